@@ -31,7 +31,7 @@ import httpx
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Depends, Header, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel, Field, ValidationError, model_validator
 
 from langgraph.errors import GraphInterrupt
@@ -76,12 +76,20 @@ from utils.alpaca.account_status_service import (
 
 # Purchase History imports
 from clera_agents.tools.purchase_history import get_comprehensive_account_activities, get_comprehensive_account_activities_async
+from clera_agents.services.web_search_cache import get_web_search_cache
 
 # Portfolio imports
 from utils.portfolio.portfolio_service import get_portfolio_service
 from utils.portfolio.abstract_provider import ProviderError
 from utils.portfolio.aggregated_portfolio_service import get_aggregated_portfolio_service
 from utils.portfolio.sector_allocation_service import get_sector_allocation_service
+from utils.portfolio.holdings_snapshot_loader import get_holdings_snapshot_loader, holdings_snapshot_scope
+from utils.portfolio.portfolio_update_broadcaster import get_portfolio_update_broadcaster, SlowConsumerError
+from utils.http_responses import etag_json_response, FastJSONResponse, CompressionMiddleware
+from utils.broker_pool import (
+    get_pooled_broker_client, get_pooled_trading_client, get_broker_latency_metrics,
+    run_broker_call, fetch_account_snapshot
+)
 
 # Portfolio History imports (Phase 1-3)
 from services.portfolio_reconstruction_manager import get_portfolio_reconstruction_manager
@@ -276,6 +284,17 @@ async def lifespan(app: FastAPI):
         )
         bg_manager.create_task(queued_order_config)
         
+        # Configure Account Closure Poller with leader election
+        # One poller advances every closing account (no task per account)
+        from services.account_closure_poller import get_account_closure_poller
+        
+        account_closure_config = BackgroundServiceConfig(
+            service_name="Account Closure Poller",
+            service_func=lambda: get_account_closure_poller().run_forever(),
+            leader_key="account_closure:poller:leader"
+        )
+        bg_manager.create_task(account_closure_config)
+        
         logger.info("✅ Background services configured with leader election")
         
     except Exception as e:
@@ -285,6 +304,14 @@ async def lifespan(app: FastAPI):
     
     # ═══════════════════════════════════════════════════════════════════════
     
+    # Reconstruction workers run on every replica (no leader election):
+    # the durable job queue hands each job to exactly one worker.
+    try:
+        get_portfolio_reconstruction_manager().start_workers()
+    except Exception as e:
+        logger.error(f"❌ Failed to start reconstruction workers: {e}")
+        startup_errors.append(f"Reconstruction workers failed to start: {str(e)}")
+    
     # Log completion of startup
     logger.info(f"API server startup process complete with {len(startup_errors)} errors/warnings.")
     
@@ -304,13 +331,30 @@ async def lifespan(app: FastAPI):
             logger.error(f"Error shutting down background services: {e}")
     else:
         logger.warning("Background service manager was not initialized - skipping shutdown")
+    
+    try:
+        await get_portfolio_reconstruction_manager().stop_workers()
+    except Exception as e:
+        logger.error(f"Error stopping reconstruction workers: {e}")
+    
+    try:
+        await get_portfolio_update_broadcaster().close()
+    except Exception as e:
+        logger.error(f"Error closing portfolio update broadcaster: {e}")
+    
+    try:
+        from utils.langgraph_client import close_langgraph_http_client
+        await close_langgraph_http_client()
+    except Exception as e:
+        logger.error(f"Error closing LangGraph HTTP client: {e}")
 
 # Create FastAPI app with lifespan
 app = FastAPI(
     title="Clera AI API",
     description="API for Clera AI platform, providing trading, portfolio management, and AI-powered financial insights.",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Register modular route modules (keep api_server.py clean)
@@ -338,6 +382,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON payloads (brotli/gzip as negotiated by the client)
+app.add_middleware(CompressionMiddleware)
+
 # Define request model
 class ChatMessage(BaseModel):
     role: str
@@ -508,9 +555,10 @@ trading_client = None
 
 if BrokerClient:
     try:
-        broker_client = BrokerClient(
-            api_key=os.getenv("BROKER_API_KEY", ""),
-            secret_key=os.getenv("BROKER_SECRET_KEY", ""),
+        # Shared pooled client (keep-alive, latency metrics, short-TTL account reads)
+        broker_client = get_pooled_broker_client(
+            os.getenv("BROKER_API_KEY", ""),
+            os.getenv("BROKER_SECRET_KEY", ""),
             sandbox=os.getenv("ALPACA_SANDBOX", "true").lower() == "true"  # Use environment variable instead of hardcoded value
         )
         # Test API keys validity
@@ -564,9 +612,9 @@ else:
 
 if TradingClient:
     try:
-        trading_client = TradingClient(
-            api_key=os.getenv("APCA_API_KEY_ID", ""),
-            secret_key=os.getenv("APCA_API_SECRET_KEY", ""),
+        trading_client = get_pooled_trading_client(
+            os.getenv("APCA_API_KEY_ID", ""),
+            os.getenv("APCA_API_SECRET_KEY", ""),
             paper=True # Assuming paper trading based on previous context
         )
     except Exception as e:
@@ -909,7 +957,7 @@ async def execute_trade(
             )
             
             if not result['success']:
-                return JSONResponse({
+                return FastJSONResponse({
                     "success": False,
                     "message": result.get('error', 'Failed to place order'),
                     "error": result.get('error')
@@ -924,7 +972,7 @@ async def execute_trade(
             # PRODUCTION-GRADE: Handle both executed orders and queued orders
             if result.get('queued'):
                 # Order was queued (market closed)
-                return JSONResponse({
+                return FastJSONResponse({
                     "success": True,
                     "queued": True,
                     "message": result.get('message', f"Order queued for market open: {action} {order_desc}"),
@@ -955,7 +1003,7 @@ async def execute_trade(
                     f"Order ID: {order['brokerage_order_id']}"
                 )
                 
-                return JSONResponse({
+                return FastJSONResponse({
                     "success": True,
                     "message": success_message,
                     "order": order
@@ -974,13 +1022,13 @@ async def execute_trade(
             # PRODUCTION-GRADE: Alpaca path only supports notional_amount, not units
             # When shares mode is used (units provided instead of notional_amount), reject with clear error
             if request.notional_amount is None:
-                return JSONResponse({
+                return FastJSONResponse({
                     "success": False,
                     "error": "Alpaca accounts only support dollar-amount orders. Please use dollar amount instead of shares."
                 }, status_code=400)
 
             if request.order_type and request.order_type.strip().upper() != 'MARKET':
-                return JSONResponse({
+                return FastJSONResponse({
                     "success": False,
                     "error": "Clera Brokerage only supports market orders at this time."
                 }, status_code=400)
@@ -992,14 +1040,14 @@ async def execute_trade(
                 side=order_side
             )
             
-            return JSONResponse({
+            return FastJSONResponse({
                 "success": True,
                 "message": result
             })
         
     except Exception as e:
         logger.error(f"Error executing trade: {e}", exc_info=True)
-        return JSONResponse({
+        return FastJSONResponse({
             "success": False,
             "message": f"Error executing trade: {str(e)}"
         }, status_code=500)
@@ -1015,19 +1063,19 @@ async def get_company_info(ticker: str):
         profile_data = company_profile(ticker.upper())
         
         if not profile_data:
-            return JSONResponse({
+            return FastJSONResponse({
                 "success": False,
                 "message": f"No data found for ticker: {ticker}"
             }, status_code=404)
         
         # Return formatted company info
-        return JSONResponse({
+        return FastJSONResponse({
             "success": True,
             "data": profile_data[0]
         })
     except Exception as e:
         logger.error(f"Error getting company info: {e}", exc_info=True)
-        return JSONResponse({
+        return FastJSONResponse({
             "success": False,
             "message": f"Error retrieving company information: {str(e)}"
         }, status_code=500)
@@ -1054,7 +1102,7 @@ async def get_latest_trade_price(ticker: str):
                  raise HTTPException(status_code=404, detail=f"Could not retrieve latest price for {ticker}")
 
             logger.info(f"Latest trade for {ticker}: Price={price} at {timestamp}")
-            return JSONResponse({
+            return FastJSONResponse({
                 "success": True,
                 "symbol": ticker,
                 "price": price,
@@ -1144,7 +1192,7 @@ async def get_stock_quotes_batch(request: BatchQuoteRequest, api_key: str = Depe
         
         if not quotes_data:
             logger.warning(f"No quote data found for symbols: {symbols}")
-            return JSONResponse({
+            return FastJSONResponse({
                 "quotes": [],
                 "errors": [f"No data available for symbols: {', '.join(symbols)}"]
             }, status_code=200)
@@ -1197,7 +1245,7 @@ async def get_stock_quotes_batch(request: BatchQuoteRequest, api_key: str = Depe
         
         logger.info(f"Returning {len(processed_quotes)} quotes for batch request. Missing: {len(missing_symbols)}")
         
-        return JSONResponse({
+        return FastJSONResponse({
             "quotes": processed_quotes,
             "errors": errors
         }, status_code=200)
@@ -1212,6 +1260,21 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+@app.get("/api/broker/metrics")
+async def get_broker_metrics(
+    api_key: str = Depends(verify_api_key)
+):
+    """Per-endpoint Alpaca request counts, errors and latency (ms) for this process."""
+    return get_broker_latency_metrics().snapshot()
+
+@app.get("/api/agents/web-search-cache/metrics")
+async def get_web_search_cache_metrics(
+    days: int = Query(7, ge=1, le=8),
+    api_key: str = Depends(verify_api_key)
+):
+    """Daily hit rate and Perplexity latency saved by the shared web search cache, across all agent processes."""
+    return {"daily": get_web_search_cache().get_shared_metrics(days)}
+
 @app.get("/info")
 async def get_info():
     """Provides basic server information, often probed by SDKs."""
@@ -1981,7 +2044,7 @@ async def get_tradable_assets():
             assets_data = await _fetch_and_cache_assets()
 
         logger.info(f"Returning {len(assets_data)} tradable assets.")
-        return JSONResponse({
+        return FastJSONResponse({
             "success": True,
             "assets": assets_data
         })
@@ -1998,7 +2061,7 @@ async def refresh_tradable_assets_cache(api_key: str = Depends(verify_api_key)):
     try:
         logger.info("Forcing refresh of tradable assets cache...")
         refreshed_assets = await _fetch_and_cache_assets()
-        return JSONResponse({
+        return FastJSONResponse({
             "success": True,
             "message": f"Successfully refreshed asset cache. Found {len(refreshed_assets)} assets.",
             "count": len(refreshed_assets)
@@ -2065,7 +2128,8 @@ def get_trading_client():
     paper = os.getenv("ALPACA_API_ENV", "paper").lower() == "paper"
     
     try:
-        return TradingClient(api_key, api_secret, paper=paper)
+        # One pooled client per credential set instead of a new session per request
+        return get_pooled_trading_client(api_key, api_secret, paper=paper)
     except Exception as e:
         logger.error(f"Failed to initialize TradingClient: {e}")
         raise HTTPException(status_code=503, detail="Trading service initialization failed")
@@ -2110,7 +2174,8 @@ async def get_portfolio_history(
             else:
                 logger.info(f"Aggregation mode: Building portfolio history from snapshots for user {authenticated_user_id}")
             aggregated_service = get_aggregated_portfolio_service()
-            return await aggregated_service.get_portfolio_history(authenticated_user_id, period, filter_account)
+            history = await aggregated_service.get_portfolio_history(authenticated_user_id, period, filter_account)
+            return etag_json_response(request, history)
     
     # PRODUCTION-GRADE: If account_id is 'null' (string) but no authenticated user,
     # this means frontend is trying to use aggregation mode without proper auth
@@ -2250,7 +2315,8 @@ async def get_aggregated_portfolio_analytics(
         
         # Calculate analytics on filtered holdings
         from utils.portfolio.aggregated_calculations import calculate_portfolio_analytics
-        analytics_result = calculate_portfolio_analytics(filtered_holdings, user_id)
+        # Risk metrics may read a year of stored prices on a model cache miss; keep the event loop free
+        analytics_result = await asyncio.to_thread(calculate_portfolio_analytics, filtered_holdings, user_id)
         
         logger.info(f"✅ Analytics calculated for {len(filtered_holdings)} holdings: risk={analytics_result['risk_score']}, diversification={analytics_result['diversification_score']}")
         
@@ -2368,8 +2434,10 @@ async def get_portfolio_analytics(
              # Return default or raise error, returning default for now
              return PortfolioAnalyticsResponse(risk_score=Decimal('0'), diversification_score=Decimal('0'))
              
-        risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions)
-        diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions)
+        # Return-based metrics read stored EOD prices; keep the event loop free
+        risk_metrics = await asyncio.to_thread(PortfolioAnalyticsEngine.calculate_risk_metrics, portfolio_positions)
+        risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions, risk_metrics=risk_metrics)
+        diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions, risk_metrics=risk_metrics)
 
         return PortfolioAnalyticsResponse(
             risk_score=risk_score,
@@ -2578,7 +2646,7 @@ async def cancel_order_for_account(
         
         logger.info(f"Successfully cancelled order {order_id} for account {account_id}")
         
-        return JSONResponse({
+        return FastJSONResponse({
             "success": True,
             "message": f"Order {order_id} has been successfully cancelled",
             "order_id": order_id,
@@ -2657,15 +2725,14 @@ async def get_portfolio_value(
         logger.info(f"Calculating live portfolio value for Alpaca account {accountId}")
         broker_client = get_broker_client()
         
-        # Get account information
-        account = broker_client.get_trade_account_by_id(accountId)
+        # Get account information and positions concurrently; the account read
+        # stays cached briefly, so the re-reads below do not hit Alpaca again
+        account, positions = await fetch_account_snapshot(broker_client, accountId)
         current_equity = float(account.equity)
         
         # Check for positions before calculating return
-        try:
-            positions = broker_client.get_all_positions_for_account(accountId)
-        except Exception as pos_err:
-            logger.error(f"API: Could not fetch positions for account {accountId} to check for cash-only status. Error: {pos_err}")
+        if isinstance(positions, Exception):
+            logger.error(f"API: Could not fetch positions for account {accountId} to check for cash-only status. Error: {positions}")
             positions = None  # Explicitly mark as fetch failure
         # --- END FIX ---
         
@@ -3082,6 +3149,7 @@ async def get_portfolio_reconstruction_status(
 @app.get("/api/portfolio/history-data/{period}")
 async def get_portfolio_history_data(
     period: str,
+    request: Request,
     user_id: str = Depends(get_authenticated_user_id),
     api_key: str = Depends(verify_api_key)
 ):
@@ -3173,7 +3241,7 @@ async def get_portfolio_history_data(
         
         logger.info(f"📈 Returning {len(timeline_data['timestamp'])} data points for {period} period")
         
-        return timeline_data
+        return etag_json_response(request, timeline_data)
         
     except Exception as e:
         logger.error(f"Error getting portfolio history data: {e}")
@@ -3235,27 +3303,17 @@ async def trigger_daily_reconstruction(
         
         logger.info(f"📊 Triggering reconstruction for {len(user_ids)} users")
         
-        # Queue reconstruction for each user (low priority for automated runs)
+        # Queue reconstruction for all users; workers prefetch prices per claimed batch
+        # (low priority for automated runs)
         reconstruction_manager = get_portfolio_reconstruction_manager()
-        queued_count = 0
+        batch = await reconstruction_manager.request_reconstruction_for_users(user_ids, priority='low')
         
-        for user_id in user_ids:
-            try:
-                await reconstruction_manager.request_reconstruction_for_user(
-                    user_id, 
-                    priority='low'  # Low priority for automated runs
-                )
-                queued_count += 1
-            except Exception as e:
-                logger.error(f"Failed to queue reconstruction for user {user_id}: {e}")
-                continue
-        
-        logger.info(f"✅ Queued {queued_count}/{len(user_ids)} users for daily reconstruction")
+        logger.info(f"✅ Queued {batch['users_queued']}/{len(user_ids)} users for daily reconstruction")
         
         return {
             'success': True,
             'users_found': len(user_ids),
-            'users_queued': queued_count,
+            'users_queued': batch['users_queued'],
             'timestamp': datetime.now().isoformat()
         }
         
@@ -3403,20 +3461,14 @@ async def get_portfolio_account_breakdown(
     try:
         # CRITICAL FIX: Always calculate LIVE account breakdown from current holdings
         # Historical snapshots are stale and don't include cash
-        from utils.supabase.db_client import get_supabase_client
-        supabase = get_supabase_client()
-        
-        # Get all current holdings with account contributions
-        result = supabase.table('user_aggregated_holdings')\
-            .select('symbol, security_type, total_market_value, account_contributions')\
-            .eq('user_id', user_id)\
-            .execute()
+        # Get all current holdings with account contributions (shared dashboard snapshot)
+        holdings = await get_holdings_snapshot_loader().load(user_id)
         
         account_breakdown = {}
         
-        if result.data:
+        if holdings:
             import json
-            for holding in result.data:
+            for holding in holdings:
                 market_value = float(holding.get('total_market_value', 0))
                 contributions = holding.get('account_contributions', [])
                 
@@ -3529,6 +3581,67 @@ async def _enhance_account_breakdown(user_id: str, account_breakdown: Dict[str,
         logger.error(f"Error enhancing account breakdown: {e}")
         return []
 
+@app.get("/api/portfolio/dashboard")
+async def get_portfolio_dashboard(
+    request: Request,
+    accountId: str = Query(..., description="Account ID (Alpaca or aggregated)"),
+    user_id: str = Depends(get_authenticated_user_id),
+    filter_account: Optional[str] = Query(None, description="Filter allocations/analytics to a specific account"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Get every dashboard view in one request.
+
+    Combines /api/portfolio/value, analytics, /api/portfolio/sector-allocation,
+    /api/portfolio/cash-stock-bond-allocation and /api/portfolio/account-breakdown.
+    The views are computed concurrently inside one holdings snapshot scope, so
+    aggregation-mode users get a single user_aggregated_holdings load for all of them.
+
+    A failing view does not fail the dashboard: its section is null and the
+    error is reported under "errors".
+    """
+    portfolio_mode = get_feature_flags().get_portfolio_mode(user_id)
+    logger.info(f"📊 Dashboard request for user {user_id}, account {accountId}, mode: {portfolio_mode}, filter: {filter_account}")
+
+    if portfolio_mode == 'aggregation':
+        analytics_view = get_aggregated_portfolio_analytics(
+            user_id=user_id, filter_account=filter_account, api_key=api_key
+        )
+        breakdown_view = get_portfolio_account_breakdown(user_id=user_id, api_key=api_key)
+    else:
+        analytics_view = get_portfolio_analytics(
+            account_id=accountId, user_id=user_id, client=get_broker_client(), api_key=api_key
+        )
+        breakdown_view = None
+
+    views = {
+        'value': get_portfolio_value(accountId=accountId, user_id=user_id, api_key=api_key),
+        'analytics': analytics_view,
+        'sector_allocation': get_sector_allocation(
+            request, account_id=accountId, user_id=user_id, filter_account=filter_account, api_key=api_key
+        ),
+        'cash_stock_bond_allocation': get_cash_stock_bond_allocation(
+            request, account_id=accountId, user_id=user_id, filter_account=filter_account, api_key=api_key
+        ),
+    }
+    if breakdown_view is not None:
+        views['account_breakdown'] = breakdown_view
+
+    with holdings_snapshot_scope():
+        results = await asyncio.gather(*views.values(), return_exceptions=True)
+
+    dashboard = {'portfolio_mode': portfolio_mode, 'account_breakdown': None, 'errors': {}}
+    for name, result in zip(views.keys(), results):
+        if isinstance(result, Exception):
+            detail = result.detail if isinstance(result, HTTPException) else str(result)
+            logger.error(f"Dashboard view '{name}' failed for user {user_id}: {detail}")
+            dashboard[name] = None
+            dashboard['errors'][name] = detail
+        else:
+            dashboard[name] = result
+
+    return dashboard
+
 # If `app` is not defined here, this code should be placed where `app` (FastAPI instance) is accessible.
 # For example, inside a function that creates the app, or in a file that defines routes for a specific module.
 
@@ -3916,14 +4029,14 @@ async def get_account_closure_task_status_endpoint(
     api_key: str = Depends(verify_api_key)
 ):
     """
-    Get status of active background task for a specific account closure.
+    Get the automated closure state for a specific account.
     
     PRODUCTION ENDPOINT: Enables monitoring of running closure processes.
     """
     try:
         from utils.alpaca.automated_account_closure import AutomatedAccountClosureProcessor
         
-        status = AutomatedAccountClosureProcessor.get_active_task_status(account_id)
+        status = await AutomatedAccountClosureProcessor.get_active_task_status(account_id)
         
         return {
             "account_id": account_id,
@@ -3941,7 +4054,7 @@ async def cancel_account_closure_task_endpoint(
     api_key: str = Depends(verify_api_key)
 ):
     """
-    Cancel active background task for a specific account closure.
+    Cancel the open automated closure for a specific account.
     
     PRODUCTION ENDPOINT: Enables stopping runaway or problematic processes.
     """
@@ -3975,14 +4088,14 @@ async def get_all_active_tasks_endpoint(
     api_key: str = Depends(verify_api_key)
 ):
     """
-    Get status of all active account closure tasks across the system.
+    Get every open automated account closure across the system.
     
     PRODUCTION MONITORING: Provides system-wide visibility of running processes.
     """
     try:
         from utils.alpaca.automated_account_closure import AutomatedAccountClosureProcessor
         
-        all_tasks = AutomatedAccountClosureProcessor.get_all_active_tasks()
+        all_tasks = await AutomatedAccountClosureProcessor.get_all_active_tasks()
         
         return {
             "active_tasks": all_tasks,
@@ -4006,34 +4119,29 @@ async def websocket_portfolio_endpoint(websocket: WebSocket, account_id: str, ap
         await websocket.accept()
         logger.info(f"WebSocket connection accepted for account {account_id}")
         
-        # Create Redis connection for this WebSocket
-        redis_url = f"redis://{CANONICAL_REDIS_HOST}:{CANONICAL_REDIS_PORT}"
-        redis_client = aioredis.Redis.from_url(redis_url)
-        pubsub = redis_client.pubsub()
-        await pubsub.subscribe(f"portfolio_updates:{account_id}")
+        # Share the process-wide Redis subscriber instead of opening a connection per socket
+        broadcaster = get_portfolio_update_broadcaster(f"redis://{CANONICAL_REDIS_HOST}:{CANONICAL_REDIS_PORT}")
+        subscription = await broadcaster.subscribe(account_id)
         
         try:
             while True:
-                # Listen for Redis messages with a timeout
                 try:
-                    message = await asyncio.wait_for(pubsub.get_message(ignore_subscribe_messages=True), timeout=30.0)
-                    if message and message['data']:
-                        # Decode and send the portfolio update
-                        data = json.loads(message['data'].decode('utf-8'))
-                        await websocket.send_text(json.dumps(data))
-                except asyncio.TimeoutError:
+                    update = await subscription.next_message(timeout=30.0)
+                except SlowConsumerError:
+                    logger.warning(f"Closing slow WebSocket consumer for account {account_id}")
+                    await websocket.close(code=4008, reason="Client too slow")
+                    break
+                
+                if update is None:
                     # Send a heartbeat to keep the connection alive
                     await websocket.send_text(json.dumps({"type": "heartbeat", "timestamp": time.time()}))
-                except Exception as e:
-                    logger.error(f"Error processing Redis message for {account_id}: {e}")
-                    break
+                else:
+                    await websocket.send_text(update)
                     
         except WebSocketDisconnect:
             logger.info(f"WebSocket disconnected for account {account_id}")
         finally:
-            await pubsub.unsubscribe(f"portfolio_updates:{account_id}")
-            await pubsub.close()
-            await redis_client.close()
+            await broadcaster.unsubscribe(subscription)
             
     except Exception as e:
         logger.error(f"WebSocket error for account {account_id}: {e}")
@@ -4307,6 +4415,25 @@ async def update_buying_power_preference(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/user/personalization/invalidate-cache")
+async def invalidate_personalization_cache(
+    user_id: str = Depends(get_authenticated_user_id)
+):
+    """
+    Invalidate the user's cached personalization prompt context.
+    
+    Called by the frontend after personalization preferences are created or
+    updated so the agent picks up the change on its next step.
+    """
+    try:
+        from utils.personalization_service import PersonalizationService
+        PersonalizationService.invalidate_personalization_cache(user_id)
+        return {'success': True}
+    except Exception as e:
+        logger.error(f"Error invalidating personalization cache: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # === USER-BASED WATCHLIST ENDPOINTS (Aggregation & Brokerage Mode) ===
 # These endpoints work for all users regardless of having an Alpaca account
 
@@ -4820,9 +4947,7 @@ async def get_cash_stock_bond_allocation(
             logger.info(f"Positions not in Redis for account {account_id}, fetching from Alpaca")
             try:
                 broker_client = get_broker_client()
-                alpaca_positions = await asyncio.to_thread(
-                    broker_client.get_all_positions_for_account, UUID(account_id)
-                )
+                alpaca_positions = await run_broker_call(broker_client.get_all_positions_for_account, UUID(account_id))
                 
                 # Convert Alpaca positions to dict format
                 positions = []
@@ -4849,9 +4974,7 @@ async def get_cash_stock_bond_allocation(
         try:
             if not broker_client:
                 broker_client = get_broker_client()
-            account = await asyncio.to_thread(
-                broker_client.get_trade_account_by_id, UUID(account_id)
-            )
+            account = await run_broker_call(broker_client.get_trade_account_by_id, UUID(account_id))
             cash_balance = Decimal(str(account.cash)) if account.cash is not None else Decimal('0')
         except Exception as e:
             logger.error(f"Error fetching cash balance for account {account_id}: {e}")
@@ -4972,7 +5095,7 @@ async def test_create_plaid_link_token(
         
     except ProviderError as e:
         logger.error(f"❌ Provider error creating link token: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=400,
             content=e.to_dict()
         )
@@ -5013,7 +5136,7 @@ async def test_exchange_plaid_token(
         
     except ProviderError as e:
         logger.error(f"Provider error exchanging token: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=400,
             content=e.to_dict()
         )
@@ -5059,7 +5182,7 @@ async def test_get_aggregated_portfolio(
         
     except ProviderError as e:
         logger.error(f"Provider error getting portfolio: {e}")
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=400,
             content=e.to_dict()
         )
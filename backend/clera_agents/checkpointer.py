@@ -0,0 +1,761 @@
+"""
+Persistent LangGraph checkpointer for the Clera agent graph.
+
+On LangGraph Platform the graph is compiled without a checkpointer and the
+platform's managed one is used. Anywhere else (self-hosted API, local runs,
+tests, benchmarks) conversation state would otherwise live in process memory,
+grow without bound, vanish on restart and stay invisible to other replicas.
+SQLCheckpointSaver keeps it in SQLite (a local file, the default) or Postgres:
+
+- Compact storage: channel values are stored once per channel version (a turn
+  that only appends messages does not rewrite account_id/user_id), and
+  payloads above COMPRESS_MIN_BYTES are zlib-compressed.
+- Pruning: only the newest `keep_last` root checkpoints per thread are kept,
+  with their writes and the channel blobs they still reference. Sub-agent
+  subgraphs write to a fresh namespace per run; a namespace is dropped once
+  no kept root checkpoint can reach it.
+- Write batching: task writes are buffered and flushed with the superstep's
+  checkpoint in one transaction; interrupts and errors (and the checkpoint
+  after them) flush immediately and every read flushes first, so a process
+  always reads its own writes.
+
+The graph does not use DeltaChannel, so pruning can drop old checkpoints
+outright. Select the backend with CLERA_CHECKPOINTER (platform, memory,
+sqlite or postgres); Postgres expects migration 029.
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import zlib
+import random
+import asyncio
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+logger = logging.getLogger(__name__)
+
+
+CHECKPOINTER_BACKEND = os.getenv("CLERA_CHECKPOINTER", "platform").lower()
+CHECKPOINT_SQLITE_PATH = os.getenv(
+    "CLERA_CHECKPOINT_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "checkpoints.sqlite3"),
+)
+CHECKPOINT_KEEP_LAST = int(os.getenv("CLERA_CHECKPOINT_KEEP_LAST", "10"))
+CHECKPOINT_BATCH_SIZE = int(os.getenv("CLERA_CHECKPOINT_BATCH_SIZE", "1"))
+CHECKPOINT_FLUSH_INTERVAL_SECONDS = float(os.getenv("CLERA_CHECKPOINT_FLUSH_INTERVAL_SECONDS", "0.5"))
+COMPRESS_MIN_BYTES = 512
+COMPRESSED_SUFFIX = "+zlib"
+
+# Writes after which the run stops (interrupt, error): flushed at once, and so is the
+# checkpoint that follows them, so another replica can resume straight away
+_STOPPING_WRITE_CHANNELS = {"__error__", "__interrupt__"}
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS agent_checkpoints (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT,
+        checkpoint_type TEXT NOT NULL,
+        checkpoint {blob} NOT NULL,
+        metadata_type TEXT NOT NULL,
+        metadata {blob} NOT NULL,
+        channel_versions TEXT NOT NULL,
+        created_at {float} NOT NULL,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agent_checkpoint_blobs (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        channel TEXT NOT NULL,
+        version TEXT NOT NULL,
+        value_type TEXT NOT NULL,
+        value {blob},
+        PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agent_checkpoint_writes (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        value_type TEXT NOT NULL,
+        value {blob},
+        task_path TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    )
+    """,
+]
+
+
+class CompactSerializer(SerializerProtocol):
+    """JsonPlus (msgpack) serialization with zlib compression for larger payloads."""
+
+    def __init__(self, serde: Optional[SerializerProtocol] = None, min_bytes: int = COMPRESS_MIN_BYTES):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_bytes = min_bytes
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.min_bytes:
+            compressed = zlib.compress(data, 6)
+            if len(compressed) < len(data):
+                return type_ + COMPRESSED_SUFFIX, compressed
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(COMPRESSED_SUFFIX):
+            return self.serde.loads_typed((type_[:-len(COMPRESSED_SUFFIX)], zlib.decompress(payload)))
+        return self.serde.loads_typed((type_, payload))
+
+
+###############################################################################
+# SQL backends (qmark placeholders, converted for Postgres)
+###############################################################################
+
+class SQLiteCheckpointBackend:
+    """Single WAL-mode SQLite file shared by the threads of one process."""
+
+    def __init__(self, path: str = CHECKPOINT_SQLITE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
+        for statement in _SCHEMA:
+            self._conn.execute(statement.format(blob="BLOB", float="REAL"))
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def executemany(self, sql: str, rows: List[Sequence[Any]]):
+        with self._lock:
+            self._conn.executemany(sql, rows)
+
+    def fetch(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def size_bytes(self) -> int:
+        if self.path == ":memory:":
+            return 0
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PostgresCheckpointBackend:
+    """
+    asyncpg pool driven from a private event loop thread.
+
+    The saver's interface is synchronous (its async methods hop to a worker
+    thread), so every statement is submitted to the pool's loop and awaited
+    from the calling thread; the graph's own event loop is never blocked.
+    """
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        import asyncpg
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="checkpoint-postgres", daemon=True)
+        self._thread.start()
+        self._pool = self._run(asyncpg.create_pool(dsn, min_size=min_size, max_size=max_size))
+        self._local = threading.local()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    @staticmethod
+    def _sql(sql: str) -> str:
+        counter = iter(range(1, 10_000))
+        return re.sub(r"\?", lambda _: f"${next(counter)}", sql)
+
+    @contextmanager
+    def transaction(self):
+        conn = self._run(self._pool.acquire())
+        tx = conn.transaction()
+        self._run(tx.start())
+        self._local.conn = conn
+        try:
+            yield self
+        except BaseException:
+            self._run(tx.rollback())
+            raise
+        else:
+            self._run(tx.commit())
+        finally:
+            self._local.conn = None
+            self._run(self._pool.release(conn))
+
+    def _executor(self):
+        return getattr(self._local, "conn", None) or self._pool
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        status = self._run(self._executor().execute(self._sql(sql), *params))
+        last = status.rsplit(" ", 1)[-1]
+        return int(last) if last.isdigit() else 0
+
+    def executemany(self, sql: str, rows: List[Sequence[Any]]):
+        self._run(self._executor().executemany(self._sql(sql), rows))
+
+    def fetch(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        return [tuple(row) for row in self._run(self._executor().fetch(self._sql(sql), *params))]
+
+    def size_bytes(self) -> int:
+        rows = self.fetch(
+            "SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0) FROM pg_class c "
+            "WHERE c.relname IN ('agent_checkpoints', 'agent_checkpoint_blobs', 'agent_checkpoint_writes')"
+        )
+        return int(rows[0][0])
+
+    def close(self):
+        self._run(self._pool.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+###############################################################################
+# Saver
+###############################################################################
+
+_UPSERT_CHECKPOINT = """
+    INSERT INTO agent_checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+        checkpoint_type, checkpoint, metadata_type, metadata, channel_versions, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id) DO UPDATE SET
+        checkpoint_type = excluded.checkpoint_type, checkpoint = excluded.checkpoint,
+        metadata_type = excluded.metadata_type, metadata = excluded.metadata,
+        channel_versions = excluded.channel_versions
+"""
+_INSERT_BLOB = """
+    INSERT INTO agent_checkpoint_blobs (thread_id, checkpoint_ns, channel, version, value_type, value)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (thread_id, checkpoint_ns, channel, version) DO NOTHING
+"""
+_INSERT_WRITE = """
+    INSERT INTO agent_checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx,
+        channel, value_type, value, task_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id, task_id, idx) DO {action}
+"""
+_UPSERT_WRITE_ACTION = "UPDATE SET channel = excluded.channel, value_type = excluded.value_type, value = excluded.value"
+_CHECKPOINT_COLUMNS = (
+    "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+    "checkpoint_type, checkpoint, metadata_type, metadata"
+)
+
+
+class _WriteBuffer:
+    """Buffered rows shared by a saver and its allowlist clones."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.rows: List[Tuple[str, tuple]] = []
+        self.checkpoints = 0
+        self.namespaces: set = set()
+        # Namespaces whose run stopped (interrupt/error); their next checkpoint is written at once
+        self.stopped: set = set()
+        self.timer: Optional[threading.Timer] = None
+        self.flushes = 0
+
+
+class SQLCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpoint saver over a SQLite or Postgres backend.
+
+    Args:
+        backend: SQLiteCheckpointBackend or PostgresCheckpointBackend
+        keep_last: Root checkpoints kept per thread (None keeps all)
+        batch_size: Checkpoints buffered before a flush (1 = one transaction per superstep)
+        flush_interval: Longest a buffered write may wait, in seconds
+        serde: Serializer (default: CompactSerializer)
+    """
+
+    def __init__(
+        self,
+        backend,
+        *,
+        keep_last: Optional[int] = CHECKPOINT_KEEP_LAST,
+        batch_size: int = CHECKPOINT_BATCH_SIZE,
+        flush_interval: float = CHECKPOINT_FLUSH_INTERVAL_SECONDS,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde or CompactSerializer())
+        self.backend = backend
+        self.keep_last = keep_last
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._buffer = _WriteBuffer()
+
+    # ------------------------------------------------------------------
+    # Write buffering
+    # ------------------------------------------------------------------
+
+    @property
+    def flushes(self) -> int:
+        return self._buffer.flushes
+
+    def _enqueue(self, rows: List[Tuple[str, tuple]], namespace: Tuple[str, str], *,
+                 checkpoint: bool = False, stopping: bool = False):
+        buffer = self._buffer
+        with buffer.lock:
+            buffer.rows.extend(rows)
+            immediate = stopping
+            if stopping:
+                buffer.stopped.add(namespace)
+            if checkpoint:
+                buffer.checkpoints += 1
+                buffer.namespaces.add(namespace)
+                if namespace in buffer.stopped:
+                    buffer.stopped.discard(namespace)
+                    immediate = True
+            if immediate or buffer.checkpoints >= self.batch_size:
+                self.flush()
+            else:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        buffer = self._buffer
+        with buffer.lock:
+            if buffer.timer is None:
+                buffer.timer = threading.Timer(self.flush_interval, self._timed_flush)
+                buffer.timer.daemon = True
+                buffer.timer.start()
+
+    def _timed_flush(self):
+        """Timer callback: nobody waits on this thread, so failures are logged and retried."""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Checkpoint flush failed, retrying in {self.flush_interval}s: {e}", exc_info=True)
+            self._schedule_flush()
+
+    def flush(self):
+        """
+        Write every buffered checkpoint and write in one transaction, then prune.
+
+        If the transaction fails the rows stay buffered and the error propagates;
+        nothing is dropped before the commit succeeds.
+        """
+        buffer = self._buffer
+        with buffer.lock:
+            if buffer.timer is not None:
+                buffer.timer.cancel()
+                buffer.timer = None
+            if not buffer.rows:
+                return
+            pending, namespaces = buffer.rows, buffer.namespaces
+
+            # One executemany per statement, rows in arrival order
+            grouped: Dict[str, List[tuple]] = {}
+            for sql, row in pending:
+                grouped.setdefault(sql, []).append(row)
+            with self.backend.transaction() as tx:
+                for sql, rows in grouped.items():
+                    tx.executemany(sql, rows)
+                if self.keep_last is not None:
+                    for thread_id in {thread_id for thread_id, _ in namespaces}:
+                        self._prune_thread(tx, thread_id, self.keep_last)
+            # Cleared only after the commit: the lock is held throughout, so a failed
+            # transaction leaves the buffer exactly as it was for the next flush
+            buffer.rows, buffer.namespaces, buffer.checkpoints = [], set(), 0
+            buffer.flushes += 1
+
+    def _prune_thread(self, tx, thread_id: str, keep_last: int):
+        """
+        Prune the root namespace to `keep_last` checkpoints and drop the subgraph
+        namespaces (checkpoint_ns "agent:<task_id>", one per sub-agent run) that
+        no kept root checkpoint can reach; the rest are pruned like the root.
+        """
+        self._prune_namespace(tx, thread_id, "", keep_last)
+        oldest_root = tx.fetch(
+            "SELECT MIN(checkpoint_id) FROM agent_checkpoints WHERE thread_id = ? AND checkpoint_ns = ''",
+            (thread_id,),
+        )[0][0]
+        if oldest_root is None:
+            return
+        # Checkpoint IDs are time-ordered and a subgraph writes its checkpoints while its parent task
+        # runs, after the root checkpoint it started from; runs older than the oldest kept root are done
+        subgraph_namespaces = tx.fetch(
+            "SELECT checkpoint_ns, MAX(checkpoint_id) FROM agent_checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns <> '' GROUP BY checkpoint_ns",
+            (thread_id,),
+        )
+        stale = [(thread_id, ns) for ns, newest in subgraph_namespaces if newest < oldest_root]
+        if stale:
+            for table in ("agent_checkpoints", "agent_checkpoint_blobs", "agent_checkpoint_writes"):
+                tx.executemany(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ?", stale)
+        stale_namespaces = {ns for _, ns in stale}
+        for ns, _ in subgraph_namespaces:
+            if ns not in stale_namespaces:
+                self._prune_namespace(tx, thread_id, ns, keep_last)
+
+    def _prune_namespace(self, tx, thread_id: str, checkpoint_ns: str, keep_last: int):
+        deleted = tx.execute(
+            """
+            DELETE FROM agent_checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id <= (
+                SELECT checkpoint_id FROM agent_checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?
+            )
+            """,
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns, keep_last),
+        )
+        if not deleted:
+            return
+        tx.execute(
+            """
+            DELETE FROM agent_checkpoint_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN (
+                SELECT checkpoint_id FROM agent_checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+            )
+            """,
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns),
+        )
+        # Versions only grow, so blobs older than the oldest version a kept checkpoint uses are unreachable
+        oldest_kept: Dict[str, str] = {}
+        for (versions_json,) in tx.fetch(
+            "SELECT channel_versions FROM agent_checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ):
+            for channel, version in json.loads(versions_json).items():
+                if channel not in oldest_kept or version < oldest_kept[channel]:
+                    oldest_kept[channel] = version
+        channels = tx.fetch(
+            "SELECT DISTINCT channel FROM agent_checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        )
+        stale = [
+            (thread_id, checkpoint_ns, channel, oldest_kept.get(channel, "~"))
+            for (channel,) in channels
+        ]
+        if stale:
+            tx.executemany(
+                "DELETE FROM agent_checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version < ?",
+                stale,
+            )
+
+    # ------------------------------------------------------------------
+    # BaseCheckpointSaver
+    # ------------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+
+        rows = []
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(c)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        rows.append((_UPSERT_CHECKPOINT, (
+            thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+            checkpoint_type, checkpoint_bytes, metadata_type, metadata_bytes,
+            json.dumps(checkpoint["channel_versions"]), time.time(),
+        )))
+        for channel, version in new_versions.items():
+            value_type, value = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)
+            rows.append((_INSERT_BLOB, (thread_id, checkpoint_ns, channel, str(version), value_type, value)))
+
+        self._enqueue(rows, (thread_id, checkpoint_ns), checkpoint=True)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            value_type, value_bytes = self.serde.dumps_typed(value)
+            # Special writes (errors, interrupts) replace earlier ones; task writes are idempotent
+            sql = _INSERT_WRITE.format(action=_UPSERT_WRITE_ACTION if write_idx < 0 else "NOTHING")
+            rows.append((sql, (
+                thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx,
+                channel, value_type, value_bytes, task_path,
+            )))
+        stopping = any(channel in _STOPPING_WRITE_CHANNELS for channel, _ in writes)
+        self._enqueue(rows, (thread_id, checkpoint_ns), stopping=stopping)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self.flush()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self.backend.fetch(
+                f"SELECT {_CHECKPOINT_COLUMNS} FROM agent_checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self.backend.fetch(
+                f"SELECT {_CHECKPOINT_COLUMNS} FROM agent_checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        if not rows:
+            return None
+        return self._load_tuple(rows[0])
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        self.flush()
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = f"SELECT {_CHECKPOINT_COLUMNS} FROM agent_checkpoints"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY checkpoint_id DESC"
+        if limit is not None and not filter:
+            sql += f" LIMIT {int(limit)}"
+
+        remaining = limit
+        for row in self.backend.fetch(sql, params):
+            if remaining is not None and remaining <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if remaining is not None:
+                remaining -= 1
+            yield self._load_tuple(row)
+
+    def _load_tuple(self, row: tuple) -> CheckpointTuple:
+        (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+         checkpoint_type, checkpoint_bytes, metadata_type, metadata_bytes) = row
+        checkpoint: Checkpoint = self.serde.loads_typed((checkpoint_type, bytes(checkpoint_bytes)))
+
+        channel_values: Dict[str, Any] = {}
+        versions = checkpoint["channel_versions"]
+        if versions:
+            pairs = [param for channel, version in versions.items() for param in (channel, str(version))]
+            blob_rows = self.backend.fetch(
+                "SELECT channel, value_type, value FROM agent_checkpoint_blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND ("
+                + " OR ".join("(channel = ? AND version = ?)" for _ in versions) + ")",
+                (thread_id, checkpoint_ns, *pairs),
+            )
+            for channel, value_type, value in blob_rows:
+                if value_type != "empty":
+                    channel_values[channel] = self.serde.loads_typed((value_type, bytes(value)))
+
+        write_rows = self.backend.fetch(
+            "SELECT task_id, idx, channel, value_type, value, task_path FROM agent_checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        write_rows.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((metadata_type, bytes(metadata_bytes))),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, bytes(value) if value is not None else b"")))
+                for task_id, _, channel, value_type, value, _ in write_rows
+            ],
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.flush()
+        with self.backend.transaction() as tx:
+            for table in ("agent_checkpoints", "agent_checkpoint_blobs", "agent_checkpoint_writes"):
+                tx.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        if strategy == "delete":
+            for thread_id in thread_ids:
+                self.delete_thread(thread_id)
+            return
+        if strategy != "keep_latest":
+            raise ValueError(f"Unknown prune strategy: {strategy}")
+        self.flush()
+        with self.backend.transaction() as tx:
+            for thread_id in thread_ids:
+                self._prune_thread(tx, thread_id, 1)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def with_allowlist(self, extra_allowlist) -> "SQLCheckpointSaver":
+        if isinstance(self.serde, CompactSerializer) and isinstance(self.serde.serde, JsonPlusSerializer):
+            inner = self.serde.serde.with_msgpack_allowlist(extra_allowlist)
+            if inner is self.serde.serde:
+                return self
+            clone = copy.copy(self)
+            clone.serde = CompactSerializer(inner, self.serde.min_bytes)
+            return clone
+        return super().with_allowlist(extra_allowlist)
+
+    # Async variants run the synchronous ones on a worker thread
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+    def close(self):
+        """Flush buffered writes and close the backend."""
+        self.flush()
+        self.backend.close()
+
+
+def get_checkpointer(backend: str = CHECKPOINTER_BACKEND) -> Optional[BaseCheckpointSaver]:
+    """
+    Checkpointer to compile the agent graph with.
+
+    Returns None for 'platform' (LangGraph Platform supplies its own), an
+    InMemorySaver for 'memory', and a SQLCheckpointSaver for 'sqlite'
+    (CLERA_CHECKPOINT_SQLITE_PATH) or 'postgres' (CLERA_CHECKPOINT_DATABASE_URL).
+    """
+    if backend == "platform":
+        return None
+    if backend == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+    if backend == "sqlite":
+        logger.info(f"Using SQLite checkpointer at {CHECKPOINT_SQLITE_PATH}")
+        return SQLCheckpointSaver(SQLiteCheckpointBackend(CHECKPOINT_SQLITE_PATH))
+    if backend == "postgres":
+        dsn = os.getenv("CLERA_CHECKPOINT_DATABASE_URL")
+        if not dsn:
+            raise RuntimeError("CLERA_CHECKPOINT_DATABASE_URL must be set when CLERA_CHECKPOINTER=postgres")
+        return SQLCheckpointSaver(PostgresCheckpointBackend(dsn))
+    raise ValueError(f"Unknown CLERA_CHECKPOINTER backend: {backend}")
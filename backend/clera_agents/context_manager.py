@@ -0,0 +1,211 @@
+"""
+Context management for the Clera supervisor and sub-agents.
+
+State.messages keeps every message of a conversation, and without this stage
+every LLM hop (supervisor and each sub-agent) was sent all of it, including
+multi-kilobyte tool outputs such as get_portfolio_summary from turns long
+past. The pre-model hooks built here give each hop a bounded view instead,
+without rewriting the stored history:
+
+- The current turn (from the latest user message on) is always sent
+  verbatim; it holds the tool results the model is working with.
+- Tool outputs from earlier turns are collapsed into short references
+  (tool name, size and a preview). The model can call the tool again.
+- When earlier turns still exceed the hop's token budget, the supervisor
+  folds the oldest of them into a rolling summary kept in state
+  (context_summary / summary_through_id). It folds at least
+  SUMMARY_BATCH_TOKENS at a time, so the summarizer runs every few turns,
+  not on every hop. Sub-agents reuse that summary and drop older turns that
+  do not fit.
+
+Token counts are approximate (langchain's count_tokens_approximately), which
+is enough to bound the context size.
+"""
+
+import os
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+logger = logging.getLogger(__name__)
+
+
+SUPERVISOR_CONTEXT_TOKEN_BUDGET = int(os.getenv("CLERA_SUPERVISOR_CONTEXT_TOKEN_BUDGET", "8000"))
+AGENT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CLERA_AGENT_CONTEXT_TOKEN_BUDGET", "6000"))
+STALE_TOOL_OUTPUT_CHARS = 600
+TOOL_PREVIEW_CHARS = 160
+SUMMARY_BATCH_TOKENS = 1500
+SUMMARY_PREFIX = "Summary of the earlier conversation with this user:\n"
+
+Summarizer = Callable[[Optional[str], List[BaseMessage]], str]
+
+SUMMARY_INSTRUCTIONS = """You maintain the running summary of a conversation between a user and Clera, an AI financial advisor.
+Update the summary with the new messages below. Keep what later turns may depend on: the user's goals and
+preferences, holdings and amounts mentioned, trades requested or executed (ticker, dollar amount, outcome),
+recommendations given and open questions. Drop pleasantries and tool plumbing. Write at most 200 words of
+plain sentences."""
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    return count_tokens_approximately(list(messages)) if messages else 0
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def collapse_tool_output(message: ToolMessage) -> ToolMessage:
+    """Replace a large tool result with a compact reference (same tool_call_id)."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if len(content) <= STALE_TOOL_OUTPUT_CHARS:
+        return message
+    # Citations comments from web_search are not useful in a preview
+    preview = " ".join(content.split("<!--", 1)[0].split())[:TOOL_PREVIEW_CHARS]
+    reference = (
+        f"[Earlier {message.name or 'tool'} output ({len(content):,} chars) omitted to save context; "
+        f"call the tool again if current figures are needed. It began: {preview}...]"
+    )
+    return message.model_copy(update={"content": reference})
+
+
+def _collapse_turn(turn: List[BaseMessage]) -> List[BaseMessage]:
+    return [collapse_tool_output(m) if isinstance(m, ToolMessage) else m for m in turn]
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return " ".join(str(content).split())
+
+
+def extractive_summary(previous: Optional[str], messages: List[BaseMessage]) -> str:
+    """Summarizer that needs no LLM: the questions asked and the start of each answer."""
+    lines = [previous] if previous else []
+    for message in messages:
+        text = _message_text(message)
+        if not text:
+            continue
+        if isinstance(message, HumanMessage):
+            lines.append(f"- User asked: {text[:200]}")
+        elif isinstance(message, AIMessage) and not message.tool_calls:
+            speaker = message.name or "Clera"
+            lines.append(f"- {speaker} answered: {text[:300]}")
+    return "\n".join(lines)
+
+
+def llm_summarizer(llm) -> Summarizer:
+    """Summarizer backed by a chat model, falling back to the extractive one on errors."""
+
+    def summarize(previous: Optional[str], messages: List[BaseMessage]) -> str:
+        transcript = "\n".join(
+            f"{type(m).__name__.replace('Message', '')}: {_message_text(m)[:1500]}"
+            for m in messages if _message_text(m)
+        )
+        prompt = [
+            SystemMessage(content=SUMMARY_INSTRUCTIONS),
+            HumanMessage(content=f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"),
+        ]
+        try:
+            return _message_text(llm.invoke(prompt))
+        except Exception as e:
+            logger.warning(f"Context summarization failed, using extractive summary: {e}")
+            return extractive_summary(previous, messages)
+
+    return summarize
+
+
+def build_context(
+    messages: Sequence[BaseMessage],
+    *,
+    budget: int,
+    summary: Optional[str] = None,
+    summary_through_id: Optional[str] = None,
+    summarizer: Optional[Summarizer] = None,
+) -> Dict[str, Any]:
+    """
+    Messages for one LLM hop, within `budget` tokens where possible.
+
+    Args:
+        messages: Full conversation history from state
+        budget: Token budget for the messages sent (the system prompt is extra)
+        summary: Rolling summary of messages up to summary_through_id
+        summary_through_id: ID of the last message folded into the summary
+        summarizer: Folds older turns into the summary; None drops them instead
+
+    Returns:
+        {"llm_input_messages": [...]} plus "context_summary" and
+        "summary_through_id" when the summary was extended.
+    """
+    messages = list(messages)
+    if summary and summary_through_id:
+        for index, message in enumerate(messages):
+            if message.id == summary_through_id:
+                messages = messages[index + 1:]
+                break
+        else:
+            # The summarized prefix is gone (history rewritten); start over
+            summary = None
+
+    turns = split_turns(messages)
+    if not turns:
+        return {"llm_input_messages": messages}
+    current = turns[-1]
+    older = [_collapse_turn(turn) for turn in turns[:-1]]
+    update: Dict[str, Any] = {}
+
+    def assemble() -> List[BaseMessage]:
+        head = [SystemMessage(content=SUMMARY_PREFIX + summary)] if summary else []
+        return head + [m for turn in older for m in turn] + current
+
+    over = count_tokens(assemble()) - budget
+    if over > 0 and older:
+        # Oldest turns go first; fold at least a batch so the summary is not rebuilt every hop
+        target = max(over, SUMMARY_BATCH_TOKENS) if summarizer else over
+        folded: List[BaseMessage] = []
+        while older and count_tokens(folded) < target:
+            folded.extend(older.pop(0))
+        if summarizer:
+            started = time.monotonic()
+            summary = summarizer(summary, folded)
+            update = {"context_summary": summary, "summary_through_id": folded[-1].id}
+            logger.info(
+                f"Folded {len(folded)} messages into the conversation summary "
+                f"in {time.monotonic() - started:.2f}s"
+            )
+
+    if count_tokens(assemble()) > budget:
+        # Still over: collapse this turn's tool outputs except the newest one the model is answering from
+        tool_indexes = [i for i, m in enumerate(current) if isinstance(m, ToolMessage)]
+        current = list(current)
+        for index in tool_indexes[:-1]:
+            current[index] = collapse_tool_output(current[index])
+            if count_tokens(assemble()) <= budget:
+                break
+
+    return {"llm_input_messages": assemble(), **update}
+
+
+def make_context_hook(budget: int, summarizer: Optional[Summarizer] = None) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """pre_model_hook for create_supervisor / create_react_agent."""
+
+    def context_hook(state: Dict[str, Any]) -> Dict[str, Any]:
+        return build_context(
+            state["messages"],
+            budget=budget,
+            summary=state.get("context_summary"),
+            summary_through_id=state.get("summary_through_id"),
+            summarizer=summarizer,
+        )
+
+    return context_hook
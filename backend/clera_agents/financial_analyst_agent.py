@@ -5,18 +5,21 @@
 
 # Import necessary libraries
 import os
+import time
+import asyncio
 import logging
 import requests
+import httpx
 from dotenv import load_dotenv
 from urllib.request import urlopen
 import certifi
 import json
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal, InvalidOperation
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import pandas as pd
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_core.tools import tool
+from langchain_core.tools import tool, StructuredTool
 import numpy as np
 from openai import OpenAI
 
@@ -60,6 +63,7 @@ logger = logging.getLogger(__name__)
 
 # Import shared market data utilities
 from utils.market_data import get_stock_quote
+from clera_agents.services.web_search_cache import get_web_search_cache, split_citations
 
 ###############################################################################
 # Import LLM client(s)
@@ -136,7 +140,7 @@ Query: {query}
         {"role": "user", "content": query}
     ]
     
-    try:
+    def _search() -> str:
         # Call Perplexity Chat Completions API directly to get citations
         print(f"[WEB_SEARCH] Calling Perplexity API with model: {model_name}")
         response = pplx_client.chat.completions.create(messages=messages, model=model_name)
@@ -169,6 +173,9 @@ Query: {query}
 
         print("[DEBUG] No citations found in response")
         return clean_text
+
+    try:
+        return get_web_search_cache().get_or_fetch(query, model_name, _search)
     except Exception as e:
         print(f"[ERROR] Exception in web_search: {e}")
         import traceback
@@ -225,7 +232,7 @@ Query: {query}
         {"role": "user", "content": query}
     ]
 
-    try:
+    def _search() -> str:
         # Stream the response
         answer_text = ""
 
@@ -264,12 +271,165 @@ Query: {query}
             return f"{clean_text}\n\n<!-- CITATIONS: {citations_str} -->"
 
         return clean_text
+
+    def _emit_cached(response: str):
+        if stream_callback:
+            stream_callback(split_citations(response))
+
+    try:
+        return get_web_search_cache().get_or_fetch(query, model_name, _search, on_cached=_emit_cached)
     except Exception as e:
         return f"Error searching for information: {e}"
 
 
-@tool("get_stock_price")
-def get_stock_price(ticker: str) -> str:
+###############################################################################
+# Pooled FMP client and EOD series cache (shared across tool calls)
+###############################################################################
+
+FMP_EOD_URL = "https://financialmodelingprep.com/stable/historical-price-eod/full"
+FMP_QUOTE_SHORT_URL = "https://financialmodelingprep.com/api/v3/quote-short/{symbol}"
+FMP_MAX_CONNECTIONS = int(os.getenv("ANALYST_FMP_MAX_CONNECTIONS", "20"))
+EOD_CACHE_TTL_SECONDS = int(os.getenv("ANALYST_EOD_CACHE_TTL_SECONDS", "600"))
+EOD_CACHE_MAX_ENTRIES = 256
+MAX_COMPARE_SYMBOLS = 10
+
+_fmp_http_client: Optional[httpx.AsyncClient] = None
+_fmp_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# (symbol, start_date, end_date) -> (expires_at, series)
+_eod_series_cache: Dict[Tuple[str, str, str], Tuple[float, list]] = {}
+
+
+def _get_fmp_http_client() -> httpx.AsyncClient:
+    """Get the pooled async client for FMP requests, bound to the running loop."""
+    global _fmp_http_client, _fmp_http_client_loop
+    loop = asyncio.get_running_loop()
+    if _fmp_http_client is None or _fmp_http_client.is_closed or _fmp_http_client_loop is not loop:
+        _fmp_http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=FMP_MAX_CONNECTIONS,
+                max_keepalive_connections=FMP_MAX_CONNECTIONS,
+            ),
+        )
+        _fmp_http_client_loop = loop
+    return _fmp_http_client
+
+
+async def close_fmp_http_client():
+    """
+    Close the pooled FMP client (the next request opens a new one).
+
+    The graph runs in the LangGraph server, which has no shutdown hook for
+    it, so process exit normally releases the pool; call this before closing
+    an event loop that used the client.
+    """
+    global _fmp_http_client, _fmp_http_client_loop
+    if _fmp_http_client is not None and not _fmp_http_client.is_closed:
+        await _fmp_http_client.aclose()
+    _fmp_http_client = None
+    _fmp_http_client_loop = None
+
+
+def clear_eod_series_cache():
+    """Drop all cached EOD series."""
+    _eod_series_cache.clear()
+
+
+def _get_cached_eod_series(key: Tuple[str, str, str]) -> Optional[list]:
+    entry = _eod_series_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, series = entry
+    if expires_at < time.monotonic():
+        _eod_series_cache.pop(key, None)
+        return None
+    return series
+
+
+def _set_cached_eod_series(key: Tuple[str, str, str], series: list):
+    if len(_eod_series_cache) >= EOD_CACHE_MAX_ENTRIES:
+        # Evict the entry closest to expiry
+        oldest = min(_eod_series_cache, key=lambda k: _eod_series_cache[k][0])
+        _eod_series_cache.pop(oldest, None)
+    _eod_series_cache[key] = (time.monotonic() + EOD_CACHE_TTL_SECONDS, series)
+
+
+async def _load_stored_eod_series(symbol: str, start_date: str, end_date: str) -> Optional[list]:
+    """Read the series from global_historical_prices when it already covers the range."""
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    # The EOD pipeline lags the current session; recent ranges go to FMP
+    if end >= date.today() - timedelta(days=1):
+        return None
+    try:
+        from services.historical_price_service import get_historical_price_service
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        return await get_historical_price_service().get_stored_eod_series(symbol, start, end)
+    except Exception as e:
+        logger.debug(f"[Performance Analysis] Stored prices unavailable for {symbol}: {e}")
+        return None
+
+
+async def _fetch_eod_series(symbol: str, start_date: str, end_date: str) -> list:
+    """Get an EOD close series: in-process cache, then stored prices, then FMP.
+    
+    Raises:
+        Exception: With the same messages as get_historical_prices on FMP errors
+    """
+    key = (symbol, start_date, end_date)
+    cached = _get_cached_eod_series(key)
+    if cached is not None:
+        logger.info(f"[Performance Analysis] EOD cache hit for {symbol} ({start_date} to {end_date})")
+        return cached
+    
+    series = await _load_stored_eod_series(symbol, start_date, end_date)
+    if series:
+        logger.info(f"[Performance Analysis] Using {len(series)} stored prices for {symbol}")
+    else:
+        fmp_api_key = os.getenv("FINANCIAL_MODELING_PREP_API_KEY")
+        if not fmp_api_key:
+            raise Exception("FMP API key not found. Please set FINANCIAL_MODELING_PREP_API_KEY environment variable.")
+        params = {'symbol': symbol, 'from': start_date, 'to': end_date, 'apikey': fmp_api_key}
+        try:
+            logger.info(f"[Performance Analysis] Making FMP API request for {symbol}")
+            response = await _get_fmp_http_client().get(FMP_EOD_URL, params=params)
+            response.raise_for_status()
+            series = response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"[Performance Analysis] FMP API request failed for {symbol}: {e}")
+            if e.response.status_code == 401:
+                raise Exception("FMP API authentication failed. Please check your API key.")
+            elif e.response.status_code == 429:
+                raise Exception("FMP API rate limit exceeded. Please try again later.")
+            raise Exception(f"FMP API request failed: {e}") from e
+        except httpx.HTTPError as e:
+            logger.error(f"[Performance Analysis] FMP API request failed for {symbol}: {e}")
+            raise Exception(f"FMP API request failed: {e}") from e
+        except Exception as e:
+            logger.error(f"[Performance Analysis] Error parsing FMP response for {symbol}: {e}")
+            raise Exception(f"Error processing FMP data for {symbol}: {e}")
+    
+    if series and isinstance(series, list):
+        _set_cached_eod_series(key, series)
+    return series
+
+
+def _format_stock_price(ticker: str, stock_quote) -> str:
+    # Check if we got valid data
+    if not stock_quote or len(stock_quote) == 0:
+        return f"Unable to retrieve price data for {ticker}. The symbol may be invalid or the market data service may be unavailable."
+    
+    # Extract price from the first item in the list
+    quote_data = stock_quote[0] if isinstance(stock_quote, list) else stock_quote
+    price = quote_data.get('price')
+    
+    if price is None:
+        return f"Price data for {ticker} is not available. The symbol may be invalid or trading may be halted."
+    
+    return f"The current price of {ticker} is ${price:.2f}."
+
+
+def _get_stock_price(ticker: str) -> str:
     """Get the current price of a stock.
     
     Args:
@@ -279,24 +439,32 @@ def get_stock_price(ticker: str) -> str:
         str: The current stock price information
     """
     try:
-        stock_quote = get_stock_quote(ticker)
-        
-        # Check if we got valid data
-        if not stock_quote or len(stock_quote) == 0:
-            return f"Unable to retrieve price data for {ticker}. The symbol may be invalid or the market data service may be unavailable."
-        
-        # Extract price from the first item in the list
-        quote_data = stock_quote[0] if isinstance(stock_quote, list) else stock_quote
-        price = quote_data.get('price')
-        
-        if price is None:
-            return f"Price data for {ticker} is not available. The symbol may be invalid or trading may be halted."
-        
-        return f"The current price of {ticker} is ${price:.2f}."
+        return _format_stock_price(ticker, get_stock_quote(ticker))
     except Exception as e:
         logger.error(f"Error getting stock price for {ticker}: {e}")
         return f"Error retrieving price data for {ticker}: {str(e)}"
 
+
+async def _get_stock_price_async(ticker: str) -> str:
+    try:
+        response = await _get_fmp_http_client().get(
+            FMP_QUOTE_SHORT_URL.format(symbol=ticker),
+            params={'apikey': os.getenv("FINANCIAL_MODELING_PREP_API_KEY")},
+        )
+        response.raise_for_status()
+        return _format_stock_price(ticker, response.json())
+    except Exception as e:
+        logger.error(f"Error getting stock price for {ticker}: {e}")
+        return f"Error retrieving price data for {ticker}: {str(e)}"
+
+
+get_stock_price = StructuredTool.from_function(
+    func=_get_stock_price,
+    coroutine=_get_stock_price_async,
+    name="get_stock_price",
+    description=_get_stock_price.__doc__,
+)
+
 ###############################################################################
 # Performance Analysis Functions (moved from portfolio_management_agent.py)
 ###############################################################################
@@ -352,11 +520,8 @@ def adjust_for_market_days(date_str: str, direction: str = "backward") -> str:
         str: Adjusted date string
     """
     try:
-        from pandas.tseries.holiday import USFederalHolidayCalendar
-        from pandas.tseries.offsets import CustomBusinessDay
-        
+        # Weekends only: no holiday calendar is built here, this runs on the event loop in the async tools
         date_obj = pd.to_datetime(date_str)
-        us_bd = CustomBusinessDay(calendar=USFederalHolidayCalendar())
         
         if direction == "backward":
             # Find previous business day if current date is not a business day
@@ -398,6 +563,63 @@ def calculate_volatility_and_variance(price_data: list) -> dict:
     }
 
 
+def _build_price_result(symbol: str, start_date: str, end_date: str, data: list, return_full_data: bool = False) -> Dict:
+    """Turn an EOD price series into the start/end price summary used by the analysis.
+    
+    Args:
+        symbol: Stock symbol
+        start_date: Requested start date
+        end_date: Requested end date
+        data: List of dicts with 'date' and 'close' (any order)
+        return_full_data: If True, include the sorted series as 'full_price_data'
+    
+    Raises:
+        ValueError: If the series is empty or has non-positive prices
+    """
+    # Validate response data (FMP returns a list of price objects)
+    if not data or not isinstance(data, list):
+        raise ValueError(f"No data available for {symbol} in the specified date range ({start_date} to {end_date})")
+    
+    if len(data) == 0:
+        raise ValueError(f"No price data available for {symbol} in the specified date range ({start_date} to {end_date}). This could be due to:\n• Invalid date range (weekends, holidays, or non-trading days)\n• Symbol not traded during this period\n• Data not available for this symbol")
+    
+    # Sort data by date (FMP returns newest first, we want oldest first for analysis)
+    data = sorted(data, key=lambda x: x['date'])
+    
+    # Extract start and end prices
+    try:
+        start_price = float(data[0]['close'])
+        end_price = float(data[-1]['close'])
+        actual_start_date = data[0]['date']
+        actual_end_date = data[-1]['date']
+    except (KeyError, IndexError, ValueError) as e:
+        logger.error(f"[Performance Analysis] Error extracting prices from FMP data for {symbol}: {e}")
+        raise Exception(f"Data format error: unable to extract price information for {symbol}")
+    
+    # Validate price data
+    if start_price <= 0 or end_price <= 0:
+        raise ValueError(f"Invalid price data for {symbol}: start_price={start_price}, end_price={end_price}")
+    
+    logger.info(f"[Performance Analysis] Successfully retrieved {len(data)} data points for {symbol}")
+    
+    result = {
+        'symbol': symbol,
+        'requested_start_date': start_date,
+        'requested_end_date': end_date,
+        'actual_start_date': actual_start_date,
+        'actual_end_date': actual_end_date,
+        'start_price': Decimal(str(start_price)),
+        'end_price': Decimal(str(end_price)),
+        'price_change': Decimal(str(end_price - start_price)),
+        'percentage_change': Decimal(str((end_price - start_price) / start_price * 100)),
+        'data_points': len(data),
+        'has_data': True
+    }
+    if return_full_data:
+        result['full_price_data'] = data
+    return result
+
+
 def get_historical_prices(symbol: str, start_date: str, end_date: str = None, return_full_data: bool = False) -> Dict:
     """Get historical prices for performance calculation using FMP API.
     
@@ -456,51 +678,35 @@ def get_historical_prices(symbol: str, start_date: str, end_date: str = None, re
             logger.error(f"[Performance Analysis] Error parsing FMP response for {symbol}: {e}")
             raise Exception(f"Error processing FMP data for {symbol}: {e}")
         
-        # Validate response data (FMP returns a list of price objects)
-        if not data or not isinstance(data, list):
-            raise ValueError(f"No data available for {symbol} in the specified date range ({start_date} to {end_date})")
-        
-        if len(data) == 0:
-            raise ValueError(f"No price data available for {symbol} in the specified date range ({start_date} to {end_date}). This could be due to:\n• Invalid date range (weekends, holidays, or non-trading days)\n• Symbol not traded during this period\n• Data not available for this symbol")
-        
-        # Sort data by date (FMP returns newest first, we want oldest first for analysis)
-        data.sort(key=lambda x: x['date'])
-        
-        # Extract start and end prices
-        try:
-            start_price = float(data[0]['close'])
-            end_price = float(data[-1]['close'])
-            actual_start_date = data[0]['date']
-            actual_end_date = data[-1]['date']
-        except (KeyError, IndexError, ValueError) as e:
-            logger.error(f"[Performance Analysis] Error extracting prices from FMP data for {symbol}: {e}")
-            raise Exception(f"Data format error: unable to extract price information for {symbol}")
+        return _build_price_result(symbol, start_date, end_date, data, return_full_data)
         
-        # Validate price data
-        if start_price <= 0 or end_price <= 0:
-            raise ValueError(f"Invalid price data for {symbol}: start_price={start_price}, end_price={end_price}")
-        
-        logger.info(f"[Performance Analysis] Successfully retrieved {len(data)} data points for {symbol}")
+    except ValueError:
+        # Re-raise ValueError as-is (these are user-facing validation errors)
+        raise
+    except Exception as e:
+        logger.error(f"[Performance Analysis] Unexpected error fetching data for {symbol}: {e}", exc_info=True)
+        raise Exception(f"Unexpected error retrieving market data for {symbol}: {str(e)}")
+
+
+async def get_historical_prices_async(symbol: str, start_date: str, end_date: str = None, return_full_data: bool = False) -> Dict:
+    """Async get_historical_prices backed by the shared EOD series cache and pooled client.
+    
+    Stored prices in global_historical_prices are used before calling FMP.
+    Raises the same errors as get_historical_prices.
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime('%Y-%m-%d')
+    logger.info(f"[Performance Analysis] Fetching historical data for {symbol} from {start_date} to {end_date}")
+    
+    try:
+        validation = validate_symbol_and_dates(symbol, start_date, end_date)
+        if 'error' in validation:
+            raise ValueError(validation['error'])
         
-        result = {
-            'symbol': symbol,
-            'requested_start_date': start_date,
-            'requested_end_date': end_date,
-            'actual_start_date': actual_start_date,
-            'actual_end_date': actual_end_date,
-            'start_price': Decimal(str(start_price)),
-            'end_price': Decimal(str(end_price)),
-            'price_change': Decimal(str(end_price - start_price)),
-            'percentage_change': Decimal(str((end_price - start_price) / start_price * 100)),
-            'data_points': len(data),
-            'has_data': True
-        }
-        if return_full_data:
-            result['full_price_data'] = data
-        return result
+        data = await _fetch_eod_series(symbol.upper(), start_date, end_date)
+        return _build_price_result(symbol, start_date, end_date, data, return_full_data)
         
     except ValueError:
-        # Re-raise ValueError as-is (these are user-facing validation errors)
         raise
     except Exception as e:
         logger.error(f"[Performance Analysis] Unexpected error fetching data for {symbol}: {e}", exc_info=True)
@@ -671,8 +877,63 @@ def _calculate_investment_performance_impl(
         logger.error(f"[Performance Analysis] Unexpected error in calculate_investment_performance: {e}", exc_info=True)
         return f"❌ **Unexpected Error:** An error occurred while analyzing {symbol}. Please try again later."
 
-@tool("calculate_investment_performance")
-def calculate_investment_performance(
+def _resolve_analysis_dates(start_date: str, end_date: str) -> Tuple[str, str]:
+    if not end_date or end_date == "":
+        end_date = datetime.now().strftime('%Y-%m-%d')
+    # Always adjust both dates backwards to the previous trading day
+    return adjust_for_market_days(start_date, "backward"), adjust_for_market_days(end_date, "backward")
+
+
+async def _fetch_performance_data(symbol: str, start_date: str, end_date: str) -> Dict:
+    performance_data = await get_historical_prices_async(symbol, start_date, end_date, return_full_data=True)
+    if 'full_price_data' in performance_data:
+        performance_data.update(calculate_volatility_and_variance(performance_data['full_price_data']))
+    return performance_data
+
+
+async def _calculate_investment_performance_impl_async(
+    symbol: str,
+    start_date: str,
+    end_date: str = "",
+    compare_to_sp500: bool = True
+) -> str:
+    """Async _calculate_investment_performance_impl: the symbol and SPY are fetched concurrently."""
+    try:
+        adjusted_start, adjusted_end = _resolve_analysis_dates(start_date, end_date)
+        if adjusted_start == adjusted_end:
+            return f"❌ **Error:** The selected date range only includes a single trading day: {adjusted_start}. Please select a wider range for meaningful analysis."
+        validation = validate_symbol_and_dates(symbol.upper(), adjusted_start, adjusted_end)
+        if 'error' in validation and 'Start date must be before end date' not in validation['error']:
+            return f"❌ **Error:** {validation['error']}"
+        logger.info(f"[Performance Analysis] Analyzing {symbol.upper()} from {adjusted_start} to {adjusted_end}")
+        
+        fetches = [_fetch_performance_data(symbol.upper(), adjusted_start, adjusted_end)]
+        if compare_to_sp500:
+            fetches.append(get_historical_prices_async('SPY', adjusted_start, adjusted_end))
+        results = await asyncio.gather(*fetches, return_exceptions=True)
+        
+        performance_data = results[0]
+        if isinstance(performance_data, ValueError):
+            return f"❌ **Data Error:** {str(performance_data)}\n\nPlease verify the symbol exists and has trading data for the specified period."
+        if isinstance(performance_data, Exception):
+            logger.error(f"[Performance Analysis] API error for {symbol}: {performance_data}")
+            return f"❌ **API Error:** Could not retrieve data for {symbol.upper()}. This might be due to:\n• Invalid symbol\n• Market data service unavailable\n• Network connectivity issues\n\nPlease try again later or verify the symbol."
+        
+        benchmark_data = None
+        if compare_to_sp500:
+            if isinstance(results[1], Exception):
+                logger.warning(f"[Performance Analysis] Could not fetch SPY benchmark data: {results[1]}")
+            else:
+                benchmark_data = results[1]
+        analysis = format_performance_analysis(performance_data, benchmark_data)
+        logger.info(f"[Performance Analysis] Successfully completed analysis for {symbol.upper()}")
+        return analysis
+    except Exception as e:
+        logger.error(f"[Performance Analysis] Unexpected error in calculate_investment_performance: {e}", exc_info=True)
+        return f"❌ **Unexpected Error:** An error occurred while analyzing {symbol}. Please try again later."
+
+
+def _calculate_investment_performance(
     symbol: str,
     start_date: str,
     end_date: str = "",
@@ -680,3 +941,93 @@ def calculate_investment_performance(
 ) -> str:
     """Calculate investment performance between two dates, with optional S&P 500 benchmark comparison. Returns formatted analysis string."""
     return _calculate_investment_performance_impl(symbol, start_date, end_date, compare_to_sp500)
+
+
+calculate_investment_performance = StructuredTool.from_function(
+    func=_calculate_investment_performance,
+    coroutine=_calculate_investment_performance_impl_async,
+    name="calculate_investment_performance",
+    description=_calculate_investment_performance.__doc__,
+)
+
+
+async def _compare_investment_performance_impl_async(
+    symbols: List[str],
+    start_date: str,
+    end_date: str = "",
+    compare_to_sp500: bool = True
+) -> str:
+    """Fetch every symbol (and SPY once) concurrently and rank them by total return."""
+    tickers = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    if not tickers:
+        return "❌ **Error:** Provide at least one symbol to compare."
+    if len(tickers) > MAX_COMPARE_SYMBOLS:
+        return f"❌ **Error:** Compare at most {MAX_COMPARE_SYMBOLS} symbols at a time."
+    
+    try:
+        adjusted_start, adjusted_end = _resolve_analysis_dates(start_date, end_date)
+        if adjusted_start == adjusted_end:
+            return f"❌ **Error:** The selected date range only includes a single trading day: {adjusted_start}. Please select a wider range for meaningful analysis."
+        for ticker in tickers:
+            validation = validate_symbol_and_dates(ticker, adjusted_start, adjusted_end)
+            if 'error' in validation:
+                return f"❌ **Error:** {ticker}: {validation['error']}"
+        logger.info(f"[Performance Analysis] Comparing {', '.join(tickers)} from {adjusted_start} to {adjusted_end}")
+        
+        fetches = [_fetch_performance_data(ticker, adjusted_start, adjusted_end) for ticker in tickers]
+        if compare_to_sp500:
+            fetches.append(get_historical_prices_async('SPY', adjusted_start, adjusted_end))
+        results = await asyncio.gather(*fetches, return_exceptions=True)
+        
+        benchmark_data = None
+        if compare_to_sp500:
+            benchmark_result = results.pop()
+            if isinstance(benchmark_result, Exception):
+                logger.warning(f"[Performance Analysis] Could not fetch SPY benchmark data: {benchmark_result}")
+            else:
+                benchmark_data = benchmark_result
+        
+        succeeded = []
+        failed = []
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[Performance Analysis] Could not analyze {ticker}: {result}")
+                failed.append(ticker)
+            else:
+                succeeded.append(result)
+        if not succeeded:
+            return f"❌ **API Error:** Could not retrieve data for {', '.join(tickers)}. Please verify the symbols and try again later."
+        
+        succeeded.sort(key=lambda data: data['percentage_change'], reverse=True)
+        ranking = [f"📊 **Performance Comparison:** {adjusted_start} to {adjusted_end}", ""]
+        for rank, data in enumerate(succeeded, 1):
+            ranking.append(f"{rank}. {data['symbol']}: {data['percentage_change']:+.2f}%")
+        if benchmark_data:
+            ranking.append(f"• S&P 500 (SPY): {benchmark_data['percentage_change']:+.2f}%")
+        if failed:
+            ranking.append(f"• No data: {', '.join(failed)}")
+        
+        sections = ["\n".join(ranking)]
+        sections.extend(format_performance_analysis(data, benchmark_data) for data in succeeded)
+        return "\n\n---\n\n".join(sections)
+    except Exception as e:
+        logger.error(f"[Performance Analysis] Unexpected error in compare_investment_performance: {e}", exc_info=True)
+        return "❌ **Unexpected Error:** An error occurred while comparing investments. Please try again later."
+
+
+def _compare_investment_performance(
+    symbols: List[str],
+    start_date: str,
+    end_date: str = "",
+    compare_to_sp500: bool = True
+) -> str:
+    """Compare the performance of several symbols (max 10) over the same period, ranked by total return, with an optional S&P 500 benchmark. Use instead of calling calculate_investment_performance once per symbol."""
+    return asyncio.run(_compare_investment_performance_impl_async(symbols, start_date, end_date, compare_to_sp500))
+
+
+compare_investment_performance = StructuredTool.from_function(
+    func=_compare_investment_performance,
+    coroutine=_compare_investment_performance_impl_async,
+    name="compare_investment_performance",
+    description=_compare_investment_performance.__doc__,
+)
@@ -33,8 +33,6 @@ from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, Base
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
 from langchain_core.tools import Tool, tool
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.store.memory import InMemoryStore
 #from langmem import create_manage_memory_tool, create_search_memory_tool # deleted langmem for now
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
@@ -65,6 +63,13 @@ from clera_agents import trade_execution_agent as te_module
 # Import personalization service and supervisor prompt
 from utils.personalization_service import create_personalized_supervisor_prompt
 from utils.prompts.supervisor_prompt import get_supervisor_clera_system_prompt
+from clera_agents.checkpointer import get_checkpointer
+from clera_agents.context_manager import (
+    AGENT_CONTEXT_TOKEN_BUDGET,
+    SUPERVISOR_CONTEXT_TOKEN_BUDGET,
+    llm_summarizer,
+    make_context_hook,
+)
 
 
 ###############################################################################
@@ -76,12 +81,15 @@ class State(TypedDict):
     user_id: Optional[str]
     is_last_step: bool
     remaining_steps: int
+    # Rolling summary of the messages up to summary_through_id (see context_manager)
+    context_summary: Optional[str]
+    summary_through_id: Optional[str]
 
 
 ###############################################################################
-# Set up storage and checkpointer
+# Set up checkpointer (None on LangGraph Platform, which supplies its own)
 ###############################################################################
-checkpointer = MemorySaver()
+checkpointer = get_checkpointer()
 
 
 ###############################################################################
@@ -98,7 +106,8 @@ financial_analyst_tools = [
     fa_module.web_search,
     fa_module.web_search_streaming,
     fa_module.get_stock_price,
-    fa_module.calculate_investment_performance
+    fa_module.calculate_investment_performance,
+    fa_module.compare_investment_performance
 ]
 
 portfolio_management_tools = [
@@ -127,6 +136,7 @@ FINANCIAL_ANALYST_STATIC_PROMPT = """You are an expert financial analyst providi
 - **web_search**: Market research, analyst ratings, company news, fundamentals
 - **get_stock_price**: Current price, daily change, volume
 - **calculate_investment_performance**: Historical returns, benchmark comparison
+- **compare_investment_performance**: Rank several tickers over one period in a single call
 
 ## SEARCH PATTERNS
 - Analyst views: "[TICKER] analyst price target rating 2025"
@@ -317,6 +327,21 @@ trade_llm = ChatAnthropic(
     stream_usage=True
 )
 
+context_summary_llm = ChatAnthropic(
+    anthropic_api_key=os.environ.get("ANTHROPIC_API_KEY"),
+    model="claude-haiku-4-5-20251001",
+    temperature=0,
+    max_tokens=400,
+    max_retries=2,
+    timeout=30,
+)
+
+# Per-hop message budgets: older turns are compacted/summarized, the current turn is sent as is
+supervisor_context_hook = make_context_hook(
+    SUPERVISOR_CONTEXT_TOKEN_BUDGET, summarizer=llm_summarizer(context_summary_llm)
+)
+agent_context_hook = make_context_hook(AGENT_CONTEXT_TOKEN_BUDGET)
+
 
 # Create Agents with Restructured Prompts
 financial_analyst_agent = create_react_agent(
@@ -324,7 +349,8 @@ financial_analyst_agent = create_react_agent(
     tools=financial_analyst_tools,
     prompt=get_financial_analyst_full_prompt(),
     name="financial_analyst_agent",
-    state_schema=State
+    state_schema=State,
+    pre_model_hook=agent_context_hook,
 )
 
 portfolio_management_agent = create_react_agent(
@@ -332,7 +358,8 @@ portfolio_management_agent = create_react_agent(
     tools=portfolio_management_tools,
     prompt=get_portfolio_management_full_prompt(),
     name="portfolio_management_agent",
-    state_schema=State
+    state_schema=State,
+    pre_model_hook=agent_context_hook,
 )
 
 trade_execution_agent = create_react_agent(
@@ -340,7 +367,8 @@ trade_execution_agent = create_react_agent(
     tools=trade_execution_tools,
     prompt=get_trade_execution_full_prompt(),
     name="trade_execution_agent",
-    state_schema=State
+    state_schema=State,
+    pre_model_hook=agent_context_hook,
 )
 
 
@@ -349,6 +377,7 @@ workflow = create_supervisor(
     [financial_analyst_agent, portfolio_management_agent, trade_execution_agent],
     model=main_llm,
     prompt=create_personalized_supervisor_prompt,
+    pre_model_hook=supervisor_context_hook,
     output_mode="full_history",
     supervisor_name="Clera", 
     state_schema=State,
@@ -356,8 +385,8 @@ workflow = create_supervisor(
     include_agent_name="inline",
 )
 
-# Compile with memory components
-graph = workflow.compile()
+# Compile with the configured checkpointer
+graph = workflow.compile(checkpointer=checkpointer)
 graph.name = "CleraAgents"
 
 __all__ = ["graph"]
\ No newline at end of file
@@ -48,6 +48,17 @@ broker_client = get_broker_client()
 
 
 
+def _get_run_context(config=None):
+    """Run-scoped memo shared with PortfolioDataProvider for the current user."""
+    from utils.account_utils import get_user_id_from_config
+    from clera_agents.services.portfolio_data_provider import PortfolioRunContext, get_run_context
+    try:
+        return get_run_context(get_user_id_from_config(config), config)
+    except ValueError:
+        # No user context: nothing to share, fetch directly
+        return PortfolioRunContext(user_id=None)
+
+
 def get_account_cash_balance(config=None) -> Decimal:
     """Get the cash balance from the user's account.
     
@@ -58,8 +69,11 @@ def get_account_cash_balance(config=None) -> Decimal:
         account_id = get_account_id(config=config)
         logger.info(f"[Portfolio Agent] Retrieving cash balance for account: {account_id}")
         
-        # Get account information
-        account = broker_client.get_trade_account_by_id(account_id)
+        # Get account information (shared with other tools in this run)
+        account = _get_run_context(config).memoize(
+            ('alpaca_trade_account', account_id),
+            lambda: broker_client.get_trade_account_by_id(account_id)
+        )
         cash_balance = Decimal(str(account.cash))
         
         # Remove sensitive info from logs
@@ -105,7 +119,10 @@ def retrieve_portfolio_positions(state=None, config=None) -> List:
         account_id = get_account_id(config=config)
         logger.info(f"[Portfolio Agent] Retrieving positions for account: {account_id}")
         
-        all_positions = broker_client.get_all_positions_for_account(account_id=account_id)
+        all_positions = _get_run_context(config).memoize(
+            ('alpaca_positions', account_id),
+            lambda: broker_client.get_all_positions_for_account(account_id=account_id)
+        )
         logger.info(f"[Portfolio Agent] Successfully retrieved {len(all_positions)} positions")
         return all_positions
         
@@ -302,7 +319,7 @@ def get_portfolio_summary(state=None, config=None) -> str:
         
         # Use the unified portfolio data provider
         from clera_agents.services.portfolio_data_provider import PortfolioDataProvider
-        provider = PortfolioDataProvider(user_id)
+        provider = PortfolioDataProvider(user_id, config=config)
         
         # Get user's account mode
         mode = provider.get_user_mode()
@@ -318,22 +335,16 @@ def get_portfolio_summary(state=None, config=None) -> str:
         if mode.mode == 'hybrid':
             # Get Alpaca cash (brokerage cash - what user can invest on our platform)
             try:
-                account = provider.broker_client.get_account_by_id(mode.alpaca_account_id)
+                account = provider.get_alpaca_account()
                 alpaca_cash = Decimal(str(account.cash))
                 logger.info(f"[Portfolio Agent] Hybrid mode - Alpaca cash: ${alpaca_cash}")
             except Exception as e:
                 logger.warning(f"[Portfolio Agent] Could not fetch Alpaca cash for hybrid mode: {e}")
             
-            # Get Plaid cash (external accounts cash)
+            # Get Plaid cash (external accounts cash, from the same rows as holdings)
             try:
-                result = provider.supabase.table('user_aggregated_holdings')\
-                    .select('total_market_value')\
-                    .eq('user_id', user_id)\
-                    .eq('security_type', 'cash')\
-                    .execute()
-                
-                if result.data and len(result.data) > 0:
-                    plaid_cash = Decimal(str(result.data[0].get('total_market_value', 0)))
+                plaid_cash = provider.get_aggregated_cash_balance()
+                if plaid_cash:
                     logger.info(f"[Portfolio Agent] Hybrid mode - Plaid cash: ${plaid_cash}")
             except Exception as e:
                 logger.warning(f"[Portfolio Agent] Could not fetch Plaid cash for hybrid mode: {e}")
@@ -494,8 +505,9 @@ Your portfolio appears to be empty or we couldn't retrieve your positions. This
                             continue
                 
                 if portfolio_positions:
-                    risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions)
-                    diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions)
+                    risk_metrics = PortfolioAnalyticsEngine.calculate_risk_metrics(portfolio_positions)
+                    risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions, risk_metrics=risk_metrics)
+                    diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions, risk_metrics=risk_metrics)
                     logger.info(f"[Portfolio Agent] Calculated scores - Risk: {risk_score}, Diversification: {diversification_score}")
                 else:
                     logger.warning("[Portfolio Agent] No positions could be mapped for score calculation")
@@ -890,7 +902,7 @@ def get_account_activities_tool(state=None, config=None) -> str:
         
         # Use the unified portfolio data provider
         from clera_agents.services.portfolio_data_provider import PortfolioDataProvider
-        provider = PortfolioDataProvider(user_id)
+        provider = PortfolioDataProvider(user_id, config=config)
         mode = provider.get_user_mode()
         
         logger.info(f"[Portfolio Agent] Fetching activities for user {user_id} ({mode.mode} mode)")
@@ -183,8 +183,9 @@ class AccountBreakdownService:
                 return {'risk_score': Decimal('0'), 'diversification_score': Decimal('0')}
             
             # Calculate scores
-            risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions)
-            diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions)
+            risk_metrics = PortfolioAnalyticsEngine.calculate_risk_metrics(portfolio_positions)
+            risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions, risk_metrics=risk_metrics)
+            diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions, risk_metrics=risk_metrics)
             
             return {
                 'risk_score': risk_score,
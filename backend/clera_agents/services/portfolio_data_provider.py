@@ -8,10 +8,18 @@ Supports:
 - Brokerage mode (Alpaca only)
 - Aggregation mode (Plaid only)
 - Hybrid mode (both Alpaca and Plaid)
+
+Fetches are memoized per agent run: providers created for the same user
+within the same LangGraph run share a PortfolioRunContext, so the portfolio
+summary, rebalancing and activities tools of one supervisor turn hit
+Supabase and Alpaca once for mode, holdings, cash and activities.
 """
 
+import time
 import logging
-from typing import Dict, List, Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
@@ -68,6 +76,113 @@ class UserPortfolioMode:
         return self.has_alpaca or self.has_plaid or self.has_snaptrade
 
 
+class PortfolioRunContext:
+    """
+    Memoized portfolio data for one user within one agent run.
+    
+    Values are loaded on first use and reused by every provider and tool in
+    the same run. Loader exceptions are not cached.
+    """
+    
+    def __init__(self, user_id: Optional[str], run_id: Optional[str] = None):
+        self.user_id = user_id
+        self.run_id = run_id
+        self.created_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self._values: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+    
+    def memoize(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, loading it on first use.
+        
+        Args:
+            key: Cache key, e.g. ('holdings',) or ('plaid_activities', 12)
+            loader: Called to produce the value on a miss
+        """
+        with self._lock:
+            if key in self._values:
+                self.hits += 1
+                if self.run_id:
+                    logger.info(f"[PortfolioRunContext] ♻️ Reusing {self._describe(key)} for run {self.run_id} ({self.hits} hits / {self.misses} misses)")
+                return self._values[key]
+        
+        value = loader()
+        
+        with self._lock:
+            self._values.setdefault(key, value)
+            self.misses += 1
+            if self.run_id:
+                logger.info(f"[PortfolioRunContext] Loaded {self._describe(key)} for run {self.run_id} ({self.hits} hits / {self.misses} misses)")
+            return self._values[key]
+    
+    @staticmethod
+    def _describe(key: Hashable) -> str:
+        return key[0] if isinstance(key, tuple) and key else str(key)
+
+
+# Run contexts shared by providers in the same (user_id, run_id)
+RUN_CONTEXT_TTL_SECONDS = 900
+MAX_RUN_CONTEXTS = 512
+_run_contexts: "OrderedDict[Tuple[str, str], PortfolioRunContext]" = OrderedDict()
+_run_contexts_lock = threading.Lock()
+
+
+def _get_run_id(config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Extract the LangGraph run id from the tool's config (or the current context)."""
+    if config is None:
+        try:
+            from langgraph.config import get_config
+            config = get_config()
+        except Exception:
+            return None
+    if not isinstance(config, dict):
+        return None
+    
+    # The per-tool callback run_id at the top level changes on every tool call,
+    # so only the run ids LangGraph propagates for the whole run are used
+    for section in ('configurable', 'metadata'):
+        values = config.get(section)
+        if isinstance(values, dict) and values.get('run_id'):
+            return str(values['run_id'])
+    return None
+
+
+def get_run_context(user_id: str, config: Optional[Dict[str, Any]] = None) -> PortfolioRunContext:
+    """
+    Get the shared run context for a user in the current agent run.
+    
+    Outside of a LangGraph run (no run id) a private, unshared context is
+    returned so callers behave exactly as without memoization.
+    """
+    run_id = _get_run_id(config)
+    if not run_id:
+        return PortfolioRunContext(user_id)
+    
+    key = (user_id, run_id)
+    now = time.monotonic()
+    with _run_contexts_lock:
+        # Drop expired runs (oldest first) and keep the registry bounded
+        while _run_contexts:
+            oldest = next(iter(_run_contexts.values()))
+            if len(_run_contexts) < MAX_RUN_CONTEXTS and now - oldest.created_at < RUN_CONTEXT_TTL_SECONDS:
+                break
+            expired = _run_contexts.popitem(last=False)[1]
+            logger.info(f"[PortfolioRunContext] Run {expired.run_id} finished with {expired.hits} hits / {expired.misses} misses")
+        
+        context = _run_contexts.get(key)
+        if context is None:
+            context = _run_contexts[key] = PortfolioRunContext(user_id, run_id)
+        return context
+
+
+def clear_run_contexts():
+    """Forget all memoized run data."""
+    with _run_contexts_lock:
+        _run_contexts.clear()
+
+
 class PortfolioDataProvider:
     """
     Unified interface for fetching portfolio data from multiple sources.
@@ -76,16 +191,18 @@ class PortfolioDataProvider:
     for a user and merging data from multiple sources when applicable.
     """
     
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, config: Optional[Dict[str, Any]] = None):
         """
         Initialize provider for a specific user.
         
         Args:
             user_id: Supabase user ID
+            config: Optional LangGraph config; providers in the same run share fetched data
         """
         self.user_id = user_id
         self.supabase = get_supabase_client()
         self.broker_client = get_broker_client()
+        self.run_context = get_run_context(user_id, config)
         self._mode: Optional[UserPortfolioMode] = None
         
     def get_user_mode(self) -> UserPortfolioMode:
@@ -100,7 +217,11 @@ class PortfolioDataProvider:
         """
         if self._mode:
             return self._mode
-            
+        
+        self._mode = self.run_context.memoize(('mode',), self._load_user_mode)
+        return self._mode
+    
+    def _load_user_mode(self) -> UserPortfolioMode:
         try:
             result = self.supabase.table('user_onboarding')\
                 .select('alpaca_account_id, plaid_connection_completed_at')\
@@ -119,7 +240,7 @@ class PortfolioDataProvider:
             # Check for SnapTrade accounts
             has_snaptrade = self._has_snaptrade_accounts()
             
-            self._mode = UserPortfolioMode(
+            mode = UserPortfolioMode(
                 has_alpaca=has_alpaca,
                 has_plaid=has_plaid,
                 has_snaptrade=has_snaptrade,
@@ -127,11 +248,11 @@ class PortfolioDataProvider:
                 user_id=self.user_id
             )
             
-            if not self._mode.is_valid:
+            if not mode.is_valid:
                 raise ValueError(f"User {self.user_id} has no connected accounts (Alpaca, Plaid, or SnapTrade)")
             
-            logger.info(f"[PortfolioDataProvider] User {self.user_id} mode: {self._mode.mode} (Alpaca:{has_alpaca}, Plaid:{has_plaid}, SnapTrade:{has_snaptrade})")
-            return self._mode
+            logger.info(f"[PortfolioDataProvider] User {self.user_id} mode: {mode.mode} (Alpaca:{has_alpaca}, Plaid:{has_plaid}, SnapTrade:{has_snaptrade})")
+            return mode
             
         except ValueError:
             # Re-raise ValueError as-is (already has good message)
@@ -160,7 +281,7 @@ class PortfolioDataProvider:
         if mode.has_alpaca:
             # Brokerage or Hybrid mode: Return Alpaca cash (not in holdings)
             try:
-                account = self.broker_client.get_account_by_id(mode.alpaca_account_id)
+                account = self.get_alpaca_account()
                 cash = Decimal(str(account.cash))
                 logger.info(f"[PortfolioDataProvider] Fetched Alpaca cash: ${cash}")
                 return cash
@@ -172,6 +293,34 @@ class PortfolioDataProvider:
         logger.info(f"[PortfolioDataProvider] Aggregation mode - cash is in holdings, returning 0")
         return Decimal('0')
     
+    def get_alpaca_account(self):
+        """
+        Get the user's Alpaca account (memoized for the run).
+        
+        Raises:
+            ValueError: If the user has no Alpaca account
+        """
+        mode = self.get_user_mode()
+        if not mode.has_alpaca:
+            raise ValueError(f"User {self.user_id} has no Alpaca account")
+        return self.run_context.memoize(
+            ('alpaca_account', mode.alpaca_account_id),
+            lambda: self.broker_client.get_account_by_id(mode.alpaca_account_id)
+        )
+    
+    def get_aggregated_cash_balance(self) -> Decimal:
+        """
+        Get cash held in aggregated (Plaid/SnapTrade) accounts.
+        
+        Read from the same memoized user_aggregated_holdings rows used for holdings.
+        """
+        return sum(
+            (Decimal(str(h.get('total_market_value') or 0))
+             for h in self._get_aggregated_holdings_rows()
+             if h.get('security_type') == 'cash'),
+            Decimal('0')
+        )
+    
     def get_holdings(self) -> List[PortfolioHolding]:
         """
         Get all portfolio holdings from available sources.
@@ -179,6 +328,9 @@ class PortfolioDataProvider:
         Returns:
             List[PortfolioHolding]: Unified list of holdings from all sources
         """
+        return list(self.run_context.memoize(('holdings',), self._load_holdings))
+    
+    def _load_holdings(self) -> List[PortfolioHolding]:
         mode = self.get_user_mode()
         holdings = []
         
@@ -236,19 +388,27 @@ class PortfolioDataProvider:
             logger.error(f"[PortfolioDataProvider] Error fetching Alpaca holdings: {e}", exc_info=True)
             return []
     
-    def _get_plaid_holdings(self) -> List[PortfolioHolding]:
-        """Fetch holdings from Plaid aggregated data"""
-        try:
+    def _get_aggregated_holdings_rows(self) -> List[Dict]:
+        """Fetch the user's user_aggregated_holdings rows (memoized for the run)."""
+        def load():
             result = self.supabase.table('user_aggregated_holdings')\
                 .select('*')\
                 .eq('user_id', self.user_id)\
                 .execute()
+            return result.data or []
+        
+        return self.run_context.memoize(('aggregated_holdings',), load)
+    
+    def _get_plaid_holdings(self) -> List[PortfolioHolding]:
+        """Fetch holdings from Plaid aggregated data"""
+        try:
+            rows = self._get_aggregated_holdings_rows()
             
-            if not result.data:
+            if not rows:
                 return []
             
             holdings = []
-            for h in result.data:
+            for h in rows:
                 try:
                     # INCLUDE CASH - it's part of aggregated holdings for Plaid users
                     # (Cash is NOT handled separately for aggregation mode)
@@ -322,12 +482,9 @@ class PortfolioDataProvider:
         """
         try:
             # SnapTrade holdings are stored in the same aggregated_holdings table
-            result = self.supabase.table('user_aggregated_holdings')\
-                .select('*')\
-                .eq('user_id', self.user_id)\
-                .execute()
+            rows = self._get_aggregated_holdings_rows()
             
-            if not result.data:
+            if not rows:
                 logger.info(f"[PortfolioDataProvider] No holdings found in user_aggregated_holdings for user {self.user_id}")
                 return []
             
@@ -338,7 +495,7 @@ class PortfolioDataProvider:
             # since they must all be from SnapTrade
             snaptrade_only = mode.has_snaptrade and not mode.has_plaid
             
-            for h in result.data:
+            for h in rows:
                 try:
                     # For hybrid users (SnapTrade + Plaid), filter by snaptrade_ prefix
                     # For SnapTrade-only users, include all holdings
@@ -406,40 +563,52 @@ class PortfolioDataProvider:
             return []
         
         try:
-            # Import here to avoid circular dependencies
-            from clera_agents.tools.purchase_history import get_account_activities
-            
-            # Set defaults
-            if date_end is None:
-                date_end = datetime.now(timezone.utc)
-            if date_start is None:
-                date_start = date_end - timedelta(days=60)
-            
-            activities = get_account_activities(
-                account_id=mode.alpaca_account_id,
-                date_start=date_start,
-                date_end=date_end
-            )
-            
-            # Convert ActivityRecord objects to dicts
-            return [
-                {
-                    'date': act.date,
-                    'type': act.type,
-                    'symbol': act.symbol,
-                    'description': act.description,
-                    'quantity': act.quantity,
-                    'price': act.price,
-                    'amount': act.amount,
-                    'source': 'alpaca'
-                }
-                for act in activities
-            ]
+            # Keyed on the requested range; defaults resolve to the same window within a run
+            return list(self.run_context.memoize(
+                ('alpaca_activities', mode.alpaca_account_id, date_start, date_end),
+                lambda: self._load_alpaca_activities(mode.alpaca_account_id, date_start, date_end)
+            ))
             
         except Exception as e:
             logger.error(f"[PortfolioDataProvider] Error fetching Alpaca activities: {e}", exc_info=True)
             return []
     
+    def _load_alpaca_activities(
+        self,
+        account_id: str,
+        date_start: Optional[datetime],
+        date_end: Optional[datetime]
+    ) -> List[Dict]:
+        # Import here to avoid circular dependencies
+        from clera_agents.tools.purchase_history import get_account_activities
+        
+        # Set defaults
+        if date_end is None:
+            date_end = datetime.now(timezone.utc)
+        if date_start is None:
+            date_start = date_end - timedelta(days=60)
+        
+        activities = get_account_activities(
+            account_id=account_id,
+            date_start=date_start,
+            date_end=date_end
+        )
+        
+        # Convert ActivityRecord objects to dicts
+        return [
+            {
+                'date': act.date,
+                'type': act.type,
+                'symbol': act.symbol,
+                'description': act.description,
+                'quantity': act.quantity,
+                'price': act.price,
+                'amount': act.amount,
+                'source': 'alpaca'
+            }
+            for act in activities
+        ]
+    
     def get_account_activities_plaid(
         self,
         months_back: int = 12
@@ -461,90 +630,96 @@ class PortfolioDataProvider:
             return []
         
         try:
-            # Calculate date range
-            end_date = datetime.now(timezone.utc)
-            start_date = end_date - timedelta(days=months_back * 30)
-            
-            # Query Plaid investment transactions
-            result = self.supabase.table('plaid_investment_transactions')\
-                .select('*')\
-                .eq('user_id', self.user_id)\
-                .gte('date', start_date.strftime('%Y-%m-%d'))\
-                .lte('date', end_date.strftime('%Y-%m-%d'))\
-                .order('date', desc=True)\
-                .execute()
-            
-            if not result.data:
-                return []
-            
-            # Batch lookup symbol mappings for all security_ids
-            security_ids = [txn.get('security_id') for txn in result.data if txn.get('security_id')]
-            symbol_mapping = {}
-            
-            if security_ids:
-                try:
-                    mapping_result = self.supabase.table('global_security_symbol_mappings')\
-                        .select('plaid_security_id, fmp_symbol')\
-                        .in_('plaid_security_id', security_ids)\
-                        .not_.is_('fmp_symbol', 'null')\
-                        .execute()
-                    
-                    if mapping_result.data:
-                        symbol_mapping = {
-                            row['plaid_security_id']: row['fmp_symbol']
-                            for row in mapping_result.data
-                        }
-                except Exception as e:
-                    logger.warning(f"[PortfolioDataProvider] Error fetching symbol mappings: {e}")
-            
-            # Convert to standardized format
-            activities = []
-            unmapped_count = 0
-            for txn in result.data:
-                security_id = txn.get('security_id')
-                
-                # Determine symbol: prefer existing symbol field, then mapped symbol, then handle cash/unknown
-                symbol = txn.get('symbol')  # Check if symbol already exists in transaction
-                
-                if not symbol and security_id:
-                    # Look up mapped symbol from security_id
-                    symbol = symbol_mapping.get(security_id)
-                    
-                    if not symbol:
-                        # No mapping found - this is a problem for downstream symbol-based logic
-                        unmapped_count += 1
-                        logger.debug(
-                            f"[PortfolioDataProvider] No symbol mapping for security_id: {security_id}, "
-                            f"transaction: {txn.get('name', 'Unknown')}"
-                        )
-                        # Use None for unmapped securities (downstream should handle gracefully)
-                        symbol = None
-                
-                # Handle cash transactions (no security_id)
-                if not symbol and not security_id:
-                    symbol = 'CASH'
-                
-                activities.append({
-                    'date': txn.get('date'),
-                    'type': txn.get('type', 'transaction'),
-                    'symbol': symbol,  # Now properly mapped symbol or None/CASH
-                    'description': f"{txn.get('type', 'Transaction')} - {txn.get('name', 'Investment Transaction')}",
-                    'quantity': abs(Decimal(str(txn.get('quantity', 0)))),
-                    'price': Decimal(str(txn.get('price', 0))),
-                    'amount': Decimal(str(txn.get('amount', 0))),
-                    'source': 'plaid'
-                })
-            
-            if unmapped_count > 0:
-                logger.warning(
-                    f"[PortfolioDataProvider] {unmapped_count}/{len(activities)} transactions "
-                    f"have unmapped security_ids - symbol-based logic may be affected"
-                )
-            
-            logger.info(f"[PortfolioDataProvider] Fetched {len(activities)} Plaid transactions")
-            return activities
+            return list(self.run_context.memoize(
+                ('plaid_activities', months_back),
+                lambda: self._load_plaid_activities(months_back)
+            ))
             
         except Exception as e:
             logger.error(f"[PortfolioDataProvider] Error fetching Plaid activities: {e}", exc_info=True)
             return []
+    
+    def _load_plaid_activities(self, months_back: int) -> List[Dict]:
+        # Calculate date range
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=months_back * 30)
+        
+        # Query Plaid investment transactions
+        result = self.supabase.table('plaid_investment_transactions')\
+            .select('*')\
+            .eq('user_id', self.user_id)\
+            .gte('date', start_date.strftime('%Y-%m-%d'))\
+            .lte('date', end_date.strftime('%Y-%m-%d'))\
+            .order('date', desc=True)\
+            .execute()
+        
+        if not result.data:
+            return []
+        
+        # Batch lookup symbol mappings for all security_ids
+        security_ids = [txn.get('security_id') for txn in result.data if txn.get('security_id')]
+        symbol_mapping = {}
+        
+        if security_ids:
+            try:
+                mapping_result = self.supabase.table('global_security_symbol_mappings')\
+                    .select('plaid_security_id, fmp_symbol')\
+                    .in_('plaid_security_id', security_ids)\
+                    .not_.is_('fmp_symbol', 'null')\
+                    .execute()
+                
+                if mapping_result.data:
+                    symbol_mapping = {
+                        row['plaid_security_id']: row['fmp_symbol']
+                        for row in mapping_result.data
+                    }
+            except Exception as e:
+                logger.warning(f"[PortfolioDataProvider] Error fetching symbol mappings: {e}")
+        
+        # Convert to standardized format
+        activities = []
+        unmapped_count = 0
+        for txn in result.data:
+            security_id = txn.get('security_id')
+            
+            # Determine symbol: prefer existing symbol field, then mapped symbol, then handle cash/unknown
+            symbol = txn.get('symbol')  # Check if symbol already exists in transaction
+            
+            if not symbol and security_id:
+                # Look up mapped symbol from security_id
+                symbol = symbol_mapping.get(security_id)
+                
+                if not symbol:
+                    # No mapping found - this is a problem for downstream symbol-based logic
+                    unmapped_count += 1
+                    logger.debug(
+                        f"[PortfolioDataProvider] No symbol mapping for security_id: {security_id}, "
+                        f"transaction: {txn.get('name', 'Unknown')}"
+                    )
+                    # Use None for unmapped securities (downstream should handle gracefully)
+                    symbol = None
+            
+            # Handle cash transactions (no security_id)
+            if not symbol and not security_id:
+                symbol = 'CASH'
+            
+            activities.append({
+                'date': txn.get('date'),
+                'type': txn.get('type', 'transaction'),
+                'symbol': symbol,  # Now properly mapped symbol or None/CASH
+                'description': f"{txn.get('type', 'Transaction')} - {txn.get('name', 'Investment Transaction')}",
+                'quantity': abs(Decimal(str(txn.get('quantity', 0)))),
+                'price': Decimal(str(txn.get('price', 0))),
+                'amount': Decimal(str(txn.get('amount', 0))),
+                'source': 'plaid'
+            })
+        
+        if unmapped_count > 0:
+            logger.warning(
+                f"[PortfolioDataProvider] {unmapped_count}/{len(activities)} transactions "
+                f"have unmapped security_ids - symbol-based logic may be affected"
+            )
+        
+        logger.info(f"[PortfolioDataProvider] Fetched {len(activities)} Plaid transactions")
+        return activities
 
@@ -0,0 +1,666 @@
+"""
+Shared response cache for the financial analyst's web_search tools.
+
+Users across the platform ask near-identical market questions ("why is NVDA
+down today") within minutes of each other, and every one of them used to be a
+multi-second Perplexity call. This cache sits in front of that call:
+
+- Exact match on the normalized query (case, punctuation and spacing ignored),
+  the Perplexity model and the date the research prompt is built for.
+- Embedding-similarity match for rewordings. Candidates must share the query
+  type, model, date and entities (tickers and numbers written in the query),
+  and their remaining content words must overlap, so "why is NVDA falling"
+  can reuse "why is NVDA down" but never "why is AMD down".
+- Freshness TTLs keyed to query type and market session: price-movement
+  answers live for minutes while the market is open, reference answers for a
+  day, and time-sensitive entries never outlive the session they were
+  fetched in.
+- Single-flight: identical concurrent queries wait for one fetch, in-process
+  via a per-key flight and across replicas via a short Redis lock.
+
+Entries live in Redis (shared across agent processes) with an in-process L1
+LRU in front. Hit rate and the Perplexity latency saved are tracked per
+process and aggregated per day in Redis for /api/agents/web-search-cache/metrics.
+Without Redis the cache degrades to the L1 only; failed fetches are never
+cached.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, time as dt_time, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+
+WEB_SEARCH_CACHE_ENABLED = os.getenv("WEB_SEARCH_CACHE_ENABLED", "true").lower() == "true"
+WEB_SEARCH_CACHE_SEMANTIC = os.getenv("WEB_SEARCH_CACHE_SEMANTIC", "true").lower() == "true"
+WEB_SEARCH_CACHE_L1_MAX_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_L1_MAX_ENTRIES", "256"))
+WEB_SEARCH_CACHE_SIMILARITY = float(os.getenv("WEB_SEARCH_CACHE_SIMILARITY", "0.93"))
+WEB_SEARCH_CACHE_COALESCE_WAIT_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_COALESCE_WAIT_SECONDS", "30"))
+WEB_SEARCH_EMBEDDING_MODEL = os.getenv("WEB_SEARCH_EMBEDDING_MODEL", "text-embedding-3-small")
+WEB_SEARCH_EMBEDDING_DIMENSIONS = 256
+SEMANTIC_BUCKET_MAX_ENTRIES = 200
+MIN_CONTENT_OVERLAP = 0.5
+LOCK_POLL_SECONDS = 0.2
+STATS_RETENTION_SECONDS = 8 * 24 * 3600
+REDIS_RETRY_SECONDS = 30
+REDIS_KEY_PREFIX = "web_search_cache:"
+
+# Seconds an answer stays fresh, by query type and market session
+QUERY_TTLS: Dict[str, Dict[str, int]] = {
+    "realtime": {"open": 120, "pre_market": 300, "after_hours": 300, "closed": 1800},
+    "news": {"open": 600, "pre_market": 900, "after_hours": 900, "closed": 3600},
+    "general": {"open": 1800, "pre_market": 3600, "after_hours": 3600, "closed": 4 * 3600},
+    "in_depth": {"open": 3600, "pre_market": 2 * 3600, "after_hours": 2 * 3600, "closed": 6 * 3600},
+    "reference": {"open": 24 * 3600, "pre_market": 24 * 3600, "after_hours": 24 * 3600, "closed": 24 * 3600},
+}
+# Answers that depend on what the market is doing right now
+SESSION_BOUND_TYPES = {"realtime", "news"}
+
+PRE_MARKET_OPEN = dt_time(4, 0)
+AFTER_HOURS_CLOSE = dt_time(20, 0)
+
+_REALTIME_PATTERN = re.compile(
+    r"\b(today|now|right now|currently|this morning|this afternoon|intraday|pre-?market|after[- ]hours|"
+    r"live|price|prices|trading at|quote|down|up|fall|falling|fell|drop|dropping|dropped|rise|rising|rose|"
+    r"surge|surging|jump|jumping|plunge|plunging|rally|rallying|selloff|sell-off|moving|move)\b"
+)
+_NEWS_PATTERN = re.compile(
+    r"\b(news|latest|recent|recently|this week|yesterday|earnings|announce|announced|announcement|"
+    r"report|reported|guidance|downgrade|upgrade|upgraded|downgraded|analyst|analysts|outlook|headlines)\b"
+)
+_REFERENCE_PATTERN = re.compile(r"^(what is|what are|what's|explain|define|definition of|how does|how do|meaning of)\b")
+_ENTITY_PATTERN = re.compile(r"\$[A-Za-z]{1,5}\b|\b[A-Z]{1,5}\b")
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?%?")
+_TOKEN_PATTERN = re.compile(r"\$?[a-z0-9]+(?:\.[0-9]+)?%?")
+
+_NON_ENTITY_CAPS = {"I", "A"}
+# Words that carry no subject: dropped before comparing what two queries are about
+_FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "of", "on", "in", "at",
+    "to", "for", "and", "or", "with", "about", "from", "by", "it", "its", "this", "that", "these", "those",
+    "what", "whats", "why", "how", "when", "who", "which", "where", "me", "my", "i", "you", "your", "we",
+    "can", "could", "should", "would", "will", "tell", "give", "show", "explain", "happening", "happened",
+    "going", "so", "much", "many", "any", "some", "there", "has", "have", "had", "stock", "stocks", "share",
+    "shares", "price", "prices", "today", "now", "currently", "right", "latest", "recent", "news", "update",
+    "updates", "market", "markets", "down", "up", "fall", "falling", "fell", "drop", "dropping", "dropped",
+    "rise", "rising", "rose", "move", "moving", "moved", "trading", "performance", "doing",
+}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation (keeping $, % and decimals) and collapse whitespace."""
+    return " ".join(_TOKEN_PATTERN.findall(query.lower()))
+
+
+def classify_query(query: str) -> str:
+    """
+    Freshness class of a search query.
+
+    Returns one of 'in_depth' (detailed research, sonar-pro), 'realtime'
+    (prices and moves), 'news', 'reference' (evergreen explanations) or
+    'general'.
+    """
+    lowered = query.lower()
+    if "in-depth" in lowered or "detailed" in lowered:
+        return "in_depth"
+    normalized = normalize_query(query)
+    if _REALTIME_PATTERN.search(normalized):
+        return "realtime"
+    if _NEWS_PATTERN.search(normalized):
+        return "news"
+    if _REFERENCE_PATTERN.search(normalized):
+        return "reference"
+    return "general"
+
+
+def extract_entities(query: str) -> List[str]:
+    """Tickers ($nvda, NVDA) and numbers written in the query, sorted."""
+    entities = set()
+    for match in _ENTITY_PATTERN.findall(query):
+        symbol = match.lstrip("$").upper()
+        if symbol not in _NON_ENTITY_CAPS:
+            entities.add(symbol)
+    entities.update(_NUMBER_PATTERN.findall(query))
+    return sorted(entities)
+
+
+def content_tokens(query: str) -> List[str]:
+    """Normalized tokens minus filler words: what the query is actually about."""
+    return sorted({token.lstrip("$") for token in normalize_query(query).split()} - _FILLER_WORDS)
+
+
+def get_market_session(now: Optional[datetime] = None) -> Tuple[str, datetime]:
+    """
+    Current US equity market session and when it next changes.
+
+    Sessions are 'pre_market' (4:00 ET to the open), 'open', 'after_hours'
+    (close to 20:00 ET) and 'closed' (overnight, weekends and holidays).
+    Early-close days end the regular session at 13:00 ET.
+
+    Returns:
+        (session, next_change) with next_change timezone-aware
+    """
+    calendar = get_trading_calendar()
+    tz = calendar.est
+    now = now.astimezone(tz) if now else datetime.now(tz)
+    today = now.date()
+
+    session, next_change = "closed", None
+    if calendar.is_market_open_today(today):
+        close = calendar.early_close_time if calendar.is_early_close_day(today) else calendar.market_close_time
+        boundaries = [
+            (PRE_MARKET_OPEN, "pre_market"),
+            (calendar.market_open_time, "open"),
+            (close, "after_hours"),
+            (AFTER_HOURS_CLOSE, "closed"),
+        ]
+        for boundary, name in boundaries:
+            if now.time() >= boundary:
+                session = name
+            elif next_change is None:
+                next_change = tz.localize(datetime.combine(today, boundary))
+
+    if next_change is None:
+        next_day = today + timedelta(days=1)
+        while not calendar.is_market_open_today(next_day):
+            next_day += timedelta(days=1)
+        next_change = tz.localize(datetime.combine(next_day, PRE_MARKET_OPEN))
+    return session, next_change
+
+
+def split_citations(response: str) -> str:
+    """Answer text without the trailing <!-- CITATIONS --> comment (what a stream shows)."""
+    return response.split("\n\n<!-- CITATIONS:", 1)[0]
+
+
+def _default_embedder() -> Optional[Callable[[str], Sequence[float]]]:
+    """OpenAI embeddings for the similarity lookup, or None when unavailable."""
+    if not WEB_SEARCH_CACHE_SEMANTIC or not os.getenv("OPENAI_API_KEY"):
+        return None
+    from openai import OpenAI
+
+    # Short timeout: a slow embedding only costs the semantic lookup, never the search
+    client = OpenAI(timeout=3.0, max_retries=0)
+
+    def embed(text: str) -> Sequence[float]:
+        response = client.embeddings.create(
+            model=WEB_SEARCH_EMBEDDING_MODEL, input=text, dimensions=WEB_SEARCH_EMBEDDING_DIMENSIONS
+        )
+        return response.data[0].embedding
+
+    return embed
+
+
+class _Flight:
+    """One in-process fetch that concurrent identical queries wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class WebSearchCache:
+    """
+    Two-level (in-process L1 + Redis) response cache for web search answers.
+
+    Args:
+        embed: Text -> vector function for the similarity lookup (default:
+            OpenAI embeddings when a key is configured; None disables it)
+        redis_client: Redis client to use instead of the lazily created one
+        similarity_threshold: Minimum cosine similarity for a reworded hit
+        session_fn: Returns (session, next_change), see get_market_session
+        clock: Wall-clock seconds, shared with other processes through Redis
+    """
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+        redis_client=None,
+        l1_max_entries: int = WEB_SEARCH_CACHE_L1_MAX_ENTRIES,
+        similarity_threshold: float = WEB_SEARCH_CACHE_SIMILARITY,
+        coalesce_wait_seconds: float = WEB_SEARCH_CACHE_COALESCE_WAIT_SECONDS,
+        session_fn: Callable[[], Tuple[str, datetime]] = get_market_session,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.embed = embed
+        self.redis_client = redis_client
+        self.l1_max_entries = l1_max_entries
+        self.similarity_threshold = similarity_threshold
+        self.coalesce_wait_seconds = coalesce_wait_seconds
+        self.session_fn = session_fn
+        self.clock = clock
+        self._redis_retry_at = 0.0
+        self._embed_retry_at = 0.0
+        # key -> entry dict (response, expires_at, fetch_seconds, bucket, vector, tokens)
+        self._l1: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "lookups": 0, "misses": 0, "fetch_errors": 0,
+            "l1_hits": 0, "redis_hits": 0, "semantic_hits": 0, "coalesced": 0,
+            "fetch_seconds": 0.0, "latency_saved_seconds": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Redis
+    # ------------------------------------------------------------------
+
+    def _get_redis_client(self):
+        """Lazy load Redis client following existing pattern from sector_data_collector.py."""
+        if self.redis_client is None:
+            import redis
+
+            _IS_PRODUCTION = os.getenv("COPILOT_ENVIRONMENT_NAME", "").lower() == "production" or os.getenv("ENVIRONMENT", "").lower() == "production"
+            if _IS_PRODUCTION:
+                redis_host = os.getenv("REDIS_HOST")
+                if not redis_host:
+                    raise RuntimeError("REDIS_HOST environment variable must be set in production!")
+            else:
+                redis_host = os.getenv("REDIS_HOST", "127.0.0.1")
+
+            # Short timeouts: a slow Redis must never cost more than the search it saves
+            self.redis_client = redis.Redis(
+                host=redis_host,
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                db=int(os.getenv("REDIS_DB", "0")),
+                decode_responses=True,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5
+            )
+        return self.redis_client
+
+    def _redis(self, operation: str, fn: Callable[[Any], Any], default=None):
+        """Run a Redis call, backing off for a while after a failure."""
+        if time.monotonic() < self._redis_retry_at:
+            return default
+        try:
+            return fn(self._get_redis_client())
+        except Exception as e:
+            logger.warning(f"Web search cache Redis {operation} failed, using in-process cache only: {e}")
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+            return default
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def get_or_fetch(
+        self,
+        query: str,
+        model: str,
+        fetch: Callable[[], str],
+        on_cached: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """
+        Return the cached answer for a query, fetching it on a miss.
+
+        Args:
+            query: The search query as the agent wrote it
+            model: Perplexity model the answer is fetched with
+            fetch: Performs the search; raising means nothing is cached
+            on_cached: Called with the answer when it was not freshly fetched
+                (lets a streaming caller emit it)
+        """
+        if not WEB_SEARCH_CACHE_ENABLED:
+            return fetch()
+
+        started = time.monotonic()
+        plan = self._plan(query, model)
+        with self._lock:
+            self._metrics["lookups"] += 1
+
+        entry, source = self._lookup(plan)
+        if entry is None:
+            entry, source = self._fetch_single_flight(plan, fetch)
+
+        if source != "fetched":
+            self._record_hit(plan, entry, source, time.monotonic() - started)
+            if on_cached:
+                on_cached(entry["response"])
+        return entry["response"]
+
+    def _plan(self, query: str, model: str) -> Dict[str, Any]:
+        normalized = normalize_query(query)
+        query_type = classify_query(query)
+        entities = extract_entities(query)
+        day = datetime.now().strftime("%Y-%m-%d")
+        bucket = "|".join([model, query_type, day, ",".join(entities)])
+        return {
+            "query": query,
+            "model": model,
+            "query_type": query_type,
+            "key": hashlib.sha256(f"{model}|{day}|{normalized}".encode()).hexdigest(),
+            "bucket": hashlib.sha256(bucket.encode()).hexdigest(),
+            "tokens": content_tokens(query),
+            "normalized": normalized,
+            "vector": None,
+        }
+
+    def _lookup(self, plan: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        now = self.clock()
+        entry = self._l1_get(plan["key"], now)
+        if entry is not None:
+            return entry, "l1"
+
+        entry = self._redis_get(plan["key"], now)
+        if entry is not None:
+            self._l1_put(plan["key"], entry)
+            return entry, "redis"
+
+        vector = self._embed(plan["normalized"])
+        if vector is None:
+            return None, None
+        plan["vector"] = vector
+        entry = self._semantic_lookup(plan, now)
+        if entry is not None:
+            return entry, "semantic"
+        return None, None
+
+    def _l1_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= now:
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry
+
+    def _l1_put(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._l1[key] = entry
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _redis_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        raw = self._redis("get", lambda r: r.get(f"{REDIS_KEY_PREFIX}entry:{key}"))
+        if not raw:
+            return None
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            return None
+        return entry if entry.get("expires_at", 0) > now else None
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed is None or time.monotonic() < self._embed_retry_at:
+            return None
+        try:
+            vector = np.asarray(self.embed(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Web search cache embedding failed, exact matches only for a while: {e}")
+            self._embed_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _is_similar(self, plan: Dict[str, Any], vector: np.ndarray, tokens: Sequence[str]) -> Optional[float]:
+        """Cosine similarity when the candidate passes both guards, else None."""
+        if vector.shape != plan["vector"].shape:
+            return None
+        mine, theirs = set(plan["tokens"]), set(tokens)
+        union = mine | theirs
+        if union and len(mine & theirs) / len(union) < MIN_CONTENT_OVERLAP:
+            return None
+        similarity = float(np.dot(plan["vector"], vector))
+        return similarity if similarity >= self.similarity_threshold else None
+
+    def _semantic_lookup(self, plan: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+        best, best_similarity = None, 0.0
+        with self._lock:
+            candidates = [
+                entry for entry in self._l1.values()
+                if entry.get("bucket") == plan["bucket"] and entry.get("vector") is not None
+                and entry["expires_at"] > now
+            ]
+        for entry in candidates:
+            similarity = self._is_similar(plan, entry["vector"], entry["tokens"])
+            if similarity is not None and similarity > best_similarity:
+                best, best_similarity = entry, similarity
+        if best is not None:
+            return best
+
+        bucket_key = f"{REDIS_KEY_PREFIX}semantic:{plan['bucket']}"
+        members = self._redis("semantic read", lambda r: r.hgetall(bucket_key), default={}) or {}
+        expired, best_key = [], None
+        for key, raw in members.items():
+            try:
+                member = json.loads(raw)
+            except ValueError:
+                expired.append(key)
+                continue
+            if member.get("x", 0) <= now:
+                expired.append(key)
+                continue
+            similarity = self._is_similar(plan, np.asarray(member["v"], dtype=np.float32), member.get("t", []))
+            if similarity is not None and similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+        if expired:
+            self._redis("semantic prune", lambda r: r.hdel(bucket_key, *expired))
+        if best_key is None:
+            return None
+
+        entry = self._redis_get(best_key, now)
+        if entry is not None:
+            self._l1_put(best_key, entry)
+        return entry
+
+    # ------------------------------------------------------------------
+    # Fetch
+    # ------------------------------------------------------------------
+
+    def _fetch_single_flight(self, plan: Dict[str, Any], fetch: Callable[[], str]) -> Tuple[Dict[str, Any], str]:
+        key = plan["key"]
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(self.coalesce_wait_seconds):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.entry, "coalesced"
+            # The leader is taking too long; search directly rather than hang the agent
+            return self._fetch(plan, fetch), "fetched"
+
+        try:
+            entry, source = self._fetch_cross_process(plan, fetch)
+            flight.entry = entry
+            return entry, source
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _fetch_cross_process(self, plan: Dict[str, Any], fetch: Callable[[], str]) -> Tuple[Dict[str, Any], str]:
+        """Let one replica fetch a query while the others poll Redis for its answer."""
+        lock_key = f"{REDIS_KEY_PREFIX}lock:{plan['key']}"
+        lock_ms = int(self.coalesce_wait_seconds * 1000)
+        acquired = self._redis("lock", lambda r: r.set(lock_key, "1", nx=True, px=lock_ms), default=True)
+        if acquired:
+            try:
+                return self._fetch(plan, fetch), "fetched"
+            finally:
+                self._redis("unlock", lambda r: r.delete(lock_key))
+
+        deadline = time.monotonic() + self.coalesce_wait_seconds
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            entry = self._redis_get(plan["key"], self.clock())
+            if entry is not None:
+                self._l1_put(plan["key"], entry)
+                return entry, "coalesced"
+            if not self._redis("lock check", lambda r: r.exists(lock_key), default=0):
+                break
+        return self._fetch(plan, fetch), "fetched"
+
+    def _fetch(self, plan: Dict[str, Any], fetch: Callable[[], str]) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            response = fetch()
+        except Exception:
+            with self._lock:
+                self._metrics["fetch_errors"] += 1
+            raise
+        fetch_seconds = time.monotonic() - started
+
+        now = self.clock()
+        session, next_change = self.session_fn()
+        ttl = QUERY_TTLS[plan["query_type"]][session]
+        expires_at = now + ttl
+        if plan["query_type"] in SESSION_BOUND_TYPES:
+            expires_at = min(expires_at, next_change.timestamp())
+
+        entry = {
+            "query": plan["query"],
+            "model": plan["model"],
+            "query_type": plan["query_type"],
+            "response": response,
+            "created_at": now,
+            "expires_at": expires_at,
+            "fetch_seconds": round(fetch_seconds, 3),
+        }
+        self._store(plan, entry)
+        with self._lock:
+            self._metrics["misses"] += 1
+            self._metrics["fetch_seconds"] += fetch_seconds
+        self._record_shared({"misses": 1}, {"fetch_seconds": fetch_seconds})
+        logger.info(
+            f"Web search cache miss ({plan['query_type']}, {session} session, "
+            f"fresh for {int(expires_at - now)}s), fetched in {fetch_seconds:.2f}s"
+        )
+        return entry
+
+    def _store(self, plan: Dict[str, Any], entry: Dict[str, Any]):
+        ttl_seconds = max(1, int(entry["expires_at"] - entry["created_at"]))
+        self._redis(
+            "write",
+            lambda r: r.set(f"{REDIS_KEY_PREFIX}entry:{plan['key']}", json.dumps(entry), ex=ttl_seconds),
+        )
+
+        local_entry = dict(entry, bucket=plan["bucket"], tokens=plan["tokens"], vector=plan["vector"])
+        self._l1_put(plan["key"], local_entry)
+        if plan["vector"] is None:
+            return
+
+        bucket_key = f"{REDIS_KEY_PREFIX}semantic:{plan['bucket']}"
+        member = json.dumps({
+            "v": [round(float(x), 5) for x in plan["vector"]],
+            "t": plan["tokens"],
+            "x": entry["expires_at"],
+        })
+
+        def write_member(r):
+            r.hset(bucket_key, plan["key"], member)
+            r.expire(bucket_key, max(ttl_seconds, int(r.ttl(bucket_key) or 0)))
+            if r.hlen(bucket_key) > SEMANTIC_BUCKET_MAX_ENTRIES:
+                members = r.hgetall(bucket_key)
+                oldest = sorted(members, key=lambda k: json.loads(members[k]).get("x", 0))
+                r.hdel(bucket_key, *oldest[:len(members) - SEMANTIC_BUCKET_MAX_ENTRIES])
+
+        self._redis("semantic write", write_member)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def _record_hit(self, plan: Dict[str, Any], entry: Dict[str, Any], source: str, lookup_seconds: float):
+        saved = max(0.0, float(entry.get("fetch_seconds", 0.0)) - lookup_seconds)
+        with self._lock:
+            self._metrics[f"{source}_hits" if source != "coalesced" else "coalesced"] += 1
+            self._metrics["latency_saved_seconds"] += saved
+            hits = self._hit_count()
+            lookups = self._metrics["lookups"]
+        self._record_shared({"hits": 1, source: 1}, {"latency_saved_seconds": saved})
+        logger.info(
+            f"Web search cache {source} hit ({plan['query_type']}), saved {saved:.2f}s "
+            f"({hits}/{lookups} lookups served from cache)"
+        )
+
+    def _hit_count(self) -> int:
+        return sum(self._metrics[name] for name in ("l1_hits", "redis_hits", "semantic_hits", "coalesced"))
+
+    def _record_shared(self, counts: Dict[str, int], seconds: Dict[str, float]):
+        """Add to today's platform-wide counters in Redis (best effort)."""
+        stats_key = f"{REDIS_KEY_PREFIX}stats:{datetime.utcnow().strftime('%Y-%m-%d')}"
+
+        def write(r):
+            for field, value in counts.items():
+                r.hincrby(stats_key, field, value)
+            for field, value in seconds.items():
+                r.hincrbyfloat(stats_key, field, round(value, 3))
+            r.expire(stats_key, STATS_RETENTION_SECONDS)
+
+        self._redis("stats", write)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit rate and latency saved for this process."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            hits = self._hit_count()
+            entries = len(self._l1)
+        lookups = metrics["lookups"]
+        metrics.update({
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "fetch_seconds": round(metrics["fetch_seconds"], 3),
+            "latency_saved_seconds": round(metrics["latency_saved_seconds"], 3),
+            "l1_entries": entries,
+        })
+        return metrics
+
+    def get_shared_metrics(self, days: int = 1) -> List[Dict[str, Any]]:
+        """Platform-wide daily hit rate and latency saved from Redis, newest day first."""
+        today = datetime.utcnow().date()
+        report = []
+        for offset in range(days):
+            day = (today - timedelta(days=offset)).isoformat()
+            raw = self._redis("stats read", lambda r: r.hgetall(f"{REDIS_KEY_PREFIX}stats:{day}"), default={}) or {}
+            hits, misses = int(raw.get("hits", 0)), int(raw.get("misses", 0))
+            report.append({
+                "day": day,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "by_source": {source: int(raw.get(source, 0)) for source in ("l1", "redis", "semantic", "coalesced")},
+                "latency_saved_seconds": round(float(raw.get("latency_saved_seconds", 0.0)), 3),
+                "fetch_seconds": round(float(raw.get("fetch_seconds", 0.0)), 3),
+            })
+        return report
+
+    def clear(self):
+        """Drop the in-process entries (Redis entries expire on their own)."""
+        with self._lock:
+            self._l1.clear()
+
+
+# Global web search cache instance
+_web_search_cache: Optional[WebSearchCache] = None
+
+
+def get_web_search_cache() -> WebSearchCache:
+    """Get or create the global web search cache instance."""
+    global _web_search_cache
+    if _web_search_cache is None:
+        _web_search_cache = WebSearchCache(embed=_default_embedder())
+    return _web_search_cache
@@ -2,7 +2,7 @@
 Portfolio analysis tools for classifying securities and analyzing portfolios.
 """
 
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from decimal import Decimal, InvalidOperation
 
@@ -10,6 +10,9 @@ from clera_agents.types.portfolio_types import (
     AssetClass, SecurityType, TargetPortfolio
 )
 
+if TYPE_CHECKING:
+    from utils.portfolio.risk_engine import PortfolioRiskMetrics
+
 
 @dataclass
 class PortfolioPosition:
@@ -467,11 +470,49 @@ class PortfolioMetrics:
 class PortfolioAnalyticsEngine:
     """Advanced portfolio analytics including risk, diversification, and returns attribution."""
     
+    @classmethod
+    def calculate_risk_metrics(
+        cls,
+        positions: List[PortfolioPosition],
+        cash_balance: Optional[Decimal] = None
+    ) -> Optional['PortfolioRiskMetrics']:
+        """Calculate return-based risk metrics from stored EOD prices.
+        
+        Covariance, volatility, beta against SPY and risk contributions come from
+        utils.portfolio.risk_engine. The result can be passed to
+        calculate_risk_score and calculate_diversification_score. Blocking on a
+        covariance cache miss; call through asyncio.to_thread from async code.
+        
+        Args:
+            positions: List of portfolio positions
+            cash_balance: Optional cash balance (zero volatility)
+            
+        Returns:
+            PortfolioRiskMetrics, or None when prices are unavailable
+        """
+        holdings: Dict[str, float] = {}
+        for position in positions:
+            if position.asset_class == AssetClass.CASH or position.market_value <= 0:
+                continue
+            holdings[position.symbol] = holdings.get(position.symbol, 0.0) + float(position.market_value)
+        if not holdings:
+            return None
+        
+        try:
+            from utils.portfolio.risk_engine import get_portfolio_risk_engine
+            return get_portfolio_risk_engine().portfolio_metrics(holdings, cash=float(cash_balance or 0))
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Return-based risk metrics unavailable, using composition scores: {e}")
+            return None
+    
     @classmethod
     def calculate_diversification_score(
         cls, 
         positions: List[PortfolioPosition],
-        cash_balance: Optional[Decimal] = None
+        cash_balance: Optional[Decimal] = None,
+        risk_metrics: Optional['PortfolioRiskMetrics'] = None
     ) -> Decimal:
         """Calculate a diversification score from 1-10 based on portfolio composition.
         
@@ -482,6 +523,10 @@ class PortfolioAnalyticsEngine:
         3. Number of securities within each asset class
         4. Concentration in individual positions
         
+        With risk_metrics covering enough of the portfolio, concentration is
+        measured by the effective number of independent bets, so ten highly
+        correlated stocks no longer count as ten separate positions.
+        
         PRODUCTION-GRADE: Cash-only portfolios return 0 (consistent with api_server.py
         and aggregated_portfolio_service.py). Score of 0 means "cannot diversify with
         only cash" - diversification requires having securities to diversify.
@@ -489,6 +534,7 @@ class PortfolioAnalyticsEngine:
         Args:
             positions: List of portfolio positions
             cash_balance: Optional cash balance (unused - kept for API compatibility)
+            risk_metrics: Optional return-based metrics from calculate_risk_metrics
             
         Returns:
             Decimal: Diversification score from 1-10, 0 for cash-only/empty portfolios
@@ -526,22 +572,26 @@ class PortfolioAnalyticsEngine:
         asset_class_score = min(num_asset_classes, 5) / 5 * 3
         
         # 2. Position concentration (0-4 points)
-        # Higher HHI (Herfindahl-Hirschman Index) means more concentration
-        position_weights = [p / total_value for p in position_percentages]
-        hhi = sum(w * w for w in position_weights) * 10000  # Scale to 0-10000
-        
-        # Convert HHI to a score where lower HHI = higher score
-        # For reference: HHI > 2500 is highly concentrated, < 1500 is competitive
-        if hhi > 5000:  # Extremely concentrated
-            concentration_score = 0
-        elif hhi > 2500:  # Highly concentrated
-            concentration_score = 1
-        elif hhi > 1500:  # Moderately concentrated
-            concentration_score = 2
-        elif hhi > 750:  # Competitive
-            concentration_score = 3
-        else:  # Very diversified
-            concentration_score = 4
+        if risk_metrics is not None and risk_metrics.is_reliable:
+            # Correlation-aware: 1 bet = 0 points, 2 = 2, 4 = 3, approaching 4
+            concentration_score = 4 * (1 - 1 / max(risk_metrics.effective_bets, 1.0))
+        else:
+            # Higher HHI (Herfindahl-Hirschman Index) means more concentration
+            position_weights = [p / total_value for p in position_percentages]
+            hhi = sum(w * w for w in position_weights) * 10000  # Scale to 0-10000
+            
+            # Convert HHI to a score where lower HHI = higher score
+            # For reference: HHI > 2500 is highly concentrated, < 1500 is competitive
+            if hhi > 5000:  # Extremely concentrated
+                concentration_score = 0
+            elif hhi > 2500:  # Highly concentrated
+                concentration_score = 1
+            elif hhi > 1500:  # Moderately concentrated
+                concentration_score = 2
+            elif hhi > 750:  # Competitive
+                concentration_score = 3
+            else:  # Very diversified
+                concentration_score = 4
             
         # 3. Asset class balance (0-3 points)
         if num_asset_classes <= 1:
@@ -572,7 +622,8 @@ class PortfolioAnalyticsEngine:
         cls, 
         positions: List[PortfolioPosition],
         historical_volatility: Optional[Dict[str, float]] = None,
-        cash_balance: Optional[Decimal] = None
+        cash_balance: Optional[Decimal] = None,
+        risk_metrics: Optional['PortfolioRiskMetrics'] = None
     ) -> Decimal:
         """Calculate a risk score from 1-10 based on portfolio composition.
         
@@ -582,6 +633,10 @@ class PortfolioAnalyticsEngine:
         3. Historical volatility of specific securities if available
         4. Cash holdings (lowest risk)
         
+        When risk_metrics covers enough of the portfolio, the score comes from
+        its annualised volatility relative to SPY instead (market = 7); the
+        composition weights below are the fallback when prices are missing.
+        
         PRODUCTION-GRADE: Cash-only portfolios return 0 (no market risk) to stay
         consistent across providers (api_server.py, aggregated_portfolio_service.py).
         
@@ -589,6 +644,7 @@ class PortfolioAnalyticsEngine:
             positions: List of portfolio positions
             historical_volatility: Optional dictionary mapping symbols to volatility values
             cash_balance: Optional cash balance for cash-inclusive risk calculation
+            risk_metrics: Optional return-based metrics from calculate_risk_metrics
             
         Returns:
             Decimal: Risk score from 1-10 where 10 is highest risk, 0 means no data / cash-only
@@ -597,6 +653,9 @@ class PortfolioAnalyticsEngine:
         # This keeps frontend and backend consistent (0/0 for cash-only)
         if not positions:
             return Decimal('0')
+        
+        if risk_metrics is not None and risk_metrics.is_reliable:
+            return Decimal(str(risk_metrics.risk_score))
             
         # Asset class risk weights (on a scale of 1-10)
         asset_class_risk = {
@@ -838,11 +897,14 @@ class PortfolioAnalyticsEngine:
         # Calculate total portfolio value including cash
         total_value = basic_analysis['total_value'] + cash_value
         
+        # Return-based risk metrics (None when stored prices are unavailable)
+        risk_metrics = cls.calculate_risk_metrics(positions, cash_value)
+        
         # Calculate risk score 
-        risk_score = cls.calculate_risk_score(positions)
+        risk_score = cls.calculate_risk_score(positions, risk_metrics=risk_metrics)
         
         # Calculate diversification score
-        diversification_score = cls.calculate_diversification_score(positions)
+        diversification_score = cls.calculate_diversification_score(positions, risk_metrics=risk_metrics)
         
         # Calculate returns attribution
         returns_attribution = cls.calculate_returns_attribution(positions)
@@ -880,6 +942,7 @@ class PortfolioAnalyticsEngine:
             total_gain_loss=total_gain_loss,
             total_gain_loss_percent=total_gain_loss_percent,
             risk_score=risk_score,
+            volatility=Decimal(str(round(risk_metrics.volatility, 4))) if risk_metrics else None,
             diversification_score=diversification_score,
             concentration_risk=concentration_risk,
             asset_class_attribution=asset_class_attribution
@@ -20,9 +20,10 @@ from langgraph.graph.message import add_messages
 from langchain_perplexity import ChatPerplexity
 from langchain_groq import ChatGroq
 
-#from langchain_pinecone import PineconeVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from pinecone import Pinecone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Pinecone or the local index (CLERA_RAG_BACKEND), with cached query embeddings
+from clera_chatbots.retrieval import build_retriever, get_query_embeddings
 
 load_dotenv(override=True)
 
@@ -100,24 +101,12 @@ class FinancialRAGAgent:
         #self.graph = graph_builder.compile()
 
     def initalize_vectorstore(self):
-        self.connect_pinecone()
         self.initalize_embedding_model()
-        vectorstore = PineconeVectorStore(
-            index=self.index,
-            embedding=self.embed,
-            text_key="text"
-        )
-        self.retriever = vectorstore.as_retriever(search_kwargs={"k":2})
-
-    def connect_pinecone(self):
-        pinecone_api_key = os.getenv("PINECONE_API_KEY")
-        self.pc = Pinecone(api_key=pinecone_api_key)
-        self.index_name = "langchain-retrieval-augmentation"
-        self.host_name = "https://langchain-retrieval-augmentation-07ueldf.svc.aped-4627-b74a.pinecone.io"
-        self.index = self.pc.Index(name=self.index_name, host=self.host_name)
+        # Repeated questions skip the embedding call and the index round trip
+        self.retriever = build_retriever(k=2, embeddings=self.embed)
 
     def initalize_embedding_model(self):
-        self.embed = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        self.embed = get_query_embeddings()
 
     def retrieval_node(self, state: State):
         user_message = HumanMessage(content=state["messages"][-1].content)
@@ -11,6 +11,7 @@
 #
 #
 import os
+import sys
 from typing import Annotated, Optional
 from typing_extensions import TypedDict
 import uuid
@@ -30,9 +31,10 @@ from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
 
-from langchain_pinecone import PineconeVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from pinecone import Pinecone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Pinecone or the local index (CLERA_RAG_BACKEND), with cached query embeddings
+from clera_chatbots.retrieval import build_retriever, get_query_embeddings
 
 from dotenv import load_dotenv 
 from datetime import datetime
@@ -117,36 +119,14 @@ class FinancialRAGAgent:
         print(self.graph.get_graph().draw_mermaid())
     
     def initalize_vectorstore(self):
-        # To create Vector Database, initialize connection to Pinecone
-        self.connect_pinecone()
         self.initalize_embedding_model()
-
-        # Set up the vector store
-        vectorstore = PineconeVectorStore(
-            index=self.index,
-            embedding=self.embed,
-            text_key="text"
-        )
-        # Create a retriever
-        self.retriever = vectorstore.as_retriever(search_kwargs={"k":2})
+        # Repeated questions skip the embedding call and the index round trip
+        self.retriever = build_retriever(k=2, embeddings=self.embed)
         print("completed initialization of vectorstore")
-    
-    def connect_pinecone(self):
-        self.pinecone_api_key = os.getenv("PINECONE_API_KEY")
-
-        try:
-            self.pc = Pinecone(api_key=self.pinecone_api_key)
-            print("Pinecone initialized successfully")
-        except Exception as e:
-            print(f"Pinecone initialization failed: {str(e)}")
-
-        self.index_name = "langchain-retrieval-augmentation"
-        self.host_name="https://langchain-retrieval-augmentation-07ueldf.svc.aped-4627-b74a.pinecone.io"
-        self.index = self.pc.Index(name=self.index_name, host=self.host_name)
 
     def initalize_embedding_model(self):
         try:
-            self.embed = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+            self.embed = get_query_embeddings()
         except Exception as e:
             print(f"Error initializing HuggingFace embeddings: {e}")
             exit(1)
@@ -154,7 +134,7 @@ class FinancialRAGAgent:
     
     def retrieval_node(self, state: State):
         """
-        This node retrieves relevant context from Pinecone based on the
+        This node retrieves relevant context from the vector index based on the
         user's last message in `state["messages"]`.
         """
         # This is the "raw" user input message:
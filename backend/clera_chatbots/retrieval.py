@@ -0,0 +1,479 @@
+"""
+Pluggable retrieval for the clera_chatbots RAG agents.
+
+Every FinancialRAGAgent used to connect to Pinecone and embed each question
+in retrieval_node. build_retriever() returns the retriever they use instead:
+
+- CLERA_RAG_BACKEND=pinecone (default): the existing Pinecone index
+- CLERA_RAG_BACKEND=local: LocalVectorIndex at CLERA_RAG_INDEX_PATH, an
+  on-disk index of memory-mapped float32 vectors with IVF lists; no network
+
+Queries are embedded through CachedEmbeddings, an LRU in front of a SQLite
+file keyed by model and normalized text, so repeated or trivially reworded
+questions skip the embedding call. The retriever also keeps an LRU of
+results per normalized question, which skips the Pinecone round trip too.
+
+scripts/build_rag_index.py builds a local index from a JSONL corpus or from
+the Pinecone index. HashingEmbeddings is a deterministic offline embedder for
+tests and dry runs.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+RAG_BACKEND = os.getenv('CLERA_RAG_BACKEND', 'pinecone')
+RAG_INDEX_PATH = os.getenv('CLERA_RAG_INDEX_PATH', os.path.expanduser('~/.cache/clera/rag_index'))
+EMBEDDING_CACHE_PATH = os.getenv(
+    'CLERA_RAG_EMBEDDING_CACHE', os.path.expanduser('~/.cache/clera/rag_embeddings.sqlite3')
+)  # Empty string keeps the cache in memory only
+EMBEDDING_MODEL = os.getenv('CLERA_RAG_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+EMBEDDING_CACHE_SIZE = int(os.getenv('CLERA_RAG_EMBEDDING_CACHE_SIZE', '2048'))
+RESULT_CACHE_SIZE = int(os.getenv('CLERA_RAG_RESULT_CACHE_SIZE', '256'))
+
+PINECONE_INDEX_NAME = os.getenv('PINECONE_INDEX_NAME', 'langchain-retrieval-augmentation')
+PINECONE_INDEX_HOST = os.getenv(
+    'PINECONE_INDEX_HOST', 'https://langchain-retrieval-augmentation-07ueldf.svc.aped-4627-b74a.pinecone.io'
+)
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_NPROBE = 8
+_SCORE_CHUNK_ROWS = 65536
+
+
+def normalize_query(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a question, used as cache key."""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    text = re.sub(r"[^\w\s$%]", ' ', text)
+    return ' '.join(text.split())
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embedder (feature hashing, no model, no network).
+
+    Questions that share words land close together, which is all tests and
+    dry runs need.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in normalize_query(text).split():
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return _unit_rows(vector).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LRU + on-disk cache in front of another Embeddings.
+
+    Keys are a hash of the namespace (model name), the kind (query or
+    document) and the normalized text. The disk layer is a SQLite file so
+    restarts and other processes on the host reuse embeddings.
+    """
+
+    def __init__(self, embeddings: Embeddings, namespace: str, max_entries: int = EMBEDDING_CACHE_SIZE,
+                 cache_path: Optional[str] = None):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lru: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)')
+            self._db.commit()
+
+        # Performance tracking
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{kind}\0{normalize_query(text)}".encode('utf-8')).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self._db is None:
+                return None
+            row = self._db.execute('SELECT vector FROM embeddings WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+            self.disk_hits += 1
+            self._remember(key, vector)
+            return vector
+
+    def _store(self, items: Sequence[Tuple[str, List[float]]]) -> None:
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._db is not None and items:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key('query', text)
+        vector = self._lookup(key)
+        if vector is None:
+            self.misses += 1
+            vector = list(self.embeddings.embed_query(text))
+            self._store([(key, vector)])
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key('document', text) for text in texts]
+        vectors: List[Optional[List[float]]] = [self._lookup(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            self.misses += len(missing)
+            embedded = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = list(vector)
+            self._store([(keys[i], vectors[i]) for i in missing])
+        return vectors
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'namespace': self.namespace,
+            'entries_in_memory': len(self._lru),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster unit vectors by cosine similarity; returns (centroids, assignment per row)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    assignments = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        for start in range(0, len(vectors), _SCORE_CHUNK_ROWS):
+            block = vectors[start:start + _SCORE_CHUNK_ROWS]
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Reseed empty lists with random rows so every list stays in use
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        centroids = _unit_rows(sums)
+    return centroids, assignments
+
+
+class LocalVectorIndex:
+    """
+    Embedded approximate-nearest-neighbour index over unit vectors (cosine).
+
+    On disk (one directory):
+        index.json      format version, dim, count, nlist, model
+        vectors.f32     float32 rows, grouped by IVF list; memory-mapped when searching
+        ivf.npz         list centroids and each list's row range
+        documents.jsonl one {"text", "metadata"} per row; doc_offsets.npy holds
+                        byte offsets so search reads only the hits
+
+    Search scores the query against the centroids, then against the rows of the
+    `nprobe` nearest lists. With nlist=1 (small corpora) it is an exact scan.
+    """
+
+    def __init__(self, path: str, meta: Dict[str, Any], vectors: np.ndarray, centroids: np.ndarray,
+                 list_offsets: np.ndarray, doc_offsets: np.ndarray):
+        self.path = path
+        self.meta = meta
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.doc_offsets = doc_offsets
+        self._documents = open(os.path.join(path, 'documents.jsonl'), 'rb')
+        self._lock = threading.Lock()
+
+    @property
+    def dim(self) -> int:
+        return int(self.meta['dim'])
+
+    @property
+    def nlist(self) -> int:
+        return int(self.meta['nlist'])
+
+    def __len__(self) -> int:
+        return int(self.meta['count'])
+
+    @classmethod
+    def build(cls, path: str, texts: Sequence[str], vectors: Any, metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+              nlist: Optional[int] = None, model: Optional[str] = None, iterations: int = 10,
+              seed: int = 0) -> 'LocalVectorIndex':
+        """Write an index for `texts` and their embeddings to `path` and open it."""
+        vectors = _unit_rows(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(texts) or not len(texts):
+            raise ValueError("Need one embedding row per text and at least one text")
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        if nlist is None:
+            nlist = max(1, int(np.sqrt(len(texts)))) if len(texts) >= 1024 else 1
+        nlist = min(nlist, len(texts))
+
+        if nlist > 1:
+            centroids, assignments = _spherical_kmeans(vectors, nlist, iterations, seed)
+        else:
+            centroids = _unit_rows(vectors.mean(axis=0, keepdims=True))
+            assignments = np.zeros(len(vectors), dtype=np.int64)
+        order = np.argsort(assignments, kind='stable')
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+
+        os.makedirs(path, exist_ok=True)
+        memmap = np.memmap(os.path.join(path, 'vectors.f32'), dtype=np.float32, mode='w+', shape=vectors.shape)
+        memmap[:] = vectors[order]
+        memmap.flush()
+        del memmap
+
+        doc_offsets = np.zeros(len(texts), dtype=np.int64)
+        with open(os.path.join(path, 'documents.jsonl'), 'wb') as documents:
+            for row, source in enumerate(order):
+                doc_offsets[row] = documents.tell()
+                line = json.dumps({'text': texts[source], 'metadata': metadatas[source] or {}})
+                documents.write(line.encode('utf-8') + b'\n')
+        np.save(os.path.join(path, 'doc_offsets.npy'), doc_offsets)
+        np.savez(os.path.join(path, 'ivf.npz'), centroids=centroids.astype(np.float32), list_offsets=list_offsets)
+
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({
+                'version': INDEX_FORMAT_VERSION,
+                'dim': int(vectors.shape[1]),
+                'count': int(len(texts)),
+                'nlist': int(nlist),
+                'model': model,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+            }, f)
+        logger.info(f"Built local RAG index at {path}: {len(texts)} documents, {nlist} lists")
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: str) -> 'LocalVectorIndex':
+        with open(os.path.join(path, 'index.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported local RAG index version {meta.get('version')} at {path}")
+        vectors = np.memmap(os.path.join(path, 'vectors.f32'), dtype=np.float32, mode='r',
+                            shape=(meta['count'], meta['dim']))
+        ivf = np.load(os.path.join(path, 'ivf.npz'))
+        doc_offsets = np.load(os.path.join(path, 'doc_offsets.npy'), mmap_mode='r')
+        return cls(path, meta, vectors, ivf['centroids'], ivf['list_offsets'], doc_offsets)
+
+    def search(self, query_vector: Sequence[float], k: int = 4,
+               nprobe: int = DEFAULT_NPROBE) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top-k (cosine score, {"text", "metadata"}) for a query embedding."""
+        query = _unit_rows(query_vector)
+        if query.shape != (self.dim,):
+            raise ValueError(f"Query has {query.shape[-1]} dimensions, index has {self.dim}")
+
+        lists = range(self.nlist)
+        if self.nlist > nprobe:
+            lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        rows, scores = [], []
+        for list_id in lists:
+            start, end = int(self.list_offsets[list_id]), int(self.list_offsets[list_id + 1])
+            for chunk in range(start, end, _SCORE_CHUNK_ROWS):
+                stop = min(chunk + _SCORE_CHUNK_ROWS, end)
+                rows.append(np.arange(chunk, stop))
+                scores.append(np.asarray(self.vectors[chunk:stop]) @ query)
+        if not rows:
+            return []
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self._read_document(int(rows[i]))) for i in top]
+
+    def _read_document(self, row: int) -> Dict[str, Any]:
+        with self._lock:
+            self._documents.seek(int(self.doc_offsets[row]))
+            return json.loads(self._documents.readline())
+
+    def close(self) -> None:
+        self._documents.close()
+
+
+class CachedRetriever:
+    """
+    Retriever with an LRU of results per normalized question.
+
+    `search(query, k)` does the actual lookup (local index or Pinecone);
+    invoke() has the same shape as the LangChain retriever the agents called.
+    """
+
+    def __init__(self, search: Callable[[str, int], List[Document]], k: int = 2,
+                 max_entries: int = RESULT_CACHE_SIZE, backend: str = 'custom'):
+        self.search = search
+        self.k = k
+        self.max_entries = max_entries
+        self.backend = backend
+        self._results: 'OrderedDict[str, List[Document]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Performance tracking
+        self.hits = 0
+        self.misses = 0
+
+    def invoke(self, query: str, config: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        key = normalize_query(query)
+        with self._lock:
+            docs = self._results.get(key)
+            if docs is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return list(docs)
+
+        self.misses += 1
+        docs = self.search(query, self.k)
+        with self._lock:
+            self._results[key] = list(docs)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return docs
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {'backend': self.backend, 'hits': self.hits, 'misses': self.misses, 'cached_queries': len(self._results)}
+
+
+def local_search(index: LocalVectorIndex, embeddings: Embeddings) -> Callable[[str, int], List[Document]]:
+    def search(query: str, k: int) -> List[Document]:
+        return [
+            Document(page_content=doc['text'], metadata={**doc.get('metadata', {}), 'score': score})
+            for score, doc in index.search(embeddings.embed_query(query), k)
+        ]
+    return search
+
+
+def connect_pinecone_index(api_key: Optional[str] = None):
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=api_key or os.getenv('PINECONE_API_KEY'))
+    return pc.Index(name=PINECONE_INDEX_NAME, host=PINECONE_INDEX_HOST)
+
+
+def pinecone_search(embeddings: Embeddings) -> Callable[[str, int], List[Document]]:
+    from langchain_pinecone import PineconeVectorStore
+
+    vectorstore = PineconeVectorStore(index=connect_pinecone_index(), embedding=embeddings, text_key='text')
+
+    def search(query: str, k: int) -> List[Document]:
+        return vectorstore.similarity_search(query, k=k)
+    return search
+
+
+_query_embeddings = None
+_query_embeddings_lock = threading.Lock()
+
+
+def get_query_embeddings() -> CachedEmbeddings:
+    """The shared, cached embedding model (loaded once per process)."""
+    global _query_embeddings
+    with _query_embeddings_lock:
+        if _query_embeddings is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+            _query_embeddings = CachedEmbeddings(
+                HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+                namespace=EMBEDDING_MODEL,
+                cache_path=EMBEDDING_CACHE_PATH or None,
+            )
+        return _query_embeddings
+
+
+def build_retriever(k: int = 2, backend: Optional[str] = None, embeddings: Optional[Embeddings] = None,
+                    index_path: Optional[str] = None) -> CachedRetriever:
+    """
+    Retriever for the RAG agents.
+
+    backend defaults to CLERA_RAG_BACKEND ('pinecone' or 'local'); the local
+    backend reads the index at index_path (default CLERA_RAG_INDEX_PATH).
+    """
+    backend = (backend or RAG_BACKEND).lower()
+    embeddings = embeddings or get_query_embeddings()
+
+    if backend == 'local':
+        index = LocalVectorIndex.open(index_path or RAG_INDEX_PATH)
+        namespace = getattr(embeddings, 'namespace', None)
+        if index.meta.get('model') and namespace and index.meta['model'] != namespace:
+            logger.warning(f"Local RAG index was built with {index.meta['model']} but queries use {namespace}")
+        logger.info(f"Using local RAG index at {index.path} ({len(index)} documents)")
+        return CachedRetriever(local_search(index, embeddings), k=k, backend='local')
+    if backend == 'pinecone':
+        return CachedRetriever(pinecone_search(embeddings), k=k, backend='pinecone')
+    raise ValueError(f"Unknown RAG backend '{backend}' (expected 'pinecone' or 'local')")
+
+
+def read_corpus(path: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Read a JSONL corpus of {"text": ..., "metadata": {...}} lines."""
+    texts, metadatas = [], []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record['text'])
+                metadatas.append(record.get('metadata') or {})
+    return texts, metadatas
+
+
+def iter_pinecone_vectors(index, batch_size: int = 100) -> Iterable[Tuple[str, List[float], Dict[str, Any]]]:
+    """Yield (text, stored vector, metadata) for every record in a Pinecone index."""
+    for ids in index.list(limit=batch_size):
+        fetched = index.fetch(ids=list(ids))
+        for record in fetched.vectors.values():
+            metadata = dict(record.metadata or {})
+            text = metadata.pop('text', '')
+            if text:
+                yield text, list(record.values), metadata
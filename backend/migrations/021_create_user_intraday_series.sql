@@ -0,0 +1,104 @@
+-- Migration 021: Packed intraday series storage
+-- Purpose: Compact alternative to one user_portfolio_history row per 5-minute snapshot
+-- Date: 2025-11-10
+--
+-- Intraday snapshots are stored as one row per user per day with packed
+-- timestamp/value arrays. A 1D chart becomes a single primary-key fetch and
+-- each 5-minute tick appends every user's point with one RPC call.
+--
+-- Enabled in the backend with INTRADAY_STORAGE_LAYOUT=packed.
+
+-- ===============================================
+-- PACKED INTRADAY SERIES TABLE
+-- ===============================================
+
+CREATE TABLE IF NOT EXISTS public.user_intraday_series (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    value_date DATE NOT NULL,
+
+    -- Parallel arrays: timestamps[i] (unix seconds) -> equity_values[i]
+    timestamps BIGINT[] NOT NULL DEFAULT '{}',
+    equity_values DOUBLE PRECISION[] NOT NULL DEFAULT '{}',
+
+    -- Baselines for the 1D chart (avoids a second lookup per request)
+    opening_value DECIMAL(20, 2),
+    previous_close DECIMAL(20, 2),
+
+    -- Running OHLC summary, maintained on append
+    intraday_high DECIMAL(20, 2),
+    intraday_low DECIMAL(20, 2),
+    closing_value DECIMAL(20, 2),
+
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now(),
+
+    PRIMARY KEY (user_id, value_date),
+    CHECK (cardinality(timestamps) = cardinality(equity_values))
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_intraday_series_date
+    ON public.user_intraday_series(value_date);
+
+-- ===============================================
+-- BULK APPEND FUNCTION (ONE CALL PER TICK)
+-- ===============================================
+
+-- points: [{"user_id", "value_date", "ts", "value", "opening_value", "previous_close"}, ...]
+CREATE OR REPLACE FUNCTION public.append_intraday_points(points JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    appended INTEGER;
+BEGIN
+    INSERT INTO public.user_intraday_series AS s (
+        user_id, value_date, timestamps, equity_values,
+        opening_value, previous_close, intraday_high, intraday_low, closing_value
+    )
+    SELECT
+        (p->>'user_id')::UUID,
+        (p->>'value_date')::DATE,
+        ARRAY[(p->>'ts')::BIGINT],
+        ARRAY[(p->>'value')::DOUBLE PRECISION],
+        (p->>'opening_value')::DECIMAL,
+        (p->>'previous_close')::DECIMAL,
+        (p->>'value')::DECIMAL,
+        (p->>'value')::DECIMAL,
+        (p->>'value')::DECIMAL
+    FROM jsonb_array_elements(points) AS p
+    ON CONFLICT (user_id, value_date) DO UPDATE SET
+        timestamps = s.timestamps || EXCLUDED.timestamps,
+        equity_values = s.equity_values || EXCLUDED.equity_values,
+        opening_value = COALESCE(s.opening_value, EXCLUDED.opening_value),
+        previous_close = COALESCE(s.previous_close, EXCLUDED.previous_close),
+        intraday_high = GREATEST(s.intraday_high, EXCLUDED.intraday_high),
+        intraday_low = LEAST(s.intraday_low, EXCLUDED.intraday_low),
+        closing_value = EXCLUDED.closing_value,
+        updated_at = now();
+
+    GET DIAGNOSTICS appended = ROW_COUNT;
+    RETURN appended;
+END;
+$$;
+
+-- ===============================================
+-- ROW LEVEL SECURITY
+-- ===============================================
+
+ALTER TABLE public.user_intraday_series ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own intraday series"
+    ON public.user_intraday_series FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Service role has full access to intraday series"
+    ON public.user_intraday_series FOR ALL
+    USING (auth.role() = 'service_role');
+
+REVOKE EXECUTE ON FUNCTION public.append_intraday_points(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.append_intraday_points(JSONB) TO service_role;
+
+COMMENT ON TABLE public.user_intraday_series IS
+'Packed intraday portfolio values: one row per user per day with parallel timestamp/value arrays.';
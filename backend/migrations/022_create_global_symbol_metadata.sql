@@ -0,0 +1,44 @@
+-- Migration 022: Durable symbol metadata (sector/industry)
+-- Purpose: Keep FMP sector lookups beyond the 24h Redis sector:{symbol} TTL
+-- Date: 2025-11-12
+--
+-- Written by utils/portfolio/sector_resolver.py after batched FMP /profile
+-- calls and read for any symbol missing from Redis, so a cold cache no longer
+-- means one FMP request per holding.
+
+-- ===============================================
+-- GLOBAL SYMBOL METADATA (SHARED ACROSS ALL USERS)
+-- ===============================================
+
+CREATE TABLE IF NOT EXISTS public.global_symbol_metadata (
+    symbol TEXT PRIMARY KEY,
+    sector TEXT NOT NULL,
+    industry TEXT,
+    company_name TEXT,
+
+    -- Where the classification came from ('fmp', 'manual')
+    source TEXT NOT NULL DEFAULT 'fmp',
+
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_global_symbol_metadata_updated_at
+    ON public.global_symbol_metadata(updated_at);
+
+-- ===============================================
+-- ROW LEVEL SECURITY
+-- ===============================================
+
+ALTER TABLE public.global_symbol_metadata ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can read symbol metadata"
+    ON public.global_symbol_metadata FOR SELECT
+    USING (auth.role() = 'authenticated');
+
+CREATE POLICY "Service role has full access to symbol metadata"
+    ON public.global_symbol_metadata FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE public.global_symbol_metadata IS
+'Durable symbol -> sector/industry classifications, backing the sector:{symbol} Redis cache.';
@@ -0,0 +1,13 @@
+-- Migration 023: ETF look-through exposure on daily snapshots
+-- Purpose: Store each EOD snapshot's true sector and asset-class exposure from ETFs
+-- Date: 2025-11-13
+--
+-- Written by DailyPortfolioSnapshotService from utils/portfolio/etf_lookthrough.py:
+-- {"sectors": {"Technology": 1234.56, ...}, "asset_classes": {"us_equity": ...}}
+-- in dollars, covering only ETFs with known composition. Older rows keep '{}'.
+
+ALTER TABLE public.user_portfolio_history
+    ADD COLUMN IF NOT EXISTS lookthrough_exposure JSONB DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN public.user_portfolio_history.lookthrough_exposure IS
+'Dollar sector/asset-class exposure of the snapshot''s ETF holdings, looked through to their constituents.';
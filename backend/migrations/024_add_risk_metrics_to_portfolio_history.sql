@@ -0,0 +1,14 @@
+-- Migration 024: Return-based risk metrics on daily snapshots
+-- Purpose: Store each EOD snapshot's volatility, beta and diversification from the covariance model
+-- Date: 2025-11-14
+--
+-- Written by DailyPortfolioSnapshotService from utils/portfolio/risk_engine.py:
+-- {"volatility": 0.182, "beta": 1.04, "diversification_ratio": 1.31, "effective_bets": 1.72,
+--  "coverage": 0.97, "risk_score": 7.8, "as_of": "2025-11-14"}
+-- Volatility is annualised. Users without stored price history keep '{}'.
+
+ALTER TABLE public.user_portfolio_history
+    ADD COLUMN IF NOT EXISTS risk_metrics JSONB DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN public.user_portfolio_history.risk_metrics IS
+'Annualised volatility, beta vs SPY and correlation-aware diversification of the snapshot''s holdings.';
@@ -0,0 +1,158 @@
+-- Migration 025: Durable portfolio reconstruction job queue
+-- Purpose: Replace the per-process asyncio.Queue in PortfolioReconstructionManager
+-- Date: 2025-11-15
+--
+-- Every API replica runs reconstruction workers that claim jobs from this table
+-- with FOR UPDATE SKIP LOCKED, so queued work survives restarts and is shared
+-- across replicas. One open (queued/running) job per user: repeat requests
+-- only raise the priority of the existing job.
+--
+-- Used by services/reconstruction_job_queue.py (RECONSTRUCTION_QUEUE_BACKEND=postgres).
+
+-- ===============================================
+-- JOB TABLE
+-- ===============================================
+
+CREATE TABLE IF NOT EXISTS public.portfolio_reconstruction_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+
+    -- 0 = high (new user), 1 = normal, 2 = low (cron / retries)
+    priority SMALLINT NOT NULL DEFAULT 1 CHECK (priority BETWEEN 0 AND 2),
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    progress DECIMAL(5, 2) NOT NULL DEFAULT 0.00,
+
+    -- Retry bookkeeping: a failed attempt goes back to 'queued' with a later available_at
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT,
+
+    -- Lease held by the worker running the job; expired leases are reclaimed
+    locked_by TEXT,
+    lease_expires_at TIMESTAMPTZ,
+
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+
+-- Deduplication: at most one open job per user
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reconstruction_jobs_open_user
+    ON public.portfolio_reconstruction_jobs(user_id)
+    WHERE status IN ('queued', 'running');
+
+-- Claim order
+CREATE INDEX IF NOT EXISTS idx_reconstruction_jobs_claim
+    ON public.portfolio_reconstruction_jobs(priority, available_at, created_at)
+    WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_reconstruction_jobs_lease
+    ON public.portfolio_reconstruction_jobs(lease_expires_at)
+    WHERE status = 'running';
+
+-- ===============================================
+-- ENQUEUE (DEDUPLICATED)
+-- ===============================================
+
+-- Returns the open job for the user plus whether this call created it.
+CREATE OR REPLACE FUNCTION public.enqueue_reconstruction_job(
+    p_user_id UUID,
+    p_priority SMALLINT DEFAULT 1,
+    p_max_attempts INTEGER DEFAULT 3
+)
+RETURNS TABLE (job JSONB, created BOOLEAN)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    row_data public.portfolio_reconstruction_jobs;
+BEGIN
+    LOOP
+        INSERT INTO public.portfolio_reconstruction_jobs (user_id, priority, max_attempts)
+        VALUES (p_user_id, p_priority, p_max_attempts)
+        ON CONFLICT (user_id) WHERE status IN ('queued', 'running') DO NOTHING
+        RETURNING * INTO row_data;
+
+        IF FOUND THEN
+            RETURN QUERY SELECT to_jsonb(row_data), TRUE;
+            RETURN;
+        END IF;
+
+        UPDATE public.portfolio_reconstruction_jobs
+        SET priority = LEAST(priority, p_priority),
+            updated_at = now()
+        WHERE user_id = p_user_id
+          AND status IN ('queued', 'running')
+        RETURNING * INTO row_data;
+
+        IF FOUND THEN
+            RETURN QUERY SELECT to_jsonb(row_data), FALSE;
+            RETURN;
+        END IF;
+
+        -- The open job finished after the insert saw it; the next insert succeeds
+    END LOOP;
+END;
+$$;
+
+-- ===============================================
+-- CLAIM (SKIP LOCKED)
+-- ===============================================
+
+-- Leases up to p_limit due jobs to p_worker_id, highest priority first.
+-- Running jobs whose lease expired (worker died) are claimed again.
+CREATE OR REPLACE FUNCTION public.claim_reconstruction_jobs(
+    p_worker_id TEXT,
+    p_limit INTEGER DEFAULT 1,
+    p_lease_seconds INTEGER DEFAULT 900
+)
+RETURNS SETOF public.portfolio_reconstruction_jobs
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.portfolio_reconstruction_jobs j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        locked_by = p_worker_id,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        updated_at = now()
+    WHERE j.id IN (
+        SELECT id
+        FROM public.portfolio_reconstruction_jobs
+        WHERE (status = 'queued' AND available_at <= now())
+           OR (status = 'running' AND lease_expires_at < now())
+        ORDER BY priority, available_at, created_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.*;
+END;
+$$;
+
+-- ===============================================
+-- ROW LEVEL SECURITY
+-- ===============================================
+
+ALTER TABLE public.portfolio_reconstruction_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own reconstruction jobs"
+    ON public.portfolio_reconstruction_jobs FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Service role has full access to reconstruction jobs"
+    ON public.portfolio_reconstruction_jobs FOR ALL
+    USING (auth.role() = 'service_role');
+
+REVOKE EXECUTE ON FUNCTION public.enqueue_reconstruction_job(UUID, SMALLINT, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.enqueue_reconstruction_job(UUID, SMALLINT, INTEGER) TO service_role;
+REVOKE EXECUTE ON FUNCTION public.claim_reconstruction_jobs(TEXT, INTEGER, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.claim_reconstruction_jobs(TEXT, INTEGER, INTEGER) TO service_role;
+
+COMMENT ON TABLE public.portfolio_reconstruction_jobs IS
+'Durable reconstruction job queue shared by all API replicas (one open job per user).';
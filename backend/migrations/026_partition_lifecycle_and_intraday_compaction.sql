@@ -0,0 +1,299 @@
+-- Migration 026: Partition lifecycle and intraday compaction
+-- Purpose: Keep history tables partitioned ahead of time and compact old intraday data
+-- Date: 2025-11-16
+--
+-- Migration 005 created fixed yearly partitions (2023-2026 for
+-- user_portfolio_history, 2023-2025 for global_historical_prices) and nothing
+-- created later ones, so inserts past the last partition fail. This migration
+-- adds the functions the maintenance job (services/partition_maintenance_service.py)
+-- calls daily:
+--
+--   ensure_monthly_partitions   pre-create monthly partitions N months ahead
+--   compact_intraday_history    roll intraday snapshots older than N days into
+--                               the daily_eod row's OHLC columns, then delete them
+--   drop_expired_partitions     drop (or detach) whole partitions past retention
+--   history_table_stats         per-table size report for before/after checks
+--
+-- It also re-creates user_intraday_series (migration 021) partitioned by
+-- month, so expiring packed intraday data is a DROP TABLE per month instead of
+-- a row-by-row delete.
+
+-- ===============================================
+-- MONTHLY PARTITIONS
+-- ===============================================
+
+-- Creates <table>_yYYYYmMM partitions from the month of p_from through
+-- p_months_ahead months after the current month. Months already covered by a
+-- legacy yearly partition are skipped. Returns the partitions created.
+CREATE OR REPLACE FUNCTION public.ensure_monthly_partitions(
+    p_table TEXT,
+    p_months_ahead INTEGER DEFAULT 3,
+    p_from DATE DEFAULT NULL
+)
+RETURNS SETOF TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    month_start DATE := date_trunc('month', COALESCE(p_from, current_date))::DATE;
+    last_month DATE := (date_trunc('month', current_date) + make_interval(months => p_months_ahead))::DATE;
+    partition_name TEXT;
+BEGIN
+    IF p_table NOT IN ('user_portfolio_history', 'global_historical_prices', 'user_intraday_series') THEN
+        RAISE EXCEPTION 'Partition maintenance is not enabled for table %', p_table;
+    END IF;
+
+    WHILE month_start <= last_month LOOP
+        partition_name := format('%s_y%sm%s', p_table, to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, p_table, month_start, (month_start + INTERVAL '1 month')::DATE
+                );
+                RETURN NEXT partition_name;
+            EXCEPTION WHEN invalid_object_definition THEN
+                -- Overlaps a legacy yearly partition: that month is already covered
+                NULL;
+            END;
+        END IF;
+
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+END;
+$$;
+
+-- ===============================================
+-- PARTITIONED PACKED INTRADAY SERIES
+-- ===============================================
+
+DO $$
+DECLARE
+    first_day DATE;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table
+        WHERE partrelid = 'public.user_intraday_series'::regclass
+    ) THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE public.user_intraday_series RENAME TO user_intraday_series_unpartitioned;
+    ALTER INDEX IF EXISTS public.user_intraday_series_pkey RENAME TO user_intraday_series_unpartitioned_pkey;
+    ALTER INDEX IF EXISTS public.idx_user_intraday_series_date RENAME TO idx_user_intraday_series_date_unpartitioned;
+
+    CREATE TABLE public.user_intraday_series (
+        user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+        value_date DATE NOT NULL,
+        timestamps BIGINT[] NOT NULL DEFAULT '{}',
+        equity_values DOUBLE PRECISION[] NOT NULL DEFAULT '{}',
+        opening_value DECIMAL(20, 2),
+        previous_close DECIMAL(20, 2),
+        intraday_high DECIMAL(20, 2),
+        intraday_low DECIMAL(20, 2),
+        closing_value DECIMAL(20, 2),
+        created_at TIMESTAMPTZ DEFAULT now(),
+        updated_at TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (user_id, value_date),
+        CHECK (cardinality(timestamps) = cardinality(equity_values))
+    ) PARTITION BY RANGE (value_date);
+
+    CREATE INDEX idx_user_intraday_series_date ON public.user_intraday_series(value_date);
+
+    SELECT COALESCE(min(value_date), current_date) INTO first_day FROM public.user_intraday_series_unpartitioned;
+    PERFORM public.ensure_monthly_partitions('user_intraday_series', 3, first_day);
+
+    INSERT INTO public.user_intraday_series SELECT * FROM public.user_intraday_series_unpartitioned;
+    DROP TABLE public.user_intraday_series_unpartitioned;
+END;
+$$;
+
+ALTER TABLE public.user_intraday_series ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own intraday series" ON public.user_intraday_series;
+CREATE POLICY "Users can view their own intraday series"
+    ON public.user_intraday_series FOR SELECT
+    USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Service role has full access to intraday series" ON public.user_intraday_series;
+CREATE POLICY "Service role has full access to intraday series"
+    ON public.user_intraday_series FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE public.user_intraday_series IS
+'Packed intraday portfolio values: one row per user per day, partitioned by month for O(1) expiry.';
+
+-- Monthly partitions from the current month for the high-volume tables
+SELECT public.ensure_monthly_partitions('user_portfolio_history', 3);
+SELECT public.ensure_monthly_partitions('global_historical_prices', 3, '2026-01-01');
+
+-- ===============================================
+-- INTRADAY COMPACTION
+-- ===============================================
+
+-- Rolls intraday data dated before current_date - p_keep_days into one
+-- daily_eod row per user per day (open/high/low/close), then deletes the
+-- row-layout intraday snapshots. Existing daily_eod rows keep their values and
+-- only gain missing OHLC fields. Packed series are summarised here and
+-- removed later by drop_expired_partitions.
+CREATE OR REPLACE FUNCTION public.compact_intraday_history(p_keep_days INTEGER DEFAULT 7)
+RETURNS TABLE (days_rolled_up INTEGER, intraday_rows_deleted INTEGER)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    cutoff DATE := current_date - p_keep_days;
+    rolled_rows INTEGER;
+    rolled_series INTEGER;
+    deleted INTEGER;
+BEGIN
+    WITH days AS (
+        SELECT
+            user_id,
+            value_date,
+            (array_agg(total_value ORDER BY created_at))[1] AS first_value,
+            (array_agg(total_value ORDER BY created_at DESC))[1] AS last_value,
+            (array_agg(total_cost_basis ORDER BY created_at DESC))[1] AS last_cost_basis,
+            (array_agg(total_gain_loss ORDER BY created_at DESC))[1] AS last_gain_loss,
+            (array_agg(total_gain_loss_percent ORDER BY created_at DESC))[1] AS last_gain_loss_percent,
+            (array_agg(securities_count ORDER BY created_at DESC))[1] AS last_securities_count,
+            max(opening_value) AS opening_value,
+            max(total_value) AS high_value,
+            min(total_value) AS low_value
+        FROM public.user_portfolio_history
+        WHERE snapshot_type = 'intraday'
+          AND value_date < cutoff
+        GROUP BY user_id, value_date
+    )
+    INSERT INTO public.user_portfolio_history AS h (
+        user_id, value_date, snapshot_type, total_value, total_cost_basis,
+        total_gain_loss, total_gain_loss_percent, opening_value, closing_value,
+        intraday_high, intraday_low, data_source, data_quality_score, securities_count
+    )
+    SELECT
+        user_id, value_date, 'daily_eod', last_value, COALESCE(last_cost_basis, last_value),
+        COALESCE(last_gain_loss, 0), COALESCE(last_gain_loss_percent, 0),
+        COALESCE(opening_value, first_value), last_value, high_value, low_value,
+        'intraday_rollup', 95.0, COALESCE(last_securities_count, 0)
+    FROM days
+    ON CONFLICT (user_id, value_date) WHERE snapshot_type = 'daily_eod' DO UPDATE SET
+        opening_value = COALESCE(h.opening_value, EXCLUDED.opening_value),
+        closing_value = COALESCE(h.closing_value, EXCLUDED.closing_value),
+        intraday_high = GREATEST(h.intraday_high, EXCLUDED.intraday_high),
+        intraday_low = LEAST(h.intraday_low, EXCLUDED.intraday_low),
+        updated_at = now();
+    GET DIAGNOSTICS rolled_rows = ROW_COUNT;
+
+    INSERT INTO public.user_portfolio_history AS h (
+        user_id, value_date, snapshot_type, total_value, total_cost_basis,
+        opening_value, closing_value, intraday_high, intraday_low,
+        data_source, data_quality_score
+    )
+    SELECT
+        s.user_id, s.value_date, 'daily_eod', s.closing_value, s.closing_value,
+        s.opening_value, s.closing_value, s.intraday_high, s.intraday_low,
+        'intraday_rollup', 95.0
+    FROM public.user_intraday_series s
+    WHERE s.value_date < cutoff
+      AND s.closing_value IS NOT NULL
+    ON CONFLICT (user_id, value_date) WHERE snapshot_type = 'daily_eod' DO UPDATE SET
+        opening_value = COALESCE(h.opening_value, EXCLUDED.opening_value),
+        closing_value = COALESCE(h.closing_value, EXCLUDED.closing_value),
+        intraday_high = GREATEST(h.intraday_high, EXCLUDED.intraday_high),
+        intraday_low = LEAST(h.intraday_low, EXCLUDED.intraday_low),
+        updated_at = now();
+    GET DIAGNOSTICS rolled_series = ROW_COUNT;
+
+    -- Intraday rows share partitions with daily history, so they are removed
+    -- with one set-based delete rather than by dropping a partition
+    DELETE FROM public.user_portfolio_history
+    WHERE snapshot_type = 'intraday'
+      AND value_date < cutoff;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+
+    RETURN QUERY SELECT rolled_rows + rolled_series, deleted;
+END;
+$$;
+
+-- ===============================================
+-- PARTITION EXPIRY
+-- ===============================================
+
+-- Drops (or, with p_detach, detaches for archiving) every monthly partition
+-- of p_table that ends on or before p_before. Legacy yearly partitions follow
+-- the same rule. Returns the partitions removed.
+CREATE OR REPLACE FUNCTION public.drop_expired_partitions(
+    p_table TEXT,
+    p_before DATE,
+    p_detach BOOLEAN DEFAULT FALSE
+)
+RETURNS SETOF TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    IF p_table NOT IN ('user_portfolio_history', 'global_historical_prices', 'user_intraday_series') THEN
+        RAISE EXCEPTION 'Partition maintenance is not enabled for table %', p_table;
+    END IF;
+
+    FOR part IN
+        SELECT
+            child.relname AS name,
+            (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'TO \(''([0-9-]+)''\)'))[1]::DATE AS upper_bound
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = parent.relnamespace
+        WHERE n.nspname = 'public'
+          AND parent.relname = p_table
+    LOOP
+        CONTINUE WHEN part.upper_bound IS NULL OR part.upper_bound > p_before;
+
+        IF p_detach THEN
+            EXECUTE format('ALTER TABLE public.%I DETACH PARTITION public.%I', p_table, part.name);
+        ELSE
+            EXECUTE format('DROP TABLE public.%I', part.name);
+        END IF;
+        RETURN NEXT part.name;
+    END LOOP;
+END;
+$$;
+
+-- ===============================================
+-- SIZE REPORT
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION public.history_table_stats()
+RETURNS TABLE (table_name TEXT, partitions INTEGER, total_bytes BIGINT, estimated_rows BIGINT)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT
+        parent.relname::TEXT,
+        count(child.oid)::INTEGER,
+        COALESCE(sum(pg_total_relation_size(child.oid)), 0)::BIGINT,
+        COALESCE(sum(GREATEST(child.reltuples, 0)), 0)::BIGINT
+    FROM pg_class parent
+    JOIN pg_namespace n ON n.oid = parent.relnamespace
+    LEFT JOIN pg_inherits i ON i.inhparent = parent.oid
+    LEFT JOIN pg_class child ON child.oid = i.inhrelid
+    WHERE n.nspname = 'public'
+      AND parent.relname IN ('user_portfolio_history', 'global_historical_prices', 'user_intraday_series')
+    GROUP BY parent.relname;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.ensure_monthly_partitions(TEXT, INTEGER, DATE) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.ensure_monthly_partitions(TEXT, INTEGER, DATE) TO service_role;
+REVOKE EXECUTE ON FUNCTION public.compact_intraday_history(INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.compact_intraday_history(INTEGER) TO service_role;
+REVOKE EXECUTE ON FUNCTION public.drop_expired_partitions(TEXT, DATE, BOOLEAN) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.drop_expired_partitions(TEXT, DATE, BOOLEAN) TO service_role;
+REVOKE EXECUTE ON FUNCTION public.history_table_stats() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.history_table_stats() TO service_role;
@@ -0,0 +1,164 @@
+-- Migration 027: Persistent account closure state machine
+-- Purpose: Replace the per-account asyncio tasks in AutomatedAccountClosureProcessor
+-- Date: 2025-11-17
+--
+-- Each closing account is one row holding its closure state and the time it
+-- is next due (next_run_at). A single poller (services/account_closure_poller.py)
+-- claims every due row with FOR UPDATE SKIP LOCKED, batch-reads account,
+-- position and transfer status for all of them, advances each state and
+-- writes the next due time back. Nothing waits in memory between steps, so
+-- closures survive restarts and deployments without an external resume script.
+--
+-- Used by services/account_closure_jobs.py (ACCOUNT_CLOSURE_STORE_BACKEND=postgres).
+
+-- ===============================================
+-- JOB TABLE
+-- ===============================================
+
+CREATE TABLE IF NOT EXISTS public.account_closure_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    account_id TEXT NOT NULL,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    ach_relationship_id TEXT NOT NULL,
+    confirmation_number TEXT,
+
+    state TEXT NOT NULL DEFAULT 'initiated'
+        CHECK (state IN ('initiated', 'liquidating', 'waiting_settlement', 'withdrawing_funds',
+                         'waiting_transfer', 'closing_account', 'completed', 'failed', 'cancelled')),
+    state_entered_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    next_run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    -- Withdrawal bookkeeping: ACH transfers are capped per day, so large
+    -- balances leave in several transfers at least 24 hours apart
+    transfer_id TEXT,
+    transfers JSONB NOT NULL DEFAULT '[]'::JSONB,
+    last_withdrawal_at TIMESTAMPTZ,
+
+    -- Consecutive failed polls; reset on every successful transition
+    errors INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+
+    -- Lease held by the poller while it advances the job; expired leases are reclaimed
+    locked_by TEXT,
+    lease_expires_at TIMESTAMPTZ,
+
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+
+-- At most one open closure per account
+CREATE UNIQUE INDEX IF NOT EXISTS idx_account_closure_jobs_open_account
+    ON public.account_closure_jobs(account_id)
+    WHERE state NOT IN ('completed', 'failed', 'cancelled');
+
+-- Due order (the timer wheel)
+CREATE INDEX IF NOT EXISTS idx_account_closure_jobs_due
+    ON public.account_closure_jobs(next_run_at)
+    WHERE state NOT IN ('completed', 'failed', 'cancelled');
+
+CREATE INDEX IF NOT EXISTS idx_account_closure_jobs_user
+    ON public.account_closure_jobs(user_id, created_at DESC);
+
+-- ===============================================
+-- CREATE (DEDUPLICATED)
+-- ===============================================
+
+-- Returns the open closure for the account plus whether this call created it.
+CREATE OR REPLACE FUNCTION public.create_account_closure_job(
+    p_account_id TEXT,
+    p_user_id UUID,
+    p_ach_relationship_id TEXT,
+    p_confirmation_number TEXT DEFAULT NULL
+)
+RETURNS TABLE (job JSONB, created BOOLEAN)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    row_data public.account_closure_jobs;
+BEGIN
+    LOOP
+        INSERT INTO public.account_closure_jobs (account_id, user_id, ach_relationship_id, confirmation_number)
+        VALUES (p_account_id, p_user_id, p_ach_relationship_id, p_confirmation_number)
+        ON CONFLICT (account_id) WHERE state NOT IN ('completed', 'failed', 'cancelled') DO NOTHING
+        RETURNING * INTO row_data;
+
+        IF FOUND THEN
+            RETURN QUERY SELECT to_jsonb(row_data), TRUE;
+            RETURN;
+        END IF;
+
+        SELECT * INTO row_data
+        FROM public.account_closure_jobs
+        WHERE account_id = p_account_id
+          AND state NOT IN ('completed', 'failed', 'cancelled');
+
+        IF FOUND THEN
+            RETURN QUERY SELECT to_jsonb(row_data), FALSE;
+            RETURN;
+        END IF;
+
+        -- The open closure finished after the insert saw it; the next insert succeeds
+    END LOOP;
+END;
+$$;
+
+-- ===============================================
+-- CLAIM DUE JOBS (SKIP LOCKED)
+-- ===============================================
+
+-- Leases up to p_limit open closures whose next_run_at has passed to
+-- p_worker_id, earliest due first. Leases left by a dead poller are reclaimed.
+CREATE OR REPLACE FUNCTION public.claim_due_account_closures(
+    p_worker_id TEXT,
+    p_limit INTEGER DEFAULT 100,
+    p_lease_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF public.account_closure_jobs
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.account_closure_jobs j
+    SET locked_by = p_worker_id,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        updated_at = now()
+    WHERE j.id IN (
+        SELECT id
+        FROM public.account_closure_jobs
+        WHERE state NOT IN ('completed', 'failed', 'cancelled')
+          AND next_run_at <= now()
+          AND (locked_by IS NULL OR lease_expires_at < now())
+        ORDER BY next_run_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.*;
+END;
+$$;
+
+-- ===============================================
+-- ROW LEVEL SECURITY
+-- ===============================================
+
+ALTER TABLE public.account_closure_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own account closure jobs"
+    ON public.account_closure_jobs FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Service role has full access to account closure jobs"
+    ON public.account_closure_jobs FOR ALL
+    USING (auth.role() = 'service_role');
+
+REVOKE EXECUTE ON FUNCTION public.create_account_closure_job(TEXT, UUID, TEXT, TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.create_account_closure_job(TEXT, UUID, TEXT, TEXT) TO service_role;
+REVOKE EXECUTE ON FUNCTION public.claim_due_account_closures(TEXT, INTEGER, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.claim_due_account_closures(TEXT, INTEGER, INTEGER) TO service_role;
+
+COMMENT ON TABLE public.account_closure_jobs IS
+'Persistent account closure state machine advanced by a single batched poller (one open closure per account).';
@@ -0,0 +1,115 @@
+-- Migration 028: Daily rollups for account closure logs
+-- Purpose: Serve account closure analytics from pre-aggregated counters instead of raw log scans
+-- Date: 2025-11-18
+--
+-- AccountClosureAnalytics used to pull up to 90 days of account_closure_logs
+-- rows and count them in Python on every dashboard or monitor call. This
+-- migration adds one counter row per (day, dimension, key), bumped by a
+-- trigger on every insert into account_closure_logs (i.e. every log written
+-- by AccountClosureLogger), and backfills it from the existing logs.
+--
+--   dimension   key               counts
+--   total       ''                every log that day
+--   log_level   INFO/ERROR/...    logs per level
+--   step        step_name         logs per closure step
+--   account     Alpaca account    logs per account (unique / top accounts)
+--
+-- Each row carries log_count plus error_count (log_level = 'ERROR'),
+-- completed_count and failed_count (message contains COMPLETED / FAILED),
+-- so readers only touch days x keys rows, however many logs were written.
+-- Rollups are history: deleting old logs (cleanup) does not decrement them.
+
+CREATE TABLE IF NOT EXISTS public.account_closure_log_daily_rollups (
+    day DATE NOT NULL,
+    dimension TEXT NOT NULL CHECK (dimension IN ('total', 'log_level', 'step', 'account')),
+    key TEXT NOT NULL DEFAULT '',
+    log_count BIGINT NOT NULL DEFAULT 0,
+    error_count BIGINT NOT NULL DEFAULT 0,
+    completed_count BIGINT NOT NULL DEFAULT 0,
+    failed_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (day, dimension, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_account_closure_log_rollups_dimension_day
+    ON public.account_closure_log_daily_rollups (dimension, day);
+
+-- ===============================================
+-- INCREMENTAL MAINTENANCE
+-- ===============================================
+
+CREATE OR REPLACE FUNCTION public.bump_account_closure_log_rollups()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_day DATE := (COALESCE(NEW.created_at, now()) AT TIME ZONE 'UTC')::date;
+    v_error INTEGER := CASE WHEN NEW.log_level = 'ERROR' THEN 1 ELSE 0 END;
+    v_completed INTEGER := CASE WHEN NEW.message LIKE '%COMPLETED%' THEN 1 ELSE 0 END;
+    v_failed INTEGER := CASE WHEN NEW.message LIKE '%FAILED%' THEN 1 ELSE 0 END;
+BEGIN
+    INSERT INTO public.account_closure_log_daily_rollups AS r
+        (day, dimension, key, log_count, error_count, completed_count, failed_count)
+    SELECT v_day, d.dimension, d.key, 1, v_error, v_completed, v_failed
+    FROM (VALUES
+        ('total', ''),
+        ('log_level', COALESCE(NEW.log_level, 'UNKNOWN')),
+        ('step', COALESCE(NEW.step_name, 'UNKNOWN')),
+        ('account', NEW.account_id)
+    ) AS d(dimension, key)
+    WHERE d.key IS NOT NULL
+    ON CONFLICT (day, dimension, key) DO UPDATE SET
+        log_count = r.log_count + 1,
+        error_count = r.error_count + EXCLUDED.error_count,
+        completed_count = r.completed_count + EXCLUDED.completed_count,
+        failed_count = r.failed_count + EXCLUDED.failed_count,
+        updated_at = now();
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- ===============================================
+-- BACKFILL (before the trigger, so no log is counted twice)
+-- ===============================================
+
+INSERT INTO public.account_closure_log_daily_rollups
+    (day, dimension, key, log_count, error_count, completed_count, failed_count)
+SELECT
+    (l.created_at AT TIME ZONE 'UTC')::date,
+    d.dimension,
+    d.key,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE l.log_level = 'ERROR'),
+    COUNT(*) FILTER (WHERE l.message LIKE '%COMPLETED%'),
+    COUNT(*) FILTER (WHERE l.message LIKE '%FAILED%')
+FROM public.account_closure_logs l
+CROSS JOIN LATERAL (VALUES
+    ('total', ''),
+    ('log_level', COALESCE(l.log_level, 'UNKNOWN')),
+    ('step', COALESCE(l.step_name, 'UNKNOWN')),
+    ('account', l.account_id)
+) AS d(dimension, key)
+WHERE d.key IS NOT NULL AND l.created_at IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (day, dimension, key) DO NOTHING;
+
+DROP TRIGGER IF EXISTS bump_account_closure_log_rollups ON public.account_closure_logs;
+CREATE TRIGGER bump_account_closure_log_rollups
+    AFTER INSERT ON public.account_closure_logs
+    FOR EACH ROW EXECUTE FUNCTION public.bump_account_closure_log_rollups();
+
+-- ===============================================
+-- ACCESS
+-- ===============================================
+
+ALTER TABLE public.account_closure_log_daily_rollups ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service role can manage account closure log rollups" ON public.account_closure_log_daily_rollups;
+CREATE POLICY "Service role can manage account closure log rollups"
+    ON public.account_closure_log_daily_rollups
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+GRANT ALL ON public.account_closure_log_daily_rollups TO service_role;
+
+COMMENT ON TABLE public.account_closure_log_daily_rollups IS
+    'Per-day counters over account_closure_logs (total, per level, per step, per account), maintained by trigger; read by AccountClosureAnalytics';
@@ -0,0 +1,79 @@
+-- Migration 029: Persistent checkpoints for the Clera agent graph
+-- Purpose: Back SQLCheckpointSaver (clera_agents/checkpointer.py) with Postgres
+-- Date: 2025-11-19
+--
+-- Only needed when the agent graph runs outside LangGraph Platform with
+-- CLERA_CHECKPOINTER=postgres; on the platform the managed checkpointer is
+-- used and these tables stay empty.
+--
+--   agent_checkpoints         one row per checkpoint (serialized without channel values)
+--   agent_checkpoint_blobs    one row per (channel, version): unchanged channels are not rewritten
+--   agent_checkpoint_writes   pending task writes of a checkpoint (resume after interrupt/failure)
+--
+-- Payloads are msgpack, zlib-compressed above 512 bytes (type suffix '+zlib').
+-- The saver keeps the newest CLERA_CHECKPOINT_KEEP_LAST checkpoints per thread
+-- and deletes older checkpoints, their writes and unreferenced blobs itself.
+
+CREATE TABLE IF NOT EXISTS public.agent_checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BYTEA NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BYTEA NOT NULL,
+    channel_versions TEXT NOT NULL,
+    created_at DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.agent_checkpoint_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value_type TEXT NOT NULL,
+    value BYTEA,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+
+CREATE TABLE IF NOT EXISTS public.agent_checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value_type TEXT NOT NULL,
+    value BYTEA,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+
+-- ===============================================
+-- ACCESS
+-- ===============================================
+
+ALTER TABLE public.agent_checkpoints ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.agent_checkpoint_blobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.agent_checkpoint_writes ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service role can manage agent checkpoints" ON public.agent_checkpoints;
+CREATE POLICY "Service role can manage agent checkpoints"
+    ON public.agent_checkpoints FOR ALL USING (auth.role() = 'service_role');
+
+DROP POLICY IF EXISTS "Service role can manage agent checkpoint blobs" ON public.agent_checkpoint_blobs;
+CREATE POLICY "Service role can manage agent checkpoint blobs"
+    ON public.agent_checkpoint_blobs FOR ALL USING (auth.role() = 'service_role');
+
+DROP POLICY IF EXISTS "Service role can manage agent checkpoint writes" ON public.agent_checkpoint_writes;
+CREATE POLICY "Service role can manage agent checkpoint writes"
+    ON public.agent_checkpoint_writes FOR ALL USING (auth.role() = 'service_role');
+
+GRANT ALL ON public.agent_checkpoints TO service_role;
+GRANT ALL ON public.agent_checkpoint_blobs TO service_role;
+GRANT ALL ON public.agent_checkpoint_writes TO service_role;
+
+COMMENT ON TABLE public.agent_checkpoints IS
+    'LangGraph checkpoints of the agent graph when self-hosted (CLERA_CHECKPOINTER=postgres); pruned per thread by SQLCheckpointSaver';
@@ -0,0 +1,48 @@
+-- Migration 030: Import closures left in Redis by the old closure flow
+-- Purpose: Let in-flight legacy closures move into account_closure_jobs
+-- Date: 2025-11-19
+--
+-- Closures started before migration 027 were driven by an in-process task
+-- whose only state lived in Redis (closure_state:* / withdrawal_state:*).
+-- import_legacy_closures() (services/account_closure_jobs.py, run with
+-- scripts/account_closure_scheduler.py --import-redis) rebuilds each one as a
+-- job and inserts it through this function, which refuses accounts that
+-- already have a closure job in any state, so the import can be re-run.
+
+CREATE OR REPLACE FUNCTION public.import_account_closure_job(p_job JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    job public.account_closure_jobs := jsonb_populate_record(NULL::public.account_closure_jobs, p_job);
+    row_data public.account_closure_jobs;
+BEGIN
+    -- Serialize concurrent imports of the account so the existence check holds
+    PERFORM pg_advisory_xact_lock(hashtext('account_closure:' || job.account_id));
+
+    IF EXISTS (SELECT 1 FROM public.account_closure_jobs WHERE account_id = job.account_id) THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO public.account_closure_jobs (
+        id, account_id, user_id, ach_relationship_id, confirmation_number,
+        state, state_entered_at, next_run_at, transfer_id, transfers, last_withdrawal_at,
+        created_at
+    )
+    VALUES (
+        job.id, job.account_id, job.user_id, job.ach_relationship_id, job.confirmation_number,
+        job.state, job.state_entered_at, job.next_run_at, job.transfer_id,
+        COALESCE(job.transfers, '[]'::JSONB), job.last_withdrawal_at,
+        COALESCE(job.created_at, now())
+    )
+    ON CONFLICT (account_id) WHERE state NOT IN ('completed', 'failed', 'cancelled') DO NOTHING
+    RETURNING * INTO row_data;
+
+    RETURN CASE WHEN FOUND THEN to_jsonb(row_data) END;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.import_account_closure_job(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.import_account_closure_job(JSONB) TO service_role;
@@ -312,23 +312,28 @@ def show_statistics(days: int = 30):
         
         print(f"\n{Colors.BOLD}📈 Account Closure Statistics (Last {days} days):{Colors.END}")
         print(f"{Colors.CYAN}{'='*60}{Colors.END}")
-        print(f"Total Closures: {stats['total_closures']}")
-        print(f"Successful: {Colors.GREEN}{stats['successful_closures']}{Colors.END}")
-        print(f"Failed: {Colors.RED}{stats['failed_closures']}{Colors.END}")
-        print(f"Success Rate: {Colors.GREEN}{stats['success_rate']:.1f}%{Colors.END}")
-        print(f"Average Duration: {stats['average_duration_minutes']:.1f} minutes")
-        print(f"Logs per Day: {stats['logs_per_day']}")
+        if not stats:
+            print(f"{Colors.YELLOW}No statistics available{Colors.END}")
+            return
+        
+        overview = stats['overview']
+        print(f"Total Logs: {overview['total_logs']}")
+        print(f"Accounts: {overview['unique_accounts']}")
+        print(f"Completed: {Colors.GREEN}{overview['success_logs']}{Colors.END}")
+        print(f"Failed: {Colors.RED}{overview['failure_logs']}{Colors.END}")
+        print(f"Success Rate: {Colors.GREEN}{overview['success_rate']:.1f}%{Colors.END}")
+        print(f"Logs per Day: {round(overview['total_logs'] / max(days, 1), 1)}")
         
-        if stats['most_common_errors']:
-            print(f"\n{Colors.RED}Most Common Errors:{Colors.END}")
-            for error, count in stats['most_common_errors']:
-                print(f"  • {error}: {count} times")
+        if stats['by_log_level']:
+            print(f"\n{Colors.BLUE}By Log Level:{Colors.END}")
+            for level, count in sorted(stats['by_log_level'].items(), key=lambda x: x[1], reverse=True):
+                color = Colors.RED if level == 'ERROR' else Colors.YELLOW if level == 'WARNING' else Colors.END
+                print(f"  • {color}{level}{Colors.END}: {count}")
         
-        if stats['step_completion_rates']:
-            print(f"\n{Colors.BLUE}Step Completion Rates:{Colors.END}")
-            for step, rate in stats['step_completion_rates'].items():
-                color = Colors.GREEN if rate > 90 else Colors.YELLOW if rate > 70 else Colors.RED
-                print(f"  • {step}: {color}{rate:.1f}%{Colors.END}")
+        if stats['by_step']:
+            print(f"\n{Colors.BLUE}Most Logged Steps:{Colors.END}")
+            for step, count in sorted(stats['by_step'].items(), key=lambda x: x[1], reverse=True)[:10]:
+                print(f"  • {step}: {count}")
         
         print(f"{Colors.CYAN}{'='*60}{Colors.END}")
         
@@ -12,6 +12,7 @@ import logging
 from datetime import datetime
 import redis
 from alpaca.broker import BrokerClient
+from utils.broker_pool import get_pooled_broker_client
 from alpaca.broker.models.accounts import Disclosures
 from pydantic import Field
 from typing import Optional
@@ -64,10 +65,10 @@ class PortfolioCalculator:
         if not self.broker_api_key or not self.broker_secret_key:
             raise ValueError("Broker API credentials are required")
             
-        self.broker_client = BrokerClient(
-            api_key=self.broker_api_key,
-            secret_key=self.broker_secret_key,
-            sandbox=sandbox
+        # Shared pooled client. Positions and account reads may be up to
+        # READ_CACHE_TTL_SECONDS old; prices still come from Redis on every update
+        self.broker_client = get_pooled_broker_client(
+            self.broker_api_key, self.broker_secret_key, sandbox=sandbox, client_class=BrokerClient
         )
         
         # Cache for portfolio base values (previous day's closing value)
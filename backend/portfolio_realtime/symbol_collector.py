@@ -12,6 +12,7 @@ import logging
 from datetime import datetime
 import redis
 from alpaca.broker import BrokerClient
+from utils.broker_pool import get_pooled_broker_client
 from dotenv import load_dotenv
 
 # Configure logging
@@ -46,10 +47,9 @@ class SymbolCollector:
         if not self.broker_api_key or not self.broker_secret_key:
             raise ValueError("Broker API credentials are required")
             
-        self.broker_client = BrokerClient(
-            api_key=self.broker_api_key,
-            secret_key=self.broker_secret_key, 
-            sandbox=sandbox
+        # Shared pooled client (get_all_accounts_positions is never served from its read cache)
+        self.broker_client = get_pooled_broker_client(
+            self.broker_api_key, self.broker_secret_key, sandbox=sandbox, client_class=BrokerClient
         )
         
         # Track account positions and symbols
@@ -13,7 +13,7 @@ import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import JSONResponse
+from utils.http_responses import FastJSONResponse
 from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
@@ -249,7 +249,7 @@ async def search_stocks(
         assets = await _get_cached_assets()
         
         if not assets:
-            return JSONResponse({
+            return FastJSONResponse({
                 "success": True,
                 "results": [],
                 "total_matches": 0,
@@ -279,7 +279,7 @@ async def search_stocks(
         # Return limited results
         limited_results = scored_results[:limit]
         
-        return JSONResponse({
+        return FastJSONResponse({
             "success": True,
             "results": limited_results,
             "total_matches": len(scored_results),
@@ -317,7 +317,7 @@ async def get_popular_stocks(
         asset_lookup = await _get_asset_lookup()
         
         if not asset_lookup:
-            return JSONResponse({
+            return FastJSONResponse({
                 "success": True,
                 "assets": [],
                 "count": 0
@@ -329,7 +329,7 @@ async def get_popular_stocks(
             if symbol in asset_lookup:
                 popular_assets.append(asset_lookup[symbol])
         
-        return JSONResponse({
+        return FastJSONResponse({
             "success": True,
             "assets": popular_assets,
             "count": len(popular_assets)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Agent Checkpointer Benchmark (memory footprint and resume latency)
+
+Runs a small message graph shaped like the supervisor graph (supervisor
+handoff, a sub-agent subgraph with a multi-kilobyte tool output, supervisor
+answer) over many threads with each checkpointer backend, every backend in
+its own process, and reports:
+
+- peak RSS of the process holding the conversations
+- on-disk size, checkpoints kept and namespaces per thread (SQL backends)
+- resume latency: loading a thread's state and running one more turn, from
+  the same process and (SQL backends) from a freshly started one
+
+Usage:
+    cd backend
+    python scripts/benchmark_checkpointer.py --threads 10000 --turns 3
+
+    # Include Postgres (scratch local database; migration 029 is applied to it)
+    LOCAL_DATABASE_URL=postgresql://localhost/clera_bench \\
+        python scripts/benchmark_checkpointer.py --backends memory sqlite postgres
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Annotated, List
+
+# Add backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from clera_agents.checkpointer import (
+    PostgresCheckpointBackend,
+    SQLCheckpointSaver,
+    SQLiteCheckpointBackend,
+)
+
+MIGRATION = Path(__file__).resolve().parent.parent / 'migrations' / '029_create_agent_checkpoints.sql'
+# Roughly the size of a get_portfolio_summary result
+TOOL_OUTPUT = "\n".join(
+    f"{symbol}: 12.5 shares @ $187.42 | value $2,342.75 | 8.4% of portfolio | unrealized +$214.10 (+10.1%)"
+    for symbol in ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "BRK.B", "JPM", "V"] * 4
+)
+
+
+class BenchState(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+    user_id: str
+
+
+def _supervisor_handoff(state: BenchState):
+    call_id = f"handoff_{len(state['messages'])}"
+    return {"messages": [
+        AIMessage(content="", name="Clera",
+                  tool_calls=[{"name": "transfer_to_portfolio_management_agent", "args": {}, "id": call_id}]),
+        ToolMessage(content="Successfully transferred to portfolio_management_agent", tool_call_id=call_id),
+    ]}
+
+
+def _agent_turn(state: BenchState):
+    question = state["messages"][-3].content
+    call_id = f"call_{len(state['messages'])}"
+    return {"messages": [
+        AIMessage(content="", tool_calls=[{"name": "get_portfolio_summary", "args": {}, "id": call_id}]),
+        ToolMessage(content=TOOL_OUTPUT, tool_call_id=call_id),
+        AIMessage(content=f"Here is what I found about: {question}", name="portfolio_management_agent"),
+    ]}
+
+
+def _supervisor_answer(state: BenchState):
+    return {"messages": [AIMessage(content="Summing up what the portfolio agent found.", name="Clera")]}
+
+
+def build_graph(checkpointer):
+    """Supervisor -> sub-agent subgraph -> supervisor, as in clera_agents/graph.py.
+
+    The sub-agent is a compiled subgraph, so every turn checkpoints into a new
+    "agent:<task_id>" namespace the way the real supervisor's sub-agents do.
+    """
+    agent = StateGraph(BenchState)
+    agent.add_node("tools", _agent_turn)
+    agent.set_entry_point("tools")
+    agent.add_edge("tools", END)
+
+    builder = StateGraph(BenchState)
+    builder.add_node("supervisor", _supervisor_handoff)
+    builder.add_node("agent", agent.compile())
+    builder.add_node("answer", _supervisor_answer)
+    builder.set_entry_point("supervisor")
+    builder.add_edge("supervisor", "agent")
+    builder.add_edge("agent", "answer")
+    builder.add_edge("answer", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def make_saver(backend: str, path: str):
+    if backend == 'memory':
+        return InMemorySaver()
+    if backend == 'sqlite':
+        return SQLCheckpointSaver(SQLiteCheckpointBackend(path))
+    return SQLCheckpointSaver(PostgresCheckpointBackend(os.environ['LOCAL_DATABASE_URL']))
+
+
+def _config(thread: int):
+    return {"configurable": {"thread_id": f"bench-{thread}"}}
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(samples) * 1000, 2),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def measure_resume(graph, threads: int, samples: int):
+    load, turn = [], []
+    for thread in random.Random(7).sample(range(threads), min(samples, threads)):
+        started = time.perf_counter()
+        graph.get_state(_config(thread))
+        load.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        graph.invoke({"messages": [HumanMessage(content="and now?")]}, _config(thread))
+        turn.append(time.perf_counter() - started)
+    return {'load_state': _percentiles(load), 'next_turn': _percentiles(turn)}
+
+
+def run_worker(args) -> dict:
+    """Populate and measure one backend (runs in its own process)."""
+    saver = make_saver(args.backend, args.path)
+    graph = build_graph(saver)
+
+    started = time.perf_counter()
+    for thread in range(args.threads):
+        graph.invoke({"messages": [HumanMessage(content="How is my portfolio doing?")], "user_id": f"user-{thread}"},
+                     _config(thread))
+        for turn in range(1, args.turns):
+            graph.invoke({"messages": [HumanMessage(content=f"Follow-up question {turn}")]}, _config(thread))
+    populate_seconds = time.perf_counter() - started
+
+    result = {
+        'backend': args.backend,
+        'populate_seconds': round(populate_seconds, 1),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'resume_same_process': measure_resume(graph, args.threads, args.samples),
+    }
+    if args.backend != 'memory':
+        saver.flush()
+        result['storage_mb'] = round(saver.backend.size_bytes() / (1024 * 1024), 1)
+        result['checkpoints_stored'] = saver.backend.fetch("SELECT COUNT(*) FROM agent_checkpoints")[0][0]
+        result['namespaces_per_thread'] = round(saver.backend.fetch(
+            "SELECT COUNT(DISTINCT thread_id || '/' || checkpoint_ns) FROM agent_checkpoints"
+        )[0][0] / args.threads, 2)
+        saver.close()
+    return result
+
+
+def run_restart_worker(args) -> dict:
+    """Resume threads written by an earlier process."""
+    graph = build_graph(make_saver(args.backend, args.path))
+    return {
+        'resume_after_restart': measure_resume(graph, args.threads, args.samples),
+        'restart_peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _spawn(args, backend: str, path: str, restart: bool = False) -> dict:
+    command = [
+        sys.executable, __file__, '--worker', '--backends', backend, '--path', path,
+        '--threads', str(args.threads), '--turns', str(args.turns), '--samples', str(args.samples),
+    ]
+    if restart:
+        command.append('--restart')
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _reset_postgres():
+    import asyncio
+    import asyncpg
+
+    async def reset():
+        conn = await asyncpg.connect(os.environ['LOCAL_DATABASE_URL'])
+        try:
+            await conn.execute(
+                "DROP TABLE IF EXISTS agent_checkpoints, agent_checkpoint_blobs, agent_checkpoint_writes"
+            )
+            # Stub the Supabase pieces the migration's RLS section refers to
+            await conn.execute("""
+                DO $$ BEGIN
+                    CREATE SCHEMA IF NOT EXISTS auth;
+                    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+                        CREATE ROLE service_role;
+                    END IF;
+                END $$;
+                CREATE OR REPLACE FUNCTION auth.role() RETURNS TEXT AS $f$ SELECT 'service_role'::text $f$ LANGUAGE sql;
+            """)
+            await conn.execute(MIGRATION.read_text())
+        finally:
+            await conn.close()
+
+    asyncio.run(reset())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=10000)
+    parser.add_argument('--turns', type=int, default=3, help='Conversation turns per thread')
+    parser.add_argument('--samples', type=int, default=500, help='Threads sampled for resume latency')
+    parser.add_argument('--backends', nargs='+', default=['memory', 'sqlite'],
+                        choices=['memory', 'sqlite', 'postgres'])
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--restart', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.backend = args.backends[0]
+        print(json.dumps(run_restart_worker(args) if args.restart else run_worker(args)))
+        return
+
+    if 'postgres' in args.backends and not os.getenv('LOCAL_DATABASE_URL'):
+        sys.exit("Set LOCAL_DATABASE_URL to a scratch local database to benchmark postgres")
+
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for backend in args.backends:
+            path = os.path.join(scratch, f'{backend}.sqlite3')
+            if backend == 'postgres':
+                _reset_postgres()
+            print(f"Benchmarking {backend}: {args.threads} threads x {args.turns} turns...", flush=True)
+            result = _spawn(args, backend, path)
+            if backend != 'memory':
+                result.update(_spawn(args, backend, path, restart=True))
+            results.append(result)
+            print(json.dumps(result, indent=2), flush=True)
+
+    print("\nbackend    peak RSS MB  storage MB  load p50/p95 ms   next turn p50/p95 ms  after restart load p50/p95 ms")
+    for r in results:
+        same = r['resume_same_process']
+        restart = r.get('resume_after_restart', {}).get('load_state')
+        print(
+            f"{r['backend']:<10} {r['peak_rss_mb']:>11} {r.get('storage_mb', '-'):>11}  "
+            f"{same['load_state']['p50_ms']:>6}/{same['load_state']['p95_ms']:<8} "
+            f"{same['next_turn']['p50_ms']:>8}/{same['next_turn']['p95_ms']:<12} "
+            f"{(str(restart['p50_ms']) + '/' + str(restart['p95_ms'])) if restart else 'lost on restart'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Context Budget Benchmark (tokens, cost and latency per LLM hop)
+
+Replays the recorded conversations in tests/agents/fixtures/conversations hop
+by hop: every supervisor / sub-agent LLM call in the recording is rebuilt
+from the history before it, once as the full history (what the graph sent
+before the context stage) and once through the context hooks from
+clera_agents/context_manager.py, carrying the rolling summary forward in
+state as the graph does. Reports per-hop input tokens (approximate, messages
+only; the system prompts are the same both ways), the input cost at list
+prices and the time spent in the hook itself.
+
+Offline runs use the extractive summarizer. With --live (needs
+ANTHROPIC_API_KEY) the supervisor summarizes with Claude Haiku as in
+production, and a sample of hops is sent to the model both ways with
+max_tokens=1 to measure billed input tokens and time to first token.
+
+Usage:
+    cd backend
+    python scripts/benchmark_context_budget.py
+    python scripts/benchmark_context_budget.py --live --live-hops 6
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# Add backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, messages_from_dict
+
+from clera_agents.context_manager import (
+    AGENT_CONTEXT_TOKEN_BUDGET,
+    SUPERVISOR_CONTEXT_TOKEN_BUDGET,
+    count_tokens,
+    extractive_summary,
+    llm_summarizer,
+    make_context_hook,
+)
+
+FIXTURES = Path(__file__).resolve().parent.parent / 'tests' / 'agents' / 'fixtures' / 'conversations'
+SUPERVISOR = "Clera"
+# USD per million input tokens: supervisor runs on Sonnet, sub-agents on Haiku
+INPUT_PRICE_PER_MTOK = {SUPERVISOR: 3.00, 'agent': 1.00}
+
+
+def load_conversation(path: Path):
+    with open(path) as f:
+        return messages_from_dict(json.load(f)['messages'])
+
+
+def llm_hops(messages):
+    """Indexes of the recorded messages produced by an LLM call (handoff-back pairs are synthetic)."""
+    return [
+        index for index, message in enumerate(messages)
+        if isinstance(message, AIMessage) and not message.response_metadata.get('__is_handoff_back')
+    ]
+
+
+def replay(messages, supervisor_hook, agent_hook):
+    """Rebuild every hop's input both ways; yields (hop agent, full input, managed input, hook seconds)."""
+    state = {}
+    for index in llm_hops(messages):
+        agent = messages[index].name or SUPERVISOR
+        history = messages[:index]
+        hook = supervisor_hook if agent == SUPERVISOR else agent_hook
+        started = time.perf_counter()
+        result = hook({**state, 'messages': history})
+        elapsed = time.perf_counter() - started
+        state.update({k: v for k, v in result.items() if k != 'llm_input_messages'})
+        yield agent, history, result['llm_input_messages'], elapsed
+
+
+def _cost(agent, tokens):
+    price = INPUT_PRICE_PER_MTOK[SUPERVISOR if agent == SUPERVISOR else 'agent']
+    return tokens * price / 1_000_000
+
+
+def measure_live(samples, llm):
+    """Billed input tokens and time to the first (only) output token, full vs managed."""
+    rows = []
+    for agent, full, managed in samples:
+        row = {'agent': agent}
+        for label, messages in (('full', full), ('managed', managed)):
+            started = time.perf_counter()
+            response = llm.invoke(messages)
+            row[f'{label}_seconds'] = time.perf_counter() - started
+            row[f'{label}_input_tokens'] = response.usage_metadata['input_tokens']
+        rows.append(row)
+        print(
+            f"  {agent:<28} full {row['full_input_tokens']:>6} tok {row['full_seconds']:.2f}s   "
+            f"managed {row['managed_input_tokens']:>6} tok {row['managed_seconds']:.2f}s",
+            flush=True,
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--supervisor-budget', type=int, default=SUPERVISOR_CONTEXT_TOKEN_BUDGET)
+    parser.add_argument('--agent-budget', type=int, default=AGENT_CONTEXT_TOKEN_BUDGET)
+    parser.add_argument('--live', action='store_true', help='Summarize and time hops against the Anthropic API')
+    parser.add_argument('--live-hops', type=int, default=4, help='Late hops per conversation sent live')
+    args = parser.parse_args()
+
+    summarizer = extractive_summary
+    live_llm = None
+    if args.live:
+        if not os.getenv('ANTHROPIC_API_KEY'):
+            sys.exit("Set ANTHROPIC_API_KEY to run with --live")
+        from langchain_anthropic import ChatAnthropic
+        summarizer = llm_summarizer(ChatAnthropic(model="claude-haiku-4-5-20251001", temperature=0, max_tokens=400))
+        live_llm = ChatAnthropic(model="claude-haiku-4-5-20251001", temperature=0, max_tokens=1)
+
+    supervisor_hook = make_context_hook(args.supervisor_budget, summarizer=summarizer)
+    agent_hook = make_context_hook(args.agent_budget)
+
+    totals = {'full_tokens': 0, 'managed_tokens': 0, 'full_cost': 0.0, 'managed_cost': 0.0}
+    hook_seconds, live_rows = [], []
+    print(f"Budgets: supervisor {args.supervisor_budget} tokens, sub-agents {args.agent_budget} tokens\n")
+    print("conversation        hops  full tok  managed tok  max hop full/managed  saved   cost full/managed")
+    for path in sorted(FIXTURES.glob('*.json')):
+        messages = load_conversation(path)
+        full_tokens, managed_tokens, full_cost, managed_cost = [], [], 0.0, 0.0
+        hops = []
+        for agent, full, managed, elapsed in replay(messages, supervisor_hook, agent_hook):
+            full_tokens.append(count_tokens(full))
+            managed_tokens.append(count_tokens(managed))
+            full_cost += _cost(agent, full_tokens[-1])
+            managed_cost += _cost(agent, managed_tokens[-1])
+            hook_seconds.append(elapsed)
+            hops.append((agent, full, managed))
+        saved = 1 - sum(managed_tokens) / sum(full_tokens)
+        print(
+            f"{path.stem:<18} {len(hops):>5} {sum(full_tokens):>9} {sum(managed_tokens):>12} "
+            f"{max(full_tokens):>11}/{max(managed_tokens):<9} {saved:>6.1%}   "
+            f"${full_cost:.4f}/${managed_cost:.4f}"
+        )
+        totals['full_tokens'] += sum(full_tokens)
+        totals['managed_tokens'] += sum(managed_tokens)
+        totals['full_cost'] += full_cost
+        totals['managed_cost'] += managed_cost
+        if live_llm:
+            # The late hops are where the history is longest
+            live_rows.extend(measure_live(hops[-args.live_hops:], live_llm))
+
+    hook_ms = sorted(s * 1000 for s in hook_seconds)
+    print(
+        f"\nTotal: {totals['full_tokens']} -> {totals['managed_tokens']} input tokens "
+        f"({1 - totals['managed_tokens'] / totals['full_tokens']:.1%} fewer), "
+        f"${totals['full_cost']:.4f} -> ${totals['managed_cost']:.4f} per replay"
+    )
+    print(
+        f"Context hook overhead: p50 {statistics.median(hook_ms):.2f} ms, "
+        f"p95 {hook_ms[int(len(hook_ms) * 0.95) - 1]:.2f} ms, max {hook_ms[-1]:.2f} ms "
+        f"({'with' if args.live else 'excluding'} LLM summarization)"
+    )
+    if live_rows:
+        full = statistics.median(r['full_seconds'] for r in live_rows)
+        managed = statistics.median(r['managed_seconds'] for r in live_rows)
+        print(
+            f"Live time to first token (median of {len(live_rows)} hops): "
+            f"{full:.2f}s full vs {managed:.2f}s managed; billed input tokens "
+            f"{sum(r['full_input_tokens'] for r in live_rows)} vs {sum(r['managed_input_tokens'] for r in live_rows)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Partition Maintenance Benchmark (local Postgres)
+
+Builds the portfolio history schema in a scratch local database, seeds
+synthetic users with a year of daily_eod rows plus 5-minute intraday rows,
+and reports chart query latency and table sizes before and after the
+migration 026 maintenance functions run (monthly partitions, intraday
+rollup, expired packed-series partitions dropped).
+
+Never point this at Supabase: it creates stub auth objects and drops data.
+
+Usage:
+    cd backend
+    createdb clera_bench
+    LOCAL_DATABASE_URL=postgresql://localhost/clera_bench \\
+        python scripts/benchmark_history_partitions.py --users 200 --intraday-days 30
+"""
+
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import statistics
+from datetime import date, timedelta
+from pathlib import Path
+
+import asyncpg
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / 'migrations'
+SCHEMA_MIGRATIONS = [
+    '005_create_portfolio_history_system.sql',
+    '011_fix_intraday_unique_constraint.sql',
+    '021_create_user_intraday_series.sql',
+]
+MAINTENANCE_MIGRATION = '026_partition_lifecycle_and_intraday_compaction.sql'
+TICKS_PER_DAY = 78  # 9:30-16:00 every 5 minutes
+
+# Minimal stand-ins for the Supabase auth schema the migrations reference
+AUTH_STUBS = """
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (id UUID PRIMARY KEY DEFAULT gen_random_uuid());
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql AS 'SELECT NULL::UUID';
+CREATE OR REPLACE FUNCTION auth.role() RETURNS TEXT LANGUAGE sql AS 'SELECT ''service_role''::TEXT';
+DO $$ BEGIN
+    CREATE ROLE service_role;
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+"""
+
+# Migration 011 drops this constraint by a truncated name Postgres does not generate
+# for the parent table, so on a fresh database it survives and rejects intraday rows
+SCHEMA_FIXUPS = """
+ALTER TABLE public.user_portfolio_history
+    DROP CONSTRAINT IF EXISTS user_portfolio_history_user_id_value_date_snapshot_type_key;
+"""
+
+CHART_QUERY = "SELECT * FROM get_portfolio_history_for_chart($1, 365)"
+INTRADAY_QUERY = """
+    SELECT created_at, total_value FROM public.user_portfolio_history
+    WHERE user_id = $1 AND value_date = $2 AND snapshot_type = 'intraday'
+    ORDER BY created_at
+"""
+SIZE_QUERY = """
+    SELECT parent.relname, count(child.oid),
+           -- user_intraday_series is a plain table until migration 026 partitions it
+           CASE WHEN count(child.oid) = 0 THEN pg_total_relation_size(parent.oid)
+                ELSE sum(pg_total_relation_size(child.oid)) END
+    FROM pg_class parent
+    LEFT JOIN pg_inherits i ON i.inhparent = parent.oid
+    LEFT JOIN pg_class child ON child.oid = i.inhrelid
+    WHERE parent.relname IN ('user_portfolio_history', 'user_intraday_series')
+    GROUP BY parent.relname, parent.oid
+"""
+
+
+def schema_sql(migration: str) -> str:
+    """Migration text made re-runnable: 005 creates some indexes twice."""
+    sql = (MIGRATIONS_DIR / migration).read_text()
+    return re.sub(r'CREATE (UNIQUE )?INDEX (?!IF NOT EXISTS)', r'CREATE \1INDEX IF NOT EXISTS ', sql)
+
+
+async def seed(conn, users: int, intraday_days: int):
+    """One year of daily_eod rows per user and TICKS_PER_DAY intraday rows per recent trading day."""
+    today = date.today()
+    user_ids = [row['id'] for row in await conn.fetch(
+        "INSERT INTO auth.users SELECT gen_random_uuid() FROM generate_series(1, $1) RETURNING id", users
+    )]
+
+    await conn.execute("""
+        INSERT INTO public.user_portfolio_history (user_id, value_date, snapshot_type, total_value, data_source)
+        SELECT u, d::DATE, 'daily_eod', 10000 + random() * 1000, 'benchmark'
+        FROM unnest($1::UUID[]) AS u, generate_series($2::DATE, $3::DATE, INTERVAL '1 day') AS d
+    """, user_ids, today - timedelta(days=365), today - timedelta(days=1))
+
+    await conn.execute("""
+        INSERT INTO public.user_portfolio_history
+            (user_id, value_date, snapshot_type, total_value, opening_value, data_source, created_at)
+        SELECT u, d::DATE, 'intraday', 10000 + random() * 1000, 10000, 'benchmark',
+               d + INTERVAL '9 hours 30 minutes' + make_interval(mins => 5 * t)
+        FROM unnest($1::UUID[]) AS u,
+             generate_series($2::DATE, $3::DATE, INTERVAL '1 day') AS d,
+             generate_series(0, $4 - 1) AS t
+        WHERE extract(isodow FROM d) < 6
+    """, user_ids, today - timedelta(days=intraday_days), today, TICKS_PER_DAY)
+
+    await conn.execute("""
+        INSERT INTO public.user_intraday_series
+            (user_id, value_date, timestamps, equity_values, opening_value, intraday_high, intraday_low, closing_value)
+        SELECT u, d::DATE, array_fill(0::BIGINT, ARRAY[$4::INT]), array_fill(10000::DOUBLE PRECISION, ARRAY[$4::INT]),
+               10000, 10100, 9900, 10050
+        FROM unnest($1::UUID[]) AS u, generate_series($2::DATE, $3::DATE, INTERVAL '1 day') AS d
+        WHERE extract(isodow FROM d) < 6
+    """, user_ids, today - timedelta(days=intraday_days), today, TICKS_PER_DAY)
+
+    await conn.execute("VACUUM ANALYZE")
+    return user_ids
+
+
+async def measure(conn, user_ids, label: str, samples: int = 200):
+    """Median/p95 latency of the 1Y and 1D chart queries plus table sizes."""
+    results = {}
+    for name, query, args in (
+        ('chart_1y', CHART_QUERY, lambda u: (u,)),
+        ('chart_1d', INTRADAY_QUERY, lambda u: (u, date.today())),
+    ):
+        timings = []
+        for i in range(samples):
+            user_id = user_ids[i % len(user_ids)]
+            started = time.perf_counter()
+            await conn.fetch(query, *args(user_id))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = (statistics.median(timings), timings[int(len(timings) * 0.95) - 1])
+
+    sizes = {row[0]: (row[1], row[2]) for row in await conn.fetch(SIZE_QUERY)}
+
+    print(f"\n== {label} ==")
+    for name, (p50, p95) in results.items():
+        print(f"  {name:<10} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+    for table, (partitions, size) in sorted(sizes.items()):
+        print(f"  {table:<24} {partitions:3d} partitions  {size / 1_048_576:9.1f} MB")
+    return results, sizes
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--intraday-days', type=int, default=30)
+    parser.add_argument('--keep-days', type=int, default=7)
+    args = parser.parse_args()
+
+    dsn = os.getenv('LOCAL_DATABASE_URL')
+    if not dsn:
+        sys.exit("Set LOCAL_DATABASE_URL to a scratch local database")
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(AUTH_STUBS)
+        for migration in SCHEMA_MIGRATIONS:
+            logger.info(f"Applying {migration}")
+            await conn.execute(schema_sql(migration))
+        await conn.execute(SCHEMA_FIXUPS)
+
+        user_ids = await seed(conn, args.users, args.intraday_days)
+        await measure(conn, user_ids, 'before maintenance')
+
+        logger.info(f"Applying {MAINTENANCE_MIGRATION}")
+        await conn.execute((MIGRATIONS_DIR / MAINTENANCE_MIGRATION).read_text())
+
+        started = time.perf_counter()
+        created = await conn.fetch("SELECT * FROM ensure_monthly_partitions('user_portfolio_history', 3)")
+        compacted = await conn.fetchrow("SELECT * FROM compact_intraday_history($1)", args.keep_days)
+        dropped = await conn.fetch(
+            "SELECT * FROM drop_expired_partitions('user_intraday_series', $1, false)",
+            date.today() - timedelta(days=args.keep_days)
+        )
+        elapsed = time.perf_counter() - started
+        await conn.execute("VACUUM FULL ANALYZE public.user_portfolio_history")
+
+        print(f"\nMaintenance: {len(created)} partitions created, {compacted['days_rolled_up']} days rolled up, "
+              f"{compacted['intraday_rows_deleted']} intraday rows deleted, {len(dropped)} partitions dropped "
+              f"in {elapsed:.2f}s")
+        await measure(conn, user_ids, 'after maintenance')
+    finally:
+        await conn.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Build the local RAG index used by the clera_chatbots agents (CLERA_RAG_BACKEND=local).
+
+Usage:
+    # From a JSONL corpus ({"text": ..., "metadata": {...}} per line), embedding with the agents' model
+    python scripts/build_rag_index.py --corpus cfp_corpus.jsonl
+
+    # Copy the vectors already stored in Pinecone (no re-embedding)
+    python scripts/build_rag_index.py --from-pinecone
+
+    # Offline: deterministic hashing embedder instead of the model (for dry runs)
+    python scripts/build_rag_index.py --corpus cfp_corpus.jsonl --stub-embedder --out /tmp/rag_index
+
+Then point the agents at it:
+    CLERA_RAG_BACKEND=local CLERA_RAG_INDEX_PATH=<out> python clera_chatbots/chatbot_for_frontend.py
+"""
+
+import os
+import sys
+import argparse
+import time
+
+# Add backend directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from clera_chatbots.retrieval import (
+    EMBEDDING_MODEL,
+    RAG_INDEX_PATH,
+    HashingEmbeddings,
+    LocalVectorIndex,
+    connect_pinecone_index,
+    get_query_embeddings,
+    iter_pinecone_vectors,
+    read_corpus,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local RAG vector index")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", help="JSONL corpus to embed")
+    source.add_argument("--from-pinecone", action="store_true", help="Copy vectors from the Pinecone index")
+    parser.add_argument("--out", default=RAG_INDEX_PATH, help=f"Index directory (default: {RAG_INDEX_PATH})")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: sqrt(N) for 1024+ documents, else exact)")
+    parser.add_argument("--stub-embedder", action="store_true", help="Use the offline hashing embedder")
+    parser.add_argument("--batch-size", type=int, default=64, help="Documents per embedding call")
+
+    args = parser.parse_args()
+    started = time.time()
+
+    if args.from_pinecone:
+        texts, vectors, metadatas = [], [], []
+        for text, vector, metadata in iter_pinecone_vectors(connect_pinecone_index()):
+            texts.append(text)
+            vectors.append(vector)
+            metadatas.append(metadata)
+        model = EMBEDDING_MODEL
+    else:
+        texts, metadatas = read_corpus(args.corpus)
+        embeddings = HashingEmbeddings() if args.stub_embedder else get_query_embeddings()
+        vectors = []
+        for start in range(0, len(texts), args.batch_size):
+            vectors.extend(embeddings.embed_documents(texts[start:start + args.batch_size]))
+            print(f"Embedded {min(start + args.batch_size, len(texts))}/{len(texts)} documents")
+        model = "hashing-stub" if args.stub_embedder else EMBEDDING_MODEL
+
+    if not texts:
+        print("❌ No documents to index")
+        sys.exit(1)
+
+    index = LocalVectorIndex.build(args.out, texts, vectors, metadatas, nlist=args.nlist, model=model)
+    print(f"✅ Built {args.out}: {len(index)} documents, {index.dim} dimensions, "
+          f"{index.nlist} lists in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
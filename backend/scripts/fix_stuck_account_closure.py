@@ -164,14 +164,8 @@ async def resume_account_closure(user_id: str, account_id: str, dry_run: bool =
         
         if result.get("success"):
             print(f"✅ Successfully resumed automated closure for account {account_id}")
-            print(f"   Background process is now running...")
-            
-            # CRITICAL FIX: Brief wait to ensure task initializes properly before script exits
-            print(f"   Allowing 5 seconds for process initialization...")
-            await asyncio.sleep(5)
-            
-            print(f"   ✅ Background process initialized - continuing independently")
-            print(f"   The automated closure will proceed according to the multi-day schedule")
+            print(f"   Closure job is stored in account_closure_jobs - the API's closure poller")
+            print(f"   will advance it on its next poll according to the multi-day schedule")
             
             return True
         else:
@@ -2,8 +2,8 @@
 """
 Account Closure Production Monitor
 
-Operational monitoring script for account closure background processes.
-Provides visibility into running tasks, Redis state, and system health.
+Operational monitoring script for account closures.
+Provides visibility into open closure jobs, Redis state, and system health.
 
 Usage:
     # Monitor all active closures
@@ -56,13 +56,13 @@ class AccountClosureMonitor:
         print(f"Redis Connected: {'✅' if self.state_manager.redis_client else '❌'}")
         print()
     
-    def get_all_active_tasks(self) -> Dict[str, Dict[str, Any]]:
-        """Get all active tasks from shared registry."""
-        return AutomatedAccountClosureProcessor.get_all_active_tasks()
+    async def get_all_active_tasks(self) -> Dict[str, Dict[str, Any]]:
+        """Get all open closures from the account_closure_jobs table."""
+        return await AutomatedAccountClosureProcessor.get_all_active_tasks()
     
-    def get_task_status(self, account_id: str) -> Dict[str, Any]:
-        """Get task status for specific account."""
-        return AutomatedAccountClosureProcessor.get_active_task_status(account_id)
+    async def get_task_status(self, account_id: str) -> Dict[str, Any]:
+        """Get the closure state for specific account."""
+        return await AutomatedAccountClosureProcessor.get_active_task_status(account_id)
     
     async def cancel_task(self, account_id: str) -> bool:
         """Cancel active task for account."""
@@ -91,35 +91,51 @@ class AccountClosureMonitor:
         
         return states
     
-    def display_active_tasks(self):
-        """Display all active background tasks."""
-        tasks = self.get_all_active_tasks()
+    async def display_active_tasks(self):
+        """Display all open closures and when the poller next checks them."""
+        tasks = await self.get_all_active_tasks()
         
         if not tasks:
-            print("📭 No active account closure tasks found")
+            print("📭 No active account closures found")
             return
         
-        print(f"🚀 ACTIVE BACKGROUND TASKS ({len(tasks)} total)")
+        print(f"🚀 ACTIVE ACCOUNT CLOSURES ({len(tasks)} total)")
         print("-" * 80)
         
         for account_id, task_info in tasks.items():
-            source_icon = "🏠" if task_info["source"] == "local_registry" else "☁️"
-            status = "✅ Running" if not task_info.get("done", False) else "⏹️ Done"
-            
-            print(f"{source_icon} Account: {account_id}")
-            print(f"   Status: {status}")
-            print(f"   Task ID: {task_info.get('task_id', 'N/A')}")
-            print(f"   Source: {task_info['source']}")
+            print(f"☁️ Account: {account_id}")
+            print(f"   State: {task_info['state']}")
+            print(f"   Job ID: {task_info.get('job_id', 'N/A')}")
+            print(f"   Next Check: {task_info.get('next_run_at', 'N/A')}")
             
             if task_info.get("created_at"):
                 print(f"   Created: {task_info['created_at']}")
-            if task_info.get("process_id"):
-                print(f"   Process: {task_info['process_id']}")
-            if task_info.get("cancelled", False):
-                print("   ⚠️ CANCELLED")
+            if task_info.get("transfers"):
+                print(f"   Transfers: {len(task_info['transfers'])}")
+            if task_info.get("last_error"):
+                print(f"   ⚠️ Last Error ({task_info.get('errors', 0)}x): {task_info['last_error']}")
             
             print()
     
+    def display_health(self):
+        """Display closure log health from the daily rollups (constant-time read)."""
+        try:
+            from utils.supabase.account_closure_analytics import account_closure_analytics
+            health = account_closure_analytics.get_system_health_metrics()
+        except Exception as e:
+            print(f"Closure log health unavailable: {e}")
+            return
+        
+        if "metrics" not in health:
+            print(f"Closure log health unavailable: {health.get('error', 'unknown error')}")
+            return
+        
+        status_icon = {"healthy": "✅", "warning": "⚠️", "unhealthy": "❌"}.get(health["health_status"], "❓")
+        metrics = health["metrics"]
+        print(f"{status_icon} CLOSURE LOG HEALTH ({health['period']}): {health['health_status']}")
+        print(f"   Logs: {metrics['total_activity']}  Errors: {metrics['error_count']} "
+              f"({metrics['error_rate']}%)  Active Accounts: {metrics['active_accounts']}")
+    
     def display_redis_states(self):
         """Display closure states from Redis."""
         states = self.get_redis_closure_states()
@@ -155,30 +171,25 @@ class AccountClosureMonitor:
             
             print()
     
-    def display_specific_account(self, account_id: str):
+    async def display_specific_account(self, account_id: str):
         """Display detailed info for specific account."""
         print(f"🔍 ACCOUNT DETAILS: {account_id}")
         print("-" * 80)
         
-        # Task status
-        task_status = self.get_task_status(account_id)
-        print("📋 TASK STATUS:")
-        if task_status["active"]:
-            print(f"   ✅ Active Task Found")
-            print(f"   Task ID: {task_status.get('task_id', 'N/A')}")
-            print(f"   Source: {task_status.get('source', 'unknown')}")
-            
-            if task_status.get("done", False):
-                print("   Status: ⏹️ Done")
-            elif task_status.get("cancelled", False):
-                print("   Status: ⚠️ Cancelled")
-            else:
-                print("   Status: 🚀 Running")
-                
-            if task_status.get("exception"):
-                print(f"   ❌ Exception: {task_status['exception']}")
+        # Closure job status
+        task_status = await self.get_task_status(account_id)
+        print("📋 CLOSURE JOB:")
+        if task_status.get("job_id"):
+            print(f"   {'🚀 Open' if task_status['active'] else '⏹️ Finished'}")
+            print(f"   Job ID: {task_status['job_id']}")
+            print(f"   State: {task_status['state']}")
+            print(f"   Next Check: {task_status.get('next_run_at', 'N/A')}")
+            if task_status.get("transfers"):
+                print(f"   Transfers: {len(task_status['transfers'])}")
+            if task_status.get("last_error"):
+                print(f"   ❌ Last Error: {task_status['last_error']}")
         else:
-            print("   📭 No active task")
+            print("   📭 No closure job")
         
         print()
         
@@ -214,12 +225,12 @@ class AccountClosureMonitor:
         print(f"⚠️ CANCELLING TASK: {account_id}")
         print("-" * 80)
         
-        task_status = self.get_task_status(account_id)
+        task_status = await self.get_task_status(account_id)
         if not task_status["active"]:
             print("❌ No active task found to cancel")
             return False
         
-        print(f"Found active task (ID: {task_status.get('task_id', 'N/A')})")
+        print(f"Found open closure (ID: {task_status.get('job_id', 'N/A')}, state: {task_status['state']})")
         print("Attempting to cancel...")
         
         success = await self.cancel_task(account_id)
@@ -238,11 +249,13 @@ class AccountClosureMonitor:
         self.display_header()
         
         if account_id:
-            self.display_specific_account(account_id)
+            await self.display_specific_account(account_id)
         else:
-            self.display_active_tasks()
+            await self.display_active_tasks()
             print()
             self.display_redis_states()
+            print()
+            self.display_health()
     
     async def watch_mode(self, interval: int = 30):
         """Continuous monitoring mode."""
@@ -80,7 +80,37 @@ async def run_reconstruction(user_id: str):
         import traceback
         traceback.print_exc()
 
+async def run_batch_reconstruction(user_ids: list):
+    """Queue many users, let this process's workers run them, and report FMP usage."""
+    print("=" * 80)
+    print(f"QUEUING BATCH RECONSTRUCTION FOR {len(user_ids)} USERS")
+    print("=" * 80)
+    
+    manager = get_portfolio_reconstruction_manager()
+    batch = await manager.request_reconstruction_for_users(user_ids, priority='normal')
+    
+    print(f"\n✅ Queued {batch['users_queued']}/{batch['users_requested']} users")
+    
+    # Let this process's workers run the queued jobs (each claimed batch shares one price prefetch)
+    while True:
+        metrics = await manager.get_global_reconstruction_metrics()
+        if not metrics.get('queue_size') and not metrics.get('running_jobs'):
+            break
+        print(f"   {metrics.get('queue_size', 0)} queued, {metrics.get('running_jobs', 0)} running...")
+        await asyncio.sleep(10)
+    
+    print(f"\n📊 FMP calls per reconstruction: {metrics.get('fmp_calls_per_reconstruction', 0):.2f}")
+    plan = manager.last_prefetch_plan
+    if plan:
+        print(f"   Last batch: {plan.unique_symbols} unique symbols, {plan.fmp_calls} FMP calls "
+              f"({plan.fmp_calls_per_user:.2f}/user vs up to {plan.fmp_calls_per_user_unplanned:.2f}/user without prefetch)")
+    await manager.stop_workers()
+
 if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        asyncio.run(run_batch_reconstruction(sys.argv[1:]))
+        sys.exit(0)
+    
     if len(sys.argv) > 1:
         user_id = sys.argv[1]
     else:
@@ -0,0 +1,534 @@
+"""
+Account Closure Jobs
+
+Persistent state for the automated account closure flow. Every closing
+account is one job in the account_closure_jobs table (migration 027) holding
+its current state and the time it is next due. The closure poller
+(services/account_closure_poller.py) claims all due jobs in one call with
+FOR UPDATE SKIP LOCKED, advances them and saves them back, so no coroutine
+waits per account and a restart only delays the next poll.
+
+State flow:
+    initiated -> liquidating -> waiting_settlement -> withdrawing_funds
+    -> waiting_transfer -> (withdrawing_funds ...) -> closing_account -> completed
+Any state may end in failed (needs manual review) or cancelled.
+
+ACCOUNT_CLOSURE_STORE_BACKEND=memory selects a process-local stand-in with the
+same behaviour for tests and dry runs.
+
+import_legacy_closures() moves closures started by the old in-process flow
+(Redis closure_state:* / withdrawal_state:* keys) into the job table once; run
+it with scripts/account_closure_scheduler.py --import-redis.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = int(os.getenv('ACCOUNT_CLOSURE_LEASE_SECONDS', '300'))
+
+
+class ClosureState(Enum):
+    """States of the closure state machine (values are stored in account_closure_jobs.state)."""
+    INITIATED = "initiated"
+    LIQUIDATING = "liquidating"
+    WAITING_SETTLEMENT = "waiting_settlement"
+    WITHDRAWING_FUNDS = "withdrawing_funds"
+    WAITING_TRANSFER = "waiting_transfer"
+    CLOSING_ACCOUNT = "closing_account"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+TERMINAL_STATES = (ClosureState.COMPLETED, ClosureState.FAILED, ClosureState.CANCELLED)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+@dataclass
+class ClosureJob:
+    """One account's closure and where it is in the state machine."""
+    id: str
+    account_id: str
+    user_id: str
+    ach_relationship_id: str
+    confirmation_number: Optional[str] = None
+    state: ClosureState = ClosureState.INITIATED
+    state_entered_at: datetime = field(default_factory=_utcnow)
+    next_run_at: datetime = field(default_factory=_utcnow)
+    transfer_id: Optional[str] = None
+    transfers: List[Dict[str, Any]] = field(default_factory=list)
+    last_withdrawal_at: Optional[datetime] = None
+    errors: int = 0
+    last_error: Optional[str] = None
+    locked_by: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    created_at: datetime = field(default_factory=_utcnow)
+    finished_at: Optional[datetime] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.state not in TERMINAL_STATES
+
+    def enter(self, state: ClosureState, now: datetime, delay_seconds: float = 0) -> None:
+        """Move to `state` and make the job due again after `delay_seconds`."""
+        if state != self.state:
+            self.state = state
+            self.state_entered_at = now
+        self.errors = 0
+        self.last_error = None
+        self.next_run_at = now + timedelta(seconds=delay_seconds)
+        if state in TERMINAL_STATES:
+            self.finished_at = now
+
+    def wait(self, now: datetime, delay_seconds: float) -> None:
+        """Stay in the current state and poll again after `delay_seconds`."""
+        self.errors = 0
+        self.next_run_at = now + timedelta(seconds=delay_seconds)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'ClosureJob':
+        return cls(
+            id=str(row['id']),
+            account_id=str(row['account_id']),
+            user_id=str(row['user_id']),
+            ach_relationship_id=str(row['ach_relationship_id']),
+            confirmation_number=row.get('confirmation_number'),
+            state=ClosureState(row.get('state') or ClosureState.INITIATED.value),
+            state_entered_at=_parse_timestamp(row.get('state_entered_at')) or _utcnow(),
+            next_run_at=_parse_timestamp(row.get('next_run_at')) or _utcnow(),
+            transfer_id=row.get('transfer_id'),
+            transfers=list(row.get('transfers') or []),
+            last_withdrawal_at=_parse_timestamp(row.get('last_withdrawal_at')),
+            errors=int(row.get('errors') or 0),
+            last_error=row.get('last_error'),
+            locked_by=row.get('locked_by'),
+            lease_expires_at=_parse_timestamp(row.get('lease_expires_at')),
+            created_at=_parse_timestamp(row.get('created_at')) or _utcnow(),
+            finished_at=_parse_timestamp(row.get('finished_at')),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'account_id': self.account_id,
+            'user_id': self.user_id,
+            'confirmation_number': self.confirmation_number,
+            'state': self.state.value,
+            'state_entered_at': _isoformat(self.state_entered_at),
+            'next_run_at': _isoformat(self.next_run_at),
+            'transfer_id': self.transfer_id,
+            'transfers': self.transfers,
+            'last_withdrawal_at': _isoformat(self.last_withdrawal_at),
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'created_at': _isoformat(self.created_at),
+            'finished_at': _isoformat(self.finished_at),
+        }
+
+    def state_values(self) -> Dict[str, Any]:
+        """Columns written back after every poll."""
+        return {
+            'state': self.state.value,
+            'state_entered_at': _isoformat(self.state_entered_at),
+            'next_run_at': _isoformat(self.next_run_at),
+            'transfer_id': self.transfer_id,
+            'transfers': self.transfers,
+            'last_withdrawal_at': _isoformat(self.last_withdrawal_at),
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'finished_at': _isoformat(self.finished_at),
+        }
+
+
+class InMemoryClosureJobStore:
+    """
+    Process-local store with the same semantics as the Postgres backend.
+
+    Methods never await between reads and writes, so claims are atomic with
+    respect to other coroutines on the same event loop. Jobs are handed out as
+    copies, like rows read from the database.
+    """
+
+    def __init__(self, clock: Optional[Callable[[], datetime]] = None,
+                 lease_seconds: int = LEASE_SECONDS):
+        self._clock = clock or _utcnow
+        self.lease_seconds = lease_seconds
+        self._jobs: Dict[str, ClosureJob] = {}
+        self._open_by_account: Dict[str, str] = {}
+
+    async def create(self, account_id: str, user_id: str, ach_relationship_id: str,
+                     confirmation_number: Optional[str] = None) -> Tuple[ClosureJob, bool]:
+        open_id = self._open_by_account.get(account_id)
+        if open_id is not None:
+            return self._copy(self._jobs[open_id]), False
+
+        now = self._clock()
+        job = ClosureJob(
+            id=str(uuid.uuid4()),
+            account_id=account_id,
+            user_id=user_id,
+            ach_relationship_id=ach_relationship_id,
+            confirmation_number=confirmation_number,
+            state_entered_at=now,
+            next_run_at=now,
+            created_at=now,
+        )
+        self._jobs[job.id] = job
+        self._open_by_account[account_id] = job.id
+        return self._copy(job), True
+
+    async def claim_due(self, worker_id: str, limit: int = 100) -> List[ClosureJob]:
+        now = self._clock()
+        due = [
+            job for job in self._jobs.values()
+            if job.is_open and job.next_run_at <= now
+            and (job.locked_by is None or (job.lease_expires_at is not None and job.lease_expires_at < now))
+        ]
+        due.sort(key=lambda job: job.next_run_at)
+
+        claimed = due[:limit]
+        for job in claimed:
+            job.locked_by = worker_id
+            job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+        return [self._copy(job) for job in claimed]
+
+    async def save(self, job: ClosureJob, release: bool = True) -> bool:
+        """
+        Write the job's state back; False if the lease was lost.
+
+        release=False keeps the lease, for progress that must be durable before
+        a broker write (the poll's final save releases it).
+        """
+        stored = self._jobs.get(job.id)
+        if stored is None or stored.locked_by is None or stored.locked_by != job.locked_by:
+            return False
+
+        for name in ('state', 'state_entered_at', 'next_run_at', 'transfer_id', 'last_withdrawal_at',
+                     'errors', 'last_error', 'finished_at'):
+            setattr(stored, name, getattr(job, name))
+        stored.transfers = [dict(transfer) for transfer in job.transfers]
+        if release:
+            stored.locked_by = stored.lease_expires_at = None
+        if not stored.is_open:
+            self._open_by_account.pop(stored.account_id, None)
+        return True
+
+    async def get(self, account_id: str) -> Optional[ClosureJob]:
+        """The open closure for the account, else its most recent one."""
+        open_id = self._open_by_account.get(account_id)
+        if open_id is not None:
+            return self._copy(self._jobs[open_id])
+        jobs = [job for job in self._jobs.values() if job.account_id == account_id]
+        return self._copy(max(jobs, key=lambda job: job.created_at)) if jobs else None
+
+    async def import_job(self, job: ClosureJob) -> bool:
+        """Insert a job built outside create(); False if the account already has a closure."""
+        if any(existing.account_id == job.account_id for existing in self._jobs.values()):
+            return False
+        self._jobs[job.id] = self._copy(job)
+        if job.is_open:
+            self._open_by_account[job.account_id] = job.id
+        return True
+
+    async def list_open(self) -> List[ClosureJob]:
+        jobs = [self._jobs[job_id] for job_id in self._open_by_account.values()]
+        return [self._copy(job) for job in sorted(jobs, key=lambda job: job.next_run_at)]
+
+    async def wake(self, account_id: str) -> bool:
+        """Make the account's open closure due now."""
+        open_id = self._open_by_account.get(account_id)
+        if open_id is None:
+            return False
+        self._jobs[open_id].next_run_at = self._clock()
+        return True
+
+    async def cancel(self, account_id: str, reason: str = 'Cancelled by operator') -> bool:
+        open_id = self._open_by_account.pop(account_id, None)
+        if open_id is None:
+            return False
+        job = self._jobs[open_id]
+        job.enter(ClosureState.CANCELLED, self._clock())
+        job.last_error = reason
+        # Dropping the lease makes a save from a poll in flight a no-op
+        job.locked_by = job.lease_expires_at = None
+        return True
+
+    @staticmethod
+    def _copy(job: ClosureJob) -> ClosureJob:
+        return replace(job, transfers=[dict(transfer) for transfer in job.transfers])
+
+
+class PostgresClosureJobStore:
+    """Store backed by account_closure_jobs and its create/claim RPCs."""
+
+    TABLE = 'account_closure_jobs'
+
+    def __init__(self, supabase=None, lease_seconds: int = LEASE_SECONDS):
+        self._supabase = supabase
+        self.lease_seconds = lease_seconds
+
+    def _get_supabase_client(self):
+        if self._supabase is None:
+            from utils.supabase.db_client import get_supabase_client
+            self._supabase = get_supabase_client()
+        return self._supabase
+
+    async def create(self, account_id: str, user_id: str, ach_relationship_id: str,
+                     confirmation_number: Optional[str] = None) -> Tuple[ClosureJob, bool]:
+        def _create():
+            return self._get_supabase_client().rpc('create_account_closure_job', {
+                'p_account_id': account_id,
+                'p_user_id': user_id,
+                'p_ach_relationship_id': ach_relationship_id,
+                'p_confirmation_number': confirmation_number,
+            }).execute()
+
+        result = await asyncio.to_thread(_create)
+        row = result.data[0]
+        return ClosureJob.from_row(row['job']), bool(row['created'])
+
+    async def claim_due(self, worker_id: str, limit: int = 100) -> List[ClosureJob]:
+        def _claim():
+            return self._get_supabase_client().rpc('claim_due_account_closures', {
+                'p_worker_id': worker_id,
+                'p_limit': limit,
+                'p_lease_seconds': self.lease_seconds,
+            }).execute()
+
+        result = await asyncio.to_thread(_claim)
+        return [ClosureJob.from_row(row) for row in result.data or []]
+
+    async def save(self, job: ClosureJob, release: bool = True) -> bool:
+        """Write the job's state back (releasing its lease unless release=False); False if the lease was lost."""
+        values = {**job.state_values(), 'updated_at': _utcnow().isoformat()}
+        if release:
+            values.update(locked_by=None, lease_expires_at=None)
+
+        def _update():
+            # Guarded by locked_by so a cancelled or reclaimed job is not overwritten
+            return self._get_supabase_client().table(self.TABLE)\
+                .update(values)\
+                .eq('id', job.id)\
+                .eq('locked_by', job.locked_by)\
+                .execute()
+
+        result = await asyncio.to_thread(_update)
+        return bool(result.data)
+
+    async def import_job(self, job: ClosureJob) -> bool:
+        """Insert a job built outside create(); False if the account already has a closure."""
+        row = {
+            'id': job.id,
+            'account_id': job.account_id,
+            'user_id': job.user_id,
+            'ach_relationship_id': job.ach_relationship_id,
+            'confirmation_number': job.confirmation_number,
+            'created_at': _isoformat(job.created_at),
+            **job.state_values(),
+        }
+
+        def _import():
+            return self._get_supabase_client().rpc('import_account_closure_job', {'p_job': row}).execute()
+
+        result = await asyncio.to_thread(_import)
+        return bool(result.data)
+
+    async def get(self, account_id: str) -> Optional[ClosureJob]:
+        """The open closure for the account, else its most recent one."""
+        def _select():
+            return self._get_supabase_client().table(self.TABLE)\
+                .select('*')\
+                .eq('account_id', account_id)\
+                .order('created_at', desc=True)\
+                .limit(5)\
+                .execute()
+
+        result = await asyncio.to_thread(_select)
+        jobs = [ClosureJob.from_row(row) for row in result.data or []]
+        return next((job for job in jobs if job.is_open), jobs[0] if jobs else None)
+
+    async def list_open(self) -> List[ClosureJob]:
+        def _select():
+            return self._get_supabase_client().table(self.TABLE)\
+                .select('*')\
+                .not_.in_('state', [state.value for state in TERMINAL_STATES])\
+                .order('next_run_at')\
+                .execute()
+
+        result = await asyncio.to_thread(_select)
+        return [ClosureJob.from_row(row) for row in result.data or []]
+
+    async def wake(self, account_id: str) -> bool:
+        """Make the account's open closure due now."""
+        return await self._update_open(account_id, {'next_run_at': _utcnow().isoformat()})
+
+    async def cancel(self, account_id: str, reason: str = 'Cancelled by operator') -> bool:
+        now = _utcnow().isoformat()
+        return await self._update_open(account_id, {
+            'state': ClosureState.CANCELLED.value,
+            'state_entered_at': now,
+            'finished_at': now,
+            'last_error': reason,
+            # Dropping the lease makes a save from a poll in flight a no-op
+            'locked_by': None,
+            'lease_expires_at': None,
+        })
+
+    async def _update_open(self, account_id: str, values: Dict[str, Any]) -> bool:
+        values = {**values, 'updated_at': _utcnow().isoformat()}
+
+        def _update():
+            return self._get_supabase_client().table(self.TABLE)\
+                .update(values)\
+                .eq('account_id', account_id)\
+                .not_.in_('state', [state.value for state in TERMINAL_STATES])\
+                .execute()
+
+        result = await asyncio.to_thread(_update)
+        return bool(result.data)
+
+
+_job_store = None
+
+
+def get_closure_job_store():
+    """Get the process-wide account closure job store for the configured backend."""
+    global _job_store
+    if _job_store is None:
+        backend = os.getenv('ACCOUNT_CLOSURE_STORE_BACKEND', 'postgres').lower()
+        if backend == 'memory':
+            _job_store = InMemoryClosureJobStore()
+        else:
+            _job_store = PostgresClosureJobStore()
+        logger.info(f"Account closure job store backend: {backend}")
+    return _job_store
+
+
+# Phases written by the old in-process closure flow -> where the state machine picks up
+LEGACY_PHASES = {
+    'starting': ClosureState.INITIATED,
+    'liquidation': ClosureState.INITIATED,
+    'settlement': ClosureState.WAITING_SETTLEMENT,
+    'withdrawal': ClosureState.WITHDRAWING_FUNDS,
+    'withdrawal_waiting': ClosureState.WITHDRAWING_FUNDS,
+    'withdrawal_resuming': ClosureState.WITHDRAWING_FUNDS,
+    'withdrawal_24hr_wait': ClosureState.WITHDRAWING_FUNDS,
+    'transfer_completion': ClosureState.WITHDRAWING_FUNDS,
+    'withdrawal_complete': ClosureState.CLOSING_ACCOUNT,
+    'final_closure': ClosureState.CLOSING_ACCOUNT,
+    'sending_completion_email': ClosureState.CLOSING_ACCOUNT,
+    'updating_final_status': ClosureState.CLOSING_ACCOUNT,
+}
+
+
+def _legacy_timestamp(value: Any) -> Optional[datetime]:
+    # The old flow wrote naive datetime.now() values; servers run in UTC
+    try:
+        parsed = _parse_timestamp(value)
+    except ValueError:
+        return None
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def legacy_closure_job(account_id: str, closure_state: Dict[str, Any],
+                       withdrawal_state: Optional[Dict[str, Any]] = None,
+                       now: Optional[datetime] = None) -> Optional[ClosureJob]:
+    """
+    Job for a closure recorded by the old flow, or None if there is nothing to resume.
+
+    A withdrawal phase with a transfer on record resumes by checking that
+    transfer; the poller only sends the next one once it has completed and
+    the 24-hour cooldown since it has passed.
+    """
+    now = now or _utcnow()
+    state = LEGACY_PHASES.get(closure_state.get('phase'))
+    user_id = closure_state.get('user_id')
+    ach_relationship_id = closure_state.get('ach_relationship_id')
+    if state is None or not user_id or not ach_relationship_id:
+        return None
+
+    transfers = list((withdrawal_state or {}).get('transfers_completed') or [])
+    last_transfer_id = (withdrawal_state or {}).get('last_transfer_id')
+    next_run_at = now
+    if state == ClosureState.WITHDRAWING_FUNDS:
+        if closure_state.get('phase') == 'withdrawal_24hr_wait':
+            next_run_at = _legacy_timestamp(closure_state.get('next_action_time')) or now
+        elif last_transfer_id:
+            state = ClosureState.WAITING_TRANSFER
+
+    return ClosureJob(
+        id=str(uuid.uuid4()),
+        account_id=account_id,
+        user_id=str(user_id),
+        ach_relationship_id=str(ach_relationship_id),
+        confirmation_number=closure_state.get('confirmation_number'),
+        state=state,
+        state_entered_at=now,
+        next_run_at=max(next_run_at, now),
+        transfer_id=last_transfer_id,
+        transfers=transfers,
+        last_withdrawal_at=_legacy_timestamp(transfers[-1].get('initiated_at')) if transfers else None,
+        created_at=_legacy_timestamp(closure_state.get('initiated_at')) or now,
+    )
+
+
+async def import_legacy_closures(store, redis_client, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    One-time import of closures still tracked only in Redis by the old flow.
+
+    Accounts that already have a job (any state) are left alone, so the import
+    can be re-run safely. Returns counts of imported, existing and skipped keys.
+    """
+    def _read_legacy_states():
+        states = {}
+        for key in redis_client.scan_iter(match='closure_state:*'):
+            key = key.decode() if isinstance(key, bytes) else key
+            account_id = key.split(':', 1)[1]
+            closure_state = redis_client.get(key)
+            withdrawal_state = redis_client.get(f'withdrawal_state:{account_id}')
+            if closure_state:
+                states[account_id] = (
+                    json.loads(closure_state),
+                    json.loads(withdrawal_state) if withdrawal_state else None,
+                )
+        return states
+
+    counts = {'imported': 0, 'existing': 0, 'skipped': 0}
+    for account_id, (closure_state, withdrawal_state) in (await asyncio.to_thread(_read_legacy_states)).items():
+        if await store.get(account_id) is not None:
+            counts['existing'] += 1
+            continue
+        job = legacy_closure_job(account_id, closure_state, withdrawal_state, now=now)
+        if job is None:
+            logger.info(f"Not importing closure for {account_id} (phase {closure_state.get('phase')!r})")
+            counts['skipped'] += 1
+        elif await store.import_job(job):
+            logger.info(f"Imported closure for {account_id}: {closure_state.get('phase')} -> {job.state.value}")
+            counts['imported'] += 1
+        else:
+            counts['existing'] += 1
+    return counts
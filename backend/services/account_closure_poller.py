@@ -0,0 +1,645 @@
+"""
+Account Closure Poller
+
+Advances every automated account closure from one place. Closures are rows in
+account_closure_jobs (services/account_closure_jobs.py) with a next_run_at
+time; each poll:
+
+1. Claims every due closure in one call (FOR UPDATE SKIP LOCKED)
+2. Batch-reads broker state for all of them at once: trade account and
+   positions for closures waiting on liquidation, settlement or closing, and
+   one outgoing-transfer listing per account for closures waiting on an ACH
+   transfer, all fanned out together over the pooled broker client
+3. Advances each closure's state, issuing at most one broker write per account
+   (liquidate, withdraw or close), and writes the next due time back
+
+Hour-long waits (T+1 settlement, ACH transfers, the 24-hour gap between
+withdrawals capped at the daily limit) are just a later next_run_at, so no
+coroutine is held per account and restarts lose nothing.
+
+run_dry_run() drives the same state machine against FakeClosureBroker and an
+in-memory store on a simulated clock, for tests and for
+scripts/account_closure_scheduler.py --dry-run.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from services.account_closure_jobs import (
+    ClosureJob,
+    ClosureState,
+    InMemoryClosureJobStore,
+    get_closure_job_store,
+)
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = float(os.getenv('ACCOUNT_CLOSURE_POLL_INTERVAL_SECONDS', '60'))
+POLL_BATCH_SIZE = int(os.getenv('ACCOUNT_CLOSURE_POLL_BATCH_SIZE', '200'))
+
+LIQUIDATION_POLL_SECONDS = 30
+LIQUIDATION_TIMEOUT_SECONDS = 15 * 60
+SETTLEMENT_POLL_SECONDS = 3600
+TRANSFER_POLL_SECONDS = 7200
+WITHDRAWAL_COOLDOWN_SECONDS = 24 * 3600
+
+WITHDRAWAL_LOOKUP_SLACK = timedelta(minutes=10)  # Broker/server clock skew when matching a requested transfer
+
+DAILY_WITHDRAWAL_LIMIT = 50000.0  # Alpaca ACH limit per account per day
+MAX_REMAINING_BALANCE = 1.0  # Accounts close once cash is at or below this
+
+MAX_POLL_ERRORS = 5
+ERROR_RETRY_BASE_SECONDS = 300
+ERROR_RETRY_MAX_SECONDS = 3600
+
+COMPLETED_TRANSFER_STATUSES = ('COMPLETE', 'COMPLETED', 'SETTLED')
+FAILED_TRANSFER_STATUSES = ('REJECTED', 'CANCELED', 'CANCELLED', 'RETURNED', 'FAILED')
+
+# States whose next step depends on the account's cash and positions
+SNAPSHOT_STATES = (
+    ClosureState.LIQUIDATING,
+    ClosureState.WAITING_SETTLEMENT,
+    ClosureState.WITHDRAWING_FUNDS,
+    ClosureState.CLOSING_ACCOUNT,
+)
+
+TransitionHook = Callable[[ClosureJob, ClosureState], Awaitable[None]]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _enum_value(value: Any) -> str:
+    return str(getattr(value, 'value', value)).upper()
+
+
+def error_retry_seconds(errors: int) -> float:
+    """Backoff before re-polling a closure after `errors` consecutive failed polls."""
+    return min(ERROR_RETRY_BASE_SECONDS * (2 ** max(errors - 1, 0)), ERROR_RETRY_MAX_SECONDS)
+
+
+@dataclass
+class AccountSnapshot:
+    """The parts of a brokerage account the closure state machine looks at."""
+    status: str
+    positions: int
+    cash: float
+    cash_withdrawable: float
+
+    @property
+    def closed(self) -> bool:
+        return self.status == 'CLOSED'
+
+    @property
+    def settled(self) -> bool:
+        # Proceeds are withdrawable once every sale has settled (T+1)
+        return self.cash_withdrawable >= self.cash - 0.01
+
+
+class AlpacaClosureBroker:
+    """Batched broker reads and per-account writes over the pooled Alpaca client."""
+
+    def __init__(self, client=None, sandbox: Optional[bool] = None):
+        self._client = client
+        self.sandbox = sandbox
+
+    def _get_client(self):
+        if self._client is None:
+            from utils.broker_pool import get_pooled_broker_client
+            self._client = get_pooled_broker_client(sandbox=self.sandbox)
+        return self._client
+
+    async def get_snapshots(self, account_ids: Iterable[str]) -> Dict[str, Any]:
+        """account_id -> AccountSnapshot, or the exception its reads raised."""
+        from utils.broker_pool import fetch_account_snapshot
+
+        account_ids = list(dict.fromkeys(account_ids))
+        client = self._get_client()
+        results = await asyncio.gather(
+            *(fetch_account_snapshot(client, account_id) for account_id in account_ids),
+            return_exceptions=True
+        )
+
+        snapshots = {}
+        for account_id, result in zip(account_ids, results):
+            if isinstance(result, BaseException):
+                snapshots[account_id] = result
+                continue
+            trade_account, positions = result
+            if isinstance(positions, BaseException):
+                snapshots[account_id] = positions
+                continue
+            snapshots[account_id] = AccountSnapshot(
+                status=_enum_value(getattr(trade_account, 'status', '')),
+                positions=len(positions or []),
+                cash=float(trade_account.cash or 0),
+                cash_withdrawable=float(trade_account.cash_withdrawable or 0),
+            )
+        return snapshots
+
+    async def get_transfer_statuses(self, transfer_ids: Dict[str, str]) -> Dict[str, Any]:
+        """account_id -> status of its transfer_id, or the exception the lookup raised."""
+        from alpaca.broker.enums import TransferDirection
+        from alpaca.broker.requests import GetTransfersRequest
+        from utils.broker_pool import run_broker_call
+
+        client = self._get_client()
+        transfers_filter = GetTransfersRequest(direction=TransferDirection.OUTGOING, limit=50)
+        account_ids = list(transfer_ids)
+        results = await asyncio.gather(
+            *(run_broker_call(client.get_transfers_for_account, account_id, transfers_filter=transfers_filter)
+              for account_id in account_ids),
+            return_exceptions=True
+        )
+
+        statuses = {}
+        for account_id, result in zip(account_ids, results):
+            if isinstance(result, BaseException):
+                statuses[account_id] = result
+                continue
+            match = next((t for t in result or [] if str(getattr(t, 'id', '')) == str(transfer_ids[account_id])), None)
+            statuses[account_id] = (
+                _enum_value(match.status) if match is not None
+                else LookupError(f"Transfer {transfer_ids[account_id]} not found")
+            )
+        return statuses
+
+    async def find_withdrawal(self, account_id: str, amount: float, since: datetime) -> Optional[str]:
+        """Id of an outgoing transfer of `amount` created since `since`, if the broker has one."""
+        from alpaca.broker.enums import TransferDirection
+        from alpaca.broker.requests import GetTransfersRequest
+        from utils.broker_pool import run_broker_call
+
+        transfers = await run_broker_call(
+            self._get_client().get_transfers_for_account,
+            account_id,
+            transfers_filter=GetTransfersRequest(direction=TransferDirection.OUTGOING, limit=50)
+        )
+        for transfer in transfers or []:
+            created_at = getattr(transfer, 'created_at', None)
+            if created_at is not None and created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            if (abs(float(transfer.amount or 0) - amount) < 0.01
+                    and (created_at is None or created_at >= since - WITHDRAWAL_LOOKUP_SLACK)):
+                return str(transfer.id)
+        return None
+
+    async def liquidate(self, account_id: str) -> None:
+        """Cancel open orders and close every position."""
+        from utils.broker_pool import run_broker_call
+        await run_broker_call(self._get_client().close_all_positions_for_account, account_id, cancel_orders=True)
+
+    async def withdraw(self, account_id: str, ach_relationship_id: str, amount: float) -> str:
+        """Start an outgoing ACH transfer and return its id."""
+        from alpaca.broker.enums import TransferDirection, TransferTiming
+        from alpaca.broker.requests import CreateACHTransferRequest
+        from utils.broker_pool import run_broker_call
+
+        transfer = await run_broker_call(
+            self._get_client().create_transfer_for_account,
+            account_id,
+            CreateACHTransferRequest(
+                amount=f"{amount:.2f}",
+                direction=TransferDirection.OUTGOING,
+                timing=TransferTiming.IMMEDIATE,
+                relationship_id=ach_relationship_id,
+            )
+        )
+        return str(transfer.id)
+
+    async def close_account(self, account_id: str) -> None:
+        from utils.broker_pool import run_broker_call
+        await run_broker_call(self._get_client().close_account, account_id)
+
+
+@dataclass
+class FakeAccount:
+    """Simulated brokerage account for FakeClosureBroker."""
+    positions_value: float = 0.0
+    cash: float = 0.0
+    unsettled: float = 0.0
+    status: str = 'ACTIVE'
+    polls_until_filled: int = 0
+    polls_until_settled: int = 0
+
+
+class FakeClosureBroker:
+    """
+    In-memory broker for dry runs and tests.
+
+    Liquidation orders fill after `fill_polls` snapshot reads, sale proceeds
+    settle after `settle_polls` more, and transfers complete after
+    `transfer_polls` status reads (or are rejected for accounts in
+    `reject_transfers`). `calls` counts every broker round trip.
+    """
+
+    def __init__(self, fill_polls: int = 1, settle_polls: int = 1, transfer_polls: int = 1,
+                 reject_transfers: Iterable[str] = ()):
+        self.accounts: Dict[str, FakeAccount] = {}
+        self.transfers: Dict[str, Dict[str, Any]] = {}
+        self.fill_polls = fill_polls
+        self.settle_polls = settle_polls
+        self.transfer_polls = transfer_polls
+        self.reject_transfers = set(reject_transfers)
+        self.calls: Counter = Counter()
+
+    def add_account(self, account_id: str, positions_value: float = 0.0, cash: float = 0.0) -> FakeAccount:
+        account = FakeAccount(positions_value=positions_value, cash=cash)
+        self.accounts[account_id] = account
+        return account
+
+    async def get_snapshots(self, account_ids: Iterable[str]) -> Dict[str, Any]:
+        account_ids = list(dict.fromkeys(account_ids))
+        if account_ids:
+            self.calls['snapshot_batches'] += 1
+        snapshots = {}
+        for account_id in account_ids:
+            self.calls['account_reads'] += 1
+            account = self.accounts.get(account_id)
+            if account is None:
+                snapshots[account_id] = LookupError(f"Account {account_id} not found")
+                continue
+            self._tick(account)
+            snapshots[account_id] = AccountSnapshot(
+                status=account.status,
+                positions=1 if account.positions_value > 0 else 0,
+                cash=account.cash + account.unsettled,
+                cash_withdrawable=account.cash,
+            )
+        return snapshots
+
+    async def get_transfer_statuses(self, transfer_ids: Dict[str, str]) -> Dict[str, Any]:
+        if transfer_ids:
+            self.calls['transfer_batches'] += 1
+        statuses = {}
+        for account_id, transfer_id in transfer_ids.items():
+            self.calls['transfer_reads'] += 1
+            transfer = self.transfers.get(transfer_id)
+            if transfer is None:
+                statuses[account_id] = LookupError(f"Transfer {transfer_id} not found")
+                continue
+            transfer['polls'] += 1
+            if transfer['polls'] >= self.transfer_polls and transfer['status'] == 'QUEUED':
+                transfer['status'] = 'REJECTED' if account_id in self.reject_transfers else 'COMPLETE'
+                if transfer['status'] == 'REJECTED':
+                    self.accounts[account_id].cash += transfer['amount']
+            statuses[account_id] = transfer['status']
+        return statuses
+
+    async def liquidate(self, account_id: str) -> None:
+        self.calls['liquidations'] += 1
+        account = self.accounts[account_id]
+        if account.positions_value > 0:
+            account.polls_until_filled = self.fill_polls
+
+    async def withdraw(self, account_id: str, ach_relationship_id: str, amount: float) -> str:
+        self.calls['withdrawals'] += 1
+        account = self.accounts[account_id]
+        if amount > account.cash + 0.005:
+            raise ValueError(f"Insufficient withdrawable cash: {account.cash:.2f} < {amount:.2f}")
+        account.cash -= amount
+        transfer_id = str(uuid.uuid4())
+        self.transfers[transfer_id] = {'account_id': account_id, 'amount': amount, 'status': 'QUEUED', 'polls': 0}
+        return transfer_id
+
+    async def find_withdrawal(self, account_id: str, amount: float, since: datetime) -> Optional[str]:
+        self.calls['withdrawal_lookups'] += 1
+        for transfer_id, transfer in reversed(list(self.transfers.items())):
+            if transfer['account_id'] == account_id and abs(transfer['amount'] - amount) < 0.01:
+                return transfer_id
+        return None
+
+    async def close_account(self, account_id: str) -> None:
+        self.calls['closures'] += 1
+        self.accounts[account_id].status = 'CLOSED'
+
+    def _tick(self, account: FakeAccount) -> None:
+        """Advance fills and settlement by one snapshot read."""
+        if account.unsettled and account.polls_until_settled <= 1:
+            account.cash += account.unsettled
+            account.unsettled = 0.0
+        elif account.unsettled:
+            account.polls_until_settled -= 1
+
+        if account.polls_until_filled > 0:
+            account.polls_until_filled -= 1
+            if account.polls_until_filled == 0:
+                account.unsettled += account.positions_value
+                account.positions_value = 0.0
+                account.polls_until_settled = self.settle_polls
+
+
+class AccountClosurePoller:
+    """
+    Single poller for all automated account closures.
+
+    on_transition(job, previous_state) runs after every saved state change
+    (status mirroring, emails, Supabase updates); it is skipped in dry runs.
+    """
+
+    def __init__(self, store=None, broker=None, on_transition: Optional[TransitionHook] = None,
+                 clock: Optional[Callable[[], datetime]] = None,
+                 batch_size: int = POLL_BATCH_SIZE, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.store = store  # Lazy loaded
+        self.broker = broker  # Lazy loaded
+        self.on_transition = on_transition
+        self._clock = clock or _utcnow
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # Performance tracking
+        self.total_polls = 0
+        self.total_jobs_advanced = 0
+        self.total_transitions = 0
+        self.total_poll_errors = 0
+
+    def _get_store(self):
+        if self.store is None:
+            self.store = get_closure_job_store()
+        return self.store
+
+    def _get_broker(self):
+        if self.broker is None:
+            self.broker = AlpacaClosureBroker()
+        return self.broker
+
+    async def run_forever(self):
+        """Poll until cancelled (runs under leader election in the API lifespan)."""
+        logger.info(f"🏦 Account closure poller started ({self.worker_id})")
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in account closure poll: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run_once(self) -> Dict[str, int]:
+        """Advance every due closure once; returns the number of closures per resulting state."""
+        store, broker = self._get_store(), self._get_broker()
+        jobs = await store.claim_due(self.worker_id, self.batch_size)
+        self.total_polls += 1
+        if not jobs:
+            return {}
+
+        now = self._clock()
+        snapshot_ids = [job.account_id for job in jobs if job.state in SNAPSHOT_STATES]
+        transfer_ids = {
+            job.account_id: job.transfer_id for job in jobs
+            if job.state == ClosureState.WAITING_TRANSFER and job.transfer_id
+        }
+        snapshots, transfer_statuses = await asyncio.gather(
+            broker.get_snapshots(snapshot_ids) if snapshot_ids else _empty(),
+            broker.get_transfer_statuses(transfer_ids) if transfer_ids else _empty(),
+        )
+
+        results = await asyncio.gather(*(
+            self._advance(job, snapshots.get(job.account_id), transfer_statuses.get(job.account_id), now)
+            for job in jobs
+        ))
+        self.total_jobs_advanced += len(jobs)
+        counts = Counter(state.value for state in results)
+        logger.info(f"🏦 Account closure poll advanced {len(jobs)} closures: {dict(counts)}")
+        return dict(counts)
+
+    async def _advance(self, job: ClosureJob, snapshot: Any, transfer_status: Any,
+                       now: datetime) -> ClosureState:
+        previous = job.state
+        try:
+            await self._step(job, snapshot, transfer_status, now)
+        except Exception as e:
+            self.total_poll_errors += 1
+            job.errors += 1
+            if job.errors >= MAX_POLL_ERRORS:
+                self._fail(job, f"{previous.value}: {e}", now)
+            else:
+                job.last_error = str(e)
+                job.next_run_at = now + timedelta(seconds=error_retry_seconds(job.errors))
+            logger.warning(f"Account closure poll failed for {job.account_id} in {previous.value} "
+                           f"({job.errors}/{MAX_POLL_ERRORS}): {e}")
+
+        try:
+            saved = await self._get_store().save(job)
+        except Exception as e:
+            # The lease expires and the job is polled again; one account's failure must not end the poll
+            logger.error(f"Failed to save account closure {job.account_id} after {previous.value}: {e}")
+            return previous
+        if not saved:
+            logger.warning(f"Account closure {job.account_id} changed while polling (cancelled?); result dropped")
+            return job.state
+
+        if job.state != previous:
+            self.total_transitions += 1
+            logger.info(f"Account closure {job.account_id}: {previous.value} -> {job.state.value}")
+            if self.on_transition is not None:
+                try:
+                    await self.on_transition(job, previous)
+                except Exception as e:
+                    logger.error(f"Account closure transition hook failed for {job.account_id}: {e}")
+        return job.state
+
+    async def _step(self, job: ClosureJob, snapshot: Any, transfer_status: Any, now: datetime) -> None:
+        """Run one state's check and at most one broker write, then schedule the job."""
+        broker = self._get_broker()
+        state = job.state
+
+        if state == ClosureState.INITIATED:
+            await broker.liquidate(job.account_id)
+            job.enter(ClosureState.LIQUIDATING, now, LIQUIDATION_POLL_SECONDS)
+            return
+
+        if state == ClosureState.WAITING_TRANSFER:
+            if isinstance(transfer_status, BaseException):
+                raise transfer_status
+            if transfer_status is None:
+                raise ValueError("No transfer to wait for")
+            if transfer_status in COMPLETED_TRANSFER_STATUSES:
+                # Back to withdrawing: either the balance is gone or the next daily tranche is due
+                job.enter(ClosureState.WITHDRAWING_FUNDS, now)
+            elif transfer_status in FAILED_TRANSFER_STATUSES:
+                self._fail(job, f"ACH transfer {job.transfer_id} {transfer_status}", now)
+            else:
+                job.wait(now, TRANSFER_POLL_SECONDS)
+            return
+
+        if isinstance(snapshot, BaseException):
+            raise snapshot
+        if snapshot is None:
+            raise ValueError("No account snapshot")
+        if snapshot.closed:
+            job.enter(ClosureState.COMPLETED, now)
+            return
+
+        if state == ClosureState.LIQUIDATING:
+            if snapshot.positions == 0:
+                job.enter(ClosureState.WAITING_SETTLEMENT, now)
+            elif (now - job.state_entered_at).total_seconds() > LIQUIDATION_TIMEOUT_SECONDS:
+                self._fail(job, f"Positions failed to clear within {LIQUIDATION_TIMEOUT_SECONDS // 60} minutes", now)
+            else:
+                job.wait(now, LIQUIDATION_POLL_SECONDS)
+
+        elif state == ClosureState.WAITING_SETTLEMENT:
+            if snapshot.cash <= MAX_REMAINING_BALANCE:
+                job.enter(ClosureState.CLOSING_ACCOUNT, now)
+            elif snapshot.settled:
+                job.enter(ClosureState.WITHDRAWING_FUNDS, now)
+            else:
+                job.wait(now, SETTLEMENT_POLL_SECONDS)
+
+        elif state == ClosureState.WITHDRAWING_FUNDS:
+            await self._withdraw(job, snapshot, now)
+
+        elif state == ClosureState.CLOSING_ACCOUNT:
+            if snapshot.positions > 0:
+                self._fail(job, "Cannot close account: positions still exist", now)
+            elif snapshot.cash > MAX_REMAINING_BALANCE:
+                job.enter(ClosureState.WITHDRAWING_FUNDS, now)
+            else:
+                await broker.close_account(job.account_id)
+                job.enter(ClosureState.COMPLETED, now)
+
+    async def _withdraw(self, job: ClosureJob, snapshot: AccountSnapshot, now: datetime) -> None:
+        pending = job.transfers[-1] if job.transfers and job.transfers[-1].get('status') == 'requested' else None
+        if pending is not None:
+            # A withdrawal was requested but its transfer id never got saved: find it rather than send another
+            transfer_id = await self._get_broker().find_withdrawal(
+                job.account_id, pending['amount'], datetime.fromisoformat(pending['initiated_at'])
+            )
+            if transfer_id:
+                pending['transfer_id'] = transfer_id
+                del pending['status']
+                job.transfer_id = transfer_id
+                job.enter(ClosureState.WAITING_TRANSFER, now, TRANSFER_POLL_SECONDS)
+                logger.info(f"Recovered withdrawal {transfer_id} for account closure {job.account_id}")
+                return
+            # Not at the broker; its cooldown (last_withdrawal_at) still applies below
+            pending['status'] = 'not_found'
+            logger.warning(f"Requested withdrawal for account closure {job.account_id} not found at the broker")
+
+        if snapshot.cash <= MAX_REMAINING_BALANCE:
+            job.enter(ClosureState.CLOSING_ACCOUNT, now)
+            return
+        if not snapshot.settled:
+            job.wait(now, SETTLEMENT_POLL_SECONDS)
+            return
+        if job.last_withdrawal_at is not None:
+            next_allowed = job.last_withdrawal_at + timedelta(seconds=WITHDRAWAL_COOLDOWN_SECONDS)
+            if now < next_allowed:
+                job.wait(now, (next_allowed - now).total_seconds())
+                return
+
+        amount = round(min(snapshot.cash_withdrawable, DAILY_WITHDRAWAL_LIMIT), 2)
+        request = {
+            'transfer_id': None,
+            'amount': amount,
+            'initiated_at': now.isoformat(),
+            'is_final': snapshot.cash_withdrawable <= DAILY_WITHDRAWAL_LIMIT,
+            'status': 'requested',
+        }
+        job.transfers.append(request)
+        job.last_withdrawal_at = now
+        # Durable before the transfer exists: if the save after it is lost, the next poll looks the
+        # transfer up instead of starting a second one inside the cooldown
+        if not await self._get_store().save(job, release=False):
+            raise RuntimeError("Closure lease lost before withdrawal")
+
+        transfer_id = await self._get_broker().withdraw(job.account_id, job.ach_relationship_id, amount)
+        request['transfer_id'] = transfer_id
+        del request['status']
+        job.transfer_id = transfer_id
+        job.enter(ClosureState.WAITING_TRANSFER, now, TRANSFER_POLL_SECONDS)
+
+    @staticmethod
+    def _fail(job: ClosureJob, reason: str, now: datetime) -> None:
+        job.enter(ClosureState.FAILED, now)
+        job.last_error = reason
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'total_polls': self.total_polls,
+            'total_jobs_advanced': self.total_jobs_advanced,
+            'total_transitions': self.total_transitions,
+            'total_poll_errors': self.total_poll_errors,
+        }
+
+
+async def _empty() -> Dict[str, Any]:
+    return {}
+
+
+@dataclass
+class DryRunReport:
+    """Outcome of run_dry_run."""
+    final_states: Dict[str, str] = field(default_factory=dict)
+    transitions: List[Tuple[str, str, str, str]] = field(default_factory=list)  # (time, account, from, to)
+    polls: int = 0
+    simulated_days: float = 0.0
+    broker_calls: Dict[str, int] = field(default_factory=dict)
+    jobs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+async def run_dry_run(accounts: Dict[str, Dict[str, float]], broker: Optional[FakeClosureBroker] = None,
+                      max_polls: int = 500) -> DryRunReport:
+    """
+    Run closures for `accounts` ({account_id: {'positions_value', 'cash'}}) to the end
+    against a fake broker, jumping a simulated clock to the next due closure between polls.
+    """
+    start = datetime(2025, 1, 6, 14, 30, tzinfo=timezone.utc)
+    clock = {'now': start}
+    store = InMemoryClosureJobStore(clock=lambda: clock['now'])
+    broker = broker or FakeClosureBroker()
+    report = DryRunReport()
+
+    async def record(job: ClosureJob, previous: ClosureState):
+        report.transitions.append((clock['now'].isoformat(), job.account_id, previous.value, job.state.value))
+
+    poller = AccountClosurePoller(store=store, broker=broker, on_transition=record,
+                                  clock=lambda: clock['now'], batch_size=max(len(accounts), 1))
+    for account_id, balances in accounts.items():
+        broker.add_account(account_id, balances.get('positions_value', 0.0), balances.get('cash', 0.0))
+        await store.create(account_id, f"user-{account_id}", f"ach-{account_id}", f"CLA-DRYRUN-{account_id[-6:]}")
+
+    while report.polls < max_polls:
+        open_jobs = await store.list_open()
+        if not open_jobs:
+            break
+        clock['now'] = max(clock['now'], min(job.next_run_at for job in open_jobs))
+        await poller.run_once()
+        report.polls += 1
+
+    for account_id in accounts:
+        job = await store.get(account_id)
+        report.final_states[account_id] = job.state.value
+        report.jobs[account_id] = job.to_dict()
+    report.simulated_days = (clock['now'] - start).total_seconds() / 86400
+    report.broker_calls = dict(broker.calls)
+    return report
+
+
+_account_closure_poller = None
+
+
+def get_account_closure_poller() -> AccountClosurePoller:
+    """Get or create the process-wide poller wired to the closure processor's hooks."""
+    global _account_closure_poller
+    if _account_closure_poller is None:
+        from utils.alpaca.automated_account_closure import AutomatedAccountClosureProcessor
+
+        sandbox = os.getenv("ALPACA_ENVIRONMENT", "sandbox").lower() == "sandbox"
+        processor = AutomatedAccountClosureProcessor(sandbox=sandbox)
+        _account_closure_poller = AccountClosurePoller(
+            broker=AlpacaClosureBroker(sandbox=sandbox),
+            on_transition=processor.handle_state_transition,
+        )
+    return _account_closure_poller
@@ -36,8 +36,6 @@ class AccountFilteringService:
         """Initialize the account filtering service."""
         self.supabase = None  # Lazy loaded
         self._account_uuid_cache = {}  # Cache UUID → provider_account_id mappings
-        self._holdings_cache = {}  # Cache user holdings: {user_id: (holdings, timestamp)}
-        self._cache_ttl_seconds = 60  # Cache for 60 seconds
     
     def _get_supabase_client(self):
         """Lazy load Supabase client to avoid circular imports."""
@@ -111,39 +109,13 @@ class AccountFilteringService:
             - sector_allocation: Sector breakdown (equities only)
         """
         try:
-            # Get all holdings - with aggressive caching for speed
-            import time
-            current_time = time.time()
+            # Get all holdings from the shared snapshot loader (deduplicated and briefly cached)
+            from utils.portfolio.holdings_snapshot_loader import get_holdings_snapshot_loader
+            all_holdings = await get_holdings_snapshot_loader().load(user_id, self._get_supabase_client())
             
-            # Check cache first
-            if user_id in self._holdings_cache:
-                cached_holdings, cache_time = self._holdings_cache[user_id]
-                if (current_time - cache_time) < self._cache_ttl_seconds:
-                    all_holdings = cached_holdings
-                    logger.debug(f"⚡ Cache hit: Using cached holdings for user {user_id}")
-                else:
-                    # Cache expired
-                    del self._holdings_cache[user_id]
-                    all_holdings = None
-            else:
-                all_holdings = None
-            
-            # Fetch from DB if not cached
-            if all_holdings is None:
-                supabase = self._get_supabase_client()
-                result = supabase.table('user_aggregated_holdings')\
-                    .select('*')\
-                    .eq('user_id', user_id)\
-                    .execute()
-                
-                if not result.data:
-                    logger.warning(f"No holdings found for user {user_id}")
-                    return self._empty_account_data()
-                
-                all_holdings = result.data
-                # Cache for future calls
-                self._holdings_cache[user_id] = (all_holdings, current_time)
-                logger.debug(f"📥 Fetched and cached {len(all_holdings)} holdings for user {user_id}")
+            if not all_holdings:
+                logger.warning(f"No holdings found for user {user_id}")
+                return self._empty_account_data()
             
             # Filter holdings to this specific account (in-memory, fast)
             account_holdings = self._filter_holdings_to_account(all_holdings, account_uuid)
@@ -367,22 +339,17 @@ class AccountFilteringService:
         - Bonds/fixed income shown as "Fixed Income" sector
         """
         try:
-            import redis
-            import json
-            import os
             from utils.asset_classification import classify_asset, AssetClassification
             from utils.portfolio.constants import UNAMBIGUOUS_CRYPTO, is_crypto_exchange
+            from utils.portfolio.sector_resolver import get_sector_resolver
+            from utils.portfolio.etf_lookthrough import get_etf_lookthrough_engine
             
-            # Connect to Redis
-            redis_client = redis.Redis(
-                host=os.getenv("REDIS_HOST", "127.0.0.1"),
-                port=int(os.getenv("REDIS_PORT", "6379")),
-                db=int(os.getenv("REDIS_DB", "0")),
-                decode_responses=True
-            )
-            
+            lookthrough_engine = get_etf_lookthrough_engine()
+            lookthrough_positions = []
             sector_values = {}
             total_value = 0.0
+            # Equities/ETFs needing an FMP sector: resolved together after the loop
+            pending_lookups = []
             
             for holding in holdings:
                 # CRITICAL: Normalize security_type to lowercase to handle case variations
@@ -425,20 +392,12 @@ class AccountFilteringService:
                             sector = 'Cryptocurrency'
                         elif classification == AssetClassification.BOND:
                             sector = 'Fixed Income'
+                        elif security_type == 'etf' and lookthrough_engine.has_lookthrough(symbol):
+                            lookthrough_positions.append((symbol, market_value))
+                            continue
                         else:
-                            # Look up FMP sector data in Redis
-                            fmp_sector_key = f"sector:{symbol}"
-                            sector_data_json = redis_client.get(fmp_sector_key)
-                            
-                            if sector_data_json:
-                                sector_data = json.loads(sector_data_json)
-                                sector = sector_data.get('sector', 'Unknown')
-                            else:
-                                # Classify ETF by name if no FMP data
-                                if security_type == 'etf':
-                                    sector = self._classify_etf_by_name(symbol, security_name)
-                                else:
-                                    sector = 'Unknown'
+                            pending_lookups.append((symbol, security_type, security_name, market_value))
+                            continue
                     else:
                         # Unknown security type - try to classify
                         classification = classify_asset(symbol, security_name, None)
@@ -456,6 +415,20 @@ class AccountFilteringService:
                 else:
                     sector_values['Unknown'] = sector_values.get('Unknown', 0) + market_value
             
+            if lookthrough_positions:
+                # ETFs with known composition are spread across the sectors they hold
+                for sector, value in lookthrough_engine.exposure(lookthrough_positions)['sectors'].items():
+                    sector_values[sector] = sector_values.get(sector, 0) + value
+            
+            if pending_lookups:
+                resolved_sectors = await get_sector_resolver().resolve(symbol for symbol, _, _, _ in pending_lookups)
+                for symbol, security_type, security_name, market_value in pending_lookups:
+                    sector = resolved_sectors.get(symbol, 'Unknown')
+                    if sector == 'Unknown' and security_type == 'etf':
+                        # Classify ETF by name if no FMP data
+                        sector = self._classify_etf_by_name(symbol, security_name)
+                    sector_values[sector] = sector_values.get(sector, 0) + market_value
+            
             # Build response
             sectors = []
             if total_value > 0:
@@ -8,8 +8,10 @@ Much lighter than Phase 1 reconstruction since it only captures current data.
 Designed to handle millions of users efficiently with batch processing.
 
 Key Features:
-- Batch processing of all aggregation users
-- Controlled concurrency to manage API load
+- Set-based EOD pipeline: holdings are streamed in pages, every user's
+  snapshot is computed in one in-memory pass, and history rows are written
+  in large chunks (no per-user queries)
+- One batched live-price fetch for the union of all users' symbols
 - Comprehensive error handling and retry logic
 - Performance monitoring and cost tracking
 - Seamless timeline extension from reconstruction data
@@ -20,7 +22,8 @@ import logging
 import json
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, date, timedelta, time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import numpy as np
 import pytz
 
 logger = logging.getLogger(__name__)
@@ -38,6 +41,8 @@ class EODSnapshot:
     institution_breakdown: Dict[str, float]
     securities_count: int
     data_quality_score: float
+    lookthrough_exposure: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    risk_metrics: Dict[str, Any] = field(default_factory=dict)
 
 @dataclass
 class EODBatchResult:
@@ -64,10 +69,14 @@ class DailyPortfolioSnapshotService:
         self.supabase = None  # Lazy loaded
         
         # Configuration
-        self.batch_size = 1000  # Users per batch
-        self.max_concurrent = 20  # Concurrent operations per batch
         self.retry_attempts = 3
         
+        # Set-based pipeline configuration
+        self.holdings_page_size = 1000  # Rows per page (PostgREST default max-rows)
+        self.write_chunk_size = 500  # History rows per bulk delete+insert
+        self.price_chunk_size = 500  # Symbols per FMP quote request
+        self.risk_model_max_symbols = 3000  # Largest symbols by value in the nightly covariance model
+        
         # Performance tracking
         self.total_snapshots_created = 0
         self.total_api_calls = 0
@@ -144,37 +153,10 @@ class DailyPortfolioSnapshotService:
                     errors=[]
                 )
             
-            # Process users in batches for memory efficiency
-            all_results = []
-            total_successful = 0
-            total_failed = 0
-            total_portfolio_value = 0.0
-            all_errors = []
-            
-            user_batches = [aggregation_users[i:i+self.batch_size] 
-                           for i in range(0, len(aggregation_users), self.batch_size)]
-            
-            for batch_num, user_batch in enumerate(user_batches, 1):
-                logger.info(f"🔄 Processing EOD batch {batch_num}/{len(user_batches)}: {len(user_batch)} users")
-                
-                # Process batch with controlled concurrency
-                batch_results = await self._process_eod_batch(user_batch)
-                
-                # Aggregate results
-                batch_successful = sum(1 for r in batch_results if r.get('success'))
-                batch_failed = len(batch_results) - batch_successful
-                batch_portfolio_value = sum(r.get('portfolio_value', 0) for r in batch_results if r.get('success'))
-                batch_errors = [r.get('error') for r in batch_results if r.get('error')]
-                
-                total_successful += batch_successful
-                total_failed += batch_failed
-                total_portfolio_value += batch_portfolio_value
-                all_errors.extend(batch_errors)
-                
-                logger.info(f"📈 Batch {batch_num} complete: {batch_successful} successful, {batch_failed} failed")
-                
-                # Rate limiting between batches
-                await asyncio.sleep(2)
+            # Set-based pipeline: stream holdings, compute all snapshots in one pass,
+            # then bulk-write history rows in large chunks
+            total_successful, total_failed, total_portfolio_value, all_errors = \
+                await self._run_bulk_eod_pipeline(aggregation_users)
             
             duration = (datetime.now() - start_time).total_seconds()
             
@@ -226,62 +208,350 @@ class DailyPortfolioSnapshotService:
             supabase = self._get_supabase_client()
             
             # Get all users with active aggregation connections (Plaid OR SnapTrade)
-            result = supabase.table('user_investment_accounts')\
-                .select('user_id')\
-                .in_('provider', ['plaid', 'snaptrade'])\
-                .eq('is_active', True)\
-                .execute()
+            # Paged so PostgREST's default row cap doesn't truncate large user bases
+            user_ids = set()
+            offset = 0
+            while True:
+                result = supabase.table('user_investment_accounts')\
+                    .select('user_id')\
+                    .in_('provider', ['plaid', 'snaptrade'])\
+                    .eq('is_active', True)\
+                    .order('user_id')\
+                    .range(offset, offset + self.holdings_page_size - 1)\
+                    .execute()
+                
+                rows = result.data or []
+                if not rows:
+                    break
+                user_ids.update(row['user_id'] for row in rows)
+                offset += len(rows)
             
-            if result.data:
-                user_ids = list(set(row['user_id'] for row in result.data))
+            if user_ids:
                 logger.info(f"📊 Found {len(user_ids)} aggregation users (Plaid + SnapTrade)")
-                return user_ids
-            
-            return []
+            return list(user_ids)
             
         except Exception as e:
             logger.error(f"Error getting aggregation users: {e}")
             return []
     
-    async def _process_eod_batch(self, user_batch: List[str]) -> List[Dict[str, Any]]:
+    async def _run_bulk_eod_pipeline(self, user_ids: List[str]) -> Tuple[int, int, float, List[str]]:
         """
-        Process EOD snapshots for a batch of users with controlled concurrency.
+        Compute and store EOD snapshots for all users in a single set-based pass.
+        
+        1. Stream every aggregated holding row in keyset-paginated pages
+        2. Fetch live prices once for the union of all symbols
+        3. Compute totals with vectorised per-user reductions and breakdowns in one loop
+        4. Score every user's risk against one covariance model of all held symbols
+        5. Bulk-write user_portfolio_history rows in large chunks
+        
+        Returns:
+            Tuple of (successful, failed, total_portfolio_value, errors)
         """
-        semaphore = asyncio.Semaphore(self.max_concurrent)
+        snapshot_date = datetime.now().date()
+        user_set = set(user_ids)
         
-        async def process_single_user_eod(user_id):
-            async with semaphore:
-                return await self._capture_user_eod_snapshot(user_id)
+        holdings: List[Dict[str, Any]] = []
+        async for page in self._stream_aggregated_holdings():
+            holdings.extend(row for row in page if row.get('user_id') in user_set)
         
-        # Execute all users in batch concurrently
-        tasks = [process_single_user_eod(user_id) for user_id in user_batch]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"📥 Streamed {len(holdings)} aggregated holdings for {len(user_set)} users")
         
-        # Convert exceptions to error results
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                processed_results.append({
-                    'success': False,
-                    'user_id': user_batch[i],
-                    'error': str(result)
-                })
-            else:
-                processed_results.append(result)
+        from utils.portfolio.live_enrichment_service import get_enrichment_service
+        enrichment_service = get_enrichment_service()
+        live_prices = enrichment_service.fetch_live_prices_batched(holdings, chunk_size=self.price_chunk_size)
+        unique_symbols = len({h.get('symbol') for h in holdings if h.get('symbol')})
+        self.total_api_calls += (unique_symbols + self.price_chunk_size - 1) // self.price_chunk_size
+        
+        risk_model = await self._load_risk_model(holdings, snapshot_date)
+        snapshots = self._build_eod_snapshots(holdings, live_prices, snapshot_date, risk_model=risk_model)
+        
+        errors = []
+        users_without_value = user_set - {snapshot.user_id for snapshot in snapshots}
+        for user_id in users_without_value:
+            errors.append(f"{user_id}: No portfolio value available")
+        
+        stored_users, write_errors = await self._bulk_store_eod_snapshots(snapshots)
+        errors.extend(write_errors)
+        
+        total_portfolio_value = sum(s.total_value for s in snapshots if s.user_id in stored_users)
+        successful = len(stored_users)
+        failed = len(user_set) - successful
+        
+        return successful, failed, total_portfolio_value, errors
+    
+    async def _stream_aggregated_holdings(self):
+        """
+        Yield pages of user_aggregated_holdings rows using keyset pagination on id.
+        
+        Keyset pagination keeps each page an indexed range scan, so total cost
+        stays linear in table size instead of growing with OFFSET. Paging stops
+        on an empty page rather than a short one, since the server may cap
+        page size below holdings_page_size.
+        """
+        supabase = self._get_supabase_client()
+        last_id = None
+        
+        while True:
+            query = supabase.table('user_aggregated_holdings')\
+                .select('id, user_id, symbol, security_name, security_type, total_quantity, '
+                        'total_market_value, total_cost_basis, account_contributions, institution_breakdown')\
+                .order('id')\
+                .limit(self.holdings_page_size)
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            
+            result = query.execute()
+            page = result.data or []
+            if not page:
+                return
+            
+            yield page
+            last_id = page[-1]['id']
+    
+    async def _load_risk_model(self, holdings: List[Dict[str, Any]], snapshot_date: date):
+        """
+        Load the covariance model for the symbols held across these holdings.
+        
+        The universe is capped at risk_model_max_symbols by total stored value;
+        users holding symbols outside it get metrics scaled from their covered
+        positions (see PortfolioRiskEngine). The model stays in the engine's
+        cache, so same-day per-request analytics slice it instead of reloading.
+        """
+        symbol_values: Dict[str, float] = {}
+        for holding in holdings:
+            symbol = holding.get('symbol')
+            if symbol and holding.get('security_type') != 'cash':
+                symbol_values[symbol] = symbol_values.get(symbol, 0.0) + abs(float(holding.get('total_market_value') or 0))
+        if not symbol_values:
+            return None
+        
+        universe = sorted(symbol_values, key=symbol_values.get, reverse=True)[:self.risk_model_max_symbols]
+        from utils.portfolio.risk_engine import get_portfolio_risk_engine
+        return await asyncio.to_thread(get_portfolio_risk_engine().get_model, universe, snapshot_date)
+    
+    def _build_eod_snapshots(
+        self,
+        holdings: List[Dict[str, Any]],
+        live_prices: Dict[str, float],
+        snapshot_date: date,
+        risk_model=None
+    ) -> List[EODSnapshot]:
+        """
+        Build EOD snapshots for every user from a flat list of holding rows.
+        
+        Totals are computed as vectorised per-user reductions (np.bincount over
+        a user index); account/institution breakdowns are accumulated in the
+        same single pass over the rows. With a risk_model, every user's
+        volatility/beta/diversification is scored in one (user x symbol) pass.
+        """
+        if not holdings:
+            return []
+        
+        user_index: Dict[str, int] = {}
+        user_ids: List[str] = []
+        idx = np.empty(len(holdings), dtype=np.int64)
+        quantity = np.empty(len(holdings), dtype=np.float64)
+        stored_value = np.empty(len(holdings), dtype=np.float64)
+        cost_basis = np.empty(len(holdings), dtype=np.float64)
+        live_price = np.full(len(holdings), np.nan, dtype=np.float64)
+        
+        for i, holding in enumerate(holdings):
+            user_id = holding['user_id']
+            position = user_index.get(user_id)
+            if position is None:
+                position = user_index[user_id] = len(user_ids)
+                user_ids.append(user_id)
+            idx[i] = position
+            quantity[i] = float(holding.get('total_quantity') or 0)
+            stored_value[i] = float(holding.get('total_market_value') or 0)
+            cost_basis[i] = float(holding.get('total_cost_basis') or 0)
+            if holding.get('security_type') != 'cash':
+                price = live_prices.get(holding.get('symbol'))
+                if price is not None:
+                    live_price[i] = price
+        
+        # Cash and unpriced securities keep their stored market value
+        has_live = ~np.isnan(live_price)
+        market_value = np.where(has_live, live_price * quantity, stored_value)
+        
+        n_users = len(user_ids)
+        total_value = np.bincount(idx, weights=market_value, minlength=n_users)
+        total_cost = np.bincount(idx, weights=cost_basis, minlength=n_users)
+        securities_count = np.bincount(idx, minlength=n_users)
+        
+        account_breakdowns: List[Dict[str, float]] = [{} for _ in range(n_users)]
+        institution_breakdowns: List[Dict[str, float]] = [{} for _ in range(n_users)]
+        for i, holding in enumerate(holdings):
+            price = live_price[i] if has_live[i] else None
+            self._accumulate_breakdowns(
+                holding,
+                float(market_value[i]),
+                price,
+                account_breakdowns[idx[i]],
+                institution_breakdowns[idx[i]]
+            )
+        
+        # Look-through sector/asset-class exposure of every user's ETFs in one pass
+        from utils.portfolio.etf_lookthrough import get_etf_lookthrough_engine
+        lookthrough = get_etf_lookthrough_engine().batch_exposures(
+            (holding['user_id'], holding.get('symbol'), float(market_value[i]))
+            for i, holding in enumerate(holdings)
+            if holding.get('security_type') == 'etf'
+        )
+        
+        risk_metrics = {}
+        if risk_model is not None:
+            from utils.portfolio.risk_engine import get_portfolio_risk_engine
+            is_cash = np.asarray([h.get('security_type') == 'cash' for h in holdings], dtype=bool)
+            cash_value = np.bincount(idx[is_cash], weights=market_value[is_cash], minlength=n_users)
+            risk_metrics = get_portfolio_risk_engine().batch_metrics(
+                (
+                    (holding['user_id'], holding.get('symbol'), float(market_value[i]))
+                    for i, holding in enumerate(holdings) if not is_cash[i]
+                ),
+                cash={user_id: float(cash_value[position]) for position, user_id in enumerate(user_ids)},
+                model=risk_model
+            )
         
-        return processed_results
+        snapshots = []
+        for position, user_id in enumerate(user_ids):
+            value = float(total_value[position])
+            if value <= 0:
+                continue
+            cost = float(total_cost[position])
+            gain_loss = value - cost
+            snapshots.append(EODSnapshot(
+                user_id=user_id,
+                snapshot_date=snapshot_date,
+                total_value=value,
+                total_cost_basis=cost,
+                total_gain_loss=gain_loss,
+                total_gain_loss_percent=(gain_loss / cost * 100) if cost > 0 else 0,
+                account_breakdown=account_breakdowns[position],
+                institution_breakdown=institution_breakdowns[position],
+                securities_count=int(securities_count[position]),
+                data_quality_score=100.0,  # Full quality from live prices
+                lookthrough_exposure=lookthrough.get(user_id, {}),
+                risk_metrics=risk_metrics[user_id].to_dict() if user_id in risk_metrics else {}
+            ))
+        
+        return snapshots
+    
+    @staticmethod
+    def _accumulate_breakdowns(
+        holding: Dict[str, Any],
+        market_value: float,
+        live_price: Optional[float],
+        account_breakdown: Dict[str, float],
+        institution_breakdown: Dict[str, float]
+    ):
+        """
+        Add one holding's value to its user's account and institution breakdowns.
+        
+        Supabase returns JSONB already parsed, but older rows may hold JSON strings.
+        """
+        contributions = holding.get('account_contributions') or []
+        institutions = holding.get('institution_breakdown') or {}
+        try:
+            if isinstance(contributions, str):
+                contributions = json.loads(contributions)
+            for contrib in contributions:
+                account_id = contrib.get('account_id', 'unknown')
+                if live_price is not None and contrib.get('quantity') is not None:
+                    contrib_value = float(contrib['quantity']) * live_price
+                else:
+                    contrib_value = float(contrib.get('market_value', 0) or 0)
+                account_breakdown[account_id] = account_breakdown.get(account_id, 0) + contrib_value
+        except (TypeError, ValueError, AttributeError):
+            pass
+        
+        try:
+            if isinstance(institutions, str):
+                institutions = json.loads(institutions)
+            if not institutions:
+                raise ValueError("empty institution breakdown")
+            for institution in institutions:
+                institution_breakdown[institution] = institution_breakdown.get(institution, 0) + market_value
+        except (TypeError, ValueError, AttributeError):
+            institution_breakdown['Unknown'] = institution_breakdown.get('Unknown', 0) + market_value
     
-    async def _capture_user_eod_snapshot(self, user_id: str) -> Dict[str, Any]:
+    async def _bulk_store_eod_snapshots(self, snapshots: List[EODSnapshot]) -> Tuple[set, List[str]]:
         """
-        Capture end-of-day snapshot for a single user.
+        Write EOD snapshots to user_portfolio_history in large chunks.
         
-        Much simpler than reconstruction - just get current portfolio value
-        and store as the next point in their historical timeline.
+        The partitioned table only has a partial unique index for daily_eod rows,
+        which PostgREST cannot target with ON CONFLICT, so each chunk is written
+        as one bulk delete followed by one bulk insert.
         
-        CRITICAL: Uses live price enrichment to ensure accurate EOD values.
+        Returns:
+            Tuple of (user_ids stored successfully, error messages)
+        """
+        supabase = self._get_supabase_client()
+        stored_users = set()
+        errors = []
+        
+        for i in range(0, len(snapshots), self.write_chunk_size):
+            chunk = snapshots[i:i + self.write_chunk_size]
+            chunk_user_ids = [snapshot.user_id for snapshot in chunk]
+            
+            try:
+                for value_date in {snapshot.snapshot_date for snapshot in chunk}:
+                    supabase.table('user_portfolio_history')\
+                        .delete()\
+                        .in_('user_id', chunk_user_ids)\
+                        .eq('value_date', value_date.isoformat())\
+                        .eq('snapshot_type', 'daily_eod')\
+                        .execute()
+                
+                supabase.table('user_portfolio_history')\
+                    .insert([self._snapshot_to_row(snapshot) for snapshot in chunk])\
+                    .execute()
+                
+                stored_users.update(chunk_user_ids)
+                
+                # Keep materialized chart series current without rebuilding them
+                from utils.portfolio.equity_series_cache import get_equity_series_cache
+                get_equity_series_cache().apply_snapshots(
+                    (snapshot.user_id, snapshot.snapshot_date, snapshot.total_value, snapshot.account_breakdown)
+                    for snapshot in chunk
+                )
+                logger.debug(f"💾 Stored EOD chunk {i // self.write_chunk_size + 1}: {len(chunk)} snapshots")
+                
+            except Exception as e:
+                logger.error(f"Error storing EOD snapshot chunk starting at {i}: {e}")
+                errors.append(f"chunk {i // self.write_chunk_size + 1}: {e}")
+        
+        return stored_users, errors
+    
+    @staticmethod
+    def _snapshot_to_row(snapshot: EODSnapshot) -> Dict[str, Any]:
+        """Convert an EODSnapshot into a user_portfolio_history row."""
+        return {
+            'user_id': snapshot.user_id,
+            'value_date': snapshot.snapshot_date.isoformat(),
+            'snapshot_type': 'daily_eod',
+            'total_value': snapshot.total_value,
+            'total_cost_basis': snapshot.total_cost_basis,
+            'total_gain_loss': snapshot.total_gain_loss,
+            'total_gain_loss_percent': min(max(snapshot.total_gain_loss_percent, -999.99), 999.99),  # Cap for database
+            'account_breakdown': json.dumps(snapshot.account_breakdown),
+            'institution_breakdown': json.dumps(snapshot.institution_breakdown),
+            'lookthrough_exposure': json.dumps(snapshot.lookthrough_exposure),
+            'risk_metrics': json.dumps(snapshot.risk_metrics),
+            'data_source': 'daily_job',
+            'price_source': 'plaid_current',
+            'data_quality_score': snapshot.data_quality_score,
+            'securities_count': snapshot.securities_count
+        }
+    
+    async def capture_user_eod_snapshot(self, user_id: str) -> Dict[str, Any]:
+        """
+        Capture end-of-day snapshot for a single user (ad-hoc re-runs).
+        
+        Uses the same one-pass computation as the bulk pipeline, so holdings
+        are read once and breakdowns come from the same rows.
         """
         try:
-            # Get aggregated holdings with LIVE price enrichment
             supabase = self._get_supabase_client()
             holdings_result = supabase.table('user_aggregated_holdings')\
                 .select('*')\
@@ -295,54 +565,30 @@ class DailyPortfolioSnapshotService:
                     'error': 'No holdings found'
                 }
             
-            # Enrich with live prices using production-grade enrichment service
             from utils.portfolio.live_enrichment_service import get_enrichment_service
-            from utils.portfolio.aggregated_calculations import calculate_portfolio_value
-            
-            enrichment_service = get_enrichment_service()
-            enriched_holdings = enrichment_service.enrich_holdings(holdings_result.data, user_id)
-            
-            # Calculate portfolio value from enriched holdings
-            portfolio_value = calculate_portfolio_value(enriched_holdings, user_id)
-            current_value = portfolio_value.get('raw_value', 0)
+            live_prices = get_enrichment_service().fetch_live_prices_batched(
+                holdings_result.data, chunk_size=self.price_chunk_size
+            )
             
-            if current_value <= 0:
+            snapshot_date = datetime.now().date()
+            risk_model = await self._load_risk_model(holdings_result.data, snapshot_date)
+            snapshots = self._build_eod_snapshots(
+                holdings_result.data, live_prices, snapshot_date, risk_model=risk_model
+            )
+            if not snapshots:
                 return {
                     'success': False,
                     'user_id': user_id,
                     'error': 'No portfolio value available'
                 }
             
-            # Calculate cost basis and gain/loss from enriched holdings
-            total_cost_basis = sum(float(h.get('total_cost_basis', 0)) for h in enriched_holdings)
-            total_gain_loss = current_value - total_cost_basis
-            total_gain_loss_percent = (total_gain_loss / total_cost_basis * 100) if total_cost_basis > 0 else 0
-            
-            # Get account breakdown from aggregated holdings
-            account_breakdown, institution_breakdown = await self._get_account_breakdown(user_id)
-            
-            # Create EOD snapshot with live-enriched data
-            eod_snapshot = EODSnapshot(
-                user_id=user_id,
-                snapshot_date=datetime.now().date(),
-                total_value=current_value,
-                total_cost_basis=total_cost_basis,
-                total_gain_loss=total_gain_loss,
-                total_gain_loss_percent=total_gain_loss_percent,
-                account_breakdown=account_breakdown,
-                institution_breakdown=institution_breakdown,
-                securities_count=len(enriched_holdings),
-                data_quality_score=100.0  # Full quality from live prices
-            )
-            
-            # Store EOD snapshot (extends historical timeline)
-            await self._store_eod_snapshot(eod_snapshot)
+            await self._store_eod_snapshot(snapshots[0])
             
             return {
                 'success': True,
                 'user_id': user_id,
-                'portfolio_value': current_value,
-                'securities_count': eod_snapshot.securities_count
+                'portfolio_value': snapshots[0].total_value,
+                'securities_count': snapshots[0].securities_count
             }
             
         except Exception as e:
@@ -353,51 +599,6 @@ class DailyPortfolioSnapshotService:
                 'error': str(e)
             }
     
-    async def _get_account_breakdown(self, user_id: str) -> Tuple[Dict[str, float], Dict[str, float]]:
-        """
-        Get account and institution breakdown from aggregated holdings.
-        """
-        try:
-            supabase = self._get_supabase_client()
-            
-            # Get aggregated holdings with account contributions
-            result = supabase.table('user_aggregated_holdings')\
-                .select('symbol, total_market_value, account_contributions, institution_breakdown')\
-                .eq('user_id', user_id)\
-                .execute()
-            
-            account_breakdown = {}
-            institution_breakdown = {}
-            
-            if result.data:
-                for holding in result.data:
-                    market_value = float(holding['total_market_value'])
-                    
-                    # Parse account contributions
-                    try:
-                        contributions = json.loads(holding['account_contributions']) if holding['account_contributions'] else []
-                        for contrib in contributions:
-                            account_id = contrib.get('account_id', 'unknown')
-                            contrib_value = contrib.get('market_value', 0)
-                            account_breakdown[account_id] = account_breakdown.get(account_id, 0) + contrib_value
-                    except:
-                        pass
-                    
-                    # Parse institution breakdown
-                    try:
-                        institutions = json.loads(holding['institution_breakdown']) if holding['institution_breakdown'] else {}
-                        for institution in institutions:
-                            institution_breakdown[institution] = institution_breakdown.get(institution, 0) + market_value
-                    except:
-                        # Fallback
-                        institution_breakdown['Unknown'] = institution_breakdown.get('Unknown', 0) + market_value
-            
-            return account_breakdown, institution_breakdown
-            
-        except Exception as e:
-            logger.error(f"Error getting account breakdown for user {user_id}: {e}")
-            return {}, {}
-    
     async def _store_eod_snapshot(self, snapshot: EODSnapshot):
         """
         Store end-of-day snapshot in portfolio history table.
@@ -407,21 +608,7 @@ class DailyPortfolioSnapshotService:
         try:
             supabase = self._get_supabase_client()
             
-            snapshot_data = {
-                'user_id': snapshot.user_id,
-                'value_date': snapshot.snapshot_date.isoformat(),
-                'snapshot_type': 'daily_eod',
-                'total_value': snapshot.total_value,
-                'total_cost_basis': snapshot.total_cost_basis,
-                'total_gain_loss': snapshot.total_gain_loss,
-                'total_gain_loss_percent': min(max(snapshot.total_gain_loss_percent, -999.99), 999.99),  # Cap for database
-                'account_breakdown': json.dumps(snapshot.account_breakdown),
-                'institution_breakdown': json.dumps(snapshot.institution_breakdown),
-                'data_source': 'daily_job',
-                'price_source': 'plaid_current',
-                'data_quality_score': snapshot.data_quality_score,
-                'securities_count': snapshot.securities_count
-            }
+            snapshot_data = self._snapshot_to_row(snapshot)
             
             # PRODUCTION-GRADE: Use delete+insert instead of upsert
             # The partitioned table doesn't have a unique constraint we can use with ON CONFLICT
@@ -438,6 +625,11 @@ class DailyPortfolioSnapshotService:
                 .insert(snapshot_data)\
                 .execute()
             
+            from utils.portfolio.equity_series_cache import get_equity_series_cache
+            get_equity_series_cache().apply_snapshots(
+                [(snapshot.user_id, snapshot.snapshot_date, snapshot.total_value, snapshot.account_breakdown)]
+            )
+            
             logger.debug(f"💾 Stored EOD snapshot for user {snapshot.user_id}: ${snapshot.total_value:.2f}")
             
         except Exception as e:
@@ -524,6 +716,13 @@ class DailyPortfolioScheduler:
                 
                 logger.info(f"✅ Scheduled collection complete: {result.successful_snapshots} snapshots, "
                            f"${result.total_portfolio_value:,.2f} total value")
+                
+                # Partition upkeep: future partitions, intraday rollup, expiry
+                try:
+                    from services.partition_maintenance_service import get_partition_maintenance_service
+                    await get_partition_maintenance_service().run_maintenance()
+                except Exception as e:
+                    logger.error(f"❌ Partition maintenance failed: {e}")
         
         except Exception as e:
             logger.error(f"❌ Daily scheduler error: {e}")
@@ -214,6 +214,10 @@ class DailySnapTradeSnapshotService:
             }
             
             supabase.table('user_portfolio_history').insert(snapshot).execute()
+            
+            # Keep the materialized chart series current without rebuilding it
+            from utils.portfolio.equity_series_cache import get_equity_series_cache
+            get_equity_series_cache().apply_snapshots([(user_id, today, total_value, None)])
             logger.info(f"✅ Created snapshot for user {user_id}: ${total_value:,.2f} (P/L: ${total_gain_loss:+,.2f})")
             return True
             
@@ -350,6 +354,10 @@ class DailySnapTradeSnapshotService:
                 except Exception as e:
                     logger.error(f"Error backfilling snapshot for {snapshot['value_date']}: {e}")
             
+            if backfilled_count:
+                from utils.portfolio.equity_series_cache import get_equity_series_cache
+                get_equity_series_cache().invalidate(user_id)
+            
             logger.info(f"✅ Backfilled {backfilled_count} snapshots for user {user_id}")
             return backfilled_count
             
@@ -8,6 +8,7 @@ Key Features:
 - Global symbol deduplication across all users
 - Batch API requests for cost efficiency
 - Permanent caching (historical prices never change)
+- In-process price store so prefetched series are valued without further queries
 - Intelligent retry logic with exponential backoff
 - Comprehensive error handling and monitoring
 """
@@ -15,6 +16,8 @@ Key Features:
 import asyncio
 import logging
 import json
+import os
+import time
 import aiohttp
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, date, timedelta
@@ -76,8 +79,18 @@ class HistoricalPriceService:
         self.fmp_api_key = None  # Lazy loaded
         self.session = None  # HTTP session for connection pooling
         
+        # In-process close store: symbol -> {date: close}, with the range each symbol covers.
+        # Filled by every batch fetch so later lookups for the same range stay local.
+        # Entries expire after price_store_ttl_seconds; coverage is kept in load order.
+        self._price_store: Dict[str, Dict[date, float]] = {}
+        self._store_coverage: Dict[str, Tuple[date, date]] = {}
+        self._store_loaded_at: Dict[str, float] = {}
+        self.price_store_max_symbols = int(os.getenv('HISTORICAL_PRICE_STORE_MAX_SYMBOLS', '5000'))
+        self.price_store_ttl_seconds = float(os.getenv('HISTORICAL_PRICE_STORE_TTL_SECONDS', '1800'))
+        
         # Performance tracking
         self.api_calls_made = 0
+        self.store_hits = 0
         self.cache_hits = 0
         self.cache_misses = 0
         self.cost_estimate = 0.0
@@ -135,17 +148,30 @@ class HistoricalPriceService:
             BatchPriceStats with comprehensive operation metrics
         """
         start_time = datetime.now()
+        api_calls_before = self.api_calls_made
         
         # Global deduplication
         unique_symbols = list(set(symbols))
         logger.info(f"💰 Batch price fetch: {len(unique_symbols)} unique symbols (deduped from {len(symbols)})")
         
+        # Symbols already prefetched into the in-process store need no query at all
+        stored_results = {
+            symbol: self._stored_result(symbol, start_date, end_date)
+            for symbol in unique_symbols
+            if self.store_covers(symbol, start_date, end_date)
+        }
+        self.store_hits += len(stored_results)
+        remaining_symbols = [symbol for symbol in unique_symbols if symbol not in stored_results]
+        
         # Check cache first (historical prices are immutable)
-        cached_results, uncached_symbols = await self._check_price_cache(
-            unique_symbols, start_date, end_date
-        )
+        cached_results, uncached_symbols = ({}, [])
+        if remaining_symbols:
+            cached_results, uncached_symbols = await self._check_price_cache(
+                remaining_symbols, start_date, end_date
+            )
         
-        logger.info(f"💾 Cache performance: {len(cached_results)} cached, {len(uncached_symbols)} need fetching")
+        logger.info(f"💾 Cache performance: {len(stored_results)} in memory, {len(cached_results)} cached, "
+                   f"{len(uncached_symbols)} need fetching")
         
         # Fetch uncached data with batch optimization
         fetched_results = {}
@@ -158,11 +184,13 @@ class HistoricalPriceService:
             await self._store_price_data_permanently(fetched_results)
         
         # Combine cached and fetched results
-        all_results = {**cached_results, **fetched_results}
+        self._remember_results({**cached_results, **fetched_results}, start_date, end_date)
+        all_results = {**stored_results, **cached_results, **fetched_results}
         
         # Calculate comprehensive statistics
         stats = self._calculate_batch_stats(
-            symbols, all_results, len(cached_results), len(uncached_symbols), start_time
+            symbols, all_results, len(stored_results) + len(cached_results), len(uncached_symbols),
+            start_time, self.api_calls_made - api_calls_before
         )
         
         logger.info(f"✅ Batch complete: {stats.successful_symbols}/{stats.total_symbols} symbols, "
@@ -212,19 +240,10 @@ class HistoricalPriceService:
                             adjusted_close=float(row['adjusted_close']) if row['adjusted_close'] else None
                         ))
                     
-                    # FIX: Only mark as cache hit if we have full coverage of the date range
-                    # Check if all dates in range are present (accounting for weekends/holidays)
-                    from datetime import timedelta
-                    expected_dates = set()
-                    current_date = start_date
-                    while current_date <= end_date:
-                        # Skip weekends (Saturday=5, Sunday=6)
-                        if current_date.weekday() < 5:
-                            expected_dates.add(current_date)
-                        current_date += timedelta(days=1)
-                    
-                    # Cache is complete if we have all expected trading days
-                    if cached_dates >= expected_dates:
+                    # Only mark as cache hit if we have full coverage of the date range.
+                    # Market holidays never have rows, so a weekday-by-weekday check would
+                    # miss on every range containing one; allow holiday-sized gaps instead.
+                    if self._covers_range(sorted(cached_dates), start_date, end_date):
                         cached_results[symbol] = HistoricalPriceResult(
                             symbol=symbol,
                             start_date=start_date,
@@ -479,13 +498,109 @@ class HistoricalPriceService:
             logger.error(f"Error in batch historical price fetch: {e}")
             return {}
     
+    @staticmethod
+    def _covers_range(sorted_dates: List[date], start_date: date, end_date: date,
+                      max_gap_days: int = 4) -> bool:
+        """True if stored trading days span the range with no gap longer than a holiday weekend."""
+        if not sorted_dates:
+            return False
+        gap = timedelta(days=max_gap_days)
+        if sorted_dates[0] - start_date > gap or end_date - sorted_dates[-1] > gap:
+            return False
+        return not any(later - earlier > gap for earlier, later in zip(sorted_dates, sorted_dates[1:]))
+    
+    def _remember_results(self, results: Dict[str, HistoricalPriceResult],
+                          start_date: date, end_date: date):
+        """Add successful results to the in-process store."""
+        for symbol, result in results.items():
+            if not result.success or not result.data_points:
+                continue
+            closes = self._price_store.setdefault(symbol, {})
+            for point in result.data_points:
+                if start_date <= point.date <= end_date:
+                    closes[point.date] = point.close_price
+            
+            # Re-inserted so the coverage dict stays ordered by load time
+            covered = self._store_coverage.pop(symbol, None)
+            if covered and covered[0] <= end_date and start_date <= covered[1]:
+                self._store_coverage[symbol] = (min(covered[0], start_date), max(covered[1], end_date))
+            else:
+                self._store_coverage[symbol] = (start_date, end_date)
+            self._store_loaded_at[symbol] = time.monotonic()
+        
+        self._expire_store()
+    
+    def _expire_store(self):
+        """Evict the earliest-loaded symbols while they are past the TTL or over the size bound."""
+        expires_before = time.monotonic() - self.price_store_ttl_seconds
+        while self._store_coverage:
+            oldest = next(iter(self._store_coverage))
+            if (len(self._store_coverage) <= self.price_store_max_symbols
+                    and self._store_loaded_at.get(oldest, 0.0) >= expires_before):
+                break
+            self._store_coverage.pop(oldest)
+            self._store_loaded_at.pop(oldest, None)
+            self._price_store.pop(oldest, None)
+    
+    def store_covers(self, symbol: str, start_date: date, end_date: date) -> bool:
+        """True if the in-process store already holds this symbol for the whole range."""
+        self._expire_store()
+        covered = self._store_coverage.get(symbol)
+        return covered is not None and covered[0] <= start_date and end_date <= covered[1]
+    
+    def _stored_result(self, symbol: str, start_date: date, end_date: date) -> HistoricalPriceResult:
+        closes = self._price_store.get(symbol, {})
+        data_points = [
+            PriceDataPoint(date=day, open_price=None, high_price=None, low_price=None,
+                           close_price=close, volume=None, adjusted_close=None)
+            for day, close in sorted(closes.items())
+            if start_date <= day <= end_date
+        ]
+        return HistoricalPriceResult(
+            symbol=symbol, start_date=start_date, end_date=end_date,
+            data_points=data_points, success=True, cache_hit=True
+        )
+    
+    def clear_price_store(self):
+        """Drop the in-process store (call after a batch run to release memory)."""
+        self._price_store.clear()
+        self._store_coverage.clear()
+        self._store_loaded_at.clear()
+
+    async def get_close_series(self, symbols: List[str],
+                               start_date: date,
+                               end_date: date) -> Dict[str, Dict[date, float]]:
+        """
+        Daily closes for every symbol over the range: symbol -> {date: close}.
+
+        One batch fetch (store, then DB cache, then FMP) for the whole range
+        instead of a lookup per symbol per day. Symbols with no data are omitted.
+        """
+        if not symbols:
+            return {}
+
+        await self.fetch_historical_prices_batch(symbols, start_date, end_date)
+
+        series = {}
+        for symbol in set(symbols):
+            closes = {
+                day: close for day, close in self._price_store.get(symbol, {}).items()
+                if start_date <= day <= end_date
+            }
+            if closes:
+                series[symbol] = closes
+        return series
+
     def _calculate_batch_stats(self, original_symbols: List[str], 
                              results: Dict[str, HistoricalPriceResult],
                              cache_hits: int, cache_misses: int,
-                             start_time: datetime) -> BatchPriceStats:
+                             start_time: datetime,
+                             api_calls_made: Optional[int] = None) -> BatchPriceStats:
         """
         Calculate comprehensive statistics for batch operation.
         """
+        if api_calls_made is None:
+            api_calls_made = self.api_calls_made
         successful = len([r for r in results.values() if r.success])
         failed = len(results) - successful
         total_data_points = sum(len(r.data_points) for r in results.values())
@@ -493,7 +608,7 @@ class HistoricalPriceService:
         duration = (datetime.now() - start_time).total_seconds()
         
         # Estimate API cost (FMP pricing)
-        api_cost = self.api_calls_made * 0.0025  # ~$0.0025 per request
+        api_cost = api_calls_made * 0.0025  # ~$0.0025 per request
         
         return BatchPriceStats(
             total_symbols=len(original_symbols),
@@ -502,7 +617,7 @@ class HistoricalPriceService:
             total_data_points=total_data_points,
             cache_hits=cache_hits,
             cache_misses=cache_misses,
-            api_calls_made=self.api_calls_made,
+            api_calls_made=api_calls_made,
             api_cost_estimate=api_cost,
             processing_duration_seconds=duration
         )
@@ -511,8 +626,13 @@ class HistoricalPriceService:
         """
         Get closing price for a specific symbol on a specific date.
         
-        Optimized for reconstruction algorithm that needs individual price lookups.
+        Optimized for reconstruction algorithm that needs individual price lookups:
+        symbols prefetched into the in-process store are answered without a query.
         """
+        if self.store_covers(symbol, target_date, target_date):
+            self.store_hits += 1
+            return self._price_store[symbol].get(target_date)
+        
         try:
             supabase = self._get_supabase_client()
             
@@ -536,6 +656,53 @@ class HistoricalPriceService:
             logger.error(f"Error getting price for {symbol} on {target_date}: {e}")
             return None
     
+    async def get_stored_eod_series(self, symbol: str, 
+                                    start_date: date, 
+                                    end_date: date,
+                                    max_gap_days: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """
+        Read a stored EOD close series for one symbol if it covers the range.
+        
+        Unlike _check_price_cache this tolerates market holidays: the series is
+        used when it starts and ends within max_gap_days of the requested dates
+        and has no gap between stored days longer than that.
+        
+        Returns:
+            List of {'date': 'YYYY-MM-DD', 'close': float} oldest first, or None
+        """
+        try:
+            supabase = self._get_supabase_client()
+            result = await asyncio.to_thread(
+                lambda: supabase.table('global_historical_prices')
+                .select('price_date, close_price')
+                .eq('fmp_symbol', symbol)
+                .is_('price_timestamp', 'null')
+                .gte('price_date', start_date.isoformat())
+                .lte('price_date', end_date.isoformat())
+                .order('price_date')
+                .execute()
+            )
+        except Exception as e:
+            logger.warning(f"Error reading stored prices for {symbol}: {e}")
+            return None
+        
+        rows = [row for row in (result.data or []) if row.get('close_price') is not None]
+        if not rows:
+            return None
+        
+        dates = [datetime.fromisoformat(row['price_date']).date() for row in rows]
+        gap = timedelta(days=max_gap_days)
+        if dates[0] - start_date > gap or end_date - dates[-1] > gap:
+            return None
+        if any(later - earlier > gap for earlier, later in zip(dates, dates[1:])):
+            return None
+        
+        self.cache_hits += 1
+        return [
+            {'date': day.isoformat(), 'close': float(row['close_price'])}
+            for day, row in zip(dates, rows)
+        ]
+    
     async def close(self):
         """Clean up HTTP session."""
         if self.session and not self.session.closed:
@@ -726,6 +726,11 @@ class IntradayPortfolioTracker:
                 .upsert(close_snapshot, on_conflict='user_id,value_date,snapshot_type')\
                 .execute()
             
+            from utils.portfolio.equity_series_cache import get_equity_series_cache
+            get_equity_series_cache().apply_snapshots([(
+                user_id, datetime.now().date(), live_state.current_value, live_state.account_breakdown
+            )])
+            
             logger.debug(f"💾 Stored market close for user {user_id}: ${live_state.current_value:.2f}")
             
         except Exception as e:
@@ -788,6 +793,9 @@ class IntradayPortfolioTracker:
                                 .upsert(snapshot, on_conflict='user_id,value_date,snapshot_type')\
                                 .execute()
                             
+                            from utils.portfolio.equity_series_cache import get_equity_series_cache
+                            get_equity_series_cache().apply_snapshots([(user_id, today, portfolio_data['raw_value'], None)])
+                            
                             logger.debug(f"📸 EOD snapshot for user {user_id[:8]}: ${portfolio_data['raw_value']:.2f}")
                 
                 except Exception as e:
@@ -5,12 +5,23 @@ PRODUCTION-GRADE: Stores portfolio value snapshots every 5 minutes during market
 for accurate 1D charts showing real portfolio fluctuations, not interpolation.
 
 Purpose: Replace brokerages with professional-grade live tracking.
+
+Writes are tick-batched: callers buffer one snapshot per user with
+buffer_snapshot() and then flush_snapshots() issues a single bulk insert for
+the whole tick. Opening values are cached per user per day so each tick costs
+no extra lookups after the first.
+
+Storage layouts (INTRADAY_STORAGE_LAYOUT):
+- 'rows' (default): one user_portfolio_history row per snapshot
+- 'packed': one user_intraday_series row per user per day holding packed
+  timestamp/value arrays (migration 021), appended via a single RPC per tick
 """
 
+import os
 import logging
 import json
-from datetime import datetime, date, time, timedelta
-from typing import Dict, Any, Optional
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import pytz
 
 logger = logging.getLogger(__name__)
@@ -33,6 +44,19 @@ class IntradaySnapshotService:
         self.last_snapshot_time = {}  # Track last snapshot per user
         self.snapshot_interval = 300  # 5 minutes in seconds
         self.est = pytz.timezone('US/Eastern')
+        
+        # Tick batching: snapshots buffered in memory until flush_snapshots()
+        self._pending_snapshots: List[Dict[str, Any]] = []
+        # Opening value per (user_id, date) - resolved once per user per day
+        self._opening_value_cache: Dict[Tuple[str, date], float] = {}
+        # Previous close per (user_id, date) - chart baseline for packed layout
+        self._previous_close_cache: Dict[Tuple[str, date], float] = {}
+        self._cache_date: Optional[date] = None
+        
+        self.storage_layout = os.getenv('INTRADAY_STORAGE_LAYOUT', 'rows').lower().strip()
+        if self.storage_layout not in ('rows', 'packed'):
+            logger.warning(f"Unknown INTRADAY_STORAGE_LAYOUT '{self.storage_layout}', using 'rows'")
+            self.storage_layout = 'rows'
     
     def _get_supabase_client(self):
         """Lazy load Supabase client."""
@@ -89,7 +113,6 @@ class IntradaySnapshotService:
             return True
         
         # FIX: Use timezone-aware datetime.now() to match last_time
-        from datetime import timezone
         now = datetime.now(timezone.utc)
         if last_time.tzinfo is None:
             # If last_time is naive, assume it's UTC
@@ -104,6 +127,10 @@ class IntradaySnapshotService:
         """
         Create an intraday portfolio snapshot.
         
+        Single-user convenience wrapper: buffers the snapshot and flushes
+        immediately. Periodic jobs covering many users should call
+        buffer_snapshot() for each user and flush_snapshots() once per tick.
+        
         Args:
             user_id: User ID
             portfolio_value: Current portfolio value
@@ -113,15 +140,33 @@ class IntradaySnapshotService:
         Returns:
             True if snapshot created successfully, False otherwise
         """
+        if not await self.buffer_snapshot(user_id, portfolio_value, opening_value, metadata):
+            return False
+        return await self.flush_snapshots() > 0
+    
+    async def buffer_snapshot(self, user_id: str, portfolio_value: float,
+                              opening_value: Optional[float] = None,
+                              metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Buffer an intraday snapshot for the current tick without writing it.
+        
+        Args:
+            user_id: User ID
+            portfolio_value: Current portfolio value
+            opening_value: Today's opening value (optional, cached per day otherwise)
+            metadata: Additional metadata (optional)
+            
+        Returns:
+            True if the snapshot was buffered, False if skipped or failed
+        """
         try:
             if not self.should_create_snapshot(user_id):
                 return False
             
-            supabase = self._get_supabase_client()
             now = datetime.now(self.est)
             today = now.date()
             
-            # Get today's opening value if not provided
+            # Get today's opening value if not provided (cached after first lookup)
             if opening_value is None:
                 opening_value = await self._get_opening_value(user_id, today)
             
@@ -149,25 +194,144 @@ class IntradaySnapshotService:
                 snapshot['account_breakdown'] = metadata.get('account_breakdown', {})
                 snapshot['securities_count'] = metadata.get('securities_count', 0)
             
-            # Insert snapshot (no upsert - we want multiple snapshots per day)
-            supabase.table('user_portfolio_history')\
-                .insert(snapshot)\
-                .execute()
+            self._pending_snapshots.append(snapshot)
             
-            # Update last snapshot time
+            # Mark the slot as taken so the same tick can't buffer this user twice
             self.last_snapshot_time[user_id] = now
-            
-            logger.info(f"📸 Intraday snapshot created for user {user_id}: ${portfolio_value:,.2f} (change: ${intraday_change:+,.2f})")
             return True
             
         except Exception as e:
-            logger.error(f"Error creating intraday snapshot for user {user_id}: {e}")
+            logger.error(f"Error buffering intraday snapshot for user {user_id}: {e}")
             return False
     
+    async def flush_snapshots(self) -> int:
+        """
+        Write all buffered snapshots for this tick in one bulk operation.
+        
+        Returns:
+            Number of snapshots written
+        """
+        if not self._pending_snapshots:
+            return 0
+        
+        pending, self._pending_snapshots = self._pending_snapshots, []
+        
+        try:
+            supabase = self._get_supabase_client()
+            
+            if self.storage_layout == 'packed':
+                # One RPC appends every user's point to their packed day row
+                supabase.rpc('append_intraday_points', {
+                    'points': [self._to_packed_point(snapshot) for snapshot in pending]
+                }).execute()
+            else:
+                # Insert snapshots (no upsert - we want multiple snapshots per day)
+                supabase.table('user_portfolio_history')\
+                    .insert(pending)\
+                    .execute()
+            
+            # The day's first written snapshot becomes the opening value for later ones;
+            # cached only now so a failed write never pins an opening value that isn't stored
+            for snapshot in pending:
+                key = (snapshot['user_id'], date.fromisoformat(snapshot['value_date']))
+                self._opening_value_cache.setdefault(key, snapshot['total_value'])
+            
+            logger.info(f"📸 Flushed {len(pending)} intraday snapshots ({self.storage_layout} layout)")
+            return len(pending)
+            
+        except Exception as e:
+            logger.error(f"Error flushing {len(pending)} intraday snapshots: {e}")
+            # Release the interval slot so these users are retried next tick
+            for snapshot in pending:
+                self.last_snapshot_time.pop(snapshot['user_id'], None)
+            return 0
+    
+    def _to_packed_point(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a buffered snapshot into an append_intraday_points payload entry."""
+        created_at = datetime.fromisoformat(snapshot['created_at'])
+        key = (snapshot['user_id'], date.fromisoformat(snapshot['value_date']))
+        return {
+            'user_id': snapshot['user_id'],
+            'value_date': snapshot['value_date'],
+            'ts': int(created_at.timestamp()),
+            'value': snapshot['total_value'],
+            'opening_value': snapshot['opening_value'],
+            'previous_close': self._previous_close_cache.get(key)
+        }
+    
+    async def prefetch_opening_values(self, user_ids: Iterable[str], today: Optional[date] = None):
+        """
+        Warm the previous-close cache for many users with one query per chunk.
+        
+        Uses each user's most recent daily_eod/reconstructed close within the
+        last week; it serves as the opening value until the user's first
+        snapshot of the day is buffered. Users already cached are skipped.
+        
+        Args:
+            user_ids: Users that will be snapshotted this tick
+            today: Trading date (default: today in US/Eastern)
+        """
+        if today is None:
+            today = datetime.now(self.est).date()
+        self._roll_day_caches(today)
+        
+        missing = [
+            uid for uid in user_ids
+            if (uid, today) not in self._opening_value_cache and (uid, today) not in self._previous_close_cache
+        ]
+        if not missing:
+            return
+        
+        try:
+            supabase = self._get_supabase_client()
+            yesterday = today - timedelta(days=1)
+            
+            for i in range(0, len(missing), 200):
+                chunk = missing[i:i + 200]
+                # 200 users x a week of daily rows can pass PostgREST's 1000-row cap; page through it
+                offset = 0
+                page_size = 1000
+                while True:
+                    result = supabase.table('user_portfolio_history')\
+                        .select('user_id, value_date, total_value, closing_value')\
+                        .in_('user_id', chunk)\
+                        .gte('value_date', (today - timedelta(days=7)).isoformat())\
+                        .lte('value_date', yesterday.isoformat())\
+                        .in_('snapshot_type', ['daily_eod', 'reconstructed'])\
+                        .order('value_date', desc=True)\
+                        .order('user_id', desc=False)\
+                        .range(offset, offset + page_size - 1)\
+                        .execute()
+                    rows = result.data or []
+                    
+                    for row in rows:
+                        key = (row['user_id'], today)
+                        if key not in self._previous_close_cache:
+                            self._previous_close_cache[key] = float(row.get('closing_value') or row['total_value'])
+                    
+                    if len(rows) < page_size:
+                        break
+                    offset += len(rows)
+            
+            logger.debug(f"Prefetched opening values for {len(missing)} users")
+            
+        except Exception as e:
+            logger.error(f"Error prefetching opening values: {e}")
+    
+    def _roll_day_caches(self, today: date):
+        """Drop previous days' cache entries so the caches stay bounded to one day."""
+        if self._cache_date != today:
+            self._opening_value_cache.clear()
+            self._previous_close_cache.clear()
+            self._cache_date = today
+    
     async def _get_opening_value(self, user_id: str, today: date) -> float:
         """
         Get today's opening value (first intraday snapshot or yesterday's close).
         
+        Cached per user per day: after the first snapshot (or a prefetched
+        previous close) no further queries are made for that day.
+        
         Args:
             user_id: User ID
             today: Today's date
@@ -175,21 +339,46 @@ class IntradaySnapshotService:
         Returns:
             Opening value for today
         """
+        self._roll_day_caches(today)
+        key = (user_id, today)
+        cached = self._opening_value_cache.get(key)
+        if cached is None:
+            cached = self._previous_close_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        return await self._fetch_opening_value(user_id, today)
+    
+    async def _fetch_opening_value(self, user_id: str, today: date) -> float:
+        """
+        Query today's opening value (first intraday snapshot or yesterday's close).
+        
+        Populates the opening value or previous close cache with the result.
+        """
         try:
             supabase = self._get_supabase_client()
             
             # Try to get today's first intraday snapshot
-            today_snapshots = supabase.table('user_portfolio_history')\
-                .select('total_value')\
-                .eq('user_id', user_id)\
-                .eq('value_date', today.isoformat())\
-                .eq('snapshot_type', 'intraday')\
-                .order('created_at', desc=False)\
-                .limit(1)\
-                .execute()
+            opening_value = None
+            if self.storage_layout == 'packed':
+                series = await self.get_intraday_series(user_id, today)
+                if series and series.get('equity_values'):
+                    opening_value = float(series.get('opening_value') or series['equity_values'][0])
+            else:
+                today_snapshots = supabase.table('user_portfolio_history')\
+                    .select('total_value')\
+                    .eq('user_id', user_id)\
+                    .eq('value_date', today.isoformat())\
+                    .eq('snapshot_type', 'intraday')\
+                    .order('created_at', desc=False)\
+                    .limit(1)\
+                    .execute()
+                if today_snapshots.data:
+                    opening_value = float(today_snapshots.data[0]['total_value'])
             
-            if today_snapshots.data:
-                return float(today_snapshots.data[0]['total_value'])
+            if opening_value is not None:
+                self._opening_value_cache[(user_id, today)] = opening_value
+                return opening_value
             
             # Fall back to yesterday's close
             yesterday = today - timedelta(days=1)
@@ -203,7 +392,9 @@ class IntradaySnapshotService:
                 .execute()
             
             if yesterday_snapshot.data:
-                return float(yesterday_snapshot.data[0].get('closing_value') or yesterday_snapshot.data[0]['total_value'])
+                close = float(yesterday_snapshot.data[0].get('closing_value') or yesterday_snapshot.data[0]['total_value'])
+                self._previous_close_cache[(user_id, today)] = close
+                return close
             
             return 0.0
             
@@ -215,6 +406,9 @@ class IntradaySnapshotService:
         """
         Retrieve all intraday snapshots for a specific date.
         
+        With the packed layout this is a single-row fetch that is unpacked into
+        the same shape the row layout returns.
+        
         Args:
             user_id: User ID
             target_date: Date to get snapshots for (default: today)
@@ -226,6 +420,10 @@ class IntradaySnapshotService:
             if target_date is None:
                 target_date = datetime.now(self.est).date()
             
+            if self.storage_layout == 'packed':
+                series = await self.get_intraday_series(user_id, target_date)
+                return self._unpack_series(series) if series else []
+            
             supabase = self._get_supabase_client()
             
             result = supabase.table('user_portfolio_history')\
@@ -242,24 +440,125 @@ class IntradaySnapshotService:
             logger.error(f"Error retrieving intraday snapshots: {e}")
             return []
     
+    async def get_intraday_series(self, user_id: str, target_date: date) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the packed intraday series row for a user and date.
+        
+        Returns:
+            Dict with 'timestamps', 'equity_values', 'opening_value' and
+            'previous_close', or None if the row does not exist
+        """
+        try:
+            supabase = self._get_supabase_client()
+            result = supabase.table('user_intraday_series')\
+                .select('timestamps, equity_values, opening_value, previous_close')\
+                .eq('user_id', user_id)\
+                .eq('value_date', target_date.isoformat())\
+                .limit(1)\
+                .execute()
+            
+            return result.data[0] if result.data else None
+            
+        except Exception as e:
+            logger.error(f"Error retrieving intraday series: {e}")
+            return None
+    
+    async def get_daily_last_values(self, user_id: str, start_date: date, end_date: date) -> Dict[date, Dict[str, Any]]:
+        """
+        Last intraday value of each day in [start_date, end_date], read from
+        whichever table the storage layout writes.
+        
+        Used to fill days the daily EOD job missed. Query errors propagate to
+        the caller.
+        
+        Returns:
+            value_date -> {'total_value', 'total_gain_loss', 'total_gain_loss_percent',
+            'created_at', 'account_breakdown'} for days with a positive last value
+        """
+        supabase = self._get_supabase_client()
+        last_per_day: Dict[date, Dict[str, Any]] = {}
+        offset = 0
+        page_size = 1000
+        
+        while True:
+            if self.storage_layout == 'packed':
+                result = supabase.table('user_intraday_series')\
+                    .select('value_date, timestamps, equity_values, opening_value, previous_close')\
+                    .eq('user_id', user_id)\
+                    .gte('value_date', start_date.isoformat())\
+                    .lte('value_date', end_date.isoformat())\
+                    .order('value_date', desc=False)\
+                    .range(offset, offset + page_size - 1)\
+                    .execute()
+            else:
+                # A few days of intraday snapshots easily exceed PostgREST's 1000-row cap; page through them
+                result = supabase.table('user_portfolio_history')\
+                    .select('value_date, total_value, total_gain_loss, total_gain_loss_percent, '
+                            'account_breakdown, created_at')\
+                    .eq('user_id', user_id)\
+                    .eq('snapshot_type', 'intraday')\
+                    .gte('value_date', start_date.isoformat())\
+                    .lte('value_date', end_date.isoformat())\
+                    .order('created_at', desc=False)\
+                    .range(offset, offset + page_size - 1)\
+                    .execute()
+            rows = result.data or []
+            
+            for row in rows:
+                if self.storage_layout == 'packed':
+                    points = self._unpack_series(row)
+                    snapshot = points[-1] if points else None
+                else:
+                    snapshot = row
+                if snapshot and float(snapshot.get('total_value') or 0) > 0:
+                    last_per_day[date.fromisoformat(row['value_date'])] = {
+                        'total_value': float(snapshot['total_value']),
+                        'total_gain_loss': snapshot.get('total_gain_loss', 0),
+                        'total_gain_loss_percent': snapshot.get('total_gain_loss_percent', 0),
+                        'created_at': snapshot.get('created_at'),
+                        'account_breakdown': row.get('account_breakdown'),
+                    }
+            
+            if len(rows) < page_size:
+                break
+            offset += len(rows)
+        
+        return last_per_day
+    
+    @staticmethod
+    def _unpack_series(series: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Expand a packed series row into per-snapshot dicts."""
+        opening_value = float(series.get('opening_value') or 0)
+        snapshots = []
+        for ts, value in zip(series.get('timestamps') or [], series.get('equity_values') or []):
+            value = float(value)
+            change = value - opening_value if opening_value else 0
+            snapshots.append({
+                'created_at': datetime.fromtimestamp(int(ts), tz=timezone.utc).isoformat(),
+                'total_value': value,
+                'total_gain_loss': change,
+                'total_gain_loss_percent': (change / opening_value * 100) if opening_value > 0 else 0,
+                'opening_value': opening_value,
+                'previous_close': series.get('previous_close')
+            })
+        return snapshots
+    
     async def cleanup_old_intraday_snapshots(self, days_to_keep: int = 7):
         """
-        Delete intraday snapshots older than specified days to save storage.
+        Compact intraday snapshots older than specified days to save storage.
+        
+        Old days are rolled up into daily_eod OHLC rows and the intraday rows
+        are deleted server-side in one statement (see PartitionMaintenanceService).
         
         Args:
             days_to_keep: Number of days of intraday data to retain
         """
         try:
-            supabase = self._get_supabase_client()
-            cutoff_date = (datetime.now(self.est).date() - timedelta(days=days_to_keep)).isoformat()
-            
-            supabase.table('user_portfolio_history')\
-                .delete()\
-                .eq('snapshot_type', 'intraday')\
-                .lt('value_date', cutoff_date)\
-                .execute()
+            from services.partition_maintenance_service import get_partition_maintenance_service
             
-            logger.info(f"🧹 Cleaned up intraday snapshots older than {days_to_keep} days")
+            result = await get_partition_maintenance_service().compact_intraday(days_to_keep)
+            logger.info(f"🧹 Compacted intraday snapshots older than {days_to_keep} days: "
+                       f"{result['days_rolled_up']} days rolled up, {result['intraday_rows_deleted']} rows deleted")
             
         except Exception as e:
             logger.error(f"Error cleaning up old intraday snapshots: {e}")
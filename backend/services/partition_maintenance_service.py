@@ -0,0 +1,222 @@
+"""
+Partition Maintenance Service
+
+Daily upkeep for the partitioned history tables (migration 026):
+
+1. Pre-create monthly partitions ahead of time for user_portfolio_history,
+   global_historical_prices and user_intraday_series
+2. Roll intraday snapshots older than the retention window into the daily_eod
+   row's open/high/low/close columns and delete the intraday rows server-side
+3. Drop packed intraday partitions whose whole month is past retention
+   (one DROP TABLE per month instead of deleting rows)
+4. Optionally drop or detach history/price partitions past a retention limit
+   (disabled by default - history and EOD prices are kept forever)
+
+Table sizes are captured before and after every run and returned in the report.
+Runs after the daily EOD collection in DailyPortfolioScheduler.
+"""
+
+import os
+import asyncio
+import logging
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ('user_portfolio_history', 'global_historical_prices', 'user_intraday_series')
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+INTRADAY_RETENTION_DAYS = int(os.getenv('INTRADAY_RETENTION_DAYS', '7'))
+
+
+def _months_env(name: str) -> Optional[int]:
+    value = os.getenv(name, '').strip()
+    return int(value) if value else None
+
+
+def _month_start(day: date, months_back: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+@dataclass
+class MaintenanceReport:
+    """Outcome of one maintenance run."""
+    partitions_created: List[str] = field(default_factory=list)
+    days_rolled_up: int = 0
+    intraday_rows_deleted: int = 0
+    partitions_removed: List[str] = field(default_factory=list)
+    size_before: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    size_after: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    duration_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def bytes_reclaimed(self) -> int:
+        before = sum(stats.get('total_bytes', 0) for stats in self.size_before.values())
+        after = sum(stats.get('total_bytes', 0) for stats in self.size_after.values())
+        return before - after
+
+    def to_dict(self) -> Dict[str, Any]:
+        report = asdict(self)
+        report['bytes_reclaimed'] = self.bytes_reclaimed
+        return report
+
+
+class PartitionMaintenanceService:
+    """Creates, compacts and expires partitions of the history tables."""
+
+    def __init__(
+        self,
+        months_ahead: int = PARTITION_MONTHS_AHEAD,
+        intraday_retention_days: int = INTRADAY_RETENTION_DAYS,
+        history_retention_months: Optional[int] = None,
+        price_retention_months: Optional[int] = None,
+        detach_expired: Optional[bool] = None
+    ):
+        """Initialize the service (retention limits default to the environment)."""
+        self.supabase = None  # Lazy loaded
+        self.months_ahead = months_ahead
+        self.intraday_retention_days = intraday_retention_days
+        self.history_retention_months = (
+            history_retention_months if history_retention_months is not None
+            else _months_env('HISTORY_RETENTION_MONTHS')
+        )
+        self.price_retention_months = (
+            price_retention_months if price_retention_months is not None
+            else _months_env('PRICE_RETENTION_MONTHS')
+        )
+        # Expired history is detached (kept as a standalone table for archiving) unless told to drop
+        self.detach_expired = (
+            detach_expired if detach_expired is not None
+            else os.getenv('EXPIRED_PARTITION_ACTION', 'detach').lower().strip() != 'drop'
+        )
+
+    def _get_supabase_client(self):
+        """Lazy load Supabase client."""
+        if self.supabase is None:
+            from utils.supabase.db_client import get_supabase_client
+            self.supabase = get_supabase_client()
+        return self.supabase
+
+    async def _rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        supabase = self._get_supabase_client()
+        result = await asyncio.to_thread(lambda: supabase.rpc(name, params or {}).execute())
+        return result.data or []
+
+    @staticmethod
+    def _names(rows: List[Any]) -> List[str]:
+        """SETOF TEXT results come back as bare strings or single-key objects."""
+        return [row if isinstance(row, str) else next(iter(row.values())) for row in rows]
+
+    async def table_stats(self) -> Dict[str, Dict[str, int]]:
+        """table -> {partitions, total_bytes, estimated_rows}."""
+        rows = await self._rpc('history_table_stats')
+        return {
+            row['table_name']: {
+                'partitions': int(row['partitions']),
+                'total_bytes': int(row['total_bytes']),
+                'estimated_rows': int(row['estimated_rows']),
+            }
+            for row in rows
+        }
+
+    async def ensure_partitions(self) -> List[str]:
+        """Pre-create monthly partitions for every partitioned table."""
+        created = []
+        for table in PARTITIONED_TABLES:
+            created.extend(self._names(await self._rpc(
+                'ensure_monthly_partitions', {'p_table': table, 'p_months_ahead': self.months_ahead}
+            )))
+        return created
+
+    async def compact_intraday(self, days_to_keep: Optional[int] = None) -> Dict[str, int]:
+        """Roll intraday data older than days_to_keep into daily OHLC rows and delete it."""
+        keep = self.intraday_retention_days if days_to_keep is None else days_to_keep
+        rows = await self._rpc('compact_intraday_history', {'p_keep_days': keep})
+        row = rows[0] if rows else {}
+        return {
+            'days_rolled_up': int(row.get('days_rolled_up') or 0),
+            'intraday_rows_deleted': int(row.get('intraday_rows_deleted') or 0),
+        }
+
+    async def expire_partitions(self, today: Optional[date] = None, include_intraday: bool = True) -> List[str]:
+        """
+        Drop packed intraday months past retention, then apply history/price retention if set.
+
+        include_intraday=False keeps the intraday partitions, for runs where compaction
+        failed and the expired months have not been rolled up into daily rows yet.
+        """
+        today = today or date.today()
+        removed = []
+        if include_intraday:
+            removed.extend(self._names(await self._rpc('drop_expired_partitions', {
+                'p_table': 'user_intraday_series',
+                'p_before': (today - timedelta(days=self.intraday_retention_days)).isoformat(),
+                'p_detach': False,
+            })))
+
+        for table, months in (('user_portfolio_history', self.history_retention_months),
+                              ('global_historical_prices', self.price_retention_months)):
+            if months is None:
+                continue
+            removed.extend(self._names(await self._rpc('drop_expired_partitions', {
+                'p_table': table,
+                'p_before': _month_start(today, months).isoformat(),
+                'p_detach': self.detach_expired,
+            })))
+        return removed
+
+    async def run_maintenance(self) -> MaintenanceReport:
+        """
+        Run every maintenance step. A failing step is recorded and the rest still run,
+        so a compaction error never stops partitions from being created. If compaction
+        fails, expired intraday partitions are kept: dropping them would lose intraday
+        data that was never rolled up.
+        """
+        started = datetime.now()
+        report = MaintenanceReport()
+        compacted = False
+
+        steps = [
+            ('size_before', self.table_stats),
+            ('partitions_created', self.ensure_partitions),
+            ('compaction', self.compact_intraday),
+            ('partitions_removed', lambda: self.expire_partitions(include_intraday=compacted)),
+            ('size_after', self.table_stats),
+        ]
+        for name, step in steps:
+            try:
+                outcome = await step()
+            except Exception as e:
+                logger.error(f"❌ Partition maintenance step '{name}' failed: {e}")
+                report.errors.append(f"{name}: {e}")
+                continue
+            if name == 'compaction':
+                compacted = True
+                report.days_rolled_up = outcome['days_rolled_up']
+                report.intraday_rows_deleted = outcome['intraday_rows_deleted']
+            else:
+                setattr(report, name, outcome)
+
+        report.duration_seconds = (datetime.now() - started).total_seconds()
+        logger.info(
+            f"🗂️ Partition maintenance: {len(report.partitions_created)} partitions created, "
+            f"{report.days_rolled_up} intraday days rolled up, {report.intraday_rows_deleted} rows deleted, "
+            f"{len(report.partitions_removed)} partitions removed, "
+            f"{report.bytes_reclaimed / 1_048_576:.1f} MB reclaimed in {report.duration_seconds:.1f}s"
+        )
+        return report
+
+
+# Singleton instance
+_partition_maintenance_service = None
+
+
+def get_partition_maintenance_service() -> PartitionMaintenanceService:
+    """Get or create singleton instance of the partition maintenance service."""
+    global _partition_maintenance_service
+    if _partition_maintenance_service is None:
+        _partition_maintenance_service = PartitionMaintenanceService()
+    return _partition_maintenance_service
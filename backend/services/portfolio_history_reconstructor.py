@@ -19,9 +19,9 @@ Designed for production scale with comprehensive error handling.
 import asyncio
 import logging
 import json
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple
 from datetime import datetime, date, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
 
 logger = logging.getLogger(__name__)
@@ -54,6 +54,38 @@ class ReconstructionResult:
     api_cost_estimate: float
     processing_duration_seconds: float
     error: Optional[str] = None
+    price_api_calls: int = 0  # FMP calls made by this user's run (0 after a batch prefetch)
+
+@dataclass
+class UserReconstructionInputs:
+    """Holdings, transactions and symbol mapping gathered before valuation."""
+    current_holdings: List[Dict[str, Any]]
+    transactions: List[Dict[str, Any]]
+    mapping_stats: Any
+    symbol_mapping: Dict[str, str]
+    prepared_at: datetime = field(default_factory=datetime.now)
+
+@dataclass
+class PricePrefetchPlan:
+    """Outcome of the cross-user price planning stage for a batch of reconstructions."""
+    users: int
+    symbol_requests: int  # sum of each user's symbol count (what per-user fetching would request)
+    unique_symbols: int
+    start_date: date
+    end_date: date
+    fmp_calls: int
+    
+    @property
+    def fmp_calls_per_user_unplanned(self) -> float:
+        """Upper bound without prefetch: every user fetches each of its own symbols."""
+        return self.symbol_requests / self.users if self.users else 0.0
+    
+    @property
+    def fmp_calls_per_user(self) -> float:
+        return self.fmp_calls / self.users if self.users else 0.0
+
+# Prepared inputs older than this are reloaded rather than reused
+PREPARED_INPUTS_TTL = timedelta(minutes=30)
 
 class PortfolioHistoryReconstructor:
     """
@@ -70,6 +102,12 @@ class PortfolioHistoryReconstructor:
         self.plaid_provider = None  # Lazy loaded
         self.supabase = None  # Lazy loaded
         
+        # Per-user progress listeners for the running reconstruction (job queue heartbeat)
+        self._progress_callbacks: Dict[str, Callable[[float], Awaitable[None]]] = {}
+        
+        # Inputs gathered by prefetch_prices_for_users, consumed by each user's run
+        self._prepared_inputs: Dict[str, UserReconstructionInputs] = {}
+        
         # Performance tracking
         self.total_api_calls = 0
         self.total_cost_estimate = 0.0
@@ -97,7 +135,11 @@ class PortfolioHistoryReconstructor:
         self._get_services()
         return self.supabase
     
-    async def reconstruct_user_portfolio_history(self, user_id: str) -> ReconstructionResult:
+    async def reconstruct_user_portfolio_history(
+        self,
+        user_id: str,
+        progress_callback: Optional[Callable[[float], Awaitable[None]]] = None
+    ) -> ReconstructionResult:
         """
         Master reconstruction algorithm for a single user.
         
@@ -106,11 +148,14 @@ class PortfolioHistoryReconstructor:
         
         Args:
             user_id: User to reconstruct portfolio history for
+            progress_callback: Optional coroutine called with each progress update
             
         Returns:
             ReconstructionResult with complete operation details
         """
         start_time = datetime.now()
+        if progress_callback is not None:
+            self._progress_callbacks[user_id] = progress_callback
         
         try:
             # Initialize services
@@ -121,35 +166,27 @@ class PortfolioHistoryReconstructor:
             
             logger.info(f"🚀 Starting portfolio reconstruction for user {user_id}")
             
-            # Step 1: Get current holdings (end state) - 10% progress
-            current_holdings = await self._get_current_plaid_holdings(user_id)
-            await self._update_reconstruction_status(user_id, 'in_progress', 10.0)
-            logger.info(f"📊 Current holdings: {len(current_holdings)} securities")
-            
-            # Step 2: Get investment transaction history - 20% progress  
-            transactions = await self._get_plaid_transaction_history(user_id)
-            await self._update_reconstruction_status(user_id, 'in_progress', 20.0)
-            logger.info(f"📈 Transaction history: {len(transactions)} transactions over 24 months")
-            
-            # Step 3: Map securities to FMP symbols - 30% progress
-            all_securities = self._extract_unique_securities(current_holdings, transactions)
-            mapping_stats = await self.symbol_mapping_service.map_securities_for_user(all_securities)
+            # Steps 1-3: holdings, transactions and symbol mapping (reused from a batch prefetch if present)
+            inputs = self._take_prepared_inputs(user_id)
+            if inputs is None:
+                inputs = await self._load_user_inputs(user_id)
             await self._update_reconstruction_status(user_id, 'in_progress', 30.0)
-            logger.info(f"🔗 Security mapping: {mapping_stats.mapped_successfully}/{mapping_stats.total_securities} mapped")
-            
-            # Get successful mappings for price fetching
-            symbol_mapping = await self._get_successful_mappings(all_securities)
+            current_holdings = inputs.current_holdings
+            transactions = inputs.transactions
+            mapping_stats = inputs.mapping_stats
+            symbol_mapping = inputs.symbol_mapping
             
             # Step 4: Batch fetch historical prices - 60% progress
-            start_date = datetime.now().date() - timedelta(days=730)  # 2 years
-            end_date = datetime.now().date()
+            # (after prefetch_prices_for_users this is served from the in-process store)
+            start_date, end_date = self._history_range()
             
             fmp_symbols = list(symbol_mapping.values())
             price_stats = await self.historical_price_service.fetch_historical_prices_batch(
                 fmp_symbols, start_date, end_date
             )
             await self._update_reconstruction_status(user_id, 'in_progress', 60.0)
-            logger.info(f"💰 Historical prices: {price_stats.successful_symbols} symbols, ~${price_stats.api_cost_estimate:.2f} cost")
+            logger.info(f"💰 Historical prices: {price_stats.successful_symbols} symbols, "
+                       f"{price_stats.api_calls_made} FMP calls, ~${price_stats.api_cost_estimate:.2f} cost")
             
             # Step 5: Core reconstruction algorithm - 90% progress
             portfolio_timeline = await self._reconstruct_daily_timeline(
@@ -178,7 +215,8 @@ class PortfolioHistoryReconstructor:
                 transactions_processed=len(transactions),
                 api_calls_made=mapping_stats.api_calls_made + price_stats.api_calls_made,
                 api_cost_estimate=price_stats.api_cost_estimate,
-                processing_duration_seconds=duration
+                processing_duration_seconds=duration,
+                price_api_calls=price_stats.api_calls_made
             )
             
         except Exception as e:
@@ -202,6 +240,124 @@ class PortfolioHistoryReconstructor:
                 processing_duration_seconds=duration,
                 error=str(e)
             )
+        
+        finally:
+            self._progress_callbacks.pop(user_id, None)
+    
+    def _history_range(self) -> Tuple[date, date]:
+        """Reconstruction window: the last 2 years."""
+        end_date = datetime.now().date()
+        return end_date - timedelta(days=730), end_date
+    
+    async def _load_user_inputs(self, user_id: str, track_progress: bool = True) -> UserReconstructionInputs:
+        """
+        Steps 1-3 of reconstruction: current holdings, transactions and FMP symbol mapping.
+        """
+        # Step 1: Get current holdings (end state) - 10% progress
+        current_holdings = await self._get_current_plaid_holdings(user_id)
+        if track_progress:
+            await self._update_reconstruction_status(user_id, 'in_progress', 10.0)
+        logger.info(f"📊 Current holdings: {len(current_holdings)} securities")
+        
+        # Step 2: Get investment transaction history - 20% progress
+        transactions = await self._get_plaid_transaction_history(user_id)
+        if track_progress:
+            await self._update_reconstruction_status(user_id, 'in_progress', 20.0)
+        logger.info(f"📈 Transaction history: {len(transactions)} transactions over 24 months")
+        
+        # Step 3: Map securities to FMP symbols
+        all_securities = self._extract_unique_securities(current_holdings, transactions)
+        mapping_stats = await self.symbol_mapping_service.map_securities_for_user(all_securities)
+        logger.info(f"🔗 Security mapping: {mapping_stats.mapped_successfully}/{mapping_stats.total_securities} mapped")
+        
+        # Get successful mappings for price fetching
+        symbol_mapping = await self._get_successful_mappings(all_securities)
+        
+        return UserReconstructionInputs(
+            current_holdings=current_holdings,
+            transactions=transactions,
+            mapping_stats=mapping_stats,
+            symbol_mapping=symbol_mapping
+        )
+    
+    def _take_prepared_inputs(self, user_id: str) -> Optional[UserReconstructionInputs]:
+        """Pop inputs prepared by a batch prefetch, if still fresh."""
+        inputs = self._prepared_inputs.pop(user_id, None)
+        if inputs is None or datetime.now() - inputs.prepared_at > PREPARED_INPUTS_TTL:
+            return None
+        return inputs
+    
+    async def prefetch_prices_for_users(self, user_ids: List[str],
+                                        max_concurrency: int = 5) -> PricePrefetchPlan:
+        """
+        Batch planning stage for many reconstructions.
+        
+        Gathers every user's holdings, transactions and symbol mapping, then
+        fetches the union of their symbols over the shared date range once.
+        Each user's later run reuses the gathered inputs and values its
+        timeline from the price service's in-process store, so popular
+        symbols are requested from FMP once per batch instead of once per user.
+        
+        Called by the reconstruction workers for each batch of jobs they claim,
+        so the inputs are prepared on the replica that runs the jobs.
+        """
+        self._get_services()
+        
+        # Drop anything a previous batch prepared but never ran (e.g. jobs taken by another replica)
+        now = datetime.now()
+        self._prepared_inputs = {
+            user_id: inputs for user_id, inputs in self._prepared_inputs.items()
+            if now - inputs.prepared_at <= PREPARED_INPUTS_TTL
+        }
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def load(user_id: str):
+            async with semaphore:
+                try:
+                    return user_id, await self._load_user_inputs(user_id, track_progress=False)
+                except Exception as e:
+                    logger.warning(f"Skipping price planning for user {user_id}: {e}")
+                    return user_id, None
+        
+        loaded = await asyncio.gather(*(load(user_id) for user_id in dict.fromkeys(user_ids)))
+        
+        symbols_per_user = {}
+        for user_id, inputs in loaded:
+            if inputs is not None:
+                self._prepared_inputs[user_id] = inputs
+                symbols_per_user[user_id] = set(inputs.symbol_mapping.values())
+        
+        unique_symbols = set().union(*symbols_per_user.values()) if symbols_per_user else set()
+        start_date, end_date = self._history_range()
+        
+        fmp_calls = 0
+        if unique_symbols:
+            stats = await self.historical_price_service.fetch_historical_prices_batch(
+                sorted(unique_symbols), start_date, end_date
+            )
+            fmp_calls = stats.api_calls_made
+        
+        plan = PricePrefetchPlan(
+            users=len(symbols_per_user),
+            symbol_requests=sum(len(symbols) for symbols in symbols_per_user.values()),
+            unique_symbols=len(unique_symbols),
+            start_date=start_date,
+            end_date=end_date,
+            fmp_calls=fmp_calls
+        )
+        
+        logger.info(f"🧭 Price prefetch for {plan.users} users: {plan.unique_symbols} unique symbols "
+                   f"from {plan.symbol_requests} per-user requests, {plan.fmp_calls} FMP calls "
+                   f"({plan.fmp_calls_per_user:.2f}/user vs up to {plan.fmp_calls_per_user_unplanned:.2f}/user unplanned)")
+        
+        return plan
+    
+    def release_prefetched_data(self):
+        """Drop prepared inputs and prefetched prices once a batch has finished."""
+        self._prepared_inputs.clear()
+        if self.historical_price_service is not None:
+            self.historical_price_service.clear_price_store()
     
     async def _get_current_plaid_holdings(self, user_id: str) -> List[Dict[str, Any]]:
         """
@@ -766,6 +922,13 @@ class PortfolioHistoryReconstructor:
         """
         Update reconstruction status for user experience tracking.
         """
+        progress_callback = self._progress_callbacks.get(user_id)
+        if progress_callback is not None and status == 'in_progress':
+            try:
+                await progress_callback(progress)
+            except Exception as e:
+                logger.warning(f"Progress callback failed for user {user_id}: {e}")
+        
         try:
             supabase = self._get_supabase_client()
             
@@ -6,14 +6,20 @@ Handles user onboarding, background processing, and status tracking.
 
 Key Features:
 - Automatic reconstruction on new user connection
-- Background job processing for scalability  
+- Durable job queue shared across replicas (services/reconstruction_job_queue.py)
+- Jobs claimed in batches, with one shared price prefetch per claimed batch
 - Real-time status updates for user experience
-- Error handling and retry mechanisms
+- Error handling and retries with backoff
 - Cost optimization and monitoring
 """
 
 import asyncio
 import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
 from typing import Dict, List, Optional, Any
 from datetime import datetime, date, timedelta
 from dataclasses import dataclass
@@ -36,25 +42,45 @@ class PortfolioReconstructionManager:
     Production manager for portfolio history reconstruction operations.
     
     Handles the complete lifecycle:
-    1. Queue management for reconstruction requests
-    2. Background processing with controlled concurrency
+    1. Durable, deduplicated job queue shared by every API replica
+    2. Worker pool that runs up to RECONSTRUCTION_WORKERS jobs concurrently,
+       claiming up to RECONSTRUCTION_CLAIM_BATCH_SIZE jobs at a time and
+       prefetching their combined prices once per claimed batch
     3. Status tracking and user notifications
-    4. Error handling and retry logic
+    4. Retries with exponential backoff
     5. Performance monitoring and cost tracking
     """
     
-    def __init__(self):
+    def __init__(self, job_queue=None, worker_count: Optional[int] = None,
+                 poll_interval: Optional[float] = None, claim_batch_size: Optional[int] = None):
         """Initialize the reconstruction manager."""
         self.reconstructor = None  # Lazy loaded
         self.supabase = None  # Lazy loaded
-        self.processing_queue = asyncio.Queue()
+        self.job_queue = job_queue  # Lazy loaded
+        
+        # Concurrency is per replica; the queue spreads work across replicas
+        self.worker_count = worker_count or int(os.getenv('RECONSTRUCTION_WORKERS', '2'))
+        self.poll_interval = poll_interval or float(os.getenv('RECONSTRUCTION_POLL_INTERVAL_SECONDS', '5'))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.claim_batch_size = claim_batch_size or int(os.getenv('RECONSTRUCTION_CLAIM_BATCH_SIZE', '10'))
+        
+        # Jobs claimed by this replica but not started yet: [job, last lease renewal (monotonic)]
+        self._claimed_jobs = deque()
+        self._claim_lock = asyncio.Lock()
+        self._batch_jobs_outstanding = 0
         self.is_processing = False
+        self._worker_tasks: List[asyncio.Task] = []
         self.active_reconstructions = set()
         
         # Performance tracking
         self.total_reconstructions_completed = 0
+        self.total_reconstructions_failed = 0
+        self.total_retries_scheduled = 0
         self.total_api_cost = 0.0
+        self.total_price_api_calls = 0
         self.average_processing_time = 0.0
+        self.total_prefetch_api_calls = 0
+        self.last_prefetch_plan = None
     
     def _get_services(self):
         """Lazy load required services."""
@@ -71,6 +97,13 @@ class PortfolioReconstructionManager:
         self._get_services()
         return self.supabase
     
+    def _get_job_queue(self):
+        """Lazy load the durable job queue."""
+        if self.job_queue is None:
+            from services.reconstruction_job_queue import get_reconstruction_job_queue
+            self.job_queue = get_reconstruction_job_queue()
+        return self.job_queue
+    
     async def request_reconstruction_for_user(self, user_id: str, priority: str = 'normal') -> Dict[str, Any]:
         """
         Request portfolio reconstruction for a user.
@@ -86,8 +119,6 @@ class PortfolioReconstructionManager:
             Status information for user experience
         """
         try:
-            self._get_services()
-            
             # Check if reconstruction already completed
             existing_status = await self._get_reconstruction_status(user_id)
             if existing_status and existing_status.get('reconstruction_status') == 'completed':
@@ -107,24 +138,28 @@ class PortfolioReconstructionManager:
                     'progress': existing_status.get('reconstruction_progress', 0)
                 }
             
-            # Queue new reconstruction request
-            request = ReconstructionRequest(user_id=user_id, priority=priority)
-            await self.processing_queue.put(request)
+            # Enqueue (deduplicated: a repeat request only raises the open job's priority)
+            job_queue = self._get_job_queue()
+            job, created = await job_queue.enqueue(user_id, priority)
             
-            # Initialize status tracking
-            await self._initialize_reconstruction_status(user_id)
+            if created:
+                await self._initialize_reconstruction_status(user_id)
+                logger.info(f"📥 Queued reconstruction job {job.id} for user {user_id} (priority: {priority})")
+            else:
+                logger.info(f"📎 User {user_id} already has open reconstruction job {job.id}")
             
-            # Start background processor if not running
-            if not self.is_processing:
-                asyncio.create_task(self._start_background_processor())
+            # Start local workers if not running
+            self.start_workers()
             
-            logger.info(f"📥 Queued reconstruction for user {user_id} (priority: {priority})")
+            queue_stats = await job_queue.stats()
             
             return {
                 'status': 'queued',
-                'message': 'Portfolio history reconstruction queued',
+                'message': 'Portfolio history reconstruction queued' if created
+                           else 'Portfolio history reconstruction already queued',
+                'job_id': job.id,
                 'estimated_completion': datetime.now() + timedelta(minutes=3),
-                'queue_position': self.processing_queue.qsize()
+                'queue_position': queue_stats.get('queued', 0)
             }
             
         except Exception as e:
@@ -134,53 +169,146 @@ class PortfolioReconstructionManager:
                 'message': f'Failed to queue reconstruction: {str(e)}'
             }
     
-    async def _start_background_processor(self):
+    async def request_reconstruction_for_users(self, user_ids: List[str],
+                                               priority: str = 'low') -> Dict[str, Any]:
+        """
+        Queue reconstructions for many users.
+        
+        Used by backfills and the daily cron. Prices are not fetched here:
+        workers on whichever replica claims the jobs prefetch the combined
+        symbols of each claimed batch once before running it.
+        """
+        results = {}
+        for user_id in dict.fromkeys(user_ids):
+            results[user_id] = await self.request_reconstruction_for_user(user_id, priority)
+        
+        return {
+            'users_requested': len(results),
+            'users_queued': sum(1 for result in results.values() if result.get('status') == 'queued'),
+            'results': results
+        }
+    
+    def start_workers(self, count: Optional[int] = None):
         """
-        Start background processor for reconstruction queue.
+        Start the local worker pool for the reconstruction queue.
         
-        Processes reconstruction requests with controlled concurrency
-        to handle massive scale without overwhelming external APIs.
+        Each worker claims and runs one job at a time, so up to `count` users
+        reconstruct concurrently on this replica. Safe to call repeatedly.
         """
         if self.is_processing:
             return
         
         self.is_processing = True
-        logger.info("🔄 Starting portfolio reconstruction background processor")
+        count = count or self.worker_count
+        self._worker_tasks = [
+            asyncio.create_task(self._worker_loop(index))
+            for index in range(count)
+        ]
+        logger.info(f"🔄 Started {count} portfolio reconstruction workers ({self.worker_id})")
+    
+    async def stop_workers(self):
+        """Stop the local worker pool; running and claimed jobs are re-claimed after their lease expires."""
+        tasks, self._worker_tasks = self._worker_tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._claimed_jobs.clear()
+        self._batch_jobs_outstanding = 0
+        self.is_processing = False
+        logger.info("⏹️ Portfolio reconstruction workers stopped")
+    
+    async def _worker_loop(self, index: int):
+        """Take and run jobs until cancelled, polling while the queue is empty."""
+        worker_id = f"{self.worker_id}/{index}"
         
-        try:
-            # Process with controlled concurrency (2 users at a time to manage API costs)
-            semaphore = asyncio.Semaphore(2)
-            
-            while True:
-                try:
-                    # Get next request from queue (wait if empty)
-                    request = await asyncio.wait_for(self.processing_queue.get(), timeout=10.0)
-                    
-                    # Process request with concurrency control
-                    async with semaphore:
-                        await self._process_reconstruction_request(request)
-                    
-                    # Mark task done
-                    self.processing_queue.task_done()
-                    
-                except asyncio.TimeoutError:
-                    # No requests in queue for 10 seconds - can stop processor
-                    if self.processing_queue.empty():
-                        break
-                    
-                except Exception as e:
-                    logger.error(f"Error in background processor: {e}")
+        while True:
+            try:
+                job = await self._next_job()
+                if job is None:
+                    await asyncio.sleep(self.poll_interval)
                     continue
+                
+                try:
+                    await self._process_job(job)
+                finally:
+                    self._finish_batch_job()
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in reconstruction worker {worker_id}: {e}")
+                await asyncio.sleep(self.poll_interval)
+    
+    async def _next_job(self):
+        """
+        Next job for a local worker, claiming and prefetching a new batch when none are waiting.
         
-        finally:
-            self.is_processing = False
-            logger.info("⏹️ Portfolio reconstruction background processor stopped")
+        Claimed jobs are shared by this replica's workers. Their leases are renewed
+        while they wait, and a job whose lease lapsed anyway is dropped (another
+        replica may already have reclaimed it).
+        """
+        job_queue = self._get_job_queue()
+        lease_seconds = getattr(job_queue, 'lease_seconds', None)
+        
+        async with self._claim_lock:
+            if not self._claimed_jobs:
+                jobs = await job_queue.claim(self.worker_id, limit=self.claim_batch_size)
+                if not jobs:
+                    return None
+                await self._prefetch_batch(jobs)
+                claimed_at = time.monotonic()
+                self._claimed_jobs.extend([job, claimed_at] for job in jobs)
+                self._batch_jobs_outstanding += len(jobs)
+            
+            now = time.monotonic()
+            while self._claimed_jobs:
+                entry = self._claimed_jobs.popleft()
+                if lease_seconds is None or now - entry[1] < lease_seconds:
+                    break
+                logger.warning(f"Lease on reconstruction job {entry[0].id} lapsed before it started; leaving it to the queue")
+                self._finish_batch_job()
+            else:
+                return None
+            
+            if lease_seconds is not None:
+                for waiting in [entry, *self._claimed_jobs]:
+                    if now - waiting[1] > lease_seconds / 2:
+                        await job_queue.update_progress(waiting[0], waiting[0].progress)
+                        waiting[1] = now
+            return entry[0]
+    
+    async def _prefetch_batch(self, jobs: List[Any]):
+        """Load inputs and fetch the combined prices for a claimed batch once."""
+        self._get_services()
+        user_ids = [job.user_id for job in jobs if job.attempts <= job.max_attempts]
+        if not user_ids:
+            return
+        try:
+            plan = await self.reconstructor.prefetch_prices_for_users(user_ids)
+            self.last_prefetch_plan = plan
+            self.total_prefetch_api_calls += plan.fmp_calls
+        except Exception as e:
+            # Jobs still run without the prefetch; they just fetch their own prices
+            logger.error(f"Price prefetch failed for batch of {len(user_ids)} users: {e}")
+    
+    def _finish_batch_job(self):
+        """Release batch data once every claimed job on this replica has finished."""
+        self._batch_jobs_outstanding = max(self._batch_jobs_outstanding - 1, 0)
+        if self._batch_jobs_outstanding == 0 and not self._claimed_jobs and self.reconstructor is not None:
+            self.reconstructor.release_prefetched_data()
     
-    async def _process_reconstruction_request(self, request: ReconstructionRequest):
+    async def _process_job(self, job):
         """
-        Process a single reconstruction request.
+        Run one claimed job and settle it (complete, retry with backoff, or fail).
         """
-        user_id = request.user_id
+        user_id = job.user_id
+        job_queue = self._get_job_queue()
+        
+        # A lease reclaimed from a dead worker may already be past its attempts
+        if job.attempts > job.max_attempts:
+            await job_queue.fail(job, job.last_error or 'Exceeded maximum attempts')
+            await self._update_reconstruction_status(user_id, 'failed', 0.0, job.last_error)
+            return
         
         try:
             # Ensure services are loaded
@@ -189,15 +317,24 @@ class PortfolioReconstructionManager:
             # Mark as active
             self.active_reconstructions.add(user_id)
             
-            logger.info(f"🚀 Processing reconstruction for user {user_id}")
+            logger.info(f"🚀 Processing reconstruction job {job.id} for user {user_id} "
+                       f"(attempt {job.attempts}/{job.max_attempts})")
+            
+            async def report_progress(progress: float):
+                await job_queue.update_progress(job, progress)
             
             # Execute reconstruction
-            result = await self.reconstructor.reconstruct_user_portfolio_history(user_id)
+            result = await self.reconstructor.reconstruct_user_portfolio_history(
+                user_id, progress_callback=report_progress
+            )
             
             if result.success:
+                await job_queue.complete(job)
+                
                 # Update tracking metrics
                 self.total_reconstructions_completed += 1
                 self.total_api_cost += result.api_cost_estimate
+                self.total_price_api_calls += result.price_api_calls
                 self.average_processing_time = (
                     (self.average_processing_time * (self.total_reconstructions_completed - 1) + 
                      result.processing_duration_seconds) / self.total_reconstructions_completed
@@ -207,19 +344,39 @@ class PortfolioReconstructionManager:
                            f"{result.total_data_points} data points, "
                            f"${result.api_cost_estimate:.2f} cost, "
                            f"{result.processing_duration_seconds:.1f}s")
+                
+                # Re-materialize the chart series from the reconstructed snapshots
+                from utils.portfolio.equity_series_cache import get_equity_series_cache
+                await get_equity_series_cache().rebuild(user_id)
             else:
                 logger.error(f"❌ Reconstruction failed for user {user_id}: {result.error}")
-                # Could implement retry logic here
+                await self._settle_failure(job, result.error or 'Unknown error')
             
         except Exception as e:
             logger.error(f"Error processing reconstruction for user {user_id}: {e}")
-            # Mark as failed
-            await self._update_reconstruction_status(user_id, 'failed', 0.0, str(e))
+            await self._settle_failure(job, str(e))
         
         finally:
             # Remove from active tracking
             self.active_reconstructions.discard(user_id)
     
+    async def _settle_failure(self, job, error: str):
+        """Re-queue a failed attempt with backoff, or mark the job failed for good."""
+        will_retry = await self._get_job_queue().fail(job, error)
+        
+        if will_retry:
+            self.total_retries_scheduled += 1
+            logger.warning(f"🔁 Reconstruction for user {job.user_id} will retry "
+                          f"(attempt {job.attempts}/{job.max_attempts} failed)")
+            await self._update_reconstruction_status(
+                job.user_id, 'pending', 0.0, error, retry_count=job.attempts
+            )
+        else:
+            self.total_reconstructions_failed += 1
+            await self._update_reconstruction_status(
+                job.user_id, 'failed', 0.0, error, retry_count=job.attempts
+            )
+    
     async def get_reconstruction_status_for_user(self, user_id: str) -> Dict[str, Any]:
         """
         Get current reconstruction status for a user.
@@ -333,7 +490,8 @@ class PortfolioReconstructionManager:
             logger.error(f"Error initializing reconstruction status for {user_id}: {e}")
     
     async def _update_reconstruction_status(self, user_id: str, status: str, 
-                                          progress: float, error: Optional[str] = None):
+                                          progress: float, error: Optional[str] = None,
+                                          retry_count: Optional[int] = None):
         """Update reconstruction status."""
         try:
             supabase = self._get_supabase_client()
@@ -348,6 +506,9 @@ class PortfolioReconstructionManager:
             if error:
                 update_data['error_message'] = error
             
+            if retry_count is not None:
+                update_data['retry_count'] = retry_count
+            
             if status == 'completed':
                 update_data['completed_at'] = datetime.now().isoformat()
             
@@ -376,13 +537,23 @@ class PortfolioReconstructionManager:
                     status = row['reconstruction_status']
                     status_counts[status] = status_counts.get(status, 0) + 1
             
+            queue_stats = await self._get_job_queue().stats()
+            
             return {
                 'total_users': len(status_result.data) if status_result.data else 0,
                 'status_breakdown': status_counts,
                 'active_reconstructions': len(self.active_reconstructions),
-                'queue_size': self.processing_queue.qsize(),
+                'queue_size': queue_stats.get('queued', 0),
+                'running_jobs': queue_stats.get('running', 0),
+                'local_workers': len(self._worker_tasks),
                 'total_completed': self.total_reconstructions_completed,
+                'total_failed': self.total_reconstructions_failed,
+                'total_retries_scheduled': self.total_retries_scheduled,
                 'total_api_cost': self.total_api_cost,
+                'fmp_calls_per_reconstruction': (
+                    (self.total_price_api_calls + self.total_prefetch_api_calls) / self.total_reconstructions_completed
+                    if self.total_reconstructions_completed else 0.0
+                ),
                 'average_processing_time_seconds': self.average_processing_time,
                 'processor_running': self.is_processing
             }
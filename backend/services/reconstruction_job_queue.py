@@ -0,0 +1,356 @@
+"""
+Reconstruction Job Queue
+
+Durable job queue for portfolio history reconstructions. Jobs live in the
+portfolio_reconstruction_jobs table (migration 025) and are leased to workers
+with FOR UPDATE SKIP LOCKED, so any number of workers on any number of API
+replicas can drain the same backlog and nothing is lost on restart.
+
+Semantics shared by both backends:
+- One open (queued/running) job per user; repeat requests only raise its priority
+- Claim order: priority ('high' < 'normal' < 'low'), then due time, then age
+- Failed attempts are re-queued with exponential backoff until max_attempts
+- Running jobs carry a lease; a job whose worker died is claimed again once it expires
+
+RECONSTRUCTION_QUEUE_BACKEND=memory selects a process-local stand-in with the
+same behaviour for tests and local development.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+MAX_ATTEMPTS = int(os.getenv('RECONSTRUCTION_MAX_ATTEMPTS', '3'))
+RETRY_BASE_SECONDS = float(os.getenv('RECONSTRUCTION_RETRY_BASE_SECONDS', '30'))
+RETRY_MAX_SECONDS = 1800.0
+LEASE_SECONDS = int(os.getenv('RECONSTRUCTION_LEASE_SECONDS', '900'))
+
+OPEN_STATUSES = ('queued', 'running')
+
+
+def priority_value(priority: str) -> int:
+    """Map an API priority name to its sort value (unknown names are 'normal')."""
+    return PRIORITIES.get(priority, PRIORITIES['normal'])
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Backoff before the next attempt after `attempts` failed ones."""
+    return min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+@dataclass
+class ReconstructionJob:
+    """One queued or running reconstruction for a user."""
+    id: str
+    user_id: str
+    priority: int = PRIORITIES['normal']
+    status: str = 'queued'
+    progress: float = 0.0
+    attempts: int = 0
+    max_attempts: int = MAX_ATTEMPTS
+    available_at: datetime = field(default_factory=_utcnow)
+    created_at: datetime = field(default_factory=_utcnow)
+    last_error: Optional[str] = None
+    locked_by: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+
+    @property
+    def priority_name(self) -> str:
+        return PRIORITY_NAMES.get(self.priority, 'normal')
+
+    @property
+    def exhausted(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'ReconstructionJob':
+        return cls(
+            id=str(row['id']),
+            user_id=str(row['user_id']),
+            priority=int(row.get('priority', PRIORITIES['normal'])),
+            status=row.get('status', 'queued'),
+            progress=float(row.get('progress') or 0.0),
+            attempts=int(row.get('attempts') or 0),
+            max_attempts=int(row.get('max_attempts') or MAX_ATTEMPTS),
+            available_at=_parse_timestamp(row.get('available_at')) or _utcnow(),
+            created_at=_parse_timestamp(row.get('created_at')) or _utcnow(),
+            last_error=row.get('last_error'),
+            locked_by=row.get('locked_by'),
+            lease_expires_at=_parse_timestamp(row.get('lease_expires_at')),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'user_id': self.user_id,
+            'priority': self.priority_name,
+            'status': self.status,
+            'progress': self.progress,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'available_at': self.available_at.isoformat(),
+            'last_error': self.last_error,
+        }
+
+
+class InMemoryReconstructionJobQueue:
+    """
+    Process-local queue with the same semantics as the Postgres backend.
+
+    Every method runs without awaiting in between reads and writes, so claims
+    are atomic with respect to other coroutines on the same event loop. Jobs
+    are handed out as copies, like rows read from the database.
+    """
+
+    def __init__(self, clock: Optional[Callable[[], datetime]] = None,
+                 lease_seconds: int = LEASE_SECONDS):
+        self._clock = clock or _utcnow
+        self.lease_seconds = lease_seconds
+        self._jobs: Dict[str, ReconstructionJob] = {}
+        self._open_by_user: Dict[str, str] = {}
+
+    async def enqueue(self, user_id: str, priority: str = 'normal',
+                      max_attempts: int = MAX_ATTEMPTS) -> Tuple[ReconstructionJob, bool]:
+        open_id = self._open_by_user.get(user_id)
+        if open_id is not None:
+            job = self._jobs[open_id]
+            job.priority = min(job.priority, priority_value(priority))
+            return replace(job), False
+
+        now = self._clock()
+        job = ReconstructionJob(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            priority=priority_value(priority),
+            max_attempts=max_attempts,
+            available_at=now,
+            created_at=now,
+        )
+        self._jobs[job.id] = job
+        self._open_by_user[user_id] = job.id
+        return replace(job), True
+
+    async def claim(self, worker_id: str, limit: int = 1) -> List[ReconstructionJob]:
+        now = self._clock()
+        due = [
+            job for job in self._jobs.values()
+            if (job.status == 'queued' and job.available_at <= now)
+            or (job.status == 'running' and job.lease_expires_at is not None and job.lease_expires_at < now)
+        ]
+        due.sort(key=lambda job: (job.priority, job.available_at, job.created_at))
+
+        claimed = due[:limit]
+        for job in claimed:
+            job.status = 'running'
+            job.attempts += 1
+            job.locked_by = worker_id
+            job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+        return [replace(job) for job in claimed]
+
+    async def update_progress(self, job: ReconstructionJob, progress: float) -> None:
+        stored = self._owned(job)
+        if stored is not None:
+            stored.progress = progress
+            stored.lease_expires_at = self._clock() + timedelta(seconds=self.lease_seconds)
+            job.progress = progress
+
+    async def complete(self, job: ReconstructionJob) -> None:
+        stored = self._owned(job)
+        if stored is not None:
+            stored.status = job.status = 'completed'
+            stored.progress = job.progress = 100.0
+            self._release(stored)
+
+    async def fail(self, job: ReconstructionJob, error: str) -> bool:
+        """Record a failed attempt; returns True if the job will be retried."""
+        stored = self._owned(job)
+        if stored is None:
+            return False
+
+        stored.last_error = error
+        if stored.exhausted:
+            stored.status = 'failed'
+            self._release(stored)
+            job.status = 'failed'
+            return False
+
+        stored.status = job.status = 'queued'
+        stored.available_at = self._clock() + timedelta(seconds=retry_delay_seconds(stored.attempts))
+        stored.locked_by = None
+        stored.lease_expires_at = None
+        return True
+
+    async def get_open_job(self, user_id: str) -> Optional[ReconstructionJob]:
+        open_id = self._open_by_user.get(user_id)
+        return replace(self._jobs[open_id]) if open_id else None
+
+    async def stats(self) -> Dict[str, int]:
+        counts = Counter(job.status for job in self._jobs.values())
+        return {status: counts.get(status, 0) for status in OPEN_STATUSES}
+
+    def _owned(self, job: ReconstructionJob) -> Optional[ReconstructionJob]:
+        # A job whose lease was reclaimed by another worker is no longer ours to update
+        stored = self._jobs.get(job.id)
+        if stored is None or stored.status != 'running' or stored.locked_by != job.locked_by:
+            return None
+        return stored
+
+    def _release(self, job: ReconstructionJob) -> None:
+        job.locked_by = None
+        job.lease_expires_at = None
+        self._open_by_user.pop(job.user_id, None)
+
+
+class PostgresReconstructionJobQueue:
+    """Queue backed by portfolio_reconstruction_jobs and its claim/enqueue RPCs."""
+
+    TABLE = 'portfolio_reconstruction_jobs'
+
+    def __init__(self, supabase=None, lease_seconds: int = LEASE_SECONDS):
+        self._supabase = supabase
+        self.lease_seconds = lease_seconds
+
+    def _get_supabase_client(self):
+        if self._supabase is None:
+            from utils.supabase.db_client import get_supabase_client
+            self._supabase = get_supabase_client()
+        return self._supabase
+
+    async def enqueue(self, user_id: str, priority: str = 'normal',
+                      max_attempts: int = MAX_ATTEMPTS) -> Tuple[ReconstructionJob, bool]:
+        def _enqueue():
+            return self._get_supabase_client().rpc('enqueue_reconstruction_job', {
+                'p_user_id': user_id,
+                'p_priority': priority_value(priority),
+                'p_max_attempts': max_attempts,
+            }).execute()
+
+        result = await asyncio.to_thread(_enqueue)
+        row = result.data[0]
+        return ReconstructionJob.from_row(row['job']), bool(row['created'])
+
+    async def claim(self, worker_id: str, limit: int = 1) -> List[ReconstructionJob]:
+        def _claim():
+            return self._get_supabase_client().rpc('claim_reconstruction_jobs', {
+                'p_worker_id': worker_id,
+                'p_limit': limit,
+                'p_lease_seconds': self.lease_seconds,
+            }).execute()
+
+        result = await asyncio.to_thread(_claim)
+        return [ReconstructionJob.from_row(row) for row in result.data or []]
+
+    async def update_progress(self, job: ReconstructionJob, progress: float) -> None:
+        job.progress = progress
+        # Progress doubles as the lease heartbeat
+        await self._update_owned(job, {
+            'progress': progress,
+            'lease_expires_at': (_utcnow() + timedelta(seconds=self.lease_seconds)).isoformat(),
+        })
+
+    async def complete(self, job: ReconstructionJob) -> None:
+        job.status, job.progress = 'completed', 100.0
+        await self._update_owned(job, {
+            'status': 'completed',
+            'progress': 100.0,
+            'finished_at': _utcnow().isoformat(),
+            'locked_by': None,
+            'lease_expires_at': None,
+        })
+
+    async def fail(self, job: ReconstructionJob, error: str) -> bool:
+        """Record a failed attempt; returns True if the job will be retried."""
+        if job.exhausted:
+            job.status = 'failed'
+            await self._update_owned(job, {
+                'status': 'failed',
+                'last_error': error,
+                'finished_at': _utcnow().isoformat(),
+                'locked_by': None,
+                'lease_expires_at': None,
+            })
+            return False
+
+        job.status = 'queued'
+        available_at = _utcnow() + timedelta(seconds=retry_delay_seconds(job.attempts))
+        await self._update_owned(job, {
+            'status': 'queued',
+            'last_error': error,
+            'available_at': available_at.isoformat(),
+            'locked_by': None,
+            'lease_expires_at': None,
+        })
+        return True
+
+    async def get_open_job(self, user_id: str) -> Optional[ReconstructionJob]:
+        def _select():
+            return self._get_supabase_client().table(self.TABLE)\
+                .select('*')\
+                .eq('user_id', user_id)\
+                .in_('status', list(OPEN_STATUSES))\
+                .limit(1)\
+                .execute()
+
+        result = await asyncio.to_thread(_select)
+        return ReconstructionJob.from_row(result.data[0]) if result.data else None
+
+    async def stats(self) -> Dict[str, int]:
+        def _count(status: str) -> int:
+            # Exact count per status: fetching rows would stop at PostgREST's 1000-row cap
+            result = self._get_supabase_client().table(self.TABLE)\
+                .select('id', count='exact', head=True)\
+                .eq('status', status)\
+                .execute()
+            return result.count or 0
+
+        return {status: await asyncio.to_thread(_count, status) for status in OPEN_STATUSES}
+
+    async def _update_owned(self, job: ReconstructionJob, values: Dict[str, Any]) -> None:
+        values = {**values, 'updated_at': _utcnow().isoformat()}
+
+        def _update():
+            # Guarded by locked_by so a worker whose lease was reclaimed cannot clobber the new owner
+            return self._get_supabase_client().table(self.TABLE)\
+                .update(values)\
+                .eq('id', job.id)\
+                .eq('status', 'running')\
+                .eq('locked_by', job.locked_by)\
+                .execute()
+
+        await asyncio.to_thread(_update)
+
+
+_job_queue = None
+
+
+def get_reconstruction_job_queue():
+    """Get the process-wide reconstruction job queue for the configured backend."""
+    global _job_queue
+    if _job_queue is None:
+        backend = os.getenv('RECONSTRUCTION_QUEUE_BACKEND', 'postgres').lower()
+        if backend == 'memory':
+            _job_queue = InMemoryReconstructionJobQueue()
+        else:
+            _job_queue = PostgresReconstructionJobQueue()
+        logger.info(f"Reconstruction job queue backend: {backend}")
+    return _job_queue
@@ -6,8 +6,9 @@ when the brokerage doesn't provide historical data via SnapTrade's reporting API
 
 APPROACH:
 1. Get current holdings from SnapTrade
-2. Fetch historical EOD prices from FMP for each security
+2. Fetch historical EOD prices from FMP for all securities in one batch
 3. Calculate daily portfolio value by applying historical prices to current quantities
+   (vectorised over the trading calendar by the shared history engine)
 4. Store snapshots in database for charting
 
 LIMITATIONS & ASSUMPTIONS:
@@ -23,11 +24,15 @@ Many fintech platforms (Mint, Personal Capital, etc.) use similar methodology.
 import os
 import logging
 import asyncio
-from datetime import datetime, date, timedelta
+from datetime import date, timedelta
 from decimal import Decimal
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any
+
+import numpy as np
 from dotenv import load_dotenv
 
+from utils.portfolio.history_engine import constant_matrix, price_matrix, trading_days, value_history
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -214,51 +219,35 @@ class SnapTradeHistoryEstimator:
             
             logger.info(f"   Got prices for {len(historical_prices)} symbols")
             
-            # Calculate daily portfolio values
+            # Value every trading day at once: constant quantities x forward-filled closes
             logger.info(f"   Calculating daily portfolio values...")
             
-            snapshots = []
-            current_date = start_date
+            days = trading_days(start_date, end_date)
+            history = value_history(
+                days,
+                symbols,
+                constant_matrix(holdings_by_symbol, symbols, days),
+                price_matrix(historical_prices, symbols, days),
+                cash=total_cash
+            )
+            daily_values = history.total_values
+            securities_valued = history.priced_counts
             
-            while current_date <= end_date:
-                # Skip weekends
-                if current_date.weekday() >= 5:
-                    current_date += timedelta(days=1)
-                    continue
-                
-                daily_value = total_cash  # Start with cash
-                securities_valued = 0
-                
-                # Add value of each position
-                for symbol, quantity in holdings_by_symbol.items():
-                    if quantity <= 0:
-                        continue
-                    
-                    # Get price for this date
-                    price = self._get_price_for_date(
-                        historical_prices.get(symbol, {}),
-                        current_date
-                    )
-                    
-                    if price and price > 0:
-                        daily_value += quantity * price
-                        securities_valued += 1
-                
-                # Only create snapshot if we have at least some price data
-                if securities_valued > 0:
-                    snapshots.append({
-                        'user_id': user_id,
-                        'value_date': current_date.isoformat(),
-                        'total_value': daily_value,
-                        'total_cost_basis': daily_value,  # We don't know actual cost basis
-                        'total_gain_loss': 0.0,
-                        'total_gain_loss_percent': 0.0,
-                        'snapshot_type': 'reconstructed',  # Use 'reconstructed' (DB constraint)
-                        'data_source': 'snaptrade_estimated',  # But mark as estimated in data_source
-                        'securities_count': securities_valued
-                    })
-                
-                current_date += timedelta(days=1)
+            snapshots = []
+            # Only create snapshots for days with at least some price data
+            for row in np.flatnonzero(securities_valued > 0):
+                daily_value = float(daily_values[row])
+                snapshots.append({
+                    'user_id': user_id,
+                    'value_date': days[row].isoformat(),
+                    'total_value': daily_value,
+                    'total_cost_basis': daily_value,  # We don't know actual cost basis
+                    'total_gain_loss': 0.0,
+                    'total_gain_loss_percent': 0.0,
+                    'snapshot_type': 'reconstructed',  # Use 'reconstructed' (DB constraint)
+                    'data_source': 'snaptrade_estimated',  # But mark as estimated in data_source
+                    'securities_count': int(securities_valued[row])
+                })
             
             logger.info(f"   Generated {len(snapshots)} daily snapshots")
             
@@ -289,6 +278,9 @@ class SnapTradeHistoryEstimator:
                         .execute()
                 
                 logger.info(f"✅ Stored {len(snapshots)} estimated snapshots")
+                
+                from utils.portfolio.equity_series_cache import get_equity_series_cache
+                get_equity_series_cache().invalidate(user_id)
             
             return {
                 'success': True,
@@ -320,149 +312,18 @@ class SnapTradeHistoryEstimator:
         """
         Fetch historical prices for multiple symbols using the historical price service.
         
+        One batch for the whole range (shared cache first, then FMP with bulk
+        cache writes) instead of a query and fetch per symbol.
+        
         Returns:
             Dict mapping symbol -> {date -> price}
         """
-        prices_by_symbol = {}
-        
-        # The historical price service already has batch fetching and caching
         logger.info(f"   Fetching prices for {len(symbols)} symbols...")
-        
-        for symbol in symbols:
-            try:
-                # Get prices for this symbol using our custom range method
-                price_dict = await self._get_symbol_prices_range(
-                    price_service, symbol, start_date, end_date
-                )
-                
-                if price_dict:
-                    prices_by_symbol[symbol] = price_dict
-                    logger.debug(f"   Got {len(price_dict)} prices for {symbol}")
-                
-            except Exception as e:
-                logger.warning(f"Failed to fetch prices for {symbol}: {e}")
-                continue
-        
-        return prices_by_symbol
-    
-    async def _get_symbol_prices_range(
-        self,
-        price_service,
-        symbol: str,
-        start_date: date,
-        end_date: date
-    ) -> Dict[date, float]:
-        """
-        Fetch all prices for a symbol in a date range.
-        
-        Note: The historical_price_service.get_price_for_symbol_on_date is designed
-        for single dates, so we need to fetch the entire range and convert to dict.
-        """
         try:
-            # Check if cached in database first
-            supabase = self._get_supabase_client()
-            
-            cached_prices = supabase.table('global_historical_prices')\
-                .select('price_date, close_price')\
-                .eq('fmp_symbol', symbol)\
-                .gte('price_date', start_date.isoformat())\
-                .lte('price_date', end_date.isoformat())\
-                .execute()
-            
-            if cached_prices.data and len(cached_prices.data) > 0:
-                # Convert to dict
-                price_dict = {}
-                for row in cached_prices.data:
-                    try:
-                        price_date = datetime.strptime(row['price_date'], '%Y-%m-%d').date()
-                        close_price = float(row['close_price'])
-                        price_dict[price_date] = close_price
-                    except (KeyError, ValueError) as e:
-                        continue
-                
-                logger.debug(f"   Cache hit for {symbol}: {len(price_dict)} prices")
-                return price_dict
-            
-            # Not in cache, fetch from FMP
-            logger.debug(f"   Cache miss for {symbol}, fetching from FMP...")
-            
-            import os
-            import aiohttp
-            
-            api_key = os.getenv("FINANCIAL_MODELING_PREP_API_KEY")
-            if not api_key:
-                logger.error("FINANCIAL_MODELING_PREP_API_KEY not set")
-                return {}
-            
-            url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}"
-            params = {
-                'apikey': api_key,
-                'from': start_date.isoformat(),
-                'to': end_date.isoformat()
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        price_dict = {}
-                        historical = data.get('historical', [])
-                        
-                        for price_data in historical:
-                            try:
-                                price_date = datetime.strptime(price_data['date'], '%Y-%m-%d').date()
-                                close_price = float(price_data['close'])
-                                price_dict[price_date] = close_price
-                                
-                                # Cache in database
-                                supabase.table('global_historical_prices')\
-                                    .upsert({
-                                        'fmp_symbol': symbol,
-                                        'price_date': price_date.isoformat(),
-                                        'open_price': float(price_data.get('open', 0)),
-                                        'high_price': float(price_data.get('high', 0)),
-                                        'low_price': float(price_data.get('low', 0)),
-                                        'close_price': close_price,
-                                        'volume': int(price_data.get('volume', 0)),
-                                        'data_source': 'fmp'
-                                    }, on_conflict='fmp_symbol,price_date')\
-                                    .execute()
-                                
-                            except (KeyError, ValueError) as e:
-                                continue
-                        
-                        logger.debug(f"   Fetched and cached {len(price_dict)} prices for {symbol}")
-                        return price_dict
-                    else:
-                        logger.warning(f"FMP API returned status {response.status} for {symbol}")
-                        return {}
-            
+            return await price_service.get_close_series(symbols, start_date, end_date)
         except Exception as e:
-            logger.error(f"Error fetching prices for {symbol}: {e}")
+            logger.warning(f"Failed to fetch prices for {len(symbols)} symbols: {e}")
             return {}
-    
-    def _get_price_for_date(
-        self,
-        price_dict: Dict[date, float],
-        target_date: date
-    ) -> Optional[float]:
-        """
-        Get price for a specific date, with fallback to previous trading days.
-        
-        If exact date not found, looks back up to 5 trading days for the most recent price.
-        """
-        # Try exact date first
-        if target_date in price_dict:
-            return price_dict[target_date]
-        
-        # Look back up to 5 days for most recent price (handles holidays, data gaps)
-        for i in range(1, 6):
-            lookback_date = target_date - timedelta(days=i)
-            if lookback_date in price_dict:
-                return price_dict[lookback_date]
-        
-        return None
 
 
 # Singleton instance
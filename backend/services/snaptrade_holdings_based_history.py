@@ -10,8 +10,8 @@ Algorithm:
 1. Get user's current holdings from SnapTrade/database
 2. Fetch historical EOD prices for all holdings (1 year back)
 3. Assume constant position sizes (conservative estimate)
-4. Generate daily portfolio value snapshots
-5. Store as 'estimated' snapshots (will be replaced by actual data later)
+4. Value every day at once with the shared history engine
+5. Store as 'estimated' snapshots in batches (will be replaced by actual data later)
 
 This gives users immediate visual feedback while waiting for full reconstruction.
 """
@@ -23,10 +23,22 @@ from decimal import Decimal
 import requests
 import os
 
+import numpy as np
+
 # Load environment variables at module level
 from dotenv import load_dotenv
 load_dotenv()
 
+from utils.portfolio.history_engine import (
+    calendar_days,
+    carry_last_valid,
+    constant_matrix,
+    gain_loss,
+    price_matrix,
+    replace_reconstructed_snapshots,
+    value_history,
+)
+
 logger = logging.getLogger(__name__)
 
 class HoldingsBasedHistoryEstimator:
@@ -100,75 +112,61 @@ class HoldingsBasedHistoryEstimator:
                 }
             logger.info(f"✅ Pre-fetched {len(today_market_values)} holdings' market values for today")
             
-            # Step 3: Generate daily snapshots
-            snapshots_created = 0
-            current_date = start_date
-            last_valid_value = Decimal(0)  # Track last valid value for filling gaps
-            last_cost_basis = Decimal(0)
+            # Step 3: Value every day at once (constant positions x forward-filled closes)
+            days = calendar_days(start_date, end_date)
+            symbol_list = sorted({h['symbol'] for h in holdings})
+            quantities: Dict[str, float] = {}
+            cost_bases: Dict[str, float] = {}
+            for h in holdings:
+                quantities[h['symbol']] = quantities.get(h['symbol'], 0.0) + h['quantity']
+                cost_bases[h['symbol']] = cost_bases.get(h['symbol'], 0.0) + h['cost_basis']
             
-            while current_date <= end_date:
-                # Calculate portfolio value for this date
-                total_value = Decimal(0)
-                total_cost_basis = Decimal(0)
-                
-                for holding in holdings:
-                    symbol = holding['symbol']
-                    quantity = Decimal(str(holding['quantity']))
-                    cost_basis_per_share = Decimal(str(holding['cost_basis'])) / quantity if quantity > 0 else Decimal(0)
-                    
-                    # Get price for this date
-                    price = historical_prices.get(symbol, {}).get(current_date, Decimal(0))
-                    
-                    # CRITICAL FIX: For today, use pre-fetched market values (O(1) lookup)
-                    # This eliminates N+1 query anti-pattern - all values fetched in one batch query
-                    if price == 0 and current_date == date.today():
-                        # Use pre-fetched today's market values
-                        if symbol in today_market_values:
-                            total_value += today_market_values[symbol]['market_value']
-                            total_cost_basis += today_market_values[symbol]['cost_basis']
-                            continue
-                    
-                    if price > 0:
-                        market_value = quantity * price
-                        cost_basis = quantity * cost_basis_per_share
-                        
-                        total_value += market_value
-                        total_cost_basis += cost_basis
-                
-                # CRITICAL FIX: Fill gaps (weekends, holidays) with last known value
-                # This prevents zero/tiny values from appearing on the chart
-                # Use $1 threshold because near-zero stocks (like FUVV at $0.0001) shouldn't count
-                MIN_VALID_VALUE = Decimal('1.0')
-                
-                if total_value < MIN_VALID_VALUE and last_valid_value >= MIN_VALID_VALUE:
-                    logger.info(f"🔧 Filling gap for {current_date}: ${total_value:.2f} -> ${last_valid_value:.2f}")
-                    total_value = last_valid_value
-                    total_cost_basis = last_cost_basis
-                
-                # Update last valid value if we have meaningful data (MUST be separate if!)
-                if total_value >= MIN_VALID_VALUE:
-                    last_valid_value = total_value
-                    last_cost_basis = total_cost_basis
-                else:
-                    logger.warning(f"⚠️ No meaningful data for {current_date}: ${total_value:.2f}")
-                
-                # Create snapshot if we have valid data (real or gap-filled)
-                if total_value >= MIN_VALID_VALUE:
-                    total_gain_loss = total_value - total_cost_basis
-                    total_gain_loss_percent = (total_gain_loss / total_cost_basis * 100) if total_cost_basis > 0 else Decimal(0)
-                    
-                    await self._store_snapshot(
-                        user_id,
-                        current_date,
-                        total_value,
-                        total_cost_basis,
-                        total_gain_loss,
-                        total_gain_loss_percent,
-                        len(holdings)
-                    )
-                    snapshots_created += 1
-                
-                current_date += timedelta(days=1)
+            history = value_history(
+                days,
+                symbol_list,
+                constant_matrix(quantities, symbol_list, days),
+                price_matrix(historical_prices, symbol_list, days),
+                cost_basis=constant_matrix(cost_bases, symbol_list, days)
+            )
+            history.cost_basis = np.where(history.priced, history.cost_basis, 0.0)
+            
+            # CRITICAL FIX: Today's EOD close usually isn't published yet - value
+            # those positions at the pre-fetched live market values instead
+            if days[-1] == date.today():
+                for column, symbol in enumerate(symbol_list):
+                    if date.today() in historical_prices.get(symbol, {}) or symbol not in today_market_values:
+                        continue
+                    history.market_values[-1, column] = float(today_market_values[symbol]['market_value'])
+                    history.cost_basis[-1, column] = float(today_market_values[symbol]['cost_basis'])
+            
+            # CRITICAL FIX: Fill remaining gaps with last known value so zero/tiny
+            # values never reach the chart. $1 threshold because near-zero stocks
+            # (like FUVV at $0.0001) shouldn't count
+            MIN_VALID_VALUE = 1.0
+            total_values, total_cost_basis = carry_last_valid(
+                history.total_values, history.total_cost_basis, MIN_VALID_VALUE
+            )
+            gains, gain_percents = gain_loss(total_values, total_cost_basis)
+            
+            valid_rows = np.flatnonzero(total_values >= MIN_VALID_VALUE)
+            if len(valid_rows) < len(days):
+                logger.warning(f"⚠️ No meaningful data for {len(days) - len(valid_rows)} days before the first priced day")
+            
+            rows = [
+                {
+                    'user_id': user_id,
+                    'value_date': days[row].isoformat(),
+                    'snapshot_type': 'reconstructed',
+                    'total_value': float(total_values[row]),
+                    'total_cost_basis': float(total_cost_basis[row]),
+                    'total_gain_loss': float(gains[row]),
+                    'total_gain_loss_percent': float(gain_percents[row]),
+                    'securities_count': len(holdings),
+                    'data_quality_score': 75.0  # 75% quality (estimated from current holdings)
+                }
+                for row in valid_rows
+            ]
+            snapshots_created = await self._store_snapshots(user_id, rows)
             
             duration = (datetime.now() - start_time).total_seconds()
             
@@ -326,28 +324,34 @@ class HoldingsBasedHistoryEstimator:
                 
                 logger.info(f"✅ Fetched {len(historical)} price points for {symbol} from FMP")
                 
-                # Cache all fetched prices
+                # Cache all fetched prices in one upsert
+                records = []
                 for item in historical:
                     price_date = datetime.strptime(item['date'], '%Y-%m-%d').date()
                     # FMP /stable endpoint uses 'price' field (EOD close price)
                     close_price = Decimal(str(item.get('price', item.get('close', 0))))
                     prices[price_date] = close_price
-                    
-                    # Store in cache
+                    records.append({
+                        'fmp_symbol': symbol,
+                        'price_date': price_date.isoformat(),
+                        'close_price': float(close_price),
+                        'open_price': float(close_price),  # /stable endpoint doesn't provide OHLC
+                        'high_price': float(close_price),
+                        'low_price': float(close_price),
+                        'volume': int(item.get('volume', 0)),
+                        'data_source': 'fmp',
+                        'data_quality': 100.0
+                    })
+                
+                if records:
                     try:
-                        supabase.table('global_historical_prices').insert({
-                            'fmp_symbol': symbol,
-                            'price_date': price_date.isoformat(),
-                            'close_price': float(close_price),
-                            'open_price': float(close_price),  # /stable endpoint doesn't provide OHLC
-                            'high_price': float(close_price),
-                            'low_price': float(close_price),
-                            'volume': int(item.get('volume', 0)),
-                            'data_source': 'fmp',
-                            'data_quality': 100.0
-                        }).execute()
-                    except Exception:
-                        pass  # Ignore duplicates
+                        await asyncio.to_thread(
+                            lambda: supabase.table('global_historical_prices')
+                            .upsert(records, on_conflict='fmp_symbol,price_date')
+                            .execute()
+                        )
+                    except Exception as e:
+                        logger.warning(f"⚠️ Failed to cache prices for {symbol}: {e}")
             else:
                 logger.warning(f"⚠️ Failed to fetch prices for {symbol}: {response.status_code}")
         
@@ -356,48 +360,25 @@ class HoldingsBasedHistoryEstimator:
         
         return prices
     
-    async def _store_snapshot(
-        self,
-        user_id: str,
-        snapshot_date: date,
-        total_value: Decimal,
-        total_cost_basis: Decimal,
-        total_gain_loss: Decimal,
-        total_gain_loss_percent: Decimal,
-        securities_count: int
-    ):
-        """Store an estimated snapshot in database.
+    async def _store_snapshots(self, user_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Store estimated snapshots in database.
         
-        Uses delete-then-insert pattern because PostgreSQL partitioned tables
-        don't support UNIQUE constraints across partitions properly for upsert.
+        Uses delete-then-insert (one delete over the range, batched inserts)
+        because PostgreSQL partitioned tables don't support UNIQUE constraints
+        across partitions properly for upsert.
         """
-        supabase = self._get_supabase_client()
+        import asyncio
         
+        supabase = self._get_supabase_client()
         try:
-            # Delete any existing record for this user/date/type (handles duplicates)
-            supabase.table('user_portfolio_history')\
-                .delete()\
-                .eq('user_id', user_id)\
-                .eq('value_date', snapshot_date.isoformat())\
-                .eq('snapshot_type', 'reconstructed')\
-                .execute()
-            
-            # Insert new record
-            supabase.table('user_portfolio_history').insert({
-                'user_id': user_id,
-                'value_date': snapshot_date.isoformat(),
-                'snapshot_type': 'reconstructed',
-                'total_value': float(total_value),
-                'total_cost_basis': float(total_cost_basis),
-                'total_gain_loss': float(total_gain_loss),
-                'total_gain_loss_percent': float(total_gain_loss_percent),
-                'securities_count': securities_count,
-                'data_quality_score': 75.0  # 75% quality (estimated from current holdings)
-            }).execute()
-            
+            stored = await asyncio.to_thread(replace_reconstructed_snapshots, supabase, user_id, rows)
         except Exception as e:
-            logger.error(f"❌ Error storing snapshot for {snapshot_date}: {e}")
+            logger.error(f"❌ Error storing {len(rows)} snapshots: {e}")
             raise  # Re-raise to propagate the error
+        
+        from utils.portfolio.equity_series_cache import get_equity_series_cache
+        get_equity_series_cache().invalidate(user_id)
+        return stored
 
 
 # Singleton
@@ -6,8 +6,8 @@ Production-grade service for reconstructing portfolio history from SnapTrade tra
 Key Features:
 - Fetches all historical transactions from SnapTrade (paginated)
 - Replays transactions chronologically to build portfolio states
-- Fetches and caches historical EOD prices from FMP API
-- Generates daily snapshots from account inception to present
+- Fetches and caches historical EOD prices from FMP API (one batch per range)
+- Generates daily snapshots on the trading calendar via the shared history engine
 - Handles multi-user efficiency (shared price cache across all users)
 
 Architecture:
@@ -20,13 +20,23 @@ Architecture:
 import asyncio
 import logging
 from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 from dataclasses import dataclass
 from collections import defaultdict
 from decimal import Decimal
-import requests
 import os
 
+import numpy as np
+
+from utils.portfolio.history_engine import (
+    gain_loss,
+    price_matrix,
+    replace_reconstructed_snapshots,
+    step_matrix,
+    trading_days,
+    value_history,
+)
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -291,82 +301,55 @@ class SnapTradePortfolioReconstructionService:
         Replay transactions chronologically to build daily portfolio snapshots.
         
         Algorithm:
-        1. Group transactions by date
-        2. For each date, apply transactions to update holdings
-        3. Fetch EOD prices for all holdings on that date
-        4. Calculate portfolio value and create snapshot
+        1. Apply each day's transactions to holdings, recording the new state of
+           every symbol touched (path-dependent cost basis stays in Decimal)
+        2. Fetch EOD closes for every symbol over the whole range in one batch
+        3. Lay both out on the trading calendar and value all days at once
+           with the shared history engine
         """
         if not transactions:
             return []
         
         # Current portfolio state (symbol -> {quantity, cost_basis})
         holdings = defaultdict(lambda: {'quantity': Decimal(0), 'cost_basis': Decimal(0)})
+        quantity_changes: Dict[date, Dict[str, float]] = defaultdict(dict)
+        cost_changes: Dict[date, Dict[str, float]] = defaultdict(dict)
         
-        # Group transactions by date
-        transactions_by_date = defaultdict(list)
         for tx in transactions:
-            transactions_by_date[tx.trade_date].append(tx)
+            self._apply_transaction_to_holdings(tx, holdings)
+            quantity_changes[tx.trade_date][tx.symbol] = float(holdings[tx.symbol]['quantity'])
+            cost_changes[tx.trade_date][tx.symbol] = float(holdings[tx.symbol]['cost_basis'])
         
-        # Get date range
         start_date = min(tx.trade_date for tx in transactions)
         end_date = max(tx.trade_date for tx in transactions)
+        days = trading_days(start_date, end_date)
+        symbols = sorted(holdings)
+        if not days:
+            return []
         
-        # Generate snapshots for each trading day
-        snapshots = []
-        current_date = start_date
+        closes = await self._get_price_history(symbols, start_date, end_date)
+        history = value_history(
+            days,
+            symbols,
+            step_matrix(quantity_changes, symbols, days),
+            price_matrix(closes, symbols, days),
+            cost_basis=step_matrix(cost_changes, symbols, days)
+        )
         
-        while current_date <= end_date:
-            # Apply transactions for this date
-            if current_date in transactions_by_date:
-                for tx in transactions_by_date[current_date]:
-                    self._apply_transaction_to_holdings(tx, holdings)
-            
-            # Skip if no holdings
-            if not any(h['quantity'] > 0 for h in holdings.values()):
-                current_date += timedelta(days=1)
-                continue
-            
-            # Fetch EOD prices for all holdings
-            symbols = [symbol for symbol, h in holdings.items() if h['quantity'] > 0]
-            prices = await self._get_historical_prices(symbols, current_date)
-            
-            # Calculate portfolio value
-            total_value = Decimal(0)
-            total_cost_basis = Decimal(0)
-            snapshot_holdings = {}
-            
-            for symbol, holding in holdings.items():
-                if holding['quantity'] <= 0:
-                    continue
-                
-                price = prices.get(symbol, Decimal(0))
-                market_value = holding['quantity'] * price
-                
-                total_value += market_value
-                total_cost_basis += holding['cost_basis']
-                
-                snapshot_holdings[symbol] = {
-                    'quantity': holding['quantity'],
-                    'cost_basis': holding['cost_basis'],
-                    'market_value': market_value,
-                    'price': price
-                }
-            
-            # Create snapshot
-            if total_value > 0:
-                total_gain_loss = total_value - total_cost_basis
-                total_gain_loss_percent = (total_gain_loss / total_cost_basis * 100) if total_cost_basis > 0 else Decimal(0)
-                
-                snapshots.append(PortfolioSnapshot(
-                    snapshot_date=current_date,
-                    total_value=total_value,
-                    total_cost_basis=total_cost_basis,
-                    total_gain_loss=total_gain_loss,
-                    total_gain_loss_percent=total_gain_loss_percent,
-                    holdings=snapshot_holdings
-                ))
-            
-            current_date += timedelta(days=1)
+        total_values = history.total_values
+        total_cost_basis = history.total_cost_basis
+        gains, gain_percents = gain_loss(total_values, total_cost_basis)
+        
+        snapshots = []
+        for row in np.flatnonzero(total_values > 0):
+            snapshots.append(PortfolioSnapshot(
+                snapshot_date=days[row],
+                total_value=Decimal(str(total_values[row])),
+                total_cost_basis=Decimal(str(total_cost_basis[row])),
+                total_gain_loss=Decimal(str(gains[row])),
+                total_gain_loss_percent=Decimal(str(gain_percents[row])),
+                holdings=history.breakdown(row)
+            ))
         
         return snapshots
     
@@ -420,128 +403,61 @@ class SnapTradePortfolioReconstructionService:
             holdings[symbol]['quantity'] = Decimal(0)
             holdings[symbol]['cost_basis'] = Decimal(0)
     
-    async def _get_historical_prices(
+    async def _get_price_history(
         self,
         symbols: List[str],
-        price_date: date
-    ) -> Dict[str, Decimal]:
+        start_date: date,
+        end_date: date
+    ) -> Dict[str, Dict[date, float]]:
         """
-        Get EOD prices for symbols on a specific date.
+        Get EOD closes for all symbols over the range: symbol -> {date: close}.
         
-        Uses cached database prices first, fetches from FMP if needed.
-        Caches fetched prices for future use across all users.
+        One batch through the historical price service (in-process store, then
+        the shared global_historical_prices cache, then FMP), so prices fetched
+        for one user are reused for every other user holding the same symbols.
         """
-        supabase = self._get_supabase_client()
-        prices = {}
-        symbols_to_fetch = []
-        
-        # Step 1: Check cache
-        for symbol in symbols:
-            result = supabase.table('global_historical_prices')\
-                .select('close_price')\
-                .eq('fmp_symbol', symbol)\
-                .eq('price_date', price_date.isoformat())\
-                .is_('price_timestamp', 'null')\
-                .limit(1)\
-                .execute()
-            
-            if result.data:
-                prices[symbol] = Decimal(str(result.data[0]['close_price']))
-            else:
-                symbols_to_fetch.append(symbol)
-        
-        # Step 2: Fetch missing prices from FMP
-        if symbols_to_fetch and self.fmp_api_key:
-            fetched_prices = await self._fetch_fmp_historical_prices(symbols_to_fetch, price_date)
-            prices.update(fetched_prices)
-            
-            # Step 3: Cache fetched prices
-            await self._cache_historical_prices(fetched_prices, price_date)
-        
-        return prices
-    
-    async def _fetch_fmp_historical_prices(
-        self,
-        symbols: List[str],
-        price_date: date
-    ) -> Dict[str, Decimal]:
-        """Fetch historical EOD prices from FMP API."""
-        prices = {}
+        from services.historical_price_service import get_historical_price_service
         
+        price_service = get_historical_price_service()
+        api_calls_before = price_service.api_calls_made
         try:
-            # FMP endpoint for historical prices
-            # We'll fetch one symbol at a time for accuracy
-            for symbol in symbols:
-                url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}"
-                params = {
-                    'apikey': self.fmp_api_key,
-                    'from': price_date.isoformat(),
-                    'to': price_date.isoformat()
-                }
-                
-                response = requests.get(url, params=params, timeout=10)
-                self.total_api_calls += 1
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    historical = data.get('historical', [])
-                    if historical:
-                        prices[symbol] = Decimal(str(historical[0]['close']))
-                else:
-                    logger.warning(f"⚠️  Failed to fetch price for {symbol} on {price_date}: {response.status_code}")
-            
+            return await price_service.get_close_series(symbols, start_date, end_date)
         except Exception as e:
-            logger.error(f"❌ Error fetching FMP prices: {e}")
-        
-        return prices
-    
-    async def _cache_historical_prices(
-        self,
-        prices: Dict[str, Decimal],
-        price_date: date
-    ):
-        """Cache fetched prices in database for future use."""
-        supabase = self._get_supabase_client()
-        
-        for symbol, price in prices.items():
-            try:
-                supabase.table('global_historical_prices').insert({
-                    'fmp_symbol': symbol,
-                    'price_date': price_date.isoformat(),
-                    'close_price': float(price),
-                    'data_source': 'fmp',
-                    'data_quality': 100.0
-                }).execute()
-            except Exception as e:
-                # Ignore duplicate key errors (price already cached)
-                pass
+            logger.error(f"❌ Error fetching historical prices: {e}")
+            return {}
+        finally:
+            self.total_api_calls += price_service.api_calls_made - api_calls_before
     
     async def _store_snapshots(
         self,
         user_id: str,
         snapshots: List[PortfolioSnapshot]
     ):
-        """Store generated snapshots in user_portfolio_history table."""
+        """Store generated snapshots in user_portfolio_history table (batched)."""
         supabase = self._get_supabase_client()
+        rows = [
+            {
+                'user_id': user_id,
+                'value_date': snapshot.snapshot_date.isoformat(),
+                'snapshot_type': 'reconstructed',
+                'total_value': float(snapshot.total_value),
+                'total_cost_basis': float(snapshot.total_cost_basis),
+                'total_gain_loss': float(snapshot.total_gain_loss),
+                'total_gain_loss_percent': float(snapshot.total_gain_loss_percent),
+                'securities_count': len(snapshot.holdings),
+                'data_quality_score': 100.0
+            }
+            for snapshot in snapshots
+        ]
         
-        for snapshot in snapshots:
-            try:
-                supabase.table('user_portfolio_history').insert({
-                    'user_id': user_id,
-                    'value_date': snapshot.snapshot_date.isoformat(),
-                    'snapshot_type': 'reconstructed',
-                    'total_value': float(snapshot.total_value),
-                    'total_cost_basis': float(snapshot.total_cost_basis),
-                    'total_gain_loss': float(snapshot.total_gain_loss),
-                    'total_gain_loss_percent': float(snapshot.total_gain_loss_percent),
-                    'securities_count': len(snapshot.holdings),
-                    'data_quality_score': 100.0
-                }, upsert=True, on_conflict='user_id,value_date,snapshot_type').execute()
-                
-                self.total_snapshots_created += 1
-                
-            except Exception as e:
-                logger.error(f"❌ Error storing snapshot for {snapshot.snapshot_date}: {e}")
+        try:
+            stored = await asyncio.to_thread(replace_reconstructed_snapshots, supabase, user_id, rows)
+            self.total_snapshots_created += stored
+            
+            from utils.portfolio.equity_series_cache import get_equity_series_cache
+            get_equity_series_cache().invalidate(user_id)
+        except Exception as e:
+            logger.error(f"❌ Error storing {len(rows)} snapshots for user {user_id}: {e}")
 
 # Singleton instance
 _reconstruction_service = None
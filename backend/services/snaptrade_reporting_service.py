@@ -200,6 +200,9 @@ class SnapTradeReportingService:
                         .execute()
                 
                 logger.info(f"✅ Successfully stored {len(all_snapshots)} snapshots")
+                
+                from utils.portfolio.equity_series_cache import get_equity_series_cache
+                get_equity_series_cache().invalidate(user_id)
             else:
                 logger.warning(f"⚠️  No portfolio data found in reporting API")
             
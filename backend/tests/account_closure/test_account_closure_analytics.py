@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Account closure analytics over the daily log rollups (migration 028).
+
+The repository is replaced with a fake that serves rollup rows and fails if
+raw logs are scanned, so these tests pin both the numbers and the fact that
+system-wide analytics never read account_closure_logs directly.
+"""
+
+import pytest
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.supabase.account_closure_analytics import AccountClosureAnalytics
+
+
+def _row(day, dimension, key, log_count, error_count=0, completed_count=0, failed_count=0):
+    return {
+        "day": day, "dimension": dimension, "key": key, "log_count": log_count,
+        "error_count": error_count, "completed_count": completed_count, "failed_count": failed_count
+    }
+
+
+@pytest.fixture
+def analytics():
+    today = datetime.now(timezone.utc).date()
+    d0, d1 = (today - timedelta(days=1)).isoformat(), today.isoformat()
+    rows = [
+        _row(d0, "total", "", 10, error_count=1, completed_count=1, failed_count=1),
+        _row(d0, "log_level", "INFO", 9),
+        _row(d0, "log_level", "ERROR", 1, error_count=1),
+        _row(d0, "step", "LIQUIDATION", 6),
+        _row(d0, "step", "WITHDRAWAL", 4),
+        _row(d0, "account", "acct-1", 7, completed_count=1),
+        _row(d0, "account", "acct-2", 3, failed_count=1),
+        _row(d1, "total", "", 20, error_count=4, completed_count=1),
+        _row(d1, "log_level", "INFO", 16),
+        _row(d1, "log_level", "ERROR", 4, error_count=4),
+        _row(d1, "step", "WITHDRAWAL", 20),
+        _row(d1, "account", "acct-2", 20, completed_count=1),
+    ]
+
+    def find_daily_rollups(start_day, end_day, dimensions=None):
+        return [
+            row for row in rows
+            if start_day.isoformat() <= row["day"] <= end_day.isoformat()
+            and (not dimensions or row["dimension"] in dimensions)
+        ]
+
+    service = AccountClosureAnalytics()
+    service.repository = Mock()
+    service.repository.find_daily_rollups.side_effect = find_daily_rollups
+    service.repository.find_by_date_range.side_effect = AssertionError("raw log scan")
+    service.days = (d0, d1)
+    return service
+
+
+def test_statistics_from_rollups(analytics):
+    d0, d1 = analytics.days
+    stats = analytics.generate_statistics(30)
+
+    assert stats["overview"] == {
+        "total_logs": 30, "unique_accounts": 2, "success_logs": 2, "failure_logs": 1, "success_rate": 66.67
+    }
+    assert stats["by_log_level"] == {"INFO": 25, "ERROR": 5}
+    assert stats["by_step"] == {"LIQUIDATION": 6, "WITHDRAWAL": 24}
+    assert stats["daily_activity"] == {d0: 10, d1: 20}
+    assert stats["top_accounts"] == [
+        {"account_id": "acct-2", "log_count": 23},
+        {"account_id": "acct-1", "log_count": 7},
+    ]
+
+
+def test_trend_analysis_from_rollups(analytics):
+    d0, d1 = analytics.days
+    trends = analytics.generate_trend_analysis(90)
+
+    assert sum(week["activity_count"] for week in trends["weekly_activity"]) == 30
+    assert trends["error_rate_trend"] == [
+        {"date": d0, "error_count": 1, "total_logs": 10, "error_rate": 10.0},
+        {"date": d1, "error_count": 4, "total_logs": 20, "error_rate": 20.0},
+    ]
+    assert trends["completion_rate_trend"] == [
+        {"date": d0, "completions": 1, "total_accounts": 2, "completion_rate": 50.0},
+        {"date": d1, "completions": 1, "total_accounts": 1, "completion_rate": 100.0},
+    ]
+
+
+def test_health_metrics_from_rollups(analytics):
+    health = analytics.get_system_health_metrics()
+
+    assert health["metrics"] == {
+        "total_activity": 30, "error_count": 5, "error_rate": 16.67, "active_accounts": 2
+    }
+    assert health["health_status"] == "unhealthy"
+    # Only the two dimensions it needs are read
+    _, _, dimensions = analytics.repository.find_daily_rollups.call_args.args
+    assert dimensions == ["total", "account"]
@@ -43,6 +43,7 @@ from utils.alpaca.automated_account_closure import (
     AutomatedAccountClosureProcessor,
     ClosureProcessStatus
 )
+from services.account_closure_jobs import InMemoryClosureJobStore
 
 # Mock classes to simulate Alpaca API objects
 class MockAccount:
@@ -450,7 +451,7 @@ class TestAutomatedAccountClosureProcessor:
     def processor(self):
         """Create AutomatedAccountClosureProcessor instance for testing."""
         with patch('utils.alpaca.automated_account_closure.AccountClosureManager'):
-            processor = AutomatedAccountClosureProcessor(sandbox=True)
+            processor = AutomatedAccountClosureProcessor(sandbox=True, job_store=InMemoryClosureJobStore())
             processor.manager = Mock()
             processor.supabase = Mock()
             return processor
@@ -481,6 +482,11 @@ class TestAutomatedAccountClosureProcessor:
             assert result['status'] == 'pending_closure'
             assert 'estimated_completion' in result
 
+            # The closure is persisted for the poller instead of running as a task
+            job = await processor.job_store.get("account-123")
+            assert job.state.value == 'initiated'
+            assert job.confirmation_number == result['confirmation_number']
+
     @pytest.mark.asyncio
     async def test_initiate_automated_closure_not_ready(self, processor):
         """Test automated closure initiation when account not ready."""
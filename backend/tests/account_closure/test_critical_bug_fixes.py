@@ -28,7 +28,6 @@ from utils.alpaca.account_closure import (
     resume_account_closure,
     ClosureStep
 )
-from utils.alpaca.automated_account_closure import AutomatedAccountClosureProcessor
 
 class TestCriticalBugFixes:
     """Integration test for the two critical bug fixes."""
@@ -259,45 +258,29 @@ class TestCriticalBugFixes:
         CRITICAL BUG FIX TEST: Ensure process handles multi-day withdrawals correctly
         without prematurely proceeding to account closure.
         
-        This test verifies the architectural improvement where the background process
-        stays alive during multi-day withdrawals instead of exiting early and relying
-        on external schedulers.
-        
-        ARCHITECTURE IMPROVEMENT: The new _handle_complete_withdrawal_process method
-        maintains the natural flow by keeping the process alive during 24-hour waits.
+        The closure is a persisted state machine advanced by the closure poller:
+        a balance above the daily withdrawal limit takes several transfers at
+        least 24 hours apart, and the account is only closed after the last one.
         """
-        # Test that the new method handles the flow correctly
-        processor = AutomatedAccountClosureProcessor(sandbox=True)
-        
-        # Verify the new method exists
-        assert hasattr(processor, '_handle_complete_withdrawal_process'), "New complete withdrawal method should exist"
-        assert callable(getattr(processor, '_handle_complete_withdrawal_process')), "Method should be callable"
-        
-        # Verify the method signature is correct
-        import inspect
-        sig = inspect.signature(processor._handle_complete_withdrawal_process)
-        all_params = list(sig.parameters.keys())
-        
-        # Verify all expected parameters are present
-        expected_params = ['account_id', 'ach_relationship_id', 'detailed_logger']
-        
-        for param in expected_params:
-            assert param in all_params, f"Method should have {param} parameter. Found: {all_params}"
+        import asyncio
+        from datetime import datetime
+        from services.account_closure_poller import run_dry_run, DAILY_WITHDRAWAL_LIMIT
         
-        # Verify the old problematic approach is no longer used in main process
-        source = inspect.getsource(processor._run_automated_closure_process)
+        report = asyncio.run(run_dry_run({"multi-day": {"positions_value": 120000.0, "cash": 0.0}}))
+        transfers = report.jobs["multi-day"]["transfers"]
         
-        # Should use the new complete withdrawal method
-        assert '_handle_complete_withdrawal_process' in source, "Should use new complete withdrawal method"
+        assert report.final_states == {"multi-day": "completed"}
+        assert len(transfers) == 3
+        assert all(transfer["amount"] <= DAILY_WITHDRAWAL_LIMIT for transfer in transfers)
         
-        # Should NOT exit early with return transfer_id pattern
-        lines = source.split('\n')
-        early_exit_pattern = any('return transfer_id' in line and 'Exit early' in line for line in lines)
-        assert not early_exit_pattern, "Should not exit early when withdrawal is waiting"
+        # Withdrawals are spaced out by the 24 hour cooldown
+        requested = [datetime.fromisoformat(transfer["initiated_at"]) for transfer in transfers]
+        assert all((b - a).total_seconds() >= 86400 for a, b in zip(requested, requested[1:]))
         
-        print("✅ ARCHITECTURE IMPROVEMENT VERIFIED: Process maintains natural flow during multi-day withdrawals")
-        print("✅ No premature exits: Background process stays alive throughout withdrawal process")
-        print("✅ External scheduler dependency removed from core flow")
+        # The account is closed exactly once, after every transfer completed
+        assert report.broker_calls["closures"] == 1
+        closing = [datetime.fromisoformat(t[0]) for t in report.transitions if t[3] == "closing_account"]
+        assert len(closing) == 1 and closing[0] >= requested[-1]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+"""
+Tests for the per-hop context stage of the agent graph: the current turn is
+sent verbatim, stale tool outputs become references, older turns are folded
+into a rolling summary in batches, and the recorded conversations in
+fixtures/conversations stay within budget with far fewer tokens.
+"""
+
+import json
+from pathlib import Path
+from typing import Annotated, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import create_react_agent
+from langgraph.prebuilt.chat_agent_executor import _validate_chat_history
+from typing_extensions import TypedDict
+
+from clera_agents.context_manager import (
+    SUMMARY_PREFIX,
+    build_context,
+    count_tokens,
+    extractive_summary,
+    make_context_hook,
+    split_turns,
+)
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "conversations"
+PORTFOLIO_SUMMARY = "| AAPL | 42.00 | $187.42 | $7,871.64 | 8.1% |\n" * 60
+
+
+def _load(name):
+    with open(FIXTURES / f"{name}.json") as f:
+        return messages_from_dict(json.load(f)["messages"])
+
+
+def _turn(index, tool_output=PORTFOLIO_SUMMARY):
+    call_id = f"call_{index}"
+    return [
+        HumanMessage(content=f"question {index}", id=f"h{index}"),
+        AIMessage(content="", tool_calls=[{"name": "get_portfolio_summary", "args": {}, "id": call_id}], id=f"a{index}"),
+        ToolMessage(content=tool_output, name="get_portfolio_summary", tool_call_id=call_id, id=f"t{index}"),
+        AIMessage(content=f"answer {index}", id=f"r{index}"),
+    ]
+
+
+class CountingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, messages):
+        self.calls.append([m.id for m in messages])
+        return extractive_summary(previous, messages)
+
+
+def _replay(messages, supervisor_hook, agent_hook):
+    """Inputs of every recorded LLM hop, carrying hook state forward as the graph does."""
+    state = {}
+    for index, message in enumerate(messages):
+        if not isinstance(message, AIMessage) or message.response_metadata.get("__is_handoff_back"):
+            continue
+        hook = supervisor_hook if message.name == "Clera" else agent_hook
+        result = hook({**state, "messages": messages[:index]})
+        state.update({k: v for k, v in result.items() if k != "llm_input_messages"})
+        yield messages[:index], result["llm_input_messages"]
+
+
+def test_short_conversation_is_sent_unchanged():
+    messages = _turn(0, tool_output="small") + _turn(1, tool_output="small")
+    result = build_context(messages, budget=8000, summarizer=CountingSummarizer())
+    assert result == {"llm_input_messages": messages}
+
+
+def test_stale_tool_outputs_collapse_and_current_turn_stays_verbatim():
+    messages = _turn(0) + _turn(1) + _turn(2)[:3]
+    sent = build_context(messages, budget=100_000)["llm_input_messages"]
+
+    stale = [m for m in sent if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in stale] == ["call_0", "call_1", "call_2"]
+    assert stale[0].content.startswith("[Earlier get_portfolio_summary output (")
+    assert len(stale[0].content) < 400
+    assert stale[2].content == PORTFOLIO_SUMMARY
+    # Stored messages are not modified
+    assert messages[2].content == PORTFOLIO_SUMMARY
+    _validate_chat_history(sent)
+
+
+def test_supervisor_folds_old_turns_into_summary_in_batches():
+    summarizer = CountingSummarizer()
+    hook = make_context_hook(1500, summarizer=summarizer)
+    state = {"messages": []}
+    for index in range(12):
+        state["messages"] = state["messages"] + _turn(index)[:3]
+        result = hook(state)
+        state.update({k: v for k, v in result.items() if k != "llm_input_messages"})
+        sent = result["llm_input_messages"]
+        assert count_tokens(sent) <= 1500
+        assert sent[-1].content == PORTFOLIO_SUMMARY
+        _validate_chat_history(sent)
+        state["messages"] = state["messages"] + [_turn(index)[3]]
+
+    assert 0 < len(summarizer.calls) < 6
+    # Each batch starts where the previous one ended
+    folded = [message_id for batch in summarizer.calls for message_id in batch]
+    assert folded == [m.id for m in state["messages"][:len(folded)]]
+    assert state["summary_through_id"] == folded[-1]
+    assert "User asked: question 0" in state["context_summary"]
+    assert sent[0] == SystemMessage(content=SUMMARY_PREFIX + state["context_summary"])
+
+
+def test_agent_hook_drops_old_turns_and_keeps_the_summary():
+    messages = [m for index in range(10) for m in _turn(index)]
+    hook = make_context_hook(600)
+    result = hook({"messages": messages, "context_summary": "User holds AAPL.", "summary_through_id": "r1"})
+
+    assert set(result) == {"llm_input_messages"}
+    sent = result["llm_input_messages"]
+    assert sent[0].content == SUMMARY_PREFIX + "User holds AAPL."
+    assert sent[-4:] == messages[-4:]
+    assert not any(m.id in {"h2", "h3"} for m in sent)
+    _validate_chat_history(sent)
+
+
+def test_summary_is_dropped_when_its_messages_are_gone():
+    messages = _turn(5, tool_output="small")
+    result = build_context(messages, budget=8000, summary="stale", summary_through_id="missing")
+    assert result["llm_input_messages"] == messages
+
+
+@pytest.mark.parametrize("name", ["portfolio_review", "market_research", "trade_session"])
+def test_recorded_conversations_fit_budget_with_fewer_tokens(name):
+    messages = _load(name)
+    summarizer = CountingSummarizer()
+    supervisor_hook = make_context_hook(3000, summarizer=summarizer)
+    agent_hook = make_context_hook(2500)
+
+    full_tokens = managed_tokens = 0
+    for history, sent in _replay(messages, supervisor_hook, agent_hook):
+        _validate_chat_history(sent)
+        current_turn = split_turns(history)[-1]
+        assert count_tokens(sent) <= max(3000, count_tokens(current_turn) + 1000)
+        full_tokens += count_tokens(history)
+        managed_tokens += count_tokens(sent)
+
+    assert managed_tokens < full_tokens * 0.65
+    assert summarizer.calls
+
+
+class RecordingChatModel(BaseChatModel):
+    """Answers with a fixed reply and records the messages it was sent."""
+
+    received: List[List[BaseMessage]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.received.append(list(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="done"))])
+
+
+class AgentState(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+    is_last_step: bool
+    remaining_steps: int
+    context_summary: Optional[str]
+    summary_through_id: Optional[str]
+
+
+def test_hook_trims_what_the_agent_model_sees_and_persists_the_summary():
+    model = RecordingChatModel(received=[])
+    agent = create_react_agent(
+        model, [], prompt="You are Clera.", state_schema=AgentState,
+        pre_model_hook=make_context_hook(600, summarizer=extractive_summary),
+    )
+    history = [m for index in range(8) for m in _turn(index)]
+    result = agent.invoke({"messages": history + [HumanMessage(content="and now?", id="last")]})
+
+    sent = model.received[0]
+    assert sent[0].content == "You are Clera."
+    assert sent[1].content.startswith(SUMMARY_PREFIX)
+    assert sent[-1].content == "and now?"
+    assert count_tokens(sent[1:]) <= 600
+    assert all(len(m.content) < 400 for m in sent if isinstance(m, ToolMessage))
+    # Full history is kept in state; the summary persists for the next hop
+    assert len(result["messages"]) == len(history) + 2
+    assert result["context_summary"] and result["summary_through_id"]
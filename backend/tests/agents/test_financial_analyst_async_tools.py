@@ -0,0 +1,210 @@
+"""
+Tests for the async financial analyst tools: concurrent symbol/benchmark
+fetches over the pooled FMP client, the shared EOD series cache and reuse of
+stored prices from global_historical_prices.
+"""
+
+import asyncio
+import time
+import httpx
+import pytest
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from clera_agents import financial_analyst_agent as fa
+
+FMP_LATENCY_SECONDS = 0.3
+START = (date.today() - timedelta(days=120)).isoformat()
+END = (date.today() - timedelta(days=30)).isoformat()
+
+
+def _series(symbol, days=30):
+    base = 100.0 + len(symbol)
+    start = date.today() - timedelta(days=120)
+    return [
+        {'date': (start + timedelta(days=i)).isoformat(), 'close': base + i}
+        for i in range(days)
+    ]
+
+
+class FmpCalls(list):
+    """Symbols requested, plus the most requests seen in flight at once."""
+    in_flight = 0
+    max_in_flight = 0
+
+
+@pytest.fixture
+def fmp(monkeypatch):
+    """Pooled client backed by a MockTransport with fixed per-request latency."""
+    calls = FmpCalls()
+
+    async def handler(request):
+        calls.in_flight += 1
+        calls.max_in_flight = max(calls.max_in_flight, calls.in_flight)
+        try:
+            await asyncio.sleep(FMP_LATENCY_SECONDS)
+        finally:
+            calls.in_flight -= 1
+        if 'quote-short' in request.url.path:
+            symbol = request.url.path.rsplit('/', 1)[-1]
+            calls.append(symbol)
+            return httpx.Response(200, json=[{'symbol': symbol, 'price': 123.45}])
+        symbol = request.url.params['symbol']
+        calls.append(symbol)
+        if symbol == 'NODATA':
+            return httpx.Response(200, json=[])
+        # FMP returns newest first
+        return httpx.Response(200, json=list(reversed(_series(symbol))))
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setenv('FINANCIAL_MODELING_PREP_API_KEY', 'test-key')
+    monkeypatch.setattr(fa, '_get_fmp_http_client', lambda: client)
+    monkeypatch.setattr(fa, '_load_stored_eod_series', AsyncMock(return_value=None))
+    fa.clear_eod_series_cache()
+    yield calls
+    fa.clear_eod_series_cache()
+
+
+async def _timed(coro):
+    started = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - started
+
+
+class TestConcurrentFetches:
+
+    @pytest.mark.asyncio
+    async def test_symbol_and_benchmark_are_fetched_concurrently(self, fmp):
+        result, elapsed = await _timed(
+            fa.calculate_investment_performance.ainvoke({'symbol': 'AAPL', 'start_date': START, 'end_date': END})
+        )
+
+        assert 'Performance Analysis: AAPL' in result
+        assert 'SPY Return' in result
+        assert sorted(fmp) == ['AAPL', 'SPY']
+        assert fmp.max_in_flight == 2
+        assert elapsed < FMP_LATENCY_SECONDS * 2  # sequential fetches would take at least this long
+
+    @pytest.mark.asyncio
+    async def test_five_tickers_cost_about_the_same_as_one(self, fmp):
+        args = {'start_date': START, 'end_date': END}
+
+        _, one = await _timed(fa.compare_investment_performance.ainvoke({'symbols': ['AAPL'], **args}))
+        fa.clear_eod_series_cache()
+        fmp.clear()
+        result, five = await _timed(fa.compare_investment_performance.ainvoke(
+            {'symbols': ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA'], **args}
+        ))
+
+        assert sorted(fmp) == ['AAPL', 'AMZN', 'GOOGL', 'MSFT', 'NVDA', 'SPY']
+        assert five < one + FMP_LATENCY_SECONDS
+        # Ranked by total return, each with the full analysis below
+        assert result.index('1. ') < result.index('Performance Analysis:')
+        assert result.count('Performance Analysis:') == 5
+
+    @pytest.mark.asyncio
+    async def test_compare_reports_symbols_without_data(self, fmp):
+        result = await fa.compare_investment_performance.ainvoke(
+            {'symbols': ['AAPL', 'NODATA'], 'start_date': START, 'end_date': END}
+        )
+
+        assert 'No data: NODATA' in result
+        assert 'Performance Analysis: AAPL' in result
+
+    @pytest.mark.asyncio
+    async def test_stock_price_uses_pooled_client(self, fmp):
+        result = await fa.get_stock_price.ainvoke({'ticker': 'AAPL'})
+        assert result == 'The current price of AAPL is $123.45.'
+
+
+class TestSeriesCache:
+
+    @pytest.mark.asyncio
+    async def test_repeat_calls_reuse_cached_series(self, fmp):
+        args = {'symbol': 'AAPL', 'start_date': START, 'end_date': END}
+
+        first = await fa.calculate_investment_performance.ainvoke(args)
+        second = await fa.compare_investment_performance.ainvoke(
+            {'symbols': ['AAPL'], 'start_date': START, 'end_date': END}
+        )
+
+        assert sorted(fmp) == ['AAPL', 'SPY']
+        assert first.split('**Period:**')[1] in second
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_are_refetched(self, fmp, monkeypatch):
+        monkeypatch.setattr(fa, 'EOD_CACHE_TTL_SECONDS', -1)
+
+        await fa.get_historical_prices_async('AAPL', START, END)
+        await fa.get_historical_prices_async('AAPL', START, END)
+
+        assert fmp == ['AAPL', 'AAPL']
+
+    @pytest.mark.asyncio
+    async def test_errors_keep_sync_semantics(self, monkeypatch):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(429)))
+        monkeypatch.setenv('FINANCIAL_MODELING_PREP_API_KEY', 'test-key')
+        monkeypatch.setattr(fa, '_get_fmp_http_client', lambda: client)
+        monkeypatch.setattr(fa, '_load_stored_eod_series', AsyncMock(return_value=None))
+        fa.clear_eod_series_cache()
+
+        with pytest.raises(Exception, match='rate limit'):
+            await fa.get_historical_prices_async('AAPL', START, END)
+        with pytest.raises(ValueError):
+            await fa.get_historical_prices_async('AAPL', END, START)
+
+
+class TestStoredPrices:
+
+    @pytest.mark.asyncio
+    async def test_stored_series_skips_fmp(self, fmp, monkeypatch):
+        service = MagicMock(get_stored_eod_series=AsyncMock(side_effect=lambda symbol, start, end: _series(symbol)))
+        monkeypatch.setattr(fa, '_load_stored_eod_series', _real_load_stored)
+
+        with patch('services.historical_price_service.get_historical_price_service', return_value=service):
+            result = await fa.get_historical_prices_async('AAPL', START, END)
+
+        assert result['data_points'] == 30
+        assert fmp == []
+
+    @pytest.mark.asyncio
+    async def test_recent_ranges_are_not_read_from_store(self):
+        service = MagicMock(get_stored_eod_series=AsyncMock())
+
+        with patch('services.historical_price_service.get_historical_price_service', return_value=service):
+            assert await _real_load_stored('AAPL', START, date.today().isoformat()) is None
+
+        service.get_stored_eod_series.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_store_must_cover_the_range(self):
+        from services.historical_price_service import HistoricalPriceService
+
+        rows = [
+            {'price_date': '2025-01-02', 'close_price': 100},
+            {'price_date': '2025-01-03', 'close_price': 101},
+            {'price_date': '2025-01-06', 'close_price': 102},
+            {'price_date': '2025-02-20', 'close_price': 110},
+        ]
+        query = MagicMock()
+        for method in ('select', 'eq', 'is_', 'gte', 'lte', 'order'):
+            getattr(query, method).return_value = query
+        service = HistoricalPriceService()
+        service.supabase = MagicMock(table=MagicMock(return_value=query))
+
+        # Weekend between Jan 3 and Jan 6 is fine
+        query.execute.return_value = MagicMock(data=rows[:3])
+        series = await service.get_stored_eod_series('AAPL', date(2025, 1, 1), date(2025, 1, 6))
+        assert series[0] == {'date': '2025-01-02', 'close': 100.0}
+        assert len(series) == 3
+
+        # A missing month is not
+        query.execute.return_value = MagicMock(data=rows)
+        assert await service.get_stored_eod_series('AAPL', date(2025, 1, 2), date(2025, 2, 20)) is None
+
+        # Nor is a series that stops well before the end date
+        query.execute.return_value = MagicMock(data=rows[:3])
+        assert await service.get_stored_eod_series('AAPL', date(2025, 1, 2), date(2025, 1, 31)) is None
+
+
+_real_load_stored = fa._load_stored_eod_series
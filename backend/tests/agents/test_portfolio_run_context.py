@@ -0,0 +1,158 @@
+"""
+Tests for run-scoped memoization in PortfolioDataProvider.
+
+Providers created for the same user within one LangGraph run must share
+mode, holdings, cash and activities fetches; different runs and users must not.
+"""
+
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from clera_agents.services import portfolio_data_provider as pdp
+from clera_agents.services.portfolio_data_provider import (
+    PortfolioDataProvider,
+    PortfolioRunContext,
+    clear_run_contexts,
+    get_run_context,
+)
+
+
+class CountingSupabase:
+    """Supabase stand-in that counts queries per table."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.calls = {}
+
+    def table(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        query = MagicMock()
+        for method in ('select', 'eq', 'single', 'limit', 'gte', 'lte', 'order', 'in_'):
+            getattr(query, method).return_value = query
+        query.not_.is_.return_value = query
+        query.execute.return_value = MagicMock(data=self.tables.get(name))
+        return query
+
+
+def _hybrid_tables():
+    return {
+        'user_onboarding': {'alpaca_account_id': 'alpaca-1', 'plaid_connection_completed_at': '2025-01-01'},
+        'user_investment_accounts': [],
+        'user_aggregated_holdings': [
+            {'symbol': 'VTI', 'security_name': 'Vanguard Total', 'security_type': 'etf',
+             'total_quantity': 10, 'total_market_value': 2500, 'total_cost_basis': 2000,
+             'unrealized_gain_loss': 500, 'unrealized_gain_loss_percent': 25.0},
+            {'symbol': 'U S Dollar', 'security_name': 'Cash', 'security_type': 'cash',
+             'total_quantity': 300, 'total_market_value': 300, 'total_cost_basis': 300,
+             'unrealized_gain_loss': 0, 'unrealized_gain_loss_percent': 0},
+        ],
+        'plaid_investment_transactions': [
+            {'date': '2025-01-05', 'type': 'buy', 'symbol': 'VTI', 'name': 'Buy VTI',
+             'quantity': 1, 'price': 250, 'amount': 250},
+        ],
+    }
+
+
+@pytest.fixture
+def backends():
+    supabase = CountingSupabase(_hybrid_tables())
+    broker = MagicMock()
+    broker.get_account_by_id.return_value = SimpleNamespace(cash='1000')
+    broker.get_all_positions_for_account.return_value = []
+    clear_run_contexts()
+    with patch.object(pdp, 'get_supabase_client', return_value=supabase), \
+         patch.object(pdp, 'get_broker_client', return_value=broker):
+        yield supabase, broker
+    clear_run_contexts()
+
+
+def _config(run_id, user_id='user-1'):
+    return {'configurable': {'user_id': user_id, 'run_id': run_id}}
+
+
+class TestRunContext:
+
+    def test_memoize_counts_hits_and_misses(self):
+        context = PortfolioRunContext('user-1', 'run-1')
+        loader = MagicMock(return_value=[1, 2])
+
+        assert context.memoize(('holdings',), loader) == [1, 2]
+        assert context.memoize(('holdings',), loader) == [1, 2]
+
+        loader.assert_called_once()
+        assert (context.hits, context.misses) == (1, 1)
+
+    def test_loader_errors_are_not_cached(self):
+        context = PortfolioRunContext('user-1', 'run-1')
+        loader = MagicMock(side_effect=[RuntimeError('boom'), 'ok'])
+
+        with pytest.raises(RuntimeError):
+            context.memoize(('mode',), loader)
+        assert context.memoize(('mode',), loader) == 'ok'
+
+    def test_contexts_are_keyed_by_user_and_run(self):
+        clear_run_contexts()
+        shared = get_run_context('user-1', _config('run-1'))
+
+        assert get_run_context('user-1', _config('run-1')) is shared
+        assert get_run_context('user-1', _config('run-2')) is not shared
+        assert get_run_context('user-2', _config('run-1', 'user-2')) is not shared
+        # The per-tool callback run_id is not the supervisor run
+        assert get_run_context('user-1', {'run_id': 'tool-call', 'configurable': {}}) is not shared
+        clear_run_contexts()
+
+    def test_registry_is_bounded(self, monkeypatch):
+        clear_run_contexts()
+        monkeypatch.setattr(pdp, 'MAX_RUN_CONTEXTS', 3)
+        for i in range(10):
+            get_run_context('user-1', _config(f"run-{i}"))
+        assert len(pdp._run_contexts) == 3
+        clear_run_contexts()
+
+
+class TestProviderMemoization:
+
+    def test_one_turn_fetches_each_source_once(self, backends):
+        supabase, broker = backends
+        config = _config('run-1')
+
+        # Summary, rebalance and activities tools each build their own provider
+        summary = PortfolioDataProvider('user-1', config=config)
+        summary.get_user_mode()
+        assert summary.get_cash_balance() == Decimal('1000')
+        assert summary.get_alpaca_account().cash == '1000'
+        assert summary.get_aggregated_cash_balance() == Decimal('300')
+        holdings = summary.get_holdings()
+
+        rebalance = PortfolioDataProvider('user-1', config=config)
+        assert rebalance.get_holdings() == holdings
+        rebalance.get_cash_balance()
+
+        activities = PortfolioDataProvider('user-1', config=config)
+        first = activities.get_account_activities_plaid(months_back=12)
+        assert activities.get_account_activities_plaid(months_back=12) == first
+
+        assert supabase.calls['user_onboarding'] == 1
+        assert supabase.calls['user_aggregated_holdings'] == 1
+        assert supabase.calls['plaid_investment_transactions'] == 1
+        broker.get_account_by_id.assert_called_once_with('alpaca-1')
+        broker.get_all_positions_for_account.assert_called_once()
+        assert summary.run_context.hits > summary.run_context.misses
+
+    def test_new_run_refetches(self, backends):
+        supabase, broker = backends
+
+        PortfolioDataProvider('user-1', config=_config('run-1')).get_holdings()
+        PortfolioDataProvider('user-1', config=_config('run-2')).get_holdings()
+
+        assert supabase.calls['user_aggregated_holdings'] == 2
+        assert broker.get_all_positions_for_account.call_count == 2
+
+    def test_returned_lists_are_copies(self, backends):
+        config = _config('run-1')
+        holdings = PortfolioDataProvider('user-1', config=config).get_holdings()
+        holdings.clear()
+
+        assert PortfolioDataProvider('user-1', config=config).get_holdings()
@@ -0,0 +1,247 @@
+"""
+Tests for the persistent agent checkpointer: conversation state survives a
+restart, interrupts resume from disk, old checkpoints are pruned and task
+writes are batched with their checkpoint. Runs a small message graph over a
+temporary SQLite file.
+"""
+
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Annotated, List
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.types import Command, interrupt
+from typing_extensions import TypedDict
+
+from clera_agents.checkpointer import (
+    CompactSerializer,
+    SQLCheckpointSaver,
+    SQLiteCheckpointBackend,
+    get_checkpointer,
+)
+
+
+class ChatState(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+    user_id: str
+
+
+def _reply(state: ChatState):
+    last = state["messages"][-1].content
+    return {"messages": [AIMessage(content=f"echo: {last}")]}
+
+
+def _confirm(state: ChatState):
+    answer = interrupt("Confirm the trade?")
+    return {"messages": [AIMessage(content=f"confirmed: {answer}")]}
+
+
+def _build_graph(saver, with_interrupt=False):
+    builder = StateGraph(ChatState)
+    builder.add_node("reply", _reply)
+    builder.set_entry_point("reply")
+    if with_interrupt:
+        builder.add_node("confirm", _confirm)
+        builder.add_edge("reply", "confirm")
+        builder.add_edge("confirm", END)
+    else:
+        builder.add_edge("reply", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _build_supervisor_graph(saver, with_interrupt=False):
+    """Root graph whose node is a compiled subgraph, like the supervisor's sub-agents."""
+    agent = StateGraph(ChatState)
+    agent.add_node("reply", _reply)
+    agent.set_entry_point("reply")
+    if with_interrupt:
+        agent.add_node("confirm", _confirm)
+        agent.add_edge("reply", "confirm")
+        agent.add_edge("confirm", END)
+    else:
+        agent.add_edge("reply", END)
+    builder = StateGraph(ChatState)
+    builder.add_node("agent", agent.compile())
+    builder.set_entry_point("agent")
+    builder.add_edge("agent", END)
+    return builder.compile(checkpointer=saver)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite3")
+
+
+def _saver(db_path, **kwargs):
+    return SQLCheckpointSaver(SQLiteCheckpointBackend(db_path), **kwargs)
+
+
+def test_conversation_resumes_after_restart(db_path):
+    saver = _saver(db_path)
+    graph = _build_graph(saver)
+    graph.invoke({"messages": [HumanMessage(content="hi")], "user_id": "u1"}, _config("t1"))
+    graph.invoke({"messages": [HumanMessage(content="again")]}, _config("t1"))
+    saver.close()
+
+    restarted = _build_graph(_saver(db_path))
+    state = restarted.get_state(_config("t1")).values
+    assert [m.content for m in state["messages"]] == ["hi", "echo: hi", "again", "echo: again"]
+    assert state["user_id"] == "u1"
+    assert restarted.get_state(_config("other")).values == {}
+
+
+def test_interrupt_resumes_from_another_process(db_path):
+    graph = _build_graph(_saver(db_path, batch_size=50, flush_interval=60), with_interrupt=True)
+    graph.invoke({"messages": [HumanMessage(content="buy AAPL")], "user_id": "u1"}, _config("trade"))
+
+    # A second replica picks the interrupted run up without the first one flushing on its own
+    other = _build_graph(_saver(db_path), with_interrupt=True)
+    assert other.get_state(_config("trade")).next == ("confirm",)
+    result = other.invoke(Command(resume="yes"), _config("trade"))
+    assert result["messages"][-1].content == "confirmed: yes"
+
+
+def test_old_checkpoints_and_blobs_are_pruned(db_path):
+    saver = _saver(db_path, keep_last=3)
+    graph = _build_graph(saver)
+    graph.invoke({"messages": [HumanMessage(content="turn 0")], "user_id": "u1"}, _config("t1"))
+    for turn in range(1, 10):
+        graph.invoke({"messages": [HumanMessage(content=f"turn {turn}")]}, _config("t1"))
+
+    assert len(list(saver.list(_config("t1")))) == 3
+    blobs = saver.backend.fetch("SELECT channel, COUNT(*) FROM agent_checkpoint_blobs GROUP BY channel")
+    assert dict(blobs)["messages"] <= 3
+    # user_id never changed after the first turn, so its only blob is still referenced
+    assert dict(blobs)["user_id"] == 1
+    assert len(graph.get_state(_config("t1")).values["messages"]) == 20
+
+    saver.prune(["t1"])
+    assert len(list(saver.list(_config("t1")))) == 1
+    assert len(graph.get_state(_config("t1")).values["messages"]) == 20
+
+    saver.delete_thread("t1")
+    assert saver.get_tuple(_config("t1")) is None
+
+
+def test_finished_subgraph_runs_are_pruned(db_path):
+    saver = _saver(db_path, keep_last=2)
+    graph = _build_supervisor_graph(saver)
+    for turn in range(20):
+        graph.invoke({"messages": [HumanMessage(content=f"turn {turn}")], "user_id": "u1"}, _config("t1"))
+
+    count = lambda sql: saver.backend.fetch(sql)[0][0]
+    # Each turn ran the subgraph in a new namespace; only the run after the oldest kept root survives
+    assert count("SELECT COUNT(DISTINCT checkpoint_ns) FROM agent_checkpoints") == 2
+    assert count("SELECT COUNT(DISTINCT checkpoint_ns) FROM agent_checkpoint_blobs") == 2
+    assert count("SELECT COUNT(*) FROM agent_checkpoints") <= 4
+    assert len(graph.get_state(_config("t1")).values["messages"]) == 40
+
+    saver.prune(["t1"])
+    assert count("SELECT COUNT(DISTINCT checkpoint_ns) FROM agent_checkpoints") <= 2
+    assert len(graph.get_state(_config("t1")).values["messages"]) == 40
+
+
+def test_interrupted_subgraph_resumes_after_pruning(db_path):
+    saver = _saver(db_path, keep_last=1)
+    graph = _build_supervisor_graph(saver, with_interrupt=True)
+    for turn in range(3):
+        graph.invoke({"messages": [HumanMessage(content=f"buy {turn}")], "user_id": "u1"}, _config("trade"))
+        graph.invoke(Command(resume=f"yes {turn}"), _config("trade"))
+    graph.invoke({"messages": [HumanMessage(content="buy AAPL")]}, _config("trade"))
+    assert saver.backend.fetch("SELECT COUNT(DISTINCT checkpoint_ns) FROM agent_checkpoints")[0][0] <= 3
+
+    other = _build_supervisor_graph(_saver(db_path, keep_last=1), with_interrupt=True)
+    assert other.get_state(_config("trade")).next == ("agent",)
+    result = other.invoke(Command(resume="yes"), _config("trade"))
+    assert result["messages"][-1].content == "confirmed: yes"
+    assert len(result["messages"]) == 12
+
+
+def test_task_writes_are_batched_with_their_checkpoint(db_path):
+    unbatched = _saver(db_path, keep_last=None, batch_size=1)
+    _build_graph(unbatched).invoke({"messages": [HumanMessage(content="hi")], "user_id": "u1"}, _config("a"))
+
+    batched = _saver(db_path, keep_last=None, batch_size=100, flush_interval=60)
+    _build_graph(batched).invoke({"messages": [HumanMessage(content="hi")], "user_id": "u1"}, _config("b"))
+    assert batched.flushes == 0
+    # Reads see buffered writes
+    assert len(list(batched.list(_config("b")))) == len(list(unbatched.list(_config("a"))))
+    assert batched.flushes == 1
+    assert unbatched.flushes == len(list(unbatched.list(_config("a"))))
+
+
+class _FlakyBackend(SQLiteCheckpointBackend):
+    """SQLite backend whose next `failures` transactions raise before committing."""
+
+    failures = 0
+
+    @contextmanager
+    def transaction(self):
+        with super().transaction() as tx:
+            yield tx
+            if self.failures:
+                self.failures -= 1
+                raise sqlite3.OperationalError("database is locked")
+
+
+def test_failed_flush_keeps_buffered_rows(db_path):
+    backend = _FlakyBackend(db_path)
+    saver = SQLCheckpointSaver(backend, keep_last=None, batch_size=100, flush_interval=60)
+    _build_graph(saver).invoke({"messages": [HumanMessage(content="hi")], "user_id": "u1"}, _config("t1"))
+
+    backend.failures = 1
+    with pytest.raises(sqlite3.OperationalError):
+        saver.flush()
+    assert backend.fetch("SELECT COUNT(*) FROM agent_checkpoints")[0][0] == 0
+
+    saver.flush()
+    restarted = _build_graph(_saver(db_path))
+    assert restarted.get_state(_config("t1")).values["messages"][-1].content == "echo: hi"
+
+
+def test_timer_flush_failure_is_logged_and_retried(db_path, caplog):
+    backend = _FlakyBackend(db_path)
+    backend.failures = 1
+    saver = SQLCheckpointSaver(backend, keep_last=None, batch_size=100, flush_interval=0.05)
+    _build_graph(saver).invoke({"messages": [HumanMessage(content="hi")], "user_id": "u1"}, _config("t1"))
+
+    deadline = time.monotonic() + 5
+    while saver.flushes == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    assert saver.flushes == 1
+    assert "Checkpoint flush failed" in caplog.text
+    assert backend.fetch("SELECT COUNT(*) FROM agent_checkpoints")[0][0] > 0
+
+
+def test_compact_serializer_compresses_large_values():
+    serde = CompactSerializer()
+    big = [HumanMessage(content="portfolio summary " * 200)]
+    type_, data = serde.dumps_typed(big)
+
+    assert type_.endswith("+zlib") and len(data) < 1000
+    assert serde.loads_typed((type_, data))[0].content == big[0].content
+    assert not serde.dumps_typed("small")[0].endswith("+zlib")
+
+
+@pytest.mark.asyncio
+async def test_async_graph_runs_on_sql_saver(db_path):
+    graph = _build_graph(_saver(db_path))
+    await graph.ainvoke({"messages": [HumanMessage(content="hi")], "user_id": "u1"}, _config("t1"))
+
+    state = await graph.aget_state(_config("t1"))
+    assert state.values["messages"][-1].content == "echo: hi"
+
+
+def test_platform_backend_compiles_without_checkpointer():
+    assert get_checkpointer("platform") is None
+    with pytest.raises(ValueError):
+        get_checkpointer("redis")
@@ -0,0 +1,291 @@
+"""
+Tests for the shared web_search response cache: exact and reworded hits,
+session/type freshness, cross-process sharing through Redis, single-flight
+coalescing and hit/latency reporting. Redis is an in-memory stand-in and the
+embedder a bag-of-words hash, so nothing leaves the process.
+"""
+
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pytest
+import pytz
+
+from clera_agents.services.web_search_cache import (
+    WebSearchCache,
+    classify_query,
+    extract_entities,
+    get_market_session,
+    normalize_query,
+)
+
+EASTERN = pytz.timezone('US/Eastern')
+FAR_FUTURE = EASTERN.localize(datetime(2100, 1, 1))
+
+
+class InMemoryRedis:
+    """The handful of Redis commands the cache uses."""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def exists(self, key):
+        return int(key in self.values)
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    def hlen(self, key):
+        return len(self.hashes.get(key, {}))
+
+    def hincrby(self, key, field, amount):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = str(int(bucket.get(field, 0)) + amount)
+
+    def hincrbyfloat(self, key, field, amount):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = str(float(bucket.get(field, 0)) + amount)
+
+    def expire(self, key, seconds):
+        return True
+
+    def ttl(self, key):
+        return -1
+
+
+def bag_of_words(text, dim=256):
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in text.split():
+        vector[zlib.crc32(token.encode()) % dim] += 1.0
+    return vector
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def redis_client():
+    return InMemoryRedis()
+
+
+@pytest.fixture
+def make_cache(clock, redis_client):
+    def make(session='open', next_change=FAR_FUTURE, embed=bag_of_words, **kwargs):
+        return WebSearchCache(
+            embed=embed, redis_client=redis_client, similarity_threshold=0.7,
+            session_fn=lambda: (session, next_change), clock=clock, **kwargs
+        )
+    return make
+
+
+class Search:
+    """Stands in for the Perplexity call and counts it."""
+
+    def __init__(self, answer='answer', delay=0.0):
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.answer
+
+
+def test_query_classification_and_entities():
+    assert normalize_query("  Why is NVDA down today?? ") == normalize_query("why is nvda DOWN today")
+    assert classify_query("Why is NVDA down today?") == 'realtime'
+    assert classify_query("Latest earnings news for Apple") == 'news'
+    assert classify_query("What is a Roth IRA?") == 'reference'
+    assert classify_query("Give me detailed research on the semiconductor cycle") == 'in_depth'
+    assert extract_entities("Why is $nvda down 5% vs AMD?") == ['5%', 'AMD', 'NVDA']
+
+
+def test_market_sessions_and_next_change():
+    # Tuesday 2025-11-18
+    session, next_change = get_market_session(EASTERN.localize(datetime(2025, 11, 18, 7, 0)))
+    assert session == 'pre_market' and next_change.hour == 9 and next_change.minute == 30
+    assert get_market_session(EASTERN.localize(datetime(2025, 11, 18, 11, 0)))[0] == 'open'
+    assert get_market_session(EASTERN.localize(datetime(2025, 11, 18, 17, 0)))[0] == 'after_hours'
+    # Friday night rolls to Monday's pre-market
+    session, next_change = get_market_session(EASTERN.localize(datetime(2025, 11, 21, 22, 0)))
+    assert session == 'closed' and next_change.date().isoformat() == '2025-11-24' and next_change.hour == 4
+
+
+def test_exact_hit_reports_hit_rate_and_latency_saved(make_cache):
+    cache = make_cache()
+    search = Search(delay=0.05)
+
+    assert cache.get_or_fetch("Why is NVDA down today?", 'sonar', search) == 'answer'
+    assert cache.get_or_fetch("why is nvda down today", 'sonar', search) == 'answer'
+    assert search.calls == 1
+
+    metrics = cache.get_metrics()
+    assert metrics['lookups'] == 2 and metrics['l1_hits'] == 1 and metrics['misses'] == 1
+    assert metrics['hit_rate'] == 0.5
+    assert metrics['latency_saved_seconds'] >= 0.04
+
+    # A different model is a different answer
+    cache.get_or_fetch("why is nvda down today", 'sonar-pro', search)
+    assert search.calls == 2
+
+
+def test_reworded_query_hits_but_other_ticker_does_not(make_cache):
+    cache = make_cache()
+    search = Search()
+
+    cache.get_or_fetch("Why is NVDA down today?", 'sonar', search)
+    cache.get_or_fetch("why is NVDA stock falling today", 'sonar', search)
+    assert search.calls == 1
+    assert cache.get_metrics()['semantic_hits'] == 1
+
+    cache.get_or_fetch("Why is AMD down today?", 'sonar', search)
+    cache.get_or_fetch("why is amd down today", 'sonar', search)  # exact hit on the AMD entry
+    cache.get_or_fetch("why is intel down today", 'sonar', search)  # no ticker written, subject differs
+    assert search.calls == 3
+
+
+def test_entries_are_shared_across_processes_through_redis(make_cache, redis_client):
+    search = Search()
+    make_cache().get_or_fetch("Why is NVDA down today?", 'sonar', search)
+
+    other_process = make_cache()
+    assert other_process.get_or_fetch("why is nvda down today", 'sonar', search) == 'answer'
+    third_process = make_cache()
+    assert third_process.get_or_fetch("Why is NVDA stock falling today?", 'sonar', search) == 'answer'
+
+    assert search.calls == 1
+    assert other_process.get_metrics()['redis_hits'] == 1
+    assert third_process.get_metrics()['semantic_hits'] == 1
+    [today] = third_process.get_shared_metrics(days=1)
+    assert today['hits'] == 2 and today['misses'] == 1 and today['hit_rate'] == 0.6667
+
+
+def test_freshness_depends_on_session_and_query_type(make_cache, clock):
+    search = Search()
+    open_cache = make_cache(session='open')
+    open_cache.get_or_fetch("Why is NVDA down today?", 'sonar', search)
+    open_cache.get_or_fetch("What is a Roth IRA?", 'sonar', search)
+
+    clock.now += 10 * 60
+    open_cache.get_or_fetch("Why is NVDA down today?", 'sonar', search)  # stale after minutes
+    open_cache.get_or_fetch("What is a Roth IRA?", 'sonar', search)  # still fresh
+    assert search.calls == 3
+
+    # Pre-market answers about the move expire at the open, whatever the TTL
+    bell = clock.now + 60
+    premarket = make_cache(session='pre_market', next_change=datetime.fromtimestamp(bell, tz=pytz.utc))
+    premarket.get_or_fetch("Why is TSLA up this morning?", 'sonar', search)
+    clock.now = bell + 1
+    premarket.get_or_fetch("Why is TSLA up this morning?", 'sonar', search)
+    assert search.calls == 5
+
+
+def test_identical_concurrent_queries_fetch_once(make_cache):
+    cache = make_cache(embed=None)
+    search = Search(delay=0.2)
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_fetch("Why is NVDA down today?", 'sonar', search)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['answer'] * 5
+    assert search.calls == 1
+    assert cache.get_metrics()['coalesced'] == 4
+
+
+def test_waits_for_another_process_holding_the_lock(make_cache, redis_client):
+    first, second = make_cache(embed=None), make_cache(embed=None)
+    search = Search()
+    redis_client.set(f"web_search_cache:lock:{first._plan('Why is NVDA down today?', 'sonar')['key']}", '1')
+
+    def other_process_finishes():
+        time.sleep(0.3)
+        first._fetch(first._plan("Why is NVDA down today?", 'sonar'), Search('from other process'))
+
+    threading.Thread(target=other_process_finishes).start()
+    assert second.get_or_fetch("Why is NVDA down today?", 'sonar', search) == 'from other process'
+    assert search.calls == 0
+
+
+def test_failed_searches_are_not_cached(make_cache):
+    cache = make_cache()
+
+    def failing():
+        raise RuntimeError("perplexity unavailable")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch("Why is NVDA down today?", 'sonar', failing)
+
+    search = Search()
+    assert cache.get_or_fetch("Why is NVDA down today?", 'sonar', search) == 'answer'
+    assert search.calls == 1
+    assert cache.get_metrics()['fetch_errors'] == 1
+
+
+def test_cached_answers_are_replayed_to_streaming_callers(make_cache):
+    cache = make_cache()
+    search = Search('NVDA fell on export news.\n\n<!-- CITATIONS: https://example.com -->')
+    streamed = []
+
+    cache.get_or_fetch("Why is NVDA down today?", 'sonar', search, on_cached=streamed.append)
+    assert streamed == []  # the live search streams itself
+
+    cache.get_or_fetch("Why is NVDA down today?", 'sonar', search, on_cached=streamed.append)
+    assert streamed == ['NVDA fell on export news.\n\n<!-- CITATIONS: https://example.com -->']
+
+
+def test_falls_back_to_in_process_cache_without_redis(clock):
+    class DownRedis:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError("redis down")
+            return fail
+
+    cache = WebSearchCache(embed=None, redis_client=DownRedis(), clock=clock,
+                           session_fn=lambda: ('open', FAR_FUTURE))
+    search = Search()
+    cache.get_or_fetch("What is a Roth IRA?", 'sonar', search)
+    cache.get_or_fetch("What is a Roth IRA?", 'sonar', search)
+    assert search.calls == 1
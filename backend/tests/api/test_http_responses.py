@@ -0,0 +1,198 @@
+"""
+Tests for the shared response layer: fast JSON serialization, negotiated
+compression and streamed JSON arrays.
+
+Includes bytes-on-wire and serialization CPU benchmarks on an asset-list
+sized payload.
+"""
+
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils import http_responses
+from utils.http_responses import (
+    CompressionMiddleware,
+    FastJSONResponse,
+    dumps_json,
+    etag_json_response,
+    negotiate_encoding,
+    streaming_json_response,
+)
+
+
+def _assets(count=8000):
+    return [
+        {
+            "id": f"b0b6dd9d-8b9b-48a9-ba46-b9d54906e4{i % 100:02d}",
+            "symbol": f"SYM{i}",
+            "name": f"Example Holdings Corporation {i} Common Stock",
+            "exchange": "NASDAQ" if i % 2 else "NYSE",
+            "tradable": True,
+            "fractionable": i % 3 == 0,
+        }
+        for i in range(count)
+    ]
+
+
+def _app():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/assets")
+    async def assets():
+        return streaming_json_response({"success": True}, "assets", _assets(), trailer={"count": 8000})
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    async def large():
+        return {"assets": _assets(2000)}
+
+    @app.get("/chart")
+    async def chart(request: Request):
+        return etag_json_response(request, {"equity": list(range(2000))})
+
+    return app
+
+
+class TestDumpsJson:
+
+    def test_matches_stdlib_output(self):
+        payload = {
+            "value": Decimal("12.50"),
+            "as_of": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            "nested": [{"a": 1, "b": None}],
+            1: "int key",
+        }
+        expected = json.dumps(payload, default=str, separators=(',', ':')).encode()
+        assert dumps_json(payload) == expected
+
+    @pytest.mark.skipif(http_responses.orjson is None, reason="documents the orjson path")
+    def test_documented_differences_from_stdlib(self):
+        assert dumps_json({"name": "Société"}) == '{"name":"Société"}'.encode('utf-8')
+        assert dumps_json([float("nan"), float("inf")]) == b'[null,null]'
+        with pytest.raises(TypeError):
+            dumps_json(2 ** 64)
+
+
+class TestNegotiateEncoding:
+
+    def test_prefers_brotli_when_available(self, monkeypatch):
+        monkeypatch.setattr(http_responses, "brotli", object())
+        assert negotiate_encoding("gzip, deflate, br") == "br"
+
+    def test_gzip_without_brotli(self, monkeypatch):
+        monkeypatch.setattr(http_responses, "brotli", None)
+        assert negotiate_encoding("gzip, deflate, br") == "gzip"
+
+    def test_respects_q_zero(self):
+        assert negotiate_encoding("gzip;q=0, identity") is None
+        assert negotiate_encoding(None) is None
+
+
+class TestCompressionMiddleware:
+
+    def test_small_responses_are_not_compressed(self):
+        response = TestClient(_app()).get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == {"ok": True}
+
+    def test_large_response_is_gzipped(self):
+        response = TestClient(_app()).get("/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert len(response.json()["assets"]) == 2000
+
+    def test_identity_when_not_accepted(self):
+        response = TestClient(_app()).get("/large", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+    def test_etag_is_weak_and_revalidates_across_encodings(self):
+        client = TestClient(_app())
+        gzipped = client.get("/chart", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/chart", headers={"Accept-Encoding": "identity"})
+
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert gzipped.headers["etag"].startswith('W/"')
+        assert gzipped.headers["etag"] == plain.headers["etag"]
+
+        revalidated = client.get("/chart", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == gzipped.headers["etag"]
+
+    def test_strong_etag_from_handler_is_weakened_when_compressed(self):
+        app = FastAPI()
+        app.add_middleware(CompressionMiddleware)
+
+        @app.get("/strong")
+        async def strong():
+            return FastJSONResponse({"assets": _assets(500)}, headers={"ETag": '"abc"'})
+
+        response = TestClient(app).get("/strong", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["etag"] == 'W/"abc"'
+
+
+class TestStreamingJsonResponse:
+
+    def test_streamed_document_is_valid_json(self):
+        response = TestClient(_app()).get("/assets", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        body = response.json()
+        assert body["success"] is True
+        assert body["count"] == 8000
+        assert body["assets"] == _assets()
+
+    @pytest.mark.parametrize("envelope,items,trailer", [
+        ({}, [], None),
+        ({"a": 1}, [1, 2, 3], None),
+        ({}, [{"x": 1}], {"total": 1}),
+    ])
+    def test_edge_shapes(self, envelope, items, trailer):
+        app = FastAPI()
+
+        @app.get("/")
+        async def endpoint():
+            return streaming_json_response(envelope, "items", iter(items), trailer=trailer, batch_size=2)
+
+        body = TestClient(app).get("/", headers={"Accept-Encoding": "identity"}).json()
+        assert body == {**envelope, "items": items, **(trailer or {})}
+
+
+class TestResponseBenchmarks:
+    """Bytes on wire and serialization CPU for an asset-list payload."""
+
+    def test_bytes_on_wire(self):
+        client = TestClient(_app())
+        identity = client.get("/assets", headers={"Accept-Encoding": "identity"})
+        gzipped = client.get("/assets", headers={"Accept-Encoding": "gzip"})
+        stdlib = len(json.dumps({"success": True, "assets": _assets(), "count": 8000}).encode())
+
+        print(f"\nassets payload on wire: stdlib json {stdlib} bytes, "
+              f"compact {identity.num_bytes_downloaded} bytes, gzip {gzipped.num_bytes_downloaded} bytes")
+        assert gzipped.json() == identity.json()
+        assert gzipped.num_bytes_downloaded < stdlib * 0.25
+
+    def test_serialization_cpu(self):
+        payload = {"success": True, "assets": _assets()}
+
+        def best_of(fn, runs=5):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        stdlib = best_of(lambda: json.dumps(payload).encode())
+        fast = best_of(lambda: dumps_json(payload))
+        print(f"\nserialize 8000 assets: stdlib {stdlib * 1000:.2f}ms, dumps_json {fast * 1000:.2f}ms")
+        if http_responses.orjson is not None:
+            assert fast < stdlib
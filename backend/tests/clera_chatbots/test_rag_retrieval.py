@@ -0,0 +1,158 @@
+"""
+Tests for the clera_chatbots retrieval layer: local vector index, embedding
+cache and cached retriever. Fully offline (fixture corpus, hashing embedder).
+"""
+
+import os
+import numpy as np
+import pytest
+
+from clera_chatbots.retrieval import (
+    CachedEmbeddings,
+    CachedRetriever,
+    HashingEmbeddings,
+    LocalVectorIndex,
+    build_retriever,
+    normalize_query,
+    read_corpus,
+)
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'financial_corpus.jsonl')
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    """Stands in for the remote/model embedding call and counts it."""
+
+    def __init__(self):
+        super().__init__(dim=128)
+        self.query_calls = 0
+        self.document_calls = 0
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        self.document_calls += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def corpus():
+    return read_corpus(CORPUS_PATH)
+
+
+@pytest.fixture
+def local_index(tmp_path, corpus):
+    texts, metadatas = corpus
+    vectors = HashingEmbeddings(dim=128).embed_documents(texts)
+    return LocalVectorIndex.build(str(tmp_path / 'index'), texts, vectors, metadatas, model='hashing-stub')
+
+
+def _doc_ids(docs):
+    return [doc.metadata['doc_id'] for doc in docs]
+
+
+def test_normalize_query_ignores_case_punctuation_and_spacing():
+    assert normalize_query("  What is a Roth IRA?? ") == normalize_query("what is a roth   ira")
+    assert normalize_query("Is $500 a 5% return?") == "is $500 a 5% return"
+
+
+def test_local_index_retrieves_fixture_documents(local_index):
+    retriever = build_retriever(k=2, backend='local', embeddings=HashingEmbeddings(dim=128),
+                                index_path=local_index.path)
+
+    assert _doc_ids(retriever.invoke("Are Roth IRA withdrawals tax free?"))[0] == 'roth_ira'
+    assert _doc_ids(retriever.invoke("what is an expense ratio on a fund"))[0] == 'expense_ratio'
+    docs = retriever.invoke("emergency fund months of expenses")
+    assert docs[0].metadata['doc_id'] == 'emergency_fund'
+    assert docs[0].metadata['score'] >= docs[1].metadata['score']
+
+
+def test_local_index_is_memory_mapped_and_reopens(local_index):
+    reopened = LocalVectorIndex.open(local_index.path)
+
+    assert isinstance(reopened.vectors, np.memmap)
+    assert len(reopened) == 16 and reopened.dim == 128
+    query = HashingEmbeddings(dim=128).embed_query("bond duration and interest rates")
+    assert reopened.search(query, k=3) == local_index.search(query, k=3)
+
+
+def test_ivf_lists_match_exact_search_when_probing_all(tmp_path):
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(600, 32)).astype(np.float32)
+    texts = [f"doc {i}" for i in range(600)]
+    exact = LocalVectorIndex.build(str(tmp_path / 'exact'), texts, vectors, nlist=1)
+    ivf = LocalVectorIndex.build(str(tmp_path / 'ivf'), texts, vectors, nlist=16)
+
+    assert ivf.nlist == 16 and int(ivf.list_offsets[-1]) == 600
+    for query in rng.normal(size=(20, 32)):
+        expected = [doc['text'] for _, doc in exact.search(query, k=5)]
+        assert [doc['text'] for _, doc in ivf.search(query, k=5, nprobe=16)] == expected
+
+    # Probing a subset of lists still finds the nearest neighbour most of the time
+    hits = sum(
+        ivf.search(query, k=1, nprobe=4)[0][1]['text'] == exact.search(query, k=1)[0][1]['text']
+        for query in rng.normal(size=(50, 32))
+    )
+    assert hits >= 35
+
+
+def test_embedding_cache_skips_repeated_and_reworded_queries(tmp_path):
+    base = CountingEmbeddings()
+    cache = CachedEmbeddings(base, namespace='stub', cache_path=str(tmp_path / 'embeddings.sqlite3'))
+
+    first = cache.embed_query("What is a Roth IRA?")
+    assert cache.embed_query("what is a roth IRA") == first
+    assert base.query_calls == 1
+    assert cache.get_metrics()['hits'] == 1
+
+    # A new process reads the same vectors back from disk
+    restarted_base = CountingEmbeddings()
+    restarted = CachedEmbeddings(restarted_base, namespace='stub', cache_path=str(tmp_path / 'embeddings.sqlite3'))
+    assert np.allclose(restarted.embed_query("What is a Roth IRA?"), first)
+    assert restarted_base.query_calls == 0
+    assert restarted.get_metrics()['disk_hits'] == 1
+
+    # A different model never reuses another model's vectors
+    other_base = CountingEmbeddings()
+    CachedEmbeddings(other_base, namespace='other', cache_path=str(tmp_path / 'embeddings.sqlite3')) \
+        .embed_query("What is a Roth IRA?")
+    assert other_base.query_calls == 1
+
+
+def test_embedding_cache_is_bounded_and_batches_document_misses():
+    base = CountingEmbeddings()
+    cache = CachedEmbeddings(base, namespace='stub', max_entries=3)
+
+    cache.embed_documents(["a", "b", "c", "d"])
+    assert base.document_calls == 4
+    assert cache.get_metrics()['entries_in_memory'] == 3
+
+    cache.embed_documents(["c", "d", "e"])
+    assert base.document_calls == 5  # only "e" was embedded
+
+
+def test_retriever_caches_results_per_normalized_question(local_index):
+    embeddings = CachedEmbeddings(CountingEmbeddings(), namespace='stub')
+    calls = []
+
+    def search(query, k):
+        calls.append(query)
+        return [doc for _, doc in local_index.search(embeddings.embed_query(query), k)]
+
+    retriever = CachedRetriever(search, k=2, max_entries=2)
+    retriever.invoke("What is dollar cost averaging?")
+    retriever.invoke("what is dollar-cost averaging")
+    assert len(calls) == 1
+    assert retriever.get_metrics()['hits'] == 1
+
+    retriever.invoke("credit score")
+    retriever.invoke("inflation")
+    retriever.invoke("What is dollar cost averaging?")  # evicted by the two newer questions
+    assert len(calls) == 4
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        build_retriever(backend='faiss', embeddings=HashingEmbeddings())
@@ -78,4 +78,12 @@ def sample_portfolio_data():
         'today_return': 9939.16,
         'raw_return': 9939.16,
         'raw_return_percent': 6.91
-    } 
\ No newline at end of file
+    } 
+
+@pytest.fixture(autouse=True)
+def reset_holdings_snapshot_loader():
+    """Holdings snapshots are cached per process; don't leak them between tests."""
+    from utils.portfolio.holdings_snapshot_loader import get_holdings_snapshot_loader
+    get_holdings_snapshot_loader().invalidate()
+    yield
+    get_holdings_snapshot_loader().invalidate()
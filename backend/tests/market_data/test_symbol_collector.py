@@ -180,7 +180,7 @@ async def test_symbol_collector_initialization():
         )
         
         # Verify initialization
-        assert collector.broker_client is mock_instance
+        assert collector.broker_client.raw_client is mock_instance
         assert collector.unique_symbols == set()
         assert collector.redis_client is not None
 
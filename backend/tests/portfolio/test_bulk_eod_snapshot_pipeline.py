@@ -0,0 +1,227 @@
+"""
+Tests for the set-based EOD snapshot pipeline in DailyPortfolioSnapshotService.
+
+Uses a small in-memory stand-in for the Supabase query builder so the full
+stream -> compute -> bulk write path can be exercised (and timed) offline.
+"""
+
+import json
+import time
+import pytest
+from datetime import date
+from unittest.mock import Mock, patch
+
+from services.daily_portfolio_snapshot_service import DailyPortfolioSnapshotService
+
+
+class _FakeQuery:
+    """Minimal PostgREST-style query builder over in-memory rows."""
+
+    def __init__(self, db, table, max_rows=1000):
+        self.db = db
+        self.table = table
+        self.max_rows = max_rows
+        self.filters = []
+        self.order_key = None
+        self.limit_n = None
+        self.range_bounds = None
+        self.mode = 'select'
+        self.payload = None
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def order(self, key, **_kwargs):
+        self.order_key = key
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.range_bounds = (start, end)
+        return self
+
+    def eq(self, key, value):
+        self.filters.append(lambda r: r.get(key) == value)
+        return self
+
+    def gt(self, key, value):
+        self.filters.append(lambda r: r.get(key) > value)
+        return self
+
+    def in_(self, key, values):
+        values = set(values)
+        self.filters.append(lambda r: r.get(key) in values)
+        return self
+
+    def delete(self):
+        self.mode = 'delete'
+        return self
+
+    def insert(self, payload):
+        self.mode = 'insert'
+        self.payload = payload if isinstance(payload, list) else [payload]
+        return self
+
+    def execute(self):
+        self.db.calls.append((self.table, self.mode))
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.mode == 'insert':
+            rows.extend(self.payload)
+            return Mock(data=self.payload)
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if self.mode == 'delete':
+            self.db.tables[self.table] = [r for r in rows if r not in matched]
+            return Mock(data=matched)
+        if self.order_key:
+            matched.sort(key=lambda r: r[self.order_key])
+        if self.range_bounds:
+            matched = matched[self.range_bounds[0]:self.range_bounds[1] + 1]
+        if self.limit_n is not None:
+            matched = matched[:self.limit_n]
+        return Mock(data=matched[:self.max_rows])
+
+
+class _FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.calls = []
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+
+def _seed(db, n_users, holdings_per_user=3):
+    accounts, holdings = [], []
+    for u in range(n_users):
+        user_id = f"user-{u:06d}"
+        accounts.append({'user_id': user_id, 'provider': 'snaptrade', 'is_active': True})
+        for h in range(holdings_per_user):
+            holdings.append({
+                'id': f"{u:06d}-{h:03d}",
+                'user_id': user_id,
+                'symbol': ['AAPL', 'VTI', 'SPY', 'NVDA'][h % 4],
+                'security_name': 'Test Security',
+                'security_type': 'equity',
+                'total_quantity': 10,
+                'total_market_value': 1000.0,
+                'total_cost_basis': 800.0,
+                'account_contributions': [
+                    {'account_id': 'snaptrade_a', 'quantity': 6, 'market_value': 600.0},
+                    {'account_id': 'snaptrade_b', 'quantity': 4, 'market_value': 400.0},
+                ],
+                'institution_breakdown': {'Schwab': {'quantity': 10, 'value': 1000.0}},
+            })
+        holdings.append({
+            'id': f"{u:06d}-cash",
+            'user_id': user_id,
+            'symbol': 'U S Dollar',
+            'security_name': 'Cash',
+            'security_type': 'cash',
+            'total_quantity': 250,
+            'total_market_value': 250.0,
+            'total_cost_basis': 250.0,
+            'account_contributions': json.dumps([{'account_id': 'snaptrade_a', 'quantity': 250, 'market_value': 250.0}]),
+            'institution_breakdown': {},
+        })
+    db.tables['user_investment_accounts'] = accounts
+    db.tables['user_aggregated_holdings'] = holdings
+
+
+def _make_service(db, live_prices):
+    service = DailyPortfolioSnapshotService()
+    service.supabase = db
+    service.portfolio_service = Mock()
+    enrichment = Mock()
+    enrichment.fetch_live_prices_batched.return_value = live_prices
+    return service, enrichment
+
+
+class TestBulkEODPipeline:
+    """Set-based EOD snapshot pipeline."""
+
+    def test_build_snapshots_uses_live_prices_and_breakdowns(self):
+        service = DailyPortfolioSnapshotService()
+        holdings = [
+            {'user_id': 'u1', 'symbol': 'AAPL', 'security_type': 'equity', 'total_quantity': 10,
+             'total_market_value': 1000, 'total_cost_basis': 900,
+             'account_contributions': [{'account_id': 'acc1', 'quantity': 10, 'market_value': 1000}],
+             'institution_breakdown': {'Fidelity': {}}},
+            {'user_id': 'u1', 'symbol': 'CASH', 'security_type': 'cash', 'total_quantity': 50,
+             'total_market_value': 50, 'total_cost_basis': 50,
+             'account_contributions': [], 'institution_breakdown': {}},
+            {'user_id': 'u2', 'symbol': 'XYZ', 'security_type': 'equity', 'total_quantity': 1,
+             'total_market_value': 0, 'total_cost_basis': 0,
+             'account_contributions': [], 'institution_breakdown': {}},
+        ]
+
+        snapshots = service._build_eod_snapshots(holdings, {'AAPL': 120.0, 'CASH': 99.0}, date(2025, 1, 2))
+
+        # u2 has no value and is skipped
+        assert [s.user_id for s in snapshots] == ['u1']
+        snap = snapshots[0]
+        assert snap.total_value == pytest.approx(1250.0)  # 10 * 120 + cash kept at 1:1
+        assert snap.total_cost_basis == pytest.approx(950.0)
+        assert snap.securities_count == 2
+        assert snap.account_breakdown == {'acc1': pytest.approx(1200.0)}
+        assert snap.institution_breakdown == {'Fidelity': pytest.approx(1200.0), 'Unknown': pytest.approx(50.0)}
+
+    @pytest.mark.asyncio
+    async def test_pipeline_pages_holdings_and_writes_in_chunks(self):
+        db = _FakeSupabase()
+        _seed(db, n_users=2500)
+        service, enrichment = _make_service(db, {'AAPL': 110.0, 'VTI': 100.0, 'SPY': 100.0, 'NVDA': 100.0})
+        service.write_chunk_size = 1000
+
+        with patch('utils.portfolio.live_enrichment_service.get_enrichment_service', return_value=enrichment):
+            result = await service.capture_all_users_eod_snapshots(sync_stale_holdings=False)
+
+        assert result.total_users_processed == 2500
+        assert result.successful_snapshots == 2500
+        assert result.failed_snapshots == 0
+
+        history = db.tables['user_portfolio_history']
+        assert len(history) == 2500
+        row = next(r for r in history if r['user_id'] == 'user-000000')
+        assert row['snapshot_type'] == 'daily_eod'
+        # AAPL, VTI, SPY at live prices plus cash
+        assert row['total_value'] == pytest.approx(1100 + 1000 + 1000 + 250)
+        assert json.loads(row['account_breakdown'])['snaptrade_a'] == pytest.approx(660 + 600 + 600 + 250)
+
+        # Prices fetched once for all users, history written in 3 chunks (delete + insert each)
+        enrichment.fetch_live_prices_batched.assert_called_once()
+        assert db.calls.count(('user_portfolio_history', 'insert')) == 3
+        assert db.calls.count(('user_portfolio_history', 'delete')) == 3
+        # 10,000 holdings streamed in pages capped at 1000 rows, plus one empty page
+        assert db.calls.count(('user_aggregated_holdings', 'select')) == 11
+
+    @pytest.mark.asyncio
+    async def test_rerun_replaces_existing_eod_rows(self):
+        db = _FakeSupabase()
+        _seed(db, n_users=10)
+        service, enrichment = _make_service(db, {})
+
+        with patch('utils.portfolio.live_enrichment_service.get_enrichment_service', return_value=enrichment):
+            await service.capture_all_users_eod_snapshots(sync_stale_holdings=False)
+            await service.capture_all_users_eod_snapshots(sync_stale_holdings=False)
+
+        assert len(db.tables['user_portfolio_history']) == 10
+
+    def test_build_snapshots_50k_users_runtime(self):
+        """50k users x 5 holdings should be computed in seconds, not hours."""
+        db = _FakeSupabase()
+        _seed(db, n_users=50_000, holdings_per_user=4)
+        service = DailyPortfolioSnapshotService()
+
+        start = time.perf_counter()
+        snapshots = service._build_eod_snapshots(
+            db.tables['user_aggregated_holdings'],
+            {'AAPL': 110.0, 'VTI': 100.0, 'SPY': 100.0, 'NVDA': 100.0},
+            date(2025, 1, 2)
+        )
+        elapsed = time.perf_counter() - start
+
+        assert len(snapshots) == 50_000
+        assert elapsed < 60
@@ -0,0 +1,391 @@
+"""
+Tests for the materialized daily equity series used by portfolio history charts.
+
+Includes a latency benchmark comparing per-request history construction from
+user_portfolio_history rows against slicing the cached series.
+"""
+
+import time
+import pytest
+from array import array
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from utils.portfolio.equity_series_cache import DailyEquitySeries, EquitySeriesCache
+from utils.portfolio.aggregated_portfolio_service import AggregatedPortfolioService
+from services.intraday_snapshot_service import IntradaySnapshotService
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the handful of Redis commands the cache uses."""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def setex(self, key, _ttl, value):
+        self.store[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    def exists(self, key):
+        return int(key in self.store)
+
+    def hget(self, key, field):
+        return self.store.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        return [self.store.get(key, {}).get(f) for f in fields]
+
+    def hset(self, key, mapping):
+        self.store.setdefault(key, {}).update(mapping)
+
+    def expire(self, key, _ttl):
+        pass
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues FakeRedis calls and returns their results on execute()."""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        results = [getattr(self.redis_client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
+class FakeHistoryQuery:
+    """Filters in-memory user_portfolio_history rows; range() enforces a page like PostgREST."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.window = None
+        self.sort_key = None
+
+    def select(self, _columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row[column] <= value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.sort_key = column
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        return self
+
+    def execute(self):
+        matched = sorted((r for r in self.rows if all(f(r) for f in self.filters)), key=lambda r: r[self.sort_key])
+        start, end = self.window or (0, 999)
+        return MagicMock(data=matched[start:min(end + 1, start + 1000)])
+
+
+class TestDailyEquitySeries:
+    """Forward-fill, slicing and incremental updates."""
+
+    def test_from_points_forward_fills_gaps_and_zeros(self):
+        series = DailyEquitySeries.from_points([
+            (date(2025, 1, 1), 100.0),
+            (date(2025, 1, 4), 130.0),
+            (date(2025, 1, 3), 0.0),  # zero treated as missing
+        ], end_date=date(2025, 1, 6))
+
+        assert series.start_date == date(2025, 1, 1)
+        assert list(series.values) == [100.0, 100.0, 100.0, 130.0, 130.0, 130.0]
+        assert series.value_on(date(2024, 12, 31)) == 0.0
+        assert series.value_on(date(2025, 2, 1)) == 130.0
+
+    def test_set_value_patches_carried_forward_days(self):
+        series = DailyEquitySeries(start_date=date(2025, 1, 1), values=array('d', [100, 100, 100, 120]))
+        series.set_value(date(2025, 1, 2), 110.0)
+        assert list(series.values) == [100, 110, 110, 120]
+
+        series.set_value(date(2025, 1, 7), 150.0)
+        assert list(series.values) == [100, 110, 110, 120, 120, 120, 150]
+
+    def test_bytes_roundtrip(self):
+        series = DailyEquitySeries(start_date=date(2025, 1, 1), values=array('d', [1.5, 2.5]), version=7)
+        restored = DailyEquitySeries.from_bytes(series.to_bytes())
+        assert restored.start_date == series.start_date
+        assert list(restored.values) == [1.5, 2.5]
+        assert restored.version == 7
+        # 8 byte header + 8 bytes per day
+        assert len(series.to_bytes()) == 8 + 16
+
+
+class TestEquitySeriesCache:
+    """Incremental maintenance through apply_snapshots."""
+
+    def test_apply_snapshots_updates_only_cached_users(self):
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache._store('u1', DailyEquitySeries(start_date=date(2025, 1, 1), values=array('d', [100.0])))
+
+        updated = cache.apply_snapshots([
+            ('u1', date(2025, 1, 3), 105.0, {}),
+            ('u2', date(2025, 1, 3), 50.0, {}),
+        ])
+
+        assert updated == 1
+        assert list(cache.get('u1').values) == [100.0, 100.0, 105.0]
+        assert cache.get('u2') is None
+
+    def test_apply_snapshot_before_start_invalidates(self):
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache._store('u1', DailyEquitySeries(start_date=date(2025, 1, 5), values=array('d', [100.0])))
+
+        cache.apply_snapshots([('u1', date(2025, 1, 1), 90.0, {})])
+
+        assert cache.get('u1') is None
+
+
+    @pytest.mark.asyncio
+    async def test_rebuild_pages_through_intraday_gap(self):
+        today = datetime.now().date()
+        last_daily = today - timedelta(days=4)
+        rows = [{'user_id': 'u1', 'value_date': last_daily.isoformat(), 'total_value': 1000.0,
+                 'snapshot_type': 'daily_eod', 'account_breakdown': {}}]
+        # Three gap days of 3-minute snapshots: well over one 1000-row page
+        for day_offset in (3, 2, 1):
+            day = today - timedelta(days=day_offset)
+            for minute in range(0, 24 * 60, 3):
+                rows.append({
+                    'user_id': 'u1', 'value_date': day.isoformat(), 'snapshot_type': 'intraday',
+                    'total_value': 1000.0 + day_offset * 10 + minute / 10000,
+                    'created_at': f"{day.isoformat()}T{minute // 60:02d}:{minute % 60:02d}:00",
+                    'account_breakdown': {},
+                })
+
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache.supabase = MagicMock()
+        cache.supabase.table.side_effect = lambda _name: FakeHistoryQuery(rows)
+        intraday_service = IntradaySnapshotService()
+        intraday_service.supabase = cache.supabase
+
+        with patch('services.intraday_snapshot_service.get_intraday_snapshot_service', return_value=intraday_service):
+            series = await cache.rebuild('u1')
+
+        last_minute = (24 * 60 - 3) / 10000
+        assert series.value_on(today - timedelta(days=3)) == pytest.approx(1030.0 + last_minute)
+        assert series.value_on(today - timedelta(days=1)) == pytest.approx(1010.0 + last_minute)
+
+
+class TestWritersKeepSeriesFresh:
+    """History writers outside the EOD job drop the user's materialized series."""
+
+    @pytest.mark.asyncio
+    async def test_holdings_based_estimate_invalidates_series(self):
+        from services.snaptrade_holdings_based_history import HoldingsBasedHistoryEstimator
+
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache._store('u1', DailyEquitySeries(start_date=date(2025, 1, 1), values=array('d', [100.0])))
+
+        estimator = HoldingsBasedHistoryEstimator()
+        estimator.supabase = MagicMock()
+        with patch('services.snaptrade_holdings_based_history.replace_reconstructed_snapshots', return_value=2), \
+             patch('utils.portfolio.equity_series_cache.get_equity_series_cache', return_value=cache):
+            stored = await estimator._store_snapshots('u1', [{'value_date': '2025-01-01'}, {'value_date': '2025-01-02'}])
+
+        assert stored == 2
+        assert cache.get('u1') is None
+
+
+class TestAccountSeries:
+    """Per-account columns are maintained alongside the total series."""
+
+    def test_apply_snapshots_maintains_sparse_account_columns(self):
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache._store('u1', DailyEquitySeries(start_date=date(2025, 1, 1), values=array('d', [100.0])))
+
+        cache.apply_snapshots([
+            ('u1', date(2025, 1, 2), 110.0, '{"plaid_a": 60.0, "plaid_b": 50.0}'),
+            ('u1', date(2025, 1, 4), 70.0, {"plaid_a": 70.0}),
+        ])
+
+        raw_a = cache.redis_client.hget(cache._account_key('u1'), 'plaid_a')
+        raw_b = cache.redis_client.hget(cache._account_key('u1'), 'plaid_b')
+        assert list(DailyEquitySeries.from_bytes(raw_a).values) == [60.0, 0.0, 70.0]
+        assert list(DailyEquitySeries.from_bytes(raw_b).values) == [50.0]
+
+    @pytest.mark.asyncio
+    async def test_filtered_chart_is_one_cached_read(self):
+        today = datetime.now().date()
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache._store('u1', DailyEquitySeries.from_points([(today - timedelta(days=400), 1000.0)], end_date=today - timedelta(days=1)))
+        pipeline = cache.redis_client.pipeline()
+        cache._store_accounts('u1', {
+            'plaid_a': DailyEquitySeries.from_points(
+                [(today - timedelta(days=400), 500.0), (today - timedelta(days=3), 600.0), (today - timedelta(days=2), 650.0)],
+                forward_fill=False
+            )
+        }, pipeline)
+        pipeline.execute()
+
+        service = AggregatedPortfolioService()
+        service.supabase = MagicMock()
+        filter_service = MagicMock()
+        filter_service.filter_holdings_by_account = AsyncMock(return_value=[
+            {'security_type': 'equity', 'total_market_value': 640.0},
+            {'security_type': 'cash', 'total_market_value': 10.0},
+        ])
+
+        with patch('utils.portfolio.equity_series_cache.get_equity_series_cache', return_value=cache), \
+             patch('utils.portfolio.account_filtering_service.get_account_filtering_service', return_value=filter_service):
+            result = await service._get_account_specific_history('u1', '1Y', 'plaid_a')
+
+        # Snapshot rows are never read for a filtered chart
+        service.supabase.table.assert_not_called()
+        filter_service.filter_holdings_by_account.assert_awaited_once_with('u1', 'plaid_a')
+        assert result['data_source'] == 'account_breakdown_actual'
+        assert result['equity'] == [610.0, 660.0, 650.0]
+        assert result['profit_loss'] == pytest.approx([0.0, 50.0, -10.0])
+
+    @pytest.mark.asyncio
+    async def test_account_without_breakdown_uses_proportion_fallback(self):
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache._store('u1', DailyEquitySeries(start_date=date(2025, 1, 1), values=array('d', [100.0])))
+
+        service = AggregatedPortfolioService()
+        fallback = AsyncMock(return_value={'data_source': 'reconstructed_from_proportion'})
+        with patch('utils.portfolio.equity_series_cache.get_equity_series_cache', return_value=cache), \
+             patch.object(service, '_get_current_account_value_fallback', new=fallback):
+            result = await service._get_account_specific_history('u1', '1M', 'plaid_missing')
+
+        assert result['data_source'] == 'reconstructed_from_proportion'
+
+
+def _history_rows(days, end):
+    return [
+        {
+            'value_date': (end - timedelta(days=i)).isoformat(),
+            'total_value': 10000.0 + i,
+            'total_gain_loss': 0.0,
+            'total_gain_loss_percent': 0.0,
+            'created_at': datetime.now().isoformat(),
+        }
+        for i in range(days, 0, -1)
+    ]
+
+
+class TestSeriesMatchesSnapshotPath:
+    """Series slicing produces the same chart as building from rows."""
+
+    @pytest.mark.asyncio
+    async def test_same_timeline_as_snapshot_path(self):
+        today = datetime.now().date()
+        rows = _history_rows(60, today)
+        service = AggregatedPortfolioService()
+
+        supabase = MagicMock()
+        chain = supabase.table.return_value.select.return_value.eq.return_value
+        chain.gte.return_value.lte.return_value.in_.return_value.order.return_value.execute.return_value = \
+            MagicMock(data=[r for r in rows if r['value_date'] >= (today - timedelta(days=30)).isoformat()])
+        chain.lt.return_value.in_.return_value.gt.return_value.order.return_value.limit.return_value.execute.return_value = \
+            MagicMock(data=[r for r in rows if r['value_date'] < (today - timedelta(days=30)).isoformat()][-1:])
+        service.supabase = supabase
+
+        series = DailyEquitySeries.from_points(
+            [(date.fromisoformat(r['value_date']), r['total_value']) for r in rows],
+            end_date=today - timedelta(days=1)
+        )
+
+        with patch.object(service, 'get_portfolio_value', new=AsyncMock(return_value={'raw_value': 12345.0})), \
+             patch.object(service, '_portfolio_has_crypto', new=AsyncMock(return_value=False)), \
+             patch.object(service, '_fill_gap_with_intraday_snapshots', new=AsyncMock(return_value=[])):
+            from_rows = await service._build_history_from_snapshots('u1', '1M')
+            from_series = await service._build_history_from_series('u1', '1M', series)
+
+        for field in ('timestamp', 'equity', 'profit_loss', 'profit_loss_pct', 'base_value'):
+            assert from_series[field] == pytest.approx(from_rows[field]), field
+
+
+class TestHistoryLatencyBenchmark:
+    """P99 latency of history requests before (rows) and after (series)."""
+
+    @pytest.mark.asyncio
+    async def test_series_p99_beats_snapshot_rebuild(self):
+        today = datetime.now().date()
+        rows = _history_rows(730, today)
+        query_latency = 0.002  # Simulated DB round-trip
+
+        def slow_execute(data):
+            def _execute():
+                time.sleep(query_latency)
+                return MagicMock(data=data)
+            return _execute
+
+        service = AggregatedPortfolioService()
+        supabase = MagicMock()
+        chain = supabase.table.return_value.select.return_value.eq.return_value
+        chain.gte.return_value.lte.return_value.in_.return_value.order.return_value.execute.side_effect = slow_execute(rows)
+        chain.lt.return_value.in_.return_value.gt.return_value.order.return_value.limit.return_value.execute.side_effect = slow_execute([])
+        service.supabase = supabase
+
+        cache = EquitySeriesCache()
+        cache.redis_client = FakeRedis()
+        cache._store('u1', DailyEquitySeries.from_points(
+            [(date.fromisoformat(r['value_date']), r['total_value']) for r in rows]
+        ))
+
+        def p99(samples):
+            samples = sorted(samples)
+            return samples[int(len(samples) * 0.99) - 1]
+
+        periods = ['1W', '1M', '3M', '1Y', 'MAX'] * 20
+        before, after = [], []
+        with patch.object(service, '_apply_live_value_to_today', new=AsyncMock()), \
+             patch.object(service, '_fill_gap_with_intraday_snapshots', new=AsyncMock(return_value=[])), \
+             patch('utils.portfolio.equity_series_cache.get_equity_series_cache', return_value=cache):
+            for period in periods:
+                start = time.perf_counter()
+                await service._build_history_from_snapshots('u1', period)
+                before.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                await service.get_portfolio_history('u1', period)
+                after.append(time.perf_counter() - start)
+
+        print(f"\nhistory P99 before: {p99(before) * 1000:.2f}ms, after: {p99(after) * 1000:.2f}ms")
+        assert p99(after) < p99(before)
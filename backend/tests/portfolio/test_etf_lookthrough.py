@@ -0,0 +1,158 @@
+"""
+Tests for ETF look-through exposure: per-ETF weight vectors, single and
+batched (user x ETF) exposure, FMP refresh and the sector allocation and
+EOD snapshot integrations.
+"""
+
+import json
+import httpx
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+from utils.portfolio.etf_lookthrough import (
+    ASSET_CLASS_AXIS,
+    SECTOR_AXIS,
+    ETFLookthroughEngine,
+)
+
+
+@pytest.fixture
+def engine():
+    return ETFLookthroughEngine()
+
+
+class TestWeightVectors:
+
+    def test_dataset_vectors_are_normalized(self, engine):
+        sectors, asset_classes = engine.get_vectors('spy')
+        assert sectors.shape == (len(SECTOR_AXIS),)
+        assert asset_classes.shape == (len(ASSET_CLASS_AXIS),)
+        assert sectors.sum() == pytest.approx(1.0)
+        assert asset_classes.sum() == pytest.approx(1.0)
+        assert sectors[SECTOR_AXIS.index('Technology')] > 0.2
+
+    def test_sector_etf_falls_back_to_categorization(self, engine):
+        sectors, asset_classes = engine.get_vectors('XLK')
+        assert sectors[SECTOR_AXIS.index('Technology')] == 1.0
+        assert asset_classes[ASSET_CLASS_AXIS.index('us_equity')] == 1.0
+
+        sectors, asset_classes = engine.get_vectors('AGG')
+        assert sectors[SECTOR_AXIS.index('Fixed Income')] == 1.0
+        assert asset_classes[ASSET_CLASS_AXIS.index('fixed_income')] == 1.0
+
+    def test_unknown_etf_has_no_lookthrough(self, engine):
+        assert not engine.has_lookthrough('ZZZZ')
+        assert not engine.has_lookthrough(None)
+
+
+class TestExposure:
+
+    def test_broad_market_etf_is_spread_across_sectors(self, engine):
+        result = engine.exposure([('SPY', 10000.0), ('XLE', 1000.0), ('ZZZZ', 500.0)])
+
+        assert len(result['sectors']) > 5
+        assert sum(result['sectors'].values()) == pytest.approx(11000.0, abs=0.1)
+        assert result['sectors']['Energy'] > 1000.0  # XLE plus SPY's energy slice
+        assert result['unresolved'] == {'ZZZZ': 500.0}
+
+    def test_batch_matches_per_user_exposure(self, engine):
+        portfolios = {
+            'u1': [('SPY', 5000.0), ('QQQ', 2500.0)],
+            'u2': [('VXUS', 3000.0), ('AGG', 1000.0), ('SPY', 100.0)],
+            'u3': [('ZZZZ', 700.0)],
+        }
+        rows = [(user_id, symbol, value) for user_id, holdings in portfolios.items() for symbol, value in holdings]
+
+        batch = engine.batch_exposures(rows)
+
+        assert set(batch) == {'u1', 'u2'}
+        for user_id in ('u1', 'u2'):
+            single = engine.exposure(portfolios[user_id])
+            assert batch[user_id]['sectors'] == pytest.approx(single['sectors'])
+            assert batch[user_id]['asset_classes'] == pytest.approx(single['asset_classes'])
+        assert batch['u2']['asset_classes']['international_equity'] > 2900.0
+
+
+class TestRefreshFromFMP:
+
+    @pytest.mark.asyncio
+    async def test_refresh_rewrites_dataset(self, tmp_path, monkeypatch):
+        dataset = tmp_path / 'etf_lookthrough.json'
+        dataset.write_text(json.dumps({'as_of': '2025-01-01', 'etfs': {}}))
+        engine = ETFLookthroughEngine(str(dataset))
+        assert not engine.has_lookthrough('ABCD')
+
+        def handler(request):
+            if 'etf-sector-weightings/ABCD' in request.url.path:
+                return httpx.Response(200, json=[
+                    {'sector': 'Technology', 'weightPercentage': '60.00%'},
+                    {'sector': 'Healthcare', 'weightPercentage': '40.00%'},
+                ])
+            if 'etf-country-weightings/ABCD' in request.url.path:
+                return httpx.Response(200, json=[
+                    {'country': 'United States', 'weightPercentage': '75.00%'},
+                    {'country': 'Japan', 'weightPercentage': '25.00%'},
+                ])
+            return httpx.Response(200, json=[])
+
+        real_client = httpx.AsyncClient
+        monkeypatch.setenv('FINANCIAL_MODELING_PREP_API_KEY', 'test-key')
+        monkeypatch.setattr(httpx, 'AsyncClient', lambda **kwargs: real_client(transport=httpx.MockTransport(handler)))
+
+        updated = await engine.refresh_from_fmp(['abcd', 'EMPTY'])
+
+        assert updated == 1
+        sectors, asset_classes = engine.get_vectors('ABCD')
+        assert sectors[SECTOR_AXIS.index('Technology')] == pytest.approx(0.6)
+        assert asset_classes[ASSET_CLASS_AXIS.index('international_equity')] == pytest.approx(0.25)
+        document = json.loads(dataset.read_text())
+        assert 'ABCD' in document['etfs']
+        assert document['as_of'] == date.today().isoformat()
+
+
+class TestIntegrations:
+
+    @pytest.mark.asyncio
+    async def test_account_filtering_spreads_broad_etfs(self):
+        from services.account_filtering_service import AccountFilteringService
+
+        holdings = [
+            {'symbol': 'VTI', 'security_type': 'etf', 'security_name': 'Vanguard Total Stock Market ETF',
+             'total_market_value': 10000.0},
+        ]
+        resolver = AsyncMock()
+        resolver.resolve.return_value = {}
+
+        with patch('utils.portfolio.sector_resolver.get_sector_resolver', return_value=resolver):
+            result = await AccountFilteringService()._calculate_sector_allocation(holdings, 'u1')
+
+        sectors = {s['sector']: s['value'] for s in result['sectors']}
+        assert 'Broad ETFs' not in sectors
+        assert len(sectors) > 5
+        assert sum(sectors.values()) == pytest.approx(10000.0, abs=0.1)
+
+    def test_eod_snapshot_carries_lookthrough_exposure(self):
+        from services.daily_portfolio_snapshot_service import DailyPortfolioSnapshotService
+
+        holdings = [
+            {'user_id': 'u1', 'symbol': 'SPY', 'security_type': 'etf', 'total_quantity': 10,
+             'total_market_value': 5000, 'total_cost_basis': 4000,
+             'account_contributions': [], 'institution_breakdown': {}},
+            {'user_id': 'u1', 'symbol': 'AAPL', 'security_type': 'equity', 'total_quantity': 5,
+             'total_market_value': 1000, 'total_cost_basis': 900,
+             'account_contributions': [], 'institution_breakdown': {}},
+            {'user_id': 'u2', 'symbol': 'AAPL', 'security_type': 'equity', 'total_quantity': 1,
+             'total_market_value': 200, 'total_cost_basis': 150,
+             'account_contributions': [], 'institution_breakdown': {}},
+        ]
+        service = DailyPortfolioSnapshotService()
+
+        snapshots = service._build_eod_snapshots(holdings, {'SPY': 600.0}, date(2025, 1, 2))
+
+        by_user = {s.user_id: s for s in snapshots}
+        exposure = by_user['u1'].lookthrough_exposure
+        assert sum(exposure['sectors'].values()) == pytest.approx(6000.0, abs=0.1)  # live SPY value
+        assert by_user['u2'].lookthrough_exposure == {}
+        row = service._snapshot_to_row(by_user['u1'])
+        assert json.loads(row['lookthrough_exposure']) == exposure
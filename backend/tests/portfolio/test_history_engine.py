@@ -0,0 +1,169 @@
+"""
+Tests for the shared vectorised history engine and the SnapTrade services
+built on it, including a 5-year x 200-symbol benchmark against the per-day
+valuation loop it replaces.
+"""
+
+import time
+import pytest
+import numpy as np
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+from services.snaptrade_portfolio_reconstruction_service import (
+    SnapTradePortfolioReconstructionService,
+    Transaction,
+)
+from utils.portfolio.history_engine import (
+    calendar_days,
+    carry_last_valid,
+    constant_matrix,
+    forward_fill,
+    price_matrix,
+    replace_reconstructed_snapshots,
+    step_matrix,
+    trading_days,
+    value_history,
+)
+
+
+def _tx(day, symbol, kind, quantity, net_amount=0):
+    return Transaction(trade_date=day, symbol=symbol, type=kind, quantity=Decimal(str(quantity)),
+                       price=Decimal(0), net_amount=Decimal(str(net_amount)), fees=Decimal(0))
+
+
+class TestMatrices:
+
+    def test_trading_days_skip_weekends_and_holidays(self):
+        days = trading_days(date(2025, 1, 17), date(2025, 1, 22))
+        # Saturday, Sunday and MLK day (Jan 20) are closed
+        assert days == [date(2025, 1, 17), date(2025, 1, 21), date(2025, 1, 22)]
+
+    def test_forward_fill_respects_limit(self):
+        column = np.array([[1.0], [np.nan], [np.nan], [np.nan], [2.0]])
+        assert forward_fill(column, 2)[:, 0].tolist()[:3] == [1.0, 1.0, 1.0]
+        assert np.isnan(forward_fill(column, 2)[3, 0])
+        assert not np.isnan(forward_fill(column)).any()
+
+    def test_price_matrix_fills_calendar_gaps(self):
+        days = calendar_days(date(2025, 1, 3), date(2025, 1, 6))  # Fri..Mon
+        closes = {'AAPL': {date(2025, 1, 3): 10.0, date(2025, 1, 6): 11.0}}
+        matrix = price_matrix(closes, ['AAPL', 'NONE'], days)
+        assert matrix[:, 0].tolist() == [10.0, 10.0, 10.0, 11.0]
+        assert np.isnan(matrix[:, 1]).all()
+
+    def test_step_matrix_holds_state_between_changes(self):
+        days = trading_days(date(2025, 1, 6), date(2025, 1, 10))
+        changes = {
+            date(2025, 1, 4): {'A': 5.0},   # Saturday before the grid seeds row 0
+            date(2025, 1, 8): {'A': 2.0, 'B': 1.0},
+        }
+        matrix = step_matrix(changes, ['A', 'B'], days)
+        assert matrix[:, 0].tolist() == [5.0, 5.0, 2.0, 2.0, 2.0]
+        assert matrix[:, 1].tolist() == [0.0, 0.0, 1.0, 1.0, 1.0]
+
+    def test_value_history_counts_priced_positions(self):
+        days = calendar_days(date(2025, 1, 6), date(2025, 1, 7))
+        prices = np.array([[10.0, np.nan], [11.0, 5.0]])
+        history = value_history(days, ['A', 'B'], constant_matrix({'A': 2, 'B': 3}, ['A', 'B'], days),
+                                prices, cash=100.0)
+        assert history.total_values.tolist() == [120.0, 137.0]
+        assert history.priced_counts.tolist() == [1, 2]
+        assert history.breakdown(0)['B'] == {'quantity': 3.0, 'cost_basis': 0.0, 'market_value': 0.0, 'price': 0.0}
+
+    def test_carry_last_valid_fills_tiny_values(self):
+        values, cost = carry_last_valid(np.array([0.0, 50.0, 0.5, 60.0]), np.array([0.0, 40.0, 0.0, 40.0]), 1.0)
+        assert values.tolist() == [0.0, 50.0, 50.0, 60.0]
+        assert cost.tolist() == [0.0, 40.0, 40.0, 40.0]
+
+    def test_snapshot_writes_are_batched(self):
+        supabase = MagicMock()
+        rows = [{'value_date': f'2025-01-{day:02d}'} for day in range(1, 12)]
+        assert replace_reconstructed_snapshots(supabase, 'user-1', rows, batch_size=5) == 11
+        table = supabase.table.return_value
+        assert table.delete.call_count == 1
+        assert [len(call.args[0]) for call in table.insert.call_args_list] == [5, 5, 1]
+
+
+class TestTransactionReplay:
+
+    @pytest.mark.asyncio
+    async def test_replay_values_trading_days_with_cost_basis(self):
+        service = SnapTradePortfolioReconstructionService()
+        service._get_price_history = AsyncMock(return_value={
+            'AAPL': {date(2025, 1, 6): 10.0, date(2025, 1, 7): 12.0, date(2025, 1, 8): 11.0},
+        })
+        transactions = [
+            _tx(date(2025, 1, 6), 'AAPL', 'BUY', 10, -100),
+            _tx(date(2025, 1, 8), 'AAPL', 'SELL', 4, 44),
+            _tx(date(2025, 1, 8), 'MSFT', 'SELL', 1, 10),  # sell with no position is ignored
+            _tx(date(2025, 1, 9), 'AAPL', 'SELL', 50, 300),  # oversell is capped at the position
+        ]
+
+        snapshots = await service._replay_transactions_to_snapshots(transactions, 'user-1')
+
+        # The capped oversell on Jan 9 closes the position, so no snapshot that day
+        assert [s.snapshot_date for s in snapshots] == [date(2025, 1, 6), date(2025, 1, 7), date(2025, 1, 8)]
+        assert [float(s.total_value) for s in snapshots] == [100.0, 120.0, 66.0]
+        assert float(snapshots[2].total_cost_basis) == pytest.approx(60.0)
+        assert float(snapshots[1].total_gain_loss_percent) == pytest.approx(20.0)
+        assert list(snapshots[2].holdings) == ['AAPL']
+
+    @pytest.mark.asyncio
+    async def test_prices_fetched_once_for_the_whole_range(self):
+        service = SnapTradePortfolioReconstructionService()
+        service._get_price_history = AsyncMock(return_value={})
+        transactions = [_tx(date(2025, 1, 6), 'AAPL', 'BUY', 1, -10),
+                        _tx(date(2025, 3, 3), 'MSFT', 'BUY', 1, -10)]
+
+        assert await service._replay_transactions_to_snapshots(transactions, 'user-1') == []
+        service._get_price_history.assert_awaited_once_with(['AAPL', 'MSFT'], date(2025, 1, 6), date(2025, 3, 3))
+
+
+def _loop_valuation(quantities, closes, days, cash):
+    """The per-day, per-holding loop the estimator used before the engine."""
+    values = []
+    for current_date in days:
+        daily_value = cash
+        for symbol, quantity in quantities.items():
+            series = closes.get(symbol, {})
+            price = None
+            for lookback in range(0, 6):
+                price = series.get(current_date - timedelta(days=lookback))
+                if price is not None:
+                    break
+            if price:
+                daily_value += quantity * price
+        values.append(daily_value)
+    return values
+
+
+class TestBenchmark:
+
+    def test_five_years_by_two_hundred_symbols(self):
+        rng = np.random.default_rng(7)
+        days = trading_days(date(2020, 11, 2), date(2025, 10, 31))
+        symbols = [f'SYM{i:03d}' for i in range(200)]
+        closes = {
+            symbol: {day: float(price) for day, price in zip(days, 50 + rng.random(len(days)) * 100)
+                     if rng.random() > 0.02}  # ~2% of closes missing
+            for symbol in symbols
+        }
+        quantities = {symbol: float(rng.integers(1, 100)) for symbol in symbols}
+
+        started = time.perf_counter()
+        history = value_history(days, symbols, constant_matrix(quantities, symbols, days),
+                                price_matrix(closes, symbols, days), cash=1000.0)
+        values = history.total_values
+        engine_seconds = time.perf_counter() - started
+
+        sample = days[::25]
+        started = time.perf_counter()
+        expected = _loop_valuation(quantities, closes, sample, 1000.0)
+        loop_seconds = (time.perf_counter() - started) * len(days) / len(sample)
+
+        assert len(days) > 1250
+        assert values[::25] == pytest.approx(expected)
+        assert engine_seconds < 2.0
+        assert engine_seconds < loop_seconds
@@ -0,0 +1,169 @@
+"""
+Tests for the shared holdings snapshot loader used by the dashboard endpoints.
+"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from utils.portfolio.holdings_snapshot_loader import HoldingsSnapshotLoader, holdings_snapshot_scope
+from utils.portfolio.account_filtering_service import AccountFilteringService
+from utils.portfolio.aggregated_portfolio_service import AggregatedPortfolioService
+
+
+HOLDINGS = [
+    {
+        'symbol': 'AAPL', 'security_name': 'Apple Inc', 'security_type': 'equity',
+        'total_quantity': 10, 'total_market_value': 1500.0, 'total_cost_basis': 1200.0,
+        'account_contributions': [{'account_id': 'plaid_a', 'market_value': 1500.0, 'quantity': 10}],
+    },
+    {
+        'symbol': 'U S Dollar', 'security_name': 'Cash', 'security_type': 'cash',
+        'total_quantity': 500, 'total_market_value': 500.0, 'total_cost_basis': 500.0,
+        'account_contributions': [{'account_id': 'plaid_b', 'market_value': 500.0, 'quantity': 500}],
+    },
+]
+
+
+def _slow_supabase(rows, delay=0.05):
+    """Mock Supabase client whose holdings query takes `delay` seconds."""
+    supabase = MagicMock()
+
+    def execute():
+        time.sleep(delay)
+        return MagicMock(data=[dict(r) for r in rows])
+
+    supabase.table.return_value.select.return_value.eq.return_value.execute.side_effect = execute
+    return supabase
+
+
+def _query_count(supabase):
+    return supabase.table.return_value.select.return_value.eq.return_value.execute.call_count
+
+
+class TestHoldingsSnapshotLoader:
+    """Single-flight, TTL cache, invalidation and request scope."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_share_one_query(self):
+        supabase = _slow_supabase(HOLDINGS)
+        loader = HoldingsSnapshotLoader(ttl_seconds=5)
+
+        results = await asyncio.gather(*[loader.load('u1', supabase) for _ in range(10)])
+
+        assert _query_count(supabase) == 1
+        assert all(len(r) == 2 for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cache_expires_and_invalidates(self):
+        supabase = _slow_supabase(HOLDINGS, delay=0)
+        loader = HoldingsSnapshotLoader(ttl_seconds=5)
+
+        await loader.load('u1', supabase)
+        await loader.load('u1', supabase)
+        assert _query_count(supabase) == 1
+
+        loader.invalidate('u1')
+        await loader.load('u1', supabase)
+        assert _query_count(supabase) == 2
+
+        loader.ttl_seconds = 0
+        await loader.load('u1', supabase)
+        assert _query_count(supabase) == 3
+
+    @pytest.mark.asyncio
+    async def test_callers_get_independent_copies(self):
+        loader = HoldingsSnapshotLoader(ttl_seconds=5)
+        supabase = _slow_supabase(HOLDINGS, delay=0)
+
+        first = await loader.load('u1', supabase)
+        first[0]['total_market_value'] = 0.0
+
+        second = await loader.load('u1', supabase)
+        assert second[0]['total_market_value'] == 1500.0
+
+    @pytest.mark.asyncio
+    async def test_nested_values_are_not_shared(self):
+        loader = HoldingsSnapshotLoader(ttl_seconds=5)
+        supabase = _slow_supabase(HOLDINGS, delay=0)
+
+        first = await loader.load('u1', supabase)
+        first[0]['account_contributions'][0]['market_value'] = 0.0
+
+        second = await loader.load('u1', supabase)
+        assert second[0]['account_contributions'][0]['market_value'] == 1500.0
+
+    @pytest.mark.asyncio
+    async def test_scope_pins_snapshot_past_ttl(self):
+        loader = HoldingsSnapshotLoader(ttl_seconds=0)
+        supabase = _slow_supabase(HOLDINGS, delay=0)
+
+        with holdings_snapshot_scope():
+            await loader.load('u1', supabase)
+            await loader.load('u1', supabase)
+        assert _query_count(supabase) == 1
+
+        await loader.load('u1', supabase)
+        assert _query_count(supabase) == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_load_propagates_to_all_waiters(self):
+        supabase = MagicMock()
+
+        def execute():
+            time.sleep(0.02)
+            raise RuntimeError("db down")
+
+        supabase.table.return_value.select.return_value.eq.return_value.execute.side_effect = execute
+        loader = HoldingsSnapshotLoader(ttl_seconds=5)
+
+        results = await asyncio.gather(*[loader.load('u1', supabase) for _ in range(3)], return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert 'u1' not in loader._inflight
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_strand_joiners(self):
+        supabase = _slow_supabase(HOLDINGS, delay=0.1)
+        loader = HoldingsSnapshotLoader(ttl_seconds=5)
+
+        leader = asyncio.create_task(loader.load('u1', supabase))
+        await asyncio.sleep(0.01)
+        joiner = asyncio.create_task(loader.load('u1', supabase))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        rows = await asyncio.wait_for(joiner, timeout=2)
+
+        assert leader.cancelled()
+        assert len(rows) == 2
+        assert 'u1' not in loader._inflight
+
+
+class TestDashboardViewsShareOneLoad:
+    """Dashboard views computed together issue a single holdings query."""
+
+    @pytest.mark.asyncio
+    async def test_views_share_snapshot(self, monkeypatch):
+        supabase = _slow_supabase(HOLDINGS)
+        loader = HoldingsSnapshotLoader(ttl_seconds=5)
+        monkeypatch.setattr('utils.portfolio.holdings_snapshot_loader._holdings_snapshot_loader', loader)
+
+        filter_service = AccountFilteringService(supabase_client=supabase)
+        aggregated_service = AggregatedPortfolioService()
+        aggregated_service.supabase = supabase
+
+        with holdings_snapshot_scope():
+            all_holdings, account_holdings, analytics, has_crypto = await asyncio.gather(
+                filter_service.filter_holdings_by_account('u1', None),
+                filter_service.filter_holdings_by_account('u1', 'plaid_a'),
+                aggregated_service.get_portfolio_analytics('u1'),
+                aggregated_service._portfolio_has_crypto('u1'),
+            )
+
+        assert _query_count(supabase) == 1
+        assert len(all_holdings) == 2
+        assert [h['symbol'] for h in account_holdings] == ['AAPL']
+        assert 'risk_score' in analytics
+        assert has_crypto is False
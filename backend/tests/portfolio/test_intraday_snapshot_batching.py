@@ -0,0 +1,187 @@
+"""
+Tests for tick-batched intraday snapshot writes and the packed series layout
+in IntradaySnapshotService.
+"""
+
+import pytest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from services.intraday_snapshot_service import IntradaySnapshotService
+
+
+class MockSupabaseResult:
+    """Mock Supabase query result."""
+    def __init__(self, data):
+        self.data = data
+
+
+@pytest.fixture
+def service():
+    svc = IntradaySnapshotService()
+    svc.supabase = MagicMock()
+    with patch.object(svc, 'is_market_hours', return_value=True):
+        yield svc
+
+
+class TestTickBatching:
+    """Snapshots from all users are buffered and flushed in one insert."""
+
+    @pytest.mark.asyncio
+    async def test_buffer_then_single_bulk_insert(self, service):
+        for i in range(50):
+            assert await service.buffer_snapshot(f'user-{i}', 1000.0 + i, opening_value=1000.0)
+
+        # Nothing written until flush
+        service.supabase.table.assert_not_called()
+
+        written = await service.flush_snapshots()
+
+        assert written == 50
+        service.supabase.table.assert_called_once_with('user_portfolio_history')
+        inserted = service.supabase.table.return_value.insert.call_args[0][0]
+        assert len(inserted) == 50
+        assert inserted[1]['total_gain_loss'] == pytest.approx(1.0)
+        assert await service.flush_snapshots() == 0
+
+    @pytest.mark.asyncio
+    async def test_same_user_not_buffered_twice_in_one_tick(self, service):
+        assert await service.buffer_snapshot('user-1', 1000.0, opening_value=1000.0)
+        assert not await service.buffer_snapshot('user-1', 1001.0, opening_value=1000.0)
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_releases_interval_slot(self, service):
+        service.supabase.table.return_value.insert.return_value.execute.side_effect = Exception("db down")
+        await service.buffer_snapshot('user-1', 1000.0, opening_value=1000.0)
+
+        assert await service.flush_snapshots() == 0
+        assert service.should_create_snapshot('user-1')
+        # Nothing was stored, so the unwritten value must not become today's opening value
+        assert service._opening_value_cache == {}
+
+
+class TestOpeningValueCache:
+    """Opening values are resolved at most once per user per day."""
+
+    @pytest.mark.asyncio
+    async def test_prefetch_uses_one_query_and_first_snapshot_becomes_opening(self, service):
+        today = date(2025, 11, 3)
+        query = service.supabase.table.return_value.select.return_value
+        chain = query.in_.return_value.gte.return_value.lte.return_value.in_.return_value\
+            .order.return_value.order.return_value.range.return_value
+        chain.execute.return_value = MockSupabaseResult([
+            {'user_id': 'u1', 'value_date': '2025-10-31', 'total_value': 900.0, 'closing_value': None},
+            {'user_id': 'u1', 'value_date': '2025-10-30', 'total_value': 800.0, 'closing_value': None},
+            {'user_id': 'u2', 'value_date': '2025-10-31', 'total_value': 500.0, 'closing_value': 510.0},
+        ])
+
+        await service.prefetch_opening_values(['u1', 'u2'], today)
+
+        assert chain.execute.call_count == 1
+        assert await service._get_opening_value('u1', today) == 900.0
+        assert await service._get_opening_value('u2', today) == 510.0
+
+        # After the day's first snapshot, later snapshots compare against it
+        service._opening_value_cache.setdefault(('u1', today), 950.0)
+        assert await service._get_opening_value('u1', today) == 950.0
+
+        # Warm cache: no further queries
+        await service.prefetch_opening_values(['u1', 'u2'], today)
+        assert chain.execute.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_prefetch_pages_past_row_cap(self, service):
+        today = date(2025, 11, 3)
+        query = service.supabase.table.return_value.select.return_value
+        chain = query.in_.return_value.gte.return_value.lte.return_value.in_.return_value\
+            .order.return_value.order.return_value
+        first_page = [{'user_id': f'u{i}', 'value_date': '2025-10-31', 'total_value': 100.0, 'closing_value': None}
+                      for i in range(1000)]
+        second_page = [{'user_id': 'late', 'value_date': '2025-10-27', 'total_value': 42.0, 'closing_value': None}]
+        chain.range.side_effect = lambda start, end: MagicMock(
+            execute=lambda: MockSupabaseResult(first_page if start == 0 else second_page)
+        )
+
+        await service.prefetch_opening_values(['late'], today)
+
+        assert [call.args for call in chain.range.call_args_list] == [(0, 999), (1000, 1999)]
+        assert await service._get_opening_value('late', today) == 42.0
+
+    @pytest.mark.asyncio
+    async def test_first_flushed_snapshot_becomes_opening(self, service):
+        await service.buffer_snapshot('u1', 1000.0, opening_value=990.0)
+        today = next(iter(service._pending_snapshots))['value_date']
+        assert service._opening_value_cache == {}
+
+        await service.flush_snapshots()
+
+        assert service._opening_value_cache == {('u1', date.fromisoformat(today)): 1000.0}
+
+
+class TestPackedLayout:
+    """Packed layout appends via one RPC and reads back in one fetch."""
+
+    @pytest.mark.asyncio
+    async def test_flush_uses_single_rpc(self, service):
+        service.storage_layout = 'packed'
+        await service.buffer_snapshot('u1', 1000.0, opening_value=990.0)
+        await service.buffer_snapshot('u2', 2000.0, opening_value=1990.0)
+
+        assert await service.flush_snapshots() == 2
+
+        service.supabase.rpc.assert_called_once()
+        name, payload = service.supabase.rpc.call_args[0]
+        assert name == 'append_intraday_points'
+        assert [p['user_id'] for p in payload['points']] == ['u1', 'u2']
+        assert isinstance(payload['points'][0]['ts'], int)
+        service.supabase.table.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_intraday_snapshots_unpacks_series(self, service):
+        service.storage_layout = 'packed'
+        chain = service.supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.limit.return_value
+        chain.execute.return_value = MockSupabaseResult([{
+            'timestamps': [1762180200, 1762180500],
+            'equity_values': [1000.0, 1010.0],
+            'opening_value': 1000.0,
+            'previous_close': 995.0,
+        }])
+
+        snapshots = await service.get_intraday_snapshots('u1', date(2025, 11, 3))
+
+        service.supabase.table.assert_called_once_with('user_intraday_series')
+        assert [s['total_value'] for s in snapshots] == [1000.0, 1010.0]
+        assert snapshots[1]['total_gain_loss'] == pytest.approx(10.0)
+        assert snapshots[1]['total_gain_loss_percent'] == pytest.approx(1.0)
+        assert snapshots[0]['previous_close'] == 995.0
+        assert snapshots[0]['created_at'].startswith('2025-11-03T')
+
+    @pytest.mark.asyncio
+    async def test_opening_value_read_from_packed_series(self, service):
+        service.storage_layout = 'packed'
+        chain = service.supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.limit.return_value
+        chain.execute.return_value = MockSupabaseResult([{
+            'timestamps': [1762180200], 'equity_values': [1003.0], 'opening_value': None, 'previous_close': 995.0,
+        }])
+
+        assert await service._fetch_opening_value('u1', date(2025, 11, 3)) == 1003.0
+        service.supabase.table.assert_called_once_with('user_intraday_series')
+
+    @pytest.mark.asyncio
+    async def test_daily_last_values_read_from_packed_series(self, service):
+        service.storage_layout = 'packed'
+        chain = service.supabase.table.return_value.select.return_value.eq.return_value\
+            .gte.return_value.lte.return_value.order.return_value.range.return_value
+        chain.execute.return_value = MockSupabaseResult([
+            {'value_date': '2025-10-30', 'timestamps': [1761831000, 1761854400],
+             'equity_values': [1000.0, 1020.0], 'opening_value': 1000.0, 'previous_close': 990.0},
+            {'value_date': '2025-10-31', 'timestamps': [], 'equity_values': [],
+             'opening_value': None, 'previous_close': None},
+        ])
+
+        last = await service.get_daily_last_values('u1', date(2025, 10, 30), date(2025, 10, 31))
+
+        service.supabase.table.assert_called_once_with('user_intraday_series')
+        assert list(last) == [date(2025, 10, 30)]
+        assert last[date(2025, 10, 30)]['total_value'] == 1020.0
+        assert last[date(2025, 10, 30)]['total_gain_loss'] == pytest.approx(20.0)
@@ -82,7 +82,7 @@ async def test_portfolio_calculator_initialization():
         )
         
         # Verify initialization
-        assert calculator.broker_client is mock_instance
+        assert calculator.broker_client.raw_client is mock_instance
         assert calculator.min_update_interval == 1
         assert calculator.account_base_values == {}
         assert calculator.last_update_time == {}
@@ -69,7 +69,7 @@ async def test_symbol_collector_initialization():
         )
         
         # Verify initialization
-        assert collector.broker_client is mock_instance
+        assert collector.broker_client.raw_client is mock_instance
         assert collector.unique_symbols == set()
 
 
@@ -117,7 +117,7 @@ async def test_portfolio_calculator_initialization():
         )
         
         # Verify initialization
-        assert calculator.broker_client is mock_instance
+        assert calculator.broker_client.raw_client is mock_instance
         assert calculator.min_update_interval == 1
 
 
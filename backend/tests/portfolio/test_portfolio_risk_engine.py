@@ -0,0 +1,341 @@
+"""
+Tests for the return-based portfolio risk engine: covariance model building,
+single and batched portfolio metrics, model caching, the stored-price loader
+and the PortfolioAnalyticsEngine / EOD snapshot integrations.
+"""
+
+import json
+import numpy as np
+import pytest
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import Mock, patch
+
+from utils.portfolio.risk_engine import (
+    MIN_OBSERVATIONS,
+    TRADING_DAYS_PER_YEAR,
+    PortfolioRiskEngine,
+    PortfolioRiskMetrics,
+    build_risk_model,
+    volatility_to_risk_score,
+)
+
+AS_OF = date(2025, 6, 30)
+
+
+def _price_paths(n_days=250, seed=7):
+    """SPY plus a high-beta stock, a low-correlation bond fund and a SPY clone."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0004, 0.01, n_days)
+    returns = {
+        'SPY': market,
+        'TSLA': 1.8 * market + rng.normal(0, 0.02, n_days),
+        'BND': 0.05 * market + rng.normal(0, 0.003, n_days),
+        'VOO': market + rng.normal(0, 0.0005, n_days),
+    }
+    return {s: 100 * np.cumprod(1 + np.concatenate([[0.0], r])) for s, r in returns.items()}
+
+
+def _model(symbols=('TSLA', 'BND', 'VOO', 'SPY'), paths=None):
+    paths = paths or _price_paths()
+    closes = np.column_stack([paths[s] for s in symbols])
+    return build_risk_model(symbols, closes, paths['SPY'], AS_OF)
+
+
+class TestBuildRiskModel:
+
+    def test_covariance_matches_numpy(self):
+        paths = _price_paths()
+        model = _model(paths=paths)
+        returns = np.diff(paths['TSLA']) / paths['TSLA'][:-1]
+        assert model.volatilities[model.index['TSLA']] == pytest.approx(
+            np.std(returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        )
+
+    def test_betas_against_benchmark(self):
+        model = _model()
+        assert model.betas[model.index['SPY']] == pytest.approx(1.0)
+        assert model.betas[model.index['TSLA']] == pytest.approx(1.8, abs=0.4)
+        assert abs(model.betas[model.index['BND']]) < 0.2
+
+    def test_short_history_symbols_are_dropped(self):
+        paths = _price_paths()
+        paths['NEWCO'] = paths['TSLA'].copy()
+        paths['NEWCO'][:-(MIN_OBSERVATIONS - 10)] = np.nan
+        model = _model(symbols=('TSLA', 'NEWCO'), paths=paths)
+        assert model.symbols == ('TSLA',)
+
+    def test_holiday_gaps_are_forward_filled(self):
+        paths = _price_paths()
+        paths['BND'][[20, 21, 100]] = np.nan
+        model = _model(symbols=('BND',), paths=paths)
+        assert model.symbols == ('BND',)
+        assert np.isfinite(model.covariance).all()
+
+    def test_missing_benchmark_history_returns_none(self):
+        paths = _price_paths(n_days=MIN_OBSERVATIONS - 5)
+        assert _model(paths=paths) is None
+
+
+class TestPortfolioMetrics:
+
+    def test_volatility_and_contributions(self):
+        model = _model()
+        weights = np.zeros(len(model.symbols))
+        weights[model.index['TSLA']] = 0.5
+        weights[model.index['BND']] = 0.5
+
+        results = model.evaluate(weights)
+        expected = np.sqrt(weights @ model.covariance @ weights)
+        assert results['volatility'][0] == pytest.approx(expected)
+
+        marginal, component = model.risk_contributions(weights)
+        assert component.sum() == pytest.approx(expected)
+        assert component[model.index['TSLA']] > component[model.index['BND']]
+
+    def test_correlated_holdings_count_as_one_bet(self):
+        model = _model()
+        clones = np.zeros(len(model.symbols))
+        clones[[model.index['SPY'], model.index['VOO']]] = 0.5
+        mixed = np.zeros(len(model.symbols))
+        mixed[[model.index['SPY'], model.index['BND']]] = 0.5
+
+        results = model.evaluate(np.vstack([clones, mixed]))
+        assert results['effective_bets'][0] == pytest.approx(1.0, abs=0.01)
+        assert results['effective_bets'][1] > 1.3
+
+    def test_batch_matches_single_portfolio(self):
+        engine = PortfolioRiskEngine()
+        model = _model()
+        rows = [
+            ('u1', 'TSLA', 6000.0), ('u1', 'BND', 4000.0),
+            ('u2', 'VOO', 5000.0), ('u2', 'ZZZZ', 1000.0),
+            ('u3', 'UNKNOWN', 500.0),
+        ]
+        batch = engine.batch_metrics(rows, cash={'u1': 10000.0}, model=model)
+
+        with patch.object(engine, 'get_model', return_value=model):
+            single = engine.portfolio_metrics({'TSLA': 6000.0, 'BND': 4000.0}, cash=10000.0)
+
+        assert set(batch) == {'u1', 'u2'}
+        assert batch['u1'].volatility == pytest.approx(single.volatility)
+        assert batch['u1'].beta == pytest.approx(single.beta)
+        assert batch['u2'].coverage == pytest.approx(5000 / 6000)
+        assert sum(single.component_risk.values()) == pytest.approx(single.volatility)
+
+    def test_batch_chunks_match_single_pass(self):
+        engine = PortfolioRiskEngine()
+        model = _model()
+        rows = [
+            ('u1', 'TSLA', 6000.0), ('u2', 'VOO', 5000.0), ('u1', 'BND', 4000.0),
+            ('u3', 'UNKNOWN', 500.0), ('u4', 'SPY', 2000.0), ('u2', 'BND', 1000.0),
+        ]
+        whole = engine.batch_metrics(rows, cash={'u1': 10000.0}, model=model, chunk_size=100)
+        chunked = engine.batch_metrics(rows, cash={'u1': 10000.0}, model=model, chunk_size=1)
+
+        assert set(chunked) == set(whole) == {'u1', 'u2', 'u4'}
+        for portfolio_id, metrics in whole.items():
+            assert chunked[portfolio_id].volatility == pytest.approx(metrics.volatility)
+            assert chunked[portfolio_id].beta == pytest.approx(metrics.beta)
+
+    def test_cash_dampens_volatility(self):
+        engine = PortfolioRiskEngine()
+        with patch.object(engine, 'get_model', return_value=_model()):
+            invested = engine.portfolio_metrics({'TSLA': 1000.0})
+            half_cash = engine.portfolio_metrics({'TSLA': 1000.0}, cash=1000.0)
+        assert half_cash.volatility == pytest.approx(invested.volatility / 2)
+        assert half_cash.risk_score < invested.risk_score
+
+    def test_unpriced_holdings_scale_priced_weights(self):
+        engine = PortfolioRiskEngine()
+        with patch.object(engine, 'get_model', return_value=_model()):
+            full = engine.portfolio_metrics({'TSLA': 1000.0})
+            partial = engine.portfolio_metrics({'TSLA': 1000.0, 'ZZZZ': 1000.0})
+        assert partial.volatility == pytest.approx(full.volatility)
+        assert partial.coverage == pytest.approx(0.5)
+        assert not partial.is_reliable
+
+    def test_risk_score_scale(self):
+        assert volatility_to_risk_score(0.16, 0.16) == 7.0
+        assert volatility_to_risk_score(0.0, 0.16) == 1.0
+        assert volatility_to_risk_score(0.60, 0.16) == 10.0
+        assert volatility_to_risk_score(0.08, 0.0) == 4.0
+
+
+class _FakePriceTable:
+    """PostgREST-style builder over global_historical_prices rows."""
+
+    def __init__(self, rows, calls, max_rows=1000):
+        self.rows = rows
+        self.calls = calls
+        self.max_rows = max_rows
+        self.filters = []
+        self.bounds = None
+
+    def select(self, *_args):
+        return self
+
+    def in_(self, key, values):
+        self.filters.append(lambda r: r[key] in set(values))
+        return self
+
+    def is_(self, key, _value):
+        self.filters.append(lambda r: r.get(key) is None)
+        return self
+
+    def gte(self, key, value):
+        self.filters.append(lambda r: r[key] >= value)
+        return self
+
+    def lte(self, key, value):
+        self.filters.append(lambda r: r[key] <= value)
+        return self
+
+    def order(self, *_args, **_kwargs):
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        self.calls.append(self.bounds)
+        matched = sorted(
+            (r for r in self.rows if all(f(r) for f in self.filters)),
+            key=lambda r: (r['price_date'], r['fmp_symbol'])
+        )
+        start, end = self.bounds
+        return Mock(data=matched[start:min(end + 1, start + self.max_rows)])
+
+
+def _price_rows(paths, symbols):
+    start = AS_OF - timedelta(days=len(paths['SPY']) - 1)
+    return [
+        {
+            'fmp_symbol': symbol,
+            'price_date': (start + timedelta(days=i)).isoformat(),
+            'close_price': float(price),
+            'price_timestamp': None,
+        }
+        for symbol in symbols
+        for i, price in enumerate(paths[symbol])
+    ]
+
+
+class TestModelCache:
+
+    @pytest.fixture
+    def engine(self):
+        rows = _price_rows(_price_paths(), ('SPY', 'TSLA', 'BND', 'VOO'))
+        calls = []
+        supabase = Mock()
+        supabase.table.side_effect = lambda _name: _FakePriceTable(rows, calls)
+        engine = PortfolioRiskEngine(lookback_days=400)
+        engine.supabase = supabase
+        engine.calls = calls
+        return engine
+
+    def test_loader_pages_through_stored_prices(self, engine):
+        model = engine.get_model(['TSLA', 'BND', 'VOO'], AS_OF)
+        assert model.symbols == ('BND', 'TSLA', 'VOO')
+        assert model.observations == 250
+        assert len(engine.calls) > 1  # 1004 rows over 1000-row pages
+
+    def test_same_universe_and_date_is_cached(self, engine):
+        first = engine.get_model(['TSLA', 'BND'], AS_OF)
+        calls = len(engine.calls)
+        assert engine.get_model(['bnd', 'TSLA'], AS_OF) is first
+        assert len(engine.calls) == calls
+        assert engine.cache_hits == 1
+
+    def test_subset_of_cached_universe_is_sliced(self, engine):
+        full = engine.get_model(['TSLA', 'BND', 'VOO'], AS_OF)
+        calls = len(engine.calls)
+        subset = engine.get_model(['TSLA', 'VOO'], AS_OF)
+        assert len(engine.calls) == calls
+        assert subset.symbols == ('TSLA', 'VOO')
+        assert subset.covariance[0, 1] == pytest.approx(full.covariance[full.index['TSLA'], full.index['VOO']])
+
+    def test_new_date_reloads(self, engine):
+        engine.get_model(['TSLA'], AS_OF)
+        calls = len(engine.calls)
+        engine.get_model(['TSLA'], AS_OF + timedelta(days=1))
+        assert len(engine.calls) > calls
+
+    def test_load_errors_are_not_cached(self, engine):
+        engine.supabase.table.side_effect = RuntimeError("db down")
+        assert engine.get_model(['TSLA'], AS_OF) is None
+        assert engine._models == {}
+
+
+def _metrics(volatility=0.16, effective_bets=1.0, coverage=1.0):
+    return PortfolioRiskMetrics(
+        volatility=volatility, beta=1.0, benchmark_volatility=0.16,
+        diversification_ratio=effective_bets ** 0.5, effective_bets=effective_bets,
+        coverage=coverage, as_of=AS_OF,
+    )
+
+
+class TestAnalyticsEngineIntegration:
+
+    @pytest.fixture
+    def positions(self):
+        from clera_agents.tools.portfolio_analysis import PortfolioPosition
+        from clera_agents.types.portfolio_types import AssetClass, SecurityType
+        return [
+            PortfolioPosition(
+                symbol=symbol, quantity=Decimal('10'), current_price=Decimal('100'),
+                market_value=Decimal('1000'), asset_class=AssetClass.EQUITY,
+                security_type=SecurityType.INDIVIDUAL_STOCK,
+            )
+            for symbol in ('AAPL', 'MSFT', 'GOOGL', 'AMZN')
+        ]
+
+    def test_risk_score_uses_volatility(self, positions):
+        from clera_agents.tools.portfolio_analysis import PortfolioAnalyticsEngine
+        static = PortfolioAnalyticsEngine.calculate_risk_score(positions)
+        scored = PortfolioAnalyticsEngine.calculate_risk_score(positions, risk_metrics=_metrics(0.08))
+        assert static == Decimal('9.5')
+        assert scored == Decimal('4.0')
+
+    def test_low_coverage_falls_back_to_composition(self, positions):
+        from clera_agents.tools.portfolio_analysis import PortfolioAnalyticsEngine
+        metrics = _metrics(0.08, coverage=0.5)
+        assert PortfolioAnalyticsEngine.calculate_risk_score(positions, risk_metrics=metrics) == Decimal('9.5')
+
+    def test_diversification_counts_correlated_positions_once(self, positions):
+        from clera_agents.tools.portfolio_analysis import PortfolioAnalyticsEngine
+        static = PortfolioAnalyticsEngine.calculate_diversification_score(positions)
+        correlated = PortfolioAnalyticsEngine.calculate_diversification_score(
+            positions, risk_metrics=_metrics(effective_bets=1.2)
+        )
+        assert correlated < static
+
+    def test_metrics_skip_when_prices_unavailable(self, positions):
+        from clera_agents.tools.portfolio_analysis import PortfolioAnalyticsEngine
+        with patch('utils.portfolio.risk_engine.PortfolioRiskEngine.get_model', return_value=None):
+            assert PortfolioAnalyticsEngine.calculate_risk_metrics(positions) is None
+
+
+class TestEODSnapshotIntegration:
+
+    def test_eod_snapshot_carries_risk_metrics(self):
+        from services.daily_portfolio_snapshot_service import DailyPortfolioSnapshotService
+        service = DailyPortfolioSnapshotService()
+        holdings = [
+            {'user_id': 'u1', 'symbol': 'TSLA', 'security_type': 'equity',
+             'total_quantity': 10, 'total_market_value': 1000, 'total_cost_basis': 800},
+            {'user_id': 'u1', 'symbol': 'U S Dollar', 'security_type': 'cash',
+             'total_quantity': 1000, 'total_market_value': 1000, 'total_cost_basis': 1000},
+            {'user_id': 'u2', 'symbol': 'ZZZZ', 'security_type': 'equity',
+             'total_quantity': 1, 'total_market_value': 50, 'total_cost_basis': 50},
+        ]
+        snapshots = service._build_eod_snapshots(holdings, {'TSLA': 100.0}, AS_OF, risk_model=_model())
+        by_user = {s.user_id: s for s in snapshots}
+
+        risk = by_user['u1'].risk_metrics
+        assert risk['coverage'] == 1.0
+        assert 0 < risk['volatility'] < 1
+        assert by_user['u2'].risk_metrics == {}
+        row = service._snapshot_to_row(by_user['u1'])
+        assert json.loads(row['risk_metrics'])['as_of'] == AS_OF.isoformat()
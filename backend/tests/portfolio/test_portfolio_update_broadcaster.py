@@ -0,0 +1,151 @@
+"""
+Tests for the per-process portfolio update broadcaster behind /ws/portfolio/{account_id}.
+
+Demonstrates that Redis connection count stays at one per process regardless
+of how many sockets are subscribed.
+"""
+
+import asyncio
+import pytest
+
+from utils.portfolio.portfolio_update_broadcaster import (
+    PortfolioUpdateBroadcaster,
+    SlowConsumerError,
+)
+
+
+class FakeRedisServer:
+    """In-memory pubsub server that counts client connections."""
+
+    def __init__(self):
+        self.connections = 0
+        self.pubsubs = []
+
+    def client(self):
+        self.connections += 1
+        return FakeRedisClient(self)
+
+    def publish(self, channel, data):
+        for pubsub in self.pubsubs:
+            if channel in pubsub.channels:
+                pubsub.inbox.put_nowait({'type': 'message', 'channel': channel.encode(), 'data': data.encode()})
+
+    @property
+    def subscribed_channels(self):
+        return set().union(*(p.channels for p in self.pubsubs)) if self.pubsubs else set()
+
+
+class FakeRedisClient:
+    def __init__(self, server):
+        self.server = server
+
+    def pubsub(self):
+        pubsub = FakePubSub()
+        self.server.pubsubs.append(pubsub)
+        return pubsub
+
+    async def aclose(self):
+        pass
+
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.inbox = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def server():
+    return FakeRedisServer()
+
+
+async def _drain():
+    # Let the reader task pick up published messages
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestPortfolioUpdateBroadcaster:
+
+    @pytest.mark.asyncio
+    async def test_one_redis_connection_for_many_sockets(self, server):
+        broadcaster = PortfolioUpdateBroadcaster(redis_factory=server.client)
+        sockets, accounts = 1000, 50
+
+        subscriptions = [await broadcaster.subscribe(f"acct{i % accounts}") for i in range(sockets)]
+
+        stats = broadcaster.stats()
+        print(f"\n{sockets} sockets -> {server.connections} Redis connection(s), {stats['subscribed_channels']} channels")
+        assert server.connections == 1
+        assert stats['redis_connections'] == 1
+        assert stats['local_subscribers'] == sockets
+        assert stats['subscribed_channels'] == accounts
+
+        server.publish('portfolio_updates:acct7', '{"total_value": 10}')
+        await _drain()
+        received = [s for s in subscriptions if not s.queue.empty()]
+        assert len(received) == sockets // accounts
+        assert all(s.account_id == 'acct7' for s in received)
+        assert await received[0].next_message(timeout=1) == '{"total_value": 10}'
+
+        await broadcaster.close()
+
+    @pytest.mark.asyncio
+    async def test_channel_unsubscribed_when_last_socket_leaves(self, server):
+        broadcaster = PortfolioUpdateBroadcaster(redis_factory=server.client)
+        first = await broadcaster.subscribe('acct1')
+        second = await broadcaster.subscribe('acct1')
+
+        await broadcaster.unsubscribe(first)
+        assert server.subscribed_channels == {'portfolio_updates:acct1'}
+
+        await broadcaster.unsubscribe(second)
+        assert server.subscribed_channels == set()
+        assert broadcaster.stats()['subscribed_channels'] == 0
+
+        await broadcaster.close()
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_is_evicted_without_affecting_others(self, server):
+        broadcaster = PortfolioUpdateBroadcaster(queue_size=3, redis_factory=server.client)
+        slow = await broadcaster.subscribe('acct1')
+        fast = await broadcaster.subscribe('acct1')
+
+        for i in range(4):
+            server.publish('portfolio_updates:acct1', f'{{"seq": {i}}}')
+            await _drain()
+            assert await fast.next_message(timeout=1) == f'{{"seq": {i}}}'
+
+        with pytest.raises(SlowConsumerError):
+            await slow.next_message(timeout=1)
+        assert broadcaster.stats()['evictions'] == 1
+        assert broadcaster.stats()['local_subscribers'] == 1
+
+        await broadcaster.unsubscribe(slow)
+        assert server.subscribed_channels == {'portfolio_updates:acct1'}
+
+        await broadcaster.close()
+
+    @pytest.mark.asyncio
+    async def test_next_message_times_out_for_heartbeat(self, server):
+        broadcaster = PortfolioUpdateBroadcaster(redis_factory=server.client)
+        subscription = await broadcaster.subscribe('acct1')
+
+        assert await subscription.next_message(timeout=0.01) is None
+
+        await broadcaster.close()
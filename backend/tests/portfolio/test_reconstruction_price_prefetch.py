@@ -0,0 +1,214 @@
+"""
+Tests for cross-user price prefetch in batch reconstructions: one FMP fetch per
+unique symbol across the batch, and per-user valuation served from the price
+service's in-process store.
+"""
+
+import pytest
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from services.historical_price_service import (
+    HistoricalPriceResult,
+    HistoricalPriceService,
+    PriceDataPoint,
+)
+from services.portfolio_history_reconstructor import PortfolioHistoryReconstructor
+
+START = date(2025, 1, 1)
+
+
+def _series(symbol, start_date, end_date):
+    points = []
+    day = start_date
+    while day <= end_date:
+        if day.weekday() < 5:
+            points.append(PriceDataPoint(date=day, open_price=None, high_price=None, low_price=None,
+                                         close_price=100.0 + day.toordinal() % 7, volume=None,
+                                         adjusted_close=None))
+        day += timedelta(days=1)
+    return HistoricalPriceResult(symbol=symbol, start_date=start_date, end_date=end_date,
+                                 data_points=points, success=True)
+
+
+def _price_service():
+    """Price service with an empty DB cache and a counting fake FMP."""
+    service = HistoricalPriceService()
+    service.supabase = MagicMock()
+    service._check_price_cache = AsyncMock(side_effect=lambda symbols, s, e: ({}, list(symbols)))
+    service._store_price_data_permanently = AsyncMock()
+    service.fmp_requests = []
+
+    async def fake_fmp(symbols, start_date, end_date):
+        service.fmp_requests.extend(symbols)
+        service.api_calls_made += len(symbols)
+        return {symbol: _series(symbol, start_date, end_date) for symbol in symbols}
+
+    service._batch_fetch_from_fmp = fake_fmp
+    return service
+
+
+PORTFOLIOS = {
+    'user-a': ['SPY', 'AAPL', 'VTI'],
+    'user-b': ['SPY', 'AAPL', 'MSFT'],
+    'user-c': ['SPY', 'VTI'],
+}
+
+
+def _reconstructor(price_service, days=20):
+    reconstructor = PortfolioHistoryReconstructor()
+    reconstructor.historical_price_service = price_service
+    reconstructor.symbol_mapping_service = MagicMock()
+    reconstructor.plaid_provider = MagicMock()
+    reconstructor.supabase = MagicMock()
+    reconstructor._history_range = lambda: (START, START + timedelta(days=days))
+    reconstructor._update_reconstruction_status = AsyncMock()
+    reconstructor._store_reconstructed_timeline = AsyncMock()
+
+    async def holdings(user_id):
+        return [
+            {'security_id': f'sec-{symbol}', 'symbol': symbol, 'security_name': symbol,
+             'security_type': 'equity', 'quantity': 10.0, 'market_value': 1000.0,
+             'cost_basis': 900.0, 'account_id': 'acct', 'institution_name': 'Bank'}
+            for symbol in PORTFOLIOS[user_id]
+        ]
+
+    async def mappings(securities):
+        return {s['security_id']: s['security_id'].removeprefix('sec-') for s in securities}
+
+    reconstructor._get_current_plaid_holdings = AsyncMock(side_effect=holdings)
+    reconstructor._get_plaid_transaction_history = AsyncMock(return_value=[])
+    reconstructor._get_successful_mappings = AsyncMock(side_effect=mappings)
+    reconstructor.symbol_mapping_service.map_securities_for_user = AsyncMock(
+        return_value=SimpleNamespace(mapped_successfully=3, total_securities=3, api_calls_made=0)
+    )
+    return reconstructor
+
+
+class TestPriceStore:
+
+    @pytest.mark.asyncio
+    async def test_batch_fetch_fills_store_and_repeat_is_free(self):
+        service = _price_service()
+        end = START + timedelta(days=30)
+
+        first = await service.fetch_historical_prices_batch(['SPY', 'AAPL'], START, end)
+        again = await service.fetch_historical_prices_batch(['SPY'], START + timedelta(days=5), end)
+
+        assert first.api_calls_made == 2
+        assert again.api_calls_made == 0
+        assert service._check_price_cache.await_count == 1
+        assert service.store_covers('AAPL', START, end)
+
+    @pytest.mark.asyncio
+    async def test_daily_lookup_reads_store_without_query(self):
+        service = _price_service()
+        await service.fetch_historical_prices_batch(['SPY'], START, START + timedelta(days=10))
+
+        monday = date(2025, 1, 6)
+        assert await service.get_price_for_symbol_on_date('SPY', monday) == 100.0 + monday.toordinal() % 7
+        assert await service.get_price_for_symbol_on_date('SPY', date(2025, 1, 4)) is None
+        service.supabase.table.assert_not_called()
+
+    def test_store_is_bounded(self):
+        service = _price_service()
+        service.price_store_max_symbols = 2
+        for symbol in ('A', 'B', 'C'):
+            service._remember_results({symbol: _series(symbol, START, START)}, START, START)
+        assert not service.store_covers('A', START, START)
+        assert service.store_covers('C', START, START)
+
+    def test_store_entries_expire(self):
+        service = _price_service()
+        service.price_store_ttl_seconds = 60
+        with patch('services.historical_price_service.time.monotonic', return_value=1000.0):
+            service._remember_results({'A': _series('A', START, START)}, START, START)
+        with patch('services.historical_price_service.time.monotonic', return_value=1030.0):
+            service._remember_results({'B': _series('B', START, START)}, START, START)
+            assert service.store_covers('A', START, START)
+        with patch('services.historical_price_service.time.monotonic', return_value=1070.0):
+            assert not service.store_covers('A', START, START)
+            assert service.store_covers('B', START, START)
+        assert 'A' not in service._price_store
+
+    def test_holidays_do_not_break_cache_coverage(self):
+        # 2025-01-01 and 2025-01-20 are market holidays with no rows
+        days = [START + timedelta(days=i) for i in range(1, 31)
+                if (START + timedelta(days=i)).weekday() < 5 and i != 19]
+        assert HistoricalPriceService._covers_range(days, START, START + timedelta(days=30))
+        assert not HistoricalPriceService._covers_range(days[:5] + days[12:], START, START + timedelta(days=30))
+
+
+class TestCrossUserPrefetch:
+
+    @pytest.mark.asyncio
+    async def test_each_symbol_fetched_once_per_batch(self):
+        service = _price_service()
+        reconstructor = _reconstructor(service)
+
+        plan = await reconstructor.prefetch_prices_for_users(list(PORTFOLIOS))
+
+        assert sorted(service.fmp_requests) == ['AAPL', 'MSFT', 'SPY', 'VTI']
+        assert plan.users == 3
+        assert plan.symbol_requests == 8
+        assert plan.unique_symbols == 4
+        assert plan.fmp_calls_per_user == pytest.approx(4 / 3)
+        assert plan.fmp_calls_per_user_unplanned == pytest.approx(8 / 3)
+
+    @pytest.mark.asyncio
+    async def test_runs_after_prefetch_use_only_local_data(self):
+        service = _price_service()
+        reconstructor = _reconstructor(service)
+        await reconstructor.prefetch_prices_for_users(list(PORTFOLIOS))
+        service.supabase.table.reset_mock()
+
+        results = [await reconstructor.reconstruct_user_portfolio_history(user_id) for user_id in PORTFOLIOS]
+
+        assert all(result.success for result in results)
+        assert [result.price_api_calls for result in results] == [0, 0, 0]
+        assert len(service.fmp_requests) == 4
+        service.supabase.table.assert_not_called()
+        # Inputs gathered during planning are reused, not reloaded
+        assert reconstructor._get_current_plaid_holdings.await_count == 3
+        assert results[0].timeline[-1].total_value > 0
+
+    @pytest.mark.asyncio
+    async def test_unplanned_runs_fetch_per_user(self):
+        service = _price_service()
+        service._remember_results = lambda *args: None  # no store: the old per-user behaviour
+        reconstructor = _reconstructor(service)
+        reconstructor.historical_price_service.get_price_for_symbol_on_date = AsyncMock(return_value=100.0)
+
+        results = [await reconstructor.reconstruct_user_portfolio_history(user_id) for user_id in PORTFOLIOS]
+        assert [result.price_api_calls for result in results] == [3, 3, 2]
+
+    @pytest.mark.asyncio
+    async def test_user_failing_to_load_is_skipped(self):
+        service = _price_service()
+        reconstructor = _reconstructor(service)
+        original = reconstructor._get_current_plaid_holdings.side_effect
+
+        async def flaky(user_id):
+            if user_id == 'user-b':
+                raise RuntimeError('plaid down')
+            return await original(user_id)
+
+        reconstructor._get_current_plaid_holdings.side_effect = flaky
+        plan = await reconstructor.prefetch_prices_for_users(list(PORTFOLIOS))
+
+        assert plan.users == 2
+        assert 'MSFT' not in service.fmp_requests
+        assert 'user-b' not in reconstructor._prepared_inputs
+
+    @pytest.mark.asyncio
+    async def test_release_drops_prepared_inputs_and_prices(self):
+        service = _price_service()
+        reconstructor = _reconstructor(service)
+        await reconstructor.prefetch_prices_for_users(list(PORTFOLIOS))
+
+        reconstructor.release_prefetched_data()
+
+        assert reconstructor._prepared_inputs == {}
+        assert service._price_store == {}
+        assert not service.store_covers('SPY', START, START)
@@ -0,0 +1,204 @@
+"""
+Tests for bulk sector resolution: one Redis MGET, durable metadata table
+fallback and comma-batched FMP profile calls.
+"""
+
+import json
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+
+from utils.portfolio.sector_resolver import SectorResolver
+
+
+class FakeRedis:
+    """Dict-backed Redis with call counting for mget."""
+
+    def __init__(self):
+        self.store = {}
+        self.mget_calls = 0
+
+    def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(k) for k in keys]
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.calls = []
+
+    def setex(self, *args):
+        self.calls.append(args)
+
+    def execute(self):
+        for args in self.calls:
+            self.redis_client.setex(*args)
+
+
+class FakeMetadataTable:
+    """Minimal global_symbol_metadata stand-in for select().in_() and upsert()."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def client(self):
+        supabase = MagicMock()
+        supabase.table.side_effect = lambda name: self._query()
+        return supabase
+
+    def _query(self):
+        table = self
+        query = MagicMock()
+
+        def in_(column, values):
+            chain = MagicMock()
+            chain.execute.return_value = MagicMock(data=[table.rows[v] for v in values if v in table.rows])
+            return chain
+
+        def upsert(rows, on_conflict=None):
+            for row in rows:
+                table.rows[row['symbol']] = row
+            return MagicMock()
+
+        query.select.return_value.in_.side_effect = in_
+        query.upsert.side_effect = upsert
+        return query
+
+
+def _symbols(count):
+    return [f"S{i:03d}" for i in range(count)]
+
+
+@pytest.fixture
+def fmp_calls(monkeypatch):
+    calls = []
+    real_client = httpx.AsyncClient
+
+    def handler(request):
+        symbols = request.url.path.rsplit('/', 1)[-1].split(',')
+        calls.append(symbols)
+        # FMP does not know symbols ending in 9; funds (ending in F) have a profile but no sector
+        return httpx.Response(200, json=[
+            {'symbol': s, 'sector': '' if s.endswith('F') else 'Technology', 'industry': 'Software',
+             'companyName': f'{s} Inc'}
+            for s in symbols if not s.endswith('9')
+        ])
+
+    monkeypatch.setenv('FINANCIAL_MODELING_PREP_API_KEY', 'test-key')
+    monkeypatch.setattr(httpx, 'AsyncClient', lambda **kwargs: real_client(transport=httpx.MockTransport(handler)))
+    return calls
+
+
+@pytest.fixture
+def resolver():
+    resolver = SectorResolver()
+    resolver.redis_client = FakeRedis()
+    resolver.metadata = FakeMetadataTable()
+    resolver.supabase = resolver.metadata.client()
+    return resolver
+
+
+class TestSectorResolver:
+
+    @pytest.mark.asyncio
+    async def test_cold_portfolio_uses_one_batched_fmp_call(self, resolver, fmp_calls):
+        symbols = _symbols(80)
+
+        sectors = await resolver.resolve(symbols)
+
+        assert len(fmp_calls) == 1
+        assert sorted(fmp_calls[0]) == symbols
+        assert resolver.redis_client.mget_calls == 1
+        assert sectors['S001'] == 'Technology'
+        assert sectors['S009'] == 'Unknown'
+        assert len(resolver.metadata.rows) == 72  # symbols FMP returned
+
+    @pytest.mark.asyncio
+    async def test_warm_cache_makes_no_fmp_calls(self, resolver, fmp_calls):
+        await resolver.resolve(_symbols(80))
+        fmp_calls.clear()
+
+        sectors = await resolver.resolve(_symbols(80))
+
+        assert fmp_calls == []
+        assert sectors['S001'] == 'Technology'
+        assert sectors['S009'] == 'Unknown'  # negative entry, not refetched
+
+    @pytest.mark.asyncio
+    async def test_durable_table_survives_redis_expiry(self, resolver, fmp_calls):
+        await resolver.resolve(['AAPL', 'MSFT'])
+        resolver.redis_client.store.clear()
+        fmp_calls.clear()
+
+        sectors = await resolver.resolve(['aapl', 'MSFT'])
+
+        assert fmp_calls == []
+        assert sectors == {'AAPL': 'Technology', 'MSFT': 'Technology'}
+        # Backfilled into Redis for the next request
+        assert json.loads(resolver.redis_client.store['sector:AAPL'])['sector'] == 'Technology'
+
+    @pytest.mark.asyncio
+    async def test_large_portfolio_is_split_into_batches(self, resolver, fmp_calls):
+        await resolver.resolve(_symbols(250))
+        assert [len(batch) for batch in fmp_calls] == [100, 100, 50]
+
+    @pytest.mark.asyncio
+    async def test_failed_fmp_batch_is_not_cached_as_unknown(self, resolver, monkeypatch):
+        real_client = httpx.AsyncClient
+        monkeypatch.setenv('FINANCIAL_MODELING_PREP_API_KEY', 'test-key')
+        monkeypatch.setattr(httpx, 'AsyncClient', lambda **kwargs: real_client(
+            transport=httpx.MockTransport(lambda request: httpx.Response(503))
+        ))
+
+        sectors = await resolver.resolve(['AAPL'])
+
+        assert sectors == {'AAPL': 'Unknown'}
+        assert 'sector:AAPL' not in resolver.redis_client.store
+
+    @pytest.mark.asyncio
+    async def test_unknown_sector_is_not_persisted(self, resolver, fmp_calls):
+        sectors = await resolver.resolve(['AAPL', 'VTIF'])
+
+        assert sectors == {'AAPL': 'Technology', 'VTIF': 'Unknown'}
+        assert set(resolver.metadata.rows) == {'AAPL'}
+        assert json.loads(resolver.redis_client.store['sector:VTIF'])['sector'] == 'Unknown'
+
+    @pytest.mark.asyncio
+    async def test_stored_unknown_rows_are_refetched(self, resolver, fmp_calls):
+        resolver.metadata.rows['MSFT'] = {'symbol': 'MSFT', 'sector': 'Unknown'}
+
+        sectors = await resolver.resolve(['MSFT'])
+
+        assert fmp_calls == [['MSFT']]
+        assert sectors == {'MSFT': 'Technology'}
+        assert resolver.metadata.rows['MSFT']['sector'] == 'Technology'
+
+
+class TestAccountFilteringSharesResolver:
+
+    @pytest.mark.asyncio
+    async def test_sector_allocation_resolves_once(self, resolver, fmp_calls):
+        from services.account_filtering_service import AccountFilteringService
+
+        holdings = [
+            {'symbol': s, 'security_type': 'equity', 'security_name': f'{s} Corp', 'total_market_value': 100.0}
+            for s in _symbols(30)
+        ] + [
+            {'symbol': 'BTC', 'security_type': 'crypto', 'security_name': 'Bitcoin', 'total_market_value': 50.0},
+        ]
+
+        with patch('utils.portfolio.sector_resolver.get_sector_resolver', return_value=resolver):
+            result = await AccountFilteringService()._calculate_sector_allocation(holdings, 'u1')
+
+        assert len(fmp_calls) == 1
+        sectors = {s['sector']: s['value'] for s in result['sectors']}
+        assert sectors['Technology'] == 2700.0
+        assert sectors['Unknown'] == 300.0
+        assert sectors['Cryptocurrency'] == 50.0
@@ -0,0 +1,327 @@
+"""
+Tests for the account closure state machine and its poller
+(in-memory job store, fake broker, simulated clock).
+"""
+
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from fnmatch import fnmatch
+
+from services.account_closure_jobs import ClosureState, InMemoryClosureJobStore, import_legacy_closures
+from services.account_closure_poller import (
+    DAILY_WITHDRAWAL_LIMIT,
+    LIQUIDATION_TIMEOUT_SECONDS,
+    MAX_POLL_ERRORS,
+    WITHDRAWAL_COOLDOWN_SECONDS,
+    AccountClosurePoller,
+    FakeClosureBroker,
+    error_retry_seconds,
+    run_dry_run,
+)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = datetime(2025, 11, 17, 15, 0, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+def _poller(broker, clock, **kwargs):
+    store = InMemoryClosureJobStore(clock=clock)
+    return AccountClosurePoller(store=store, broker=broker, clock=clock, **kwargs), store
+
+
+@pytest.mark.asyncio
+async def test_dry_run_closes_account_end_to_end():
+    report = await run_dry_run({'acct-1': {'positions_value': 20000.0, 'cash': 500.0}})
+
+    assert report.final_states == {'acct-1': 'completed'}
+    assert [t[3] for t in report.transitions] == [
+        'liquidating', 'waiting_settlement', 'withdrawing_funds', 'waiting_transfer',
+        'withdrawing_funds', 'closing_account', 'completed',
+    ]
+    assert report.jobs['acct-1']['transfers'][0]['amount'] == 20500.0
+    assert report.broker_calls['closures'] == 1
+
+
+@pytest.mark.asyncio
+async def test_large_balance_is_withdrawn_in_daily_tranches():
+    report = await run_dry_run({'whale': {'positions_value': 120000.0, 'cash': 0.0}})
+
+    transfers = report.jobs['whale']['transfers']
+    assert report.final_states == {'whale': 'completed'}
+    assert [t['amount'] for t in transfers] == [DAILY_WITHDRAWAL_LIMIT, DAILY_WITHDRAWAL_LIMIT, 20000.0]
+    requested = [datetime.fromisoformat(t['initiated_at']) for t in transfers]
+    assert all((b - a).total_seconds() >= WITHDRAWAL_COOLDOWN_SECONDS for a, b in zip(requested, requested[1:]))
+    assert report.simulated_days >= 2
+
+
+@pytest.mark.asyncio
+async def test_rejected_transfer_fails_closure():
+    broker = FakeClosureBroker(reject_transfers=['acct-1'])
+    report = await run_dry_run({'acct-1': {'positions_value': 1000.0}}, broker=broker)
+
+    assert report.final_states == {'acct-1': 'failed'}
+    assert 'REJECTED' in report.jobs['acct-1']['last_error']
+    assert broker.calls['closures'] == 0
+
+
+@pytest.mark.asyncio
+async def test_poll_batches_reads_across_accounts():
+    clock = FakeClock()
+    broker = FakeClosureBroker(fill_polls=3)
+    poller, store = _poller(broker, clock)
+    for index in range(50):
+        broker.add_account(f'acct-{index}', positions_value=1000.0)
+        await store.create(f'acct-{index}', f'user-{index}', f'ach-{index}')
+
+    assert await poller.run_once() == {'liquidating': 50}
+    assert broker.calls['snapshot_batches'] == 0
+
+    clock.advance(60)
+    assert await poller.run_once() == {'liquidating': 50}
+    # One batched read for all fifty due closures
+    assert broker.calls['snapshot_batches'] == 1
+    assert broker.calls['account_reads'] == 50
+
+    # Nothing is due until the next check, so an early poll does no broker I/O
+    assert await poller.run_once() == {}
+    assert broker.calls['snapshot_batches'] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_during_poll_is_not_overwritten():
+    clock = FakeClock()
+    broker = FakeClosureBroker()
+    poller, store = _poller(broker, clock)
+    broker.add_account('acct-1', positions_value=1000.0)
+    await store.create('acct-1', 'user-1', 'ach-1')
+
+    original_liquidate = broker.liquidate
+
+    async def liquidate_then_cancel(account_id):
+        await original_liquidate(account_id)
+        await store.cancel(account_id)
+
+    broker.liquidate = liquidate_then_cancel
+    await poller.run_once()
+
+    job = await store.get('acct-1')
+    assert job.state == ClosureState.CANCELLED
+    assert await store.list_open() == []
+
+
+@pytest.mark.asyncio
+async def test_transition_hook_sees_each_state_change():
+    clock = FakeClock()
+    broker = FakeClosureBroker()
+    seen = []
+
+    async def hook(job, previous):
+        seen.append((previous.value, job.state.value))
+
+    poller, store = _poller(broker, clock, on_transition=hook)
+    broker.add_account('acct-1', positions_value=1000.0)
+    await store.create('acct-1', 'user-1', 'ach-1')
+
+    await poller.run_once()
+    assert seen == [('initiated', 'liquidating')]
+
+
+@pytest.mark.asyncio
+async def test_broker_errors_back_off_then_fail():
+    clock = FakeClock()
+    broker = FakeClosureBroker()
+    poller, store = _poller(broker, clock)
+    await store.create('missing', 'user-1', 'ach-1')
+    broker.add_account('missing')
+    await poller.run_once()  # liquidates -> LIQUIDATING
+    del broker.accounts['missing']
+
+    for attempt in range(1, MAX_POLL_ERRORS):
+        clock.now = (await store.get('missing')).next_run_at
+        await poller.run_once()
+        job = await store.get('missing')
+        assert job.state == ClosureState.LIQUIDATING
+        assert job.errors == attempt
+        assert job.next_run_at == clock.now + timedelta(seconds=error_retry_seconds(attempt))
+
+    clock.now = job.next_run_at
+    await poller.run_once()
+    job = await store.get('missing')
+    assert job.state == ClosureState.FAILED
+    assert 'not found' in job.last_error
+
+
+@pytest.mark.asyncio
+async def test_liquidation_timeout_fails_closure():
+    clock = FakeClock()
+    broker = FakeClosureBroker(fill_polls=10_000)
+    poller, store = _poller(broker, clock)
+    broker.add_account('stuck', positions_value=1000.0)
+    await store.create('stuck', 'user-1', 'ach-1')
+
+    await poller.run_once()
+    clock.advance(LIQUIDATION_TIMEOUT_SECONDS + 1)
+    await poller.run_once()
+
+    job = await store.get('stuck')
+    assert job.state == ClosureState.FAILED
+    assert 'Positions failed to clear' in job.last_error
+
+
+async def _withdrawing(broker, clock, store_class=InMemoryClosureJobStore, **account):
+    """A poller whose closure for 'acct-1' is due to withdraw its settled cash."""
+    store = store_class(clock=clock)
+    poller = AccountClosurePoller(store=store, broker=broker, clock=clock)
+    broker.add_account('acct-1', **account)
+    await store.create('acct-1', 'user-1', 'ach-1')
+    while (await store.get('acct-1')).state != ClosureState.WITHDRAWING_FUNDS:
+        clock.now = (await store.get('acct-1')).next_run_at
+        await poller.run_once()
+    clock.now = (await store.get('acct-1')).next_run_at
+    return poller, store
+
+
+class FlakyStore(InMemoryClosureJobStore):
+    """Fails the next releasing save of a job that has moved to fail_state."""
+    fail_state = None
+
+    async def save(self, job, release=True):
+        if release and job.state == self.fail_state:
+            self.fail_state = None
+            raise ConnectionError('store unavailable')
+        return await super().save(job, release=release)
+
+
+@pytest.mark.asyncio
+async def test_lost_save_after_withdrawal_does_not_withdraw_twice():
+    clock = FakeClock()
+    broker = FakeClosureBroker()
+    poller, store = await _withdrawing(broker, clock, store_class=FlakyStore, positions_value=1000.0)
+    store.fail_state = ClosureState.WAITING_TRANSFER
+
+    await poller.run_once()
+    assert len(broker.transfers) == 1
+    job = await store.get('acct-1')
+    assert job.state == ClosureState.WITHDRAWING_FUNDS
+    assert job.transfers[-1]['status'] == 'requested'
+
+    # Polled again once the lease runs out: the requested transfer is found, not re-sent
+    clock.now = job.lease_expires_at + timedelta(seconds=1)
+    await poller.run_once()
+    job = await store.get('acct-1')
+    assert len(broker.transfers) == 1
+    assert broker.calls['withdrawal_lookups'] == 1
+    assert job.state == ClosureState.WAITING_TRANSFER
+    assert job.transfer_id == job.transfers[-1]['transfer_id'] == next(iter(broker.transfers))
+    assert 'status' not in job.transfers[-1]
+
+
+@pytest.mark.asyncio
+async def test_withdrawal_missing_at_broker_waits_out_cooldown():
+    clock = FakeClock()
+    broker = FakeClosureBroker()
+    poller, store = await _withdrawing(broker, clock, positions_value=1000.0)
+
+    async def unreachable(account_id, ach_relationship_id, amount):
+        raise ConnectionError('broker unavailable')
+
+    original_withdraw, broker.withdraw = broker.withdraw, unreachable
+    await poller.run_once()
+    broker.withdraw = original_withdraw
+    requested_at = (await store.get('acct-1')).last_withdrawal_at
+
+    clock.now = (await store.get('acct-1')).next_run_at
+    await poller.run_once()
+    job = await store.get('acct-1')
+    assert broker.transfers == {}
+    assert job.transfers[-1]['status'] == 'not_found'
+    assert job.next_run_at == requested_at + timedelta(seconds=WITHDRAWAL_COOLDOWN_SECONDS)
+
+    clock.now = job.next_run_at
+    await poller.run_once()
+    assert len(broker.transfers) == 1
+    assert (await store.get('acct-1')).state == ClosureState.WAITING_TRANSFER
+
+
+@pytest.mark.asyncio
+async def test_store_error_does_not_end_poll_for_other_accounts():
+    clock = FakeClock()
+    broker = FakeClosureBroker()
+    store = FlakyStore(clock=clock)
+    poller = AccountClosurePoller(store=store, broker=broker, clock=clock)
+    for account_id in ('acct-1', 'acct-2'):
+        broker.add_account(account_id, positions_value=1000.0)
+        await store.create(account_id, 'user-1', 'ach-1')
+    store.fail_state = ClosureState.LIQUIDATING
+
+    counts = await poller.run_once()
+
+    assert sum(counts.values()) == 2
+    states = sorted([(await store.get(a)).state.value for a in ('acct-1', 'acct-2')])
+    assert states == ['initiated', 'liquidating']
+
+
+class LegacyRedis:
+    """The scan/get subset of a Redis client, over JSON values."""
+
+    def __init__(self, values):
+        self.values = {key: json.dumps(value) for key, value in values.items()}
+
+    def scan_iter(self, match):
+        return [key for key in self.values if fnmatch(key, match)]
+
+    def get(self, key):
+        return self.values.get(key)
+
+
+@pytest.mark.asyncio
+async def test_legacy_redis_closures_are_imported_once():
+    clock = FakeClock()
+    broker = FakeClosureBroker()
+    poller, store = _poller(broker, clock)
+    legacy = {'user_id': 'user-1', 'ach_relationship_id': 'ach-1', 'initiated_at': '2025-11-14T10:00:00'}
+    redis_client = LegacyRedis({
+        'closure_state:settling': {**legacy, 'phase': 'settlement'},
+        'closure_state:in-transfer': {**legacy, 'phase': 'withdrawal'},
+        'withdrawal_state:in-transfer': {
+            'transfers_completed': [{'transfer_id': 'tr-1', 'amount': 500.0,
+                                     'initiated_at': '2025-11-17T09:00:00', 'is_final': True}],
+            'last_transfer_id': 'tr-1',
+        },
+        'closure_state:cooling-down': {**legacy, 'phase': 'withdrawal_24hr_wait',
+                                       'next_action_time': '2025-11-18T09:00:00+00:00'},
+        'closure_state:done': {**legacy, 'phase': 'completed'},
+        'closure_state:already-a-job': {**legacy, 'phase': 'settlement'},
+    })
+    await store.create('already-a-job', 'user-1', 'ach-1')
+
+    counts = await import_legacy_closures(store, redis_client, now=clock.now)
+
+    assert counts == {'imported': 3, 'existing': 1, 'skipped': 1}
+    settling = await store.get('settling')
+    assert settling.state == ClosureState.WAITING_SETTLEMENT
+    assert settling.created_at == datetime(2025, 11, 14, 10, 0, tzinfo=timezone.utc)
+    in_transfer = await store.get('in-transfer')
+    assert (in_transfer.state, in_transfer.transfer_id) == (ClosureState.WAITING_TRANSFER, 'tr-1')
+    assert in_transfer.last_withdrawal_at == datetime(2025, 11, 17, 9, 0, tzinfo=timezone.utc)
+    cooling_down = await store.get('cooling-down')
+    assert cooling_down.state == ClosureState.WITHDRAWING_FUNDS
+    assert cooling_down.next_run_at == datetime(2025, 11, 18, 9, 0, tzinfo=timezone.utc)
+    assert await store.get('done') is None
+
+    # Imported closures are polled like any other, and a second import is a no-op
+    broker.add_account('settling', cash=1000.0)
+    await poller.run_once()
+    assert (await store.get('settling')).state == ClosureState.WITHDRAWING_FUNDS
+    assert await import_legacy_closures(store, redis_client, now=clock.now) == {
+        'imported': 0, 'existing': 4, 'skipped': 1,
+    }
@@ -0,0 +1,121 @@
+"""
+Tests for PartitionMaintenanceService: RPC sequencing, retention windows and
+failure isolation between maintenance steps (Supabase RPCs mocked).
+"""
+
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from services.partition_maintenance_service import PartitionMaintenanceService, _month_start
+
+
+def _service(responses, **kwargs):
+    """Service whose supabase.rpc(name, params) answers from `responses` and records calls."""
+    service = PartitionMaintenanceService(**kwargs)
+    service.calls = []
+
+    def rpc(name, params):
+        service.calls.append((name, params))
+        response = responses.get(name, [])
+        if isinstance(response, Exception):
+            raise response
+        data = response(params) if callable(response) else response
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=data))
+
+    service.supabase = MagicMock()
+    service.supabase.rpc.side_effect = rpc
+    return service
+
+
+STATS_BEFORE = [{'table_name': 'user_portfolio_history', 'partitions': 4, 'total_bytes': 5000, 'estimated_rows': 90}]
+STATS_AFTER = [{'table_name': 'user_portfolio_history', 'partitions': 5, 'total_bytes': 2000, 'estimated_rows': 30}]
+
+
+class TestMaintenanceRun:
+
+    @pytest.mark.asyncio
+    async def test_full_run_reports_each_step(self):
+        stats = iter([STATS_BEFORE, STATS_AFTER])
+        service = _service({
+            'history_table_stats': lambda params: next(stats),
+            'ensure_monthly_partitions': lambda params: (
+                ['user_portfolio_history_y2027m01'] if params['p_table'] == 'user_portfolio_history' else []
+            ),
+            'compact_intraday_history': [{'days_rolled_up': 12, 'intraday_rows_deleted': 936}],
+            'drop_expired_partitions': [{'drop_expired_partitions': 'user_intraday_series_y2025m09'}],
+        }, history_retention_months=None, price_retention_months=None)
+
+        report = await service.run_maintenance()
+
+        assert report.errors == []
+        assert report.partitions_created == ['user_portfolio_history_y2027m01']
+        assert report.days_rolled_up == 12
+        assert report.intraday_rows_deleted == 936
+        assert report.partitions_removed == ['user_intraday_series_y2025m09']
+        assert report.bytes_reclaimed == 3000
+        assert [name for name, _ in service.calls] == [
+            'history_table_stats',
+            'ensure_monthly_partitions', 'ensure_monthly_partitions', 'ensure_monthly_partitions',
+            'compact_intraday_history',
+            'drop_expired_partitions',
+            'history_table_stats',
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failed_step_does_not_stop_partition_creation(self):
+        service = _service({
+            'history_table_stats': RuntimeError('permission denied'),
+            'compact_intraday_history': RuntimeError('lock timeout'),
+        })
+
+        report = await service.run_maintenance()
+
+        assert len(report.errors) == 3
+        assert sum(name == 'ensure_monthly_partitions' for name, _ in service.calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_compaction_keeps_intraday_partitions(self):
+        service = _service({
+            'compact_intraday_history': RuntimeError('lock timeout'),
+            'drop_expired_partitions': lambda params: [f"{params['p_table']}_y2023m10"],
+        }, history_retention_months=24, price_retention_months=None)
+
+        report = await service.run_maintenance()
+
+        assert report.errors == ['compaction: lock timeout']
+        dropped_tables = [params['p_table'] for name, params in service.calls if name == 'drop_expired_partitions']
+        assert dropped_tables == ['user_portfolio_history']
+        assert report.partitions_removed == ['user_portfolio_history_y2023m10']
+
+
+class TestRetention:
+
+    @pytest.mark.asyncio
+    async def test_history_is_kept_forever_by_default(self):
+        service = _service({}, intraday_retention_days=7, history_retention_months=None, price_retention_months=None)
+        await service.expire_partitions(today=date(2025, 11, 16))
+
+        assert service.calls == [('drop_expired_partitions', {
+            'p_table': 'user_intraday_series', 'p_before': '2025-11-09', 'p_detach': False,
+        })]
+
+    @pytest.mark.asyncio
+    async def test_history_retention_detaches_whole_months(self):
+        service = _service({}, history_retention_months=24, price_retention_months=None, detach_expired=True)
+        await service.expire_partitions(today=date(2025, 11, 16))
+
+        assert service.calls[1] == ('drop_expired_partitions', {
+            'p_table': 'user_portfolio_history', 'p_before': '2023-11-01', 'p_detach': True,
+        })
+
+    def test_month_start_crosses_years(self):
+        assert _month_start(date(2025, 2, 20), 3) == date(2024, 11, 1)
+        assert _month_start(date(2025, 2, 20)) == date(2025, 2, 1)
+
+    @pytest.mark.asyncio
+    async def test_compaction_uses_configured_window(self):
+        service = _service({'compact_intraday_history': []}, intraday_retention_days=10)
+        assert await service.compact_intraday() == {'days_rolled_up': 0, 'intraday_rows_deleted': 0}
+        assert service.calls == [('compact_intraday_history', {'p_keep_days': 10})]
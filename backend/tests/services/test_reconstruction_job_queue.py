@@ -0,0 +1,305 @@
+"""
+Tests for the durable reconstruction job queue and the worker pool in
+PortfolioReconstructionManager (in-memory backend, fake reconstructor).
+"""
+
+import asyncio
+import time
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from services.portfolio_history_reconstructor import ReconstructionResult
+from services.portfolio_reconstruction_manager import PortfolioReconstructionManager
+from services.reconstruction_job_queue import (
+    InMemoryReconstructionJobQueue,
+    PostgresReconstructionJobQueue,
+    ReconstructionJob,
+    retry_delay_seconds,
+)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = datetime(2025, 11, 15, 12, 0, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+def _result(user_id, success=True, error=None):
+    return ReconstructionResult(
+        user_id=user_id, success=success, timeline=[], start_date=date.today(), end_date=date.today(),
+        total_data_points=10, securities_processed=1, transactions_processed=1, api_calls_made=1,
+        api_cost_estimate=0.01, processing_duration_seconds=0.01, error=error
+    )
+
+
+class FakeReconstructor:
+    """Sleeps like an I/O-bound reconstruction and reports progress."""
+
+    def __init__(self, duration=0.005, fail_users=()):
+        self.duration = duration
+        self.fail_users = set(fail_users)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.prefetched_batches = []
+        self.releases = 0
+
+    async def prefetch_prices_for_users(self, user_ids):
+        self.prefetched_batches.append(list(user_ids))
+        return SimpleNamespace(fmp_calls=len(user_ids))
+
+    def release_prefetched_data(self):
+        self.releases += 1
+
+    async def reconstruct_user_portfolio_history(self, user_id, progress_callback=None):
+        self.calls.append(user_id)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if progress_callback:
+                await progress_callback(50.0)
+            await asyncio.sleep(self.duration)
+            if user_id in self.fail_users:
+                return _result(user_id, success=False, error='provider timeout')
+            return _result(user_id)
+        finally:
+            self.running -= 1
+
+
+def _manager(queue, reconstructor, workers):
+    manager = PortfolioReconstructionManager(job_queue=queue, worker_count=workers, poll_interval=0.01)
+    manager.reconstructor = reconstructor
+    manager.supabase = MagicMock()
+    manager._update_reconstruction_status = AsyncMock()
+    return manager
+
+
+async def _drain(manager, queue, timeout=30):
+    manager.start_workers()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = await queue.stats()
+        if stats['queued'] == 0 and stats['running'] == 0:
+            break
+        await asyncio.sleep(0.01)
+    await manager.stop_workers()
+
+
+@pytest.fixture(autouse=True)
+def no_series_rebuild():
+    with patch('utils.portfolio.equity_series_cache.get_equity_series_cache') as cache:
+        cache.return_value.rebuild = AsyncMock()
+        yield
+
+
+class TestQueueSemantics:
+
+    @pytest.mark.asyncio
+    async def test_repeat_requests_are_deduplicated(self):
+        queue = InMemoryReconstructionJobQueue()
+        first, created = await queue.enqueue('user-1', 'low')
+        again, created_again = await queue.enqueue('user-1', 'high')
+
+        assert created and not created_again
+        assert again.id == first.id
+        assert again.priority_name == 'high'
+        assert (await queue.stats())['queued'] == 1
+
+    @pytest.mark.asyncio
+    async def test_claims_in_priority_then_age_order(self):
+        clock = FakeClock()
+        queue = InMemoryReconstructionJobQueue(clock=clock)
+        await queue.enqueue('low-user', 'low')
+        clock.advance(1)
+        await queue.enqueue('normal-old', 'normal')
+        clock.advance(1)
+        await queue.enqueue('normal-new', 'normal')
+        clock.advance(1)
+        await queue.enqueue('high-user', 'high')
+
+        claimed = await queue.claim('w', limit=4)
+        assert [job.user_id for job in claimed] == ['high-user', 'normal-old', 'normal-new', 'low-user']
+        assert await queue.claim('w') == []
+
+    @pytest.mark.asyncio
+    async def test_failed_attempt_backs_off_then_fails_for_good(self):
+        clock = FakeClock()
+        queue = InMemoryReconstructionJobQueue(clock=clock)
+        await queue.enqueue('user-1', max_attempts=2)
+
+        job, = await queue.claim('w')
+        assert await queue.fail(job, 'boom') is True
+        assert await queue.claim('w') == []
+
+        clock.advance(retry_delay_seconds(1))
+        job, = await queue.claim('w')
+        assert job.attempts == 2
+        assert await queue.fail(job, 'boom again') is False
+        assert await queue.get_open_job('user-1') is None
+
+        _, created = await queue.enqueue('user-1')
+        assert created
+
+    def test_backoff_is_exponential_and_capped(self):
+        assert retry_delay_seconds(2) == 2 * retry_delay_seconds(1)
+        assert retry_delay_seconds(50) == retry_delay_seconds(60)
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_reclaimed_and_old_worker_is_fenced(self):
+        clock = FakeClock()
+        queue = InMemoryReconstructionJobQueue(clock=clock, lease_seconds=60)
+        await queue.enqueue('user-1')
+
+        stale, = await queue.claim('dead-worker')
+        clock.advance(61)
+        fresh, = await queue.claim('live-worker')
+        assert fresh.attempts == 2
+
+        await queue.complete(stale)
+        assert (await queue.get_open_job('user-1')).status == 'running'
+        await queue.complete(fresh)
+        assert await queue.get_open_job('user-1') is None
+
+    def test_job_from_database_row(self):
+        job = ReconstructionJob.from_row({
+            'id': 'a', 'user_id': 'u', 'priority': 0, 'status': 'running', 'progress': '42.50',
+            'attempts': 1, 'max_attempts': 3, 'available_at': '2025-11-15T12:00:00Z',
+            'created_at': '2025-11-15T11:59:00+00:00', 'locked_by': 'w',
+        })
+        assert job.priority_name == 'high'
+        assert job.progress == 42.5
+        assert job.available_at.tzinfo is not None
+
+    @pytest.mark.asyncio
+    async def test_postgres_stats_use_exact_counts(self):
+        supabase = MagicMock()
+        query = supabase.table.return_value.select.return_value
+        query.eq.side_effect = lambda _column, status: MagicMock(
+            execute=MagicMock(return_value=SimpleNamespace(count={'queued': 4200, 'running': 8}[status], data=[]))
+        )
+
+        stats = await PostgresReconstructionJobQueue(supabase=supabase).stats()
+
+        assert stats == {'queued': 4200, 'running': 8}
+        supabase.table.return_value.select.assert_called_with('id', count='exact', head=True)
+
+
+class TestWorkerPool:
+
+    @pytest.mark.asyncio
+    async def test_request_queues_once_and_reports_job(self):
+        queue = InMemoryReconstructionJobQueue()
+        manager = _manager(queue, FakeReconstructor(), workers=1)
+        manager._get_reconstruction_status = AsyncMock(return_value=None)
+        manager._initialize_reconstruction_status = AsyncMock()
+        manager.start_workers = MagicMock()
+
+        first = await manager.request_reconstruction_for_user('user-1', 'high')
+        second = await manager.request_reconstruction_for_user('user-1', 'high')
+
+        assert first['status'] == second['status'] == 'queued'
+        assert first['job_id'] == second['job_id']
+        assert manager._initialize_reconstruction_status.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_workers_run_jobs_concurrently(self):
+        queue = InMemoryReconstructionJobQueue()
+        reconstructor = FakeReconstructor(duration=0.05)
+        for index in range(8):
+            await queue.enqueue(f'user-{index}')
+
+        await _drain(_manager(queue, reconstructor, workers=4), queue)
+        assert reconstructor.max_running == 4
+        assert sorted(reconstructor.calls) == sorted(f'user-{index}' for index in range(8))
+
+    @pytest.mark.asyncio
+    async def test_progress_is_recorded_on_job(self):
+        queue = InMemoryReconstructionJobQueue()
+        seen = []
+        original = queue.update_progress
+
+        async def spy(job, progress):
+            seen.append(progress)
+            await original(job, progress)
+
+        queue.update_progress = spy
+        await queue.enqueue('user-1')
+        await _drain(_manager(queue, FakeReconstructor(), workers=1), queue)
+        assert seen == [50.0]
+
+    @pytest.mark.asyncio
+    async def test_failed_reconstruction_is_retried(self, monkeypatch):
+        monkeypatch.setattr('services.reconstruction_job_queue.RETRY_BASE_SECONDS', 0.0)
+        queue = InMemoryReconstructionJobQueue()
+        reconstructor = FakeReconstructor(fail_users={'flaky'})
+        manager = _manager(queue, reconstructor, workers=1)
+        await queue.enqueue('flaky', max_attempts=3)
+
+        await _drain(manager, queue)
+        assert reconstructor.calls == ['flaky'] * 3
+        assert manager.total_retries_scheduled == 2
+        assert manager.total_reconstructions_failed == 1
+        assert manager._update_reconstruction_status.await_args.args[1] == 'failed'
+
+    @pytest.mark.asyncio
+    async def test_each_claimed_batch_is_prefetched_once(self):
+        queue = InMemoryReconstructionJobQueue()
+        reconstructor = FakeReconstructor()
+        for index in range(7):
+            await queue.enqueue(f'user-{index}')
+
+        manager = _manager(queue, reconstructor, workers=2)
+        manager.claim_batch_size = 3
+        await _drain(manager, queue)
+
+        assert [len(batch) for batch in reconstructor.prefetched_batches] == [3, 3, 1]
+        assert sorted(sum(reconstructor.prefetched_batches, [])) == sorted(reconstructor.calls)
+        assert manager.total_prefetch_api_calls == 7
+        # Prefetched data is released once nothing claimed is left to run
+        assert reconstructor.releases >= 1
+        assert manager._batch_jobs_outstanding == 0
+
+    @pytest.mark.asyncio
+    async def test_waiting_claimed_jobs_keep_their_lease(self):
+        clock = FakeClock()
+        queue = InMemoryReconstructionJobQueue(clock=clock, lease_seconds=60)
+        for index in range(3):
+            await queue.enqueue(f'user-{index}')
+        manager = _manager(queue, FakeReconstructor(), workers=1)
+
+        first = await manager._next_job()
+        clock.advance(45)
+        with patch('services.portfolio_reconstruction_manager.time.monotonic', return_value=time.monotonic() + 45):
+            second = await manager._next_job()
+
+        assert [first.user_id, second.user_id] == ['user-0', 'user-1']
+        clock.advance(30)
+        # Jobs taken or waiting after half a lease were renewed; only the never-finished first one lapsed
+        assert [job.user_id for job in await queue.claim('other-worker', limit=3)] == ['user-0']
+
+    @pytest.mark.asyncio
+    async def test_throughput_scales_with_workers_on_1000_user_backlog(self):
+        """Synthetic backlog: 1,000 users, 2 ms of I/O each."""
+        elapsed = {}
+        for workers in (1, 8):
+            queue = InMemoryReconstructionJobQueue()
+            reconstructor = FakeReconstructor(duration=0.002)
+            for index in range(1000):
+                await queue.enqueue(f'user-{index}', 'low' if index % 3 else 'normal')
+
+            started = time.perf_counter()
+            await _drain(_manager(queue, reconstructor, workers=workers), queue, timeout=60)
+            elapsed[workers] = time.perf_counter() - started
+
+            assert len(reconstructor.calls) == 1000
+            assert reconstructor.max_running == workers
+
+        assert elapsed[1] / elapsed[8] > 3
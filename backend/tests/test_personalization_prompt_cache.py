@@ -0,0 +1,158 @@
+"""
+Tests for the per-user personalization prompt cache used when building the
+supervisor system prompt on every LLM step.
+
+Includes a prompt-construction latency comparison (the part of time-to-first-
+token spent before the model call) with and without the cache.
+"""
+
+import statistics
+import time
+import pytest
+from unittest.mock import patch
+
+from utils.personalization_service import (
+    PersonalizationContext,
+    PersonalizationPromptCache,
+    PersonalizationService,
+    create_personalized_supervisor_prompt,
+    get_personalization_prompt_cache,
+)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+
+class DownRedis:
+    def get(self, key):
+        raise ConnectionError("redis down")
+
+    def incr(self, key):
+        raise ConnectionError("redis down")
+
+
+CONFIG = {'configurable': {'user_id': 'user-1'}}
+DB_LATENCY_SECONDS = 0.03
+
+
+@pytest.fixture
+def cache():
+    cache = PersonalizationPromptCache(ttl_seconds=300)
+    cache.redis_client = FakeRedis()
+    with patch('utils.personalization_service._personalization_prompt_cache', cache):
+        yield cache
+
+
+@pytest.fixture
+def fetches():
+    calls = []
+
+    def fetch(user_id):
+        calls.append(user_id)
+        time.sleep(DB_LATENCY_SECONDS)  # Supabase round trip
+        return PersonalizationContext(user_name=f"Name{len(calls)}", investment_goals='Saving for retirement')
+
+    with patch.object(PersonalizationService, 'get_user_personalization_context', side_effect=fetch):
+        yield calls
+
+
+def _prompt():
+    with patch('utils.prompts.supervisor_prompt.get_supervisor_clera_system_prompt', return_value="Base prompt"):
+        return create_personalized_supervisor_prompt({'messages': []}, CONFIG)[0].content
+
+
+class TestPersonalizationPromptCache:
+
+    def test_multi_step_conversation_reads_database_once(self, cache, fetches):
+        prompts = [_prompt() for _ in range(5)]
+
+        assert fetches == ['user-1']
+        assert all('Name1' in p for p in prompts)
+        assert (cache.hits, cache.misses) == (4, 1)
+
+    def test_invalidation_picks_up_new_preferences(self, cache, fetches):
+        assert 'Name1' in _prompt()
+
+        PersonalizationService.invalidate_personalization_cache('user-1')
+
+        assert 'Name2' in _prompt()
+        assert cache.redis_client.store['personalization:version:user-1'] == '1'
+
+    def test_version_bump_from_another_process_invalidates(self, cache, fetches):
+        assert 'Name1' in _prompt()
+
+        # Another process (the API server) handled the preferences write
+        cache.redis_client.incr('personalization:version:user-1')
+
+        assert 'Name2' in _prompt()
+        assert 'Name2' in _prompt()
+        assert len(fetches) == 2
+
+    def test_entries_expire_after_ttl(self, cache, fetches):
+        cache.ttl_seconds = 0
+        _prompt()
+        _prompt()
+        assert len(fetches) == 2
+
+    def test_users_without_personalization_are_cached(self, cache):
+        with patch.object(PersonalizationService, 'get_user_personalization_context',
+                          return_value=PersonalizationContext()) as fetch:
+            assert _prompt() == "Base prompt"
+            assert _prompt() == "Base prompt"
+        fetch.assert_called_once()
+
+    def test_redis_outage_falls_back_to_ttl(self, cache, fetches):
+        cache.redis_client = DownRedis()
+
+        _prompt()
+        _prompt()
+        PersonalizationService.invalidate_personalization_cache('user-1')  # Local entry still dropped
+        _prompt()
+
+        assert len(fetches) == 2
+
+    def test_database_errors_are_not_cached(self, cache):
+        with patch.object(PersonalizationService, 'get_user_personalization_context',
+                          side_effect=[Exception("DB Error"), PersonalizationContext(user_name='Ana')]):
+            assert _prompt() == "Base prompt"
+            assert 'Ana' in _prompt()
+
+
+class TestPromptConstructionLatency:
+    """Prompt construction time per supervisor step, before and after caching."""
+
+    def test_time_to_first_token_overhead(self, cache, fetches):
+        steps = 6
+
+        uncached = []
+        for _ in range(steps):
+            get_personalization_prompt_cache().clear()  # Previous behaviour: query every step
+            uncached.append(_timed_prompt())
+        assert len(fetches) == steps
+
+        get_personalization_prompt_cache().clear()
+        _prompt()  # First step of the conversation
+        cached = [_timed_prompt() for _ in range(steps - 1)]
+        assert len(fetches) == steps + 1
+
+        print(f"\nsupervisor prompt build per step: uncached min {min(uncached) * 1000:.2f}ms, "
+              f"cached median {statistics.median(cached) * 1000:.3f}ms "
+              f"(simulated DB latency {DB_LATENCY_SECONDS * 1000:.0f}ms)")
+        # Every uncached step waits on the database; a typical cached step does not
+        assert min(uncached) >= DB_LATENCY_SECONDS
+        assert statistics.median(cached) < DB_LATENCY_SECONDS / 5
+
+
+def _timed_prompt():
+    start = time.perf_counter()
+    _prompt()
+    return time.perf_counter() - start
@@ -15,10 +15,19 @@ from typing import Dict, Any, Optional
 from utils.personalization_service import (
     PersonalizationService, 
     PersonalizationContext,
-    create_personalized_supervisor_prompt
+    create_personalized_supervisor_prompt,
+    get_personalization_prompt_cache
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_personalization_cache():
+    """Tests reuse the same user_id with different data; start each one cold."""
+    get_personalization_prompt_cache().clear()
+    yield
+    get_personalization_prompt_cache().clear()
+
+
 class TestPersonalizationContext:
     """Test the PersonalizationContext dataclass."""
     
@@ -0,0 +1,179 @@
+"""
+Tests for the pooled Alpaca client layer: shared clients per credential set,
+short-TTL account reads with write invalidation, the bounded async facade
+and per-endpoint latency metrics.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, Mock
+
+import utils.broker_pool as broker_pool
+from utils.broker_pool import (
+    BrokerLatencyMetrics,
+    PooledBrokerClient,
+    _endpoint_name,
+    _InstrumentedAdapter,
+    fetch_account_snapshot,
+    get_pooled_broker_client,
+)
+
+ACCOUNT_ID = "3f1b6a52-4f0e-4c7a-9d53-1b2c3d4e5f60"
+
+
+@pytest.fixture
+def raw_client():
+    client = MagicMock()
+    client.get_trade_account_by_id.side_effect = lambda account_id: Mock(cash='100', account_id=account_id)
+    client.get_all_positions_for_account.return_value = [Mock(symbol='AAPL')]
+    return client
+
+
+class TestSharedClients:
+
+    def test_one_client_per_credential_set(self):
+        client_class = MagicMock()
+        first = get_pooled_broker_client('key', 'secret', sandbox=True, client_class=client_class)
+        again = get_pooled_broker_client('key', 'secret', sandbox=True, client_class=client_class)
+        live = get_pooled_broker_client('key', 'secret', sandbox=False, client_class=client_class)
+
+        assert first is again
+        assert live is not first
+        assert client_class.call_count == 2
+
+    def test_session_gets_instrumented_pool(self):
+        client_class = MagicMock()
+        client = get_pooled_broker_client('key2', 'secret', sandbox=True, client_class=client_class)
+        adapter = client.raw_client._session.mount.call_args_list[0].args[1]
+        assert isinstance(adapter, _InstrumentedAdapter)
+        assert adapter._pool_maxsize == broker_pool.BROKER_POOL_MAXSIZE
+
+    def test_missing_credentials_raise(self, monkeypatch):
+        monkeypatch.delenv('BROKER_API_KEY', raising=False)
+        monkeypatch.delenv('BROKER_SECRET_KEY', raising=False)
+        with pytest.raises(ValueError, match='BROKER_API_KEY'):
+            get_pooled_broker_client()
+
+
+class TestReadCache:
+
+    def test_account_reads_are_cached(self, raw_client):
+        client = PooledBrokerClient(raw_client, cache_ttl_seconds=60)
+        first = client.get_trade_account_by_id(ACCOUNT_ID)
+        second = client.get_trade_account_by_id(account_id=ACCOUNT_ID)
+
+        assert first is second
+        assert raw_client.get_trade_account_by_id.call_count == 1
+        assert client.cache_hits == 1
+
+    def test_cache_expires(self, raw_client):
+        client = PooledBrokerClient(raw_client, cache_ttl_seconds=0.01)
+        client.get_all_positions_for_account(ACCOUNT_ID)
+        time.sleep(0.02)
+        client.get_all_positions_for_account(ACCOUNT_ID)
+        assert raw_client.get_all_positions_for_account.call_count == 2
+
+    def test_writes_invalidate_account(self, raw_client):
+        client = PooledBrokerClient(raw_client, cache_ttl_seconds=60)
+        client.get_all_positions_for_account(ACCOUNT_ID)
+        client.get_all_positions_for_account('other')
+        client.submit_order_for_account(ACCOUNT_ID, order_data=Mock())
+        client.get_all_positions_for_account(ACCOUNT_ID)
+        client.get_all_positions_for_account('other')
+
+        raw_client.submit_order_for_account.assert_called_once()
+        assert raw_client.get_all_positions_for_account.call_count == 3
+
+    def test_errors_are_not_cached(self, raw_client):
+        raw_client.get_trade_account_by_id.side_effect = [RuntimeError('503'), Mock(cash='5')]
+        client = PooledBrokerClient(raw_client, cache_ttl_seconds=60)
+        with pytest.raises(RuntimeError):
+            client.get_trade_account_by_id(ACCOUNT_ID)
+        assert client.get_trade_account_by_id(ACCOUNT_ID).cash == '5'
+
+    def test_uncached_reads_pass_through(self, raw_client):
+        client = PooledBrokerClient(raw_client, cache_ttl_seconds=60)
+        client.get_orders_for_account(ACCOUNT_ID, filter=None)
+        client.get_orders_for_account(ACCOUNT_ID, filter=None)
+        assert raw_client.get_orders_for_account.call_count == 2
+
+
+class TestAsyncFacade:
+
+    @pytest.mark.asyncio
+    async def test_snapshot_fetches_concurrently(self, raw_client):
+        started = []
+        barrier = threading.Barrier(2, timeout=2)
+
+        def account(account_id):
+            started.append('account')
+            barrier.wait()
+            return Mock(cash='100')
+
+        def positions(account_id):
+            started.append('positions')
+            barrier.wait()
+            return []
+
+        raw_client.get_trade_account_by_id.side_effect = account
+        raw_client.get_all_positions_for_account.side_effect = positions
+        client = PooledBrokerClient(raw_client)
+
+        trade_account, held = await client.aio.get_account_snapshot(ACCOUNT_ID)
+        assert trade_account.cash == '100'
+        assert held == []
+        assert sorted(started) == ['account', 'positions']
+
+    @pytest.mark.asyncio
+    async def test_snapshot_returns_positions_error(self, raw_client):
+        raw_client.get_all_positions_for_account.side_effect = RuntimeError('positions down')
+        account, positions = await fetch_account_snapshot(raw_client, ACCOUNT_ID)
+        assert account.cash == '100'
+        assert isinstance(positions, RuntimeError)
+
+    @pytest.mark.asyncio
+    async def test_aio_does_not_block_loop(self, raw_client):
+        raw_client.get_clock.side_effect = lambda: time.sleep(0.1)
+        client = PooledBrokerClient(raw_client)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*(client.aio.get_clock() for _ in range(4)))
+        task.cancel()
+        assert ticks >= 5
+
+
+class TestLatencyMetrics:
+
+    def test_endpoint_names_collapse_ids(self):
+        assert _endpoint_name('GET', f'https://broker-api.alpaca.markets/v1/trading/accounts/{ACCOUNT_ID}/positions?x=1') \
+            == 'GET /v1/trading/accounts/{id}/positions'
+
+    def test_snapshot_percentiles(self):
+        metrics = BrokerLatencyMetrics()
+        for ms in range(1, 101):
+            metrics.record('GET /v1/clock', ms / 1000)
+        metrics.record('GET /v1/clock', 0.2, ok=False)
+
+        stats = metrics.snapshot()['GET /v1/clock']
+        assert stats['count'] == 101
+        assert stats['errors'] == 1
+        assert stats['p50_ms'] == pytest.approx(51, abs=1)
+        assert stats['p95_ms'] == pytest.approx(96, abs=1)
+        assert stats['max_ms'] == 200.0
+
+    def test_adapter_records_requests(self, monkeypatch):
+        metrics = BrokerLatencyMetrics()
+        monkeypatch.setattr(broker_pool, '_latency_metrics', metrics)
+        monkeypatch.setattr('requests.adapters.HTTPAdapter.send', lambda self, request, **kw: Mock(status_code=404))
+
+        _InstrumentedAdapter().send(Mock(method='GET', url=f'https://x/v1/accounts/{ACCOUNT_ID}'))
+        assert metrics.snapshot()['GET /v1/accounts/{id}']['errors'] == 1
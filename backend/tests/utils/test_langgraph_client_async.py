@@ -0,0 +1,128 @@
+"""
+Tests for the async LangGraph client: streams run on the shared event loop
+without stalling it, and client disconnects close the upstream stream.
+"""
+
+import time
+import asyncio
+import httpx
+import pytest
+from unittest.mock import patch
+
+import utils.langgraph_client as langgraph_client
+
+
+class SlowSSEStream(httpx.AsyncByteStream):
+    """Emits SSE events with a delay between them, like an LLM token stream."""
+
+    def __init__(self, events: int, delay: float):
+        self.events = events
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        yield b"event: metadata\ndata: {\"run_id\": \"r1\"}\n\n"
+        for i in range(self.events):
+            await asyncio.sleep(self.delay)
+            yield f"event: messages\ndata: {{\"token\": {i}}}\n\n".encode()
+
+    async def aclose(self):
+        self.closed = True
+
+
+def _client_for(streams, events=20, delay=0.01, status_code=200):
+    def handler(request):
+        assert request.url.path.endswith("/runs/stream")
+        stream = SlowSSEStream(events, delay)
+        streams.append(stream)
+        return httpx.Response(status_code, stream=stream, headers={"content-type": "text/event-stream"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def _consume(thread_id):
+    return [chunk async for chunk in langgraph_client.run_thread_stream(thread_id, "agent", input_data={"messages": []})]
+
+
+class TestRunThreadStream:
+
+    @pytest.mark.asyncio
+    async def test_100_concurrent_streams_do_not_stall_loop(self):
+        streams = []
+        client = _client_for(streams)
+        max_gap = 0.0
+        running = True
+
+        async def heartbeat():
+            nonlocal max_gap
+            last = time.perf_counter()
+            while running:
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                max_gap = max(max_gap, now - last)
+                last = now
+
+        with patch.object(langgraph_client, "LANGGRAPH_API_URL", "http://langgraph.test"), \
+             patch.object(langgraph_client, "get_langgraph_http_client", return_value=client):
+            monitor = asyncio.create_task(heartbeat())
+            start = time.perf_counter()
+            results = await asyncio.gather(*(_consume(f"t{i}") for i in range(100)))
+            elapsed = time.perf_counter() - start
+            running = False
+            await monitor
+
+        print(f"\n100 streams in {elapsed:.2f}s, max event loop gap {max_gap * 1000:.1f}ms")
+        assert all(len(chunks) == 2 * 21 for chunks in results)
+        assert results[0][0] == "event: metadata\n\n"
+        assert results[0][3] == 'data: {"token": 0}\n\n'
+        # A single stream takes ~0.2s; serialised blocking streams would take ~20s
+        assert elapsed < 5
+        assert max_gap < 0.25
+
+    @pytest.mark.asyncio
+    async def test_closing_generator_closes_upstream(self):
+        streams = []
+        client = _client_for(streams, events=1000)
+
+        with patch.object(langgraph_client, "LANGGRAPH_API_URL", "http://langgraph.test"), \
+             patch.object(langgraph_client, "get_langgraph_http_client", return_value=client):
+            stream = langgraph_client.run_thread_stream("t1", "agent", input_data={"messages": []})
+            for _ in range(3):
+                await stream.__anext__()
+            await stream.aclose()
+
+        assert streams[0].closed
+
+    @pytest.mark.asyncio
+    async def test_error_status_raises_with_body(self):
+        def handler(request):
+            return httpx.Response(422, text="bad input")
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(langgraph_client, "LANGGRAPH_API_URL", "http://langgraph.test"), \
+             patch.object(langgraph_client, "get_langgraph_http_client", return_value=client):
+            with pytest.raises(Exception, match=r"Failed to stream run \(422\): bad input"):
+                await _consume("t1")
+
+
+class TestRequestRetries:
+
+    @pytest.mark.asyncio
+    async def test_retries_transient_5xx(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                return httpx.Response(503)
+            return httpx.Response(200, json=[{"values": {}}])
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(langgraph_client, "LANGGRAPH_API_URL", "http://langgraph.test"), \
+             patch.object(langgraph_client, "BACKOFF_FACTOR", 0), \
+             patch.object(langgraph_client, "get_langgraph_http_client", return_value=client):
+            history = await langgraph_client.get_thread_messages("t1", limit=10)
+
+        assert history == [{"values": {}}]
+        assert len(calls) == 3
+        assert calls[-1].url.params["limit"] == "10"
@@ -23,7 +23,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from alpaca.broker.client import BrokerClient
+from utils.broker_pool import get_pooled_broker_client
 from alpaca.broker.requests import CreateACHRelationshipRequest, CreateACHTransferRequest
 from alpaca.broker.enums import BankAccountType, TransferDirection, TransferTiming
 
@@ -161,11 +161,7 @@ api_key = os.getenv("BROKER_API_KEY")
 secret_key = os.getenv("BROKER_SECRET_KEY")
 is_sandbox = os.getenv("ALPACA_ENVIRONMENT", "sandbox").lower() == "sandbox"
 
-broker_client = BrokerClient(
-    api_key,
-    secret_key,
-    sandbox=is_sandbox
-)
+broker_client = get_pooled_broker_client(api_key, secret_key, sandbox=is_sandbox)
 
 def create_ach_relationship_manual(
     account_id: str,
@@ -5,46 +5,28 @@ Centralized Alpaca BrokerClient factory to eliminate code duplication.
 import os
 import logging
 from typing import Optional
-from alpaca.broker import BrokerClient
+
+from utils.broker_pool import PooledBrokerClient, get_pooled_broker_client
 
 logger = logging.getLogger(__name__)
 
-def get_broker_client() -> BrokerClient:
+def get_broker_client() -> PooledBrokerClient:
     """
-    Always return a new Alpaca BrokerClient instance with proper configuration.
+    Return the process-wide pooled Alpaca BrokerClient.
+    
+    All callers share one HTTP connection pool, latency metrics and the
+    short-TTL account/positions read cache (see utils.broker_pool).
     
     Returns:
-        BrokerClient: Configured Alpaca broker client
+        PooledBrokerClient: Shared broker client (proxies every BrokerClient method)
     Raises:
         ValueError: If required environment variables are missing
         Exception: If client initialization fails
     """
-    # Get configuration from environment
-    api_key = os.getenv("BROKER_API_KEY")
-    secret_key = os.getenv("BROKER_SECRET_KEY")
-    sandbox_str = os.getenv("ALPACA_SANDBOX", "true").lower()
-
-    # Validate required credentials
-    if not api_key or not secret_key:
-        missing = []
-        if not api_key:
-            missing.append("BROKER_API_KEY")
-        if not secret_key:
-            missing.append("BROKER_SECRET_KEY")
-        raise ValueError(f"Missing required Alpaca broker credentials: {', '.join(missing)}")
-
-    # Parse sandbox setting
-    sandbox = sandbox_str == "true"
-
     try:
-        # Create and return a new broker client
-        client = BrokerClient(
-            api_key=api_key,
-            secret_key=secret_key,
-            sandbox=sandbox
-        )
-        logger.info(f"[BrokerClient Factory] Created {'sandbox' if sandbox else 'live'} broker client instance")
-        return client
+        return get_pooled_broker_client()
+    except ValueError:
+        raise
     except Exception as e:
         logger.error(f"[BrokerClient Factory] Failed to create broker client: {e}")
         raise
@@ -26,11 +26,8 @@ def get_broker_client(sandbox: bool = True) -> BrokerClient:
     if not api_key or not secret_key:
         raise ValueError("BROKER_API_KEY and BROKER_SECRET_KEY environment variables must be set")
     
-    return BrokerClient(
-        api_key=api_key,
-        secret_key=secret_key,
-        sandbox=sandbox
-    )
+    from utils.broker_pool import get_pooled_broker_client
+    return get_pooled_broker_client(api_key, secret_key, sandbox=sandbox)
 
 def create_alpaca_account(account_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from alpaca.broker.client import BrokerClient
+from utils.broker_pool import get_pooled_broker_client
 from alpaca.broker.requests import CreateACHRelationshipRequest, CreateACHTransferRequest
 from alpaca.broker.enums import BankAccountType, TransferDirection, TransferTiming
 
@@ -18,11 +18,7 @@ is_sandbox = os.getenv("ALPACA_ENVIRONMENT", "sandbox").lower() == "sandbox"
 # Valid routing number for Alpaca sandbox
 VALID_TEST_ROUTING_NUMBER = "121000358"
 
-broker_client = BrokerClient(
-    api_key,
-    secret_key,
-    sandbox=is_sandbox
-)
+broker_client = get_pooled_broker_client(api_key, secret_key, sandbox=is_sandbox)
 
 def create_ach_relationship_manual(
     account_id: str,
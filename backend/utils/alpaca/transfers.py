@@ -1,5 +1,5 @@
 # Add to backend/utils/alpaca/transfers.py
-from alpaca.broker.client import BrokerClient
+from utils.broker_pool import get_pooled_broker_client
 import os
 import logging
 
@@ -26,9 +26,9 @@ def get_transfers_for_account(account_id: str, broker_client=None) -> list:
             if not api_key or not api_secret:
                 raise ValueError("Missing Alpaca API credentials")
                 
-            broker_client = BrokerClient(
-                api_key=api_key,
-                secret_key=api_secret,
+            broker_client = get_pooled_broker_client(
+                api_key,
+                api_secret,
                 sandbox=os.getenv("ALPACA_ENVIRONMENT", "sandbox").lower() == "sandbox"
             )
         
@@ -62,9 +62,9 @@ def get_account_details(account_id: str, broker_client=None):
             if not api_key or not api_secret:
                 raise ValueError("Missing Alpaca API credentials")
                 
-            broker_client = BrokerClient(
-                api_key=api_key,
-                secret_key=api_secret,
+            broker_client = get_pooled_broker_client(
+                api_key,
+                api_secret,
                 sandbox=os.getenv("ALPACA_ENVIRONMENT", "sandbox").lower() == "sandbox"
             )
         
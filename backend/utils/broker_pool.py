@@ -0,0 +1,334 @@
+"""
+Pooled Alpaca client layer.
+
+Every Alpaca SDK client owns a requests.Session, so each independently
+constructed BrokerClient/TradingClient opens its own connections. This module
+keeps one client per credential set for the whole process, with:
+
+- a keep-alive HTTPAdapter sized for the broker executor, so concurrent calls
+  reuse connections instead of opening (and discarding) new ones
+- per-endpoint latency metrics recorded at the adapter for every request
+- short-TTL caching of account/positions reads, invalidated by any write
+  made for the same account through the pooled client
+- an async facade (client.aio) that runs calls in a bounded thread pool
+  instead of the unbounded default executor used by asyncio.to_thread
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+BROKER_EXECUTOR_WORKERS = int(os.getenv("ALPACA_EXECUTOR_WORKERS", "16"))
+BROKER_POOL_MAXSIZE = int(os.getenv("ALPACA_POOL_MAXSIZE", str(max(BROKER_EXECUTOR_WORKERS, 10) * 2)))
+READ_CACHE_TTL_SECONDS = float(os.getenv("ALPACA_READ_CACHE_TTL_SECONDS", "3"))
+LATENCY_SAMPLE_SIZE = 500  # Recent samples kept per endpoint for percentiles
+
+# Reads whose results are cached per account for READ_CACHE_TTL_SECONDS
+CACHED_READS = (
+    "get_trade_account_by_id",
+    "get_all_positions_for_account",
+    "get_account_by_id",
+)
+
+_ID_SEGMENT = re.compile(
+    r"/(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)(?=/|$)"
+)
+
+
+def _endpoint_name(method: str, url: str) -> str:
+    """'GET /v1/trading/accounts/{id}/positions' from a full request URL."""
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else "/"
+    path = path.split("?", 1)[0]
+    return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+class BrokerLatencyMetrics:
+    """Thread-safe per-endpoint request counts, errors and latency percentiles."""
+
+    def __init__(self, sample_size: int = LATENCY_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, endpoint: str, seconds: float, ok: bool = True):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                    'samples': deque(maxlen=self.sample_size),
+                }
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['samples'].append(seconds)
+            if not ok:
+                stats['errors'] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-endpoint summary in milliseconds."""
+        with self._lock:
+            items = [(name, dict(stats, samples=sorted(stats['samples']))) for name, stats in self._endpoints.items()]
+
+        def percentile(samples, fraction):
+            return samples[min(int(len(samples) * fraction), len(samples) - 1)] * 1000
+
+        return {
+            name: {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total'] / stats['count'] * 1000, 1),
+                'p50_ms': round(percentile(stats['samples'], 0.50), 1),
+                'p95_ms': round(percentile(stats['samples'], 0.95), 1),
+                'max_ms': round(stats['max'] * 1000, 1),
+            }
+            for name, stats in sorted(items)
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+_latency_metrics = BrokerLatencyMetrics()
+
+
+def get_broker_latency_metrics() -> BrokerLatencyMetrics:
+    """Get the process-wide Alpaca latency metrics."""
+    return _latency_metrics
+
+
+class _InstrumentedAdapter(HTTPAdapter):
+    """Keep-alive adapter that records latency for every request it sends."""
+
+    def send(self, request, **kwargs):
+        endpoint = _endpoint_name(request.method, request.url)
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            _latency_metrics.record(endpoint, time.perf_counter() - started, ok=False)
+            raise
+        _latency_metrics.record(endpoint, time.perf_counter() - started, ok=response.status_code < 400)
+        return response
+
+
+def mount_instrumented_pool(client):
+    """Replace the SDK client's session adapters with the sized, instrumented keep-alive pool."""
+    adapter = _InstrumentedAdapter(pool_connections=4, pool_maxsize=BROKER_POOL_MAXSIZE)
+    client._session.mount("https://", adapter)
+    client._session.mount("http://", adapter)
+    return client
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=BROKER_EXECUTOR_WORKERS, thread_name_prefix="alpaca")
+    return _executor
+
+
+async def run_broker_call(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking Alpaca call in the bounded broker executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), lambda: func(*args, **kwargs))
+
+
+async def fetch_account_snapshot(client, account_id) -> Tuple[Any, Any]:
+    """
+    Fetch an account's trade account and positions concurrently.
+
+    Works with any broker client (pooled or not) through the broker executor.
+
+    Returns:
+        (trade_account, positions); positions is the raised exception
+        instead of a list if only the positions call failed
+    """
+    account, positions = await asyncio.gather(
+        run_broker_call(client.get_trade_account_by_id, account_id),
+        run_broker_call(client.get_all_positions_for_account, account_id),
+        return_exceptions=True
+    )
+    if isinstance(account, BaseException):
+        raise account
+    return account, positions
+
+
+class _AsyncBrokerCalls:
+    """`await client.aio.<method>(...)` for any method of the pooled client."""
+
+    def __init__(self, client: 'PooledBrokerClient'):
+        self._client = client
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            return await run_broker_call(method, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def get_account_snapshot(self, account_id) -> Tuple[Any, Any]:
+        """Trade account and positions fetched concurrently (see fetch_account_snapshot)."""
+        return await fetch_account_snapshot(self._client, account_id)
+
+
+class PooledBrokerClient:
+    """
+    Shared BrokerClient with short-TTL account reads.
+
+    Proxies every BrokerClient method. Reads in CACHED_READS are served from a
+    per-account cache for READ_CACHE_TTL_SECONDS; any other non-get call that
+    names an account (orders, transfers, closures) drops that account's
+    cached reads so callers see their own writes.
+    """
+
+    def __init__(self, client, cache_ttl_seconds: float = READ_CACHE_TTL_SECONDS):
+        self._client = client
+        self._cache_ttl = cache_ttl_seconds
+        self._cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._cache_lock = threading.Lock()
+        self.aio = _AsyncBrokerCalls(self)
+
+        # Performance tracking
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def raw_client(self):
+        """The underlying alpaca BrokerClient."""
+        return self._client
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+        if name in CACHED_READS:
+            return lambda *args, **kwargs: self._cached_read(name, attribute, args, kwargs)
+        if name.startswith("get_") or name.startswith("list_"):
+            return attribute
+
+        def write(*args, **kwargs):
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                account_id = kwargs.get("account_id", args[0] if args else None)
+                if account_id is not None:
+                    self.invalidate(account_id)
+
+        return write
+
+    def _cached_read(self, name: str, method: Callable, args, kwargs):
+        account_id = kwargs.get("account_id", args[0] if args else None)
+        if account_id is None or self._cache_ttl <= 0 or len(args) + len(kwargs) > 1:
+            return method(*args, **kwargs)
+
+        key = (name, str(account_id))
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self.cache_hits += 1
+                return entry[1]
+            self.cache_misses += 1
+
+        # Errors propagate and are not cached
+        result = method(*args, **kwargs)
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + self._cache_ttl, result)
+            if len(self._cache) > 10000:
+                self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+        return result
+
+    def invalidate(self, account_id=None):
+        """Drop cached reads for one account, or for all accounts."""
+        with self._cache_lock:
+            if account_id is None:
+                self._cache.clear()
+            else:
+                account_id = str(account_id)
+                for key in [k for k in self._cache if k[1] == account_id]:
+                    del self._cache[key]
+
+
+_broker_clients: Dict[Tuple[str, str, bool, Any], PooledBrokerClient] = {}
+_trading_clients: Dict[Tuple[str, str, bool], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_pooled_broker_client(
+    api_key: Optional[str] = None,
+    secret_key: Optional[str] = None,
+    sandbox: Optional[bool] = None,
+    client_class=None
+) -> PooledBrokerClient:
+    """
+    Get the process-wide BrokerClient for a credential set.
+
+    Defaults to BROKER_API_KEY / BROKER_SECRET_KEY / ALPACA_SANDBOX.
+    client_class lets modules pass the BrokerClient name they import, so one
+    patched in tests yields its own pooled client.
+
+    Raises:
+        ValueError: If credentials are missing
+    """
+    api_key = api_key or os.getenv("BROKER_API_KEY")
+    secret_key = secret_key or os.getenv("BROKER_SECRET_KEY")
+    if sandbox is None:
+        sandbox = os.getenv("ALPACA_SANDBOX", "true").lower() == "true"
+    if not api_key or not secret_key:
+        missing = [name for name, value in (("BROKER_API_KEY", api_key), ("BROKER_SECRET_KEY", secret_key)) if not value]
+        raise ValueError(f"Missing required Alpaca broker credentials: {', '.join(missing)}")
+
+    if client_class is None:
+        from alpaca.broker import BrokerClient as client_class
+
+    key = (api_key, secret_key, bool(sandbox), client_class)
+    client = _broker_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _broker_clients.get(key)
+            if client is None:
+                client = PooledBrokerClient(mount_instrumented_pool(client_class(
+                    api_key=api_key,
+                    secret_key=secret_key,
+                    sandbox=bool(sandbox)
+                )))
+                _broker_clients[key] = client
+                logger.info(f"[Broker Pool] Created shared {'sandbox' if sandbox else 'live'} broker client")
+    return client
+
+
+def get_pooled_trading_client(api_key: str, secret_key: str, paper: bool = True):
+    """Get the process-wide TradingClient for a credential set."""
+    key = (api_key, secret_key, bool(paper))
+    client = _trading_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _trading_clients.get(key)
+            if client is None:
+                from alpaca.trading.client import TradingClient
+                client = mount_instrumented_pool(TradingClient(api_key, secret_key, paper=paper))
+                _trading_clients[key] = client
+                logger.info(f"[Broker Pool] Created shared {'paper' if paper else 'live'} trading client")
+    return client
@@ -0,0 +1,308 @@
+"""
+HTTP response helpers shared by api_server.py and routes/*.
+
+Conditional GET support: chart endpoints are requested repeatedly by the
+dashboard, so responses carry a weak ETag and a matching If-None-Match
+short-circuits to 304 Not Modified without re-sending the body. The tag is
+weak because CompressionMiddleware may send the same JSON as identity, gzip
+or brotli bytes; a strong tag would claim those are byte-identical.
+
+Large payloads (asset lists, holdings, transfers, activities):
+
+- FastJSONResponse serializes with orjson when installed (stdlib json otherwise)
+- CompressionMiddleware applies brotli or gzip, as negotiated via
+  Accept-Encoding, to compressible responses above COMPRESSION_MIN_BYTES,
+  including streamed responses (chunk by chunk)
+- streaming_json_response emits a long array as chunked output instead of
+  building the whole document in memory; it only lowers peak memory and time
+  to first byte when the items come from a lazy iterator or generator
+"""
+
+import os
+import zlib
+import hashlib
+import json
+import logging
+from typing import Any, AsyncIterable, Dict, Iterable, Optional, Union
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+STREAM_BATCH_SIZE = 256
+
+_COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+
+def dumps_json(payload: Any) -> bytes:
+    """
+    Serialize payload to compact JSON bytes.
+
+    Values orjson cannot encode natively (Decimal, datetime, UUID...) go
+    through str(), so for ASCII text and finite numbers the output matches
+    json.dumps(payload, default=str, separators=(',', ':')). With orjson
+    it differs from that call in three ways:
+
+    - non-ASCII text is written as UTF-8 instead of \\uXXXX escapes
+    - NaN and Infinity become null (json.dumps emits invalid JSON for them)
+    - integers outside the 64-bit range raise TypeError
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            payload,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        )
+    return json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps_json."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header (None if neither is accepted)."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0 or (accepted.get('*', 0) > 0 and 'gzip' not in accepted):
+        return 'gzip'
+    return None
+
+
+class _Compressor:
+    """Incremental gzip/brotli compressor."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == 'br':
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b'') -> bytes:
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip.
+
+    Skips responses that are already encoded, not textual, event streams
+    (SSE must reach the client unbuffered) and complete bodies smaller than
+    minimum_size. Streamed bodies are compressed and flushed per chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding'))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+
+    def __init__(self, send, encoding: str, middleware: CompressionMiddleware):
+        self._send = send
+        self.encoding = encoding
+        self.middleware = middleware
+        self.start_message = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            # Held until the first body chunk shows whether compression applies
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not self._should_compress(headers, body, more_body):
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            # The compressed bytes are a different representation; a strong tag would no longer hold
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["Content-Length"]
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": self.compressor.compress(body, flush=True), "more_body": True})
+            else:
+                compressed = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(compressed))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        if more_body:
+            await self._send({"type": "http.response.body", "body": self.compressor.compress(body, flush=True), "more_body": True})
+        else:
+            await self._send({"type": "http.response.body", "body": self.compressor.finish(body)})
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if self.start_message["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("text/event-stream") or not content_type.startswith(_COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.middleware.minimum_size
+
+
+async def _iter_items(items: Union[Iterable[Any], AsyncIterable[Any]]):
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+def streaming_json_response(
+    envelope: Dict[str, Any],
+    array_key: str,
+    items: Union[Iterable[Any], AsyncIterable[Any]],
+    trailer: Optional[Dict[str, Any]] = None,
+    batch_size: int = STREAM_BATCH_SIZE
+) -> StreamingResponse:
+    """
+    Stream {**envelope, array_key: [...items], **trailer} as chunked JSON.
+
+    Items are serialized in batches as they are produced, so the full array
+    is never materialized as one document. Pass a generator or paging
+    iterator: a list that is already built gains nothing over a plain
+    FastJSONResponse. Fields whose value depends on the
+    items (counts) belong in trailer, which is written after the array.
+
+    Args:
+        envelope: Fields written before the array
+        array_key: Name of the array field
+        items: Sync or async iterable of JSON-serializable items
+        trailer: Fields written after the array
+        batch_size: Items serialized per chunk
+    """
+    async def generate():
+        head = dumps_json(envelope)[:-1]
+        yield head + (b',' if envelope else b'') + dumps_json(array_key) + b':['
+
+        batch = []
+        first = True
+        async for item in _iter_items(items):
+            batch.append(dumps_json(item))
+            if len(batch) >= batch_size:
+                yield (b'' if first else b',') + b','.join(batch)
+                first = False
+                batch = []
+        if batch:
+            yield (b'' if first else b',') + b','.join(batch)
+
+        tail = dumps_json(trailer or {})
+        yield b']' + (b',' + tail[1:] if trailer else b'}')
+
+    return StreamingResponse(generate(), media_type='application/json')
+
+
+def compute_etag(body: bytes) -> str:
+    """Weak ETag for a serialized response body (valid for every content coding of it)."""
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match."""
+    if not if_none_match:
+        return False
+    candidates = [_opaque_tag(tag.strip()) for tag in if_none_match.split(',')]
+    return '*' in candidates or _opaque_tag(etag) in candidates
+
+
+def etag_json_response(request: Request, payload: Any, max_age: int = 0) -> Response:
+    """
+    Serialize payload as JSON with an ETag, honoring If-None-Match.
+
+    Args:
+        request: Incoming request (for the If-None-Match header)
+        payload: JSON-serializable response content
+        max_age: Seconds the client may reuse the response without revalidating
+
+    Returns:
+        304 response if the client's copy is current, otherwise a JSON response
+    """
+    body = dumps_json(payload)
+    etag = compute_etag(body)
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f"private, max-age={max_age}, must-revalidate",
+    }
+
+    if _etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type='application/json', headers=headers)
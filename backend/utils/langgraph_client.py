@@ -2,14 +2,16 @@
 Utility for interacting with LangGraph Cloud API.
 This module provides functions to create threads, add messages, run threads,
 and fetch thread history from a deployed LangGraph agent.
+
+All calls are async and share one pooled httpx.AsyncClient, so in-flight
+requests (including long LLM streams) never block the API server's event loop.
 """
 
 import os
 import json
-import requests
+import asyncio
 import logging
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import httpx
 from typing import Dict, List, Any, Optional, Union
 from dotenv import load_dotenv
 from utils.citation_extractor import extract_citations_from_text, extract_citations_from_messages
@@ -23,49 +25,92 @@ load_dotenv()
 # LangGraph API configuration
 LANGGRAPH_API_URL = os.getenv("LANGGRAPH_API_URL")
 LANGGRAPH_API_KEY = os.getenv("LANGGRAPH_API_KEY")
+LANGGRAPH_MAX_CONNECTIONS = int(os.getenv("LANGGRAPH_MAX_CONNECTIONS", "200"))
+
+# --- Shared async HTTP client ---
+
+RETRIES = 3
+BACKOFF_FACTOR = 0.3
+STATUS_FORCELIST = (500, 502, 503, 504)
+
+# Streams may stay quiet for a long time while the agent runs tools, so only
+# connecting and sending are bounded for them
+_DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+_STREAM_TIMEOUT = httpx.Timeout(None, connect=10.0, write=30.0)
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_langgraph_http_client() -> httpx.AsyncClient:
+    """
+    Get the pooled async client for LangGraph requests.
+
+    The client is bound to the running event loop; a new one is created if
+    called from a different loop (e.g. between test event loops).
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            timeout=_DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=LANGGRAPH_MAX_CONNECTIONS,
+                max_keepalive_connections=min(LANGGRAPH_MAX_CONNECTIONS, 50)
+            ),
+            # Retries connection failures; status-code retries are handled in _request
+            transport=httpx.AsyncHTTPTransport(retries=RETRIES)
+        )
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_langgraph_http_client():
+    """Close the pooled client (called on server shutdown)."""
+    global _http_client, _http_client_loop
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
 
-# --- Configure requests Session for robustness --- 
-
-def create_session_with_retries(
-    retries=3,
-    backoff_factor=0.3,
-    status_forcelist=(500, 502, 503, 504),
-    session=None,
-) -> requests.Session:
-    session = session or requests.Session()
-    retry_strategy = Retry(
-        total=retries,
-        read=retries,
-        connect=retries,
-        backoff_factor=backoff_factor,
-        status_forcelist=status_forcelist,
-        # Explicitly adding method_whitelist=False to retry on POST etc.
-        # or specify methods: method_whitelist=frozenset(['HEAD', 'GET', 'POST', 'PUT', 'DELETE', 'OPTIONS', 'TRACE'])
-        allowed_methods=False 
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
-
-# Global session object
-langgraph_session = create_session_with_retries()
+
+async def _request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request, retrying on transient 5xx responses with exponential backoff.
+
+    Raises:
+        httpx.HTTPError: If the request fails or the final response is an error
+    """
+    client = get_langgraph_http_client()
+    for attempt in range(RETRIES + 1):
+        response = await client.request(method, url, headers=get_headers(), **kwargs)
+        if response.status_code not in STATUS_FORCELIST or attempt == RETRIES:
+            break
+        await asyncio.sleep(BACKOFF_FACTOR * (2 ** attempt))
+    response.raise_for_status()
+    return response
+
+
+def _log_error_response(e: httpx.HTTPError):
+    response = getattr(e, 'response', None) if isinstance(e, httpx.HTTPStatusError) else None
+    if response is not None:
+        logger.error(f"Response status: {response.status_code}, Response body: {response.text}")
 # ----------------------------------------------
 
 def get_headers() -> Dict[str, str]:
     """
     Get the headers needed for LangGraph API requests.
-    
+
     Returns:
         Dict[str, str]: Headers dictionary with API key and content type
     """
     # Content-Type is generally required for POST/PATCH, harmless for GET
-    return {
-        "x-api-key": LANGGRAPH_API_KEY,
-        "Content-Type": "application/json" 
-    }
+    headers = {"Content-Type": "application/json"}
+    if LANGGRAPH_API_KEY:
+        headers["x-api-key"] = LANGGRAPH_API_KEY
+    return headers
 
-def create_thread(metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+async def create_thread(metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Create a new thread in LangGraph Cloud.
     Args: metadata (Dict, optional): Metadata...
@@ -76,23 +121,20 @@ def create_thread(metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     payload = {}
     if metadata:
         payload["metadata"] = metadata
-    
+
     try:
-        # Use the session object
-        response = langgraph_session.post(url, headers=get_headers(), json=payload)
-        response.raise_for_status()
+        response = await _request("POST", url, json=payload)
         thread_data = response.json()
         logger.info(f"Created thread: {thread_data['thread_id']}")
         return thread_data
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error creating thread: {e}")
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Response: {e.response.text}")
+        _log_error_response(e)
         raise Exception(f"Failed to create thread: {str(e)}")
 
-def run_thread_wait(
-    thread_id: str, 
-    assistant_id: str, 
+async def run_thread_wait(
+    thread_id: str,
+    assistant_id: str,
     input_data: Dict[str, Any],
     config: Optional[Dict[str, Any]] = None,
     metadata: Optional[Dict[str, Any]] = None
@@ -107,63 +149,47 @@ def run_thread_wait(
     payload = {"assistant_id": assistant_id, "input": input_data}
     if config: payload["config"] = config
     if metadata: payload["metadata"] = metadata
-        
+
     logger.info(f"Running thread {thread_id} with assistant/graph '{assistant_id}' using /runs/wait, payload keys: {list(payload.keys())}")
-    
+
     try:
-        # Use the session object
-        response = langgraph_session.post(url, headers=get_headers(), json=payload)
-        response.raise_for_status()
+        # The run lasts as long as the agent does, so the read timeout is lifted
+        response = await _request("POST", url, json=payload, timeout=_STREAM_TIMEOUT)
         final_output = response.json()
         logger.info(f"Completed run for thread {thread_id} via /runs/wait")
         return final_output
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error running thread {thread_id} via /runs/wait: {e}")
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Response status: {e.response.status_code}, Response body: {e.response.text}")
+        _log_error_response(e)
         raise Exception(f"Failed to run thread and wait: {str(e)}")
 
-def get_thread_messages(thread_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+async def get_thread_messages(thread_id: str, limit: int = 50) -> List[Dict[str, Any]]:
     """
     Get the history (checkpoints/states) for a thread.
     Args: ...
     Returns: List[Dict]: Checkpoints...
     Raises: Exception: If fails...
     """
-    url = f"{LANGGRAPH_API_URL}/threads/{thread_id}/history?limit={limit}"
+    url = f"{LANGGRAPH_API_URL}/threads/{thread_id}/history"
     logger.info(f"Getting history for thread {thread_id} with limit {limit}")
-    
+
     try:
-        # Use the session object
-        response = langgraph_session.get(url, headers=get_headers())
-        response.raise_for_status()
+        response = await _request("GET", url, params={"limit": limit})
         history_data = response.json()
         logger.info(f"Retrieved {len(history_data)} history items for thread {thread_id}")
         return history_data
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         # Log the specific error more clearly
         error_message = f"Error getting history for thread {thread_id}: {e}"
-        if isinstance(e, requests.exceptions.SSLError):
-            error_message += " (SSL Error)"
-        elif isinstance(e, requests.exceptions.ConnectionError):
-             error_message += " (Connection Error)"
+        if isinstance(e, httpx.ConnectError):
+            error_message += " (Connection Error)"
+        elif isinstance(e, httpx.TimeoutException):
+            error_message += " (Timeout)"
         logger.error(error_message)
-        
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Response status: {e.response.status_code}, Response body: {e.response.text}")
-            # Check if body is empty or non-JSON before logging text
-            try:
-                 response_body = e.response.text
-            except Exception:
-                 response_body = "<Failed to read response body>"
-            logger.error(f"Response status: {e.response.status_code}, Response body: {response_body}")
-        else:
-            logger.error("No response object available in exception.")
-            
-        # Re-raise a more specific exception if possible, otherwise generic
+        _log_error_response(e)
         raise Exception(f"Failed to get thread history: {str(e)}")
 
-def get_thread(thread_id: str) -> Dict[str, Any]:
+async def get_thread(thread_id: str) -> Dict[str, Any]:
     """
     Get thread information.
     Args: ...
@@ -172,19 +198,16 @@ def get_thread(thread_id: str) -> Dict[str, Any]:
     """
     url = f"{LANGGRAPH_API_URL}/threads/{thread_id}"
     try:
-        # Use the session object
-        response = langgraph_session.get(url, headers=get_headers())
-        response.raise_for_status()
+        response = await _request("GET", url)
         thread_data = response.json()
         logger.info(f"Retrieved thread {thread_id}")
         return thread_data
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error getting thread {thread_id}: {e}")
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Response: {e.response.text}")
+        _log_error_response(e)
         raise Exception(f"Failed to get thread: {str(e)}")
 
-def list_threads(limit: int = 20, metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+async def list_threads(limit: int = 20, metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """
     List available threads using /threads/search.
     Args: ...
@@ -197,19 +220,16 @@ def list_threads(limit: int = 20, metadata_filter: Optional[Dict[str, Any]] = No
     logger.info(f"Listing threads with payload: {payload}")
 
     try:
-        # Use the session object
-        response = langgraph_session.post(url, headers=get_headers(), json=payload)
-        response.raise_for_status()
+        response = await _request("POST", url, json=payload)
         threads_data = response.json()
         logger.info(f"Retrieved {len(threads_data)} threads via search")
         return threads_data
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error listing threads via search: {e}")
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Response status: {e.response.status_code}, Response body: {e.response.text}")
+        _log_error_response(e)
         raise Exception(f"Failed to list threads: {str(e)}")
 
-def update_thread_metadata(thread_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+async def update_thread_metadata(thread_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
     """
     Update thread metadata using PATCH.
     Args: ...
@@ -217,28 +237,20 @@ def update_thread_metadata(thread_id: str, metadata: Dict[str, Any]) -> Dict[str
     Raises: Exception: If fails...
     """
     url = f"{LANGGRAPH_API_URL}/threads/{thread_id}"
-    headers = get_headers()
-    masked_headers = {k: (f"{v[:5]}...{v[-4:]}" if k == 'x-api-key' and v and len(v) > 9 else v) for k, v in headers.items()}
-    logger.info(f"Attempting PATCH to {url} with headers: {masked_headers}")
+    logger.info(f"Attempting PATCH to {url}")
     payload = {"metadata": metadata}
 
     try:
-        # Use the session object
-        response = langgraph_session.patch(url, headers=headers, json=payload)
-        response.raise_for_status()
+        response = await _request("PATCH", url, json=payload)
         updated_thread_data = response.json()
         logger.info(f"Successfully updated metadata for thread {thread_id}")
         return updated_thread_data
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error updating metadata for thread {thread_id}: {e}")
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Response status: {e.response.status_code}, Response body: {e.response.text}")
-        raise Exception(f"Failed to update thread metadata: {str(e)}") 
+        _log_error_response(e)
+        raise Exception(f"Failed to update thread metadata: {str(e)}")
 
 
-# Note: run_thread_stream needs careful handling with sessions and streaming.
-# Using the global session might be okay, but keep an eye on potential issues
-# if many streams are run concurrently or if sessions behave unexpectedly with streaming.
 async def run_thread_stream(
     thread_id: str,
     assistant_id: str,
@@ -250,6 +262,11 @@ async def run_thread_stream(
 ):
     """
     Stream events using /runs/stream. Handles initial and resume runs.
+
+    Lines are read incrementally from the pooled async client. If the consumer
+    stops iterating (e.g. the browser disconnected and the response task was
+    cancelled), the upstream HTTP stream is closed immediately.
+
     Args: ...
     Yields: str: Raw SSE chunks...
     Raises: Exception: If fails...
@@ -262,7 +279,7 @@ async def run_thread_stream(
         "assistant_id": assistant_id,
         "stream_mode": ["messages", "events"] # Requesting messages and events
     }
-    
+
     if resume_command is not None:
         payload["command"] = {"resume": resume_command}
         run_type = "resume"
@@ -273,73 +290,59 @@ async def run_thread_stream(
         log_input_desc = f"input keys: {list(input_data.keys())}"
     else:
          raise ValueError("Either input_data or resume_command must be provided")
-    
+
     if config: payload["config"] = config
     if metadata: payload["metadata"] = metadata
 
     logger.info(f"Starting {run_type} stream for thread {thread_id} with assistant/graph '{assistant_id}'. Details: {log_input_desc}")
 
     lines_yielded = 0
+    client = get_langgraph_http_client()
     try:
-        response = langgraph_session.post(
-            url, 
-            headers=headers, 
-            json=payload, 
-            stream=True
-        )
-        response.raise_for_status()
-        
-        logger.info(f"SSE stream connection established for thread {thread_id}.")
-        
-        for line in response.iter_lines(decode_unicode=True):
-             # Strip whitespace from the line before processing
-             clean_line = line.strip()
-             if clean_line:
-                 logger.debug(f"Raw SSE line received for {thread_id}: {clean_line}") 
-                 
-                 # Check for potential error events specifically
-                 if clean_line.startswith("event: error"):
-                     logger.error(f"Explicit error event received in stream for {thread_id}: {clean_line}")
-                 # Check for data that might indicate an issue
-                 if clean_line.startswith("data:"):
-                     try:
-                         # Process based on the cleaned line
-                         data_content = json.loads(clean_line[len("data:"):].strip())
-                         if isinstance(data_content, dict) and data_content.get("event") == "error":
+        async with client.stream("POST", url, headers=headers, json=payload, timeout=_STREAM_TIMEOUT) as response:
+            if response.is_error:
+                error_body = (await response.aread()).decode('utf-8', errors='replace')
+                logger.error(f"Response status: {response.status_code}, Response body: {error_body}")
+                raise Exception(f"Failed to stream run ({response.status_code}): {error_body}")
+
+            logger.info(f"SSE stream connection established for thread {thread_id}.")
+
+            async for line in response.aiter_lines():
+                clean_line = line.strip()
+                if not clean_line:
+                    continue  # keep-alive / event separator
+
+                # Cheap prefix/substring checks; only suspected error payloads are parsed
+                if clean_line.startswith("event: error"):
+                    logger.error(f"Explicit error event received in stream for {thread_id}: {clean_line}")
+                elif clean_line.startswith("data:") and '"error"' in clean_line:
+                    try:
+                        data_content = json.loads(clean_line[len("data:"):].strip())
+                        if isinstance(data_content, dict) and data_content.get("event") == "error":
                             logger.error(f"Parsed error event data for {thread_id}: {data_content}")
-                     except json.JSONDecodeError:
-                         logger.warning(f"Failed to parse JSON data for line: {clean_line}", exc_info=True)
-                         pass # Ignore if data is not valid JSON
-                         
-                 # Format the line as a proper SSE chunk
-                 sse_chunk = f"{line}\n\n"
-                 
-                 # Call the callback with the chunk if provided
-                 if callback:
-                     await callback(sse_chunk)
-                     
-                 # Yield the original line + standard SSE termination 
-                 yield sse_chunk
-                 lines_yielded += 1
-             # else: # Log stripped empty lines if needed
-             #    logger.debug(f"Empty line received (keep-alive) for {thread_id}")
-                 
+                    except json.JSONDecodeError:
+                        pass  # Ignore if data is not valid JSON
+
+                # Format the line as a proper SSE chunk
+                sse_chunk = f"{line}\n\n"
+
+                # Call the callback with the chunk if provided
+                if callback:
+                    await callback(sse_chunk)
+
+                yield sse_chunk
+                lines_yielded += 1
+
         logger.info(f"SSE stream finished for thread {thread_id}. Total lines yielded: {lines_yielded}")
         if lines_yielded == 0:
              logger.warning(f"Stream for thread {thread_id} finished immediately without yielding any data lines. Potential agent error?")
 
-    except requests.exceptions.RequestException as e:
+    except (asyncio.CancelledError, GeneratorExit):
+        logger.info(f"SSE stream for thread {thread_id} closed by client after {lines_yielded} lines")
+        raise
+    except httpx.HTTPError as e:
         logger.error(f"Error during streaming connection for thread {thread_id}: {e}")
-        if hasattr(e, 'response') and e.response:
-            try:
-                 error_body = e.response.text
-                 logger.error(f"Response status: {e.response.status_code}, Response body: {error_body}")
-                 raise Exception(f"Failed to stream run ({e.response.status_code}): {error_body}") from e
-            except Exception as read_err:
-                 logger.error(f"Response status: {e.response.status_code}, Failed to read error body: {read_err}")
-                 raise Exception(f"Failed to stream run ({e.response.status_code}): {str(e)}") from e
-        else:
-             raise Exception(f"Failed to stream run: {str(e)}") from e
+        raise Exception(f"Failed to stream run: {str(e)}") from e
     except Exception as e:
          logger.error(f"Unexpected error during stream processing for thread {thread_id}: {e}", exc_info=True)
          raise
@@ -4,10 +4,17 @@ Fetches user personalization data and formats it for system prompt injection.
 
 This service implements the Single Responsibility Principle by handling only
 personalization context management, with clear separation from other concerns.
+
+The formatted personalization section is cached per user (TTL + version) so
+the supervisor prompt, rebuilt on every LLM step, only reads the database once
+per conversation. Preference writes bump the user's version to invalidate it.
 """
 
+import os
+import time
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, Callable, Tuple
 from dataclasses import dataclass
 from langgraph.types import RunnableConfig
 from langgraph.config import get_config
@@ -66,6 +73,118 @@ class PersonalizationContext:
         return sections
 
 
+PERSONALIZATION_CACHE_TTL_SECONDS = int(os.getenv("PERSONALIZATION_CACHE_TTL_SECONDS", "300"))
+PERSONALIZATION_VERSION_KEY_PREFIX = "personalization:version:"
+REDIS_RETRY_SECONDS = 30
+
+
+class PersonalizationPromptCache:
+    """
+    Per-user cache of the formatted personalization prompt section.
+    
+    Entries expire after a TTL and are tagged with the user's personalization
+    version, a Redis counter bumped whenever preferences are written, so an
+    update reaches every agent process on its next step. Without Redis the
+    cache falls back to TTL-only expiry.
+    """
+    
+    def __init__(self, ttl_seconds: int = PERSONALIZATION_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = None
+        self._redis_retry_at = 0.0
+        # user_id -> (version, expires_at, prompt section)
+        self._entries: Dict[str, Tuple[Optional[int], float, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _get_redis_client(self):
+        """Lazy load Redis client following existing pattern from sector_data_collector.py."""
+        if self.redis_client is None:
+            import redis
+            
+            _IS_PRODUCTION = os.getenv("COPILOT_ENVIRONMENT_NAME", "").lower() == "production" or os.getenv("ENVIRONMENT", "").lower() == "production"
+            if _IS_PRODUCTION:
+                redis_host = os.getenv("REDIS_HOST")
+                if not redis_host:
+                    raise RuntimeError("REDIS_HOST environment variable must be set in production!")
+            else:
+                redis_host = os.getenv("REDIS_HOST", "127.0.0.1")
+            
+            # Short timeouts: this sits on the prompt path of every LLM step
+            self.redis_client = redis.Redis(
+                host=redis_host,
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                db=int(os.getenv("REDIS_DB", "0")),
+                decode_responses=True,
+                socket_timeout=0.25,
+                socket_connect_timeout=0.25
+            )
+        return self.redis_client
+    
+    def _get_version(self, user_id: str) -> Optional[int]:
+        """Current personalization version for a user (None if Redis is unavailable)."""
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            value = self._get_redis_client().get(f"{PERSONALIZATION_VERSION_KEY_PREFIX}{user_id}")
+            return int(value) if value else 0
+        except Exception as e:
+            logger.warning(f"Personalization version lookup failed, using TTL only: {e}")
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+            return None
+    
+    def get_prompt_section(self, user_id: str, loader: Callable[[], str]) -> str:
+        """
+        Get the cached prompt section for a user, loading it on a miss.
+        
+        Args:
+            user_id: Supabase user ID
+            loader: Builds the prompt section ('' when the user has none)
+        """
+        version = self._get_version(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now and (version is None or entry[0] == version):
+                self.hits += 1
+                logger.debug(f"Personalization cache hit ({self.hits} hits / {self.misses} misses)")
+                return entry[2]
+        
+        section = loader()
+        with self._lock:
+            self._entries[user_id] = (version, now + self.ttl_seconds, section)
+            self.misses += 1
+        logger.info(f"Personalization cache miss, loaded from database ({self.hits} hits / {self.misses} misses)")
+        return section
+    
+    def invalidate(self, user_id: str):
+        """Drop a user's cached section here and, via the version bump, in every process."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        try:
+            self._get_redis_client().incr(f"{PERSONALIZATION_VERSION_KEY_PREFIX}{user_id}")
+        except Exception as e:
+            logger.warning(f"Failed to bump personalization version, other processes will refresh after TTL: {e}")
+    
+    def clear(self):
+        """Drop all cached sections in this process."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Global personalization prompt cache instance
+_personalization_prompt_cache: Optional[PersonalizationPromptCache] = None
+
+
+def get_personalization_prompt_cache() -> PersonalizationPromptCache:
+    """Get or create the global personalization prompt cache instance."""
+    global _personalization_prompt_cache
+    if _personalization_prompt_cache is None:
+        _personalization_prompt_cache = PersonalizationPromptCache()
+    return _personalization_prompt_cache
+
+
 class PersonalizationService:
     """Centralized service for user personalization context management."""
     
@@ -357,6 +476,32 @@ class PersonalizationService:
         }
         return guidance_map.get(experience_level, "Adjust communication style to match their investment knowledge level.")
     
+    @staticmethod
+    def get_personalization_prompt_section(user_id: str) -> str:
+        """
+        Get the formatted personalization section for a user's system prompt.
+        
+        Served from the per-user prompt cache; the database is only queried on
+        a miss, after the TTL, or after the user's preferences change.
+        
+        Returns:
+            str: Newline-joined prompt sections ('' if the user has none)
+        """
+        def load() -> str:
+            context = PersonalizationService.get_user_personalization_context(user_id)
+            if not context.has_any_context():
+                return ""
+            return "\n".join(context.to_prompt_sections())
+        
+        return get_personalization_prompt_cache().get_prompt_section(user_id, load)
+    
+    @staticmethod
+    def invalidate_personalization_cache(user_id: str):
+        """Invalidate a user's cached personalization after their preferences are written."""
+        if user_id:
+            get_personalization_prompt_cache().invalidate(user_id)
+            logger.info("Invalidated personalization cache for user")
+    
     @staticmethod
     def build_personalized_system_prompt(base_prompt: str, config: RunnableConfig = None) -> str:
         """
@@ -390,17 +535,15 @@ class PersonalizationService:
                 logger.debug("No user_id in LangGraph config")
                 return base_prompt
             
-            # Fetch personalization context
-            context = PersonalizationService.get_user_personalization_context(user_id)
+            # Fetch personalization context (cached across steps of a conversation)
+            personalization_context = PersonalizationService.get_personalization_prompt_section(user_id)
             
             # If no personalization data, return base prompt
-            if not context.has_any_context():
+            if not personalization_context:
                 logger.debug(f"No personalization context available for user")
                 return base_prompt
             
             # Build enhanced prompt
-            personalization_sections = context.to_prompt_sections()
-            personalization_context = "\n".join(personalization_sections)
             
             enhanced_prompt = f"""{base_prompt}
 
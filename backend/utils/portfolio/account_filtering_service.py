@@ -53,20 +53,15 @@ class AccountFilteringService:
             List of holdings for the specific account
         """
         try:
-            supabase = self._get_supabase_client()
-            
             # Get all holdings for user (INCLUDING CASH for accurate allocation calculation)
-            result = supabase.table('user_aggregated_holdings')\
-                .select('*')\
-                .eq('user_id', user_id)\
-                .execute()
+            # Shared loader: concurrent dashboard views reuse one holdings query
+            from utils.portfolio.holdings_snapshot_loader import get_holdings_snapshot_loader
+            all_holdings = await get_holdings_snapshot_loader().load(user_id, self._get_supabase_client())
             
-            if not result.data:
+            if not all_holdings:
                 logger.warning(f"No holdings found for user {user_id}")
                 return []
             
-            all_holdings = result.data
-            
             # If no filter or total, return all holdings
             if not filter_account or filter_account == 'total':
                 logger.info(f"Returning all {len(all_holdings)} holdings for user {user_id}")
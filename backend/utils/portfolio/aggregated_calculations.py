@@ -256,8 +256,9 @@ def calculate_portfolio_analytics(holdings_data: List[Dict[str, Any]], user_id:
         # Calculate analytics with live data
         logger.info(f"Calculating analytics for {len(portfolio_positions)} aggregated positions (live-enriched)")
         
-        risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions)
-        diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions)
+        risk_metrics = PortfolioAnalyticsEngine.calculate_risk_metrics(portfolio_positions)
+        risk_score = PortfolioAnalyticsEngine.calculate_risk_score(portfolio_positions, risk_metrics=risk_metrics)
+        diversification_score = PortfolioAnalyticsEngine.calculate_diversification_score(portfolio_positions, risk_metrics=risk_metrics)
         
         logger.info(f"Portfolio analytics calculated for user {user_id}: risk={risk_score}, diversification={diversification_score}")
         
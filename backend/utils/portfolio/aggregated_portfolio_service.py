@@ -12,14 +12,19 @@ This service follows SOLID principles:
 - Modularity: Clean separation from API layer
 """
 
+import asyncio
 import logging
-import json
 from typing import Dict, Any, List, Optional
 from decimal import Decimal
 from datetime import datetime, date, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Calendar days covered by each history period
+HISTORY_PERIOD_DAYS = {
+    '1D': 1, '1W': 7, '1M': 30, '3M': 90, '6M': 180, '1Y': 365, 'MAX': 730  # 2 years max
+}
+
 class AggregatedPortfolioService:
     """
     Service for calculating portfolio metrics from aggregated investment data.
@@ -39,6 +44,15 @@ class AggregatedPortfolioService:
             self.supabase = get_supabase_client()
         return self.supabase
     
+    async def _load_holdings(self, user_id: str) -> List[Dict[str, Any]]:
+        """All aggregated holdings rows for a user, via the shared snapshot loader."""
+        from .holdings_snapshot_loader import get_holdings_snapshot_loader
+        return await get_holdings_snapshot_loader().load(user_id, self._get_supabase_client())
+    
+    @staticmethod
+    def _is_cash_holding(holding: Dict[str, Any]) -> bool:
+        return holding.get('security_type') == 'cash' or holding.get('symbol') == 'U S Dollar'
+    
     async def get_portfolio_value(self, user_id: str, include_cash: bool = True) -> Dict[str, Any]:
         """
         Calculate current portfolio value and return metrics for aggregated data.
@@ -53,28 +67,22 @@ class AggregatedPortfolioService:
             Dictionary with portfolio value, today's return, and metadata
         """
         try:
-            supabase = self._get_supabase_client()
-            
             # Get aggregated holdings for this user (need ALL fields for enrichment)
-            query = supabase.table('user_aggregated_holdings')\
-                .select('*')\
-                .eq('user_id', user_id)
+            holdings = await self._load_holdings(user_id)
             
             # CRITICAL: Include cash by default for accurate portfolio value
             # Cash is part of the total portfolio value and should be counted
             if not include_cash:
-                query = query.neq('security_type', 'cash').neq('symbol', 'U S Dollar')
-            
-            result = query.execute()
+                holdings = [h for h in holdings if not self._is_cash_holding(h)]
             
-            if not result.data:
+            if not holdings:
                 logger.warning(f"No aggregated holdings found for user {user_id}")
                 return self._empty_portfolio_value_response()
             
             # CRITICAL: Enrich with LIVE market prices (database values are stale)
             from utils.portfolio.live_enrichment_service import get_enrichment_service
             enrichment_service = get_enrichment_service()
-            enriched_holdings = enrichment_service.enrich_holdings(result.data, user_id)
+            enriched_holdings = enrichment_service.enrich_holdings(holdings, user_id)
             
             # Use modular calculation function with enriched data
             from .aggregated_calculations import calculate_portfolio_value
@@ -100,33 +108,23 @@ class AggregatedPortfolioService:
             Dictionary with risk_score and diversification_score
         """
         try:
-            supabase = self._get_supabase_client()
-            
-            # CRITICAL: First check if user has any holdings at all (including cash)
-            # This determines if they have a "cash-only" portfolio vs "empty" portfolio
-            all_holdings_result = supabase.table('user_aggregated_holdings')\
-                .select('symbol, security_type, total_market_value')\
-                .eq('user_id', user_id)\
-                .execute()
+            # CRITICAL: Load ALL holdings (including cash) once
+            # Cash presence determines a "cash-only" portfolio vs an "empty" portfolio
+            all_holdings = await self._load_holdings(user_id)
             
             # Get aggregated holdings for analytics (EXCLUDE CASH POSITIONS)
-            result = supabase.table('user_aggregated_holdings')\
-                .select('symbol, security_name, security_type, total_quantity, total_market_value, total_cost_basis, unrealized_gain_loss')\
-                .eq('user_id', user_id)\
-                .neq('security_type', 'cash')\
-                .neq('symbol', 'U S Dollar')\
-                .execute()
+            securities = [h for h in all_holdings if not self._is_cash_holding(h)]
             
-            if not result.data:
+            if not securities:
                 # CRITICAL: Distinguish between "cash-only" and "truly empty" portfolios
                 # - Cash-only: User has cash but no securities → low risk, low diversification
                 # - Truly empty: User has no holdings at all → no data
                 has_cash_holdings = False
                 total_cash = 0.0
                 
-                if all_holdings_result.data:
-                    for holding in all_holdings_result.data:
-                        if holding.get('security_type') == 'cash' or holding.get('symbol') == 'U S Dollar':
+                if all_holdings:
+                    for holding in all_holdings:
+                        if self._is_cash_holding(holding):
                             total_cash += float(holding.get('total_market_value', 0) or 0)
                             has_cash_holdings = True
                 
@@ -143,7 +141,8 @@ class AggregatedPortfolioService:
             
             # Use modular calculation function
             from .aggregated_calculations import calculate_portfolio_analytics
-            return calculate_portfolio_analytics(result.data, user_id)
+            # Risk metrics may read a year of stored prices on a model cache miss; keep the event loop free
+            return await asyncio.to_thread(calculate_portfolio_analytics, securities, user_id)
             
         except Exception as e:
             logger.error(f"Error calculating aggregated portfolio analytics for user {user_id}: {e}")
@@ -169,21 +168,16 @@ class AggregatedPortfolioService:
             return cached_response
         
         try:
-            supabase = self._get_supabase_client()
-            
             # Get aggregated holdings for allocation calculation (INCLUDE CASH for allocation percentages)
-            result = supabase.table('user_aggregated_holdings')\
-                .select('symbol, security_name, security_type, total_market_value')\
-                .eq('user_id', user_id)\
-                .execute()
+            holdings = await self._load_holdings(user_id)
             
-            if not result.data:
+            if not holdings:
                 logger.warning(f"No aggregated holdings found for user {user_id}")
                 return self._empty_allocation_response()
             
             # Use modular calculation function
             from .aggregated_calculations import calculate_asset_allocation
-            response = calculate_asset_allocation(result.data, user_id)
+            response = calculate_asset_allocation(holdings, user_id)
             
             # OPTIMIZATION: Cache the response for 30 seconds
             self._cache_response(cache_key, response, ttl_seconds=30)
@@ -228,22 +222,10 @@ class AggregatedPortfolioService:
             Portfolio history response compatible with frontend chart (all accounts or filtered)
         """
         try:
-            supabase = self._get_supabase_client()
-            
             # Handle account-specific filtering
             if filter_account:
                 return await self._get_account_specific_history(user_id, period, filter_account)
             
-            # Calculate date range based on period
-            from datetime import datetime, timedelta
-            end_date = datetime.now().date()
-            
-            period_mapping = {
-                '1D': 1, '1W': 7, '1M': 30, '3M': 90, '6M': 180, '1Y': 365, 'MAX': 730  # 2 years max
-            }
-            days_back = period_mapping.get(period, 30)
-            start_date = end_date - timedelta(days=days_back)
-            
             # CRITICAL FIX: For 1D, ALWAYS use intraday chart with live price updates
             # This shows multiple data points throughout the day (hourly interpolation)
             # instead of just 2 EOD points (yesterday close → today close)
@@ -251,6 +233,126 @@ class AggregatedPortfolioService:
                 logger.info(f"🔧 1D request - building intraday chart with live price movements")
                 return await self._build_intraday_chart(user_id, filter_account)
             
+            # OPTIMIZATION: Serve every period as a slice of the materialized daily series
+            from .equity_series_cache import get_equity_series_cache
+            series = await get_equity_series_cache().get_or_build(user_id)
+            if series is not None:
+                return await self._build_history_from_series(user_id, period, series)
+            
+            # Fallback: cache unavailable or no daily history yet - build from snapshots
+            return await self._build_history_from_snapshots(user_id, period)
+            
+        except Exception as e:
+            logger.error(f"Error getting aggregated portfolio history for user {user_id}: {e}")
+            return self._empty_history_response(period)
+    
+    def _get_history_date_range(self, period: str) -> tuple:
+        """Return (start_date, end_date) for a history period."""
+        end_date = datetime.now().date()
+        days_back = HISTORY_PERIOD_DAYS.get(period, 30)
+        return end_date - timedelta(days=days_back), end_date
+    
+    async def _build_history_from_series(self, user_id: str, period: str, series) -> Dict[str, Any]:
+        """
+        Build a history chart response as a slice of the user's daily equity series.
+        
+        Produces the same timeline as _build_history_from_snapshots: one point per
+        calendar day, forward-filled, with day-over-day P/L and today's point
+        overlaid with the live portfolio value.
+        """
+        start_date, end_date = self._get_history_date_range(period)
+        
+        values = series.slice(start_date, end_date)
+        previous_day_value = series.value_on(start_date - timedelta(days=1))
+        
+        timestamps = []
+        profit_loss = []
+        profit_loss_pct = []
+        for offset, value in enumerate(values):
+            current_date = start_date + timedelta(days=offset)
+            timestamps.append(int(datetime.combine(current_date, datetime.min.time()).timestamp()))
+            day_pl = value - previous_day_value if previous_day_value > 0 else 0.0
+            profit_loss.append(day_pl)
+            profit_loss_pct.append((day_pl / previous_day_value * 100) if previous_day_value > 0 else 0.0)
+            previous_day_value = value
+        
+        equity_values = list(values)
+        await self._apply_live_value_to_today(user_id, equity_values, profit_loss, profit_loss_pct)
+        
+        logger.info(f"Portfolio history served from equity series for user {user_id}: {len(equity_values)} data points over {period}")
+        
+        return {
+            "timestamp": timestamps,
+            "equity": equity_values,
+            "profit_loss": profit_loss,
+            "profit_loss_pct": profit_loss_pct,
+            "base_value": equity_values[0] if equity_values else 0.0,
+            "timeframe": "1D",  # Daily snapshots
+            "base_value_asof": max(series.start_date, start_date).isoformat(),
+            "data_source": "plaid_snapshots_with_live"
+        }
+    
+    async def _apply_live_value_to_today(
+        self,
+        user_id: str,
+        equity_values: List[float],
+        profit_loss: List[float],
+        profit_loss_pct: List[float]
+    ) -> None:
+        """
+        Overwrite today's (last) data point with the LIVE portfolio value.
+        
+        CRYPTO-AWARE LOGIC:
+        - Crypto trades 24/7, so returns can occur on weekends/holidays
+        - Stock prices are "stale" on holidays (= yesterday's close), contributing $0 to return
+        - Total return = crypto return + stock return ($0 on holidays)
+        - This naturally gives correct behavior: crypto returns show, stock returns are $0
+        """
+        if not equity_values:
+            return
+        
+        from utils.trading_calendar import get_trading_calendar
+        
+        today = datetime.now().date()
+        is_market_closed = not get_trading_calendar().is_market_open_today(today)
+        has_crypto = await self._portfolio_has_crypto(user_id)
+        
+        current_portfolio = await self.get_portfolio_value(user_id, include_cash=True)
+        current_value = current_portfolio.get('raw_value', 0)
+        
+        if current_value <= 0:
+            return
+        
+        equity_values[-1] = current_value
+        yesterday_value = equity_values[-2] if len(equity_values) > 1 else current_value
+        
+        # PRODUCTION-GRADE: On non-trading days for stocks-only portfolios,
+        # force today's return to $0 to avoid phantom returns from calculation noise
+        if is_market_closed and not has_crypto:
+            today_pl = 0.0
+            today_pl_pct = 0.0
+            logger.info(f"📅 Market CLOSED, stocks-only portfolio: forcing $0.00 return")
+        else:
+            today_pl = current_value - yesterday_value
+            today_pl_pct = (today_pl / yesterday_value * 100) if yesterday_value > 0 else 0
+            if is_market_closed:
+                logger.info(f"📅 Market CLOSED, crypto portfolio: ${today_pl:+,.2f} ({today_pl_pct:+.2f}%)")
+            else:
+                logger.info(f"✅ Market OPEN: Today's P/L: ${today_pl:+,.2f} ({today_pl_pct:+.2f}%)")
+        
+        profit_loss[-1] = today_pl
+        profit_loss_pct[-1] = today_pl_pct
+    
+    async def _build_history_from_snapshots(self, user_id: str, period: str) -> Dict[str, Any]:
+        """
+        Build a history chart response directly from user_portfolio_history rows.
+        
+        Used when the materialized equity series is unavailable.
+        """
+        try:
+            supabase = self._get_supabase_client()
+            start_date, end_date = self._get_history_date_range(period)
+            
             # Get portfolio history snapshots for the period (from reconstructed/daily_eod history)
             result = supabase.table('user_portfolio_history')\
                 .select('value_date, total_value, total_gain_loss, total_gain_loss_percent, created_at')\
@@ -305,8 +407,6 @@ class AggregatedPortfolioService:
             profit_loss_pct = []
             
             # Generate DAILY data points for the entire requested period (like Alpaca did)
-            from datetime import timedelta
-            
             # Create snapshot lookup for efficient access
             snapshot_by_date = {}
             for snapshot in snapshots:
@@ -375,96 +475,9 @@ class AggregatedPortfolioService:
             
             logger.info(f"📊 Generated daily timeline for {period}: {len(timestamps)} daily points from {start_date} to {end_date}")
             
-            # PRODUCTION-GRADE: Update today's data point with LIVE value if market is open
-            # The loop above already included today (end_date >= today), so we update it, not append
-            from datetime import datetime
-            from utils.trading_calendar import get_trading_calendar
-            
-            today = datetime.now().date()
-            trading_calendar = get_trading_calendar()
-            
-            # Check if today is already in the timeline (it should be, since end_date = today)
-            # PRODUCTION-GRADE: Always update with LIVE portfolio value for accurate returns
-            # 
-            # CRYPTO-AWARE LOGIC:
-            # - Crypto trades 24/7, so returns can occur on weekends/holidays
-            # - Stock prices are "stale" on holidays (= yesterday's close), contributing $0 to return
-            # - Total return = crypto return + stock return ($0 on holidays)
-            # - This naturally gives correct behavior: crypto returns show, stock returns are $0
-            #
-            # The math works because:
-            # - current_stock_price = yesterday_stock_price (stale) → stock return = $0
-            # - current_crypto_price = live → crypto return = actual change
-            # - total_return = (stale_stock + live_crypto) - (yesterday_stock + yesterday_crypto)
-            #                = live_crypto - yesterday_crypto = crypto return only
-            
-            # PRODUCTION-GRADE: Check if market is closed and portfolio has crypto
-            is_market_closed = not trading_calendar.is_market_open_today(today)
-            has_crypto = await self._portfolio_has_crypto(user_id)
-            
-            if today in snapshot_by_date and len(equity_values) > 0:
-                # Today's snapshot exists - but we should STILL update with live values
-                # because crypto prices may have changed since the snapshot was created
-                logger.info(f"📍 Today's snapshot exists, updating with LIVE portfolio value for crypto accuracy")
-                
-                current_portfolio = await self.get_portfolio_value(user_id, include_cash=True)
-                current_value = current_portfolio.get('raw_value', 0)
-                
-                if current_value > 0:
-                    equity_values[-1] = current_value
-                    yesterday_value = equity_values[-2] if len(equity_values) > 1 else current_value
-                    
-                    # PRODUCTION-GRADE: On non-trading days for stocks-only portfolios,
-                    # force today's return to $0 to avoid phantom returns from calculation noise
-                    if is_market_closed and not has_crypto:
-                        today_pl = 0.0
-                        today_pl_pct = 0.0
-                        logger.info(f"📅 Market CLOSED, stocks-only portfolio: forcing $0.00 return")
-                    else:
-                        today_pl = current_value - yesterday_value
-                        today_pl_pct = (today_pl / yesterday_value * 100) if yesterday_value > 0 else 0
-                        if is_market_closed:
-                                logger.info(f"📅 Market CLOSED, crypto portfolio: ${today_pl:+,.2f} ({today_pl_pct:+.2f}%)")
-                        else:
-                            logger.info(f"✅ Market OPEN: Today's P/L: ${today_pl:+,.2f} ({today_pl_pct:+.2f}%)")
-                    
-                    profit_loss[-1] = today_pl
-                    profit_loss_pct[-1] = today_pl_pct
-                        
-            elif end_date >= today and len(equity_values) > 0:
-                # Today was included in the loop but has no snapshot yet
-                # Update the last data point (today) with live value
-                logger.info(f"📍 Updating today's placeholder with LIVE portfolio value")
-                
-                # Get current portfolio value (including cash)
-                current_portfolio = await self.get_portfolio_value(user_id, include_cash=True)
-                current_value = current_portfolio.get('raw_value', 0)
-                
-                if current_value > 0:
-                    # Update today's value (last item in arrays)
-                    equity_values[-1] = current_value
-                    
-                    yesterday_value = equity_values[-2] if len(equity_values) > 1 else current_value
-                    
-                    # PRODUCTION-GRADE: On non-trading days for stocks-only portfolios,
-                    # force today's return to $0 to avoid phantom returns from calculation noise
-                    if is_market_closed and not has_crypto:
-                        today_pl = 0.0
-                        today_pl_pct = 0.0
-                        logger.info(f"📅 Market CLOSED, stocks-only portfolio: forcing $0.00 return")
-                    else:
-                        today_pl = current_value - yesterday_value
-                        today_pl_pct = (today_pl / yesterday_value * 100) if yesterday_value > 0 else 0
-                        if is_market_closed:
-                            logger.info(f"📅 Market CLOSED, crypto portfolio: ${today_pl:+,.2f} ({today_pl_pct:+.2f}%)")
-                        else:
-                            logger.info(f"✅ Market OPEN: Today's P/L: ${today_pl:+,.2f} ({today_pl_pct:+.2f}%)")
-                    
-                    # Update today's P/L (last item)
-                    profit_loss[-1] = today_pl
-                    profit_loss_pct[-1] = today_pl_pct
-                    
-                    logger.info(f"✅ Updated today's value: ${current_value:,.2f} (return: ${today_pl:+,.2f})")
+            # PRODUCTION-GRADE: Update today's data point with LIVE value
+            # The loop above already included today (end_date = today), so we update it, not append
+            await self._apply_live_value_to_today(user_id, equity_values, profit_loss, profit_loss_pct)
             
             # Calculate base value (oldest value in period)
             base_value = equity_values[0] if equity_values else 0.0
@@ -512,18 +525,13 @@ class AggregatedPortfolioService:
             from utils.asset_classification import classify_asset, AssetClassification
             from utils.portfolio.constants import UNAMBIGUOUS_CRYPTO, is_crypto_exchange
             
-            supabase = self._get_supabase_client()
-            
             # Get user's holdings with institution_breakdown for exchange detection
-            result = supabase.table('user_aggregated_holdings')\
-                .select('symbol, security_type, security_name, institution_breakdown')\
-                .eq('user_id', user_id)\
-                .execute()
+            holdings = await self._load_holdings(user_id)
             
-            if not result.data:
+            if not holdings:
                 return False
             
-            for holding in result.data:
+            for holding in holdings:
                 security_type = (holding.get('security_type') or '').lower()
                 symbol = (holding.get('symbol') or '').upper()
                 security_name = holding.get('security_name') or ''
@@ -725,20 +733,24 @@ class AggregatedPortfolioService:
                 profit_loss = []
                 profit_loss_pct = []
                 
-                # Get yesterday's close for baseline
+                # Get yesterday's close for baseline (packed series rows carry it inline)
                 yesterday = today - timedelta(days=1)
-                yesterday_result = supabase.table('user_portfolio_history')\
-                    .select('total_value, closing_value')\
-                    .eq('user_id', user_id)\
-                    .lte('value_date', yesterday.isoformat())\
-                    .in_('snapshot_type', ['daily_eod', 'reconstructed'])\
-                    .order('value_date', desc=True)\
-                    .limit(1)\
-                    .execute()
-                
                 yesterday_value = 0.0
-                if yesterday_result.data:
-                    yesterday_value = float(yesterday_result.data[0].get('closing_value') or yesterday_result.data[0]['total_value'])
+                packed_previous_close = intraday_snapshots[0].get('previous_close')
+                if packed_previous_close is not None:
+                    yesterday_value = float(packed_previous_close)
+                else:
+                    yesterday_result = supabase.table('user_portfolio_history')\
+                        .select('total_value, closing_value')\
+                        .eq('user_id', user_id)\
+                        .lte('value_date', yesterday.isoformat())\
+                        .in_('snapshot_type', ['daily_eod', 'reconstructed'])\
+                        .order('value_date', desc=True)\
+                        .limit(1)\
+                        .execute()
+                    
+                    if yesterday_result.data:
+                        yesterday_value = float(yesterday_result.data[0].get('closing_value') or yesterday_result.data[0]['total_value'])
                 
                 # Add yesterday's close as first point (for baseline comparison)
                 est = pytz.timezone('US/Eastern')
@@ -1077,51 +1089,28 @@ class AggregatedPortfolioService:
             List of snapshot dictionaries in the same format as daily_eod snapshots
         """
         try:
-            from datetime import datetime, timedelta
-            
-            supabase = self._get_supabase_client()
-            gap_snapshots = []
+            from services.intraday_snapshot_service import get_intraday_snapshot_service
             
-            # Query all intraday snapshots in the date range
-            intraday_result = supabase.table('user_portfolio_history')\
-                .select('value_date, total_value, total_gain_loss, total_gain_loss_percent, created_at')\
-                .eq('user_id', user_id)\
-                .eq('snapshot_type', 'intraday')\
-                .gte('value_date', start_date.isoformat())\
-                .lte('value_date', end_date.isoformat())\
-                .order('value_date', desc=False)\
-                .order('created_at', desc=False)\
-                .execute()
+            # Last intraday value per day, from whichever table the intraday layout writes
+            last_per_day = await get_intraday_snapshot_service().get_daily_last_values(
+                user_id, start_date, end_date
+            )
             
-            if not intraday_result.data:
+            if not last_per_day:
                 logger.warning(f"No intraday snapshots found for gap fill ({start_date} to {end_date})")
                 return []
             
-            # Group intraday snapshots by date and take the last one for each day
-            # (represents the end-of-day value for that day)
-            from collections import defaultdict
-            intraday_by_date = defaultdict(list)
-            
-            for snapshot in intraday_result.data:
-                value_date = snapshot['value_date']
-                intraday_by_date[value_date].append(snapshot)
-            
-            # For each date with intraday data, use the LAST snapshot (latest time) as the daily value
-            for value_date, day_snapshots in intraday_by_date.items():
-                # Sort by created_at and take the last one
-                day_snapshots.sort(key=lambda x: x.get('created_at', ''))
-                last_snapshot = day_snapshots[-1]
-                
-                # Only include if the value is non-zero
-                if float(last_snapshot.get('total_value', 0)) > 0:
-                    gap_snapshots.append({
-                        'value_date': value_date,
-                        'total_value': last_snapshot['total_value'],
-                        'total_gain_loss': last_snapshot.get('total_gain_loss', 0),
-                        'total_gain_loss_percent': last_snapshot.get('total_gain_loss_percent', 0),
-                        'created_at': last_snapshot.get('created_at'),
-                        'snapshot_type': 'intraday_aggregated'  # Mark as derived from intraday
-                    })
+            gap_snapshots = [
+                {
+                    'value_date': value_date.isoformat(),
+                    'total_value': snapshot['total_value'],
+                    'total_gain_loss': snapshot.get('total_gain_loss', 0),
+                    'total_gain_loss_percent': snapshot.get('total_gain_loss_percent', 0),
+                    'created_at': snapshot.get('created_at'),
+                    'snapshot_type': 'intraday_aggregated'  # Mark as derived from intraday
+                }
+                for value_date, snapshot in last_per_day.items()
+            ]
             
             # Sort by date
             gap_snapshots.sort(key=lambda x: x['value_date'])
@@ -1139,14 +1128,14 @@ class AggregatedPortfolioService:
         """
         Get portfolio history filtered to a specific account using ACTUAL per-account data.
         
-        We extract the specific account's value from the account_breakdown JSONB field
-        that's stored in every daily snapshot. This provides exact historical values,
-        not approximations.
+        Per-account values come from the account_breakdown recorded with every daily
+        snapshot. They are materialized as one series per account next to the total
+        series, so a filtered chart is a single cached read rather than a re-parse of
+        every snapshot row. This provides exact historical values, not approximations.
         
         Supports both UUID and prefixed account IDs (snaptrade_xxx, plaid_xxx).
         """
         try:
-            import json  # Import at function level for JSON parsing
             supabase = self._get_supabase_client()
             
             # CRITICAL FIX: Handle prefixed account IDs (snaptrade_xxx, plaid_xxx)
@@ -1182,6 +1171,97 @@ class AggregatedPortfolioService:
                 logger.info(f"Building intraday chart for account {prefixed_account_id}")
                 return await self._build_intraday_chart_account(user_id, filter_account, prefixed_account_id)
             
+            # OPTIMIZATION: Serve from the materialized per-account series
+            from .equity_series_cache import get_equity_series_cache
+            account_series = await get_equity_series_cache().get_or_build_account(user_id, prefixed_account_id)
+            if account_series is not None:
+                if not account_series.values:
+                    logger.info(f"No per-account data in account_breakdown for {prefixed_account_id}, using proportion-based reconstruction")
+                    return await self._get_current_account_value_fallback(user_id, filter_account, period)
+                return await self._build_account_history_from_series(user_id, period, prefixed_account_id, account_series)
+            
+            # Fallback: cache unavailable - build from snapshot rows
+            return await self._build_account_history_from_snapshots(user_id, period, filter_account, prefixed_account_id)
+            
+        except Exception as e:
+            logger.error(f"Error getting account-specific history for {filter_account}: {e}")
+            return self._empty_history_response(period)
+    
+    async def _build_account_history_from_series(
+        self,
+        user_id: str,
+        period: str,
+        prefixed_account_id: str,
+        account_series
+    ) -> Dict[str, Any]:
+        """
+        Build an account-filtered chart from the account's materialized daily series.
+        
+        Matches _build_account_history_from_snapshots: only days on which the account
+        held securities are plotted, the account's current cash balance is added to
+        each point, and today's live account value is appended.
+        """
+        start_date, end_date = self._get_history_date_range(period)
+        
+        # One holdings read gives both today's live value and the account's cash balance
+        from utils.portfolio.account_filtering_service import get_account_filtering_service
+        filtered_holdings = await get_account_filtering_service().filter_holdings_by_account(user_id, prefixed_account_id)
+        current_account_value = sum(float(h.get('total_market_value', 0)) for h in filtered_holdings)
+        account_cash_balance = sum(
+            float(h.get('total_market_value', 0)) for h in filtered_holdings if h.get('security_type') == 'cash'
+        )
+        
+        timestamps = []
+        equity_values = []
+        last_point_date = None
+        for value_date, account_value in account_series.iter_points(start_date, end_date):
+            timestamps.append(int(datetime.combine(value_date, datetime.min.time()).timestamp()))
+            equity_values.append(account_value + account_cash_balance)
+            last_point_date = value_date
+        
+        if (last_point_date is None or last_point_date < end_date) and current_account_value > 0:
+            timestamps.append(int(datetime.combine(end_date, datetime.min.time()).timestamp()))
+            equity_values.append(current_account_value)
+        
+        if not timestamps:
+            logger.warning(f"Account {prefixed_account_id} has no historical values in series and no current value")
+            return self._empty_history_response(period)
+        
+        profit_loss = [0.0]
+        profit_loss_pct = [0.0]
+        for prev_val, val in zip(equity_values, equity_values[1:]):
+            day_pl = float(val - prev_val)
+            profit_loss.append(day_pl)
+            profit_loss_pct.append(float(day_pl / prev_val * 100) if prev_val > 0 else 0.0)
+        
+        logger.info(f"✅ Portfolio history for account {prefixed_account_id} served from series: {len(timestamps)} data points over {period}")
+        
+        return {
+            "timestamp": timestamps,
+            "equity": equity_values,
+            "profit_loss": profit_loss,
+            "profit_loss_pct": profit_loss_pct,
+            "base_value": equity_values[0],
+            "timeframe": period,
+            "base_value_asof": str(timestamps[0]),
+            "data_source": "account_breakdown_actual"
+        }
+    
+    async def _build_account_history_from_snapshots(
+        self,
+        user_id: str,
+        period: str,
+        filter_account: str,
+        prefixed_account_id: str
+    ) -> Dict[str, Any]:
+        """
+        Build an account-filtered chart by extracting the account's value from the
+        account_breakdown of each user_portfolio_history row in the period.
+        """
+        try:
+            import json  # Import at function level for JSON parsing
+            supabase = self._get_supabase_client()
+            
             # Calculate date range based on period
             from datetime import datetime, timedelta
             end_date = datetime.now().date()
@@ -1587,63 +1667,6 @@ class AggregatedPortfolioService:
             logger.error(f"Error in account history reconstruction: {e}")
             return self._empty_history_response(period)
     
-    async def _get_current_account_percentage(self, user_id: str, account_uuid: str) -> float:
-        """
-        Calculate what percentage of the total portfolio belongs to a specific account.
-        (LEGACY - kept for backward compatibility, but no longer used for history)
-        """
-        try:
-            supabase = self._get_supabase_client()
-            
-            # First, get the Plaid account ID for this UUID
-            result = supabase.table('user_investment_accounts')\
-                .select('provider_account_id')\
-                .eq('id', account_uuid)\
-                .eq('user_id', user_id)\
-                .single()\
-                .execute()
-            
-            if not result.data:
-                logger.warning(f"Account {account_uuid} not found for user {user_id}")
-                return 0.0
-                
-            plaid_account_id = f"plaid_{result.data['provider_account_id']}"
-            logger.debug(f"Mapping account UUID {account_uuid} to Plaid ID {plaid_account_id}")
-            
-            # Get all holdings and calculate account-specific total
-            result = supabase.table('user_aggregated_holdings')\
-                .select('symbol, total_market_value, account_contributions')\
-                .eq('user_id', user_id)\
-                .execute()
-            
-            total_portfolio_value = 0.0
-            account_specific_value = 0.0
-            
-            if result.data:
-                for holding in result.data:
-                    total_value = float(holding['total_market_value'])
-                    total_portfolio_value += total_value
-                    
-                    # Check account contributions for this account
-                    contributions = holding['account_contributions']
-                    if isinstance(contributions, str):
-                        contributions = json.loads(contributions) if contributions else []
-                    
-                    for contrib in contributions:
-                        if contrib.get('account_id') == plaid_account_id:
-                            account_specific_value += float(contrib.get('market_value', 0))
-            
-            if total_portfolio_value > 0:
-                percentage = account_specific_value / total_portfolio_value
-                logger.info(f"Account {account_uuid} represents {percentage:.1%} of total portfolio (${account_specific_value:.2f} / ${total_portfolio_value:.2f})")
-                return percentage
-            else:
-                return 0.0
-                
-        except Exception as e:
-            logger.error(f"Error calculating account percentage for {account_uuid}: {e}")
-            return 0.0
-    
     def _get_cached_response(self, cache_key: str) -> Dict[str, Any] | None:
         """
         Get cached response from Redis if available and not expired.
@@ -12,6 +12,7 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+from utils.broker_pool import run_broker_call
 from .abstract_provider import (
     AbstractPortfolioProvider, Account, Position, Transaction, PerformanceData, ProviderError
 )
@@ -57,14 +58,9 @@ class AlpacaPortfolioProvider(AbstractPortfolioProvider):
             broker_client = get_broker_client()
             
             account_uuid = uuid.UUID(alpaca_account_id)
-            account_details = await asyncio.to_thread(
-                broker_client.get_account_by_id, 
-                account_id=account_uuid
-            )
-            
-            trade_account = await asyncio.to_thread(
-                broker_client.get_trade_account_by_id,
-                account_id=account_uuid
+            account_details, trade_account = await asyncio.gather(
+                run_broker_call(broker_client.get_account_by_id, account_id=account_uuid),
+                run_broker_call(broker_client.get_trade_account_by_id, account_id=account_uuid)
             )
             
             # Create Account object
@@ -107,7 +103,7 @@ class AlpacaPortfolioProvider(AbstractPortfolioProvider):
             broker_client = get_broker_client()
             
             account_uuid = uuid.UUID(alpaca_account_id)
-            alpaca_positions = await asyncio.to_thread(
+            alpaca_positions = await run_broker_call(
                 broker_client.get_all_positions_for_account,
                 account_id=account_uuid
             )
@@ -171,7 +167,7 @@ class AlpacaPortfolioProvider(AbstractPortfolioProvider):
                 limit=100
             )
             
-            orders = await asyncio.to_thread(
+            orders = await run_broker_call(
                 broker_client.get_orders_for_account,
                 account_id=account_uuid,
                 filter=order_filter
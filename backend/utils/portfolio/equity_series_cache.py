@@ -0,0 +1,462 @@
+"""
+Daily Equity Series Cache
+
+Materialized per-user daily portfolio value series for history charts.
+
+Every history period (1W/1M/3M/1Y/MAX) is a slice of the same forward-filled
+daily series, so instead of re-querying user_portfolio_history and walking
+calendar days on every request, the series is built once from the database and
+stored in Redis as a compact packed array of float64 values.
+
+Per-account series are materialized alongside the total from the same
+account_breakdown data, one packed column per account in a Redis hash, so an
+account-filtered chart is a single HGET instead of re-parsing account_breakdown
+JSON from every snapshot row. Account series are sparse: a zero means the
+account held nothing (or did not exist) that day.
+
+The series are kept current incrementally:
+- EOD snapshots (daily jobs, SnapTrade captures, the intraday tracker's
+  market-close rows) append or patch a single day via apply_snapshots()
+- Completed reconstructions rebuild everything via rebuild()
+- Other writers of historical rows (SnapTrade reconstruction, estimation,
+  reporting backfills) drop the user's series via invalidate(); the next
+  read rebuilds it
+
+Storage format:
+    portfolio_series:{user_id}                 -> packed total series
+    portfolio_account_series:{user_id} (hash)  -> {account_id: packed account series}
+    packed = struct '<iI' header (start date ordinal, version)
+             + little-endian float64 values, one per calendar day
+"""
+
+import os
+import json
+import logging
+import struct
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SERIES_KEY_PREFIX = "portfolio_series"
+ACCOUNT_SERIES_KEY_PREFIX = "portfolio_account_series"
+SERIES_TTL_SECONDS = 7 * 24 * 3600  # Refreshed by every EOD run
+SERIES_MAX_DAYS = 730  # Matches the MAX period in AggregatedPortfolioService
+_HEADER = struct.Struct('<iI')
+
+
+def _parse_breakdown(raw: Any) -> Dict[str, float]:
+    """account_breakdown arrives as JSONB (dict) or, for older rows, a JSON string."""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw) if raw else {}
+        except (json.JSONDecodeError, ValueError):
+            return {}
+    if not isinstance(raw, dict):
+        return {}
+    breakdown = {}
+    for account_id, value in raw.items():
+        try:
+            breakdown[account_id] = float(value or 0)
+        except (TypeError, ValueError):
+            continue
+    return breakdown
+
+
+@dataclass
+class DailyEquitySeries:
+    """Daily portfolio values starting at start_date."""
+    start_date: date
+    values: array
+    version: int = 0
+
+    @property
+    def end_date(self) -> date:
+        """Last calendar day with a materialized value."""
+        return self.start_date + timedelta(days=len(self.values) - 1)
+
+    def value_on(self, day: date) -> float:
+        """Value on a day: 0 before the series starts, forward-filled after it ends."""
+        if not self.values or day < self.start_date:
+            return 0.0
+        offset = (day - self.start_date).days
+        if offset >= len(self.values):
+            return self.values[-1]
+        return self.values[offset]
+
+    def slice(self, start: date, end: date) -> List[float]:
+        """Daily values from start to end inclusive."""
+        return [self.value_on(start + timedelta(days=i)) for i in range((end - start).days + 1)]
+
+    def iter_points(self, start: date, end: date) -> Iterable[Tuple[date, float]]:
+        """Stored (day, value) pairs with a positive value between start and end inclusive."""
+        first = max((start - self.start_date).days, 0)
+        last = min((end - self.start_date).days, len(self.values) - 1)
+        for offset in range(first, last + 1):
+            value = self.values[offset]
+            if value > 0:
+                yield self.start_date + timedelta(days=offset), value
+
+    def set_value(self, day: date, value: float):
+        """
+        Set one day's value, keeping forward-fill semantics.
+
+        Days after `day` that were carried forward from the old value are
+        updated too; appends past the end fill the gap with the last value.
+        Zero values are treated as missing and keep the last known value.
+        """
+        if day < self.start_date:
+            raise ValueError("cannot prepend to a daily equity series")
+
+        offset = (day - self.start_date).days
+        if offset >= len(self.values):
+            last = self.values[-1] if self.values else 0.0
+            self.values.extend([last] * (offset - len(self.values)))
+            self.values.append(value if value > 0 else last)
+        else:
+            if value <= 0:
+                return
+            old = self.values[offset]
+            self.values[offset] = value
+            i = offset + 1
+            while i < len(self.values) and self.values[i] == old:
+                self.values[i] = value
+                i += 1
+        self.version += 1
+
+    def set_point(self, day: date, value: float):
+        """Set one day's value as-is, without forward-filling (sparse account series)."""
+        if day < self.start_date:
+            raise ValueError("cannot prepend to a daily equity series")
+
+        offset = (day - self.start_date).days
+        if offset >= len(self.values):
+            self.values.extend([0.0] * (offset - len(self.values) + 1))
+        self.values[offset] = value
+        self.version += 1
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(self.start_date.toordinal(), self.version) + self.values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> 'DailyEquitySeries':
+        start_ordinal, version = _HEADER.unpack_from(raw)
+        values = array('d')
+        values.frombytes(raw[_HEADER.size:])
+        return cls(start_date=date.fromordinal(start_ordinal), values=values, version=version)
+
+    @classmethod
+    def from_points(
+        cls,
+        points: Iterable[Tuple[date, float]],
+        end_date: Optional[date] = None,
+        forward_fill: bool = True
+    ) -> Optional['DailyEquitySeries']:
+        """Build a series from (date, value) points in any order."""
+        by_date: Dict[date, float] = {}
+        for day, value in points:
+            by_date[day] = value
+        if not by_date:
+            return None
+
+        ordered = sorted(by_date)
+        series = cls(start_date=ordered[0], values=array('d'))
+        for day in ordered:
+            if forward_fill:
+                series.set_value(day, by_date[day])
+            else:
+                series.set_point(day, by_date[day])
+        if forward_fill and end_date and end_date > series.end_date:
+            series.values.extend([series.values[-1]] * (end_date - series.end_date).days)
+        series.version = 1
+        return series
+
+
+class EquitySeriesCache:
+    """
+    Redis-backed store of materialized daily equity series.
+
+    Reads never fail hard: if Redis is unavailable callers receive None and
+    should fall back to building history from snapshots directly.
+    """
+
+    def __init__(self):
+        """Initialize the cache (clients are lazy loaded)."""
+        self.redis_client = None
+        self.supabase = None
+
+    def _get_supabase_client(self):
+        """Lazy load Supabase client to avoid circular imports."""
+        if self.supabase is None:
+            from utils.supabase.db_client import get_supabase_client
+            self.supabase = get_supabase_client()
+        return self.supabase
+
+    def _get_redis_client(self):
+        """Lazy load a binary-safe Redis client (values are packed bytes)."""
+        if self.redis_client is None:
+            import redis
+
+            _IS_PRODUCTION = os.getenv("COPILOT_ENVIRONMENT_NAME", "").lower() == "production" or os.getenv("ENVIRONMENT", "").lower() == "production"
+            if _IS_PRODUCTION:
+                redis_host = os.getenv("REDIS_HOST")
+                if not redis_host:
+                    raise RuntimeError("REDIS_HOST environment variable must be set in production!")
+            else:
+                redis_host = os.getenv("REDIS_HOST", "127.0.0.1")
+
+            self.redis_client = redis.Redis(
+                host=redis_host,
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                db=int(os.getenv("REDIS_DB", "0")),
+                decode_responses=False
+            )
+        return self.redis_client
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"{SERIES_KEY_PREFIX}:{user_id}"
+
+    @staticmethod
+    def _account_key(user_id: str) -> str:
+        return f"{ACCOUNT_SERIES_KEY_PREFIX}:{user_id}"
+
+    def get(self, user_id: str) -> Optional[DailyEquitySeries]:
+        """Return the cached series for a user, or None on miss/error."""
+        try:
+            raw = self._get_redis_client().get(self._key(user_id))
+            return DailyEquitySeries.from_bytes(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Error reading equity series for user {user_id}: {e}")
+            return None
+
+    def _store(self, user_id: str, series: DailyEquitySeries, pipeline=None):
+        target = pipeline if pipeline is not None else self._get_redis_client()
+        target.setex(self._key(user_id), SERIES_TTL_SECONDS, series.to_bytes())
+
+    def _store_accounts(self, user_id: str, accounts: Dict[str, DailyEquitySeries], pipeline):
+        """Queue writes of account columns into the user's hash."""
+        if not accounts:
+            return
+        pipeline.hset(
+            self._account_key(user_id),
+            mapping={account_id: series.to_bytes() for account_id, series in accounts.items()}
+        )
+        pipeline.expire(self._account_key(user_id), SERIES_TTL_SECONDS)
+
+    async def get_or_build(self, user_id: str) -> Optional[DailyEquitySeries]:
+        """Return the cached series, materializing it from the database on a miss."""
+        try:
+            raw = self._get_redis_client().get(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"Equity series cache unavailable for user {user_id}: {e}")
+            return None
+        if raw:
+            return DailyEquitySeries.from_bytes(raw)
+        return await self.rebuild(user_id)
+
+    async def get_or_build_account(self, user_id: str, account_id: str) -> Optional[DailyEquitySeries]:
+        """
+        Return one account's cached series, materializing the user's series on a miss.
+
+        Args:
+            user_id: User ID
+            account_id: Prefixed account ID as used in account_breakdown (e.g. plaid_xxx)
+
+        Returns:
+            The account's sparse series; an empty series if the user has history
+            but none for this account; None if the cache is unavailable or the
+            user has no history at all.
+        """
+        try:
+            pipeline = self._get_redis_client().pipeline(transaction=False)
+            pipeline.exists(self._key(user_id))
+            pipeline.hget(self._account_key(user_id), account_id)
+            materialized, raw = pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Equity series cache unavailable for user {user_id}: {e}")
+            return None
+
+        if not materialized:
+            if await self.rebuild(user_id) is None:
+                return None
+            try:
+                raw = self._get_redis_client().hget(self._account_key(user_id), account_id)
+            except Exception as e:
+                logger.warning(f"Error reading account series for user {user_id}: {e}")
+                return None
+
+        if raw:
+            return DailyEquitySeries.from_bytes(raw)
+        return DailyEquitySeries(start_date=datetime.now().date(), values=array('d'))
+
+    async def rebuild(self, user_id: str) -> Optional[DailyEquitySeries]:
+        """
+        Materialize a user's total and per-account series from user_portfolio_history.
+
+        Uses reconstructed/daily_eod rows, plus the last intraday value of any
+        completed day after the latest daily row (daily job gaps). Today is
+        excluded; callers overlay the live value.
+        """
+        try:
+            supabase = self._get_supabase_client()
+            today = datetime.now().date()
+            start = today - timedelta(days=SERIES_MAX_DAYS + 1)
+
+            points: List[Tuple[date, float]] = []
+            breakdowns: Dict[date, Dict[str, float]] = {}
+            offset = 0
+            page_size = 1000
+            while True:
+                result = supabase.table('user_portfolio_history')\
+                    .select('value_date, total_value, account_breakdown')\
+                    .eq('user_id', user_id)\
+                    .gte('value_date', start.isoformat())\
+                    .lt('value_date', today.isoformat())\
+                    .in_('snapshot_type', ['reconstructed', 'daily_eod'])\
+                    .order('value_date', desc=False)\
+                    .range(offset, offset + page_size - 1)\
+                    .execute()
+                rows = result.data or []
+                if not rows:
+                    break
+                for row in rows:
+                    value_date = date.fromisoformat(row['value_date'])
+                    points.append((value_date, float(row['total_value'] or 0)))
+                    breakdowns[value_date] = _parse_breakdown(row.get('account_breakdown'))
+                offset += len(rows)
+
+            gap_start = max((p[0] for p in points), default=start - timedelta(days=1)) + timedelta(days=1)
+            if gap_start < today:
+                from services.intraday_snapshot_service import get_intraday_snapshot_service
+
+                # Read from whichever table the intraday layout writes (rows or packed series)
+                last_per_day = await get_intraday_snapshot_service().get_daily_last_values(
+                    user_id, gap_start, today - timedelta(days=1)
+                )
+                for value_date, snapshot in last_per_day.items():
+                    points.append((value_date, snapshot['total_value']))
+                    breakdowns[value_date] = _parse_breakdown(snapshot.get('account_breakdown'))
+
+            series = DailyEquitySeries.from_points(points, end_date=today - timedelta(days=1))
+            if series is None:
+                return None
+
+            # Pivot day -> {account: value} rows into one sparse column per account
+            account_points: Dict[str, List[Tuple[date, float]]] = {}
+            for value_date, breakdown in breakdowns.items():
+                for account_id, value in breakdown.items():
+                    if value > 0:
+                        account_points.setdefault(account_id, []).append((value_date, value))
+            accounts = {
+                account_id: DailyEquitySeries.from_points(account_values, forward_fill=False)
+                for account_id, account_values in account_points.items()
+            }
+
+            pipeline = self._get_redis_client().pipeline(transaction=False)
+            self._store(user_id, series, pipeline)
+            pipeline.delete(self._account_key(user_id))
+            self._store_accounts(user_id, accounts, pipeline)
+            pipeline.execute()
+
+            logger.info(
+                f"💾 Materialized equity series for user {user_id}: {len(series.values)} days from "
+                f"{series.start_date}, {len(accounts)} account series"
+            )
+            return series
+
+        except Exception as e:
+            logger.error(f"Error materializing equity series for user {user_id}: {e}")
+            return None
+
+    def apply_snapshots(self, snapshots: Iterable[Tuple[str, date, float, Any]]) -> int:
+        """
+        Incrementally apply new daily values to cached series.
+
+        Users without a cached series are skipped (their series is built from
+        the database on next read). Values dated before a series' start
+        invalidate it so the next read rebuilds.
+
+        Args:
+            snapshots: (user_id, value_date, total_value, account_breakdown) tuples
+
+        Returns:
+            Number of cached series updated
+        """
+        by_user: Dict[str, List[Tuple[date, float, Dict[str, float]]]] = {}
+        for user_id, value_date, value, account_breakdown in snapshots:
+            by_user.setdefault(user_id, []).append((value_date, value, _parse_breakdown(account_breakdown)))
+        if not by_user:
+            return 0
+
+        try:
+            redis_client = self._get_redis_client()
+            user_ids = list(by_user)
+            raws = redis_client.mget([self._key(uid) for uid in user_ids])
+            cached = [(uid, raw) for uid, raw in zip(user_ids, raws) if raw]
+
+            # One round trip for every account column touched by these snapshots
+            touched_accounts: Dict[str, List[str]] = {}
+            read_pipeline = redis_client.pipeline(transaction=False)
+            for user_id, _ in cached:
+                account_ids = sorted({a for _, _, breakdown in by_user[user_id] for a in breakdown})
+                touched_accounts[user_id] = account_ids
+                if account_ids:
+                    read_pipeline.hmget(self._account_key(user_id), account_ids)
+            account_raws = iter(read_pipeline.execute())
+
+            updated = 0
+            pipeline = redis_client.pipeline(transaction=False)
+            for user_id, raw in cached:
+                account_ids = touched_accounts[user_id]
+                columns = zip(account_ids, next(account_raws)) if account_ids else []
+                accounts = {
+                    account_id: DailyEquitySeries.from_bytes(column)
+                    for account_id, column in columns if column
+                }
+                series = DailyEquitySeries.from_bytes(raw)
+                try:
+                    for value_date, value, breakdown in sorted(by_user[user_id], key=lambda p: p[0]):
+                        series.set_value(value_date, float(value))
+                        for account_id, account_value in breakdown.items():
+                            if account_id in accounts:
+                                accounts[account_id].set_point(value_date, account_value)
+                            elif account_value > 0:
+                                accounts[account_id] = DailyEquitySeries.from_points(
+                                    [(value_date, account_value)], forward_fill=False
+                                )
+                except ValueError:
+                    pipeline.delete(self._key(user_id), self._account_key(user_id))
+                    continue
+                self._store(user_id, series, pipeline)
+                self._store_accounts(user_id, accounts, pipeline)
+                updated += 1
+            pipeline.execute()
+
+            logger.debug(f"Applied {sum(len(v) for v in by_user.values())} points to {updated} equity series")
+            return updated
+
+        except Exception as e:
+            logger.warning(f"Error applying snapshots to equity series: {e}")
+            return 0
+
+    def invalidate(self, user_id: str):
+        """Drop a user's cached total and per-account series."""
+        try:
+            self._get_redis_client().delete(self._key(user_id), self._account_key(user_id))
+        except Exception as e:
+            logger.warning(f"Error invalidating equity series for user {user_id}: {e}")
+
+
+# Global cache instance
+_equity_series_cache: Optional[EquitySeriesCache] = None
+
+
+def get_equity_series_cache() -> EquitySeriesCache:
+    """Get or create the global equity series cache instance."""
+    global _equity_series_cache
+    if _equity_series_cache is None:
+        _equity_series_cache = EquitySeriesCache()
+    return _equity_series_cache
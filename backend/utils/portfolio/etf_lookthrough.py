@@ -0,0 +1,362 @@
+"""
+ETF Look-Through Exposure Engine
+
+Computes true sector and asset-class exposure for portfolios holding ETFs.
+Instead of mapping each ETF to a single sector bucket (so a total-market
+fund shows up as one "Broad ETFs" slice), every ETF is represented by a
+weight vector over a fixed sector axis and a fixed asset-class axis, and a
+portfolio's exposure is the weighted sum of the vectors of the ETFs it holds.
+
+Weight vectors come from, in order:
+1. data/etf_lookthrough.json (refreshable from FMP sector/country weightings)
+2. ETFCategorizationService for single-sector and single-asset-class funds
+   it knows with full confidence (XLK -> 100% Technology, AGG -> 100% Fixed Income)
+
+ETFs with neither (unknown or name-inferred funds) are left to the caller's
+existing classification. Vectors are cached per ETF. For the EOD job,
+exposures for every user are computed in one vectorised pass: holdings form a
+sparse (user x ETF) matrix in coordinate form, multiplied by the dense
+(ETF x sector) weight matrix with a gather/scatter (np.add.at).
+"""
+
+import os
+import json
+import asyncio
+import logging
+import tempfile
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ETF_LOOKTHROUGH_DATASET = os.getenv(
+    "ETF_LOOKTHROUGH_DATASET",
+    os.path.join(os.path.dirname(__file__), "..", "..", "data", "etf_lookthrough.json")
+)
+
+# FMP sector names, matching what individual stocks resolve to
+SECTOR_AXIS: Tuple[str, ...] = (
+    "Technology",
+    "Financial Services",
+    "Healthcare",
+    "Consumer Cyclical",
+    "Communication Services",
+    "Industrials",
+    "Consumer Defensive",
+    "Energy",
+    "Utilities",
+    "Real Estate",
+    "Basic Materials",
+    "Fixed Income",
+    "Commodities",
+)
+
+ASSET_CLASS_AXIS: Tuple[str, ...] = (
+    "us_equity",
+    "international_equity",
+    "fixed_income",
+    "real_estate",
+    "commodities",
+    "cash",
+)
+
+# Alternate sector spellings (ETFCategory values, GICS names) -> SECTOR_AXIS
+_SECTOR_ALIASES = {
+    "Consumer Discretionary": "Consumer Cyclical",
+    "Consumer Staples": "Consumer Defensive",
+    "Health Care": "Healthcare",
+    "Financials": "Financial Services",
+    "Information Technology": "Technology",
+    "Materials": "Basic Materials",
+    "Telecommunication Services": "Communication Services",
+}
+
+_SECTOR_INDEX = {name: i for i, name in enumerate(SECTOR_AXIS)}
+_ASSET_CLASS_INDEX = {name: i for i, name in enumerate(ASSET_CLASS_AXIS)}
+
+
+def _normalize(weights: Dict[str, Any], index: Dict[str, int], aliases: Optional[Dict[str, str]] = None) -> Optional[np.ndarray]:
+    """Turn a {name: weight} mapping into a vector on the given axis summing to 1."""
+    vector = np.zeros(len(index), dtype=np.float64)
+    for name, weight in weights.items():
+        if aliases:
+            name = aliases.get(name, name)
+        position = index.get(name)
+        if position is None:
+            continue
+        if isinstance(weight, str):
+            weight = weight.rstrip('%')
+        try:
+            vector[position] += max(float(weight), 0.0)
+        except (TypeError, ValueError):
+            continue
+    total = vector.sum()
+    if total <= 0:
+        return None
+    return vector / total
+
+
+class ETFLookthroughEngine:
+    """Per-ETF weight vectors and portfolio exposure computation."""
+
+    def __init__(self, dataset_path: str = ETF_LOOKTHROUGH_DATASET):
+        """Initialize the engine (dataset is loaded on first use)."""
+        self.dataset_path = dataset_path
+        self._dataset: Optional[Dict[str, Dict[str, Any]]] = None
+        # symbol -> (sector vector, asset-class vector), or None when unresolvable
+        self._vectors: Dict[str, Optional[Tuple[np.ndarray, np.ndarray]]] = {}
+
+    def _load_dataset(self) -> Dict[str, Dict[str, Any]]:
+        if self._dataset is None:
+            try:
+                with open(self.dataset_path, 'r') as f:
+                    self._dataset = json.load(f).get('etfs', {})
+                logger.info(f"Loaded ETF look-through weights for {len(self._dataset)} ETFs")
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"ETF look-through dataset unavailable ({self.dataset_path}): {e}")
+                self._dataset = {}
+        return self._dataset
+
+    def get_vectors(self, symbol: Optional[str]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get (sector, asset-class) weight vectors for an ETF.
+
+        Returns:
+            Tuple of vectors on SECTOR_AXIS and ASSET_CLASS_AXIS, or None if the
+            ETF's composition is unknown
+        """
+        if not symbol:
+            return None
+        symbol = symbol.upper().strip()
+        if symbol not in self._vectors:
+            self._vectors[symbol] = self._build_vectors(symbol)
+        return self._vectors[symbol]
+
+    def has_lookthrough(self, symbol: Optional[str]) -> bool:
+        """Whether an ETF's exposure can be looked through."""
+        return self.get_vectors(symbol) is not None
+
+    def _build_vectors(self, symbol: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        entry = self._load_dataset().get(symbol)
+        if entry:
+            sectors = _normalize(entry.get('sectors', {}), _SECTOR_INDEX, _SECTOR_ALIASES)
+            asset_classes = _normalize(entry.get('asset_classes', {}), _ASSET_CLASS_INDEX)
+            if sectors is not None and asset_classes is not None:
+                return sectors, asset_classes
+        return self._vectors_from_category(symbol)
+
+    @staticmethod
+    def _vectors_from_category(symbol: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Single-bucket vectors for ETFs the categorization service knows exactly."""
+        from utils.etf_categorization_service import get_etf_categorization_service, ETFCategory
+
+        classification = get_etf_categorization_service().classify_etf(symbol)
+        if classification.confidence < 1.0:
+            return None
+
+        category = classification.category
+        if category == ETFCategory.FIXED_INCOME:
+            sector, asset_class = "Fixed Income", "fixed_income"
+        elif category == ETFCategory.COMMODITIES:
+            sector, asset_class = "Commodities", "commodities"
+        elif category == ETFCategory.REAL_ESTATE:
+            sector, asset_class = "Real Estate", "real_estate"
+        elif category in (ETFCategory.BROAD_MARKET, ETFCategory.INTERNATIONAL, ETFCategory.UNKNOWN):
+            # Diversified funds need real weights; a single bucket is what we are replacing
+            return None
+        else:
+            sector, asset_class = _SECTOR_ALIASES.get(category.value, category.value), "us_equity"
+
+        return (
+            _normalize({sector: 1.0}, _SECTOR_INDEX),
+            _normalize({asset_class: 1.0}, _ASSET_CLASS_INDEX),
+        )
+
+    def exposure(self, holdings: Iterable[Tuple[str, float]]) -> Dict[str, Any]:
+        """
+        Look-through exposure for one portfolio's ETF positions.
+
+        Args:
+            holdings: (symbol, market_value) pairs
+
+        Returns:
+            {'sectors': {name: value}, 'asset_classes': {name: value},
+             'unresolved': {symbol: value}} with zero entries omitted
+        """
+        symbols, values, unresolved = [], [], {}
+        for symbol, value in holdings:
+            if self.has_lookthrough(symbol):
+                symbols.append(symbol.upper().strip())
+                values.append(float(value))
+            elif value:
+                unresolved[symbol] = unresolved.get(symbol, 0.0) + float(value)
+
+        if not symbols:
+            return {'sectors': {}, 'asset_classes': {}, 'unresolved': unresolved}
+
+        sector_matrix, asset_matrix = self._matrices(symbols)
+        value_vector = np.asarray(values, dtype=np.float64)
+        return {
+            'sectors': self._to_dict(value_vector @ sector_matrix, SECTOR_AXIS),
+            'asset_classes': self._to_dict(value_vector @ asset_matrix, ASSET_CLASS_AXIS),
+            'unresolved': unresolved,
+        }
+
+    def batch_exposures(self, rows: Iterable[Tuple[str, str, float]]) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Look-through exposure for many users at once.
+
+        Args:
+            rows: (user_id, symbol, market_value) for each ETF position
+
+        Returns:
+            user_id -> {'sectors': {...}, 'asset_classes': {...}} for users
+            holding at least one look-through ETF
+        """
+        user_index: Dict[str, int] = {}
+        etf_index: Dict[str, int] = {}
+        user_pos: List[int] = []
+        etf_pos: List[int] = []
+        values: List[float] = []
+
+        for user_id, symbol, value in rows:
+            if not value or not self.has_lookthrough(symbol):
+                continue
+            symbol = symbol.upper().strip()
+            user_pos.append(user_index.setdefault(user_id, len(user_index)))
+            etf_pos.append(etf_index.setdefault(symbol, len(etf_index)))
+            values.append(float(value))
+
+        if not values:
+            return {}
+
+        sector_matrix, asset_matrix = self._matrices(list(etf_index))
+        users = np.asarray(user_pos, dtype=np.int64)
+        etfs = np.asarray(etf_pos, dtype=np.int64)
+        weights = np.asarray(values, dtype=np.float64)[:, None]
+
+        # Sparse (user x ETF) @ dense (ETF x axis): scatter-add each position's weighted row
+        sector_exposure = np.zeros((len(user_index), len(SECTOR_AXIS)), dtype=np.float64)
+        asset_exposure = np.zeros((len(user_index), len(ASSET_CLASS_AXIS)), dtype=np.float64)
+        np.add.at(sector_exposure, users, weights * sector_matrix[etfs])
+        np.add.at(asset_exposure, users, weights * asset_matrix[etfs])
+
+        return {
+            user_id: {
+                'sectors': self._to_dict(sector_exposure[position], SECTOR_AXIS),
+                'asset_classes': self._to_dict(asset_exposure[position], ASSET_CLASS_AXIS),
+            }
+            for user_id, position in user_index.items()
+        }
+
+    def _matrices(self, symbols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = [self.get_vectors(symbol) for symbol in symbols]
+        return (
+            np.vstack([v[0] for v in vectors]),
+            np.vstack([v[1] for v in vectors]),
+        )
+
+    @staticmethod
+    def _to_dict(vector: np.ndarray, axis: Tuple[str, ...]) -> Dict[str, float]:
+        return {name: round(float(value), 2) for name, value in zip(axis, vector) if value > 0.005}
+
+    async def refresh_from_fmp(self, symbols: Iterable[str]) -> int:
+        """
+        Refresh dataset entries from FMP ETF sector and country weightings.
+
+        Updated entries are written back to the dataset file and their cached
+        vectors dropped. ETFs FMP returns no sector weights for (e.g. bond
+        funds) keep their existing entry.
+
+        Returns:
+            Number of ETFs updated
+        """
+        api_key = os.getenv('FINANCIAL_MODELING_PREP_API_KEY')
+        if not api_key:
+            logger.warning("FMP API key not configured - skipping ETF look-through refresh")
+            return 0
+
+        import httpx
+
+        symbols = sorted({s.upper().strip() for s in symbols if s})
+        async with httpx.AsyncClient(timeout=30) as client:
+            results = await asyncio.gather(*(self._fetch_weightings(client, s, api_key) for s in symbols))
+
+        dataset = self._load_dataset()
+        updated = 0
+        for symbol, entry in zip(symbols, results):
+            if entry is None:
+                continue
+            dataset[symbol] = {**dataset.get(symbol, {}), **entry}
+            self._vectors.pop(symbol, None)
+            updated += 1
+
+        if updated:
+            self._write_dataset(dataset)
+            logger.info(f"📥 Refreshed ETF look-through weights for {updated}/{len(symbols)} ETFs")
+        return updated
+
+    async def _fetch_weightings(self, client, symbol: str, api_key: str) -> Optional[Dict[str, Any]]:
+        base = "https://financialmodelingprep.com/api/v3"
+        try:
+            sector_response, country_response = await asyncio.gather(
+                client.get(f"{base}/etf-sector-weightings/{symbol}", params={'apikey': api_key}),
+                client.get(f"{base}/etf-country-weightings/{symbol}", params={'apikey': api_key}),
+            )
+            sector_rows = sector_response.json() if sector_response.status_code == 200 else []
+            country_rows = country_response.json() if country_response.status_code == 200 else []
+        except Exception as e:
+            logger.error(f"Error fetching ETF weightings for {symbol}: {e}")
+            return None
+
+        sectors = {
+            row.get('sector'): row.get('weightPercentage')
+            for row in sector_rows if isinstance(row, dict) and row.get('sector')
+        }
+        if _normalize(sectors, _SECTOR_INDEX, _SECTOR_ALIASES) is None:
+            return None
+
+        us_weight = 0.0
+        total_weight = 0.0
+        for row in country_rows if isinstance(country_rows, list) else []:
+            try:
+                weight = float(str(row.get('weightPercentage', '0')).rstrip('%'))
+            except ValueError:
+                continue
+            total_weight += weight
+            if row.get('country') == 'United States':
+                us_weight += weight
+        asset_classes = (
+            {'us_equity': us_weight, 'international_equity': total_weight - us_weight}
+            if total_weight > 0 else {'us_equity': 100.0}
+        )
+        return {'sectors': sectors, 'asset_classes': asset_classes}
+
+    def _write_dataset(self, dataset: Dict[str, Dict[str, Any]]):
+        try:
+            with open(self.dataset_path, 'r') as f:
+                document = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            document = {}
+        document['etfs'] = dataset
+        document['as_of'] = date.today().isoformat()
+
+        directory = os.path.dirname(os.path.abspath(self.dataset_path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+            json.dump(document, f, indent=2)
+            temp_path = f.name
+        os.replace(temp_path, self.dataset_path)
+
+
+# Global engine instance
+_etf_lookthrough_engine: Optional[ETFLookthroughEngine] = None
+
+
+def get_etf_lookthrough_engine() -> ETFLookthroughEngine:
+    """Get or create the global ETF look-through engine instance."""
+    global _etf_lookthrough_engine
+    if _etf_lookthrough_engine is None:
+        _etf_lookthrough_engine = ETFLookthroughEngine()
+    return _etf_lookthrough_engine
@@ -0,0 +1,252 @@
+"""
+Portfolio History Engine
+
+Vectorised daily valuation shared by the SnapTrade history services. Positions
+are laid out as a (day x symbol) quantity matrix - replayed from transactions
+or held constant from current holdings - and closes as a matching price matrix
+forward-filled over the trading calendar. Daily totals, cost basis and
+per-symbol breakdowns then come from a handful of NumPy operations instead of
+a Python loop (and a price lookup) per day per holding.
+
+The services stay responsible for where holdings and prices come from and how
+snapshots are stored; this module only does the arithmetic.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_FILL_DAYS = 5  # Carry a close forward across holidays and short halts only
+SNAPSHOT_INSERT_BATCH_SIZE = 500
+
+
+def trading_days(start_date: date, end_date: date, calendar=None) -> List[date]:
+    """NYSE trading days in [start_date, end_date] (weekends and market holidays excluded)."""
+    if calendar is None:
+        from utils.trading_calendar import get_trading_calendar
+        calendar = get_trading_calendar()
+    return [day for day in calendar_days(start_date, end_date) if calendar.is_market_open_today(day)]
+
+
+def calendar_days(start_date: date, end_date: date) -> List[date]:
+    """Every calendar day in [start_date, end_date]."""
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def forward_fill(matrix: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+    """Carry each column's last finite value forward over at most `limit` missing rows (no limit if None)."""
+    filled = matrix.copy()
+    rows = np.arange(len(matrix))[:, None]
+    last_seen = np.where(np.isfinite(matrix), rows, -1)
+    np.maximum.accumulate(last_seen, axis=0, out=last_seen)
+    fillable = ~np.isfinite(matrix) & (last_seen >= 0)
+    if limit is not None:
+        fillable &= rows - last_seen <= limit
+    carried = np.take_along_axis(matrix, np.clip(last_seen, 0, None), axis=0)
+    filled[fillable] = carried[fillable]
+    return filled
+
+
+def _day_ordinals(days: Sequence[date]) -> np.ndarray:
+    return np.fromiter((day.toordinal() for day in days), dtype=np.int64, count=len(days))
+
+
+def price_matrix(
+    closes: Mapping[str, Mapping[date, float]],
+    symbols: Sequence[str],
+    days: Sequence[date],
+    fill_limit: Optional[int] = MAX_FILL_DAYS
+) -> np.ndarray:
+    """
+    (day x symbol) close matrix, forward-filled over at most `fill_limit` rows.
+
+    Closes dated between grid days (e.g. a Saturday close on a trading-day grid)
+    land on the next grid day. Cells with no close in reach are NaN.
+    """
+    ordinals = _day_ordinals(days)
+    matrix = np.full((len(days), len(symbols)), np.nan, dtype=np.float64)
+    if not len(days):
+        return matrix
+    for column, symbol in enumerate(symbols):
+        series = closes.get(symbol)
+        if not series:
+            continue
+        series_days = _day_ordinals(list(series))
+        values = np.fromiter((float(v) for v in series.values()), dtype=np.float64, count=len(series))
+        order = np.argsort(series_days, kind='stable')
+        series_days, values = series_days[order], values[order]
+        rows = np.searchsorted(ordinals, series_days)
+        keep = (rows < len(days)) & (series_days >= ordinals[0]) & (values > 0)
+        # Later closes overwrite earlier ones that fall into the same row
+        matrix[rows[keep], column] = values[keep]
+    return forward_fill(matrix, fill_limit)
+
+
+def step_matrix(
+    changes: Mapping[date, Mapping[str, float]],
+    symbols: Sequence[str],
+    days: Sequence[date],
+    initial: Optional[Mapping[str, float]] = None
+) -> np.ndarray:
+    """
+    (day x symbol) matrix of a state that changes on some dates and holds otherwise.
+
+    `changes` maps a date to the new value of each symbol touched that day (e.g.
+    quantity after that day's trades). Changes before the first grid day seed
+    the first row; changes between grid days apply from the next grid day.
+    """
+    index = {symbol: column for column, symbol in enumerate(symbols)}
+    ordinals = _day_ordinals(days)
+    matrix = np.full((len(days), len(symbols)), np.nan, dtype=np.float64)
+    if len(days):
+        matrix[0] = [float((initial or {}).get(symbol, 0.0)) for symbol in symbols]
+
+    for change_date in sorted(changes):
+        row = int(np.searchsorted(ordinals, change_date.toordinal()))
+        if row >= len(days):
+            continue
+        for symbol, value in changes[change_date].items():
+            column = index.get(symbol)
+            if column is not None:
+                matrix[row, column] = float(value)
+
+    return forward_fill(matrix)
+
+
+def constant_matrix(values: Mapping[str, float], symbols: Sequence[str], days: Sequence[date]) -> np.ndarray:
+    """(day x symbol) matrix holding each symbol's value on every day."""
+    row = np.array([float(values.get(symbol, 0.0)) for symbol in symbols], dtype=np.float64)
+    return np.broadcast_to(row, (len(days), len(symbols))).copy()
+
+
+@dataclass
+class PortfolioHistory:
+    """Daily valuation of a (day x symbol) position matrix."""
+    days: List[date]
+    symbols: List[str]
+    quantities: np.ndarray  # (day x symbol)
+    prices: np.ndarray  # (day x symbol), NaN where no close was in reach
+    market_values: np.ndarray  # (day x symbol), 0 where unpriced
+    cost_basis: np.ndarray  # (day x symbol)
+    cash: np.ndarray  # (day,)
+
+    @property
+    def held(self) -> np.ndarray:
+        return self.quantities > 0
+
+    @property
+    def priced(self) -> np.ndarray:
+        """Held positions with a close (after forward fill)."""
+        return self.held & np.isfinite(self.prices)
+
+    @property
+    def total_values(self) -> np.ndarray:
+        return self.market_values.sum(axis=1) + self.cash
+
+    @property
+    def total_cost_basis(self) -> np.ndarray:
+        return self.cost_basis.sum(axis=1)
+
+    @property
+    def held_counts(self) -> np.ndarray:
+        return self.held.sum(axis=1)
+
+    @property
+    def priced_counts(self) -> np.ndarray:
+        return self.priced.sum(axis=1)
+
+    def breakdown(self, row: int) -> Dict[str, Dict[str, float]]:
+        """symbol -> {quantity, cost_basis, market_value, price} for positions held on that day."""
+        columns = np.flatnonzero(self.held[row])
+        return {
+            self.symbols[column]: {
+                'quantity': float(self.quantities[row, column]),
+                'cost_basis': float(self.cost_basis[row, column]),
+                'market_value': float(self.market_values[row, column]),
+                'price': float(self.prices[row, column]) if np.isfinite(self.prices[row, column]) else 0.0,
+            }
+            for column in columns
+        }
+
+
+def value_history(
+    days: Sequence[date],
+    symbols: Sequence[str],
+    quantities: np.ndarray,
+    prices: np.ndarray,
+    cost_basis: Optional[np.ndarray] = None,
+    cash: Any = 0.0
+) -> PortfolioHistory:
+    """Value positions at forward-filled closes; unpriced positions count as zero."""
+    quantities = np.where(quantities > 0, quantities, 0.0)
+    market_values = np.where(np.isfinite(prices), quantities * np.nan_to_num(prices), 0.0)
+    if cost_basis is None:
+        cost_basis = np.zeros_like(quantities)
+    return PortfolioHistory(
+        days=list(days),
+        symbols=list(symbols),
+        quantities=quantities,
+        prices=prices,
+        market_values=market_values,
+        cost_basis=np.where(quantities > 0, cost_basis, 0.0),
+        cash=np.broadcast_to(np.asarray(cash, dtype=np.float64), (len(days),)).copy(),
+    )
+
+
+def gain_loss(values: np.ndarray, cost_basis: np.ndarray):
+    """(gain/loss, gain/loss percent) arrays; percent is 0 where there is no cost basis."""
+    gains = values - cost_basis
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = np.where(cost_basis > 0, gains / cost_basis * 100.0, 0.0)
+    return gains, percent
+
+
+def carry_last_valid(values: np.ndarray, cost_basis: np.ndarray, min_value: float):
+    """
+    Replace days valued below `min_value` with the last day at or above it.
+
+    Days before the first valid one stay as they are. Returns new (values, cost_basis).
+    """
+    valid = values >= min_value
+    rows = np.arange(len(values))
+    last_valid = np.where(valid, rows, -1)
+    np.maximum.accumulate(last_valid, out=last_valid)
+    fill = ~valid & (last_valid >= 0)
+    source = np.where(fill, last_valid, rows)
+    return values[source], cost_basis[source]
+
+
+def replace_reconstructed_snapshots(
+    supabase,
+    user_id: str,
+    rows: List[Dict[str, Any]],
+    batch_size: int = SNAPSHOT_INSERT_BATCH_SIZE
+) -> int:
+    """
+    Store 'reconstructed' snapshot rows: one delete over their date range, then batched inserts.
+
+    Delete-then-insert because the reconstructed uniqueness rule is a partial
+    index on the partitioned table, which PostgREST upserts cannot target.
+    """
+    if not rows:
+        return 0
+
+    dates = [row['value_date'] for row in rows]
+    supabase.table('user_portfolio_history')\
+        .delete()\
+        .eq('user_id', user_id)\
+        .eq('snapshot_type', 'reconstructed')\
+        .gte('value_date', min(dates))\
+        .lte('value_date', max(dates))\
+        .execute()
+
+    for i in range(0, len(rows), batch_size):
+        supabase.table('user_portfolio_history')\
+            .insert(rows[i:i + batch_size])\
+            .execute()
+    return len(rows)
@@ -0,0 +1,165 @@
+"""
+Holdings Snapshot Loader
+
+Shared, request-scoped loader for a user's user_aggregated_holdings rows.
+
+On dashboard load the frontend requests value, analytics, sector allocation,
+cash/stock/bond allocation and account breakdown at the same time. Each of
+those views is computed from the same holdings rows, so they all read through
+this loader instead of querying the table independently:
+
+- Single-flight: concurrent loads for the same user share one database query
+- Short-lived per-user cache: loads within HOLDINGS_SNAPSHOT_TTL_SECONDS reuse
+  the last result (holdings only change on sync, which invalidates the entry)
+- Request scope: inside holdings_snapshot_scope() every view sees the same
+  snapshot, even if the cache entry expires mid-request
+
+Callers receive deep copies of the rows and may modify them freely.
+"""
+
+import os
+import copy
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HOLDINGS_SNAPSHOT_TTL_SECONDS = float(os.getenv("HOLDINGS_SNAPSHOT_TTL_SECONDS", "5"))
+
+# user_id -> rows loaded within the current request scope (None outside a scope)
+_request_snapshots: ContextVar[Optional[Dict[str, List[Dict[str, Any]]]]] = ContextVar(
+    "holdings_request_snapshots", default=None
+)
+
+
+@contextmanager
+def holdings_snapshot_scope():
+    """
+    Pin holdings snapshots for the duration of a request.
+
+    Tasks created inside the scope (e.g. via asyncio.gather) share it, so
+    every view computed for the request is built from the same rows.
+    """
+    token = _request_snapshots.set({})
+    try:
+        yield
+    finally:
+        _request_snapshots.reset(token)
+
+
+class HoldingsSnapshotLoader:
+    """Loads user_aggregated_holdings once per user per request burst."""
+
+    def __init__(self, ttl_seconds: float = HOLDINGS_SNAPSHOT_TTL_SECONDS):
+        """Initialize the loader (Supabase client is lazy loaded)."""
+        self.supabase = None
+        self.ttl_seconds = ttl_seconds
+        self._cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_supabase_client(self):
+        """Lazy load Supabase client to avoid circular imports."""
+        if self.supabase is None:
+            from utils.supabase.db_client import get_supabase_client
+            self.supabase = get_supabase_client()
+        return self.supabase
+
+    async def load(self, user_id: str, supabase=None) -> List[Dict[str, Any]]:
+        """
+        Get all aggregated holdings rows (including cash) for a user.
+
+        Args:
+            user_id: User ID to load holdings for
+            supabase: Optional client to query with (defaults to the shared client)
+
+        Returns:
+            List of holdings rows (copies)
+
+        Raises:
+            Exception: Propagates database errors to every waiting caller
+        """
+        scoped = _request_snapshots.get()
+        if scoped is not None and user_id in scoped:
+            return self._copy(scoped[user_id])
+
+        rows = self._get_cached(user_id)
+        if rows is None:
+            inflight = self._inflight.get(user_id)
+            if inflight is not None:
+                logger.debug(f"Holdings load for user {user_id} joined in-flight query")
+                try:
+                    rows = await asyncio.shield(inflight)
+                except asyncio.CancelledError:
+                    # The leading caller was cancelled mid-query; load again unless this caller was too
+                    if not inflight.cancelled() or asyncio.current_task().cancelling():
+                        raise
+                    return await self.load(user_id, supabase)
+            else:
+                rows = await self._fetch(user_id, supabase)
+
+        if scoped is not None:
+            scoped[user_id] = rows
+        return self._copy(rows)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop cached holdings for a user (after a sync), or for everyone."""
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(user_id, None)
+
+    def _get_cached(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._cache.get(user_id)
+        if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+            logger.debug(f"💨 Holdings snapshot cache hit for user {user_id}")
+            return entry[1]
+        return None
+
+    async def _fetch(self, user_id: str, supabase=None) -> List[Dict[str, Any]]:
+        client = supabase or self._get_supabase_client()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            result = await asyncio.to_thread(
+                lambda: client.table('user_aggregated_holdings')
+                .select('*')
+                .eq('user_id', user_id)
+                .execute()
+            )
+            rows = result.data or []
+            self._cache[user_id] = (time.monotonic(), rows)
+            future.set_result(rows)
+            logger.debug(f"Loaded holdings snapshot for user {user_id}: {len(rows)} rows")
+            return rows
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure does not log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            # Cancellation (client disconnect, timeout) is not an Exception; release joiners anyway
+            if not future.done():
+                future.cancel()
+            if self._inflight.get(user_id) is future:
+                del self._inflight[user_id]
+
+    @staticmethod
+    def _copy(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Rows carry nested values (account_contributions), so a shallow copy would share them
+        return copy.deepcopy(rows)
+
+
+# Global loader instance
+_holdings_snapshot_loader: Optional[HoldingsSnapshotLoader] = None
+
+
+def get_holdings_snapshot_loader() -> HoldingsSnapshotLoader:
+    """Get or create the global holdings snapshot loader instance."""
+    global _holdings_snapshot_loader
+    if _holdings_snapshot_loader is None:
+        _holdings_snapshot_loader = HoldingsSnapshotLoader()
+    return _holdings_snapshot_loader
@@ -129,6 +129,39 @@ class LiveEnrichmentService:
         logger.info(f"✅ Enriched {len(enriched)} holdings for user {user_id}")
         return enriched
     
+    def fetch_live_prices_batched(
+        self,
+        holdings: List[Dict[str, Any]],
+        chunk_size: int = 500
+    ) -> Dict[str, float]:
+        """
+        Fetch live prices for a large, multi-user set of holdings.
+        
+        Used by set-based jobs (EOD snapshots) that price the union of every
+        user's symbols once instead of once per user. Symbols are de-duplicated
+        and quoted in chunks to keep FMP URLs within length limits.
+        
+        Args:
+            holdings: Holdings with 'symbol' (and optionally 'security_name')
+            chunk_size: Maximum number of symbols per FMP quote request
+            
+        Returns:
+            Dictionary mapping symbol -> current price
+        """
+        unique_holdings: Dict[str, Dict[str, Any]] = {}
+        for h in holdings:
+            symbol = h.get('symbol')
+            if symbol and h.get('security_type') != 'cash' and symbol not in unique_holdings:
+                unique_holdings[symbol] = {'symbol': symbol, 'security_name': h.get('security_name', '')}
+        
+        candidates = list(unique_holdings.values())
+        live_prices: Dict[str, float] = {}
+        for i in range(0, len(candidates), chunk_size):
+            live_prices.update(self._fetch_live_prices(candidates[i:i + chunk_size]))
+        
+        logger.info(f"✅ Batched live prices: {len(live_prices)}/{len(candidates)} symbols")
+        return live_prices
+    
     def _fetch_live_prices(self, holdings: List[Dict[str, Any]]) -> Dict[str, float]:
         """
         Fetch live prices for all symbols in holdings using FMP API.
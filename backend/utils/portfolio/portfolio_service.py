@@ -492,6 +492,9 @@ class PortfolioService:
                 # Clear aggregated holdings cache
                 supabase.table('user_aggregated_holdings').delete().eq('user_id', user_id).execute()
                 
+                from utils.portfolio.holdings_snapshot_loader import get_holdings_snapshot_loader
+                get_holdings_snapshot_loader().invalidate(user_id)
+                
                 # Note: We don't clear portfolio snapshots as they're historical data
                 # Only clear today's manual snapshots if needed
                 today = datetime.now().date().isoformat()
@@ -585,6 +588,9 @@ class PortfolioService:
                 result = supabase.table('user_aggregated_holdings').insert(cache_records).execute()
                 logger.info(f"💾 Cached {len(cache_records)} aggregated holdings for user {user_id}")
             
+            from utils.portfolio.holdings_snapshot_loader import get_holdings_snapshot_loader
+            get_holdings_snapshot_loader().invalidate(user_id)
+            
         except Exception as e:
             logger.error(f"Error caching aggregated holdings for user {user_id}: {e}")
             # Don't fail the main request if caching fails
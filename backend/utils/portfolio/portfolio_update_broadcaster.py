@@ -0,0 +1,260 @@
+"""
+Portfolio Update Broadcaster
+
+Per-process fan-out of Redis portfolio_updates:{account_id} messages to local
+WebSocket clients.
+
+Instead of one Redis connection and pubsub per connected socket, the process
+holds a single pubsub connection:
+
+- Channels are subscribed per active account with reference counting; the
+  last socket for an account leaving unsubscribes the channel
+- One reader task receives every message and decodes it once
+- Each socket gets a bounded in-memory queue. A socket whose queue fills up
+  (it is not draining as fast as updates arrive) is evicted rather than
+  buffering without limit or slowing delivery to everyone else
+
+Redis connection count is therefore constant per process, independent of the
+number of open dashboards.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "portfolio_updates:"
+PORTFOLIO_WS_QUEUE_SIZE = int(os.getenv("PORTFOLIO_WS_QUEUE_SIZE", "100"))
+
+# Seconds the reader waits for a message before re-checking state
+_READ_TIMEOUT = 1.0
+_RECONNECT_DELAY = 1.0
+_MAX_RECONNECT_DELAY = 30.0
+
+_EVICTED = object()
+
+
+class SlowConsumerError(Exception):
+    """Raised to a subscriber whose queue overflowed and was evicted."""
+
+
+class PortfolioUpdateSubscription:
+    """A single WebSocket's view of an account's update stream."""
+
+    def __init__(self, account_id: str, queue_size: int):
+        self.account_id = account_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+    async def next_message(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for the next update.
+
+        Returns:
+            The raw JSON text of the update, or None if timeout elapsed
+
+        Raises:
+            SlowConsumerError: If this subscription was evicted
+        """
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is _EVICTED:
+            raise SlowConsumerError(f"Subscriber for account {self.account_id} fell behind")
+        return item
+
+    def _offer(self, message: str) -> bool:
+        """Queue a message without blocking. Returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _evict(self):
+        """Drop pending updates and wake the consumer with the eviction marker."""
+        self.evicted = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_EVICTED)
+
+
+class PortfolioUpdateBroadcaster:
+    """Shares one Redis pubsub connection across all local portfolio sockets."""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        queue_size: int = PORTFOLIO_WS_QUEUE_SIZE,
+        redis_factory: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Initialize the broadcaster (Redis connection is opened on first subscribe).
+
+        Args:
+            redis_url: Redis URL for the pubsub connection
+            queue_size: Per-socket queue bound before the socket is evicted
+            redis_factory: Optional callable returning an asyncio Redis client
+        """
+        self.redis_url = redis_url
+        self.queue_size = queue_size
+        self._redis_factory = redis_factory or self._default_redis_factory
+        self._redis = None
+        self._pubsub = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._subscribers: Dict[str, Set[PortfolioUpdateSubscription]] = {}
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self._messages_received = 0
+        self._evictions = 0
+
+    def _default_redis_factory(self):
+        import redis.asyncio as aioredis
+        return aioredis.Redis.from_url(self.redis_url)
+
+    async def subscribe(self, account_id: str) -> PortfolioUpdateSubscription:
+        """Register a local subscriber for an account's updates."""
+        subscription = PortfolioUpdateSubscription(account_id, self.queue_size)
+        async with self._lock:
+            await self._ensure_started()
+            subscribers = self._subscribers.get(account_id)
+            if subscribers is None:
+                subscribers = self._subscribers[account_id] = set()
+                await self._pubsub.subscribe(f"{CHANNEL_PREFIX}{account_id}")
+                logger.debug(f"Subscribed to {CHANNEL_PREFIX}{account_id}")
+            subscribers.add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: PortfolioUpdateSubscription):
+        """Remove a subscriber; unsubscribes the channel when it was the last one."""
+        async with self._lock:
+            subscribers = self._subscribers.get(subscription.account_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if subscribers:
+                return
+            del self._subscribers[subscription.account_id]
+            if self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(f"{CHANNEL_PREFIX}{subscription.account_id}")
+                    logger.debug(f"Unsubscribed from {CHANNEL_PREFIX}{subscription.account_id}")
+                except Exception as e:
+                    # The reader resubscribes only active channels after reconnecting
+                    logger.warning(f"Error unsubscribing {CHANNEL_PREFIX}{subscription.account_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection and fan-out counters for monitoring."""
+        return {
+            "redis_connections": 1 if self._pubsub is not None else 0,
+            "subscribed_channels": len(self._subscribers),
+            "local_subscribers": sum(len(s) for s in self._subscribers.values()),
+            "messages_received": self._messages_received,
+            "evictions": self._evictions,
+        }
+
+    async def close(self):
+        """Stop the reader and release the Redis connection."""
+        self._closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        await self._disconnect()
+        self._subscribers.clear()
+
+    async def _ensure_started(self):
+        if self._closed:
+            raise RuntimeError("Portfolio update broadcaster is closed")
+        if self._pubsub is None:
+            self._connect()
+        if self._reader_task is None or self._reader_task.done():
+            self._reader_task = asyncio.create_task(self._read_loop())
+
+    def _connect(self):
+        self._redis = self._redis_factory()
+        self._pubsub = self._redis.pubsub()
+        logger.info("📡 Portfolio update broadcaster connected to Redis")
+
+    async def _disconnect(self):
+        pubsub, redis_client = self._pubsub, self._redis
+        self._pubsub = self._redis = None
+        try:
+            if pubsub is not None:
+                await pubsub.aclose()
+            if redis_client is not None:
+                await redis_client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing portfolio update Redis connection: {e}")
+
+    async def _reconnect(self):
+        """Replace the pubsub connection and resubscribe every active channel."""
+        async with self._lock:
+            await self._disconnect()
+            self._connect()
+            channels = [f"{CHANNEL_PREFIX}{account_id}" for account_id in self._subscribers]
+            if channels:
+                await self._pubsub.subscribe(*channels)
+        logger.info(f"📡 Portfolio update broadcaster reconnected ({len(channels)} channels)")
+
+    async def _read_loop(self):
+        delay = _RECONNECT_DELAY
+        while not self._closed:
+            try:
+                if not self._subscribers:
+                    await asyncio.sleep(_READ_TIMEOUT)
+                    continue
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=_READ_TIMEOUT
+                )
+                delay = _RECONNECT_DELAY
+                if message and message.get('data'):
+                    self._dispatch(message['channel'], message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Portfolio update reader error, reconnecting in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _MAX_RECONNECT_DELAY)
+                try:
+                    await self._reconnect()
+                except Exception as reconnect_error:
+                    logger.error(f"❌ Portfolio update reconnect failed: {reconnect_error}")
+
+    def _dispatch(self, channel, data):
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        account_id = channel[len(CHANNEL_PREFIX):]
+        subscribers = self._subscribers.get(account_id)
+        if not subscribers:
+            return
+
+        self._messages_received += 1
+        text = data.decode('utf-8') if isinstance(data, bytes) else str(data)
+        for subscription in list(subscribers):
+            if subscription.evicted or subscription._offer(text):
+                continue
+            subscription._evict()
+            subscribers.discard(subscription)
+            self._evictions += 1
+            logger.warning(f"⚠️ Evicted slow portfolio update consumer for account {account_id}")
+
+
+# Global broadcaster instance
+_portfolio_update_broadcaster: Optional[PortfolioUpdateBroadcaster] = None
+
+
+def get_portfolio_update_broadcaster(redis_url: Optional[str] = None) -> PortfolioUpdateBroadcaster:
+    """Get or create the global portfolio update broadcaster instance."""
+    global _portfolio_update_broadcaster
+    if _portfolio_update_broadcaster is None:
+        if redis_url is None:
+            redis_url = f"redis://{os.getenv('REDIS_HOST', '127.0.0.1')}:{os.getenv('REDIS_PORT', '6379')}"
+        _portfolio_update_broadcaster = PortfolioUpdateBroadcaster(redis_url=redis_url)
+    return _portfolio_update_broadcaster
@@ -321,7 +321,9 @@ class RealtimeDataService:
             user_ids = list(set(row['user_id'] for row in result.data))
             logger.info(f"📸 Creating intraday snapshots for {len(user_ids)} aggregation users")
             
-            snapshots_created = 0
+            # Warm opening values for the whole tick with bulk queries
+            await snapshot_service.prefetch_opening_values(user_ids)
+            
             for user_id in user_ids:
                 try:
                     # Check if snapshot should be created (respects 5-minute interval)
@@ -333,8 +335,8 @@ class RealtimeDataService:
                     current_value = portfolio_data.get('raw_value', 0)
                     
                     if current_value > 0:
-                        # Create intraday snapshot
-                        success = await snapshot_service.create_snapshot(
+                        # Buffer intraday snapshot; written in one bulk insert below
+                        await snapshot_service.buffer_snapshot(
                             user_id=user_id,
                             portfolio_value=current_value,
                             metadata={
@@ -342,14 +344,12 @@ class RealtimeDataService:
                                 'securities_count': len(portfolio_data.get('holdings', []))
                             }
                         )
-                        
-                        if success:
-                            snapshots_created += 1
                     
                 except Exception as e:
                     logger.error(f"Error creating snapshot for user {user_id}: {e}")
                     continue
             
+            snapshots_created = await snapshot_service.flush_snapshots()
             logger.info(f"✅ Created {snapshots_created} intraday snapshots")
             return snapshots_created
             
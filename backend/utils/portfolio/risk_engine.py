@@ -0,0 +1,530 @@
+"""
+Portfolio Risk Engine
+
+Return-based risk metrics for portfolios, replacing static asset-class risk
+weights. Daily closes for a symbol universe are read from
+global_historical_prices in one paged query, aligned into a (day x symbol)
+matrix and turned into an annualised covariance matrix of daily returns.
+Given portfolio weights over that universe the engine computes:
+
+- portfolio volatility, sqrt(w' S w)
+- beta against SPY
+- marginal risk (S w / vol) and component risk (w * marginal, summing to vol)
+- diversification ratio (w . vol_i / vol) and effective number of independent bets
+
+Covariance models are cached per (symbol universe, as-of date). A cached model
+covering a superset of the requested symbols is sliced instead of reloaded, so
+the model the EOD job builds for every held symbol also serves that day's
+per-request lookups. Many portfolios are scored at once from a
+(portfolio x symbol) weight matrix.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.portfolio.history_engine import forward_fill
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_SYMBOL = "SPY"
+TRADING_DAYS_PER_YEAR = 252
+DEFAULT_LOOKBACK_DAYS = int(os.getenv("RISK_ENGINE_LOOKBACK_DAYS", "365"))
+MIN_OBSERVATIONS = 60  # Daily returns a symbol needs before it enters a model
+MAX_FILL_DAYS = 5  # Carry a close forward across holidays and short halts only
+MIN_COVERAGE = 0.8  # Share of invested value a model must price for its metrics to be used
+MAX_CACHED_MODELS = 32
+PRICE_PAGE_SIZE = 1000  # PostgREST default max-rows
+SYMBOLS_PER_QUERY = 200  # Keeps the in.(...) filter well inside URL limits
+BATCH_CHUNK_SIZE = 500  # Portfolios per dense (portfolio x symbol) weight block
+FALLBACK_BENCHMARK_VOLATILITY = 0.16  # Long-run S&P 500 volatility
+
+
+def volatility_to_risk_score(volatility: float, benchmark_volatility: float) -> float:
+    """
+    Map annualised volatility onto the 1-10 risk scale.
+
+    A portfolio as volatile as the market scores 7, half as volatile 4, and
+    1.5x the market or more scores 10. Cash contributes no volatility, so
+    cash-heavy portfolios drift towards 1.
+    """
+    if benchmark_volatility <= 0:
+        benchmark_volatility = FALLBACK_BENCHMARK_VOLATILITY
+    score = 1.0 + 6.0 * volatility / benchmark_volatility
+    return round(min(max(score, 1.0), 10.0), 1)
+
+
+@dataclass
+class PortfolioRiskMetrics:
+    """Return-based risk metrics for one portfolio."""
+    volatility: float  # Annualised, fraction (0.18 = 18%)
+    beta: float
+    benchmark_volatility: float
+    diversification_ratio: float  # Weighted average volatility / portfolio volatility
+    effective_bets: float  # diversification_ratio ** 2
+    coverage: float  # Share of invested value priced by the model
+    as_of: date
+    marginal_risk: Dict[str, float] = field(default_factory=dict)
+    component_risk: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def risk_score(self) -> float:
+        """Risk on the 1-10 scale used by PortfolioAnalyticsEngine."""
+        return volatility_to_risk_score(self.volatility, self.benchmark_volatility)
+
+    @property
+    def is_reliable(self) -> bool:
+        """Whether enough of the portfolio is priced for the metrics to stand in for it."""
+        return self.coverage >= MIN_COVERAGE
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable form for storage."""
+        return {
+            'volatility': round(self.volatility, 6),
+            'beta': round(self.beta, 4),
+            'diversification_ratio': round(self.diversification_ratio, 4),
+            'effective_bets': round(self.effective_bets, 4),
+            'coverage': round(self.coverage, 4),
+            'risk_score': self.risk_score,
+            'as_of': self.as_of.isoformat(),
+        }
+
+
+@dataclass
+class RiskModel:
+    """Annualised return covariance for a symbol universe plus its benchmark."""
+    symbols: Tuple[str, ...]
+    as_of: date
+    covariance: np.ndarray  # (symbol x symbol)
+    benchmark_covariance: np.ndarray  # Cov(symbol, benchmark) per symbol
+    benchmark_variance: float
+    observations: int
+
+    def __post_init__(self):
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.volatilities = np.sqrt(np.clip(np.diag(self.covariance), 0.0, None))
+        self.betas = (
+            self.benchmark_covariance / self.benchmark_variance
+            if self.benchmark_variance > 0 else np.zeros(len(self.symbols))
+        )
+
+    @property
+    def benchmark_volatility(self) -> float:
+        return float(np.sqrt(max(self.benchmark_variance, 0.0)))
+
+    def correlation(self) -> np.ndarray:
+        """Correlation matrix of the universe."""
+        scale = np.where(self.volatilities > 0, self.volatilities, 1.0)
+        return self.covariance / np.outer(scale, scale)
+
+    def subset(self, symbols: Iterable[str]) -> 'RiskModel':
+        """Model restricted to the given symbols (those it has no data for are dropped)."""
+        wanted = sorted({s for s in symbols if s in self.index})
+        positions = np.asarray([self.index[s] for s in wanted], dtype=np.int64)
+        return RiskModel(
+            symbols=tuple(wanted),
+            as_of=self.as_of,
+            covariance=self.covariance[np.ix_(positions, positions)],
+            benchmark_covariance=self.benchmark_covariance[positions],
+            benchmark_variance=self.benchmark_variance,
+            observations=self.observations,
+        )
+
+    def evaluate(self, weights: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Risk metrics for many portfolios at once.
+
+        Args:
+            weights: (portfolio x symbol) weights as fractions of each
+                portfolio's total value, columns in self.symbols order
+
+        Returns:
+            Arrays of length n_portfolios keyed 'volatility', 'beta',
+            'diversification_ratio' and 'effective_bets'
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        variance = np.empty(len(weights), dtype=np.float64)
+        for start in range(0, len(weights), BATCH_CHUNK_SIZE):
+            chunk = weights[start:start + BATCH_CHUNK_SIZE]
+            variance[start:start + len(chunk)] = np.einsum('ps,ps->p', chunk @ self.covariance, chunk)
+
+        # Pairwise-complete covariance need not be exactly PSD; clip tiny negatives
+        volatility = np.sqrt(np.clip(variance, 0.0, None))
+        weighted_volatility = weights @ self.volatilities
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(volatility > 0, weighted_volatility / volatility, 1.0)
+        ratio = np.maximum(ratio, 1.0)
+        return {
+            'volatility': volatility,
+            'beta': weights @ self.betas,
+            'diversification_ratio': ratio,
+            'effective_bets': ratio ** 2,
+        }
+
+    def risk_contributions(self, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Marginal and component risk for one portfolio.
+
+        Returns:
+            (marginal, component) per symbol; component sums to portfolio volatility
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        exposure = self.covariance @ weights
+        volatility = float(np.sqrt(max(float(weights @ exposure), 0.0)))
+        if volatility == 0:
+            zeros = np.zeros(len(weights))
+            return zeros, zeros
+        marginal = exposure / volatility
+        return marginal, weights * marginal
+
+
+def build_risk_model(
+    symbols: Sequence[str],
+    closes: np.ndarray,
+    benchmark_closes: np.ndarray,
+    as_of: date
+) -> Optional[RiskModel]:
+    """
+    Build a covariance model from aligned daily closes.
+
+    Args:
+        symbols: Column labels of closes
+        closes: (day x symbol) closes, NaN where a symbol has no price that day
+        benchmark_closes: Benchmark closes on the same days
+        as_of: Date the model is valid for
+
+    Returns:
+        RiskModel over the symbols with at least MIN_OBSERVATIONS returns, or
+        None if the benchmark itself has too little history
+    """
+    matrix = forward_fill(np.column_stack([closes, benchmark_closes]), MAX_FILL_DAYS)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = matrix[1:] / matrix[:-1] - 1.0
+
+    # Benchmark trading days define the calendar
+    returns = returns[np.isfinite(returns[:, -1])]
+    valid = np.isfinite(returns)
+    counts = valid.sum(axis=0)
+    if counts[-1] < MIN_OBSERVATIONS:
+        return None
+
+    keep = counts >= MIN_OBSERVATIONS
+    returns, valid, counts = returns[:, keep], valid[:, keep], counts[keep]
+
+    # Pairwise-complete covariance: symbols listed mid-window keep their full
+    # variance instead of being shrunk towards zero by filled-in days
+    means = np.where(valid, returns, 0.0).sum(axis=0) / counts
+    centred = np.where(valid, returns - means, 0.0)
+    present = valid.astype(np.float64)
+    pair_counts = present.T @ present
+    full = (centred.T @ centred) / np.maximum(pair_counts - 1.0, 1.0) * TRADING_DAYS_PER_YEAR
+
+    kept_symbols = tuple(s for s, k in zip(symbols, keep[:-1]) if k)
+    return RiskModel(
+        symbols=kept_symbols,
+        as_of=as_of,
+        covariance=full[:-1, :-1],
+        benchmark_covariance=full[:-1, -1],
+        benchmark_variance=float(full[-1, -1]),
+        observations=int(counts[-1]),
+    )
+
+
+class PortfolioRiskEngine:
+    """Covariance models from stored EOD prices and portfolio risk metrics."""
+
+    def __init__(self, lookback_days: int = DEFAULT_LOOKBACK_DAYS, max_cached_models: int = MAX_CACHED_MODELS):
+        """Initialize the engine (models are loaded on first use)."""
+        self.supabase = None  # Lazy loaded
+        self.lookback_days = lookback_days
+        self.max_cached_models = max_cached_models
+        self._models: 'OrderedDict[Tuple[Tuple[str, ...], date], Optional[RiskModel]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Performance tracking
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _get_supabase_client(self):
+        """Lazy load Supabase client."""
+        if self.supabase is None:
+            from utils.supabase.db_client import get_supabase_client
+            self.supabase = get_supabase_client()
+        return self.supabase
+
+    def get_model(self, symbols: Iterable[str], as_of: Optional[date] = None) -> Optional[RiskModel]:
+        """
+        Get the covariance model for a symbol universe.
+
+        Blocking (reads Supabase on a cache miss); call through
+        asyncio.to_thread from async code.
+
+        Returns:
+            RiskModel, or None if the benchmark has no usable history
+        """
+        universe = tuple(sorted({s.upper().strip() for s in symbols if s}))
+        as_of = as_of or date.today()
+        key = (universe, as_of)
+
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.cache_hits += 1
+                return self._models[key]
+            for (cached_universe, cached_as_of), model in reversed(self._models.items()):
+                if model is not None and cached_as_of == as_of and set(universe) <= set(cached_universe):
+                    self.cache_hits += 1
+                    return model.subset(universe)
+            self.cache_misses += 1
+
+        try:
+            model = self._load_model(universe, as_of)
+        except Exception as e:
+            # Not cached, so the next request retries
+            logger.warning(f"Error building risk model for {len(universe)} symbols: {e}")
+            return None
+
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.max_cached_models:
+                self._models.popitem(last=False)
+        return model
+
+    def _load_model(self, universe: Tuple[str, ...], as_of: date) -> Optional[RiskModel]:
+        start_date = as_of - timedelta(days=self.lookback_days)
+        closes_by_symbol = self._load_closes(universe + (BENCHMARK_SYMBOL,), start_date, as_of)
+
+        benchmark = closes_by_symbol.get(BENCHMARK_SYMBOL)
+        if not benchmark:
+            logger.warning(f"No stored {BENCHMARK_SYMBOL} closes since {start_date} - risk model unavailable")
+            return None
+
+        days = sorted({day for series in closes_by_symbol.values() for day in series})
+        day_index = {day: i for i, day in enumerate(days)}
+        closes = np.full((len(days), len(universe)), np.nan, dtype=np.float64)
+        for column, symbol in enumerate(universe):
+            for day, close in closes_by_symbol.get(symbol, {}).items():
+                closes[day_index[day], column] = close
+        benchmark_closes = np.full(len(days), np.nan, dtype=np.float64)
+        for day, close in benchmark.items():
+            benchmark_closes[day_index[day]] = close
+
+        model = build_risk_model(universe, closes, benchmark_closes, as_of)
+        if model is not None:
+            logger.info(
+                f"📐 Built risk model for {len(model.symbols)}/{len(universe)} symbols "
+                f"over {model.observations} days (as of {as_of})"
+            )
+        return model
+
+    def _load_closes(self, symbols: Tuple[str, ...], start_date: date, end_date: date) -> Dict[str, Dict[date, float]]:
+        """Read stored EOD closes for the symbols, paging through results."""
+        supabase = self._get_supabase_client()
+        closes: Dict[str, Dict[date, float]] = {}
+
+        for i in range(0, len(symbols), SYMBOLS_PER_QUERY):
+            chunk = list(symbols[i:i + SYMBOLS_PER_QUERY])
+            offset = 0
+            while True:
+                result = supabase.table('global_historical_prices')\
+                    .select('fmp_symbol, price_date, close_price')\
+                    .in_('fmp_symbol', chunk)\
+                    .is_('price_timestamp', 'null')\
+                    .gte('price_date', start_date.isoformat())\
+                    .lte('price_date', end_date.isoformat())\
+                    .order('price_date')\
+                    .order('fmp_symbol')\
+                    .range(offset, offset + PRICE_PAGE_SIZE - 1)\
+                    .execute()
+                page = result.data or []
+                if not page:
+                    break
+                for row in page:
+                    if row.get('close_price') is None:
+                        continue
+                    day = datetime.fromisoformat(row['price_date']).date()
+                    closes.setdefault(row['fmp_symbol'], {})[day] = float(row['close_price'])
+                offset += len(page)
+
+        return closes
+
+    def portfolio_metrics(
+        self,
+        holdings: Dict[str, float],
+        cash: float = 0.0,
+        as_of: Optional[date] = None
+    ) -> Optional[PortfolioRiskMetrics]:
+        """
+        Risk metrics for one portfolio, including marginal and component risk.
+
+        Args:
+            holdings: symbol -> market value of each security position
+            cash: Cash balance (zero volatility)
+
+        Returns:
+            PortfolioRiskMetrics, or None if no model or no priced holdings
+        """
+        holdings = {s.upper().strip(): float(v) for s, v in holdings.items() if s and v}
+        if not holdings:
+            return None
+        model = self.get_model(holdings, as_of)
+        if model is None:
+            return None
+
+        weights, coverage = self._weight_vector(model, holdings, cash)
+        if coverage == 0:
+            return None
+
+        results = model.evaluate(weights[None, :])
+        marginal, component = model.risk_contributions(weights)
+        return PortfolioRiskMetrics(
+            volatility=float(results['volatility'][0]),
+            beta=float(results['beta'][0]),
+            benchmark_volatility=model.benchmark_volatility,
+            diversification_ratio=float(results['diversification_ratio'][0]),
+            effective_bets=float(results['effective_bets'][0]),
+            coverage=coverage,
+            as_of=model.as_of,
+            marginal_risk={s: float(marginal[i]) for i, s in enumerate(model.symbols) if weights[i]},
+            component_risk={s: float(component[i]) for i, s in enumerate(model.symbols) if weights[i]},
+        )
+
+    def batch_metrics(
+        self,
+        rows: Iterable[Tuple[str, str, float]],
+        cash: Optional[Dict[str, float]] = None,
+        model: Optional[RiskModel] = None,
+        as_of: Optional[date] = None,
+        chunk_size: int = BATCH_CHUNK_SIZE
+    ) -> Dict[str, PortfolioRiskMetrics]:
+        """
+        Risk metrics for many portfolios in vectorised chunks.
+
+        Args:
+            rows: (portfolio_id, symbol, market_value) for each security position
+            cash: portfolio_id -> cash balance
+            model: Pre-built model to score against (skips loading)
+            chunk_size: Portfolios per dense weight matrix, bounding memory
+                to chunk_size x model symbols regardless of user count
+
+        Returns:
+            portfolio_id -> PortfolioRiskMetrics (without per-symbol
+            contributions) for portfolios the model prices at all
+        """
+        cash = cash or {}
+        portfolio_index: Dict[str, int] = {}
+        portfolio_pos: List[int] = []
+        symbols: List[str] = []
+        values: List[float] = []
+        for portfolio_id, symbol, value in rows:
+            if not symbol or not value:
+                continue
+            portfolio_pos.append(portfolio_index.setdefault(portfolio_id, len(portfolio_index)))
+            symbols.append(symbol.upper().strip())
+            values.append(float(value))
+
+        if not values:
+            return {}
+        if model is None:
+            model = self.get_model(symbols, as_of)
+            if model is None:
+                return {}
+
+        n_portfolios = len(portfolio_index)
+        portfolios = np.asarray(portfolio_pos, dtype=np.int64)
+        value_array = np.asarray(values, dtype=np.float64)
+        columns = np.asarray([model.index.get(s, -1) for s in symbols], dtype=np.int64)
+        covered = columns >= 0
+
+        invested = np.bincount(portfolios, weights=value_array, minlength=n_portfolios)
+        priced = np.bincount(portfolios[covered], weights=value_array[covered], minlength=n_portfolios)
+        cash_array = np.asarray(
+            [float(cash.get(pid, 0.0)) for pid in portfolio_index], dtype=np.float64
+        )
+
+        # Covered positions grouped by portfolio so each chunk is one contiguous slice
+        order = np.argsort(portfolios[covered], kind='stable')
+        covered_portfolios = portfolios[covered][order]
+        covered_columns = columns[covered][order]
+        covered_values = value_array[covered][order]
+
+        results = {key: np.zeros(n_portfolios, dtype=np.float64)
+                   for key in ('volatility', 'beta', 'diversification_ratio', 'effective_bets')}
+        for start in range(0, n_portfolios, chunk_size):
+            end = min(start + chunk_size, n_portfolios)
+            lo, hi = np.searchsorted(covered_portfolios, [start, end])
+            dollars = np.zeros((end - start, len(model.symbols)), dtype=np.float64)
+            np.add.at(dollars, (covered_portfolios[lo:hi] - start, covered_columns[lo:hi]), covered_values[lo:hi])
+            weights = self._scale_weights(
+                dollars, invested[start:end], priced[start:end], cash_array[start:end]
+            )
+            for key, values_for_chunk in model.evaluate(weights).items():
+                results[key][start:end] = values_for_chunk
+
+        metrics = {}
+        for portfolio_id, position in portfolio_index.items():
+            if priced[position] <= 0:
+                continue
+            metrics[portfolio_id] = PortfolioRiskMetrics(
+                volatility=float(results['volatility'][position]),
+                beta=float(results['beta'][position]),
+                benchmark_volatility=model.benchmark_volatility,
+                diversification_ratio=float(results['diversification_ratio'][position]),
+                effective_bets=float(results['effective_bets'][position]),
+                coverage=float(priced[position] / invested[position]) if invested[position] > 0 else 0.0,
+                as_of=model.as_of,
+            )
+        return metrics
+
+    def _weight_vector(self, model: RiskModel, holdings: Dict[str, float], cash: float) -> Tuple[np.ndarray, float]:
+        dollars = np.zeros((1, len(model.symbols)), dtype=np.float64)
+        invested = priced = 0.0
+        for symbol, value in holdings.items():
+            invested += value
+            column = model.index.get(symbol)
+            if column is not None:
+                dollars[0, column] += value
+                priced += value
+        if priced <= 0:
+            return dollars[0], 0.0
+        weights = self._scale_weights(
+            dollars, np.asarray([invested]), np.asarray([priced]), np.asarray([float(cash or 0.0)])
+        )
+        return weights[0], priced / invested if invested > 0 else 0.0
+
+    @staticmethod
+    def _scale_weights(dollars: np.ndarray, invested: np.ndarray, priced: np.ndarray, cash: np.ndarray) -> np.ndarray:
+        """
+        Turn priced dollar positions into weights of total portfolio value.
+
+        Unpriced holdings are assumed to behave like the priced ones, so priced
+        weights are scaled up to the full invested share rather than treating
+        the unpriced remainder as riskless. Negative cash (margin) is ignored.
+        """
+        total = invested + np.clip(cash, 0.0, None)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where((priced > 0) & (total > 0), invested / (priced * total), 0.0)
+        return dollars * scale[:, None]
+
+    def clear_cache(self):
+        """Drop all cached models."""
+        with self._lock:
+            self._models.clear()
+
+
+# Global engine instance
+_portfolio_risk_engine: Optional[PortfolioRiskEngine] = None
+
+
+def get_portfolio_risk_engine() -> PortfolioRiskEngine:
+    """Get or create the global portfolio risk engine instance."""
+    global _portfolio_risk_engine
+    if _portfolio_risk_engine is None:
+        _portfolio_risk_engine = PortfolioRiskEngine()
+    return _portfolio_risk_engine
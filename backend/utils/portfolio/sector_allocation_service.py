@@ -180,51 +180,52 @@ class SectorAllocationService:
                 logger.warning(f"No equity holdings found for user {user_id}, filter: {filter_account}")
                 return self._empty_sector_allocation_response()
             
-            # Build sector allocation using FMP data (same as Alpaca/brokerage mode)
+            # ETFs with known composition are spread across the sectors they hold
+            from utils.portfolio.etf_lookthrough import get_etf_lookthrough_engine
+            lookthrough_engine = get_etf_lookthrough_engine()
+            lookthrough_holdings = []
+            direct_holdings = []
+            for h in equity_holdings:
+                if h['security_type'] == 'etf' and lookthrough_engine.has_lookthrough(h['symbol']):
+                    lookthrough_holdings.append(h)
+                else:
+                    direct_holdings.append(h)
+            
             sector_values = {}
             total_portfolio_value = 0
-            redis_client = self._get_redis_client()
             
-            # Use same Redis key format as sector_data_collector.py
-            for holding in equity_holdings:
+            if lookthrough_holdings:
+                exposure = lookthrough_engine.exposure(
+                    (h['symbol'], h['total_market_value']) for h in lookthrough_holdings
+                )
+                for sector, value in exposure['sectors'].items():
+                    sector_values[sector] = sector_values.get(sector, 0) + value
+                total_portfolio_value += sum(h['total_market_value'] for h in lookthrough_holdings)
+                logger.debug(f"🔍 Looked through {len(lookthrough_holdings)} ETFs into {len(exposure['sectors'])} sectors")
+            
+            # Build sector allocation using FMP data (same as Alpaca/brokerage mode)
+            # All symbols are resolved in one pass: Redis MGET, durable table, batched FMP
+            from utils.portfolio.sector_resolver import get_sector_resolver
+            resolved_sectors = await get_sector_resolver().resolve(h['symbol'] for h in direct_holdings)
+            
+            for holding in direct_holdings:
                 symbol = holding['symbol']
                 market_value = holding['total_market_value']
                 security_type = holding['security_type']
                 total_portfolio_value += market_value
                 
-                # Look up FMP sector data in Redis (same key format as sector_data_collector.py)
-                fmp_sector_key = f"sector:{symbol}"
-                sector_data_json = redis_client.get(fmp_sector_key)
-                
-                if sector_data_json:
-                    try:
-                        sector_data = json.loads(sector_data_json)
-                        sector = sector_data.get('sector', 'Unknown')
-                        
-                        if sector and sector != 'Unknown':
-                            sector_values[sector] = sector_values.get(sector, 0) + market_value
-                            logger.debug(f"✅ {symbol} ({security_type}): {sector} (${market_value:.2f})")
-                        else:
-                            sector_values['Unknown'] = sector_values.get('Unknown', 0) + market_value
-                            logger.debug(f"❓ {symbol} ({security_type}): Unknown sector (${market_value:.2f})")
-                    except json.JSONDecodeError:
-                        logger.warning(f"Failed to parse FMP sector data for {symbol}")
-                        sector_values['Unknown'] = sector_values.get('Unknown', 0) + market_value
+                sector = resolved_sectors.get(symbol.upper(), 'Unknown')
+                if sector and sector != 'Unknown':
+                    sector_values[sector] = sector_values.get(sector, 0) + market_value
+                    logger.debug(f"✅ {symbol} ({security_type}): {sector} (${market_value:.2f})")
+                elif security_type == 'etf':
+                    # If FMP has no sector for an ETF, classify it intelligently
+                    etf_sector = self._classify_etf_by_name(symbol, holding.get('security_name', ''))
+                    sector_values[etf_sector] = sector_values.get(etf_sector, 0) + market_value
+                    logger.debug(f"📊 {symbol} (ETF): Classified as {etf_sector} (${market_value:.2f})")
                 else:
-                    # No FMP data in cache - try to fetch it
-                    sector = await self._fetch_fmp_sector(symbol)
-                    if sector and sector != 'Unknown':
-                        sector_values[sector] = sector_values.get(sector, 0) + market_value
-                        logger.debug(f"🔍 {symbol} ({security_type}): Fetched {sector} (${market_value:.2f})")
-                    else:
-                        # If FMP fails and it's an ETF, classify it intelligently
-                        if security_type == 'etf':
-                            etf_sector = self._classify_etf_by_name(symbol, holding.get('security_name', ''))
-                            sector_values[etf_sector] = sector_values.get(etf_sector, 0) + market_value
-                            logger.debug(f"📊 {symbol} (ETF): Classified as {etf_sector} (${market_value:.2f})")
-                        else:
-                            sector_values['Unknown'] = sector_values.get('Unknown', 0) + market_value
-                            logger.debug(f"⚠️ {symbol} ({security_type}): No FMP data available (${market_value:.2f})")
+                    sector_values['Unknown'] = sector_values.get('Unknown', 0) + market_value
+                    logger.debug(f"⚠️ {symbol} ({security_type}): No FMP data available (${market_value:.2f})")
             
             # Build sector allocation response (same format as existing infrastructure)
             sector_allocation_response = []
@@ -260,67 +261,6 @@ class SectorAllocationService:
             logger.error(f"Error calculating Plaid sector allocation for user {user_id}: {e}")
             return self._empty_sector_allocation_response(error=str(e))
     
-    async def _fetch_fmp_sector(self, symbol: str) -> str:
-        """
-        Fetch sector data from FMP API and cache it in Redis.
-        
-        Uses same approach as sector_data_collector.py for consistency.
-        
-        Args:
-            symbol: Stock ticker symbol
-            
-        Returns:
-            Sector name or 'Unknown'
-        """
-        try:
-            import httpx
-            import os
-            
-            fmp_api_key = os.getenv('FINANCIAL_MODELING_PREP_API_KEY')
-            if not fmp_api_key:
-                logger.warning("FMP API key not configured")
-                return 'Unknown'
-            
-            # Fetch company profile from FMP
-            url = f'https://financialmodelingprep.com/api/v3/profile/{symbol}'
-            params = {'apikey': fmp_api_key}
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, timeout=10)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and len(data) > 0:
-                        sector = data[0].get('sector', 'Unknown')
-                        industry = data[0].get('industry', '')
-                        
-                        # Cache in Redis (same format as sector_data_collector.py)
-                        redis_client = self._get_redis_client()
-                        sector_data = {
-                            'symbol': symbol,
-                            'sector': sector,
-                            'industry': industry,
-                            'last_updated': datetime.now(timezone.utc).isoformat()
-                        }
-                        redis_client.setex(
-                            f"sector:{symbol}",
-                            86400,  # 24 hour TTL
-                            json.dumps(sector_data)
-                        )
-                        
-                        logger.info(f"📥 Fetched and cached FMP sector for {symbol}: {sector}")
-                        return sector
-                    else:
-                        logger.warning(f"FMP returned empty data for {symbol}")
-                        return 'Unknown'
-                else:
-                    logger.warning(f"FMP API error for {symbol}: {response.status_code}")
-                    return 'Unknown'
-                    
-        except Exception as e:
-            logger.error(f"Error fetching FMP sector for {symbol}: {e}")
-            return 'Unknown'
-    
     def _consolidate_plaid_sector(self, plaid_sector: str, metadata: Dict[str, Any]) -> str:
         """
         Consolidate Plaid sector names to match existing standardized categories.
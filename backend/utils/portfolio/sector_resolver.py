@@ -0,0 +1,271 @@
+"""
+Sector Resolver
+
+Bulk symbol → sector resolution shared by SectorAllocationService and
+AccountFilteringService.
+
+Resolution is done for all of a portfolio's symbols in one pass:
+
+1. One Redis MGET over sector:{symbol} keys (24h TTL, same format the
+   sector allocation service has always written)
+2. One query against global_symbol_metadata for the misses; sectors rarely
+   change, so this table keeps them after the Redis keys expire
+3. Comma-batched FMP /profile calls (as SectorDataCollector._process_symbol_batch
+   does) for whatever is still unknown, written back to Redis and the table
+
+Symbols FMP has no profile or no sector for are remembered in Redis for a
+shorter period so every dashboard load does not retry them. They are never
+written to the table, which only holds real classifications.
+"""
+
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+SECTOR_KEY_PREFIX = "sector:"
+SECTOR_TTL_SECONDS = 86400  # 24 hours
+NEGATIVE_TTL_SECONDS = 3600  # Symbols FMP does not know
+FMP_PROFILE_BATCH_SIZE = 100
+METADATA_TABLE = "global_symbol_metadata"
+
+
+class SectorResolver:
+    """Resolves sectors for many symbols with one cache read and batched FMP calls."""
+
+    def __init__(self):
+        """Initialize the resolver (clients are lazy loaded)."""
+        self.supabase = None
+        self.redis_client = None
+
+    def _get_supabase_client(self):
+        """Lazy load Supabase client to avoid circular imports."""
+        if self.supabase is None:
+            from utils.supabase.db_client import get_supabase_client
+            self.supabase = get_supabase_client()
+        return self.supabase
+
+    def _get_redis_client(self):
+        """Lazy load Redis client following existing pattern from sector_data_collector.py."""
+        if self.redis_client is None:
+            import redis
+
+            _IS_PRODUCTION = os.getenv("COPILOT_ENVIRONMENT_NAME", "").lower() == "production" or os.getenv("ENVIRONMENT", "").lower() == "production"
+            if _IS_PRODUCTION:
+                redis_host = os.getenv("REDIS_HOST")
+                if not redis_host:
+                    raise RuntimeError("REDIS_HOST environment variable must be set in production!")
+            else:
+                redis_host = os.getenv("REDIS_HOST", "127.0.0.1")
+
+            self.redis_client = redis.Redis(
+                host=redis_host,
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                db=int(os.getenv("REDIS_DB", "0")),
+                decode_responses=True
+            )
+        return self.redis_client
+
+    async def resolve(self, symbols: Iterable[str]) -> Dict[str, str]:
+        """
+        Resolve sectors for a set of symbols.
+
+        Args:
+            symbols: Ticker symbols (duplicates and case are normalized)
+
+        Returns:
+            Dict of symbol -> sector. Symbols with no known sector map to 'Unknown'.
+        """
+        pending = sorted({s.upper() for s in symbols if s})
+        if not pending:
+            return {}
+
+        sectors: Dict[str, str] = {}
+
+        cached = self._read_redis(pending)
+        sectors.update(cached)
+        pending = [s for s in pending if s not in cached]
+
+        if pending:
+            stored = await self._read_metadata_table(pending)
+            sectors.update(stored)
+            pending = [s for s in pending if s not in stored]
+            if stored:
+                self._write_redis({symbol: {'sector': sector} for symbol, sector in stored.items()})
+
+        if pending:
+            profiles, answered = await self._fetch_fmp_profiles(pending)
+            # Profiles without a sector (many ETFs and funds) are treated like unknown symbols
+            known = {symbol: profile for symbol, profile in profiles.items() if profile['sector'] != 'Unknown'}
+            sectors.update({symbol: profile['sector'] for symbol, profile in known.items()})
+            self._write_redis(known)
+            # Only batches FMP actually answered are remembered as unknown, and only in Redis,
+            # so a sector FMP adds later is picked up once the short negative TTL expires
+            self._write_redis(
+                {symbol: profiles.get(symbol, {'sector': 'Unknown'}) for symbol in answered if symbol not in known},
+                ttl_seconds=NEGATIVE_TTL_SECONDS
+            )
+            if known:
+                await self._upsert_metadata_table(known)
+
+        for symbol in pending:
+            sectors.setdefault(symbol, 'Unknown')
+
+        logger.debug(f"Resolved sectors for {len(sectors)} symbols ({len(cached)} from Redis)")
+        return sectors
+
+    def _read_redis(self, symbols: List[str]) -> Dict[str, str]:
+        try:
+            values = self._get_redis_client().mget([f"{SECTOR_KEY_PREFIX}{s}" for s in symbols])
+        except Exception as e:
+            logger.warning(f"Redis sector lookup failed, falling back to durable store: {e}")
+            return {}
+
+        found = {}
+        for symbol, raw in zip(symbols, values):
+            if not raw:
+                continue
+            try:
+                found[symbol] = json.loads(raw).get('sector') or 'Unknown'
+            except (json.JSONDecodeError, AttributeError):
+                logger.warning(f"Failed to parse FMP sector data for {symbol}")
+        return found
+
+    def _write_redis(self, entries: Dict[str, Dict[str, str]], ttl_seconds: int = SECTOR_TTL_SECONDS):
+        if not entries:
+            return
+        try:
+            now = datetime.now(timezone.utc).isoformat()
+            pipe = self._get_redis_client().pipeline(transaction=False)
+            for symbol, data in entries.items():
+                pipe.setex(
+                    f"{SECTOR_KEY_PREFIX}{symbol}",
+                    ttl_seconds,
+                    json.dumps({
+                        'symbol': symbol,
+                        'sector': data.get('sector', 'Unknown'),
+                        'industry': data.get('industry', ''),
+                        'last_updated': now
+                    })
+                )
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to cache sectors in Redis: {e}")
+
+    async def _read_metadata_table(self, symbols: List[str]) -> Dict[str, str]:
+        try:
+            supabase = self._get_supabase_client()
+            result = await asyncio.to_thread(
+                lambda: supabase.table(METADATA_TABLE)
+                .select('symbol, sector')
+                .in_('symbol', symbols)
+                .execute()
+            )
+            # 'Unknown' rows (written by earlier versions) are misses, so FMP gets asked again
+            return {
+                row['symbol']: row['sector'] for row in (result.data or [])
+                if row.get('sector') and row['sector'] != 'Unknown'
+            }
+        except Exception as e:
+            logger.warning(f"Symbol metadata lookup failed: {e}")
+            return {}
+
+    async def _upsert_metadata_table(self, profiles: Dict[str, Dict[str, str]]):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {
+                'symbol': symbol,
+                'sector': profile['sector'],
+                'industry': profile.get('industry') or None,
+                'company_name': profile.get('company_name') or None,
+                'source': 'fmp',
+                'updated_at': now
+            }
+            for symbol, profile in profiles.items()
+        ]
+        try:
+            supabase = self._get_supabase_client()
+            await asyncio.to_thread(
+                lambda: supabase.table(METADATA_TABLE).upsert(rows, on_conflict='symbol').execute()
+            )
+            logger.info(f"💾 Persisted sector metadata for {len(rows)} symbols")
+        except Exception as e:
+            logger.warning(f"Failed to persist symbol metadata: {e}")
+
+    async def _fetch_fmp_profiles(self, symbols: List[str]) -> Tuple[Dict[str, Dict[str, str]], Set[str]]:
+        """
+        Fetch company profiles from FMP in comma-separated batches.
+
+        Returns:
+            Tuple of (symbol -> {'sector', 'industry', 'company_name'} for symbols
+            FMP knows, set of symbols whose batch request succeeded)
+        """
+        fmp_api_key = os.getenv('FINANCIAL_MODELING_PREP_API_KEY')
+        if not fmp_api_key:
+            logger.warning("FMP API key not configured")
+            return {}, set()
+
+        import httpx
+
+        batches = [symbols[i:i + FMP_PROFILE_BATCH_SIZE] for i in range(0, len(symbols), FMP_PROFILE_BATCH_SIZE)]
+        async with httpx.AsyncClient(timeout=30) as client:
+            results = await asyncio.gather(
+                *(self._fetch_profile_batch(client, batch, fmp_api_key) for batch in batches)
+            )
+
+        profiles = {}
+        answered = set()
+        for batch, batch_profiles in zip(batches, results):
+            if batch_profiles is not None:
+                profiles.update(batch_profiles)
+                answered.update(batch)
+        logger.info(f"📥 Fetched FMP sectors for {len(profiles)}/{len(symbols)} symbols in {len(batches)} call(s)")
+        return profiles, answered
+
+    async def _fetch_profile_batch(self, client, symbols: List[str], api_key: str) -> Optional[Dict[str, Dict[str, str]]]:
+        """Fetch one comma-separated /profile batch (None if the request failed)."""
+        url = f"https://financialmodelingprep.com/api/v3/profile/{','.join(symbols)}"
+        try:
+            response = await client.get(url, params={'apikey': api_key})
+            if response.status_code != 200:
+                logger.warning(f"FMP API error for batch of {len(symbols)} symbols: {response.status_code}")
+                return None
+            data = response.json()
+        except Exception as e:
+            logger.error(f"Error fetching FMP profiles for {len(symbols)} symbols: {e}")
+            return None
+
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list):
+            logger.warning(f"FMP API response for batch was not a list: {data}")
+            return None
+
+        requested = set(symbols)
+        profiles = {}
+        for profile in data:
+            symbol = (profile.get('symbol') or '').upper()
+            if symbol not in requested:
+                continue
+            profiles[symbol] = {
+                'sector': profile.get('sector') or 'Unknown',
+                'industry': profile.get('industry') or '',
+                'company_name': profile.get('companyName') or ''
+            }
+        return profiles
+
+
+# Global resolver instance
+_sector_resolver: Optional[SectorResolver] = None
+
+
+def get_sector_resolver() -> SectorResolver:
+    """Get or create the global sector resolver instance."""
+    global _sector_resolver
+    if _sector_resolver is None:
+        _sector_resolver = SectorResolver()
+    return _sector_resolver
@@ -21,6 +21,7 @@ from datetime import datetime
 from utils.supabase.db_client import get_supabase_client
 from utils.portfolio.snaptrade_provider import SnapTradePortfolioProvider
 from utils.portfolio.abstract_provider import Position
+from utils.portfolio.holdings_snapshot_loader import get_holdings_snapshot_loader
 
 logger = logging.getLogger(__name__)
 
@@ -91,6 +92,7 @@ class SnapTradeSyncService:
                     logger.error(f"Error upserting holding {symbol}: {e}", exc_info=True)
                     continue
             
+            get_holdings_snapshot_loader().invalidate(user_id)
             logger.info(f"✅ Synced {holdings_synced} holdings for user {user_id}")
             
             return {
@@ -163,6 +165,7 @@ class SnapTradeSyncService:
                     logger.error(f"Error updating position {position.symbol}: {e}")
                     continue
             
+            get_holdings_snapshot_loader().invalidate(user_id)
             logger.info(f"✅ Updated {updated} positions for account {account_id}")
             
             return {
@@ -5,6 +5,11 @@ Account Closure Analytics
 This module provides analytics and reporting functionality for account closure operations.
 It generates statistics, trends, and insights from account closure data.
 
+System-wide statistics, trends and health metrics read the daily rollup
+counters in account_closure_log_daily_rollups (migration 028), which a trigger
+bumps on every log AccountClosureLogger writes; they never scan raw logs.
+Per-account reports still read that account's logs.
+
 Responsibilities:
 - Statistics generation and aggregation
 - Trend analysis and reporting
@@ -14,8 +19,8 @@ Responsibilities:
 """
 
 import logging
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
 from collections import defaultdict
 
 from .account_closure_repository import account_closure_repository
@@ -41,32 +46,30 @@ class AccountClosureAnalytics:
             Dict[str, Any]: Comprehensive statistics
         """
         try:
-            # Calculate date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            # Get logs within date range
-            logs = self.repository.find_by_date_range(start_date, end_date)
+            start_date, end_date, rollups = self._load_rollups(days)
+            totals = [row for row in rollups if row["dimension"] == "total"]
             
             # Calculate basic metrics
-            total_logs = len(logs)
-            unique_accounts = len(set([log.get("account_id") for log in logs if log.get("account_id")]))
+            total_logs = sum(row["log_count"] for row in totals)
+            account_activity = self._sum_rollups(rollups, "account")
+            unique_accounts = len(account_activity)
             
-            # Count by log level
-            log_levels = self._count_by_field(logs, "log_level")
+            # Count by log level and step
+            log_levels = self._sum_rollups(rollups, "log_level")
+            steps = self._sum_rollups(rollups, "step")
             
-            # Count by step
-            steps = self._count_by_field(logs, "step_name")
+            # Daily activity
+            daily_counts = self._sum_rollups(rollups, "total", by="day")
             
-            # Calculate daily activity
-            daily_counts = self._calculate_daily_activity(logs)
-            
-            # Find most active accounts
-            top_accounts = self._get_top_accounts(logs, limit=10)
+            # Most active accounts
+            top_accounts = [
+                {"account_id": account_id, "log_count": count}
+                for account_id, count in sorted(account_activity.items(), key=lambda x: x[1], reverse=True)[:10]
+            ]
             
             # Calculate success/failure rates
-            success_logs = len([log for log in logs if "COMPLETED" in log.get("message", "")])
-            failure_logs = len([log for log in logs if "FAILED" in log.get("message", "")])
+            success_logs = sum(row["completed_count"] for row in totals)
+            failure_logs = sum(row["failed_count"] for row in totals)
             success_rate = round(success_logs / max(success_logs + failure_logs, 1) * 100, 2)
             
             statistics = {
@@ -94,65 +97,67 @@ class AccountClosureAnalytics:
             logger.error(f"Error generating account closure statistics: {e}")
             return {}
     
-    def _count_by_field(self, logs: List[Dict[str, Any]], field_name: str) -> Dict[str, int]:
+    def _load_rollups(
+        self,
+        days: int,
+        dimensions: Optional[List[str]] = None
+    ) -> Tuple[datetime, datetime, List[Dict[str, Any]]]:
         """
-        Count occurrences by a specific field.
+        Load the daily rollup rows covering the last `days` days (UTC).
         
         Args:
-            logs (List[Dict[str, Any]]): List of log entries
-            field_name (str): Field name to count by
+            days (int): Number of days to cover
+            dimensions (Optional[List[str]]): Only these rollup dimensions
             
         Returns:
-            Dict[str, int]: Count by field value
+            Tuple[datetime, datetime, List[Dict[str, Any]]]: Start, end and rollup rows
         """
-        counts = defaultdict(int)
-        for log in logs:
-            value = log.get(field_name, "UNKNOWN")
-            counts[value] += 1
-        return dict(counts)
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=days)
+        rollups = self.repository.find_daily_rollups(start_date.date(), end_date.date(), dimensions)
+        return start_date, end_date, rollups
     
-    def _calculate_daily_activity(self, logs: List[Dict[str, Any]]) -> Dict[str, int]:
+    def _sum_rollups(
+        self,
+        rollups: List[Dict[str, Any]],
+        dimension: str,
+        by: str = "key",
+        counter: str = "log_count"
+    ) -> Dict[str, int]:
         """
-        Calculate daily activity counts.
+        Sum one counter of a rollup dimension, grouped by key or by day.
         
         Args:
-            logs (List[Dict[str, Any]]): List of log entries
+            rollups (List[Dict[str, Any]]): Rollup rows
+            dimension (str): Dimension to sum ('total', 'log_level', 'step', 'account')
+            by (str): Group by 'key' or 'day'
+            counter (str): Counter column to sum
             
         Returns:
-            Dict[str, int]: Daily activity counts
+            Dict[str, int]: Sum per key or day
         """
-        daily_counts = defaultdict(int)
-        for log in logs:
-            created_at = log.get("created_at", "")
-            if created_at:
-                try:
-                    date_obj = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    date_key = date_obj.strftime('%Y-%m-%d')
-                    daily_counts[date_key] += 1
-                except:
-                    pass
-        return dict(daily_counts)
+        sums = defaultdict(int)
+        for row in rollups:
+            if row["dimension"] == dimension:
+                sums[row[by]] += row[counter]
+        return dict(sums)
     
-    def _get_top_accounts(self, logs: List[Dict[str, Any]], limit: int = 10) -> List[Dict[str, Any]]:
+    def _count_by_field(self, logs: List[Dict[str, Any]], field_name: str) -> Dict[str, int]:
         """
-        Get accounts with the most activity.
+        Count occurrences by a specific field.
         
         Args:
             logs (List[Dict[str, Any]]): List of log entries
-            limit (int): Maximum number of accounts to return
+            field_name (str): Field name to count by
             
         Returns:
-            List[Dict[str, Any]]: Top accounts by activity
+            Dict[str, int]: Count by field value
         """
-        account_activity = defaultdict(int)
+        counts = defaultdict(int)
         for log in logs:
-            account_id = log.get("account_id")
-            if account_id:
-                account_activity[account_id] += 1
-        
-        # Sort accounts by activity
-        sorted_accounts = sorted(account_activity.items(), key=lambda x: x[1], reverse=True)
-        return [{"account_id": acc, "log_count": count} for acc, count in sorted_accounts[:limit]]
+            value = log.get(field_name, "UNKNOWN")
+            counts[value] += 1
+        return dict(counts)
     
     def generate_trend_analysis(self, days: int = 90) -> Dict[str, Any]:
         """
@@ -165,20 +170,16 @@ class AccountClosureAnalytics:
             Dict[str, Any]: Trend analysis data
         """
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            # Get logs for trend analysis
-            logs = self.repository.find_by_date_range(start_date, end_date)
+            start_date, end_date, rollups = self._load_rollups(days, ["total", "account"])
             
             # Calculate weekly trends
-            weekly_trends = self._calculate_weekly_trends(logs, days)
+            weekly_trends = self._calculate_weekly_trends(rollups)
             
             # Calculate error rate trends
-            error_trends = self._calculate_error_trends(logs, days)
+            error_trends = self._calculate_error_trends(rollups)
             
             # Calculate completion rate trends
-            completion_trends = self._calculate_completion_trends(logs, days)
+            completion_trends = self._calculate_completion_trends(rollups)
             
             trend_analysis = {
                 "period": {
@@ -197,51 +198,32 @@ class AccountClosureAnalytics:
             logger.error(f"Error generating trend analysis: {e}")
             return {}
     
-    def _calculate_weekly_trends(self, logs: List[Dict[str, Any]], days: int) -> List[Dict[str, Any]]:
-        """Calculate weekly activity trends."""
+    def _calculate_weekly_trends(self, rollups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Calculate weekly activity trends from the daily totals."""
         weekly_data = defaultdict(int)
         
-        for log in logs:
-            created_at = log.get("created_at", "")
-            if created_at:
-                try:
-                    date_obj = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    # Get the start of the week (Monday)
-                    week_start = date_obj - timedelta(days=date_obj.weekday())
-                    week_key = week_start.strftime('%Y-%m-%d')
-                    weekly_data[week_key] += 1
-                except:
-                    pass
+        for day, count in self._sum_rollups(rollups, "total", by="day").items():
+            day_obj = date.fromisoformat(day)
+            # Get the start of the week (Monday)
+            week_start = day_obj - timedelta(days=day_obj.weekday())
+            weekly_data[week_start.isoformat()] += count
         
         # Convert to sorted list
         return [{"week_start": week, "activity_count": count} 
                 for week, count in sorted(weekly_data.items())]
     
-    def _calculate_error_trends(self, logs: List[Dict[str, Any]], days: int) -> List[Dict[str, Any]]:
-        """Calculate error rate trends."""
-        daily_errors = defaultdict(int)
-        daily_totals = defaultdict(int)
-        
-        for log in logs:
-            created_at = log.get("created_at", "")
-            if created_at:
-                try:
-                    date_obj = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    date_key = date_obj.strftime('%Y-%m-%d')
-                    daily_totals[date_key] += 1
-                    
-                    if log.get("log_level") == "ERROR":
-                        daily_errors[date_key] += 1
-                except:
-                    pass
+    def _calculate_error_trends(self, rollups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Calculate error rate trends from the daily totals."""
+        daily_totals = self._sum_rollups(rollups, "total", by="day")
+        daily_errors = self._sum_rollups(rollups, "total", by="day", counter="error_count")
         
         # Calculate error rates
         error_rates = []
-        for date, total in daily_totals.items():
-            error_count = daily_errors.get(date, 0)
+        for day, total in daily_totals.items():
+            error_count = daily_errors.get(day, 0)
             error_rate = round((error_count / total) * 100, 2) if total > 0 else 0
             error_rates.append({
-                "date": date,
+                "date": day,
                 "error_count": error_count,
                 "total_logs": total,
                 "error_rate": error_rate
@@ -249,35 +231,21 @@ class AccountClosureAnalytics:
         
         return sorted(error_rates, key=lambda x: x["date"])
     
-    def _calculate_completion_trends(self, logs: List[Dict[str, Any]], days: int) -> List[Dict[str, Any]]:
-        """Calculate completion rate trends."""
-        daily_completions = defaultdict(int)
-        daily_accounts = defaultdict(set)
-        
-        for log in logs:
-            created_at = log.get("created_at", "")
-            account_id = log.get("account_id")
-            message = log.get("message", "")
-            
-            if created_at and account_id:
-                try:
-                    date_obj = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    date_key = date_obj.strftime('%Y-%m-%d')
-                    daily_accounts[date_key].add(account_id)
-                    
-                    if "COMPLETED" in message:
-                        daily_completions[date_key] += 1
-                except:
-                    pass
+    def _calculate_completion_trends(self, rollups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Calculate completion rate trends from the per-account daily rollups."""
+        daily_completions = self._sum_rollups(rollups, "account", by="day", counter="completed_count")
+        daily_accounts = defaultdict(int)
+        for row in rollups:
+            if row["dimension"] == "account":
+                daily_accounts[row["day"]] += 1
         
         # Calculate completion rates
         completion_rates = []
-        for date, accounts in daily_accounts.items():
-            completion_count = daily_completions.get(date, 0)
-            total_accounts = len(accounts)
+        for day, total_accounts in daily_accounts.items():
+            completion_count = daily_completions.get(day, 0)
             completion_rate = round((completion_count / total_accounts) * 100, 2) if total_accounts > 0 else 0
             completion_rates.append({
-                "date": date,
+                "date": day,
                 "completions": completion_count,
                 "total_accounts": total_accounts,
                 "completion_rate": completion_rate
@@ -360,15 +328,13 @@ class AccountClosureAnalytics:
             Dict[str, Any]: System health metrics
         """
         try:
-            # Get recent logs (last 24 hours)
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=1)
-            recent_logs = self.repository.find_by_date_range(start_date, end_date)
+            # Today's and yesterday's rollups (UTC days)
+            _, _, rollups = self._load_rollups(1, ["total", "account"])
             
             # Calculate health metrics
-            total_activity = len(recent_logs)
-            error_count = len([log for log in recent_logs if log.get("log_level") == "ERROR"])
-            active_accounts = len(set([log.get("account_id") for log in recent_logs if log.get("account_id")]))
+            total_activity = sum(self._sum_rollups(rollups, "total").values())
+            error_count = sum(self._sum_rollups(rollups, "total", counter="error_count").values())
+            active_accounts = len(self._sum_rollups(rollups, "account"))
             
             # Calculate error rate
             error_rate = round((error_count / total_activity) * 100, 2) if total_activity > 0 else 0
@@ -381,7 +347,7 @@ class AccountClosureAnalytics:
                 health_status = "warning"
             
             metrics = {
-                "period": "last_24_hours",
+                "period": "today_and_yesterday_utc",
                 "health_status": health_status,
                 "metrics": {
                     "total_activity": total_activity,
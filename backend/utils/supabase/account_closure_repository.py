@@ -15,7 +15,7 @@ Responsibilities:
 
 import logging
 from typing import Dict, Any, Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 from .db_client import get_supabase_client, CustomJSONEncoder
 
@@ -29,6 +29,7 @@ class AccountClosureRepository:
         """Initialize the repository."""
         self.supabase = get_supabase_client()
         self.table_name = "account_closure_logs"
+        self.rollup_table_name = "account_closure_log_daily_rollups"
     
     def insert_log(self, log_entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -284,6 +285,54 @@ class AccountClosureRepository:
             logger.error(f"Error counting logs with filters: {e}")
             return 0
 
+    
+    def find_daily_rollups(
+        self,
+        start_day: date,
+        end_day: date,
+        dimensions: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find daily rollup counters within a day range.
+        
+        The rollups are maintained by a trigger on every log insert
+        (migration 028), so this reads one row per day and key however many
+        logs were written.
+        
+        Args:
+            start_day (date): First day (inclusive)
+            end_day (date): Last day (inclusive)
+            dimensions (Optional[List[str]]): Only these dimensions
+                ('total', 'log_level', 'step', 'account')
+            
+        Returns:
+            List[Dict[str, Any]]: Rollup rows ordered by day
+        """
+        try:
+            rows: List[Dict[str, Any]] = []
+            offset = 0
+            page_size = 1000
+            while True:
+                query = self.supabase.table(self.rollup_table_name) \
+                    .select("day, dimension, key, log_count, error_count, completed_count, failed_count") \
+                    .gte("day", start_day.isoformat()) \
+                    .lte("day", end_day.isoformat())
+                
+                if dimensions:
+                    query = query.in_("dimension", dimensions)
+                
+                result = query.order("day").order("dimension").order("key") \
+                    .range(offset, offset + page_size - 1) \
+                    .execute()
+                page = result.data or []
+                rows.extend(page)
+                if len(page) < page_size:
+                    return rows
+                offset += len(page)
+        except Exception as e:
+            logger.error(f"Error finding account closure log rollups: {e}")
+            return []
+
 
 # Create a singleton instance for easy access
 account_closure_repository = AccountClosureRepository() 
\ No newline at end of file
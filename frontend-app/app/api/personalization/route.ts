@@ -70,6 +70,44 @@ function formatPersonalizationFromDatabase(record: UserPersonalizationRow): Pers
   };
 }
 
+/**
+ * Tells the backend to drop the agent's cached personalization context for this user
+ * so the next chat step uses the new preferences. Failures are logged, not surfaced:
+ * the cache also expires on its own.
+ */
+async function invalidateAgentPersonalizationCache(
+  supabase: Awaited<ReturnType<typeof createClient>>
+): Promise<void> {
+  const backendUrl = process.env.BACKEND_API_URL;
+  const backendApiKey = process.env.BACKEND_API_KEY;
+  if (!backendUrl || !backendApiKey) {
+    return;
+  }
+
+  try {
+    const { data: { session } } = await supabase.auth.getSession();
+    if (!session?.access_token) {
+      return;
+    }
+
+    const response = await fetch(`${backendUrl}/api/user/personalization/invalidate-cache`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'x-api-key': backendApiKey,
+        'Authorization': `Bearer ${session.access_token}`,
+      },
+      cache: 'no-store'
+    });
+
+    if (!response.ok) {
+      console.warn(`Personalization cache invalidation failed with status: ${response.status}`);
+    }
+  } catch (error) {
+    console.warn('Personalization cache invalidation failed:', error);
+  }
+}
+
 /**
  * GET /api/personalization
  * Retrieves the user's personalization data
@@ -190,6 +228,8 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    await invalidateAgentPersonalizationCache(supabase);
+
     // Convert back to application format for response
     const formattedData = formatPersonalizationFromDatabase(insertedData as UserPersonalizationRow);
 
@@ -271,6 +311,8 @@ export async function PUT(request: NextRequest) {
       );
     }
 
+    await invalidateAgentPersonalizationCache(supabase);
+
     // Convert back to application format for response
     const formattedData = formatPersonalizationFromDatabase(updatedData as UserPersonalizationRow);
 